@@ -11,6 +11,7 @@ from .models import (
     SessaoTratamento, RelatorioTratamentoConfig,
     WhatsAppTarifaOficial, HistoricoCustoWhatsAppOficial,
     CidadeOfertaEspecial,
+    SchedulerJobExecucao,
 )
 
 
@@ -445,3 +446,20 @@ class HistoricoCustoWhatsAppOficialAdmin(admin.ModelAdmin):
     search_fields = ('telefone', 'template_name', 'message_id')
     date_hierarchy = 'criado_em'
     ordering = ('-criado_em',)
+
+
+@admin.register(SchedulerJobExecucao)
+class SchedulerJobExecucaoAdmin(admin.ModelAdmin):
+    list_display = (
+        'job_id',
+        'pool',
+        'status',
+        'iniciado_em',
+        'duracao_ms',
+        'linhas_afetadas',
+        'host',
+    )
+    list_filter = ('status', 'pool', 'job_id')
+    search_fields = ('job_id', 'erro')
+    date_hierarchy = 'iniciado_em'
+    ordering = ('-iniciado_em',)
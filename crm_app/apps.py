@@ -10,8 +10,12 @@ class CrmAppConfig(AppConfig):
         import crm_app.signals
         import crm_app.signals_m10  # Novos signals para M-10 automático
         import crm_app.signals_m10_automacao  # Automação de M-10 com FPD
+        import crm_app.signals_qualidade  # noqa: F401 — invalida o rollup do Qualidade/FPD
+        import crm_app.signals_busca  # noqa: F401 — índice de busca textual (DocumentoBusca)
         import crm_app.pap_job_fila  # noqa: F401 — modelo PapJobFila
         import crm_app.whatsapp_webhook_fila  # noqa: F401 — modelo WhatsappWebhookFila
+        import crm_app.job_fila  # noqa: F401 — modelo JobFila (fila genérica: importações)
+        import crm_app.whatsapp_roteador  # noqa: F401 — cache write-through de SessaoWhatsapp
         import crm_app.services.whatsapp_ia_config_service  # noqa: F401 — invalidação cache blocklist
 
         # Scheduler em processo dedicado: python manage.py run_scheduler (ver Procfile).
@@ -27,7 +27,12 @@ logger = logging.getLogger(__name__)
 def _is_member(user, groups) -> bool:
     if not user or not getattr(user, "is_authenticated", False):
         return False
-    return user.is_superuser or user.groups.filter(name__in=groups).exists()
+    if user.is_superuser:
+        return True
+    from usuarios.autorizacao import snapshot_autorizacao
+
+    snap = snapshot_autorizacao(user)
+    return snap.tem_grupo(groups) if snap is not None else user.groups.filter(name__in=groups).exists()
 
 
 def _normalize_phone(raw: Optional[str]) -> str:
@@ -3,7 +3,6 @@ import logging
 from datetime import datetime, timedelta
 from io import BytesIO
 
-import openpyxl
 from django.core.cache import cache
 from django.http import HttpResponse
 from django.utils import timezone
@@ -220,6 +219,8 @@ class AuditoriaSemSlotRelatorioView(APIView):
             criado_em__date__lte=d_fim,
         ).select_related('usuario', 'venda', 'venda__cliente', 'venda__vendedor').order_by('criado_em')
 
+        import openpyxl
+
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = 'Sem SLOT'
@@ -0,0 +1,9 @@
+"""
+Benchmark dos endpoints mais pesados do CRM (tempo, nº de queries e planos EXPLAIN).
+
+- `dados_sinteticos`: popula um banco de benchmark com volumes realistas (Faker pt_BR).
+- `cenarios`: endpoints/serviços medidos (VendaViewSet.list, esteira-contadores, ...).
+- `executor`: mede cada cenário, captura EXPLAIN das queries e compara com o baseline.
+
+Entrada: python manage.py benchmark_crm (ver o comando para as opções).
+"""
@@ -0,0 +1,75 @@
+"""
+Cenários medidos pelo benchmark: cada um recebe o usuário e executa a view/serviço.
+
+Views DRF rodam via APIRequestFactory + force_authenticate e a resposta é renderizada,
+para que serialização e JSON entrem na conta como numa requisição real.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from django.utils import timezone
+
+
+def _executar_view(view, path: str, params: Dict[str, Any], usuario) -> Any:
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    request = APIRequestFactory().get(path, params)
+    force_authenticate(request, user=usuario)
+    response = view(request)
+    if hasattr(response, 'render'):
+        response.render()
+    if getattr(response, 'status_code', 200) >= 400:
+        raise RuntimeError(f'{path} respondeu HTTP {response.status_code}')
+    return response
+
+
+def venda_list(usuario):
+    from crm_app.views import VendaViewSet
+
+    view = VendaViewSet.as_view({'get': 'list'})
+    return _executar_view(view, '/api/crm/vendas/', {'page': 1, 'view': 'geral'}, usuario)
+
+
+def esteira_contadores(usuario):
+    from crm_app.views import VendaViewSet
+
+    view = VendaViewSet.as_view({'get': 'esteira_contadores'})
+    return _executar_view(view, '/api/crm/vendas/esteira-contadores/', {}, usuario)
+
+
+def painel_performance(usuario):
+    from crm_app.views import PainelPerformanceView
+
+    return _executar_view(PainelPerformanceView.as_view(), '/api/crm/performance-painel/', {}, usuario)
+
+
+def dashboard_resumo(usuario):
+    from crm_app.views import DashboardResumoView
+
+    return _executar_view(DashboardResumoView.as_view(), '/api/crm/dashboard-resumo/', {}, usuario)
+
+
+def folha_mes(usuario):
+    from crm_app.comissao_folha_service import calcular_folha_mes
+
+    hoje = timezone.localdate()
+    return calcular_folha_mes(hoje.year, hoje.month)
+
+
+def qualidade_dashboard(usuario):
+    from crm_app.services.qualidade_service import LENTE_VENCIMENTO, dashboard_qualidade
+
+    mes = timezone.localdate().strftime('%Y-%m')
+    return dashboard_qualidade(LENTE_VENCIMENTO, mes, usuario, {'page': 1, 'page_size': 100})
+
+
+CENARIOS: 'OrderedDict[str, Callable[[Any], Any]]' = OrderedDict([
+    ('venda_list', venda_list),
+    ('esteira_contadores', esteira_contadores),
+    ('painel_performance', painel_performance),
+    ('dashboard_resumo', dashboard_resumo),
+    ('calcular_folha_mes', folha_mes),
+    ('dashboard_qualidade', qualidade_dashboard),
+])
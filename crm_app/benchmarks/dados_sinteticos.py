@@ -0,0 +1,283 @@
+"""
+Gerador de dados sintéticos para o benchmark (Faker pt_BR, seed fixa = reprodutível).
+
+Cria usuários (supervisores + vendedores), clientes, vendas em vários status da
+esteira, contratos M10 com faturas e linhas de ImportacaoOsab. Tudo via bulk_create
+(sem signals) e marcado com o prefixo `BENCH` para `limpar_dados` conseguir remover.
+
+Rodar só em banco de benchmark/dev: o comando exige DEBUG ou --forcar.
+"""
+from __future__ import annotations
+
+import logging
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = 'BENCH'
+USUARIO_ADMIN = 'bench_admin'
+BATCH = 2000
+
+# Volumes com escala=1.0 (ordem de grandeza de um mês cheio em produção)
+VOLUMES_BASE = {
+    'supervisores': 8,
+    'vendedores': 120,
+    'vendas': 20_000,
+    'contratos_m10': 8_000,
+    'faturas_por_contrato': 3,
+    'osab': 20_000,
+}
+
+_STATUS_ESTEIRA = (
+    ('INSTALADA', 'FECHADO', 45),
+    ('AGENDADO', 'ABERTO', 25),
+    ('PENDENCIADA', 'ABERTO', 15),
+    ('CANCELADA', 'FECHADO', 10),
+    ('EM ANÁLISE', 'ABERTO', 5),
+)
+_STATUS_TRATAMENTO = (('CADASTRADA', 'FECHADO'), ('SEM TRATAMENTO', 'ABERTO'))
+_STATUS_FATURA = (('PAGO', 60), ('NAO_PAGO', 20), ('ATRASADO', 10), ('AGUARDANDO', 10))
+
+
+def volumes(escala: float) -> Dict[str, int]:
+    return {
+        k: max(1, int(v * escala)) if k != 'faturas_por_contrato' else v
+        for k, v in VOLUMES_BASE.items()
+    }
+
+
+def _escolha_ponderada(rng: random.Random, opcoes):
+    return rng.choices(opcoes, weights=[o[-1] for o in opcoes], k=1)[0]
+
+
+def _bulk(model, objs: List, log: Callable[[str], None]) -> None:
+    for i in range(0, len(objs), BATCH):
+        model.objects.bulk_create(objs[i:i + BATCH])
+    log(f'  {model.__name__}: {len(objs)}')
+
+
+def gerar_dados(
+    escala: float = 1.0,
+    seed: int = 42,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, int]:
+    """Popula o banco; retorna as quantidades criadas por tipo."""
+    from faker import Faker
+
+    from crm_app.models import (
+        Cliente, ContratoM10, FaturaM10, FormaPagamento, ImportacaoOsab, MotivoPendencia,
+        Operadora, Plano, StatusCRM, Venda,
+    )
+    from usuarios.models import Perfil, Usuario
+
+    log = log or logger.info
+    fake = Faker('pt_BR')
+    Faker.seed(seed)
+    rng = random.Random(seed)
+    vol = volumes(escala)
+    hoje = timezone.localdate()
+
+    with transaction.atomic():
+        perfis = {
+            nome: Perfil.objects.get_or_create(nome=nome, defaults={'cod_perfil': f'{PREFIXO}_{nome.upper()}'})[0]
+            for nome in ('Diretoria', 'Supervisor', 'Vendedor')
+        }
+        for nome in ('Diretoria', 'Supervisor', 'Vendedor'):
+            Group.objects.get_or_create(name=nome)
+
+        admin, _ = Usuario.objects.get_or_create(
+            username=USUARIO_ADMIN,
+            defaults={'is_superuser': True, 'is_staff': True, 'perfil': perfis['Diretoria']},
+        )
+
+        operadora, _ = Operadora.objects.get_or_create(nome=f'{PREFIXO} NIO')
+        planos = [
+            Plano.objects.get_or_create(
+                nome=f'{PREFIXO} {mb} MEGA', operadora=operadora,
+                defaults={'valor': Decimal(valor), 'comissao_base': Decimal('50.00')},
+            )[0]
+            for mb, valor in ((300, '99.90'), (500, '119.90'), (700, '149.90'), (1000, '199.90'))
+        ]
+        formas = [
+            FormaPagamento.objects.get_or_create(nome=f'{PREFIXO} {n}')[0]
+            for n in ('BOLETO', 'DACC', 'CARTAO')
+        ]
+        st_esteira = {
+            nome: StatusCRM.objects.get_or_create(nome=nome, tipo='Esteira', defaults={'estado': estado})[0]
+            for nome, estado, _p in _STATUS_ESTEIRA
+        }
+        st_trat = [
+            StatusCRM.objects.get_or_create(nome=nome, tipo='Tratamento', defaults={'estado': estado})[0]
+            for nome, estado in _STATUS_TRATAMENTO
+        ]
+        motivo, _ = MotivoPendencia.objects.get_or_create(
+            nome=f'{PREFIXO} CLIENTE AUSENTE', defaults={'tipo_pendencia': 'CLIENTE'},
+        )
+
+        log(f'Gerando dados sintéticos (escala={escala}, seed={seed})...')
+        base_user = Usuario.objects.filter(username__startswith='bench_').count()
+        supervisores = [
+            Usuario(
+                username=f'bench_sup_{base_user + i}', first_name=fake.first_name(), last_name=fake.last_name(),
+                perfil=perfis['Supervisor'], canal='PAP', cluster=rng.choice(['CLUSTER_1', 'CLUSTER_2', 'CLUSTER_3']),
+            )
+            for i in range(vol['supervisores'])
+        ]
+        _bulk(Usuario, supervisores, log)
+        supervisores = list(Usuario.objects.filter(username__startswith='bench_sup_'))
+        vendedores = [
+            Usuario(
+                username=f'bench_vend_{base_user + i}', first_name=fake.first_name(), last_name=fake.last_name(),
+                perfil=perfis['Vendedor'], canal='PAP', supervisor=rng.choice(supervisores),
+                cluster=rng.choice(['CLUSTER_1', 'CLUSTER_2', 'CLUSTER_3']),
+                matricula_pap=str(rng.randint(100000, 999999)),
+            )
+            for i in range(vol['vendedores'])
+        ]
+        _bulk(Usuario, vendedores, log)
+        vendedores = list(Usuario.objects.filter(username__startswith='bench_vend_'))
+
+        base_cli = Cliente.objects.filter(nome_razao_social__startswith=PREFIXO).count()
+        clientes = [
+            Cliente(cpf_cnpj=f'9{base_cli + i:010d}', nome_razao_social=f'{PREFIXO} {fake.name()}'.upper())
+            for i in range(vol['vendas'])
+        ]
+        _bulk(Cliente, clientes, log)
+        clientes = list(
+            Cliente.objects.filter(nome_razao_social__startswith=PREFIXO).order_by('-id')[:vol['vendas']]
+        )
+
+        vendas = []
+        for i, cliente in enumerate(clientes):
+            nome_st, _estado, _p = _escolha_ponderada(rng, _STATUS_ESTEIRA)
+            criado = hoje - timedelta(days=rng.randint(0, 90))
+            instalada = nome_st == 'INSTALADA'
+            vendas.append(Venda(
+                vendedor=rng.choice(vendedores),
+                cliente=cliente,
+                plano=rng.choice(planos),
+                forma_pagamento=rng.choice(formas),
+                status_tratamento=rng.choice(st_trat),
+                status_esteira=st_esteira[nome_st],
+                motivo_pendencia=motivo if nome_st == 'PENDENCIADA' else None,
+                ordem_servico=f'{70_000_000 + base_cli + i}',
+                data_abertura=timezone.make_aware(datetime.combine(criado, time(10, 0))),
+                data_agendamento=criado + timedelta(days=rng.randint(1, 7)) if nome_st != 'CANCELADA' else None,
+                periodo_agendamento=rng.choice(['MANHA', 'TARDE']),
+                data_instalacao=criado + timedelta(days=rng.randint(1, 10)) if instalada else None,
+                cep=fake.postcode(formatted=False),
+                logradouro=fake.street_name()[:255],
+                numero_residencia=str(rng.randint(1, 2000)),
+                bairro=fake.bairro()[:100],
+                cidade=fake.city()[:100],
+                estado=fake.estado_sigla(),
+                telefone1=f'319{rng.randint(10_000_000, 99_999_999)}',
+                ativo=True,
+            ))
+        _bulk(Venda, vendas, log)
+        # auto_now_add ignora o valor do objeto: espalha data_criacao nos últimos 90 dias
+        ids = list(Venda.objects.filter(cliente__nome_razao_social__startswith=PREFIXO).values_list('id', flat=True))
+        for dias in range(0, 91, 7):
+            lote = ids[dias::13]
+            Venda.objects.filter(id__in=lote).update(
+                data_criacao=timezone.now() - timedelta(days=dias, hours=rng.randint(0, 12)),
+            )
+
+        vendas_inst = list(
+            Venda.objects.filter(
+                cliente__nome_razao_social__startswith=PREFIXO, data_instalacao__isnull=False,
+            ).select_related('cliente', 'vendedor', 'plano')[:vol['contratos_m10']]
+        )
+        contratos = []
+        for v in vendas_inst:
+            contratos.append(ContratoM10(
+                venda=v,
+                numero_contrato=f'{PREFIXO}-{v.ordem_servico}',
+                ordem_servico=v.ordem_servico,
+                cliente_nome=v.cliente.nome_razao_social,
+                cpf_cliente=v.cliente.cpf_cnpj,
+                vendedor=v.vendedor,
+                data_instalacao=v.data_instalacao,
+                safra=v.data_instalacao.strftime('%Y-%m'),
+                plano_original=v.plano.nome,
+                plano_atual=v.plano.nome,
+                valor_plano=v.plano.valor,
+                status_contrato='ATIVO',
+            ))
+        _bulk(ContratoM10, contratos, log)
+
+        faturas = []
+        for c in ContratoM10.objects.filter(numero_contrato__startswith=f'{PREFIXO}-').only('id', 'data_instalacao', 'valor_plano'):
+            for n in range(1, vol['faturas_por_contrato'] + 1):
+                venc = c.data_instalacao + timedelta(days=30 * n)
+                st = _escolha_ponderada(rng, _STATUS_FATURA)[0]
+                faturas.append(FaturaM10(
+                    contrato=c,
+                    numero_fatura=n,
+                    valor=c.valor_plano,
+                    data_vencimento=venc,
+                    data_pagamento=venc - timedelta(days=rng.randint(0, 5)) if st == 'PAGO' else None,
+                    status=st,
+                    dias_atraso=rng.randint(1, 60) if st == 'ATRASADO' else 0,
+                ))
+        _bulk(FaturaM10, faturas, log)
+
+        osab = []
+        for i in range(vol['osab']):
+            dt = hoje - timedelta(days=rng.randint(0, 90))
+            osab.append(ImportacaoOsab(
+                produto=f'{PREFIXO} FIBRA',
+                uf=fake.estado_sigla(),
+                dt_ref=dt,
+                documento=f'{80_000_000 + i}',
+                cliente=fake.name()[:255],
+                matricula_vendedor=rng.choice(vendedores).matricula_pap,
+                data_abertura=timezone.make_aware(datetime.combine(dt, time(9, 0))),
+                data_fechamento=dt + timedelta(days=rng.randint(0, 10)),
+                situacao=rng.choice(['CONCLUIDO', 'PENDENTE', 'CANCELADO', 'EM APROVISIONAMENTO']),
+                safra=dt.strftime('%Y%m'),
+            ))
+        _bulk(ImportacaoOsab, osab, log)
+
+    return {
+        'usuarios': len(supervisores) + len(vendedores),
+        'vendas': len(vendas),
+        'contratos_m10': len(contratos),
+        'faturas_m10': len(faturas),
+        'osab': len(osab),
+        'admin_id': admin.id,
+    }
+
+
+def limpar_dados(log: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+    """Remove o que `gerar_dados` criou (pelo prefixo)."""
+    from crm_app.models import Cliente, ContratoM10, ImportacaoOsab, Venda
+    from usuarios.models import Usuario
+
+    log = log or logger.info
+    removidos = {}
+    with transaction.atomic():
+        removidos['contratos_m10'] = ContratoM10.objects.filter(numero_contrato__startswith=f'{PREFIXO}-').delete()[0]
+        removidos['vendas'] = Venda.objects.filter(cliente__nome_razao_social__startswith=PREFIXO).delete()[0]
+        removidos['clientes'] = Cliente.objects.filter(nome_razao_social__startswith=PREFIXO).delete()[0]
+        removidos['osab'] = ImportacaoOsab.objects.filter(produto=f'{PREFIXO} FIBRA').delete()[0]
+        removidos['usuarios'] = Usuario.objects.filter(username__startswith='bench_').delete()[0]
+    log(f'Dados de benchmark removidos: {removidos}')
+    return removidos
+
+
+def usuario_benchmark():
+    from usuarios.models import Usuario
+
+    return Usuario.objects.filter(username=USUARIO_ADMIN).first()
+
+
+def mes_referencia() -> date:
+    return timezone.localdate().replace(day=1)
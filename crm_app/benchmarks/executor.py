@@ -0,0 +1,210 @@
+"""
+Mede os cenários (tempo, queries, EXPLAIN) e compara com o baseline salvo em JSON.
+
+Plano normalizado = sequência de nós (tipo + tabela + índice), sem custos/linhas, para
+o diff não oscilar com estatísticas. PostgreSQL usa EXPLAIN (FORMAT JSON); SQLite usa
+EXPLAIN QUERY PLAN (útil para dev, mas o baseline de referência é o do Postgres).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import statistics
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger(__name__)
+
+TOP_QUERIES = 15
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_LISTA_IN = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_RE_ESPACOS = re.compile(r'\s+')
+
+
+def normalizar_sql(sql: str) -> str:
+    """Troca literais por `?` e colapsa listas IN, para agrupar a mesma query."""
+    sql = _RE_STRING.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = _RE_LISTA_IN.sub('(...)', sql)
+    return _RE_ESPACOS.sub(' ', sql).strip()
+
+
+def hash_sql(sql_normalizado: str) -> str:
+    return hashlib.sha1(sql_normalizado.encode('utf-8')).hexdigest()[:12]
+
+
+def _nos_plano_postgres(plano: Dict[str, Any], saida: List[str]) -> None:
+    partes = [plano.get('Node Type', '?')]
+    if plano.get('Relation Name'):
+        partes.append(plano['Relation Name'])
+    if plano.get('Index Name'):
+        partes.append(plano['Index Name'])
+    saida.append(':'.join(partes))
+    for filho in plano.get('Plans') or []:
+        _nos_plano_postgres(filho, saida)
+
+
+def explicar(sql: str) -> Optional[List[str]]:
+    """Plano normalizado da query (None se não for SELECT ou o EXPLAIN falhar)."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+                bruto = cursor.fetchone()[0]
+                if isinstance(bruto, str):
+                    bruto = json.loads(bruto)
+                nos: List[str] = []
+                _nos_plano_postgres(bruto[0]['Plan'], nos)
+                return nos
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                return [_RE_NUMERO.sub('?', str(linha[-1])) for linha in cursor.fetchall()]
+    except Exception as e:
+        logger.debug('[BENCH] EXPLAIN falhou: %s', e)
+    return None
+
+
+def medir_cenario(
+    nome: str,
+    func: Callable[[Any], Any],
+    usuario,
+    *,
+    repeticoes: int = 5,
+    com_explain: bool = True,
+) -> Dict[str, Any]:
+    """Executa 1× aquecendo + captura queries, depois `repeticoes`× cronometrado."""
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as ctx:
+            func(usuario)
+        transaction.set_rollback(True)
+
+    agrupadas: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+    for q in ctx.captured_queries:
+        norm = normalizar_sql(q['sql'])
+        h = hash_sql(norm)
+        item = agrupadas.setdefault(h, {'hash': h, 'sql': q['sql'], 'execucoes': 0, 'tempo_ms': 0.0})
+        item['execucoes'] += 1
+        item['tempo_ms'] += float(q.get('time') or 0) * 1000
+
+    top = sorted(agrupadas.values(), key=lambda i: i['tempo_ms'], reverse=True)[:TOP_QUERIES]
+    for item in top:
+        item['tempo_ms'] = round(item['tempo_ms'], 2)
+        item['plano'] = explicar(item['sql']) if com_explain else None
+        item['sql'] = item['sql'][:800]
+
+    tempos = []
+    for _ in range(max(1, repeticoes)):
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            func(usuario)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            transaction.set_rollback(True)
+    tempos.sort()
+
+    return {
+        'cenario': nome,
+        'tempo_ms': round(statistics.median(tempos), 1),
+        'tempo_ms_max': round(tempos[-1], 1),
+        'queries': len(ctx.captured_queries),
+        'queries_repetidas': sum(i['execucoes'] - 1 for i in agrupadas.values() if i['execucoes'] > 1),
+        'top_queries': top,
+    }
+
+
+def executar(
+    cenarios: Dict[str, Callable[[Any], Any]],
+    usuario,
+    *,
+    repeticoes: int = 5,
+    com_explain: bool = True,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    log = log or logger.info
+    resultado: Dict[str, Any] = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'vendor': connection.vendor,
+        'cenarios': {},
+    }
+    for nome, func in cenarios.items():
+        try:
+            medido = medir_cenario(nome, func, usuario, repeticoes=repeticoes, com_explain=com_explain)
+        except Exception as e:
+            logger.exception('[BENCH] Cenário %s falhou', nome)
+            medido = {'cenario': nome, 'erro': f'{type(e).__name__}: {e}'}
+        resultado['cenarios'][nome] = medido
+        if 'erro' in medido:
+            log(f'  {nome}: ERRO {medido["erro"]}')
+        else:
+            log(f'  {nome}: {medido["tempo_ms"]} ms, {medido["queries"]} queries')
+    return resultado
+
+
+def carregar_baseline(caminho: Path) -> Optional[Dict[str, Any]]:
+    if not caminho.exists():
+        return None
+    return json.loads(caminho.read_text(encoding='utf-8'))
+
+
+def salvar_baseline(resultado: Dict[str, Any], caminho: Path) -> None:
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(json.dumps(resultado, ensure_ascii=False, indent=2, sort_keys=True), encoding='utf-8')
+
+
+def comparar(
+    atual: Dict[str, Any],
+    baseline: Dict[str, Any],
+    *,
+    fator_tempo: float = 1.5,
+    folga_tempo_ms: float = 20.0,
+    folga_queries: int = 0,
+) -> Dict[str, List[str]]:
+    """
+    Diferenças contra o baseline.
+
+    Regressão: mais queries que o baseline (+folga), tempo acima de `fator_tempo`×
+    (e de `folga_tempo_ms`), ou Seq Scan novo numa query que já existia.
+    Aviso: outras mudanças de plano e cenários sem baseline.
+    """
+    regressoes: List[str] = []
+    avisos: List[str] = []
+    if baseline.get('vendor') and baseline.get('vendor') != atual.get('vendor'):
+        avisos.append(f"Baseline de {baseline.get('vendor')} comparado com {atual.get('vendor')}.")
+
+    base_cenarios = baseline.get('cenarios') or {}
+    for nome, cen in (atual.get('cenarios') or {}).items():
+        base = base_cenarios.get(nome)
+        if 'erro' in cen:
+            regressoes.append(f'{nome}: falhou ({cen["erro"]})')
+            continue
+        if not base or 'erro' in base:
+            avisos.append(f'{nome}: sem baseline válido.')
+            continue
+        if cen['queries'] > base['queries'] + folga_queries:
+            regressoes.append(f'{nome}: queries {base["queries"]} -> {cen["queries"]}')
+        if cen['tempo_ms'] > base['tempo_ms'] * fator_tempo and cen['tempo_ms'] - base['tempo_ms'] > folga_tempo_ms:
+            regressoes.append(f'{nome}: tempo {base["tempo_ms"]} ms -> {cen["tempo_ms"]} ms')
+
+        planos_base = {q['hash']: q.get('plano') for q in base.get('top_queries') or []}
+        for q in cen.get('top_queries') or []:
+            plano_base = planos_base.get(q['hash'])
+            plano = q.get('plano')
+            if not plano or not plano_base or plano == plano_base:
+                continue
+            seq_novos = {n for n in plano if n.startswith('Seq Scan')} - set(plano_base)
+            if seq_novos:
+                regressoes.append(f'{nome}: query {q["hash"]} passou a fazer {", ".join(sorted(seq_novos))}')
+            else:
+                avisos.append(f'{nome}: plano da query {q["hash"]} mudou')
+    return {'regressoes': regressoes, 'avisos': avisos}
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 from typing import Any, Optional
 
 
@@ -23,6 +24,29 @@ def os_variantes(val: Optional[str]) -> set[str]:
     return {x for x in out if x}
 
 
+def chave_os_canonica(val: Optional[str]) -> Optional[str]:
+    """
+    Forma única da O.S.: duas O.S. casam em `os_variantes` se e só se as chaves são iguais.
+
+    Sem ".0" final e sem prefixos "OS-"; numérica sem zeros à esquerda. None para vazio/'NAN'.
+    """
+    if val is None:
+        return None
+    s = str(val).strip()
+    if not s or s.upper() == 'NAN':
+        return None
+    while True:
+        if s.endswith('.0'):
+            s = s[:-2]
+        if s.upper().startswith('OS-'):
+            s = s[3:].strip()
+            continue
+        break
+    if s.isdigit():
+        s = s.lstrip('0') or '0'
+    return s or None
+
+
 def build_osab_documento_set(documentos) -> set[str]:
     """Conjunto de chaves OSAB (documento) com variantes para match com ordem_servico do CRM."""
     osab_set: set[str] = set()
@@ -91,3 +115,32 @@ def anomes_filtro_variantes(anomes: str) -> list[str]:
         y, m = int(s[:4]), int(s[4:6])
         return [s, f'{y}-{m:02d}', f'{y}/{m:02d}']
     return [anomes] if anomes else []
+
+
+def normalizar_anomes_gross(val) -> Optional[str]:
+    """Normaliza ANOMES_GROSS para formato AAAAMM (ex.: '2025-07' -> '202507'). Aceita também número serial do Excel."""
+    import pandas as pd
+
+    if val is None or pd.isna(val):
+        return None
+    # Número serial do Excel (ex.: 45658 = 1/12/2025)
+    try:
+        if isinstance(val, (int, float)) and 30000 <= float(val) <= 60000:
+            d = datetime(1899, 12, 30) + timedelta(days=int(float(val)))
+            return d.strftime('%Y%m')
+    except (ValueError, OSError):
+        pass
+    s = str(val).strip()
+    if not s or s.lower() in ('nan', 'none', ''):
+        return None
+    # Remover separadores comuns
+    s = s.replace('-', '').replace('/', '').replace(' ', '')
+    # Se tem formato de data completa (YYYY-MM-DD), pegar só YYYYMM
+    if len(s) >= 6 and s[:4].isdigit():
+        if len(s) >= 8:  # YYYYMMDD ou YYYYMMDDHH...
+            return s[:6]  # Pega YYYYMM
+        elif len(s) == 6 and s.isdigit():
+            return s  # Já está no formato AAAAMM
+        elif len(s) == 7 and s[4] in ('-', '/'):  # YYYY-MM ou YYYY/MM
+            return s[:4] + s[5:7]
+    return s[:6] if len(s) >= 6 else None
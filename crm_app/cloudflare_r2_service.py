@@ -126,6 +126,54 @@ class CloudflareR2Storage:
         """
         return self.upload_file(file_obj, folder_name, filename)
 
+    def upload_private(self, file_obj: FileLike, folder_name: str, filename: str) -> str:
+        """
+        Envia arquivo ao R2 sem exigir URL pública. Retorna a chave do objeto (para download()).
+        """
+        object_key = self._build_object_key(folder_name, filename)
+        if hasattr(file_obj, "seek"):
+            file_obj.seek(0)
+        try:
+            # upload_fileobj faz multipart em streaming: arquivos grandes não vão inteiros para a memória
+            self._client.upload_fileobj(
+                file_obj,
+                self.bucket_name,
+                object_key,
+                ExtraArgs={"ContentType": self._guess_content_type(filename)},
+            )
+        except ClientError as exc:
+            error = exc.response.get("Error", {})
+            raise CloudflareR2StorageError(
+                f"Erro no upload R2 ({error.get('Code', 'unknown')}): {error.get('Message', exc)}"
+            ) from exc
+        logger.info("[R2] Upload privado: %s", object_key)
+        return object_key
+
+    def download(self, object_key: str) -> bytes:
+        try:
+            resposta = self._client.get_object(Bucket=self.bucket_name, Key=object_key)
+        except ClientError as exc:
+            error = exc.response.get("Error", {})
+            raise CloudflareR2StorageError(
+                f"Erro no download R2 ({error.get('Code', 'unknown')}): {error.get('Message', exc)}"
+            ) from exc
+        return resposta["Body"].read()
+
+    def download_to_file(self, object_key: str, file_obj: BinaryIO) -> None:
+        try:
+            self._client.download_fileobj(self.bucket_name, object_key, file_obj)
+        except ClientError as exc:
+            error = exc.response.get("Error", {})
+            raise CloudflareR2StorageError(
+                f"Erro no download R2 ({error.get('Code', 'unknown')}): {error.get('Message', exc)}"
+            ) from exc
+
+    def delete(self, object_key: str) -> None:
+        try:
+            self._client.delete_object(Bucket=self.bucket_name, Key=object_key)
+        except ClientError:
+            logger.warning("[R2] Falha ao remover %s", object_key, exc_info=True)
+
 
 def sanitize_r2_folder_name(value: str, max_length: int = 80) -> str:
     """Normaliza nome de pasta para uso seguro no R2."""
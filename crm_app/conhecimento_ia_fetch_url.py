@@ -8,7 +8,11 @@ import re
 from urllib.parse import urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+
+from crm_app.lazy_imports import lazy_attr
+
+# bs4 só é carregado quando uma URL é de fato buscada.
+BeautifulSoup = lazy_attr('bs4', 'BeautifulSoup')
 
 logger = logging.getLogger(__name__)
 
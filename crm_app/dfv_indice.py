@@ -0,0 +1,258 @@
+"""
+Índice DFV por CEP para as consultas de fachada/viabilidade (WhatsApp, KMZ).
+
+A tabela DFV tem milhões de linhas e as consultas antigas filtravam por CEP com
+`icontains` em tipo_viabilidade a cada mensagem. No fim de cada importação DFV o índice
+é reconstruído (`reconstruir_indice`): uma linha `DFVIndiceCep` por CEP com as fachadas
+viáveis já ordenadas e o mapa número → tipo. Cada processo guarda os CEPs lidos num LRU
+em memória, descartado quando a versão `dfv_fachadas` muda (`versao_indice`).
+
+Enquanto o índice nunca foi gerado (versão 0) as funções devolvem "indisponível" e os
+chamadores em `utils` seguem com a consulta direta na DFV.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from crm_app.versao_indice import VersaoLocal, incrementar_versao
+
+logger = logging.getLogger(__name__)
+
+NOME_VERSAO = 'dfv_fachadas'
+
+_versao_local = VersaoLocal(
+    NOME_VERSAO, ttl_seg=float(getattr(settings, 'DFV_INDICE_VERSAO_TTL_SEG', 60)),
+)
+
+
+def eh_viavel(tipo_viabilidade: Optional[str]) -> bool:
+    """Mesmo critério do filtro legado (`icontains` VIAVEL / VIÁVEL)."""
+    tipo = (tipo_viabilidade or '').upper()
+    return 'VIAVEL' in tipo or 'VIÁVEL' in tipo
+
+
+def num_compl(num: Optional[str], compl: Optional[str]) -> str:
+    num = (num or '').strip()
+    compl = (compl or '').strip()
+    if compl:
+        return f"{num} ({compl})"
+    return num
+
+
+def ordenar_fachadas(numeros: List[str]) -> List[str]:
+    """Ordena pelo número (ignorando complemento), como a listagem de fachadas sempre fez."""
+    try:
+        return sorted(
+            numeros,
+            key=lambda x: int(''.join(filter(str.isdigit, x.split(' ')[0])))
+            if any(c.isdigit() for c in x.split(' ')[0]) else 0,
+        )
+    except Exception:
+        return sorted(numeros)
+
+
+def montar_entrada(linhas: List[Tuple]) -> Dict[str, Any]:
+    """
+    linhas: (num_fachada, complemento, logradouro, bairro, tipo_rede, nome_cdo, tipo_viabilidade)
+    de um mesmo CEP, em ordem de pk.
+
+    `tipos`/`logradouros` reproduzem a linha que `DFV.objects.filter(cep, num_fachada).first()`
+    devolveria (a de menor pk); `logradouros` só guarda os números cujo logradouro difere do
+    cabeçalho, para não repetir a rua em todas as fachadas.
+    """
+    viaveis = [l for l in linhas if eh_viavel(l[6])]
+    cabecalho = viaveis[0] if viaveis else linhas[0]
+    tipos: Dict[str, str] = {}
+    logradouros: Dict[str, Optional[str]] = {}
+    for l in linhas:
+        if l[0] and l[0] not in tipos:
+            tipos[l[0]] = (l[6] or '').upper()
+            if l[2] != cabecalho[2]:
+                logradouros[l[0]] = l[2]
+    return {
+        'logradouro': cabecalho[2] or '',
+        'bairro': cabecalho[3] or '',
+        'tecnologia': cabecalho[4] or '',
+        'cdos': sorted({l[5] for l in viaveis if l[5]}),
+        'viaveis': ordenar_fachadas([num_compl(l[0], l[1]) for l in viaveis if l[0]]),
+        'numeros_viaveis': sorted({l[0] for l in viaveis if l[0]}),
+        'tipos': tipos,
+        'logradouros': logradouros,
+    }
+
+
+def reconstruir_indice(*, batch_size: int = 2000) -> Dict[str, int]:
+    """
+    Recria DFVIndiceCep a partir da DFV (streaming ordenado por CEP) e sobe a versão.
+
+    Roda numa transação: leitores continuam vendo o índice anterior até o commit.
+    """
+    from crm_app.models import DFV, DFVIndiceCep
+
+    inicio = time.monotonic()
+    linhas = (
+        DFV.objects.exclude(cep__isnull=True).exclude(cep='')
+        .order_by('cep', 'pk')
+        .values_list(
+            'cep', 'num_fachada', 'complemento', 'logradouro', 'bairro',
+            'tipo_rede', 'nome_cdo', 'tipo_viabilidade',
+        )
+        .iterator(chunk_size=10_000)
+    )
+    total_ceps = 0
+    total_fachadas = 0
+    with transaction.atomic():
+        DFVIndiceCep.objects.all().delete()
+        lote: List[DFVIndiceCep] = []
+        for cep, grupo in groupby(linhas, key=lambda l: l[0]):
+            registros = [l[1:] for l in grupo]
+            entrada = montar_entrada(registros)
+            lote.append(DFVIndiceCep(
+                cep=cep,
+                total_fachadas=len(registros),
+                total_viaveis=len(entrada['viaveis']),
+                dados=entrada,
+            ))
+            total_ceps += 1
+            total_fachadas += len(registros)
+            if len(lote) >= batch_size:
+                DFVIndiceCep.objects.bulk_create(lote)
+                lote = []
+        if lote:
+            DFVIndiceCep.objects.bulk_create(lote)
+        versao = incrementar_versao(NOME_VERSAO, ceps=total_ceps, fachadas=total_fachadas)
+
+    _cache.limpar()
+    _versao_local.invalidar()
+    duracao = round(time.monotonic() - inicio, 1)
+    logger.info(
+        '[DFV INDICE] Reconstruído v%s: %s CEPs, %s fachadas em %ss',
+        versao, total_ceps, total_fachadas, duracao,
+    )
+    return {'versao': versao, 'ceps': total_ceps, 'fachadas': total_fachadas, 'duracao_segundos': duracao}
+
+
+class _CacheCeps:
+    """LRU de entradas por CEP; `None` guardado = CEP ausente da DFV (cache negativo)."""
+
+    def __init__(self) -> None:
+        self._dados: 'OrderedDict[str, Optional[dict]]' = OrderedDict()
+        self._versao: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _capacidade(self) -> int:
+        return int(getattr(settings, 'DFV_INDICE_CACHE_CEPS', 20_000))
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+            self._versao = None
+
+    def buscar(self, ceps: Iterable[str], versao: int) -> Tuple[Dict[str, Optional[dict]], List[str]]:
+        achados: Dict[str, Optional[dict]] = {}
+        faltando: List[str] = []
+        with self._lock:
+            if self._versao != versao:
+                self._dados.clear()
+                self._versao = versao
+            for cep in ceps:
+                if cep in self._dados:
+                    self._dados.move_to_end(cep)
+                    achados[cep] = self._dados[cep]
+                else:
+                    faltando.append(cep)
+        return achados, faltando
+
+    def guardar(self, entradas: Dict[str, Optional[dict]], versao: int) -> None:
+        with self._lock:
+            if self._versao != versao:
+                return
+            capacidade = self._capacidade()
+            for cep, entrada in entradas.items():
+                self._dados[cep] = entrada
+                self._dados.move_to_end(cep)
+            while len(self._dados) > capacidade:
+                self._dados.popitem(last=False)
+
+
+_cache = _CacheCeps()
+
+
+def obter_entradas(ceps: Iterable[str]) -> Optional[Dict[str, Optional[dict]]]:
+    """
+    Entradas do índice para vários CEPs (uma query para os que não estão em memória).
+
+    Retorna None se o índice estiver indisponível (nunca gerado ou erro de banco);
+    no dict, `None` significa que o CEP não tem nenhuma fachada na DFV.
+    """
+    ceps = list(dict.fromkeys(c for c in ceps if c))
+    try:
+        versao = _versao_local.obter()
+        if versao <= 0:
+            return None
+        achados, faltando = _cache.buscar(ceps, versao)
+        if faltando:
+            from crm_app.models import DFVIndiceCep
+
+            lidos: Dict[str, Optional[dict]] = {cep: None for cep in faltando}
+            for cep, dados in DFVIndiceCep.objects.filter(cep__in=faltando).values_list('cep', 'dados'):
+                lidos[cep] = dados
+            _cache.guardar(lidos, versao)
+            achados.update(lidos)
+        return achados
+    except Exception as e:
+        logger.warning('[DFV INDICE] Índice indisponível, usando consulta direta: %s', e)
+        return None
+
+
+def obter_entrada(cep: str) -> Tuple[bool, Optional[dict]]:
+    """(índice disponível?, entrada do CEP ou None se o CEP não consta na DFV)."""
+    entradas = obter_entradas([cep])
+    if entradas is None:
+        return False, None
+    return True, entradas.get(cep)
+
+
+def numeros_viaveis_lote(pares: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], bool]:
+    """
+    CEP+número viável na DFV para vários endereços de uma vez (fallback do KMZ).
+
+    Usa o índice; sem índice, faz uma única consulta na DFV para todo o lote.
+    """
+    from bisect import bisect_left
+
+    pares = [(str(c or ''), str(n or '').strip()) for c, n in pares]
+    entradas = obter_entradas(c for c, _n in pares)
+    resultado: Dict[Tuple[str, str], bool] = {}
+    if entradas is not None:
+        for cep, num in pares:
+            numeros = (entradas.get(cep) or {}).get('numeros_viaveis') or []
+            i = bisect_left(numeros, num)
+            resultado[(cep, num)] = i < len(numeros) and numeros[i] == num
+        return resultado
+
+    from django.db.models import Q
+    from crm_app.models import DFV
+
+    validos = [(c, n) for c, n in pares if c and n]
+    encontrados = set()
+    if validos:
+        encontrados = set(
+            DFV.objects.filter(
+                cep__in={c for c, _n in validos},
+                num_fachada__in={n for _c, n in validos},
+            ).filter(
+                Q(tipo_viabilidade__icontains='VIAVEL') | Q(tipo_viabilidade__icontains='VIÁVEL')
+            ).values_list('cep', 'num_fachada')
+        )
+    for par in pares:
+        resultado[par] = par in encontrados
+    return resultado
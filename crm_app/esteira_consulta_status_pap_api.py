@@ -48,6 +48,7 @@ class ConsultaStatusEsteiraIniciarView(APIView):
             'tipo_pendencia': (data.get('tipo_pendencia') or '').strip(),
             'motivo_pendencia': (data.get('motivo_pendencia') or '').strip(),
             'colunas': colunas,
+            'pular_estaveis': str(data.get('pular_estaveis') or '').strip().lower() in ('1', 'true', 'sim'),
         }
 
         from crm_app.esteira_consulta_status_pap_service import criar_e_iniciar_consulta_aba
@@ -18,6 +18,11 @@ from django.conf import settings
 from django.db.models import Q
 from django.utils import timezone
 
+from crm_app.esteira_sync_status_pap_estado import (
+    registrar_verificacao_pap,
+    separar_vendas_para_sync,
+)
+
 logger = logging.getLogger(__name__)
 
 TELEFONE_JOB_PREFIX = 'CONSULTA-ESTEIRA-PAP'
@@ -799,6 +804,9 @@ def executar_job_consulta_aba(execucao_id: int) -> None:
 
     filtros = dict((execucao.relatorio_json or {}).get('filtros') or {})
     vendas = list(queryset_vendas_consulta_aba(filtros))
+    if filtros.get('pular_estaveis'):
+        # Opt-in: a aba consulta o que o operador vê; só pula estáveis se ele pedir.
+        vendas, _puladas = separar_vendas_para_sync(vendas)
     fila: List = list(vendas)
     detalhes: List[dict] = []
     sessao = _SessaoPapUsuarioHolder(usuario)
@@ -878,6 +886,17 @@ def executar_job_consulta_aba(execucao_id: int) -> None:
                     'erro': err_txt,
                 }
 
+            if not resultado.get('erro') and not resultado.get('ignorado_sem_cpf'):
+                try:
+                    _run_django_sync(
+                        lambda: registrar_verificacao_pap(
+                            venda.id, alterou=bool(resultado.get('alterou'))
+                        ),
+                        timeout_seconds=30,
+                    )
+                except Exception as e:
+                    logger.debug('[CONSULTA ESTEIRA] Estado sync venda #%s: %s', venda.id, e)
+
             if resultado.get('ignorado_sem_cpf'):
                 processados += 1
                 ignorados += 1
@@ -573,19 +573,37 @@ def buscar_sessao_por_envio(envio_id: int, telefone: str = ''):
     )
 
 
+def _ref_tem_sessao(ref: str, telefone: str, estado=None) -> bool:
+    """Sessão com este messageId; com o estado do roteador (whatsapp_roteador) não consulta o banco."""
+    from crm_app.whatsapp_roteador import FLUXO_LISTA_AGENDAMENTO
+
+    if estado is not None and estado.cobre(FLUXO_LISTA_AGENDAMENTO):
+        return estado.ref_de(FLUXO_LISTA_AGENDAMENTO, ref)
+    return buscar_sessao_por_mensagem_whatsapp(ref, telefone) is not None
+
+
+def _pode_ter_sessao_ativa(telefone: str, estado=None) -> bool:
+    from crm_app.whatsapp_roteador import FLUXO_LISTA_AGENDAMENTO
+
+    if estado is not None and estado.cobre(FLUXO_LISTA_AGENDAMENTO):
+        return estado.tem_aberto(FLUXO_LISTA_AGENDAMENTO)
+    return True
+
+
 def deve_tentar_lista_agendamento(
     mensagem_texto: str,
     *,
     button_id: str = '',
     reference_message_id: str = '',
     telefone: str = '',
+    estado=None,
 ) -> bool:
     if button_id and (
         button_id.startswith(PREFIXO_BOTAO) or parse_button_id_lista_agendamento(button_id)
     ):
         return True
     ref = (reference_message_id or '').strip()
-    if ref and telefone and buscar_sessao_por_mensagem_whatsapp(ref, telefone):
+    if ref and telefone and _ref_tem_sessao(ref, telefone, estado):
         return True
     return False
 
@@ -782,12 +800,14 @@ def processar_resposta_lista_agendamento(
     *,
     button_id: str = '',
     reference_message_id: str = '',
+    estado=None,
 ) -> bool:
     if not deve_tentar_lista_agendamento(
         mensagem_texto or '',
         button_id=button_id,
         reference_message_id=reference_message_id,
         telefone=telefone_remetente,
+        estado=estado,
     ):
         return False
 
@@ -802,11 +822,11 @@ def processar_resposta_lista_agendamento(
     )
 
     sessao = None
-    if ref:
+    if ref and (estado is None or _ref_tem_sessao(ref, telefone_remetente, estado)):
         sessao = buscar_sessao_por_mensagem_whatsapp(ref, telefone_remetente)
     if sessao is None and parsed:
         sessao = buscar_sessao_por_envio(parsed['envio_id'], telefone_remetente)
-    if sessao is None:
+    if sessao is None and _pode_ter_sessao_ativa(telefone_remetente, estado):
         ativas = list(_sessao_ativa_qs(telefone_remetente).order_by('-criado_em')[:1])
         sessao = ativas[0] if len(ativas) == 1 else None
 
@@ -580,19 +580,29 @@ def _parece_resposta_posso_antecipar(mensagem_texto: str, button_id: str = '') -
     return False
 
 
+def _ref_tem_solicitacao(ref: str, telefone: str, estado=None) -> bool:
+    """Consulta com este messageId; com o estado do roteador (whatsapp_roteador) não consulta o banco."""
+    from crm_app.whatsapp_roteador import FLUXO_POSSO_ANTECIPAR
+
+    if estado is not None and estado.cobre(FLUXO_POSSO_ANTECIPAR):
+        return estado.ref_de(FLUXO_POSSO_ANTECIPAR, ref)
+    return buscar_solicitacao_por_mensagem_whatsapp(ref, telefone) is not None
+
+
 def deve_tentar_posso_antecipar(
     mensagem_texto: str,
     *,
     button_id: str = '',
     reference_message_id: str = '',
     telefone: str = '',
+    estado=None,
 ) -> bool:
     """Evita consulta ao banco em mensagens do bot geral (Status, 1, O.S., etc.)."""
     if button_id and (button_id.startswith('pa_') or parse_button_id_posso_antecipar(button_id)):
         return True
     ref = (reference_message_id or '').strip()
     if ref and telefone:
-        if buscar_solicitacao_por_mensagem_whatsapp(ref, telefone):
+        if _ref_tem_solicitacao(ref, telefone, estado):
             return True
     if _extrair_venda_id_da_mensagem(mensagem_texto or ''):
         return True
@@ -605,6 +615,7 @@ def processar_resposta_posso_antecipar_vendedor(
     *,
     button_id: str = '',
     reference_message_id: str = '',
+    estado=None,
 ) -> bool:
     """
     Se o vendedor respondeu (botão ou texto) a uma consulta pendente, registra e confirma.
@@ -624,7 +635,20 @@ def processar_resposta_posso_antecipar_vendedor(
         button_id=button_id,
         reference_message_id=ref,
         telefone=telefone_remetente,
+        estado=estado,
+    ):
+        return False
+
+    from crm_app.whatsapp_roteador import FLUXO_POSSO_ANTECIPAR
+
+    if (
+        estado is not None
+        and estado.cobre(FLUXO_POSSO_ANTECIPAR)
+        and not estado.linhas(FLUXO_POSSO_ANTECIPAR)
+        and not btn_parsed
+        and not ref
     ):
+        # Sem consulta na janela de resposta: o fluxo terminaria sem solicitação e sem aviso
         return False
 
     logger.info(
@@ -393,21 +393,39 @@ def _etapa_turno(sessao, parsed_btn: dict, telefone: str) -> bool:
     return True
 
 
+def _ref_tem_sessao(ref: str, telefone: str, estado=None) -> bool:
+    """Sessão com este messageId; com o estado do roteador (whatsapp_roteador) não consulta o banco."""
+    from crm_app.whatsapp_roteador import FLUXO_POSSO_REAGENDAR
+
+    if estado is not None and estado.cobre(FLUXO_POSSO_REAGENDAR):
+        return estado.ref_de(FLUXO_POSSO_REAGENDAR, ref)
+    return buscar_sessao_por_mensagem_whatsapp(ref, telefone) is not None
+
+
+def _tem_sessao_ativa(telefone: str, estado=None) -> bool:
+    from crm_app.whatsapp_roteador import FLUXO_POSSO_REAGENDAR
+
+    if estado is not None and estado.cobre(FLUXO_POSSO_REAGENDAR):
+        return estado.tem_aberto(FLUXO_POSSO_REAGENDAR)
+    return _sessao_ativa_qs(telefone).exists()
+
+
 def deve_tentar_posso_reagendar(
     mensagem_texto: str,
     *,
     button_id: str = '',
     reference_message_id: str = '',
     telefone: str = '',
+    estado=None,
 ) -> bool:
     if button_id and (button_id.startswith(PREFIXO_BOTAO) or parse_button_id_posso_reagendar(button_id)):
         return True
     ref = (reference_message_id or '').strip()
-    if ref and telefone and buscar_sessao_por_mensagem_whatsapp(ref, telefone):
+    if ref and telefone and _ref_tem_sessao(ref, telefone, estado):
         return True
     norm = (mensagem_texto or '').strip().upper()
     if norm in ('SIM', 'NÃO', 'NAO', 'S', 'N') and telefone:
-        return _sessao_ativa_qs(telefone).exists()
+        return _tem_sessao_ativa(telefone, estado)
     return False
 
 
@@ -496,12 +514,14 @@ def processar_resposta_posso_reagendar_consultor(
     *,
     button_id: str = '',
     reference_message_id: str = '',
+    estado=None,
 ) -> bool:
     if not deve_tentar_posso_reagendar(
         mensagem_texto or '',
         button_id=button_id,
         reference_message_id=reference_message_id,
         telefone=telefone_remetente,
+        estado=estado,
     ):
         return False
 
@@ -517,11 +537,11 @@ def processar_resposta_posso_reagendar_consultor(
     )
 
     sessao = None
-    if ref:
+    if ref and (estado is None or _ref_tem_sessao(ref, telefone_remetente, estado)):
         sessao = buscar_sessao_por_mensagem_whatsapp(ref, telefone_remetente)
     if sessao is None and parsed_btn:
         sessao = buscar_sessao_ativa_por_venda(parsed_btn['venda_id'], telefone_remetente)
-    if sessao is None:
+    if sessao is None and (estado is None or _tem_sessao_ativa(telefone_remetente, estado)):
         ativas = list(_sessao_ativa_qs(telefone_remetente).order_by('-criado_em')[:1])
         sessao = ativas[0] if len(ativas) == 1 else None
 
@@ -0,0 +1,189 @@
+"""
+Skip list do sync STATUS PAP da esteira (estado por venda).
+
+Cada consulta PAP grava o hash de `_snapshot_venda_sync_pap` e quando a venda foi
+verificada/alterada. Vendas que não mudam recuam em backoff exponencial; vendas com
+agendamento próximo, pendência recente ou alteração feita fora do sync (OSAB, edição
+manual) voltam para o intervalo base. Assim o limite por hora vai para quem tende a mudar.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Teto do expoente: 2**8 × base já passa do intervalo máximo com os defaults.
+_EXPOENTE_MAX = 8
+
+
+def _cfg(nome: str, default):
+    return getattr(settings, nome, default)
+
+
+def skip_estaveis_ativo() -> bool:
+    return bool(_cfg('SYNC_ESTEIRA_SKIP_ESTAVEIS', True))
+
+
+def _intervalo_base_min() -> int:
+    return int(_cfg('SYNC_ESTEIRA_ESTADO_INTERVALO_BASE_MIN', 120))
+
+
+def _intervalo_max_min() -> int:
+    return int(_cfg('SYNC_ESTEIRA_ESTADO_INTERVALO_MAX_MIN', 48 * 60))
+
+
+def _dias_agendamento_proximo() -> int:
+    return int(_cfg('SYNC_ESTEIRA_ESTADO_DIAS_AGENDAMENTO', 1))
+
+
+def _horas_pendencia_recente() -> int:
+    return int(_cfg('SYNC_ESTEIRA_ESTADO_HORAS_PENDENCIA_RECENTE', 48))
+
+
+def hash_snapshot_venda(snapshot: Dict[str, Any]) -> str:
+    """Hash estável do snapshot (datas serializadas em ISO; chaves ordenadas)."""
+    bruto = json.dumps(snapshot, sort_keys=True, default=str, ensure_ascii=True)
+    return hashlib.sha1(bruto.encode('utf-8')).hexdigest()
+
+
+def hash_atual_venda(venda) -> str:
+    from crm_app.utils import _snapshot_venda_sync_pap
+
+    return hash_snapshot_venda(_snapshot_venda_sync_pap(venda))
+
+
+def venda_provavel_mudanca(venda, estado=None, agora: Optional[datetime] = None) -> bool:
+    """
+    Venda com chance alta de mudar no PAP: agendamento até amanhã (ou vencido)
+    ou pendência cuja última alteração é recente.
+    """
+    agora = agora or timezone.now()
+    hoje = timezone.localdate(agora)
+    if venda.data_agendamento and venda.data_agendamento <= hoje + timedelta(days=_dias_agendamento_proximo()):
+        return True
+    if venda.motivo_pendencia_id:
+        ref = getattr(estado, 'ultima_alteracao_em', None)
+        if ref is None or agora - ref <= timedelta(hours=_horas_pendencia_recente()):
+            return True
+    return False
+
+
+def calcular_proxima_verificacao(
+    venda,
+    verificacoes_sem_alteracao: int,
+    *,
+    estado=None,
+    agora: Optional[datetime] = None,
+) -> datetime:
+    agora = agora or timezone.now()
+    base = _intervalo_base_min()
+    if venda_provavel_mudanca(venda, estado, agora):
+        return agora + timedelta(minutes=base)
+    expoente = min(max(0, verificacoes_sem_alteracao), _EXPOENTE_MAX)
+    minutos = min(base * (2 ** expoente), _intervalo_max_min())
+    return agora + timedelta(minutes=minutos)
+
+
+def registrar_verificacao_pap(venda_id: int, *, alterou: bool = False, agora: Optional[datetime] = None):
+    """
+    Atualiza o estado após uma consulta PAP concluída (com ou sem resultado).
+
+    Rodar na thread ORM (`_run_django_sync`) — lê a venda já atualizada pelo sync.
+    """
+    from crm_app.models import Venda, VendaSyncStatusPapEstado
+
+    agora = agora or timezone.now()
+    venda = (
+        Venda.objects.select_related('status_esteira')
+        .only(
+            'id',
+            'status_esteira__nome',
+            'motivo_pendencia_id',
+            'status_agendamento_id',
+            'data_agendamento',
+            'periodo_agendamento',
+            'data_instalacao',
+        )
+        .filter(pk=venda_id)
+        .first()
+    )
+    if venda is None:
+        return None
+
+    novo_hash = hash_atual_venda(venda)
+    estado, _ = VendaSyncStatusPapEstado.objects.get_or_create(venda_id=venda_id)
+    mudou = alterou or (estado.snapshot_hash != novo_hash and bool(estado.snapshot_hash))
+    if mudou or not estado.ultima_alteracao_em:
+        estado.ultima_alteracao_em = agora
+    estado.verificacoes_sem_alteracao = 0 if mudou else estado.verificacoes_sem_alteracao + 1
+    estado.snapshot_hash = novo_hash
+    estado.ultima_verificacao_em = agora
+    estado.proxima_verificacao_em = calcular_proxima_verificacao(
+        venda, estado.verificacoes_sem_alteracao, estado=estado, agora=agora,
+    )
+    estado.save(
+        update_fields=[
+            'snapshot_hash',
+            'ultima_verificacao_em',
+            'ultima_alteracao_em',
+            'verificacoes_sem_alteracao',
+            'proxima_verificacao_em',
+        ]
+    )
+    return estado
+
+
+def separar_vendas_para_sync(
+    vendas: Iterable,
+    *,
+    agora: Optional[datetime] = None,
+) -> Tuple[List, List]:
+    """
+    Divide as vendas elegíveis em (a consultar, puladas por estarem estáveis).
+
+    A fila mantém a ordem original dentro de cada grupo de prioridade:
+    provável mudança → nunca consultada/alterada fora do sync → demais vencidas.
+    """
+    from crm_app.models import VendaSyncStatusPapEstado
+
+    agora = agora or timezone.now()
+    vendas = list(vendas)
+    estados = {
+        e.venda_id: e
+        for e in VendaSyncStatusPapEstado.objects.filter(venda_id__in=[v.id for v in vendas])
+    }
+
+    fila: List[Tuple[int, int, Any]] = []
+    puladas: List = []
+    for ordem, venda in enumerate(vendas):
+        estado = estados.get(venda.id)
+        if estado is None or not estado.snapshot_hash:
+            fila.append((1, ordem, venda))
+            continue
+        if estado.snapshot_hash != hash_atual_venda(venda):
+            # CRM mudou por outra via (OSAB, edição): vale conferir no PAP já.
+            fila.append((1, ordem, venda))
+            continue
+        if venda_provavel_mudanca(venda, estado, agora):
+            fila.append((0, ordem, venda))
+            continue
+        if estado.proxima_verificacao_em is None or estado.proxima_verificacao_em <= agora:
+            fila.append((2, ordem, venda))
+            continue
+        puladas.append(venda)
+
+    fila.sort(key=lambda item: (item[0], item[1]))
+    if puladas:
+        logger.info(
+            '[SYNC ESTEIRA] Skip list: %s venda(s) estáveis puladas, %s a consultar.',
+            len(puladas),
+            len(fila),
+        )
+    return [item[2] for item in fila], puladas
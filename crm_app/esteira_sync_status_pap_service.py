@@ -16,6 +16,12 @@ from django.conf import settings
 from django.db.models import Case, IntegerField, Q, Value, When
 from django.utils import timezone
 
+from crm_app.esteira_sync_status_pap_estado import (
+    registrar_verificacao_pap,
+    separar_vendas_para_sync,
+    skip_estaveis_ativo,
+)
+
 logger = logging.getLogger(__name__)
 
 TELEFONE_JOB = 'SYNC-ESTEIRA-PAP'
@@ -280,6 +286,9 @@ def _montar_relatorio_final(execucao, detalhes: List[dict]) -> str:
         f'❌ Erros: {execucao.erros}',
         f'⚠️ Ignorados (sem CPF/CNPJ): {execucao.ignorados_sem_cpf}',
     ]
+    pulados = (execucao.relatorio_json or {}).get('pulados_estaveis') or 0
+    if pulados:
+        linhas.append(f'⏭️ Pulados (estáveis no PAP): {pulados}')
     atualizados = [d for d in detalhes if d.get('alterou')]
     if atualizados:
         linhas.append('')
@@ -563,6 +572,19 @@ def _processar_um_pedido(
     return pos_pap.get('resultado', {**base, 'sem_alteracao': True})
 
 
+def _registrar_estado_sync(venda_id: int, resultado: dict) -> None:
+    """Grava hash/backoff da venda na skip list (só consultas PAP concluídas)."""
+    if resultado.get('erro') or resultado.get('ignorado_sem_cpf'):
+        return
+    try:
+        _run_django_sync(
+            lambda: registrar_verificacao_pap(venda_id, alterou=bool(resultado.get('alterou'))),
+            timeout_seconds=30,
+        )
+    except Exception as e:
+        logger.warning('[SYNC ESTEIRA] Falha ao gravar estado sync venda #%s: %s', venda_id, e)
+
+
 def _atualizar_execucao(execucao, **kwargs):
     """Persiste progresso em thread ORM limpa (Playwright polui o thread do job)."""
     exec_id = execucao.id
@@ -685,6 +707,9 @@ def executar_job(execucao_id: int) -> None:
         return
 
     vendas = list(queryset_vendas_elegiveis())
+    puladas: List = []
+    if skip_estaveis_ativo():
+        vendas, puladas = separar_vendas_para_sync(vendas)
     fila: List = list(vendas)
     retentativas: List = []
     detalhes: List[dict] = []
@@ -696,9 +721,15 @@ def executar_job(execucao_id: int) -> None:
         execucao,
         status=SyncStatusEsteiraExecucao.STATUS_EM_ANDAMENTO,
         total_pedidos=len(vendas),
-        relatorio_json={'detalhes': []},
+        relatorio_json={'detalhes': [], 'pulados_estaveis': len(puladas)},
+    )
+    logger.info(
+        '[SYNC ESTEIRA] Iniciando execução #%s (%s) — %s pedidos (%s estáveis pulados).',
+        execucao_id,
+        execucao.modo,
+        len(vendas),
+        len(puladas),
     )
-    logger.info('[SYNC ESTEIRA] Iniciando execução #%s (%s) — %s pedidos.', execucao_id, execucao.modo, len(vendas))
 
     processados = atualizados = sem_alteracao = erros = ignorados = 0
     primeira = True
@@ -746,6 +777,7 @@ def executar_job(execucao_id: int) -> None:
                 }
 
             _registrar_consulta_hora(consultas_hora)
+            _registrar_estado_sync(venda.id, resultado)
 
             # processados = pedidos finalizados (não tentativas). Retry reprocessa o mesmo
             # pedido; contar tentativas fazia o badge passar de total (ex.: 152/85).
@@ -777,7 +809,7 @@ def executar_job(execucao_id: int) -> None:
                 sem_alteracao=sem_alteracao,
                 erros=erros,
                 ignorados_sem_cpf=ignorados,
-                relatorio_json={'detalhes': detalhes[-200:]},
+                relatorio_json={'detalhes': detalhes[-200:], 'pulados_estaveis': len(puladas)},
             )
     finally:
         sessao_pap.fechar()
@@ -800,7 +832,7 @@ def executar_job(execucao_id: int) -> None:
         sem_alteracao=sem_alteracao,
         erros=erros,
         ignorados_sem_cpf=ignorados,
-        relatorio_json={'detalhes': detalhes},
+        relatorio_json={'detalhes': detalhes, 'pulados_estaveis': len(puladas)},
     )
 
     try:
@@ -104,3 +104,20 @@ class FunilVendaWppTentativaDetailView(APIView):
                 "eventos": ev_data,
             }
         )
+
+
+class FunilVendaWppResumoView(APIView):
+    """Eventos e finalizações por estágio nos últimos N dias (agregado diário `RollupFunilVendaWppDia`)."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not is_member(request.user, ["Diretoria", "Admin"]):
+            return Response({"detail": "Sem permissão."}, status=403)
+        from crm_app.services import telemetria_rollup
+
+        try:
+            dias = min(max(0, int(request.query_params.get("dias", 30))), 3650)
+        except (TypeError, ValueError):
+            dias = 30
+        return Response(telemetria_rollup.resumo_funil(dias))
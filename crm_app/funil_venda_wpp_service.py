@@ -105,28 +105,41 @@ def _atualizar_max_funil(tentativa, estagio: str) -> None:
         tentativa.funil_estagio_max = novo
 
 
-def _append_event(
+def _enfileirar_evento(
     tentativa_id: int,
     etapa_codigo: str,
     funil_estagio: str,
     tipo_evento: str,
     payload: Dict[str, Any],
 ) -> None:
-    FunilVendaWppTentativa, FunilVendaWppEvento = _import_models()
-    try:
-        tentativa = FunilVendaWppTentativa.objects.get(pk=tentativa_id)
-    except FunilVendaWppTentativa.DoesNotExist:
-        return
-    FunilVendaWppEvento.objects.create(
-        tentativa=tentativa,
+    """FunilVendaWppEvento vai para o buffer de telemetria (bulk_create fora da resposta)."""
+    from crm_app.services.telemetria_buffer import TIPO_FUNIL_EVENTO, registrar
+
+    registrar(
+        TIPO_FUNIL_EVENTO,
+        tentativa_id=int(tentativa_id),
         etapa_codigo=etapa_codigo[:80],
         funil_estagio=funil_estagio,
         tipo_evento=tipo_evento,
         payload=payload or {},
     )
+
+
+def _append_event(
+    tentativa,
+    etapa_codigo: str,
+    funil_estagio: str,
+    tipo_evento: str,
+    payload: Dict[str, Any],
+    campos_extra: tuple = (),
+) -> None:
+    """Enfileira o evento e grava etapa atual/estágio máximo (+ campos_extra) num save só."""
+    _enfileirar_evento(tentativa.pk, etapa_codigo, funil_estagio, tipo_evento, payload)
     tentativa.etapa_codigo_atual = etapa_codigo[:80]
     _atualizar_max_funil(tentativa, funil_estagio)
-    tentativa.save(update_fields=["etapa_codigo_atual", "funil_estagio_max", "atualizado_em"])
+    tentativa.save(
+        update_fields=["etapa_codigo_atual", "funil_estagio_max", "atualizado_em", *campos_extra]
+    )
 
 
 def funil_iniciar_com_cep(sessao, dados: dict, cep_limpo: str) -> None:
@@ -163,12 +176,12 @@ def funil_iniciar_com_cep(sessao, dados: dict, cep_limpo: str) -> None:
         sessao.dados_temp = dados
         sessao.save(update_fields=["dados_temp"])
 
-        FunilVendaWppEvento.objects.create(
-            tentativa=t,
-            etapa_codigo="venda_cep",
-            funil_estagio=FunilVendaWppTentativa.FUNIL_VIABILIDADE,
-            tipo_evento=FunilVendaWppEvento.TIPO_INPUT,
-            payload={"cep": cep_limpo},
+        _enfileirar_evento(
+            t.id,
+            "venda_cep",
+            FunilVendaWppTentativa.FUNIL_VIABILIDADE,
+            FunilVendaWppEvento.TIPO_INPUT,
+            {"cep": cep_limpo},
         )
     except Exception as e:
         logger.exception("[FUNIL WPP] funil_iniciar_com_cep: %s", e)
@@ -189,17 +202,20 @@ def funil_registrar_evento_sessao(
         if not tid:
             return
         FunilVendaWppTentativa, FunilVendaWppEvento = _import_models()
+        t = FunilVendaWppTentativa.objects.filter(pk=tid).first()
+        if not t:
+            return
         est = etapa_para_funil_estagio(etapa_codigo)
         te = tipo_evento or FunilVendaWppEvento.TIPO_INPUT
-        _append_event(int(tid), etapa_codigo, est, te, payload or {})
-        t = FunilVendaWppTentativa.objects.filter(pk=tid).first()
-        if t and payload:
+        campos_extra = ()
+        if payload:
             agg = dict(t.dados_agregados or {})
             for k, v in payload.items():
                 if k not in ("senha", "senha_pap"):
                     agg[k] = v
             t.dados_agregados = agg
-            t.save(update_fields=["dados_agregados", "atualizado_em"])
+            campos_extra = ("dados_agregados",)
+        _append_event(t, etapa_codigo, est, te, payload or {}, campos_extra=campos_extra)
     except Exception as e:
         logger.exception("[FUNIL WPP] funil_registrar_evento_sessao: %s", e)
 
@@ -217,15 +233,13 @@ def funil_registrar_credito(sessao, resultado_credito: str) -> None:
         if not tentativa:
             return
         tentativa.credito_resultado = (resultado_credito or "")[:255]
-        _atualizar_max_funil(tentativa, FunilVendaWppTentativa.FUNIL_CREDITO)
-        tentativa.save(update_fields=["credito_resultado", "funil_estagio_max", "atualizado_em"])
-
         _append_event(
-            int(tid),
+            tentativa,
             "credito_resultado",
             FunilVendaWppTentativa.FUNIL_CREDITO,
             FunilVendaWppEvento.TIPO_CREDITO,
             {"resultado_credito": resultado_credito},
+            campos_extra=("credito_resultado",),
         )
     except Exception as e:
         logger.exception("[FUNIL WPP] funil_registrar_credito: %s", e)
@@ -244,15 +258,13 @@ def funil_registrar_protocolo(sessao, protocolo: str) -> None:
         if not tentativa:
             return
         tentativa.protocolo_pap = (protocolo or "")[:160]
-        _atualizar_max_funil(tentativa, FunilVendaWppTentativa.FUNIL_PEDIDO)
-        tentativa.save(update_fields=["protocolo_pap", "funil_estagio_max", "atualizado_em"])
-
         _append_event(
-            int(tid),
+            tentativa,
             "protocolo_pap",
             FunilVendaWppTentativa.FUNIL_PEDIDO,
             FunilVendaWppEvento.TIPO_PROTOCOLO,
             {"protocolo": protocolo},
+            campos_extra=("protocolo_pap",),
         )
     except Exception as e:
         logger.exception("[FUNIL WPP] funil_registrar_protocolo: %s", e)
@@ -281,12 +293,12 @@ def funil_finalizar(
         tentativa.finalizado_em = timezone.now()
         tentativa.save(update_fields=["status", "mensagem_erro", "finalizado_em", "atualizado_em"])
 
-        FunilVendaWppEvento.objects.create(
-            tentativa=tentativa,
-            etapa_codigo="finalizacao",
-            funil_estagio=tentativa.funil_estagio_max or FunilVendaWppTentativa.FUNIL_VIABILIDADE,
-            tipo_evento=FunilVendaWppEvento.TIPO_STATUS,
-            payload={"status": status, "mensagem": mensagem_erro},
+        _enfileirar_evento(
+            tentativa.pk,
+            "finalizacao",
+            tentativa.funil_estagio_max or FunilVendaWppTentativa.FUNIL_VIABILIDADE,
+            FunilVendaWppEvento.TIPO_STATUS,
+            {"status": status, "mensagem": mensagem_erro},
         )
         if limpar_id_dados and dados.get(_CHAVE_FUNIL_ID):
             del dados[_CHAVE_FUNIL_ID]
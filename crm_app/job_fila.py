@@ -0,0 +1,372 @@
+"""
+Fila genérica de jobs em PostgreSQL (sem Redis) — generaliza PapJobFila / WhatsappWebhookFila.
+
+- handlers tipados: `@registrar_handler('osab', fila='imports')` liga o tipo do job a uma função
+  que recebe o `JobFila`;
+- claim por fila e prioridade com SELECT FOR UPDATE SKIP LOCKED (índice parcial das pendentes);
+- lease: o claim reserva o job até `lease_ate`; o handler renova com `heartbeat(job)`, que
+  também grava o checkpoint no payload. Lease vencido = processo morto: `recuperar_jobs_travados`
+  recoloca o job (ou marca erro esgotadas as tentativas), como `recuperar_jobs_pap_travados`;
+- o heartbeat só vale para a tentativa dona do job: uma execução já reassumida recebe
+  `JobPerdido` e o chunk corrente é desfeito.
+
+Consumo: `manage.py run_worker --queues=imports:2,pap,webhook` (imports tem worker dedicado por
+padrão). Filas fora de JOBS_WORKER_FILAS rodam numa thread do próprio web (`despachar_job`); como
+ninguém mais as consome, lease vencido nelas vira erro em vez de voltar para a fila. O scheduler
+só recupera leases vencidos — nunca executa handlers.
+"""
+from __future__ import annotations
+
+import importlib
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+FILA_IMPORTS = "imports"
+
+# Módulos que registram handlers (importados sob demanda no primeiro lookup).
+MODULOS_HANDLERS = (
+    "crm_app.services.importacao_legado_service",
+    "crm_app.services.importacao_jobs",
+    "crm_app.services.folha_pdf_jobs",
+)
+
+
+class JobPerdido(Exception):
+    """O job foi reassumido por outra execução (lease vencido); o trabalho corrente é descartado."""
+
+
+class JobFalhaDefinitiva(Exception):
+    """Erro que não adianta repetir (arquivo ilegível, log inexistente): encerra sem nova tentativa."""
+
+
+class JobFila(models.Model):
+    STATUS_PENDENTE = "pendente"
+    STATUS_PROCESSANDO = "processando"
+    STATUS_CONCLUIDO = "concluido"
+    STATUS_ERRO = "erro"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, "Pendente"),
+        (STATUS_PROCESSANDO, "Processando"),
+        (STATUS_CONCLUIDO, "Concluído"),
+        (STATUS_ERRO, "Erro"),
+    ]
+
+    fila = models.CharField(max_length=32, default=FILA_IMPORTS, db_index=True)
+    tipo = models.CharField(max_length=64, db_index=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDENTE,
+        db_index=True,
+    )
+    prioridade = models.SmallIntegerField(default=5)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=3)
+    erro = models.TextField(blank=True, default="")
+    criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    heartbeat_em = models.DateTimeField(null=True, blank=True)
+    lease_ate = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "crm_job_fila"
+        ordering = ["prioridade", "criado_em"]
+        indexes = [
+            models.Index(
+                fields=["fila", "prioridade", "criado_em"],
+                condition=models.Q(status="pendente"),
+                name="job_fila_pendente_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"JobFila({self.id}, {self.fila}/{self.tipo}, {self.status})"
+
+
+@dataclass(frozen=True)
+class HandlerJob:
+    tipo: str
+    fila: str
+    funcao: Callable[[JobFila], None]
+    max_tentativas: int = 3
+    # Sem heartbeat por este tempo o job é considerado órfão (None = JOBS_LEASE_SEGUNDOS).
+    lease_segundos: int | None = None
+    # Chamado quando o job termina em erro (após a última tentativa) para fechar o log do domínio.
+    ao_falhar: Callable[[JobFila, str], None] | None = None
+
+    @property
+    def lease(self) -> timedelta:
+        return timedelta(seconds=self.lease_segundos or int(getattr(settings, "JOBS_LEASE_SEGUNDOS", 900)))
+
+
+_HANDLERS: dict[str, HandlerJob] = {}
+_handlers_carregados = False
+
+
+def registrar_handler(
+    tipo: str,
+    *,
+    fila: str = FILA_IMPORTS,
+    max_tentativas: int = 3,
+    lease_segundos: int | None = None,
+    ao_falhar: Callable[[JobFila, str], None] | None = None,
+):
+    def _decorador(funcao: Callable[[JobFila], None]):
+        _HANDLERS[tipo] = HandlerJob(
+            tipo=tipo,
+            fila=fila,
+            funcao=funcao,
+            max_tentativas=max_tentativas,
+            lease_segundos=lease_segundos,
+            ao_falhar=ao_falhar,
+        )
+        return funcao
+
+    return _decorador
+
+
+def obter_handler(tipo: str) -> HandlerJob | None:
+    global _handlers_carregados
+    if not _handlers_carregados:
+        for modulo in MODULOS_HANDLERS:
+            importlib.import_module(modulo)
+        _handlers_carregados = True
+    return _HANDLERS.get(tipo)
+
+
+def fila_tem_worker_dedicado(fila: str) -> bool:
+    return fila in (getattr(settings, "JOBS_WORKER_FILAS", None) or [])
+
+
+def enfileirar_job(tipo: str, payload: dict[str, Any], *, prioridade: int = 5) -> JobFila:
+    handler = obter_handler(tipo)
+    if handler is None:
+        raise ValueError(f"Tipo de job sem handler registrado: {tipo}")
+    job = JobFila.objects.create(
+        fila=handler.fila,
+        tipo=tipo,
+        payload=payload,
+        prioridade=prioridade,
+        max_tentativas=handler.max_tentativas,
+    )
+    logger.info("[JOB_FILA] Job %s enfileirado fila=%s tipo=%s", job.id, handler.fila, tipo)
+    return job
+
+
+def despachar_job(tipo: str, payload: dict[str, Any], *, prioridade: int = 5) -> JobFila:
+    """
+    Enfileira o job. Se a fila não tem worker dedicado, processa numa thread local que
+    reivindica o próprio job (sem retomada: se o processo morrer, o lease vence e o job vira erro).
+    """
+    job = enfileirar_job(tipo, payload, prioridade=prioridade)
+    if not fila_tem_worker_dedicado(job.fila):
+        threading.Thread(
+            target=processar_proximo_job,
+            kwargs={"job_id": job.id},
+            name=f"job-{tipo}-{job.id}",
+            daemon=True,
+        ).start()
+    return job
+
+
+def reivindicar_proximo_job(
+    filas: list[str] | tuple[str, ...] | None = None,
+    *,
+    job_id: int | None = None,
+) -> JobFila | None:
+    """Claim atômico do próximo job pendente das filas (ou de um job específico)."""
+    with transaction.atomic():
+        qs = JobFila.objects.select_for_update(skip_locked=True).filter(status=JobFila.STATUS_PENDENTE)
+        if filas:
+            qs = qs.filter(fila__in=list(filas))
+        if job_id is not None:
+            qs = qs.filter(pk=job_id)
+        job = qs.order_by("prioridade", "criado_em").first()
+        if not job:
+            return None
+        handler = obter_handler(job.tipo)
+        agora = timezone.now()
+        job.status = JobFila.STATUS_PROCESSANDO
+        job.iniciado_em = agora
+        job.heartbeat_em = agora
+        job.lease_ate = agora + (handler.lease if handler else timedelta(minutes=15))
+        job.tentativas = (job.tentativas or 0) + 1
+        job.save(update_fields=["status", "iniciado_em", "heartbeat_em", "lease_ate", "tentativas"])
+        return job
+
+
+def heartbeat(job: JobFila, payload: dict[str, Any] | None = None) -> None:
+    """
+    Renova o lease (e grava o checkpoint em `payload`, se dado). Chame dentro da transação do
+    chunk: se o job já foi reassumido, `JobPerdido` desfaz o chunk junto.
+    """
+    handler = obter_handler(job.tipo)
+    agora = timezone.now()
+    campos: dict[str, Any] = {
+        "heartbeat_em": agora,
+        "lease_ate": agora + (handler.lease if handler else timedelta(minutes=15)),
+    }
+    if payload is not None:
+        campos["payload"] = payload
+    gravados = JobFila.objects.filter(
+        pk=job.pk, status=JobFila.STATUS_PROCESSANDO, tentativas=job.tentativas,
+    ).update(**campos)
+    if not gravados:
+        raise JobPerdido(f"Job {job.pk} reassumido por outra execução.")
+    if payload is not None:
+        job.payload = payload
+
+
+def _encerrar(job: JobFila, status: str, erro: str = "", *, de: str = JobFila.STATUS_PROCESSANDO) -> bool:
+    """Muda o job de `de` para `status`; False se outra execução já o encerrou/recolocou."""
+    return bool(JobFila.objects.filter(pk=job.pk, status=de, tentativas=job.tentativas).update(
+        status=status, concluido_em=timezone.now(), lease_ate=None, erro=erro[:4000],
+    ))
+
+
+def _falhar(
+    job: JobFila,
+    handler: HandlerJob | None,
+    mensagem: str,
+    *,
+    definitiva: bool = False,
+    de: str = JobFila.STATUS_PROCESSANDO,
+) -> bool:
+    """
+    Recoloca o job ou o encerra em erro. Mesma guarda do `heartbeat` (status + tentativas):
+    se o job saiu de `de` no meio tempo (ex.: acabou de concluir), não mexe e retorna False.
+    """
+    if not definitiva and (job.tentativas or 0) < (job.max_tentativas or 3):
+        recolocado = JobFila.objects.filter(pk=job.pk, status=de, tentativas=job.tentativas).update(
+            status=JobFila.STATUS_PENDENTE, iniciado_em=None, lease_ate=None, erro=mensagem[:4000],
+        )
+        if recolocado:
+            logger.warning("[JOB_FILA] Job %s recolocado (tentativa %s): %s", job.id, job.tentativas, mensagem)
+        return bool(recolocado)
+    if not _encerrar(job, JobFila.STATUS_ERRO, mensagem, de=de):
+        return False
+    logger.error("[JOB_FILA] Job %s encerrado em erro: %s", job.id, mensagem)
+    if handler and handler.ao_falhar:
+        try:
+            handler.ao_falhar(job, mensagem)
+        except Exception:
+            logger.exception("[JOB_FILA] Falha no ao_falhar do job %s", job.id)
+    return True
+
+
+def processar_job(job: JobFila) -> bool:
+    """Executa o handler do job. Retorna True se concluiu."""
+    handler = obter_handler(job.tipo)
+    if handler is None:
+        _falhar(job, None, f"Tipo sem handler registrado: {job.tipo}", definitiva=True)
+        return False
+    parar = threading.Event()
+    batimento = threading.Thread(
+        target=_heartbeat_periodico, args=(job, handler, parar), name=f"job-heartbeat-{job.id}", daemon=True,
+    )
+    batimento.start()
+    try:
+        handler.funcao(job)
+    except JobPerdido:
+        logger.warning("[JOB_FILA] Job %s reassumido por outra execução; parando.", job.id)
+        return False
+    except JobFalhaDefinitiva as exc:
+        _falhar(job, handler, str(exc), definitiva=True)
+        return False
+    except Exception as exc:
+        logger.exception("[JOB_FILA] Erro no job %s tipo=%s", job.id, job.tipo)
+        _falhar(job, handler, str(exc) or exc.__class__.__name__)
+        return False
+    finally:
+        parar.set()
+    _encerrar(job, JobFila.STATUS_CONCLUIDO)
+    return True
+
+
+def _heartbeat_periodico(job: JobFila, handler: HandlerJob, parar: threading.Event) -> None:
+    """Renova o lease enquanto o handler roda (a cada 1/3 do lease): processo vivo = job vivo."""
+    from django.db import connection
+
+    intervalo = handler.lease.total_seconds() / 3
+    usou_banco = False
+    try:
+        while not parar.wait(intervalo):
+            usou_banco = True
+            try:
+                heartbeat(job)
+            except JobPerdido:
+                return
+            except Exception:
+                logger.warning("[JOB_FILA] Falha no heartbeat do job %s", job.id, exc_info=True)
+    finally:
+        # Conexão própria desta thread: não deixar aberta no PgBouncer
+        if usou_banco:
+            connection.close()
+
+
+def processar_proximo_job(filas: list[str] | None = None, *, job_id: int | None = None) -> bool:
+    """Reivindica e processa um job. Retorna False se não havia job pendente."""
+    job = reivindicar_proximo_job(filas, job_id=job_id)
+    if not job:
+        return False
+    processar_job(job)
+    return True
+
+
+def recuperar_jobs_travados(filas: list[str] | None = None) -> dict[str, int]:
+    """
+    Recoloca jobs com lease vencido (processo morreu) ou marca erro esgotadas as tentativas.
+    Em fila sem worker dedicado não há quem retome: o job vai direto para erro, assim como o
+    pendente que passou do lease sem ser reivindicado.
+    """
+    stats = {"requeued": 0, "erro": 0}
+    qs = JobFila.objects.filter(status=JobFila.STATUS_PROCESSANDO, lease_ate__lt=timezone.now())
+    if filas:
+        qs = qs.filter(fila__in=list(filas))
+    for job in qs.order_by("lease_ate")[:100]:
+        msg = f"Lease vencido: sem heartbeat desde {job.heartbeat_em}."
+        definitiva = not fila_tem_worker_dedicado(job.fila)
+        antes = not definitiva and (job.tentativas or 0) < (job.max_tentativas or 3)
+        if _falhar(job, obter_handler(job.tipo), msg, definitiva=definitiva):
+            stats["requeued" if antes else "erro"] += 1
+
+    # Fila sem worker dedicado: pendente além do lease é de um processo web que morreu antes
+    # de a thread reivindicar o job; ninguém mais vai pegá-lo. As filas com worker saem antes
+    # do corte, senão 100 pendentes de `imports` escondem os órfãos das outras.
+    pendentes = JobFila.objects.filter(status=JobFila.STATUS_PENDENTE).exclude(
+        fila__in=list(getattr(settings, "JOBS_WORKER_FILAS", None) or []),
+    )
+    if filas:
+        pendentes = pendentes.filter(fila__in=list(filas))
+    for job in pendentes.order_by("criado_em")[:100]:
+        handler = obter_handler(job.tipo)
+        lease = handler.lease if handler else timedelta(seconds=int(getattr(settings, "JOBS_LEASE_SEGUNDOS", 900)))
+        if job.criado_em >= timezone.now() - lease:
+            continue
+        if _falhar(
+            job, handler, "Job pendente sem worker: processo web reiniciado antes de iniciar.",
+            definitiva=True, de=JobFila.STATUS_PENDENTE,
+        ):
+            stats["erro"] += 1
+    return stats
+
+
+def retomar_jobs_orfaos() -> dict[str, int]:
+    """
+    Scheduler: só recupera leases vencidos. Quem reprocessa é o `run_worker` da fila — o
+    scheduler roda em outro serviço, sem o disco do web, e não deve carregar importações no
+    POOL_LENTO.
+    """
+    return recuperar_jobs_travados()
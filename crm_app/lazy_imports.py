@@ -0,0 +1,75 @@
+"""
+Imports preguiçosos para dependências pesadas (pandas, openpyxl, xhtml2pdf, Playwright).
+
+`views.py` é carregado pelo urls.py e, indiretamente, por comandos e serviços
+(`run_scheduler`, `run_webhook_worker`, comissionamento) que nunca geram Excel/PDF.
+O proxy só importa a dependência real no primeiro acesso a um atributo.
+"""
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    """Proxy de módulo: `pd = LazyModule('pandas')` e `pd.DataFrame` importa na hora."""
+
+    __slots__ = ('_nome', '_modulo')
+
+    def __init__(self, nome: str) -> None:
+        object.__setattr__(self, '_nome', nome)
+        object.__setattr__(self, '_modulo', None)
+
+    def _carregar(self) -> ModuleType:
+        modulo: Optional[ModuleType] = self._modulo
+        if modulo is None:
+            # import_module usa o lock de import do Python: seguro entre threads.
+            modulo = importlib.import_module(self._nome)
+            object.__setattr__(self, '_modulo', modulo)
+        return modulo
+
+    @property
+    def carregado(self) -> bool:
+        return self._modulo is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._carregar(), attr)
+
+    def __dir__(self):
+        return dir(self._carregar())
+
+    def __repr__(self) -> str:
+        estado = 'carregado' if self._modulo is not None else 'pendente'
+        return f'<LazyModule {self._nome} ({estado})>'
+
+
+class LazyAttr:
+    """Proxy de nome importado (`from openpyxl.styles import Font`) resolvido no 1º uso."""
+
+    __slots__ = ('_modulo', '_attr', '_valor')
+
+    def __init__(self, modulo: str, attr: str) -> None:
+        object.__setattr__(self, '_modulo', modulo)
+        object.__setattr__(self, '_attr', attr)
+        object.__setattr__(self, '_valor', None)
+
+    def _resolver(self) -> Any:
+        valor = self._valor
+        if valor is None:
+            valor = getattr(importlib.import_module(self._modulo), self._attr)
+            object.__setattr__(self, '_valor', valor)
+        return valor
+
+    def __call__(self, *args, **kwargs):
+        return self._resolver()(*args, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolver(), attr)
+
+    def __repr__(self) -> str:
+        return f'<LazyAttr {self._modulo}.{self._attr}>'
+
+
+def lazy_attr(modulo: str, attr: str) -> LazyAttr:
+    return LazyAttr(modulo, attr)
@@ -0,0 +1,47 @@
+"""
+Arquiva jobs terminados das filas (FilaJobHistorico) e poda logs mais velhos que a retenção.
+
+Roda toda madrugada no scheduler; use à mão para o primeiro expurgo ou para conferir
+quanto seria removido.
+
+Uso:
+  python manage.py aplicar_retencao --dry-run
+  python manage.py aplicar_retencao
+  python manage.py aplicar_retencao --modelo LogEnvioPerformance --max-lotes 10
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.services import retencao_service
+
+
+class Command(BaseCommand):
+    help = 'Arquiva jobs concluídos das filas e apaga logs mais antigos que RETENCAO_DIAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Só conta o que seria arquivado/apagado')
+        parser.add_argument(
+            '--modelo', action='append', default=[],
+            help='Poda só estes modelos (pode repetir; padrão: todos com retenção > 0)',
+        )
+        parser.add_argument('--max-lotes', type=int, default=None, help='Limite de lotes de exclusão por modelo')
+        parser.add_argument('--sem-arquivar', action='store_true', help='Não arquiva as filas')
+
+    def handle(self, *args, **options):
+        invalidos = [m for m in options['modelo'] if m not in retencao_service.TABELAS_PODA]
+        if invalidos:
+            raise CommandError(
+                f'Modelo sem retenção: {", ".join(invalidos)} '
+                f'(use {", ".join(retencao_service.TABELAS_PODA)})'
+            )
+        dry_run = options['dry_run']
+        verbo = 'seriam' if dry_run else 'foram'
+        if not options['sem_arquivar']:
+            for fila, n in retencao_service.arquivar_filas(dry_run=dry_run).items():
+                self.stdout.write(f'Fila {fila}: {n} job(s) {verbo} arquivado(s)')
+        podados = retencao_service.podar(
+            options['modelo'] or None, dry_run=dry_run, max_lotes=options['max_lotes'],
+        )
+        for modelo, n in podados.items():
+            dias = retencao_service.dias_retencao(modelo)
+            self.stdout.write(f'{modelo} (> {dias} dias): {n} linha(s) {verbo} apagada(s)')
+        self.stdout.write(self.style.SUCCESS('Retenção concluída' + (' (dry-run)' if dry_run else '')))
@@ -0,0 +1,107 @@
+"""
+Benchmark dos endpoints pesados: tempo, nº de queries e planos EXPLAIN vs. baseline.
+
+Rodar num banco de benchmark (cópia vazia ou staging), nunca em produção.
+
+Uso:
+  python manage.py benchmark_crm --gerar-dados --escala 1
+  python manage.py benchmark_crm --salvar-baseline
+  python manage.py benchmark_crm                      # compara com o baseline; falha se regredir
+  python manage.py benchmark_crm --cenarios venda_list,esteira_contadores --repeticoes 10
+  python manage.py benchmark_crm --limpar-dados
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from crm_app.benchmarks import cenarios as mod_cenarios
+from crm_app.benchmarks import dados_sinteticos, executor
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de endpoints (tempo, queries, EXPLAIN) com diff contra baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gerar-dados', action='store_true', help='Popula dados sintéticos antes de medir')
+        parser.add_argument('--limpar-dados', action='store_true', help='Remove os dados sintéticos e sai')
+        parser.add_argument('--escala', type=float, default=1.0, help='Multiplicador dos volumes (1.0 ≈ 20k vendas)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--forcar', action='store_true', help='Permite gerar/limpar dados com DEBUG=False')
+        parser.add_argument('--cenarios', default='', help='Lista separada por vírgula (padrão: todos)')
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--sem-explain', action='store_true')
+        parser.add_argument('--baseline', default='', help='Arquivo JSON do baseline')
+        parser.add_argument('--salvar-baseline', action='store_true', help='Grava o resultado como novo baseline')
+        parser.add_argument('--fator-tempo', type=float, default=1.5, help='Regressão se tempo > baseline × fator')
+        parser.add_argument('--sem-falhar', action='store_true', help='Só reporta; não sai com erro')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado completo em JSON')
+
+    def _log(self, msg: str) -> None:
+        self.stdout.write(msg)
+
+    def handle(self, *args, **options):
+        if (options['gerar_dados'] or options['limpar_dados']) and not (settings.DEBUG or options['forcar']):
+            raise CommandError('Gerar/limpar dados exige DEBUG=True ou --forcar (use um banco de benchmark).')
+
+        if options['limpar_dados']:
+            dados_sinteticos.limpar_dados(log=self._log)
+            return
+
+        if options['gerar_dados']:
+            criados = dados_sinteticos.gerar_dados(escala=options['escala'], seed=options['seed'], log=self._log)
+            self.stdout.write(self.style.SUCCESS(f'Dados gerados: {criados}'))
+
+        usuario = dados_sinteticos.usuario_benchmark()
+        if usuario is None:
+            raise CommandError('Usuário de benchmark não encontrado: rode com --gerar-dados primeiro.')
+
+        nomes = [n.strip() for n in options['cenarios'].split(',') if n.strip()]
+        desconhecidos = [n for n in nomes if n not in mod_cenarios.CENARIOS]
+        if desconhecidos:
+            raise CommandError(
+                f'Cenário(s) desconhecido(s): {", ".join(desconhecidos)}. '
+                f'Disponíveis: {", ".join(mod_cenarios.CENARIOS)}'
+            )
+        selecionados = {n: f for n, f in mod_cenarios.CENARIOS.items() if not nomes or n in nomes}
+
+        self.stdout.write(f'Medindo {len(selecionados)} cenário(s) em {connection.vendor}...')
+        resultado = executor.executar(
+            selecionados,
+            usuario,
+            repeticoes=options['repeticoes'],
+            com_explain=not options['sem_explain'],
+            log=self._log,
+        )
+
+        caminho = Path(options['baseline']) if options['baseline'] else (
+            Path(settings.BASE_DIR) / 'benchmarks' / f'baseline_{connection.vendor}.json'
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(resultado, ensure_ascii=False, indent=2, default=str))
+
+        if options['salvar_baseline']:
+            executor.salvar_baseline(resultado, caminho)
+            self.stdout.write(self.style.SUCCESS(f'Baseline salvo em {caminho}'))
+            return
+
+        baseline = executor.carregar_baseline(caminho)
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(
+                f'Sem baseline em {caminho}; rode com --salvar-baseline para criar.'
+            ))
+            return
+
+        diff = executor.comparar(resultado, baseline, fator_tempo=options['fator_tempo'])
+        for aviso in diff['avisos']:
+            self.stdout.write(self.style.WARNING(f'  ⚠ {aviso}'))
+        for reg in diff['regressoes']:
+            self.stdout.write(self.style.ERROR(f'  ✗ {reg}'))
+        if diff['regressoes'] and not options['sem_falhar']:
+            raise CommandError(f'{len(diff["regressoes"])} regressão(ões) contra o baseline.')
+        if not diff['regressoes']:
+            self.stdout.write(self.style.SUCCESS('Sem regressões contra o baseline.'))
@@ -32,6 +32,12 @@ class Command(BaseCommand):
             default=3,
             help='Número máximo de tentativas de retry (padrão: 3)',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Contratos consultados em paralelo (padrão: NIO_BUSCA_WORKERS)',
+        )
 
     def handle(self, *args, **options):
         safra = options.get('safra')
@@ -93,55 +99,44 @@ class Command(BaseCommand):
             'contratos_sem_faturas': 0,
         }
         
-        # Processar cada contrato
-        for idx, contrato in enumerate(contratos, 1):
-            porcentagem = (idx / total_contratos) * 100
-            self.stdout.write(
-                f'\n[{idx}/{total_contratos} - {porcentagem:.1f}%] '
-                f'{contrato.numero_contrato} - {contrato.cliente_nome[:40]}'
-            )
-            
-            if not contrato.cpf_cliente:
-                self.stdout.write(self.style.WARNING('  ⚠️  CPF não cadastrado'))
+        # Contratos sem CPF ficam de fora do pool
+        com_cpf = []
+        for contrato in contratos:
+            if contrato.cpf_cliente:
+                com_cpf.append(contrato)
+            else:
                 stats['contratos_sem_cpf'] += 1
-                continue
-            
-            stats['contratos_processados'] += 1
-            
-            # Buscar faturas do contrato
-            self.stdout.write(f'  🔍 Processando faturas...')
-            resultado = servico.buscar_faturas_contrato(contrato, origem='AUTOMATICA')
-            
-            # Atualizar estatísticas
-            stats['faturas_processadas'] += resultado['processadas']
-            stats['faturas_sucesso'] += resultado['sucesso']
-            stats['faturas_erro'] += resultado['erro']
-            stats['faturas_nao_disponiveis'] += resultado['nao_disponiveis']
-            
+        stats['contratos_processados'] = len(com_cpf)
+        workers = options.get('workers') or None
+        self.stdout.write(
+            f'🔍 Processando {len(com_cpf)} contratos com {workers or "NIO_BUSCA_WORKERS"} workers...'
+        )
+
+        feitos = 0
+
+        def _progresso(contrato, resultado, latencia_ms):
+            nonlocal feitos
+            feitos += 1
             if resultado['processadas'] == 0:
-                self.stdout.write(self.style.SUCCESS('  ✅ Todas as faturas pagas'))
                 stats['contratos_sem_faturas'] += 1
-            else:
-                # Exibir resumo do contrato
-                self.stdout.write(
-                    f'  📊 Processadas: {resultado["processadas"]} | '
-                    f'✅ Sucesso: {resultado["sucesso"]} | '
-                    f'❌ Erro: {resultado["erro"]} | '
-                    f'⏳ Não disp.: {resultado["nao_disponiveis"]}'
-                )
-            
-            # Progress visual a cada 10 contratos
-            if idx % 10 == 0 or idx == total_contratos:
-                tempo_decorrido = (timezone.now() - inicio_geral).total_seconds()
-                tempo_medio = tempo_decorrido / idx if idx > 0 else 0
-                estimativa_restante = tempo_medio * (total_contratos - idx)
-                
-                self.stdout.write(
-                    f'\n  ⏱️  Tempo: {tempo_decorrido:.1f}s | '
-                    f'Média: {tempo_medio:.2f}s/contrato | '
-                    f'Estimativa restante: {estimativa_restante:.0f}s'
-                )
-        
+            self.stdout.write(
+                f'  [{feitos}/{len(com_cpf)}] {contrato.numero_contrato} - '
+                f'✅ {resultado["sucesso"]} | ❌ {resultado["erro"]} | '
+                f'⏳ {resultado["nao_disponiveis"]} | {latencia_ms:.0f} ms'
+            )
+
+        resultado = servico.processar_contratos(com_cpf, workers=workers, ao_concluir=_progresso)
+        stats['faturas_processadas'] = resultado['processadas']
+        stats['faturas_sucesso'] = resultado['sucesso']
+        stats['faturas_erro'] = resultado['erro']
+        stats['faturas_nao_disponiveis'] = resultado['nao_disponiveis']
+        latencia = resultado['latencia']
+        if latencia['n']:
+            self.stdout.write(
+                f'\n  ⏱️  Latência/contrato: p50 {latencia["p50"]:.0f} ms | '
+                f'p95 {latencia["p95"]:.0f} ms | máx {latencia["max"]:.0f} ms'
+            )
+
         # Atualizar histórico com estatísticas
         historico.total_faturas = stats['faturas_processadas']
         historico.faturas_sucesso = stats['faturas_sucesso']
@@ -0,0 +1,45 @@
+"""
+Estatísticas e manutenção do cache por CPF das dívidas Nio (crm_app/nio_dividas_cache.py).
+
+Uso:
+  python manage.py cache_dividas_nio                   # hit/stale/miss/renovação/erro
+  python manage.py cache_dividas_nio --json
+  python manage.py cache_dividas_nio --invalidar 12345678901
+  python manage.py cache_dividas_nio --zerar
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from crm_app import nio_dividas_cache
+
+
+class Command(BaseCommand):
+    help = 'Mostra estatísticas do cache de dívidas Nio por CPF; invalida CPF ou zera contadores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invalidar', action='append', default=[], metavar='CPF',
+                            help='Descarta o cache do CPF (pode repetir)')
+        parser.add_argument('--zerar', action='store_true', help='Zera os contadores')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        for cpf in options['invalidar']:
+            nio_dividas_cache.invalidar_cpf(cpf)
+            self.stdout.write(f'CPF {nio_dividas_cache.limpar_cpf(cpf)} invalidado.')
+
+        stats = nio_dividas_cache.estatisticas()
+        if options['zerar']:
+            nio_dividas_cache.zerar_estatisticas()
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, ensure_ascii=False))
+            return
+        taxa = stats['taxa_acerto']
+        self.stdout.write(
+            f"hit={stats['hit']} stale={stats['stale']} miss={stats['miss']} "
+            f"renovacao={stats['renovacao']} erro={stats['erro']} "
+            f"taxa_acerto={'-' if taxa is None else f'{taxa:.1%}'}"
+        )
+        if options['zerar']:
+            self.stdout.write(self.style.SUCCESS('Contadores zerados.'))
@@ -0,0 +1,124 @@
+"""
+Mede o tempo de import de um módulo (padrão: ROOT_URLCONF) com `python -X importtime`.
+
+Roda num subprocesso limpo (sem cache de sys.modules) e lista os módulos mais caros
+por tempo cumulativo. Com orçamento > 0, falha (exit != 0) quando o total estoura —
+serve para CI/deploy pegar um `import pandas` novo no topo de views.py.
+
+Uso:
+  python manage.py perfil_importacao
+  python manage.py perfil_importacao --modulo crm_app.views --top 30
+  python manage.py perfil_importacao --orcamento-ms 1200 --json
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Dependências que não deveriam carregar só por importar o URLconf
+PESADOS = ('pandas', 'numpy', 'openpyxl', 'xhtml2pdf', 'reportlab', 'playwright', 'bs4')
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Linhas `import time: self | cumulative | pacote` → [(modulo, self_us, cumul_us, nivel)].
+
+    O nível vem da indentação do nome (2 espaços por import aninhado); nível 0 é top-level.
+    """
+    linhas = []
+    for linha in stderr.splitlines():
+        if not linha.startswith('import time:'):
+            continue
+        partes = linha[len('import time:'):].split('|')
+        if len(partes) != 3:
+            continue
+        try:
+            self_us = int(partes[0].strip())
+            cumul_us = int(partes[1].strip())
+        except ValueError:
+            continue  # cabeçalho "self [us] | cumulative | imported package"
+        nome = partes[2][1:] if partes[2].startswith(' ') else partes[2]
+        nivel = (len(nome) - len(nome.lstrip(' '))) // 2
+        linhas.append((nome.strip(), self_us, cumul_us, nivel))
+    return linhas
+
+
+class Command(BaseCommand):
+    help = 'Perfil de tempo de import (python -X importtime) com orçamento opcional'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modulo', default=None, help='Módulo alvo (padrão: ROOT_URLCONF)')
+        parser.add_argument('--top', type=int, default=20, help='Quantos módulos listar')
+        parser.add_argument(
+            '--orcamento-ms',
+            type=int,
+            default=None,
+            help='Falha se o import passar disso (padrão: IMPORT_TIME_BUDGET_MS; 0 desliga)',
+        )
+        parser.add_argument('--json', action='store_true', help='Saída em JSON')
+
+    def handle(self, *args, **options):
+        alvo = options['modulo'] or settings.ROOT_URLCONF
+        orcamento_ms = options['orcamento_ms']
+        if orcamento_ms is None:
+            orcamento_ms = int(getattr(settings, 'IMPORT_TIME_BUDGET_MS', 0) or 0)
+
+        codigo = f'import django; django.setup(); import {alvo}'
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'gestao_equipes.settings'))
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', codigo],
+            env=env,
+            cwd=str(settings.BASE_DIR),
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            erro = [l for l in proc.stderr.splitlines() if not l.startswith('import time:')]
+            raise CommandError(f'Falha ao importar {alvo}:\n' + '\n'.join(erro[-20:]))
+
+        linhas = parse_importtime(proc.stderr)
+        por_modulo: Dict[str, int] = {m: c for m, _s, c, _n in linhas}
+        # django.setup() entra no total: é custo de boot de qualquer processo
+        total_us = sum(c for _m, _s, c, nivel in linhas if nivel == 0)
+        alvo_us = por_modulo.get(alvo, 0)
+        top = sorted(linhas, key=lambda l: l[2], reverse=True)[: max(1, options['top'])]
+        pesados = [p for p in PESADOS if p in por_modulo]
+        total_ms = round(total_us / 1000, 1)
+        estourou = bool(orcamento_ms) and total_ms > orcamento_ms
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'modulo': alvo,
+                'total_ms': total_ms,
+                'modulo_ms': round(alvo_us / 1000, 1),
+                'orcamento_ms': orcamento_ms,
+                'estourou': estourou,
+                'pesados_carregados': pesados,
+                'top': [{'modulo': m, 'self_ms': round(s / 1000, 1), 'cumulativo_ms': round(c / 1000, 1)}
+                        for m, s, c, _n in top],
+            }, ensure_ascii=False, indent=2))
+        else:
+            self.stdout.write(f'Alvo: {alvo}')
+            self.stdout.write(f'Total de import: {total_ms} ms (só {alvo}: {round(alvo_us / 1000, 1)} ms)')
+            self.stdout.write('')
+            self.stdout.write(f'{"cumul. ms":>10} {"self ms":>9}  módulo')
+            for m, s, c, _n in top:
+                self.stdout.write(f'{c / 1000:>10.1f} {s / 1000:>9.1f}  {m}')
+            if pesados:
+                self.stdout.write('')
+                self.stdout.write(self.style.WARNING(
+                    'Dependências pesadas carregadas no import: ' + ', '.join(pesados)
+                ))
+
+        if estourou:
+            raise CommandError(f'Import de {alvo} levou {total_ms} ms (orçamento: {orcamento_ms} ms).')
+        if orcamento_ms and not options['json']:
+            self.stdout.write(self.style.SUCCESS(f'Dentro do orçamento ({orcamento_ms} ms).'))
@@ -0,0 +1,20 @@
+"""
+Regrava o conjunto compartilhado de documentos OSAB (IndiceSerializado `osab_documentos`).
+
+Rode uma vez após o deploy (até lá a exportação monta o conjunto varrendo a
+ImportacaoOsab) e após cargas manuais na tabela fora da tela de importação.
+
+Uso:
+  python manage.py reconstruir_conjunto_osab
+"""
+from django.core.management.base import BaseCommand
+
+from crm_app.services import osab_documentos
+
+
+class Command(BaseCommand):
+    help = 'Regrava o conjunto de documentos OSAB usado em CONSTA / NÃO CONSTA OSAB'
+
+    def handle(self, *args, **options):
+        total = osab_documentos.atualizar_conjunto('manage.py reconstruir_conjunto_osab')
+        self.stdout.write(self.style.SUCCESS(f'{total} documentos OSAB no conjunto'))
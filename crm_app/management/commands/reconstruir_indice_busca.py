@@ -0,0 +1,30 @@
+"""
+Reconstrói o índice de busca textual do Qualidade e da Esteira (DocumentoBusca).
+
+Obrigatório uma vez após o deploy: até a primeira reconstrução as telas seguem com a
+busca antiga direto nas tabelas. Depois disso os signals mantêm o índice; rode de novo
+após correções em massa (update/bulk_update) em contratos, vendas ou clientes.
+
+Uso:
+  python manage.py reconstruir_indice_busca
+  python manage.py reconstruir_indice_busca --tipo venda
+"""
+from django.core.management.base import BaseCommand
+
+from crm_app.services import busca_textual
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual (contratos M10 e vendas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo', action='append', default=[],
+            choices=[busca_textual.TIPO_CONTRATO, busca_textual.TIPO_VENDA],
+            help='contrato ou venda (pode repetir; padrão: ambos)',
+        )
+
+    def handle(self, *args, **options):
+        resumo = busca_textual.reconstruir_indice(options['tipo'] or None)
+        for tipo, total in resumo.items():
+            self.stdout.write(self.style.SUCCESS(f'{tipo}: {total} documentos indexados'))
@@ -0,0 +1,26 @@
+"""
+Reconstrói o índice DFV por CEP (DFVIndiceCep) a partir da base DFV atual.
+
+Roda sozinho no fim de cada importação DFV; use manualmente no primeiro deploy
+ou se a base DFV for alterada por fora do importador.
+
+Uso:
+  python manage.py reconstruir_indice_dfv
+"""
+from django.core.management.base import BaseCommand
+
+from crm_app.dfv_indice import reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice DFV por CEP usado nas consultas de fachada/viabilidade'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        resultado = reconstruir_indice(batch_size=max(100, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice DFV v{resultado['versao']}: {resultado['ceps']} CEPs, "
+            f"{resultado['fachadas']} fachadas em {resultado['duracao_segundos']}s"
+        ))
@@ -0,0 +1,38 @@
+"""
+Reconstrói o agregado do Qualidade / Dashboard FPD (RollupQualidade).
+
+As fatias se refazem sozinhas na leitura quando ficam sujas; use no primeiro deploy
+(para não pagar a construção no primeiro acesso) ou após correções em massa no banco.
+
+Uso:
+  python manage.py reconstruir_rollup_qualidade
+  python manage.py reconstruir_rollup_qualidade --lente vencimento --periodo 2026-03
+  python manage.py reconstruir_rollup_qualidade --lente FPD --lente SPD
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.services import qualidade_rollup
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o agregado por lente/mês usado nos cards do Qualidade e no Dashboard FPD'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lente', action='append', default=[],
+            help='vencimento, instalacao, FPD, SPD ou TPD (pode repetir; padrão: todas)',
+        )
+        parser.add_argument('--periodo', action='append', default=[], metavar='YYYY-MM')
+
+    def handle(self, *args, **options):
+        validas = qualidade_rollup.LENTES_PAINEL + qualidade_rollup.INDICADORES_FPD
+        invalidas = [l for l in options['lente'] if l not in validas]
+        if invalidas:
+            raise CommandError(f'Lente inválida: {", ".join(invalidas)} (use {", ".join(validas)})')
+        resultado = qualidade_rollup.reconstruir_tudo(
+            lentes=options['lente'] or None,
+            periodos=options['periodo'] or None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['fatias']} fatias reconstruídas em {resultado['duracao_ms']} ms"
+        ))
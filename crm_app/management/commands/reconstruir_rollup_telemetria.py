@@ -0,0 +1,44 @@
+"""
+Reconstrói os agregados diários da telemetria do bot (RollupEstatisticaBotDia / RollupFunilVendaWppDia).
+
+O agregado é somado a cada gravação em lote da telemetria; use no primeiro deploy (backfill
+do histórico bruto) ou após correções em massa nas tabelas brutas. Os dias informados são
+apagados e refeitos numa transação.
+
+Uso:
+  python manage.py reconstruir_rollup_telemetria
+  python manage.py reconstruir_rollup_telemetria --desde 2026-01-01
+  python manage.py reconstruir_rollup_telemetria --desde 2026-03-01 --ate 2026-03-31
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.services import telemetria_rollup
+
+
+def _data(valor):
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Data inválida: {valor} (use YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os agregados diários das estatísticas do bot e do funil VENDER a partir das tabelas brutas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', metavar='YYYY-MM-DD', help='Primeiro dia (padrão: todo o histórico)')
+        parser.add_argument('--ate', metavar='YYYY-MM-DD', help='Último dia (padrão: hoje)')
+
+    def handle(self, *args, **options):
+        desde, ate = _data(options['desde']), _data(options['ate'])
+        if desde and ate and desde > ate:
+            raise CommandError('--desde maior que --ate')
+        resultado = telemetria_rollup.reconstruir(desde, ate)
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['estatisticas']} linhas de estatísticas e {resultado['funil']} do funil "
+            f"reconstruídas em {resultado['duracao_ms']} ms"
+        ))
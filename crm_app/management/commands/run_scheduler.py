@@ -11,6 +11,8 @@ from django.core.management.base import BaseCommand
 
 class Command(BaseCommand):
     help = 'Inicia o agendador de tarefas em processo dedicado (bloqueante)'
+    # O scheduler não serve HTTP: sem checks o boot não importa o URLconf (views.py).
+    requires_system_checks = []
 
     def handle(self, *args, **options):
         from crm_app.scheduler import run_blocking_scheduler
@@ -18,6 +18,8 @@ from crm_app.whatsapp_webhook_fila import reivindicar_proximo_webhook
 
 class Command(BaseCommand):
     help = "Processa fila de webhooks WhatsApp em processo dedicado."
+    # Sem system checks: o check de URLs importaria urls.py/views.py no boot do worker.
+    requires_system_checks = []
 
     def handle(self, *args, **options) -> None:
         intervalo = float(getattr(settings, "WHATSAPP_WORKER_POLL_SECONDS", 1.0))
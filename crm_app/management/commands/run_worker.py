@@ -0,0 +1,163 @@
+"""
+Worker genérico das filas PostgreSQL, com concorrência por fila.
+
+Uso: python manage.py run_worker --queues=imports:2,pap,webhook:4
+- imports (e qualquer outra fila da JobFila): handlers registrados em crm_app/job_fila.py;
+- pap / webhook: adaptadores sobre PapJobFila / WhatsappWebhookFila, que mantêm tabelas e regras
+  próprias (expiração de pendentes PAP, timeout do Playwright).
+Sem --queues usa JOBS_WORKER_FILAS; sem `:N` a concorrência vem de JOBS_CONCORRENCIA.
+
+Railway: serviço com este start command. Quem consome pap/webhook aqui deve ter
+PAP_WORKER_MODE / WHATSAPP_WORKER_MODE=true, como nos workers dedicados.
+"""
+from __future__ import annotations
+
+import logging
+import signal
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.db_resilience import force_close_db_connections, retry_on_db_connection_error
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class _Adaptador:
+    reivindicar: Callable[[], Any]
+    # Retorna True quando o processo precisa reiniciar (PAP travado no Playwright).
+    processar: Callable[[Any], bool | None]
+    recuperar: Callable[[], Any] | None = None
+
+
+def _sem_reinicio(processar: Callable[[Any], Any]) -> Callable[[Any], bool]:
+    def _processar(job: Any) -> bool:
+        processar(job)
+        return False
+
+    return _processar
+
+
+def _adaptador(fila: str) -> _Adaptador:
+    if fila == "pap":
+        from crm_app.pap_job_fila import recuperar_jobs_pap_travados, reivindicar_proximo_job
+        from crm_app.services.pap_job_processor import processar_job_com_timeout, timeout_job_segundos
+
+        return _Adaptador(
+            reivindicar=reivindicar_proximo_job,
+            processar=lambda job: processar_job_com_timeout(job, timeout_job_segundos(job.tipo)),
+            recuperar=recuperar_jobs_pap_travados,
+        )
+    if fila == "webhook":
+        from crm_app.services.webhook_job_processor import processar_job
+        from crm_app.whatsapp_webhook_fila import reivindicar_proximo_webhook
+
+        return _Adaptador(reivindicar=reivindicar_proximo_webhook, processar=_sem_reinicio(processar_job))
+
+    from crm_app.job_fila import processar_job, recuperar_jobs_travados, reivindicar_proximo_job
+
+    return _Adaptador(
+        reivindicar=lambda: reivindicar_proximo_job([fila]),
+        processar=_sem_reinicio(processar_job),
+        recuperar=lambda: recuperar_jobs_travados([fila]),
+    )
+
+
+def parse_filas(valor: str | None) -> dict[str, int]:
+    """'imports:2,pap,webhook' -> {'imports': 2, 'pap': N, 'webhook': N} (N de JOBS_CONCORRENCIA)."""
+    padrao = getattr(settings, "JOBS_CONCORRENCIA", {}) or {}
+    itens = [i.strip() for i in (valor or ",".join(getattr(settings, "JOBS_WORKER_FILAS", []) or ["imports"])).split(",")]
+    filas: dict[str, int] = {}
+    for item in filter(None, itens):
+        nome, _, n = item.partition(":")
+        try:
+            filas[nome.strip()] = max(1, int(n)) if n else max(1, int(padrao.get(nome.strip(), 1)))
+        except ValueError:
+            raise CommandError(f"Concorrência inválida em --queues: {item!r}")
+    if not filas:
+        raise CommandError("Nenhuma fila informada.")
+    return filas
+
+
+class Command(BaseCommand):
+    help = "Processa as filas PostgreSQL (imports, pap, webhook...) com concorrência por fila."
+    # Sem system checks: o check de URLs importaria urls.py/views.py no boot do worker.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queues",
+            default=None,
+            help="Filas e concorrência, ex.: imports:2,pap,webhook:4 (padrão: JOBS_WORKER_FILAS).",
+        )
+
+    def handle(self, *args, **options) -> None:
+        filas = parse_filas(options.get("queues"))
+        self._intervalo = float(getattr(settings, "JOBS_WORKER_POLL_SECONDS", 2.0))
+        self._parar = threading.Event()
+        self._reiniciar = False
+
+        def _shutdown(signum=None, frame=None) -> None:
+            # Jobs em andamento perdem o lease e são retomados (imports com checkpoint por chunk).
+            self.stdout.write(self.style.WARNING(f"[WORKER] Sinal {signum} — encerrando..."))
+            self._parar.set()
+
+        signal.signal(signal.SIGINT, _shutdown)
+        signal.signal(signal.SIGTERM, _shutdown)
+
+        threads = []
+        for fila, concorrencia in filas.items():
+            adaptador = _adaptador(fila)
+            for vaga in range(concorrencia):
+                t = threading.Thread(
+                    target=self._loop, args=(fila, adaptador, vaga), name=f"worker-{fila}-{vaga}", daemon=True,
+                )
+                t.start()
+                threads.append(t)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[WORKER] Iniciado (poll={self._intervalo}s) filas={filas}"
+        ))
+        while not self._parar.wait(1.0):
+            pass
+        for t in threads:
+            t.join(timeout=30)
+
+        if self._reiniciar:
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS("[WORKER] Encerrado."))
+
+    def _loop(self, fila: str, adaptador: _Adaptador, vaga: int) -> None:
+        ciclos_sem_job = 0
+        try:
+            while not self._parar.is_set():
+                try:
+                    # Poll longo sem ORM: descarta a conexão ociosa desta thread antes de tocar no banco.
+                    force_close_db_connections()
+                    # Só a 1ª vaga de cada fila roda a recuperação (no start e a cada ~30 polls vazios).
+                    if adaptador.recuperar and vaga == 0 and ciclos_sem_job % 30 == 0:
+                        retry_on_db_connection_error(adaptador.recuperar, label=f"recuperar_{fila}")
+
+                    job = retry_on_db_connection_error(adaptador.reivindicar, label=f"reivindicar_{fila}")
+                    if not job:
+                        ciclos_sem_job += 1
+                        self._parar.wait(self._intervalo)
+                        continue
+
+                    ciclos_sem_job = 0
+                    logger.info("[WORKER] %s job %s tipo=%s", fila, job.id, getattr(job, "tipo", ""))
+                    if adaptador.processar(job):
+                        # Playwright pode ter deixado o processo inconsistente — a plataforma reinicia.
+                        logger.error("[WORKER] Job %s da fila %s travou; reiniciando o worker.", job.id, fila)
+                        self._reiniciar = True
+                        self._parar.set()
+                except Exception:
+                    logger.exception("[WORKER] Erro inesperado no loop da fila %s", fila)
+                    force_close_db_connections()
+                    self._parar.wait(max(2.0, self._intervalo))
+        finally:
+            force_close_db_connections()
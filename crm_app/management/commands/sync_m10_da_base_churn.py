@@ -20,12 +20,11 @@ Uso:
   python manage.py sync_m10_da_base_churn --anomes 202507 --dry-run
   python manage.py sync_m10_da_base_churn --anomes 202507 --consultar   # listar sem alterar
 """
-from datetime import datetime
-
-from dateutil.relativedelta import relativedelta
 from django.core.management.base import BaseCommand
 
-from crm_app.models import ContratoM10, ImportacaoChurn, SafraM10
+from crm_app.churn_os_utils import chave_os_canonica
+from crm_app.models import ContratoM10, ImportacaoChurn
+from crm_app.services.churn_import_service import contratos_por_os, recalcular_ativos_safras
 
 
 def _normalize_os(val):
@@ -37,36 +36,6 @@ def _normalize_os(val):
     return str(s)
 
 
-def _os_variants(os_val):
-    """Gera variações de O.S. para matching com ContratoM10.ordem_servico."""
-    s = _normalize_os(os_val)
-    if not s:
-        return []
-    variants = [s]
-    if s.isdigit() or (s.lstrip('0') and s.lstrip('0').isdigit()):
-        variants.append(s.zfill(8))
-        stripped = s.lstrip('0') or '0'
-        if stripped not in variants:
-            variants.append(stripped)
-    if '-' in s:
-        part = s.split('-', 1)[1].strip()
-        if part and part not in variants:
-            variants.append(part)
-            if part.isdigit() or (part.lstrip('0') and part.lstrip('0').isdigit()):
-                p8 = part.zfill(8)
-                if p8 not in variants:
-                    variants.append(p8)
-    return variants
-
-
-def _find_contrato_m10(os_val):
-    for v in _os_variants(os_val):
-        c = ContratoM10.objects.filter(ordem_servico=v).first()
-        if c:
-            return c
-    return None
-
-
 class Command(BaseCommand):
     help = 'Atualiza ContratoM10 (CANCELADO) a partir da base ImportacaoChurn já importada'
 
@@ -128,13 +97,23 @@ class Command(BaseCommand):
         sem_os = 0
         affected_safras = set()
 
-        for ch in qs.iterator():
+        churns = list(qs)
+        # Contratos de todas as O.S. numa consulta por lote (antes: até 4 queries por churn)
+        pk_por_os = {
+            chave: row['pk']
+            for chave, row in contratos_por_os(
+                chave_os_canonica(ch.nr_ordem or ch.numero_pedido) for ch in churns
+            ).items()
+        }
+        contratos = ContratoM10.objects.in_bulk(list(pk_por_os.values()))
+
+        for ch in churns:
             os_candidato = ch.nr_ordem or ch.numero_pedido
             if not os_candidato or not str(os_candidato).strip():
                 sem_os += 1
                 continue
 
-            contrato = _find_contrato_m10(os_candidato)
+            contrato = contratos.get(pk_por_os.get(chave_os_canonica(os_candidato)))
             if not contrato:
                 nao_encontrados += 1
                 if nao_encontrados <= 10:
@@ -164,24 +143,8 @@ class Command(BaseCommand):
                 ))
 
         if not dry_run and affected_safras and cancelados > 0:
-            for safra_str in affected_safras:
-                try:
-                    y, m = int(safra_str[:4]), int(safra_str[5:7])
-                    mes_ref = datetime(y, m, 1).date()
-                except (ValueError, IndexError):
-                    continue
-                safra_obj = SafraM10.objects.filter(mes_referencia=mes_ref).first()
-                if not safra_obj:
-                    continue
-                data_fim = mes_ref + relativedelta(months=1)
-                total_ativos = ContratoM10.objects.filter(
-                    data_instalacao__gte=mes_ref,
-                    data_instalacao__lt=data_fim,
-                    status_contrato='ATIVO',
-                ).count()
-                safra_obj.total_ativos = total_ativos
-                safra_obj.save(update_fields=['total_ativos'])
-            self.stdout.write('Safras com total_ativos recalculado: {}'.format(', '.join(sorted(affected_safras))))
+            recalculadas = recalcular_ativos_safras(affected_safras)
+            self.stdout.write('Safras com total_ativos recalculado: {}'.format(', '.join(recalculadas)))
 
         self.stdout.write('')
         self.stdout.write('=' * 60)
@@ -0,0 +1,35 @@
+# Skip list do sync STATUS PAP da esteira (hash do snapshot + backoff por venda)
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0204_historico_envio_status_entrega'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaSyncStatusPapEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_hash', models.CharField(blank=True, default='', max_length=40)),
+                ('ultima_verificacao_em', models.DateTimeField(blank=True, null=True)),
+                ('ultima_alteracao_em', models.DateTimeField(blank=True, null=True)),
+                ('verificacoes_sem_alteracao', models.PositiveIntegerField(default=0)),
+                ('proxima_verificacao_em', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('venda', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='sync_status_pap_estado',
+                    to='crm_app.venda',
+                )),
+            ],
+            options={
+                'verbose_name': 'Estado sync PAP da venda',
+                'verbose_name_plural': 'Estados sync PAP das vendas',
+                'db_table': 'crm_venda_sync_status_pap_estado',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Ledger de execuções do APScheduler (duração, linhas afetadas, erro por job)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0205_venda_sync_status_pap_estado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerJobExecucao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(db_index=True, max_length=100)),
+                ('pool', models.CharField(blank=True, default='', max_length=30)),
+                ('status', models.CharField(
+                    choices=[('executando', 'Executando'), ('sucesso', 'Sucesso'), ('erro', 'Erro')],
+                    default='executando',
+                    max_length=15,
+                )),
+                ('iniciado_em', models.DateTimeField()),
+                ('finalizado_em', models.DateTimeField(blank=True, null=True)),
+                ('duracao_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('linhas_afetadas', models.IntegerField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('host', models.CharField(blank=True, default='', max_length=120)),
+            ],
+            options={
+                'verbose_name': 'Execução de job agendado',
+                'verbose_name_plural': 'Execuções de jobs agendados',
+                'db_table': 'crm_scheduler_job_execucao',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='schedulerjobexecucao',
+            index=models.Index(fields=['job_id', '-iniciado_em'], name='crm_sched_job_inicio_idx'),
+        ),
+    ]
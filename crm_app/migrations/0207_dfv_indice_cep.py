@@ -0,0 +1,43 @@
+# Índice DFV por CEP (rebuild pós-importação) + carimbo de versão de índices derivados
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0206_scheduler_job_execucao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DFVIndiceCep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cep', models.CharField(max_length=10, unique=True)),
+                ('total_fachadas', models.PositiveIntegerField(default=0)),
+                ('total_viaveis', models.PositiveIntegerField(default=0)),
+                ('dados', models.JSONField(default=dict)),
+            ],
+            options={
+                'verbose_name': 'Índice DFV por CEP',
+                'verbose_name_plural': 'Índice DFV por CEP',
+                'db_table': 'crm_dfv_indice_cep',
+            },
+        ),
+        migrations.CreateModel(
+            name='VersaoIndice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=60, unique=True)),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('detalhes', models.JSONField(blank=True, default=dict)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versão de índice',
+                'verbose_name_plural': 'Versões de índices',
+                'db_table': 'crm_versao_indice',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Agregado pré-calculado por lente/mês do Qualidade e do Dashboard FPD
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0207_dfv_indice_cep'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupQualidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lente', models.CharField(max_length=20)),
+                ('periodo', models.CharField(help_text='YYYY-MM', max_length=7)),
+                ('linhas', models.JSONField(blank=True, default=list)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('sujo', models.BooleanField(default=True)),
+                ('versao', models.PositiveIntegerField(default=0, help_text='Incrementada a cada invalidação')),
+                ('construido_em', models.DateTimeField(blank=True, null=True)),
+                ('duracao_ms', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Rollup Qualidade/FPD',
+                'verbose_name_plural': 'Rollups Qualidade/FPD',
+                'db_table': 'crm_rollup_qualidade',
+                'unique_together': {('lente', 'periodo')},
+            },
+        ),
+    ]
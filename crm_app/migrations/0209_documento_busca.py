@@ -0,0 +1,64 @@
+# Documento desnormalizado da busca textual (Qualidade / Esteira) + índices trigram no PostgreSQL
+
+from django.db import migrations, models, transaction
+
+
+COLUNAS_TRGM = ('texto', 'documento', 'telefones')
+
+
+def criar_indices_trgm(apps, schema_editor):
+    """pg_trgm + GIN por coluna; em outros bancos a busca cai no LIKE sem índice."""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        print("⚠️  Pulando índices trigram da busca - banco atual é", connection.vendor)
+        return
+    with connection.cursor() as cursor:
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        except Exception as e:
+            print("⚠️  Não foi possível criar a extensão pg_trgm:", e)
+            return
+        for coluna in COLUNAS_TRGM:
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_docbusca_{coluna}_trgm
+                ON crm_documento_busca USING gin ({coluna} gin_trgm_ops);
+            """)
+
+
+def remover_indices_trgm(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for coluna in COLUNAS_TRGM:
+            cursor.execute(f"DROP INDEX IF EXISTS idx_docbusca_{coluna}_trgm;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0208_rollup_qualidade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('contrato', 'Contrato M10'), ('venda', 'Venda')], max_length=10)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('texto', models.TextField(blank=True, default='')),
+                ('documento', models.TextField(blank=True, default='')),
+                ('telefones', models.TextField(blank=True, default='')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Documento de busca',
+                'verbose_name_plural': 'Documentos de busca',
+                'db_table': 'crm_documento_busca',
+                'unique_together': {('tipo', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(criar_indices_trgm, remover_indices_trgm),
+    ]
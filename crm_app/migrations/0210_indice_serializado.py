@@ -0,0 +1,29 @@
+# Conjuntos derivados gravados compactados (ex.: documentos OSAB canônicos)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0209_documento_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceSerializado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=60, unique=True)),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('dados', models.BinaryField(default=bytes)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Índice serializado',
+                'verbose_name_plural': 'Índices serializados',
+                'db_table': 'crm_indice_serializado',
+            },
+        ),
+    ]
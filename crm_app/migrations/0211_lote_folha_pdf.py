@@ -0,0 +1,61 @@
+# Lotes de PDFs folha + extrato gerados em background (WhatsApp / download ZIP)
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0210_indice_serializado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteFolhaPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('whatsapp', 'Envio WhatsApp'), ('download', 'Download ZIP')], max_length=10)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('SUCESSO', 'Sucesso'), ('PARCIAL', 'Parcial'), ('ERRO', 'Erro')], db_index=True, default='PENDENTE', max_length=12)),
+                ('ano', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('vendedores_ids', models.JSONField(default=list)),
+                ('fechar_mes', models.BooleanField(default=False)),
+                ('usar_data_efetiva', models.BooleanField(default=False)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('renderizados', models.PositiveIntegerField(default=0)),
+                ('enviados', models.PositiveIntegerField(default=0)),
+                ('erros', models.JSONField(blank=True, default=list)),
+                ('mensagem', models.TextField(blank=True, default='')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('finalizado_em', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lote de PDFs da folha',
+                'verbose_name_plural': 'Lotes de PDFs da folha',
+                'db_table': 'crm_lote_folha_pdf',
+            },
+        ),
+        migrations.CreateModel(
+            name='LoteFolhaPdfItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vendedor_id', models.PositiveBigIntegerField()),
+                ('nome_arquivo', models.CharField(blank=True, default='', max_length=255)),
+                ('pdf', models.BinaryField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('GERADO', 'Gerado'), ('ENVIADO', 'Enviado'), ('ERRO', 'Erro')], default='GERADO', max_length=10)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='crm_app.lotefolhapdf')),
+            ],
+            options={
+                'verbose_name': 'PDF de lote da folha',
+                'verbose_name_plural': 'PDFs de lotes da folha',
+                'db_table': 'crm_lote_folha_pdf_item',
+                'unique_together': {('lote', 'vendedor_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Agregados diários da telemetria do bot (estatísticas por comando e eventos do funil)
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0211_lote_folha_pdf'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupEstatisticaBotDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('comando', models.CharField(max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('vendedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Rollup diário Estatística Bot',
+                'verbose_name_plural': 'Rollups diários Estatística Bot',
+                'db_table': 'crm_rollup_estatistica_bot_dia',
+                'indexes': [
+                    models.Index(fields=['dia', 'comando'], name='rollup_bot_dia_comando_idx'),
+                    models.Index(fields=['vendedor', 'dia'], name='rollup_bot_vendedor_dia_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupFunilVendaWppDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('funil_estagio', models.CharField(max_length=20)),
+                ('tipo_evento', models.CharField(max_length=30)),
+                ('status_final', models.CharField(blank=True, default='', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Rollup diário Funil Venda WPP',
+                'verbose_name_plural': 'Rollups diários Funil Venda WPP',
+                'db_table': 'crm_rollup_funil_venda_wpp_dia',
+                'indexes': [
+                    models.Index(fields=['dia', 'funil_estagio'], name='rollup_funil_dia_estagio_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Retenção: histórico de jobs arquivados das filas e índice parcial das pendentes
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0212_rollup_telemetria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilaJobHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fila', models.CharField(choices=[('webhook', 'Webhook WhatsApp'), ('pap', 'Job PAP')], max_length=20)),
+                ('job_id', models.BigIntegerField()),
+                ('tipo', models.CharField(blank=True, default='', max_length=64)),
+                ('telefone', models.CharField(blank=True, db_index=True, default='', max_length=32)),
+                ('status', models.CharField(max_length=16)),
+                ('prioridade', models.SmallIntegerField(default=5)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('criado_em', models.DateTimeField()),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('arquivado_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Job arquivado de fila',
+                'verbose_name_plural': 'Jobs arquivados de filas',
+                'db_table': 'crm_fila_job_historico',
+                'indexes': [
+                    models.Index(fields=['fila', 'job_id'], name='crm_fila_hist_job_idx'),
+                    models.Index(fields=['fila', 'criado_em'], name='crm_fila_hist_criado_idx'),
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='whatsappwebhookfila',
+            index=models.Index(
+                condition=models.Q(('status', 'pendente')),
+                fields=['prioridade', 'criado_em'],
+                name='webhook_fila_pendente_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='papjobfila',
+            index=models.Index(
+                condition=models.Q(('status', 'pendente')),
+                fields=['prioridade', 'criado_em'],
+                name='pap_fila_pendente_idx',
+            ),
+        ),
+    ]
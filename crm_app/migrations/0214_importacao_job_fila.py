@@ -0,0 +1,37 @@
+# Fila durável de importações (legado em chunks com checkpoint, retomável após restart)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0213_retencao_filas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacaoJobFila',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(db_index=True, max_length=64)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], db_index=True, default='pendente', max_length=16)),
+                ('prioridade', models.SmallIntegerField(default=5)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('max_tentativas', models.PositiveSmallIntegerField(default=3)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'crm_importacao_job_fila',
+                'ordering': ['prioridade', 'criado_em'],
+                'indexes': [
+                    models.Index(condition=models.Q(('status', 'pendente')), fields=['prioridade', 'criado_em'], name='importacao_fila_pendente_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Fila de importações vira a fila genérica de jobs (fila/tipo, lease com heartbeat)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0214_importacao_job_fila'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='importacaojobfila',
+            name='importacao_fila_pendente_idx',
+        ),
+        migrations.RenameModel(
+            old_name='ImportacaoJobFila',
+            new_name='JobFila',
+        ),
+        migrations.AlterModelTable(
+            name='jobfila',
+            table='crm_job_fila',
+        ),
+        migrations.RenameField(
+            model_name='jobfila',
+            old_name='atualizado_em',
+            new_name='heartbeat_em',
+        ),
+        migrations.AddField(
+            model_name='jobfila',
+            name='fila',
+            field=models.CharField(db_index=True, default='imports', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='jobfila',
+            name='lease_ate',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='jobfila',
+            index=models.Index(condition=models.Q(('status', 'pendente')), fields=['fila', 'prioridade', 'criado_em'], name='job_fila_pendente_idx'),
+        ),
+    ]
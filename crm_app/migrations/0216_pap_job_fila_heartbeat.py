@@ -0,0 +1,18 @@
+# Heartbeat do worker PAP: job sem batimento recente é dado como travado antes do stale por minutos
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0215_job_fila_generica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='papjobfila',
+            name='heartbeat_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
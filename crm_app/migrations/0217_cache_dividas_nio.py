@@ -0,0 +1,29 @@
+# Cache por CPF/página das dívidas Nio em tabela própria (sai do DatabaseCache)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0216_pap_job_fila_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheDividasNio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cpf', models.CharField(max_length=14)),
+                ('pagina', models.CharField(max_length=24)),
+                ('resultado', models.JSONField(default=dict)),
+                ('consultado_em', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Cache de dívidas Nio',
+                'verbose_name_plural': 'Cache de dívidas Nio',
+                'db_table': 'crm_cache_dividas_nio',
+                'unique_together': {('cpf', 'pagina')},
+            },
+        ),
+    ]
@@ -1756,6 +1756,14 @@ class SessaoWhatsapp(models.Model):
     def __str__(self):
         return f"{self.telefone} - {self.etapa}"
 
+    def save(self, *args, **kwargs):
+        # Save parcial também grava updated_at: o cache de sessão do bot (whatsapp_roteador)
+        # é validado por etapa + updated_at.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
+        super().save(*args, **kwargs)
+
 
 class BrProntoBoEmUso(models.Model):
     """
@@ -2245,6 +2253,31 @@ class EstatisticaBotWhatsApp(models.Model):
         vendedor_nome = self.vendedor.username if self.vendedor else "N/A"
         return f"{self.comando} - {vendedor_nome} - {self.data_envio.strftime('%d/%m/%Y %H:%M')}"
 
+
+class RollupEstatisticaBotDia(models.Model):
+    """
+    Contagem diária de EstatisticaBotWhatsApp por (dia, vendedor, comando)
+    (ver `crm_app/services/telemetria_rollup.py`). Somada na gravação em lote da telemetria;
+    a leitura sempre agrega com Sum (a chave pode repetir em gravações concorrentes).
+    """
+    dia = models.DateField()
+    vendedor = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    comando = models.CharField(max_length=20)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'crm_rollup_estatistica_bot_dia'
+        verbose_name = 'Rollup diário Estatística Bot'
+        verbose_name_plural = 'Rollups diários Estatística Bot'
+        indexes = [
+            models.Index(fields=['dia', 'comando'], name='rollup_bot_dia_comando_idx'),
+            models.Index(fields=['vendedor', 'dia'], name='rollup_bot_vendedor_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.dia} {self.comando} vendedor={self.vendedor_id}: {self.total}'
+
+
 class DFV(models.Model):
     uf = models.CharField(max_length=2, null=True, blank=True)
     municipio = models.CharField(max_length=100, null=True, blank=True)
@@ -2270,6 +2303,73 @@ class DFV(models.Model):
             models.Index(fields=['cep', 'num_fachada']),
         ]
 
+
+class DFVIndiceCep(models.Model):
+    """
+    Índice pré-computado da base DFV: uma linha por CEP (ver `crm_app/dfv_indice.py`).
+
+    Reconstruído no fim de cada importação DFV. `dados` guarda cabeçalho (logradouro,
+    bairro, tecnologia, CDOs), fachadas viáveis já ordenadas e o mapa número → tipo.
+    """
+
+    cep = models.CharField(max_length=10, unique=True)
+    total_fachadas = models.PositiveIntegerField(default=0)
+    total_viaveis = models.PositiveIntegerField(default=0)
+    dados = models.JSONField(default=dict)
+
+    class Meta:
+        db_table = 'crm_dfv_indice_cep'
+        verbose_name = 'Índice DFV por CEP'
+        verbose_name_plural = 'Índice DFV por CEP'
+
+    def __str__(self):
+        return f'{self.cep} ({self.total_viaveis}/{self.total_fachadas} viáveis)'
+
+
+class VersaoIndice(models.Model):
+    """
+    Carimbo de versão de dados derivados (índices/caches por processo).
+
+    Quem reconstrói chama `versao_indice.incrementar_versao(nome)`; os processos comparam
+    com a versão que carregaram e descartam o cache local quando muda.
+    """
+
+    nome = models.CharField(max_length=60, unique=True)
+    versao = models.PositiveBigIntegerField(default=0)
+    detalhes = models.JSONField(default=dict, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'crm_versao_indice'
+        verbose_name = 'Versão de índice'
+        verbose_name_plural = 'Versões de índices'
+
+    def __str__(self):
+        return f'{self.nome} v{self.versao}'
+
+
+class IndiceSerializado(models.Model):
+    """
+    Conjunto derivado gravado compactado (uma linha por `nome`) com a versão que o gerou.
+
+    Processos carregam `dados` uma vez por versão (`VersaoIndice` de mesmo nome) em vez de
+    varrer a tabela de origem a cada uso.
+    """
+
+    nome = models.CharField(max_length=60, unique=True)
+    versao = models.PositiveBigIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    dados = models.BinaryField(default=bytes)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'crm_indice_serializado'
+        verbose_name = 'Índice serializado'
+        verbose_name_plural = 'Índices serializados'
+
+    def __str__(self):
+        return f'{self.nome} v{self.versao} ({self.total})'
+
 class GrupoDisparo(models.Model):
     nome = models.CharField(max_length=100, help_text="Ex: Grupo Gestão Comercial")
     chat_id = models.CharField(max_length=100, help_text="ID do grupo (Ex: 12036304...g.us)")
@@ -2973,6 +3073,32 @@ class SyncStatusEsteiraExecucao(models.Model):
         return f"Sync esteira #{self.id} ({self.modo}) — {self.status}"
 
 
+class VendaSyncStatusPapEstado(models.Model):
+    """
+    Último estado conhecido da venda no PAP (skip list do sync da esteira).
+
+    `snapshot_hash` = hash de `_snapshot_venda_sync_pap` após a última consulta.
+    Vendas estáveis recuam em backoff exponencial (`proxima_verificacao_em`).
+    """
+
+    venda = models.OneToOneField(
+        Venda, on_delete=models.CASCADE, related_name='sync_status_pap_estado',
+    )
+    snapshot_hash = models.CharField(max_length=40, blank=True, default='')
+    ultima_verificacao_em = models.DateTimeField(null=True, blank=True)
+    ultima_alteracao_em = models.DateTimeField(null=True, blank=True)
+    verificacoes_sem_alteracao = models.PositiveIntegerField(default=0)
+    proxima_verificacao_em = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        db_table = 'crm_venda_sync_status_pap_estado'
+        verbose_name = 'Estado sync PAP da venda'
+        verbose_name_plural = 'Estados sync PAP das vendas'
+
+    def __str__(self):
+        return f'Venda #{self.venda_id} — próxima {self.proxima_verificacao_em}'
+
+
 class NioReagendamentoExecucao(models.Model):
     """Job de reagendamento via bot WhatsApp oficial Nio (7029)."""
 
@@ -3869,6 +3995,67 @@ class ImportacaoFPD(models.Model):
         return f"{self.indicador} {self.nr_ordem} - Fatura {self.nr_fatura}"
 
 
+class RollupQualidade(models.Model):
+    """
+    Agregado pré-calculado do Qualidade / Dashboard FPD por lente e mês
+    (ver `crm_app/services/qualidade_rollup.py`).
+
+    `lente`: vencimento | instalacao (contratos do painel) ou FPD | SPD | TPD (linhas
+    da ImportacaoFPD). `linhas` é o cubo [[dimensões..., quantidade], ...]. Signals
+    marcam a fatia como suja; a leitura seguinte a reconstrói.
+    """
+
+    lente = models.CharField(max_length=20)
+    periodo = models.CharField(max_length=7, help_text="YYYY-MM")
+    linhas = models.JSONField(default=list, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    sujo = models.BooleanField(default=True)
+    versao = models.PositiveIntegerField(default=0, help_text="Incrementada a cada invalidação")
+    construido_em = models.DateTimeField(null=True, blank=True)
+    duracao_ms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'crm_rollup_qualidade'
+        verbose_name = 'Rollup Qualidade/FPD'
+        verbose_name_plural = 'Rollups Qualidade/FPD'
+        unique_together = ('lente', 'periodo')
+
+    def __str__(self):
+        return f'{self.lente} {self.periodo} ({self.total})'
+
+
+class DocumentoBusca(models.Model):
+    """
+    Documento desnormalizado da busca textual do Qualidade (contratos) e da Esteira
+    (vendas) — ver `crm_app/services/busca_textual.py`.
+
+    `texto`: nome/contrato/O.S. normalizados (minúsculas, sem acento); `documento`:
+    dígitos de CPF/CNPJ e O.S.; `telefones`: dígitos dos telefones. No PostgreSQL as
+    três colunas têm índice GIN trigram (migration 0209).
+    """
+
+    TIPO_CHOICES = [
+        ('contrato', 'Contrato M10'),
+        ('venda', 'Venda'),
+    ]
+
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    objeto_id = models.PositiveBigIntegerField()
+    texto = models.TextField(blank=True, default='')
+    documento = models.TextField(blank=True, default='')
+    telefones = models.TextField(blank=True, default='')
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'crm_documento_busca'
+        verbose_name = 'Documento de busca'
+        verbose_name_plural = 'Documentos de busca'
+        unique_together = ('tipo', 'objeto_id')
+
+    def __str__(self):
+        return f'{self.tipo} {self.objeto_id}'
+
+
 class LogImportacaoFPD(models.Model):
     """Log de importações FPD"""
     
@@ -4923,6 +5110,29 @@ class FunilVendaWppEvento(models.Model):
         return f"{self.tentativa_id} {self.etapa_codigo} @ {self.criado_em}"
 
 
+class RollupFunilVendaWppDia(models.Model):
+    """
+    Contagem diária de FunilVendaWppEvento por (dia, estágio, tipo de evento, status da
+    finalização) — `status_final` só nos eventos de status (ver `telemetria_rollup`).
+    """
+    dia = models.DateField()
+    funil_estagio = models.CharField(max_length=20)
+    tipo_evento = models.CharField(max_length=30)
+    status_final = models.CharField(max_length=20, blank=True, default="")
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "crm_rollup_funil_venda_wpp_dia"
+        verbose_name = "Rollup diário Funil Venda WPP"
+        verbose_name_plural = "Rollups diários Funil Venda WPP"
+        indexes = [
+            models.Index(fields=["dia", "funil_estagio"], name="rollup_funil_dia_estagio_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.funil_estagio}/{self.tipo_evento} {self.status_final}: {self.total}"
+
+
 class WhatsAppIntegracaoConfig(models.Model):
     """Configuração única do provedor WhatsApp (Z-API, Evolution+n8n, WhatsAtende ou híbrido)."""
 
@@ -5171,4 +5381,191 @@ class RelatorioTratamentoConfig(models.Model):
 
     def __str__(self) -> str:
         estado = 'ativo' if self.ativo else 'inativo'
-        return f'Relatório tempo de tratamento ({estado})'
\ No newline at end of file
+        return f'Relatório tempo de tratamento ({estado})'
+
+class SchedulerJobExecucao(models.Model):
+    """
+    Ledger de execuções dos jobs do APScheduler (manage.py run_scheduler).
+
+    Gravado por `_wrap_scheduler_job`: início, fim, duração, linhas afetadas (quando o
+    job retorna) e erro. Base do p50/p95 por job em `scheduler_execucoes`.
+    """
+
+    STATUS_EXECUTANDO = 'executando'
+    STATUS_SUCESSO = 'sucesso'
+    STATUS_ERRO = 'erro'
+    STATUS_CHOICES = (
+        (STATUS_EXECUTANDO, 'Executando'),
+        (STATUS_SUCESSO, 'Sucesso'),
+        (STATUS_ERRO, 'Erro'),
+    )
+
+    job_id = models.CharField(max_length=100, db_index=True)
+    pool = models.CharField(max_length=30, blank=True, default='')
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default=STATUS_EXECUTANDO)
+    iniciado_em = models.DateTimeField()
+    finalizado_em = models.DateTimeField(null=True, blank=True)
+    duracao_ms = models.PositiveIntegerField(null=True, blank=True)
+    linhas_afetadas = models.IntegerField(null=True, blank=True)
+    erro = models.TextField(blank=True, default='')
+    host = models.CharField(max_length=120, blank=True, default='')
+
+    class Meta:
+        db_table = 'crm_scheduler_job_execucao'
+        verbose_name = 'Execução de job agendado'
+        verbose_name_plural = 'Execuções de jobs agendados'
+        indexes = [
+            models.Index(fields=['job_id', '-iniciado_em'], name='crm_sched_job_inicio_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.job_id} @ {self.iniciado_em:%d/%m %H:%M} ({self.status})'
+
+
+class FilaJobHistorico(models.Model):
+    """
+    Jobs concluídos/com erro arquivados das filas PostgreSQL (WhatsappWebhookFila, PapJobFila).
+
+    A retenção (`crm_app/services/retencao_service.py`) move para cá o que terminou há mais de
+    FILA_ARQUIVAR_APOS_HORAS; as tabelas da fila ficam só com o trabalho em andamento.
+    """
+
+    FILA_WEBHOOK = 'webhook'
+    FILA_PAP = 'pap'
+    FILA_CHOICES = (
+        (FILA_WEBHOOK, 'Webhook WhatsApp'),
+        (FILA_PAP, 'Job PAP'),
+    )
+
+    fila = models.CharField(max_length=20, choices=FILA_CHOICES)
+    job_id = models.BigIntegerField()
+    tipo = models.CharField(max_length=64, blank=True, default='')
+    telefone = models.CharField(max_length=32, blank=True, default='', db_index=True)
+    status = models.CharField(max_length=16)
+    prioridade = models.SmallIntegerField(default=5)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    erro = models.TextField(blank=True, default='')
+    payload = models.JSONField(default=dict, blank=True)
+    criado_em = models.DateTimeField()
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    arquivado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'crm_fila_job_historico'
+        verbose_name = 'Job arquivado de fila'
+        verbose_name_plural = 'Jobs arquivados de filas'
+        indexes = [
+            models.Index(fields=['fila', 'job_id'], name='crm_fila_hist_job_idx'),
+            models.Index(fields=['fila', 'criado_em'], name='crm_fila_hist_criado_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.fila}#{self.job_id} ({self.status})'
+
+
+class LoteFolhaPdf(models.Model):
+    """
+    Lote de PDFs folha + extrato (envio WhatsApp ou download em ZIP) gerado em background.
+
+    A tela cria o lote, recebe o id na hora e acompanha `renderizados` / `enviados` pelo
+    endpoint de status; os PDFs ficam em `LoteFolhaPdfItem` (ver services/folha_pdf_lote.py).
+    """
+
+    TIPO_WHATSAPP = 'whatsapp'
+    TIPO_DOWNLOAD = 'download'
+    TIPO_CHOICES = (
+        (TIPO_WHATSAPP, 'Envio WhatsApp'),
+        (TIPO_DOWNLOAD, 'Download ZIP'),
+    )
+    STATUS_PENDENTE = 'PENDENTE'
+    STATUS_PROCESSANDO = 'PROCESSANDO'
+    STATUS_SUCESSO = 'SUCESSO'
+    STATUS_PARCIAL = 'PARCIAL'
+    STATUS_ERRO = 'ERRO'
+    STATUS_CHOICES = (
+        (STATUS_PENDENTE, 'Pendente'),
+        (STATUS_PROCESSANDO, 'Processando'),
+        (STATUS_SUCESSO, 'Sucesso'),
+        (STATUS_PARCIAL, 'Parcial'),
+        (STATUS_ERRO, 'Erro'),
+    )
+
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDENTE, db_index=True)
+    ano = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    vendedores_ids = models.JSONField(default=list)
+    fechar_mes = models.BooleanField(default=False)
+    usar_data_efetiva = models.BooleanField(default=False)
+    total = models.PositiveIntegerField(default=0)
+    renderizados = models.PositiveIntegerField(default=0)
+    enviados = models.PositiveIntegerField(default=0)
+    erros = models.JSONField(default=list, blank=True)
+    mensagem = models.TextField(blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    finalizado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'crm_lote_folha_pdf'
+        verbose_name = 'Lote de PDFs da folha'
+        verbose_name_plural = 'Lotes de PDFs da folha'
+
+    def __str__(self):
+        return f'Lote folha {self.mes:02d}/{self.ano} #{self.pk} ({self.tipo}, {self.status})'
+
+
+class LoteFolhaPdfItem(models.Model):
+    """PDF de um vendedor dentro de um `LoteFolhaPdf`."""
+
+    STATUS_GERADO = 'GERADO'
+    STATUS_ENVIADO = 'ENVIADO'
+    STATUS_ERRO = 'ERRO'
+    STATUS_CHOICES = (
+        (STATUS_GERADO, 'Gerado'),
+        (STATUS_ENVIADO, 'Enviado'),
+        (STATUS_ERRO, 'Erro'),
+    )
+
+    lote = models.ForeignKey(LoteFolhaPdf, on_delete=models.CASCADE, related_name='itens')
+    vendedor_id = models.PositiveBigIntegerField()
+    nome_arquivo = models.CharField(max_length=255, blank=True, default='')
+    pdf = models.BinaryField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_GERADO)
+    erro = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'crm_lote_folha_pdf_item'
+        verbose_name = 'PDF de lote da folha'
+        verbose_name_plural = 'PDFs de lotes da folha'
+        unique_together = (('lote', 'vendedor_id'),)
+
+    def __str__(self):
+        return f'{self.nome_arquivo or self.vendedor_id} ({self.status})'
+
+
+class CacheDividasNio(models.Model):
+    """
+    Resposta de `nio_api.consultar_dividas_nio` por CPF e página (offset:limit) — ver
+    `crm_app/nio_dividas_cache.py`.
+
+    Tabela própria em vez do DatabaseCache: cada página é uma linha gravada por upsert
+    (sem ler-modificar-gravar) e não disputa o MAX_ENTRIES com sessões e tokens; linhas
+    antigas saem pela retenção (RETENCAO_DIAS['CacheDividasNio']).
+    """
+
+    cpf = models.CharField(max_length=14)
+    pagina = models.CharField(max_length=24)
+    resultado = models.JSONField(default=dict)
+    consultado_em = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'crm_cache_dividas_nio'
+        verbose_name = 'Cache de dívidas Nio'
+        verbose_name_plural = 'Cache de dívidas Nio'
+        unique_together = ('cpf', 'pagina')
+
+    def __str__(self):
+        return f'{self.cpf} [{self.pagina}]'
@@ -3,17 +3,22 @@ import hashlib
 import json
 import logging
 import os
+import socket
 import threading
 import time
+import uuid
 from typing import Dict, Optional
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from django.conf import settings
+from django.core.cache import cache
 
 from .recaptcha_solver import RecaptchaSolver
 
@@ -28,6 +33,13 @@ DEFAULT_STORAGE_STATE = getattr(settings, "NIO_STORAGE_STATE", os.path.join(sett
 # =============================================================================
 # Este cache evita que múltiplas requisições simultâneas abram várias
 # instâncias do Playwright ao mesmo tempo, o que causava travamento do servidor.
+#
+# Dois níveis: `_token_cache` (memória do processo) e o cache do Django
+# (DatabaseCache, compartilhado entre workers gunicorn, scheduler e run_webhook_worker).
+# A renovação é coordenada por um lock no cache (cache.add): só um processo busca
+# token por vez; os demais aguardam o token publicado. Quando faltam
+# NIO_TOKEN_RENOVAR_ANTES_SEG para expirar, o token é renovado em background e as
+# chamadas seguem usando o atual.
 
 _token_cache = {
     "params": None,           # Dados do token (token, apiServerUrl)
@@ -36,13 +48,212 @@ _token_cache = {
 }
 _token_lock = threading.Lock()  # Lock para garantir apenas 1 Playwright por vez
 
+CACHE_KEY_PARAMS = "nio:token:params"
+CACHE_KEY_LOCK = "nio:token:lock"
+CACHE_KEY_SESSION_ID = "nio:session_id:{}"
+
+_renovacao_lock = threading.Lock()
+_renovacao_thread: Optional[threading.Thread] = None
+
+_session_ids: Dict[str, tuple] = {}  # chave (api_url+token) -> (session_id, timestamp)
+_sessao_local = threading.local()
+
+
+def _ttl_token() -> int:
+    return int(getattr(settings, "NIO_TOKEN_TTL_SEG", 1800) or 1800)
+
+
+def _renovar_antes_seg() -> int:
+    return int(getattr(settings, "NIO_TOKEN_RENOVAR_ANTES_SEG", 300) or 0)
+
+
+def _ttl_session_id() -> int:
+    return int(getattr(settings, "NIO_SESSION_ID_TTL_SEG", 600) or 0)
+
+
+def _cache_get(chave: str):
+    try:
+        return cache.get(chave)
+    except Exception as e:
+        logger.warning("[NIO CACHE] Cache compartilhado indisponível (%s): %s", chave, e)
+        return None
+
+
+def _cache_set(chave: str, valor, timeout: int) -> None:
+    try:
+        cache.set(chave, valor, timeout=timeout)
+    except Exception as e:
+        logger.warning("[NIO CACHE] Falha ao gravar %s no cache compartilhado: %s", chave, e)
+
+
+def _cache_delete(chave: str) -> None:
+    try:
+        cache.delete(chave)
+    except Exception:
+        pass
+
+
+def _http_session() -> requests.Session:
+    """Session HTTP por thread (pool de conexões keep-alive reaproveitado entre consultas)."""
+    session = getattr(_sessao_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _sessao_local.session = session
+    return session
+
+
+def _token_valido(agora: float):
+    """(params, idade) do token local ou, se vencido, do compartilhado; (None, None) se nenhum vale."""
+    ttl = _ttl_token()
+    idade = agora - _token_cache["timestamp"]
+    if _token_cache["params"] and idade < _token_cache["expires_in"]:
+        return _token_cache["params"], idade
+
+    entrada = _cache_get(CACHE_KEY_PARAMS)
+    if isinstance(entrada, dict) and entrada.get("params"):
+        idade = agora - float(entrada.get("timestamp") or 0)
+        if idade < ttl:
+            _token_cache["params"] = entrada["params"]
+            _token_cache["timestamp"] = float(entrada["timestamp"])
+            _token_cache["expires_in"] = ttl
+            return entrada["params"], idade
+    return None, None
+
+
+def _publicar_token(params: dict) -> None:
+    agora = time.time()
+    ttl = _ttl_token()
+    _token_cache["params"] = params
+    _token_cache["timestamp"] = agora
+    _token_cache["expires_in"] = ttl
+    _cache_set(CACHE_KEY_PARAMS, {"params": params, "timestamp": agora}, timeout=ttl)
+    logger.info(f"[NIO CACHE] 💾 Token salvo no cache (válido por {ttl}s)")
+
+
+def _adquirir_lock_global() -> Optional[str]:
+    """Retorna o token de dono do lock compartilhado, ou None se outro processo o detém."""
+    timeout = int(getattr(settings, "NIO_TOKEN_LOCK_SEG", 180) or 180)
+    dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+    try:
+        return dono if cache.add(CACHE_KEY_LOCK, dono, timeout=timeout) else None
+    except Exception as e:
+        # Sem cache compartilhado: volta ao comportamento por processo.
+        logger.warning("[NIO CACHE] Lock compartilhado indisponível: %s", e)
+        return dono
+
+
+def _liberar_lock_global(dono: str) -> None:
+    """Só apaga o lock se ainda é nosso (pode ter expirado e sido pego por outro processo)."""
+    if _cache_get(CACHE_KEY_LOCK) == dono:
+        _cache_delete(CACHE_KEY_LOCK)
+
+
+def _aguardar_token_publicado(timeout_seg: float) -> Optional[dict]:
+    """Outro processo está renovando: espera o token aparecer no cache compartilhado."""
+    limite = time.time() + timeout_seg
+    while time.time() < limite:
+        time.sleep(1)
+        params, _ = _token_valido(time.time())
+        if params:
+            return params
+        if _cache_get(CACHE_KEY_LOCK) is None:
+            break
+    return None
+
+
+def _buscar_token_remoto(headless: bool, storage_state: Optional[str]) -> Optional[dict]:
+    # Tentar via requests primeiro (mais rápido, sem Playwright)
+    params = fetch_params_requests(requests.Session())
+    if params:
+        logger.info("[NIO CACHE] ✅ Token obtido via requests (sem Playwright)")
+        return params
+
+    # Fallback: Playwright em thread dedicada. A API sync deixa um
+    # event loop na OS thread; se rodar na thread do Gunicorn, o JWT/ORM
+    # dos próximos requests falha com SynchronousOnlyOperation.
+    logger.info("[NIO CACHE] ⚠️ Requests falhou. Usando Playwright (apenas 1 instância)...")
+    params = _fetch_params_playwright_isolado(headless=headless, storage_state=storage_state)
+    if params:
+        logger.info("[NIO CACHE] ✅ Token obtido via Playwright")
+    else:
+        logger.error("[NIO CACHE] ❌ Falha ao obter token (requests e Playwright falharam)")
+    return params
+
+
+def _renovar_token(
+    headless: bool,
+    storage_state: Optional[str],
+    *,
+    force_refresh: bool = False,
+    esperar: bool = True,
+) -> Optional[dict]:
+    """Busca token novo com lock local + lock compartilhado. esperar=False: desiste se outro renova."""
+    with _token_lock:
+        if not force_refresh:
+            # Re-verificar dentro do lock (outra thread/processo pode ter atualizado)
+            params, idade = _token_valido(time.time())
+            if params and (esperar or idade < _ttl_token() - _renovar_antes_seg()):
+                logger.info(f"[NIO CACHE] ✅ Token atualizado por outra thread/processo (idade: {idade:.0f}s)")
+                return params
+
+        dono = _adquirir_lock_global()
+        if dono is None:
+            if not esperar:
+                return None
+            logger.info("[NIO CACHE] ⏳ Outro processo renovando o token; aguardando...")
+            params = _aguardar_token_publicado(int(getattr(settings, "NIO_TOKEN_LOCK_SEG", 180) or 180))
+            if params:
+                return params
+            logger.warning("[NIO CACHE] Token não publicado a tempo; buscando neste processo.")
+
+        try:
+            logger.info("[NIO CACHE] 🔄 Cache expirado/vazio. Buscando novo token...")
+            params = _buscar_token_remoto(headless, storage_state)
+            if params:
+                _publicar_token(params)
+            return params
+        finally:
+            # Sem o lock (esperou e desistiu) não apaga: o lock é de quem está renovando.
+            if dono is not None:
+                _liberar_lock_global(dono)
+
+
+def _renovar_em_background(headless: bool, storage_state: Optional[str]) -> None:
+    from django.db import connection
+
+    try:
+        _renovar_token(headless, storage_state, esperar=False)
+    except Exception:
+        logger.exception("[NIO CACHE] Falha na renovação antecipada do token")
+    finally:
+        connection.close()
+
+
+def _agendar_renovacao(headless: bool, storage_state: Optional[str]) -> None:
+    """Dispara (no máximo uma por processo) a renovação antecipada em thread daemon."""
+    global _renovacao_thread
+    with _renovacao_lock:
+        if _renovacao_thread is not None and _renovacao_thread.is_alive():
+            return
+        _renovacao_thread = threading.Thread(
+            target=_renovar_em_background,
+            args=(headless, storage_state),
+            name="nio-token-renovacao",
+            daemon=True,
+        )
+        _renovacao_thread.start()
+
 
 def get_cached_params(headless: bool = True, storage_state: Optional[str] = None, force_refresh: bool = False) -> Optional[dict]:
     """
     Obtém os parâmetros (token/apiServerUrl) usando cache inteligente.
     
-    - Se o cache estiver válido, retorna imediatamente (sem Playwright)
-    - Se o cache expirou, apenas UMA thread busca novo token (outras aguardam)
+    - Se o cache (do processo ou compartilhado) estiver válido, retorna imediatamente
+    - Perto de expirar, agenda renovação em background e devolve o token atual
+    - Se o cache expirou, apenas UMA thread/processo busca novo token (outros aguardam)
     - Isso evita múltiplos Playwrights rodando simultaneamente
     
     Args:
@@ -53,67 +264,99 @@ def get_cached_params(headless: bool = True, storage_state: Optional[str] = None
     Returns:
         dict com token e apiServerUrl, ou None se falhar
     """
-    global _token_cache
-    
-    current_time = time.time()
-    
-    # 1. Verificar se cache está válido (sem lock - leitura rápida)
     if not force_refresh:
-        cache_age = current_time - _token_cache["timestamp"]
-        if _token_cache["params"] and cache_age < _token_cache["expires_in"]:
-            logger.info(f"[NIO CACHE] ✅ Usando token do cache (idade: {cache_age:.0f}s)")
-            return _token_cache["params"]
-    
-    # 2. Cache expirado ou vazio - precisamos buscar novo token
-    # Usar lock para garantir que apenas uma thread busca
-    with _token_lock:
-        # Re-verificar cache dentro do lock (outra thread pode ter atualizado)
-        current_time = time.time()
-        cache_age = current_time - _token_cache["timestamp"]
-        if not force_refresh and _token_cache["params"] and cache_age < _token_cache["expires_in"]:
-            logger.info(f"[NIO CACHE] ✅ Token atualizado por outra thread (idade: {cache_age:.0f}s)")
-            return _token_cache["params"]
-        
-        logger.info("[NIO CACHE] 🔄 Cache expirado/vazio. Buscando novo token...")
-        
-        # 3. Tentar via requests primeiro (mais rápido, sem Playwright)
-        session = requests.Session()
-        params = fetch_params_requests(session)
-        
+        params, idade = _token_valido(time.time())
         if params:
-            logger.info("[NIO CACHE] ✅ Token obtido via requests (sem Playwright)")
-        else:
-            # 4. Fallback: Playwright em thread dedicada. A API sync deixa um
-            # event loop na OS thread; se rodar na thread do Gunicorn, o JWT/ORM
-            # dos próximos requests falha com SynchronousOnlyOperation.
-            logger.info("[NIO CACHE] ⚠️ Requests falhou. Usando Playwright (apenas 1 instância)...")
-            params = _fetch_params_playwright_isolado(
-                headless=headless, storage_state=storage_state
-            )
-            
-            if params:
-                logger.info("[NIO CACHE] ✅ Token obtido via Playwright")
-            else:
-                logger.error("[NIO CACHE] ❌ Falha ao obter token (requests e Playwright falharam)")
-                return None
-        
-        # 5. Atualizar cache
-        _token_cache["params"] = params
-        _token_cache["timestamp"] = time.time()
-        logger.info(f"[NIO CACHE] 💾 Token salvo no cache (válido por {_token_cache['expires_in']}s)")
-        
-        return params
+            if idade >= _ttl_token() - _renovar_antes_seg():
+                _agendar_renovacao(headless, storage_state)
+            logger.info(f"[NIO CACHE] ✅ Usando token do cache (idade: {idade:.0f}s)")
+            return params
+
+    return _renovar_token(headless, storage_state, force_refresh=force_refresh)
 
 
 def invalidate_token_cache():
     """Invalida o cache de token (útil quando token expira no meio de uma operação)"""
-    global _token_cache
     with _token_lock:
         _token_cache["params"] = None
         _token_cache["timestamp"] = 0
+        _session_ids.clear()
+        _cache_delete(CACHE_KEY_PARAMS)
         logger.info("[NIO CACHE] 🗑️ Cache invalidado")
 
 
+def _aguardar_taxa(api_base: str) -> None:
+    """Limite de requisições por host da API Nio (NIO_API_MAX_RPS; 0 = sem limite)."""
+    por_segundo = float(getattr(settings, "NIO_API_MAX_RPS", 0) or 0)
+    if por_segundo <= 0:
+        return
+    from crm_app.services.rate_limit import limitador_por_host
+
+    limitador_por_host(urlparse(api_base).netloc or api_base, por_segundo).aguardar()
+
+
+def _chave_session_id(api_base: str, token: str) -> str:
+    return CACHE_KEY_SESSION_ID.format(hashlib.sha1(f"{api_base}|{token}".encode()).hexdigest()[:20])
+
+
+def _session_id_em_cache(chave: str, agora: float, ttl: int) -> Optional[str]:
+    """sessionId ainda válido do processo ou do cache compartilhado (sem chamar a Nio)."""
+    if ttl <= 0:
+        return None
+    local = _session_ids.get(chave)
+    if local and agora - local[1] < ttl:
+        return local[0]
+    entrada = _cache_get(chave)
+    if isinstance(entrada, dict) and entrada.get("session_id") and agora - float(entrada.get("timestamp") or 0) < ttl:
+        _session_ids[chave] = (entrada["session_id"], float(entrada["timestamp"]))
+        return entrada["session_id"]
+    return None
+
+
+def obter_session_id(api_base: str, token: str, session: requests.Session, force_refresh: bool = False) -> Optional[str]:
+    """sessionId reaproveitado (processo e cache compartilhado) por NIO_SESSION_ID_TTL_SEG."""
+    chave = _chave_session_id(api_base, token)
+    ttl = _ttl_session_id()
+    agora = time.time()
+    if not force_refresh:
+        session_id = _session_id_em_cache(chave, agora, ttl)
+        if session_id:
+            return session_id
+
+    _aguardar_taxa(api_base)
+    session_id = get_session_id(api_base, token, session)
+    if session_id and ttl > 0:
+        for k in [k for k, (_, ts) in _session_ids.items() if agora - ts >= ttl]:
+            _session_ids.pop(k, None)
+        _session_ids[chave] = (session_id, agora)
+        _cache_set(chave, {"session_id": session_id, "timestamp": agora}, timeout=ttl)
+    return session_id
+
+
+def credenciais_vigentes() -> Optional[Dict[str, str]]:
+    """
+    token, api_base e session_id já em cache e dentro do TTL, sem abrir Playwright nem
+    chamar a Nio; None se algum faltar. Usado para anexar credenciais atuais a respostas
+    guardadas (o PDF da fatura é baixado com elas).
+    """
+    agora = time.time()
+    params, _ = _token_valido(agora)
+    token = (params or {}).get("token")
+    api_base = (params or {}).get("apiServerUrl")
+    if not token or not api_base:
+        return None
+    session_id = _session_id_em_cache(_chave_session_id(api_base, token), agora, _ttl_session_id())
+    if not session_id:
+        return None
+    return {"token": token, "api_base": api_base, "session_id": session_id}
+
+
+def invalidar_session_id(api_base: str, token: str) -> None:
+    chave = _chave_session_id(api_base, token)
+    _session_ids.pop(chave, None)
+    _cache_delete(chave)
+
+
 def decrypt_params(enc_b64: str) -> dict:
     data = base64.b64decode(enc_b64)
     if len(data) <= 16:
@@ -454,6 +697,91 @@ def _map_invoice(invoice: Dict, debt: Dict) -> Dict:
     }
 
 
+def _contexto_consulta(headless: bool, storage_state: Optional[str]):
+    """(token, api_url) do cache de token; levanta RuntimeError como a consulta original."""
+    # USAR CACHE DE TOKEN - evita múltiplos Playwrights simultâneos
+    params = get_cached_params(headless=headless, storage_state=storage_state)
+
+    if not params:
+        logger.error("[M10] Falha ao obter token/apiServerUrl (possível bloqueio/captcha). Rode headful para renovar cookies.")
+        raise RuntimeError("Falha ao obter token/apiServerUrl (possível bloqueio/captcha). Rode headful para renovar cookies.")
+
+    token = params.get("token")
+    api_url = params.get("apiServerUrl")
+    if not token or not api_url:
+        logger.error("[M10] /params sem token ou apiServerUrl")
+        raise RuntimeError("/params sem token ou apiServerUrl")
+    return token, api_url
+
+
+def credenciais_atuais(headless: bool = True, storage_state: Optional[str] = None) -> Dict[str, str]:
+    """
+    Como `credenciais_vigentes`, mas renova token/sessionId quando não há nada válido em
+    cache (mesmo caminho da consulta). Levanta RuntimeError se a Nio não autenticar.
+    """
+    credenciais = credenciais_vigentes()
+    if credenciais:
+        return credenciais
+    token, api_url = _contexto_consulta(headless, storage_state)
+    session_id = obter_session_id(api_url, token, _http_session())
+    if not session_id:
+        raise RuntimeError("Falha ao obter sessionId")
+    return {"token": token, "api_base": api_url, "session_id": session_id}
+
+
+def _consultar_com_token(cpf: str, offset: int, limit: int, token: str, api_url: str, session: requests.Session) -> Dict:
+    session_id = obter_session_id(api_url, token, session)
+    logger.info(f"[M10] Session ID: {session_id}")
+    if not session_id:
+        logger.error("[M10] Falha ao obter sessionId")
+        raise RuntimeError("Falha ao obter sessionId")
+
+    try:
+        _aguardar_taxa(api_url)
+        data = get_debts(api_url, token, session_id, cpf, offset, limit, session)
+    except requests.HTTPError as e:
+        if getattr(e.response, "status_code", None) not in (401, 403):
+            raise
+        # sessionId reaproveitado pode ter expirado do lado da Nio: renova uma vez.
+        logger.info("[M10] sessionId recusado (%s); renovando", e.response.status_code)
+        invalidar_session_id(api_url, token)
+        session_id = obter_session_id(api_url, token, session, force_refresh=True)
+        if not session_id:
+            invalidate_token_cache()
+            raise RuntimeError("Falha ao obter sessionId")
+        try:
+            _aguardar_taxa(api_url)
+            data = get_debts(api_url, token, session_id, cpf, offset, limit, session)
+        except requests.HTTPError as e2:
+            if getattr(e2.response, "status_code", None) in (401, 403):
+                invalidate_token_cache()
+            raise
+
+    logger.info(f"[M10] Dados recebidos: {data}")
+    if data.get("erro_400"):
+        return {
+            "token": None,
+            "api_base": api_url,
+            "session_id": None,
+            "invoices": [],
+            "raw": data,
+            "erro_400": True,
+            "detail": data.get("detail", "CPF não encontrado ou inválido na base Nio"),
+        }
+    invoices = []
+    for debt in data.get("debts", []):
+        for inv in debt.get("invoices", []) or []:
+            invoices.append(_map_invoice(inv, debt))
+    logger.info(f"[M10] Faturas mapeadas: {len(invoices)}")
+    return {
+        "token": token,
+        "api_base": api_url,
+        "session_id": session_id,
+        "invoices": invoices,
+        "raw": data,
+    }
+
+
 def consultar_dividas_nio(cpf: str, offset: int = 0, limit: int = 10, storage_state: Optional[str] = None, headless: bool = True) -> Dict:
     """
     Consulta dívidas no Nio usando cache de token para evitar múltiplos Playwrights.
@@ -462,57 +790,55 @@ def consultar_dividas_nio(cpf: str, offset: int = 0, limit: int = 10, storage_st
     - Se o token estiver válido, usa direto (sem abrir Playwright)
     - Se precisar renovar, apenas UMA instância do Playwright é aberta
     - Outras requisições aguardam e usam o token renovado
+    sessionId e conexões HTTP (keep-alive) são reaproveitados entre consultas.
     """
-    import logging
-    logger = logging.getLogger(__name__)
     logger.info(f"[M10] Iniciando consulta NIO para CPF: {cpf}")
-    session = requests.Session()
-
     try:
-        # USAR CACHE DE TOKEN - evita múltiplos Playwrights simultâneos
-        params = get_cached_params(headless=headless, storage_state=storage_state)
-        
-        if not params:
-            logger.error("[M10] Falha ao obter token/apiServerUrl (possível bloqueio/captcha). Rode headful para renovar cookies.")
-            raise RuntimeError("Falha ao obter token/apiServerUrl (possível bloqueio/captcha). Rode headful para renovar cookies.")
-
-        token = params.get("token")
-        api_url = params.get("apiServerUrl")
-        logger.info(f"[M10] Token: {token}, API URL: {api_url}")
-        if not token or not api_url:
-            logger.error("[M10] /params sem token ou apiServerUrl")
-            raise RuntimeError("/params sem token ou apiServerUrl")
-
-        session_id = get_session_id(api_url, token, session)
-        logger.info(f"[M10] Session ID: {session_id}")
-        if not session_id:
-            logger.error("[M10] Falha ao obter sessionId")
-            raise RuntimeError("Falha ao obter sessionId")
-
-        data = get_debts(api_url, token, session_id, cpf, offset, limit, session)
-        logger.info(f"[M10] Dados recebidos: {data}")
-        if data.get("erro_400"):
-            return {
-                "token": None,
-                "api_base": api_url,
-                "session_id": None,
-                "invoices": [],
-                "raw": data,
-                "erro_400": True,
-                "detail": data.get("detail", "CPF não encontrado ou inválido na base Nio"),
-            }
-        invoices = []
-        for debt in data.get("debts", []):
-            for inv in debt.get("invoices", []) or []:
-                invoices.append(_map_invoice(inv, debt))
-        logger.info(f"[M10] Faturas mapeadas: {len(invoices)}")
-        return {
-            "token": token,
-            "api_base": api_url,
-            "session_id": session_id,
-            "invoices": invoices,
-            "raw": data,
-        }
+        token, api_url = _contexto_consulta(headless, storage_state)
+        return _consultar_com_token(cpf, offset, limit, token, api_url, _http_session())
     except Exception as e:
         logger.exception(f"[M10] Erro na consulta NIO: {e}")
         raise
+
+
+def consultar_dividas_nio_lote(
+    cpfs,
+    offset: int = 0,
+    limit: int = 50,
+    storage_state: Optional[str] = None,
+    headless: bool = True,
+    pausa_seg: float = 0.0,
+) -> Dict[str, Dict]:
+    """
+    Consulta vários CPFs com o mesmo token, sessionId e pool de conexões.
+
+    Retorna {cpf_limpo: resultado de consultar_dividas_nio} — ou {"erro": msg} para o
+    CPF que falhou (inválido, HTTP, etc.), sem interromper o lote. CPFs repetidos são
+    consultados uma vez. Se o token não puder ser obtido, todos voltam com o mesmo erro.
+    """
+    unicos = list(dict.fromkeys("".join(filter(str.isdigit, str(c or ""))) for c in cpfs))
+    resultados: Dict[str, Dict] = {}
+    session = _http_session()
+    for i, cpf in enumerate(unicos):
+        if len(cpf) < 11:
+            resultados[cpf] = {"erro": f"CPF inválido: {cpf}"}
+            continue
+        try:
+            # Token relido a cada CPF (hit em memória) para acompanhar a renovação antecipada.
+            token, api_url = _contexto_consulta(headless, storage_state)
+        except RuntimeError as e:
+            for restante in unicos[i:]:
+                resultados.setdefault(restante, {"erro": str(e)})
+            break
+        try:
+            resultados[cpf] = _consultar_com_token(cpf, offset, limit, token, api_url, session)
+        except Exception as e:
+            logger.warning("[M10] Lote NIO: falha no CPF %s: %s", cpf, e)
+            resultados[cpf] = {"erro": f"{type(e).__name__}: {e}"[:300]}
+        if pausa_seg and i < len(unicos) - 1:
+            time.sleep(pausa_seg)
+    logger.info(
+        "[M10] Lote NIO: %s CPF(s), %s com erro",
+        len(resultados), sum(1 for r in resultados.values() if "erro" in r),
+    )
+    return resultados
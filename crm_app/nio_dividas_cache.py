@@ -0,0 +1,248 @@
+"""
+Cache por CPF das respostas de `nio_api.consultar_dividas_nio`.
+
+A resposta fica na tabela `CacheDividasNio` (comum a todos os processos), uma linha por
+CPF e página (offset/limit) gravada por upsert — fora do DatabaseCache, para não disputar o
+MAX_ENTRIES com sessões/tokens. Linhas antigas saem pela retenção. Token/sessionId não são
+gravados: cada leitura recebe as credenciais atuais (`nio_api.credenciais_atuais`).
+
+- Fresca (idade < NIO_DIVIDAS_CACHE_TTL_SEG): devolvida direto.
+- Velha mas dentro de NIO_DIVIDAS_CACHE_SWR_SEG: com `permitir_stale=True` é devolvida
+  na hora e uma thread renova o CPF em background (stale-while-revalidate); sem isso,
+  conta como miss e consulta ao vivo.
+- `invalidar_cpf` é chamado quando o CRM grava dados vindos da Nio (match de fatura).
+
+Contadores hit/stale/miss/renovacao/erro e o lock de renovação ficam no cache do Django
+(chaves fixas ou de vida curta; `estatisticas()`).
+"""
+from __future__ import annotations
+
+import copy
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = 'nio:dividas:'
+CHAVE_STATS = PREFIXO + 'stats:{}'
+CHAVE_RENOVACAO = PREFIXO + 'renovando:{}'
+CONTADORES = ('hit', 'stale', 'miss', 'renovacao', 'erro')
+# Credenciais da sessão Nio: não vão para a tabela; a leitura anexa as vigentes.
+CHAVES_CREDENCIAIS = ('token', 'api_base', 'session_id')
+
+RESULTADO_HIT = 'hit'
+RESULTADO_STALE = 'stale'
+RESULTADO_MISS = 'miss'
+
+
+def cache_ativo() -> bool:
+    return bool(getattr(settings, 'NIO_DIVIDAS_CACHE_ENABLED', True))
+
+
+def _ttl() -> int:
+    return int(getattr(settings, 'NIO_DIVIDAS_CACHE_TTL_SEG', 300) or 0)
+
+
+def _janela_stale() -> int:
+    return int(getattr(settings, 'NIO_DIVIDAS_CACHE_SWR_SEG', 1800) or 0)
+
+
+def limpar_cpf(cpf: Any) -> str:
+    return re.sub(r'\D', '', str(cpf or ''))
+
+
+def _pagina(offset: int, limit: int) -> str:
+    return f'{int(offset)}:{int(limit)}'
+
+
+def _contar(nome: str) -> None:
+    chave = CHAVE_STATS.format(nome)
+    try:
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, 1, timeout=None)
+    except Exception:
+        pass
+
+
+def estatisticas() -> Dict[str, Any]:
+    """Contadores acumulados e taxa de acerto (hit + stale sobre o total)."""
+    try:
+        valores = cache.get_many([CHAVE_STATS.format(n) for n in CONTADORES])
+    except Exception:
+        valores = {}
+    stats = {n: int(valores.get(CHAVE_STATS.format(n)) or 0) for n in CONTADORES}
+    total = stats['hit'] + stats['stale'] + stats['miss']
+    stats['total'] = total
+    stats['taxa_acerto'] = round((stats['hit'] + stats['stale']) / total, 4) if total else None
+    return stats
+
+
+def zerar_estatisticas() -> None:
+    try:
+        cache.delete_many([CHAVE_STATS.format(n) for n in CONTADORES])
+    except Exception:
+        pass
+
+
+def invalidar_cpf(cpf: Any) -> None:
+    """Descarta todas as páginas em cache do CPF (próxima consulta vai à Nio)."""
+    cpf = limpar_cpf(cpf)
+    if not cpf:
+        return
+    from crm_app.models import CacheDividasNio
+
+    try:
+        CacheDividasNio.objects.filter(cpf=cpf).delete()
+    except Exception:
+        logger.warning('[NIO DIVIDAS CACHE] Falha ao invalidar CPF %s', cpf)
+
+
+def _ler(cpf: str, pagina: str) -> Optional[Dict[str, Any]]:
+    """{'resultado', 'timestamp'} da página do CPF, ou None."""
+    from crm_app.models import CacheDividasNio
+
+    try:
+        item = CacheDividasNio.objects.filter(cpf=cpf, pagina=pagina).values('resultado', 'consultado_em').first()
+    except Exception:
+        return None
+    if not item or not isinstance(item['resultado'], dict):
+        return None
+    return {'resultado': item['resultado'], 'timestamp': item['consultado_em'].timestamp()}
+
+
+def _gravar(cpf: str, pagina: str, resultado: Dict[str, Any]) -> None:
+    """Upsert da página (INSERT ... ON CONFLICT): concorrentes não apagam as outras páginas."""
+    from crm_app.models import CacheDividasNio
+
+    if _ttl() + _janela_stale() <= 0:
+        return
+    try:
+        with transaction.atomic():
+            CacheDividasNio.objects.bulk_create(
+                [CacheDividasNio(
+                    cpf=cpf,
+                    pagina=pagina,
+                    resultado={k: v for k, v in resultado.items() if k not in CHAVES_CREDENCIAIS},
+                    consultado_em=timezone.now(),
+                )],
+                update_conflicts=True,
+                unique_fields=['cpf', 'pagina'],
+                update_fields=['resultado', 'consultado_em'],
+            )
+    except Exception:
+        logger.warning('[NIO DIVIDAS CACHE] Falha ao gravar CPF %s', cpf)
+
+
+def _com_credenciais_atuais(resultado: Dict[str, Any], storage_state, headless: bool) -> Dict[str, Any]:
+    """
+    Resposta do cache com token/sessionId atuais (usados depois para baixar PDF). Sem
+    credenciais válidas em cache, autentica de novo — nunca reaproveita as da gravação.
+    """
+    from crm_app.nio_api import credenciais_atuais
+
+    saida = copy.deepcopy(resultado)
+    if saida.get('erro_400'):
+        saida.update(dict.fromkeys(CHAVES_CREDENCIAIS))
+        return saida
+    try:
+        saida.update(credenciais_atuais(headless=headless, storage_state=storage_state))
+    except Exception:
+        _contar('erro')
+        raise
+    return saida
+
+
+def _consultar_ao_vivo(cpf: str, offset: int, limit: int, storage_state, headless: bool) -> Dict[str, Any]:
+    from crm_app.nio_api import consultar_dividas_nio
+
+    try:
+        resultado = consultar_dividas_nio(cpf, offset=offset, limit=limit, storage_state=storage_state, headless=headless)
+    except Exception:
+        _contar('erro')
+        raise
+    _gravar(cpf, _pagina(offset, limit), resultado)
+    return resultado
+
+
+def _renovar_em_background(cpf: str, offset: int, limit: int, storage_state, headless: bool) -> None:
+    from django.db import connection
+
+    try:
+        _consultar_ao_vivo(cpf, offset, limit, storage_state, headless)
+        _contar('renovacao')
+    except Exception as e:
+        logger.warning('[NIO DIVIDAS CACHE] Renovação em background falhou (CPF %s): %s', cpf, e)
+    finally:
+        try:
+            cache.delete(CHAVE_RENOVACAO.format(f'{cpf}:{_pagina(offset, limit)}'))
+        except Exception:
+            pass
+        connection.close()
+
+
+def _agendar_renovacao(cpf: str, offset: int, limit: int, storage_state, headless: bool) -> None:
+    """Uma renovação por CPF/página em todo o cluster (lock via cache.add)."""
+    try:
+        livre = cache.add(CHAVE_RENOVACAO.format(f'{cpf}:{_pagina(offset, limit)}'), '1', timeout=120)
+    except Exception:
+        livre = True
+    if not livre:
+        return
+    threading.Thread(
+        target=_renovar_em_background,
+        args=(cpf, offset, limit, storage_state, headless),
+        name=f'nio-dividas-{cpf[-4:]}',
+        daemon=True,
+    ).start()
+
+
+def consultar_dividas_nio_cache(
+    cpf: str,
+    offset: int = 0,
+    limit: int = 10,
+    storage_state: Optional[str] = None,
+    headless: bool = True,
+    *,
+    permitir_stale: bool = False,
+    forcar: bool = False,
+) -> Dict[str, Any]:
+    """
+    `consultar_dividas_nio` com cache por CPF. Mesmo retorno, mais a chave `cache`
+    ('hit', 'stale' ou 'miss'). `forcar=True` ignora o cache (mas atualiza a entrada).
+    """
+    cpf_limpo = limpar_cpf(cpf)
+    if not cache_ativo() or not cpf_limpo:
+        from crm_app.nio_api import consultar_dividas_nio
+
+        return consultar_dividas_nio(cpf, offset=offset, limit=limit, storage_state=storage_state, headless=headless)
+
+    pagina = _pagina(offset, limit)
+    item = None if forcar else _ler(cpf_limpo, pagina)
+    if item:
+        idade = time.time() - float(item.get('timestamp') or 0)
+        if idade < _ttl():
+            _contar('hit')
+            saida = _com_credenciais_atuais(item['resultado'], storage_state, headless)
+            saida['cache'] = RESULTADO_HIT
+            return saida
+        if permitir_stale and idade < _ttl() + _janela_stale():
+            _contar('stale')
+            _agendar_renovacao(cpf_limpo, offset, limit, storage_state, headless)
+            saida = _com_credenciais_atuais(item['resultado'], storage_state, headless)
+            saida['cache'] = RESULTADO_STALE
+            return saida
+
+    _contar('miss')
+    saida = dict(_consultar_ao_vivo(cpf_limpo, offset, limit, storage_state, headless))
+    saida['cache'] = RESULTADO_MISS
+    return saida
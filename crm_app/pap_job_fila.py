@@ -1,9 +1,22 @@
 """
 Fila de jobs PAP em PostgreSQL — isola Playwright do serviço web sem Redis.
+
+Agendamento do claim:
+- faixas: tipos interativos (WhatsApp esperando resposta, PAP_JOB_TIPOS_INTERATIVOS) passam
+  na frente da faixa de lote, que leva PAP_JOB_LOTE_PENALIDADE níveis de prioridade a mais;
+- envelhecimento: cada PAP_JOB_AGING_SEGUNDOS de espera ganha um nível, então o lote não morre
+  de fome atrás de uma rajada de interativos;
+- limites de concorrência por faixa (PAP_JOB_LOTE_MAX_SIMULTANEOS) e por tipo
+  (PAP_JOB_CONCORRENCIA_TIPOS), checados no mesmo lock do claim;
+- heartbeat: o worker renova `heartbeat_em` enquanto espera o handler; sem batimento por
+  PAP_JOB_HEARTBEAT_STALE_SEGUNDOS o job é dado como travado (worker morto), sem esperar
+  PAP_JOB_STALE_PROCESSANDO_MINUTES.
 """
 from __future__ import annotations
 
 import logging
+import math
+from collections import Counter
 from datetime import timedelta
 from typing import Any
 
@@ -42,6 +55,7 @@ class PapJobFila(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
     iniciado_em = models.DateTimeField(null=True, blank=True)
     concluido_em = models.DateTimeField(null=True, blank=True)
+    heartbeat_em = models.DateTimeField(null=True, blank=True)
     telefone = models.CharField(max_length=32, blank=True, default="", db_index=True)
 
     class Meta:
@@ -49,6 +63,12 @@ class PapJobFila(models.Model):
         ordering = ["prioridade", "criado_em"]
         indexes = [
             models.Index(fields=["status", "prioridade", "criado_em"]),
+            # Claim do próximo job: só as pendentes, sem varrer o histórico concluído
+            models.Index(
+                fields=["prioridade", "criado_em"],
+                condition=models.Q(status="pendente"),
+                name="pap_fila_pendente_idx",
+            ),
         ]
 
     def __str__(self) -> str:
@@ -72,22 +92,103 @@ def enfileirar_job_pap(
     return job
 
 
+FAIXA_INTERATIVA = "interativa"
+FAIXA_LOTE = "lote"
+
+# Candidatos lidos por claim (as pendentes expiram em minutos; a fila é curta).
+JANELA_CLAIM = 100
+# Chave do advisory lock que serializa o claim PAP entre workers ("PAPC").
+CLAIM_LOCK_KEY = 0x50415043
+
+
+def faixa_do_tipo(tipo: str) -> str:
+    interativos = getattr(settings, "PAP_JOB_TIPOS_INTERATIVOS", ("status_online", "analise_credito"))
+    return FAIXA_INTERATIVA if tipo in interativos else FAIXA_LOTE
+
+
+def prioridade_efetiva(tipo: str, prioridade: int, criado_em, agora) -> float:
+    """Prioridade (menor primeiro) com penalidade da faixa de lote e envelhecimento pela espera."""
+    efetiva = float(prioridade)
+    if faixa_do_tipo(tipo) == FAIXA_LOTE:
+        efetiva += float(getattr(settings, "PAP_JOB_LOTE_PENALIDADE", 5))
+    aging = float(getattr(settings, "PAP_JOB_AGING_SEGUNDOS", 30) or 0)
+    if aging > 0 and criado_em:
+        efetiva -= max(0.0, (agora - criado_em).total_seconds()) / aging
+    return efetiva
+
+
+def _tem_vaga(tipo: str, rodando: Counter) -> bool:
+    limite_tipo = int((getattr(settings, "PAP_JOB_CONCORRENCIA_TIPOS", {}) or {}).get(tipo, 0) or 0)
+    if limite_tipo and rodando[tipo] >= limite_tipo:
+        return False
+    if faixa_do_tipo(tipo) == FAIXA_LOTE:
+        limite_lote = int(getattr(settings, "PAP_JOB_LOTE_MAX_SIMULTANEOS", 1) or 0)
+        em_lote = sum(n for t, n in rodando.items() if faixa_do_tipo(t) == FAIXA_LOTE)
+        if limite_lote and em_lote >= limite_lote:
+            return False
+    return True
+
+
 def reivindicar_proximo_job() -> PapJobFila | None:
-    """Claim atômico do próximo job pendente (SELECT FOR UPDATE SKIP LOCKED)."""
+    """
+    Claim do próximo job pela prioridade efetiva, respeitando os limites por faixa e tipo.
+
+    Contagem dos PROCESSANDO e claim na mesma transação, serializados entre workers por
+    `pg_advisory_xact_lock` (escopo de transação: compatível com o PgBouncer). Sem o lock, dois
+    workers contariam as mesmas vagas e estourariam os limites. Ordenação em Python (igual no
+    SQLite e no PostgreSQL).
+    """
     with transaction.atomic():
-        job = (
-            PapJobFila.objects.select_for_update(skip_locked=True)
-            .filter(status=PapJobFila.STATUS_PENDENTE)
+        conn = transaction.get_connection()
+        if conn.vendor == "postgresql":
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [CLAIM_LOCK_KEY])
+
+        candidatos = list(
+            PapJobFila.objects.filter(status=PapJobFila.STATUS_PENDENTE)
             .order_by("prioridade", "criado_em")
-            .first()
+            .values("id", "tipo", "prioridade", "criado_em")[:JANELA_CLAIM]
+        )
+        if not candidatos:
+            return None
+        rodando = Counter(
+            PapJobFila.objects.filter(status=PapJobFila.STATUS_PROCESSANDO).values_list("tipo", flat=True)
+        )
+        agora = timezone.now()
+        candidatos.sort(
+            key=lambda c: (prioridade_efetiva(c["tipo"], c["prioridade"], c["criado_em"], agora), c["criado_em"])
         )
+        job = None
+        for candidato in candidatos:
+            if not _tem_vaga(candidato["tipo"], rodando):
+                continue
+            # SKIP LOCKED: linha presa por outra transação (ex.: recuperação) é pulada
+            job = (
+                PapJobFila.objects.select_for_update(skip_locked=True)
+                .filter(pk=candidato["id"], status=PapJobFila.STATUS_PENDENTE)
+                .first()
+            )
+            if job:
+                break
         if not job:
             return None
         job.status = PapJobFila.STATUS_PROCESSANDO
-        job.iniciado_em = timezone.now()
+        job.iniciado_em = agora
+        job.heartbeat_em = agora
         job.tentativas = (job.tentativas or 0) + 1
-        job.save(update_fields=["status", "iniciado_em", "tentativas"])
-        return job
+        job.save(update_fields=["status", "iniciado_em", "heartbeat_em", "tentativas"])
+    logger.info(
+        "[PAP_FILA] Job %s tipo=%s reivindicado após %.1fs na fila",
+        job.id, job.tipo, (agora - job.criado_em).total_seconds(),
+    )
+    return job
+
+
+def heartbeat_job_pap(job: PapJobFila) -> None:
+    """Worker vivo: renova `heartbeat_em` do job em processamento."""
+    PapJobFila.objects.filter(pk=job.pk, status=PapJobFila.STATUS_PROCESSANDO).update(
+        heartbeat_em=timezone.now()
+    )
 
 
 def _stale_processando_minutos() -> int:
@@ -99,30 +200,41 @@ def _stale_pendente_minutos() -> int:
     return int(getattr(settings, "PAP_JOB_STALE_PENDENTE_MINUTES", 10))
 
 
+def _heartbeat_stale_segundos() -> int:
+    return int(getattr(settings, "PAP_JOB_HEARTBEAT_STALE_SEGUNDOS", 90))
+
+
 def recuperar_jobs_pap_travados() -> dict[str, int]:
     """
     Recupera a fila quando o worker morre/trava no Playwright.
 
-    - processando antigo: recola como pendente (se ainda há tentativas) ou erro
+    - processando sem heartbeat recente (ou antigo demais): recola como pendente (se ainda há
+      tentativas) ou erro
     - pendente antigo: marca erro (usuário já recebeu timeout no WhatsApp; reprocessar spamaria)
     """
     agora = timezone.now()
     limite_proc = agora - timedelta(minutes=_stale_processando_minutos())
     limite_pend = agora - timedelta(minutes=_stale_pendente_minutos())
+    limite_hb = agora - timedelta(seconds=_heartbeat_stale_segundos())
     stats = {"processando_requeued": 0, "processando_erro": 0, "pendente_expirado": 0}
 
     travados = list(
-        PapJobFila.objects.filter(
-            status=PapJobFila.STATUS_PROCESSANDO,
-            iniciado_em__lt=limite_proc,
-        ).order_by("iniciado_em")[:100]
+        PapJobFila.objects.filter(status=PapJobFila.STATUS_PROCESSANDO)
+        .filter(models.Q(heartbeat_em__lt=limite_hb) | models.Q(iniciado_em__lt=limite_proc))
+        .order_by("iniciado_em")[:100]
     )
     for job in travados:
         idade_criado_min = (agora - job.criado_em).total_seconds() / 60.0 if job.criado_em else 0
-        msg = (
-            f"Job abandonado: travado em processando desde {job.iniciado_em} "
-            f"(>{_stale_processando_minutos()} min)."
-        )
+        if job.heartbeat_em and job.heartbeat_em < limite_hb:
+            msg = (
+                f"Job abandonado: sem heartbeat desde {job.heartbeat_em} "
+                f"(>{_heartbeat_stale_segundos()}s; worker morto?)."
+            )
+        else:
+            msg = (
+                f"Job abandonado: travado em processando desde {job.iniciado_em} "
+                f"(>{_stale_processando_minutos()} min)."
+            )
         # Jobs muito antigos: não reprocessar (WhatsApp já deu timeout ao usuário).
         if idade_criado_min >= _stale_pendente_minutos() or (job.tentativas or 0) >= (job.max_tentativas or 2):
             job.status = PapJobFila.STATUS_ERRO
@@ -166,3 +278,72 @@ def recuperar_jobs_pap_travados() -> dict[str, int]:
             logger.warning("[PAP_FILA] %s job(s) pendente(s) expirados.", n)
 
     return stats
+
+
+def _percentil(ordenados: list[float], p: float) -> float | None:
+    """Percentil por nearest-rank (lista já ordenada)."""
+    if not ordenados:
+        return None
+    return ordenados[max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))]
+
+
+def duracao_p95_segundos(tipo: str) -> float | None:
+    """
+    p95 da duração (iniciado → concluído) dos jobs concluídos do tipo nos últimos
+    PAP_JOB_TIMEOUT_JANELA_DIAS, incluindo os já arquivados em FilaJobHistorico. None com
+    menos de PAP_JOB_TIMEOUT_MIN_AMOSTRAS amostras. Cache de 10 min (consultado a cada job).
+    """
+    from django.core.cache import cache
+
+    from crm_app.models import FilaJobHistorico
+
+    chave = f"pap_job_p95:{tipo}"
+    em_cache = cache.get(chave)
+    if em_cache is not None:
+        return em_cache or None
+
+    desde = timezone.now() - timedelta(days=int(getattr(settings, "PAP_JOB_TIMEOUT_JANELA_DIAS", 7)))
+    linhas: list[tuple[Any, Any]] = []
+    for qs in (
+        PapJobFila.objects.filter(tipo=tipo, status=PapJobFila.STATUS_CONCLUIDO, concluido_em__gte=desde),
+        FilaJobHistorico.objects.filter(
+            fila=FilaJobHistorico.FILA_PAP, tipo=tipo, status=PapJobFila.STATUS_CONCLUIDO, concluido_em__gte=desde,
+        ),
+    ):
+        linhas += qs.exclude(iniciado_em=None).order_by("-concluido_em").values_list("iniciado_em", "concluido_em")[:1000]
+
+    duracoes = sorted(max(0.0, (fim - inicio).total_seconds()) for inicio, fim in linhas)
+    p95 = None
+    if len(duracoes) >= int(getattr(settings, "PAP_JOB_TIMEOUT_MIN_AMOSTRAS", 20)):
+        p95 = _percentil(duracoes, 95)
+    cache.set(chave, p95 or 0, 600)
+    return p95
+
+
+def metricas_espera_por_tipo(minutos: int = 60) -> dict[str, dict[str, Any]]:
+    """Espera na fila (criado → iniciado) por tipo na janela, mais pendentes e a mais antiga."""
+    agora = timezone.now()
+    esperas: dict[str, list[float]] = {}
+    for tipo, criado, iniciado in (
+        PapJobFila.objects.filter(iniciado_em__gte=agora - timedelta(minutes=minutos))
+        .values_list("tipo", "criado_em", "iniciado_em")[:5000]
+    ):
+        esperas.setdefault(tipo, []).append(max(0.0, (iniciado - criado).total_seconds()))
+
+    pendentes: dict[str, list[Any]] = {}
+    for tipo, criado in PapJobFila.objects.filter(status=PapJobFila.STATUS_PENDENTE).values_list("tipo", "criado_em"):
+        pendentes.setdefault(tipo, []).append(criado)
+
+    metricas = {}
+    for tipo in sorted(set(esperas) | set(pendentes)):
+        ordenadas = sorted(round(e, 1) for e in esperas.get(tipo, []))
+        fila = pendentes.get(tipo, [])
+        metricas[tipo] = {
+            "faixa": faixa_do_tipo(tipo),
+            "n": len(ordenadas),
+            "espera_p50_s": _percentil(ordenadas, 50),
+            "espera_p95_s": _percentil(ordenadas, 95),
+            "pendentes": len(fila),
+            "pendente_mais_antigo_s": round((agora - min(fila)).total_seconds(), 1) if fila else None,
+        }
+    return metricas
@@ -3,7 +3,6 @@ import logging
 from datetime import datetime
 from io import BytesIO
 
-import openpyxl
 from django.http import HttpResponse
 from django.utils import timezone
 from rest_framework import permissions, status
@@ -85,6 +84,8 @@ class PendenciaIndevidaRelatorioView(APIView):
             'venda', 'venda__cliente', 'venda__vendedor', 'usuario', 'motivo_pendencia',
         ).prefetch_related('anexos').order_by('criado_em')
 
+        import openpyxl
+
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = 'Pendências indevidas'
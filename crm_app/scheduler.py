@@ -5,6 +5,7 @@ Agendador de tarefas automáticas (faturas Nio, performance, boas-vindas, Sonax)
 Produção: processo dedicado — python manage.py run_scheduler
 Não iniciar junto com Gunicorn (evita competir com HTTP/webhooks).
 """
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
@@ -13,36 +14,82 @@ from django.conf import settings
 from django.core.management import call_command
 import logging
 import signal
+import time
 from collections.abc import Callable
 from functools import wraps
-from typing import TypeVar
+from typing import Any, TypeVar
 
 logger = logging.getLogger(__name__)
 
 _scheduler_instance = None
 
-_F = TypeVar("_F", bound=Callable[..., None])
+_F = TypeVar("_F", bound=Callable[..., Any])
 
+# Pools de execução: jobs curtos (lembretes, checagens por minuto) não esperam
+# atrás de lotes longos de I/O (match Nio, sync PAP, pré-aquecimento da folha).
+POOL_PADRAO = "default"
+POOL_LENTO = "lento"
 
-def _wrap_scheduler_job(func: _F) -> _F:
+
+def _executors():
+    return {
+        POOL_PADRAO: ThreadPoolExecutor(int(getattr(settings, "SCHEDULER_POOL_PADRAO_WORKERS", 5))),
+        POOL_LENTO: ThreadPoolExecutor(int(getattr(settings, "SCHEDULER_POOL_LENTO_WORKERS", 3))),
+    }
+
+
+def _wrap_scheduler_job(func: _F, *, job_id: str = "", pool: str = POOL_PADRAO) -> _F:
     """
-    Garante conexão PostgreSQL válida antes/depois de cada job.
+    Garante conexão PostgreSQL válida antes/depois de cada job e registra a execução.
 
     Processos longos (APScheduler) reutilizam conexões stale após timeout do proxy.
+    Cada execução vira uma linha em SchedulerJobExecucao (duração, linhas afetadas
+    pelo retorno do job, erro logado/lançado).
     """
+    job_id = job_id or func.__name__
+
     @wraps(func)
     def wrapper(*args, **kwargs) -> None:
         import django.db
+        from crm_app.scheduler_execucoes import captura_erro, finalizar_execucao, iniciar_execucao
 
         django.db.close_old_connections()
+        inicio = time.monotonic()
+        execucao_id = iniciar_execucao(job_id, pool)
+        captura = captura_erro()
+        captura.iniciar()
+        resultado = None
+        erro = None
         try:
-            func(*args, **kwargs)
+            resultado = func(*args, **kwargs)
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+            raise
         finally:
+            erro_logado = captura.finalizar()
+            erro = erro or erro_logado
             django.db.close_old_connections()
+            finalizar_execucao(execucao_id, inicio_monotonic=inicio, resultado=resultado, erro=erro)
+            logger.debug(
+                "[SCHEDULER] %s terminou em %.1fs%s",
+                job_id, time.monotonic() - inicio, " (erro)" if erro else "",
+            )
 
     return wrapper  # type: ignore[return-value]
 
 
+def _add_job(scheduler, func, *, id: str, pool: str = POOL_PADRAO, **kwargs):
+    """add_job com ledger + pool; max_instances=1 evita sobreposição do mesmo job."""
+    kwargs.setdefault("replace_existing", True)
+    kwargs.setdefault("max_instances", 1)
+    return scheduler.add_job(
+        _wrap_scheduler_job(func, job_id=id, pool=pool),
+        id=id,
+        executor=pool,
+        **kwargs,
+    )
+
+
 def buscar_faturas_automatico():
     try:
         logger.info("🤖 Iniciando lote de match Nio noturno...")
@@ -57,7 +104,7 @@ def finalizar_match_nio_noturno():
         from crm_app.services.nio_match_service import finalizar_janela_noturna
 
         logger.info("🌅 Encerrando janela de match Nio noturno")
-        finalizar_janela_noturna()
+        return finalizar_janela_noturna()
     except Exception as e:
         logger.error("❌ Erro ao finalizar match Nio noturno: %s", e)
 
@@ -137,7 +184,7 @@ def preaquecer_cache_folha_comissionamento():
 def lembrete_presenca_supervisor_10h():
     try:
         from presenca.services.lembrete_presenca_service import enviar_lembrete_supervisores, SLOT_10H
-        enviar_lembrete_supervisores(SLOT_10H)
+        return enviar_lembrete_supervisores(SLOT_10H)
     except Exception as e:
         logger.error("❌ Erro no lembrete presença 10h: %s", e)
 
@@ -145,7 +192,7 @@ def lembrete_presenca_supervisor_10h():
 def lembrete_presenca_supervisor_11h():
     try:
         from presenca.services.lembrete_presenca_service import enviar_lembrete_supervisores, SLOT_11H
-        enviar_lembrete_supervisores(SLOT_11H)
+        return enviar_lembrete_supervisores(SLOT_11H)
     except Exception as e:
         logger.error("❌ Erro no lembrete presença 11h: %s", e)
 
@@ -153,7 +200,7 @@ def lembrete_presenca_supervisor_11h():
 def aplicar_faltas_presenca_12h():
     try:
         from presenca.services.lembrete_presenca_service import aplicar_faltas_automaticas_12h
-        aplicar_faltas_automaticas_12h()
+        return aplicar_faltas_automaticas_12h()
     except Exception as e:
         logger.error("❌ Erro na falta automática presença 12h: %s", e)
 
@@ -166,6 +213,7 @@ def lista_agendamento_vendedor_manha():
         )
         resultado = processar_disparo_lista_agendamento(SLOT_MANHA)
         logger.info("[ListaAgendamento] Manhã: %s", resultado)
+        return resultado
     except Exception as e:
         logger.error("❌ Erro lista agendamento vendedor (manhã): %s", e)
         import traceback
@@ -180,6 +228,7 @@ def lista_agendamento_vendedor_tarde():
         )
         resultado = processar_disparo_lista_agendamento(SLOT_TARDE)
         logger.info("[ListaAgendamento] Tarde: %s", resultado)
+        return resultado
     except Exception as e:
         logger.error("❌ Erro lista agendamento vendedor (tarde): %s", e)
         import traceback
@@ -224,160 +273,203 @@ def encerrar_sessoes_tratamento_ociosas():
         from crm_app.services.relatorio_tratamento_service import get_config
         from crm_app.services.tempo_tratamento_service import encerrar_sessoes_ociosas
         timeout = int(getattr(get_config(), 'timeout_ociosidade_minutos', 10) or 10)
-        encerrar_sessoes_ociosas(timeout)
+        return encerrar_sessoes_ociosas(timeout)
     except Exception as e:
         logger.error("❌ Erro ao encerrar sessões de tratamento ociosas: %s", e)
 
 
+def limpar_ledger_scheduler():
+    from crm_app.scheduler_execucoes import limpar_execucoes_antigas
+
+    try:
+        return limpar_execucoes_antigas()
+    except Exception as e:
+        logger.error("❌ Erro ao limpar ledger do scheduler: %s", e)
+
+
+def aplicar_retencao():
+    """Arquiva jobs terminados das filas e poda logs antigos (retencao_service)."""
+    from crm_app.services.retencao_service import aplicar_retencao as _aplicar
+
+    try:
+        return _aplicar()['total']
+    except Exception as e:
+        logger.error("❌ Erro na retenção de filas/logs: %s", e)
+
+
+def retomar_jobs_orfaos():
+    """Recoloca (ou encerra) jobs da fila genérica com lease vencido; não executa handlers."""
+    from crm_app.job_fila import retomar_jobs_orfaos as _retomar
+
+    try:
+        return _retomar()
+    except Exception as e:
+        logger.error("❌ Erro ao retomar jobs órfãos: %s", e)
+
+
 def _registrar_jobs(scheduler):
     tz_match = getattr(settings, "TIME_ZONE", None) or "America/Sao_Paulo"
-    scheduler.add_job(
-        _wrap_scheduler_job(buscar_faturas_automatico),
+    _add_job(
+        scheduler,
+        buscar_faturas_automatico,
         trigger=CronTrigger.from_crontab('*/20 22-23,0-6 * * *', timezone=tz_match),
         id='buscar_faturas_diario',
+        pool=POOL_LENTO,
         name='Match Nio noturno (22h–7h a cada 20 min)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(finalizar_match_nio_noturno),
+    _add_job(
+        scheduler,
+        finalizar_match_nio_noturno,
         trigger=CronTrigger.from_crontab('0 7 * * *', timezone=tz_match),
         id='finalizar_match_nio_noturno',
+        pool=POOL_LENTO,
         name='Encerra relatório do match Nio (07:00)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(processar_envio_performance_agendado),
+    _add_job(
+        scheduler,
+        processar_envio_performance_agendado,
         trigger=IntervalTrigger(minutes=1),
         id='processar_envio_performance',
         name='Processar envios programados de Performance (a cada minuto)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(processar_relatorio_esteira_gc_agendado),
+    _add_job(
+        scheduler,
+        processar_relatorio_esteira_gc_agendado,
         trigger=IntervalTrigger(minutes=1),
         id='processar_relatorio_esteira_gc',
         name='Relatório esteira GC ao WhatsApp (a cada minuto)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(processar_relatorio_pendencia_cliente_agendado),
+    _add_job(
+        scheduler,
+        processar_relatorio_pendencia_cliente_agendado,
         trigger=IntervalTrigger(minutes=1),
         id='processar_relatorio_pendencia_cliente',
         name='Relatório pendências CLIENTE por vendedor (a cada minuto)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(processar_fila_boas_vindas),
+    _add_job(
+        scheduler,
+        processar_fila_boas_vindas,
         trigger=IntervalTrigger(minutes=5),
         id='processar_fila_boas_vindas',
+        pool=POOL_LENTO,
         name='Processar fila de boas-vindas (a cada 5 min)',
-        replace_existing=True,
-        max_instances=1,
     )
     tz_cob = getattr(settings, "TIME_ZONE", None) or "America/Sao_Paulo"
-    scheduler.add_job(
-        _wrap_scheduler_job(enviar_templates_cobranca_nio),
+    _add_job(
+        scheduler,
+        enviar_templates_cobranca_nio,
         trigger=CronTrigger.from_crontab("0 9 * * *", timezone=tz_cob),
         id="enviar_templates_cobranca_nio",
+        pool=POOL_LENTO,
         name="Templates Meta cobrança Nio (09:00)",
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(processar_relatorio_tratamento_agendado),
+    _add_job(
+        scheduler,
+        processar_relatorio_tratamento_agendado,
         trigger=IntervalTrigger(minutes=1),
         id='processar_relatorio_tratamento',
         name='Relatório tempo de tratamento ao WhatsApp (a cada minuto)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(encerrar_sessoes_tratamento_ociosas),
+    _add_job(
+        scheduler,
+        encerrar_sessoes_tratamento_ociosas,
         trigger=IntervalTrigger(minutes=3),
         id='encerrar_sessoes_tratamento_ociosas',
         name='Encerrar sessões de tratamento ociosas (a cada 3 min)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(_processar_fallback_sonax_auditoria),
+    _add_job(
+        scheduler,
+        _processar_fallback_sonax_auditoria,
         trigger=IntervalTrigger(
             minutes=int(getattr(settings, "SONAX_AUDITORIA_FALLBACK_INTERVAL_MINUTES", 2))
         ),
         id="processar_fallback_sonax_auditoria",
+        pool=POOL_LENTO,
         name="Fallback Sonax auditoria (status + gravação)",
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(sync_status_esteira_pap_automatico),
+    _add_job(
+        scheduler,
+        sync_status_esteira_pap_automatico,
         trigger=CronTrigger.from_crontab('0 22 * * *'),
         id='sync_status_esteira_pap_noturno',
+        pool=POOL_LENTO,
         name='Sync esteira PAP — início 22:00 (America/Sao_Paulo)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(preaquecer_cache_folha_comissionamento),
+    _add_job(
+        scheduler,
+        preaquecer_cache_folha_comissionamento,
         trigger=CronTrigger.from_crontab('0 6 * * *'),
         id='preaquecer_cache_folha',
+        pool=POOL_LENTO,
         name='Pré-aquecer cache folha comissionamento (06:00)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(preaquecer_cache_folha_comissionamento),
+    _add_job(
+        scheduler,
+        preaquecer_cache_folha_comissionamento,
         trigger=CronTrigger.from_crontab('0 12 * * *'),
         id='preaquecer_cache_folha_meiodia',
+        pool=POOL_LENTO,
         name='Pré-aquecer cache folha comissionamento (12:00)',
-        replace_existing=True,
-        max_instances=1,
     )
     tz_sp = getattr(settings, "TIME_ZONE", "America/Sao_Paulo")
-    scheduler.add_job(
-        _wrap_scheduler_job(lembrete_presenca_supervisor_10h),
+    _add_job(
+        scheduler,
+        lembrete_presenca_supervisor_10h,
         trigger=CronTrigger.from_crontab('0 10 * * 1-5', timezone=tz_sp),
         id='lembrete_presenca_supervisor_10h',
         name='Lembrete presença supervisor (10:00 seg-sex)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(lembrete_presenca_supervisor_11h),
+    _add_job(
+        scheduler,
+        lembrete_presenca_supervisor_11h,
         trigger=CronTrigger.from_crontab('0 11 * * 1-5', timezone=tz_sp),
         id='lembrete_presenca_supervisor_11h',
         name='Lembrete presença supervisor (11:00 seg-sex)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(aplicar_faltas_presenca_12h),
+    _add_job(
+        scheduler,
+        aplicar_faltas_presenca_12h,
         trigger=CronTrigger.from_crontab('0 12 * * 1-5', timezone=tz_sp),
         id='aplicar_faltas_presenca_12h',
         name='Falta automática presença (12:00 seg-sex)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(lista_agendamento_vendedor_manha),
+    _add_job(
+        scheduler,
+        lista_agendamento_vendedor_manha,
         trigger=CronTrigger.from_crontab('30 7 * * *', timezone=tz_sp),
         id='lista_agendamento_vendedor_manha',
         name='Lista agendamentos vendedor — manhã (07:30)',
-        replace_existing=True,
-        max_instances=1,
     )
-    scheduler.add_job(
-        _wrap_scheduler_job(lista_agendamento_vendedor_tarde),
+    _add_job(
+        scheduler,
+        lista_agendamento_vendedor_tarde,
         trigger=CronTrigger.from_crontab('30 12 * * *', timezone=tz_sp),
         id='lista_agendamento_vendedor_tarde',
         name='Lista agendamentos vendedor — tarde (12:30)',
-        replace_existing=True,
-        max_instances=1,
+    )
+    _add_job(
+        scheduler,
+        limpar_ledger_scheduler,
+        trigger=CronTrigger.from_crontab('15 3 * * *', timezone=tz_sp),
+        id='limpar_ledger_scheduler',
+        pool=POOL_LENTO,
+        name='Limpar ledger de execuções do scheduler (03:15)',
+    )
+    _add_job(
+        scheduler,
+        aplicar_retencao,
+        trigger=CronTrigger.from_crontab('40 3 * * *', timezone=tz_sp),
+        id='aplicar_retencao',
+        pool=POOL_LENTO,
+        name='Arquivar filas e podar logs antigos (03:40)',
+    )
+    _add_job(
+        scheduler,
+        retomar_jobs_orfaos,
+        trigger=IntervalTrigger(minutes=5),
+        id='retomar_jobs_orfaos',
+        pool=POOL_LENTO,
+        name='Recuperar leases vencidos da fila genérica (a cada 5 min)',
     )
 
 
@@ -385,13 +477,13 @@ def _log_jobs(scheduler):
     jobs = scheduler.get_jobs()
     logger.info("[OK] %s tarefa(s) agendada(s):", len(jobs))
     for job in jobs:
-        logger.info("  - %s: %s", job.name, job.trigger)
+        logger.info("  - %s [%s]: %s", job.name, job.executor, job.trigger)
 
 
 def create_scheduler(*, blocking=False):
     """Cria scheduler com jobs registrados (não inicia)."""
     cls = BlockingScheduler if blocking else BackgroundScheduler
-    scheduler = cls()
+    scheduler = cls(executors=_executors())
     _registrar_jobs(scheduler)
     return scheduler
 
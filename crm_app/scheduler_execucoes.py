@@ -0,0 +1,212 @@
+"""
+Ledger de execuções dos jobs do APScheduler (`SchedulerJobExecucao`).
+
+`_wrap_scheduler_job` chama `iniciar_execucao` / `finalizar_execucao` em volta de cada
+job. Os jobs do scheduler engolem exceções e só logam; por isso o 1º ERROR logado na
+thread do job (`CapturaErroJob`) também conta como falha da execução.
+
+Falha ao gravar o ledger nunca derruba o job (só warning no log).
+"""
+from __future__ import annotations
+
+import logging
+import math
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Chaves usadas pelos serviços ao devolver dict de resumo (ordem de preferência)
+_CHAVES_LINHAS = (
+    'linhas_afetadas',
+    'processados',
+    'enviados',
+    'colaboradores_afetados',
+    'supervisores',
+    'total',
+)
+
+
+def ledger_ativo() -> bool:
+    return bool(getattr(settings, 'SCHEDULER_LEDGER_ENABLED', True))
+
+
+def linhas_afetadas_de(resultado: Any) -> Optional[int]:
+    """Extrai a contagem do retorno do job (int ou dict de resumo); None se não houver."""
+    if isinstance(resultado, bool):
+        return None
+    if isinstance(resultado, int):
+        return resultado
+    if isinstance(resultado, dict):
+        for chave in _CHAVES_LINHAS:
+            valor = resultado.get(chave)
+            if isinstance(valor, int) and not isinstance(valor, bool):
+                return valor
+    return None
+
+
+class CapturaErroJob(logging.Handler):
+    """Guarda o 1º registro ERROR+ emitido na thread do job enquanto a captura está ativa."""
+
+    def __init__(self) -> None:
+        super().__init__(level=logging.ERROR)
+        self._local = threading.local()
+
+    def iniciar(self) -> None:
+        self._local.ativo = True
+        self._local.erro = None
+
+    def finalizar(self) -> Optional[str]:
+        erro = getattr(self._local, 'erro', None)
+        self._local.ativo = False
+        self._local.erro = None
+        return erro
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not getattr(self._local, 'ativo', False) or self._local.erro is not None:
+            return
+        try:
+            self._local.erro = record.getMessage()[:4000]
+        except Exception:
+            self._local.erro = str(record.msg)[:4000]
+
+
+_captura_erro: Optional[CapturaErroJob] = None
+_captura_lock = threading.Lock()
+
+
+def captura_erro() -> CapturaErroJob:
+    """Handler único, pendurado no root logger na primeira chamada."""
+    global _captura_erro
+    if _captura_erro is None:
+        with _captura_lock:
+            if _captura_erro is None:
+                handler = CapturaErroJob()
+                logging.getLogger().addHandler(handler)
+                _captura_erro = handler
+    return _captura_erro
+
+
+def iniciar_execucao(job_id: str, pool: str = '') -> Optional[int]:
+    if not ledger_ativo():
+        return None
+    from crm_app.models import SchedulerJobExecucao
+
+    try:
+        execucao = SchedulerJobExecucao.objects.create(
+            job_id=job_id[:100],
+            pool=(pool or '')[:30],
+            iniciado_em=timezone.now(),
+            host=socket.gethostname()[:120],
+        )
+        return execucao.pk
+    except Exception as e:
+        logger.warning('[SCHEDULER] Ledger: falha ao registrar início de %s: %s', job_id, e)
+        return None
+
+
+def finalizar_execucao(
+    execucao_id: Optional[int],
+    *,
+    inicio_monotonic: float,
+    resultado: Any = None,
+    erro: Optional[str] = None,
+) -> None:
+    if not execucao_id:
+        return
+    from crm_app.models import SchedulerJobExecucao
+
+    duracao_ms = int((time.monotonic() - inicio_monotonic) * 1000)
+    try:
+        SchedulerJobExecucao.objects.filter(pk=execucao_id).update(
+            status=SchedulerJobExecucao.STATUS_ERRO if erro else SchedulerJobExecucao.STATUS_SUCESSO,
+            finalizado_em=timezone.now(),
+            duracao_ms=max(0, duracao_ms),
+            linhas_afetadas=linhas_afetadas_de(resultado),
+            erro=(erro or '')[:4000],
+        )
+    except Exception as e:
+        logger.warning('[SCHEDULER] Ledger: falha ao registrar fim da execução %s: %s', execucao_id, e)
+
+
+def _percentil(ordenados: List[int], p: float) -> Optional[int]:
+    """Percentil por nearest-rank (lista já ordenada)."""
+    if not ordenados:
+        return None
+    idx = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[idx]
+
+
+def estatisticas_jobs(dias: int = 7, job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    p50/p95/máx de duração, execuções, erros e última execução por job na janela.
+
+    Percentis calculados em Python para funcionar igual no SQLite e no PostgreSQL;
+    o volume é pequeno (dezenas de jobs × poucas execuções/minuto).
+    """
+    from crm_app.models import SchedulerJobExecucao
+
+    desde = timezone.now() - timedelta(days=max(1, int(dias)))
+    qs = SchedulerJobExecucao.objects.filter(iniciado_em__gte=desde)
+    if job_id:
+        qs = qs.filter(job_id=job_id)
+
+    por_job: Dict[str, Dict[str, Any]] = {}
+    for ex in qs.order_by('job_id', 'iniciado_em').values(
+        'job_id', 'pool', 'status', 'iniciado_em', 'duracao_ms', 'linhas_afetadas', 'erro',
+    ):
+        item = por_job.setdefault(ex['job_id'], {
+            'job_id': ex['job_id'],
+            'pool': ex['pool'],
+            'execucoes': 0,
+            'erros': 0,
+            'em_andamento': 0,
+            '_duracoes': [],
+            'linhas_afetadas_total': 0,
+            'ultima_execucao': None,
+            'ultimo_status': None,
+            'ultimo_erro': '',
+        })
+        item['execucoes'] += 1
+        if ex['status'] == SchedulerJobExecucao.STATUS_ERRO:
+            item['erros'] += 1
+            item['ultimo_erro'] = ex['erro']
+        elif ex['status'] == SchedulerJobExecucao.STATUS_EXECUTANDO:
+            item['em_andamento'] += 1
+        if ex['duracao_ms'] is not None:
+            item['_duracoes'].append(ex['duracao_ms'])
+        if ex['linhas_afetadas']:
+            item['linhas_afetadas_total'] += ex['linhas_afetadas']
+        item['ultima_execucao'] = ex['iniciado_em']
+        item['ultimo_status'] = ex['status']
+        item['pool'] = ex['pool'] or item['pool']
+
+    saida = []
+    for item in por_job.values():
+        duracoes = sorted(item.pop('_duracoes'))
+        item['p50_ms'] = _percentil(duracoes, 50)
+        item['p95_ms'] = _percentil(duracoes, 95)
+        item['max_ms'] = duracoes[-1] if duracoes else None
+        saida.append(item)
+    saida.sort(key=lambda i: (i['p95_ms'] or 0), reverse=True)
+    return saida
+
+
+def limpar_execucoes_antigas(dias: Optional[int] = None) -> int:
+    """Apaga execuções mais velhas que SCHEDULER_LEDGER_RETENCAO_DIAS; retorna quantas."""
+    from crm_app.models import SchedulerJobExecucao
+
+    dias = int(dias if dias is not None else getattr(settings, 'SCHEDULER_LEDGER_RETENCAO_DIAS', 30))
+    if dias <= 0:
+        return 0
+    limite = timezone.now() - timedelta(days=dias)
+    apagadas, _ = SchedulerJobExecucao.objects.filter(iniciado_em__lt=limite).delete()
+    if apagadas:
+        logger.info('[SCHEDULER] Ledger: %s execução(ões) com mais de %s dias removidas.', apagadas, dias)
+    return apagadas
@@ -0,0 +1,42 @@
+"""API: ledger de execuções do scheduler (p50/p95 por job e últimas execuções)."""
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from crm_app.models import SchedulerJobExecucao
+from crm_app.utils import is_member
+
+PERFIS_SCHEDULER = ['Diretoria', 'Admin']
+
+
+class SchedulerJobsEstatisticasView(APIView):
+    """
+    GET ?dias=7 — resumo por job (execuções, erros, p50/p95/máx em ms).
+    GET ?job_id=X&limite=50 — inclui as últimas execuções daquele job.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not is_member(request.user, PERFIS_SCHEDULER):
+            return Response({'detail': 'Acesso negado.'}, status=status.HTTP_403_FORBIDDEN)
+
+        from crm_app.scheduler_execucoes import estatisticas_jobs
+
+        try:
+            dias = max(1, min(90, int(request.query_params.get('dias') or 7)))
+            limite = max(1, min(500, int(request.query_params.get('limite') or 50)))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Parâmetros inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+        job_id = (request.query_params.get('job_id') or '').strip() or None
+
+        payload = {'dias': dias, 'jobs': estatisticas_jobs(dias=dias, job_id=job_id)}
+        if job_id:
+            payload['execucoes'] = list(
+                SchedulerJobExecucao.objects.filter(job_id=job_id)
+                .order_by('-iniciado_em')
+                .values(
+                    'id', 'pool', 'status', 'iniciado_em', 'finalizado_em',
+                    'duracao_ms', 'linhas_afetadas', 'erro', 'host',
+                )[:limite]
+            )
+        return Response(payload)
@@ -563,19 +563,63 @@ def calcular_complemento_adiantamento_sabado_folha(
     }
 
 
+def quitar_adiantamento_sabado_em_lote(vendas) -> int:
+    """
+    Versão set-based de ``quitar_adiantamento_sabado_na_instalacao`` (status_esteira_antes=None).
+
+    Filtra em memória as vendas instaladas com sábado marcado e sem estorno; resincroniza
+    antecipação num UPDATE e quita as pendentes num UPDATE por timestamp de instalação.
+    """
+    from crm_app.models import Venda
+
+    candidatas = [
+        v for v in vendas
+        if v.pk
+        and getattr(v, 'adiantamento_sabado_marcado', False)
+        and not getattr(v, 'flag_desc_adiantamento_sabado', False)
+        and status_esteira_eh_instalada(v.status_esteira)
+    ]
+    if not candidatas:
+        return 0
+
+    resincronizar = [v for v in candidatas if v.adiantamento_sabado_quitado_em and not v.antecipacao_comissao]
+    por_ts = {}
+    for venda in candidatas:
+        if not venda.adiantamento_sabado_quitado_em:
+            por_ts.setdefault(quitado_em_a_partir_data_instalacao(venda), []).append(venda)
+
+    count = 0
+    if resincronizar:
+        count += Venda.objects.filter(
+            pk__in=[v.pk for v in resincronizar],
+            adiantamento_sabado_marcado=True,
+            antecipacao_comissao=False,
+        ).update(antecipacao_comissao=True)
+        for venda in resincronizar:
+            venda.antecipacao_comissao = True
+
+    for ts, grupo in por_ts.items():
+        count += Venda.objects.filter(
+            pk__in=[v.pk for v in grupo],
+            adiantamento_sabado_marcado=True,
+            adiantamento_sabado_quitado_em__isnull=True,
+        ).update(antecipacao_comissao=True, adiantamento_sabado_quitado_em=ts)
+        for venda in grupo:
+            venda.antecipacao_comissao = True
+            venda.adiantamento_sabado_quitado_em = ts
+
+    if count:
+        logger.info('Adiantamento sábado quitado/resincronizado em lote — %s venda(s)', count)
+    return count
+
+
 def quitar_adiantamento_sabado_pos_bulk(vendas) -> int:
     """
     Após bulk_update (OSAB etc.) que altera status_esteira sem disparar signals.
     status_esteira_antes omitido: só quita se ainda pendente (adiantamento_sabado_quitado_em vazio).
     """
-    count = 0
-    for venda in vendas:
-        try:
-            if quitar_adiantamento_sabado_na_instalacao(venda, status_esteira_antes=None):
-                count += 1
-        except Exception:
-            logger.exception(
-                'Erro ao quitar adiantamento sábado pós-bulk — venda #%s',
-                getattr(venda, 'pk', '?'),
-            )
-    return count
+    try:
+        return quitar_adiantamento_sabado_em_lote(vendas)
+    except Exception:
+        logger.exception('Erro ao quitar adiantamento sábado pós-bulk (%s vendas)', len(vendas))
+        return 0
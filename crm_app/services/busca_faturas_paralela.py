@@ -0,0 +1,177 @@
+"""
+Execução paralela da busca/match de faturas Nio por contrato.
+
+- Pool limitado de threads (NIO_BUSCA_WORKERS); cada tarefa fecha sua conexão de banco.
+- Token Nio aquecido uma vez antes do lote: as threads reaproveitam o broker de
+  `nio_api` (token/sessionId compartilhados) e o limite por host (NIO_API_MAX_RPS).
+- Retry inline com backoff exponencial + jitter, em vez de uma passada de retry no fim.
+- `ao_concluir` roda na thread chamadora à medida que as tarefas terminam; é lá que
+  o HistoricoBuscaFatura é gravado, sem disputar a mesma linha entre threads.
+- `prazo_seg`: ao estourar, não inicia novas tarefas (o lote cabe na janela do scheduler).
+"""
+from __future__ import annotations
+
+import logging
+import math
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResultadoTarefa:
+    item: Any
+    resultado: Any = None
+    erro: Optional[str] = None
+    tentativas: int = 0
+    latencia_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.erro is None
+
+
+def workers_padrao() -> int:
+    return max(1, int(getattr(settings, 'NIO_BUSCA_WORKERS', 4) or 1))
+
+
+def backoff_com_jitter(tentativa: int, base_seg: float, max_seg: float) -> float:
+    """Full jitter: uniforme entre 0 e min(max, base·2^(n−1))."""
+    return random.uniform(0, min(max_seg, base_seg * (2 ** max(0, tentativa - 1))))
+
+
+def executar_com_retry(
+    func: Callable[[Any], Any],
+    item: Any,
+    *,
+    tentativas: int = 3,
+    base_seg: float = 1.0,
+    max_seg: float = 20.0,
+    repetir_se: Optional[Callable[[Any], bool]] = None,
+) -> ResultadoTarefa:
+    """Chama func(item) até `tentativas` vezes se levantar exceção ou `repetir_se(resultado)`."""
+    saida = ResultadoTarefa(item=item)
+    inicio = time.perf_counter()
+    for tentativa in range(1, max(1, tentativas) + 1):
+        saida.tentativas = tentativa
+        try:
+            saida.resultado = func(item)
+            saida.erro = None
+            if repetir_se is None or not repetir_se(saida.resultado):
+                break
+        except Exception as e:
+            saida.erro = f'{type(e).__name__}: {e}'[:300]
+        if tentativa < tentativas:
+            espera = backoff_com_jitter(tentativa, base_seg, max_seg)
+            logger.info('[BUSCA PARALELA] Tentativa %s falhou; nova em %.1fs', tentativa, espera)
+            time.sleep(espera)
+    saida.latencia_ms = round((time.perf_counter() - inicio) * 1000, 1)
+    return saida
+
+
+_FIM = object()
+
+
+def _tarefa(func, item, opcoes) -> ResultadoTarefa:
+    from django.db import connection
+
+    try:
+        return executar_com_retry(func, item, **opcoes)
+    finally:
+        connection.close()
+
+
+def executar_em_paralelo(
+    itens: Iterable[Any],
+    func: Callable[[Any], Any],
+    *,
+    workers: Optional[int] = None,
+    tentativas: int = 3,
+    base_seg: float = 1.0,
+    max_seg: float = 20.0,
+    repetir_se: Optional[Callable[[Any], bool]] = None,
+    ao_concluir: Optional[Callable[[ResultadoTarefa], None]] = None,
+    prazo_seg: Optional[float] = None,
+) -> List[ResultadoTarefa]:
+    """
+    Processa `itens` com até `workers` threads. workers=1 roda na thread atual
+    (usado nos testes e quando se quer o comportamento sequencial antigo).
+    Itens não iniciados por estouro de prazo ficam fora do retorno.
+    """
+    itens = list(itens)
+    workers = workers or workers_padrao()
+    opcoes = {'tentativas': tentativas, 'base_seg': base_seg, 'max_seg': max_seg, 'repetir_se': repetir_se}
+    limite = time.monotonic() + prazo_seg if prazo_seg else None
+    concluidos: List[ResultadoTarefa] = []
+
+    def _registrar(res: ResultadoTarefa) -> None:
+        concluidos.append(res)
+        if ao_concluir is not None:
+            try:
+                ao_concluir(res)
+            except Exception:
+                logger.exception('[BUSCA PARALELA] Falha no callback de progresso')
+
+    if workers <= 1:
+        for item in itens:
+            if limite and time.monotonic() >= limite:
+                break
+            _registrar(executar_com_retry(func, item, **opcoes))
+        return concluidos
+
+    pendentes = iter(itens)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='busca-fatura') as pool:
+        em_voo = set()
+
+        def _abastecer() -> None:
+            while len(em_voo) < workers:
+                if limite and time.monotonic() >= limite:
+                    return
+                item = next(pendentes, _FIM)
+                if item is _FIM:
+                    return
+                em_voo.add(pool.submit(_tarefa, func, item, opcoes))
+
+        _abastecer()
+        while em_voo:
+            prontos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                em_voo.discard(futuro)
+                _registrar(futuro.result())
+            _abastecer()
+    return concluidos
+
+
+def aquecer_token_nio() -> bool:
+    """Garante um token Nio válido antes de abrir o pool (uma renovação, não N)."""
+    try:
+        from crm_app.nio_api import get_cached_params
+
+        return bool(get_cached_params(headless=True))
+    except Exception:
+        logger.exception('[BUSCA PARALELA] Falha ao aquecer token Nio')
+        return False
+
+
+def resumo_latencias(latencias_ms: List[float]) -> Dict[str, Any]:
+    """p50/p95/máx/média (ms) por nearest-rank."""
+    if not latencias_ms:
+        return {'n': 0, 'p50': None, 'p95': None, 'max': None, 'media': None}
+    ordenadas = sorted(latencias_ms)
+
+    def _p(p: float) -> float:
+        return ordenadas[max(0, math.ceil(p / 100 * len(ordenadas)) - 1)]
+
+    return {
+        'n': len(ordenadas),
+        'p50': round(_p(50), 1),
+        'p95': round(_p(95), 1),
+        'max': round(ordenadas[-1], 1),
+        'media': round(sum(ordenadas) / len(ordenadas), 1),
+    }
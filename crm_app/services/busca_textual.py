@@ -0,0 +1,249 @@
+"""
+Busca textual sobre a base inteira (Qualidade e Esteira) via `DocumentoBusca`.
+
+Um documento por contrato M10 / venda com os campos já normalizados:
+- texto: nome do cliente, nº do contrato (provisório e definitivo), O.S. e CPF/CNPJ
+  com máscara — minúsculas, sem acento, separados por " | ";
+- documento: dígitos de CPF/CNPJ (e da O.S., na venda);
+- telefones: dígitos de cada telefone, separados por espaço.
+
+No PostgreSQL as três colunas têm GIN trigram: `LIKE '%termo%'` usa o índice em vez
+de varrer a tabela aplicando REGEXP_REPLACE linha a linha.
+
+Manutenção: signals (crm_app/signals_busca.py) reindexam o objeto salvo; escritas em
+lote chamam `indexar_contratos` / `indexar_vendas`. `manage.py reconstruir_indice_busca`
+refaz tudo e incrementa a versão `busca_textual` — enquanto ela for 0 (índice nunca
+construído) ou BUSCA_INDICE_ENABLED=False, `q_busca` retorna None e as telas usam a
+busca antiga direto nas tabelas.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import unicodedata
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.db.models import Q
+
+from crm_app.versao_indice import VersaoLocal, incrementar_versao
+
+logger = logging.getLogger(__name__)
+
+NOME_VERSAO = 'busca_textual'
+TIPO_CONTRATO = 'contrato'
+TIPO_VENDA = 'venda'
+SEPARADOR = ' | '
+LOTE_PADRAO = 2000
+
+_versao = VersaoLocal(NOME_VERSAO, ttl_seg=60)
+
+
+def normalizar_texto(valor: Any) -> str:
+    """Minúsculas, sem acento e com espaços colapsados."""
+    texto = unicodedata.normalize('NFKD', str(valor or ''))
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch))
+    return ' '.join(texto.lower().split())
+
+
+def so_digitos(valor: Any) -> str:
+    return re.sub(r'\D', '', str(valor or ''))
+
+
+def _juntar(valores: Iterable[str], sep: str) -> str:
+    vistos: list[str] = []
+    for v in valores:
+        if v and v not in vistos:
+            vistos.append(v)
+    return sep.join(vistos)
+
+
+def indice_disponivel() -> bool:
+    if not getattr(settings, 'BUSCA_INDICE_ENABLED', True):
+        return False
+    try:
+        return _versao.obter() > 0
+    except Exception:
+        logger.exception('[BUSCA TEXTUAL] Falha ao ler versão do índice')
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Documentos
+# ---------------------------------------------------------------------------
+
+def documento_contrato(contrato) -> dict[str, str]:
+    """Campos do documento de um ContratoM10 (usa `contrato.venda` se já carregada)."""
+    venda = contrato.venda if contrato.venda_id else None
+    telefones = [
+        so_digitos(getattr(venda, 'telefone1', None)),
+        so_digitos(getattr(venda, 'telefone2', None)),
+        so_digitos(getattr(contrato, 'telefone', None)),
+    ]
+    return {
+        'texto': _juntar(
+            (normalizar_texto(v) for v in (
+                contrato.cliente_nome, contrato.numero_contrato,
+                contrato.numero_contrato_definitivo, contrato.ordem_servico,
+            )),
+            SEPARADOR,
+        ),
+        'documento': so_digitos(contrato.cpf_cliente),
+        'telefones': _juntar(telefones, ' '),
+    }
+
+
+def documento_venda(venda) -> dict[str, str]:
+    """Campos do documento de uma Venda (usa `venda.cliente`)."""
+    cliente = venda.cliente if venda.cliente_id else None
+    cpf_cnpj = getattr(cliente, 'cpf_cnpj', None)
+    return {
+        'texto': _juntar(
+            (normalizar_texto(v) for v in (
+                getattr(cliente, 'nome_razao_social', None), venda.ordem_servico, cpf_cnpj,
+            )),
+            SEPARADOR,
+        ),
+        'documento': _juntar((so_digitos(cpf_cnpj), so_digitos(venda.ordem_servico)), ' '),
+        'telefones': _juntar((so_digitos(venda.telefone1), so_digitos(venda.telefone2)), ' '),
+    }
+
+
+def _gravar(tipo: str, docs: dict[int, dict[str, str]]) -> int:
+    from crm_app.models import DocumentoBusca
+
+    if not docs:
+        return 0
+    DocumentoBusca.objects.bulk_create(
+        [DocumentoBusca(tipo=tipo, objeto_id=pk, **campos) for pk, campos in docs.items()],
+        batch_size=LOTE_PADRAO,
+        update_conflicts=True,
+        unique_fields=['tipo', 'objeto_id'],
+        update_fields=['texto', 'documento', 'telefones', 'atualizado_em'],
+    )
+    return len(docs)
+
+
+def remover(tipo: str, ids: Iterable[int]) -> None:
+    from crm_app.models import DocumentoBusca
+
+    ids = [int(i) for i in ids if i]
+    if ids:
+        DocumentoBusca.objects.filter(tipo=tipo, objeto_id__in=ids).delete()
+
+
+def indexar_objetos_contrato(contratos: Iterable[Any]) -> int:
+    """Indexa instâncias já carregadas (signals: sem reler o contrato)."""
+    return _gravar(TIPO_CONTRATO, {c.pk: documento_contrato(c) for c in contratos if c.pk})
+
+
+def indexar_objetos_venda(vendas: Iterable[Any]) -> int:
+    return _gravar(TIPO_VENDA, {v.pk: documento_venda(v) for v in vendas if v.pk})
+
+
+def indexar_contratos(ids: Iterable[int]) -> int:
+    from crm_app.models import ContratoM10
+
+    ids = [int(i) for i in ids if i]
+    total = 0
+    for i in range(0, len(ids), LOTE_PADRAO):
+        fatia = ids[i:i + LOTE_PADRAO]
+        contratos = list(
+            ContratoM10.objects.filter(pk__in=fatia).select_related('venda')
+        )
+        total += indexar_objetos_contrato(contratos)
+        remover(TIPO_CONTRATO, set(fatia) - {c.pk for c in contratos})
+    return total
+
+
+def indexar_vendas(ids: Iterable[int]) -> int:
+    from crm_app.models import Venda
+
+    ids = [int(i) for i in ids if i]
+    total = 0
+    for i in range(0, len(ids), LOTE_PADRAO):
+        fatia = ids[i:i + LOTE_PADRAO]
+        vendas = list(
+            Venda.objects.filter(pk__in=fatia)
+            .select_related('cliente')
+            .only('id', 'ordem_servico', 'telefone1', 'telefone2', 'cliente_id',
+                  'cliente__nome_razao_social', 'cliente__cpf_cnpj')
+        )
+        total += indexar_objetos_venda(vendas)
+        remover(TIPO_VENDA, set(fatia) - {v.pk for v in vendas})
+    return total
+
+
+def reconstruir_indice(tipos: Optional[Iterable[str]] = None) -> dict[str, int]:
+    """Reindexa a base inteira (por faixas de id), remove órfãos e publica nova versão."""
+    from crm_app.models import ContratoM10, DocumentoBusca, Venda
+
+    tipos = list(tipos or (TIPO_CONTRATO, TIPO_VENDA))
+    fontes = {TIPO_CONTRATO: (ContratoM10, indexar_contratos), TIPO_VENDA: (Venda, indexar_vendas)}
+    resumo: dict[str, int] = {}
+    for tipo in tipos:
+        modelo, indexar = fontes[tipo]
+        ids = list(modelo.objects.order_by('pk').values_list('pk', flat=True))
+        resumo[tipo] = indexar(ids)
+        orfaos = DocumentoBusca.objects.filter(tipo=tipo).exclude(
+            objeto_id__in=modelo.objects.values('pk'),
+        ).delete()[0]
+        logger.info('[BUSCA TEXTUAL] %s: %s documentos, %s órfãos removidos', tipo, resumo[tipo], orfaos)
+    incrementar_versao(NOME_VERSAO, **resumo)
+    _versao.invalidar()
+    return resumo
+
+
+# ---------------------------------------------------------------------------
+# Consulta
+# ---------------------------------------------------------------------------
+
+def _variantes_telefone(tipo: str, digitos: str) -> set[str]:
+    from crm_app.services.qualidade_service import (
+        _digitos_telefone_variantes,
+        _variantes_busca_telefone,
+    )
+
+    if tipo == TIPO_CONTRATO:
+        return _variantes_busca_telefone(digitos)
+    return {v for v in _digitos_telefone_variantes(digitos) if len(v) >= 8}
+
+
+def ids_documentos(tipo: str, termo: str):
+    """Subquery com os `objeto_id` cujo documento casa com `termo`."""
+    from crm_app.models import DocumentoBusca
+
+    termo = str(termo or '').strip()
+    digitos = so_digitos(termo)
+    cond = Q(texto__contains=normalizar_texto(termo))
+    if digitos:
+        cond |= Q(documento__contains=digitos)
+    if len(digitos) >= 8:
+        for variante in _variantes_telefone(tipo, digitos):
+            cond |= Q(telefones__contains=variante)
+    return DocumentoBusca.objects.filter(cond, tipo=tipo).values('objeto_id')
+
+
+def q_busca(tipo: str, termo: str) -> Optional[Q]:
+    """
+    Q para filtrar ContratoM10 (tipo contrato) ou Venda (tipo venda) pela busca livre.
+    Na venda inclui o consultor (username/nome), resolvido antes na tabela de usuários.
+    None quando o índice não está disponível — o chamador usa a busca antiga.
+    """
+    termo = str(termo or '').strip()
+    if not termo or not indice_disponivel():
+        return None
+    q = Q(pk__in=ids_documentos(tipo, termo))
+    if tipo == TIPO_VENDA:
+        from usuarios.models import Usuario
+
+        vendedores = list(
+            Usuario.objects.filter(
+                Q(username__icontains=termo)
+                | Q(first_name__icontains=termo)
+                | Q(last_name__icontains=termo)
+            ).values_list('pk', flat=True)
+        )
+        if vendedores:
+            q |= Q(vendedor_id__in=vendedores)
+    return q
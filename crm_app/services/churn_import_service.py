@@ -0,0 +1,434 @@
+"""
+Importação da base CHURN (Bônus M-10 → Importar Churn) e sincronização com ContratoM10.
+
+O fluxo antigo (`ImportarChurnView.post`) percorria a planilha com `iterrows()`: um
+`update_or_create` de `ImportacaoChurn` por linha, um dicionário montado com todos os
+ContratoM10 (objetos inteiros) e um `contrato.save()` por cancelamento — cada save disparando
+faturas, índice de busca e rollup do Qualidade. Agora:
+
+1. **staging** — a planilha é normalizada por coluna num DataFrame (`normalizar_planilha_churn`),
+   com a chave canônica da O.S. (`chave_os_canonica`);
+2. **diff** — as linhas são comparadas com a base atual: novas, alteradas, iguais e
+   removidas (estão na base e não vieram no arquivo; só reportadas, não apagadas);
+3. **upsert** — só novas/alteradas são gravadas: `bulk_create(update_conflicts=True)` na chave
+   natural `numero_pedido`; linhas sem pedido casam por `nr_ordem` (bulk_update/bulk_create);
+4. **M10** — os contratos são buscados de uma vez pelas variantes das O.S. do arquivo
+   (`contratos_por_os`), cancelados com um `bulk_update` e os cancelados por CHURN que saíram
+   da base são reativados com um `.update()`. Só esses contratos têm as fatias do Qualidade
+   marcadas e as safras com `total_ativos` recontado.
+
+O resumo do diff vai em `LogImportacaoChurn.detalhes_json['diff']`.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import date
+from typing import Any, Iterable
+
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from crm_app.churn_os_utils import chave_os_canonica, normalizar_anomes_gross, os_variantes
+
+logger = logging.getLogger(__name__)
+
+LOTE = 1000
+AMOSTRA_DIFF = 20
+
+# campo do modelo -> colunas da planilha (primeira preenchida vence); texto copiado como veio
+COLUNAS_TEXTO = {
+    'produto': ('PRODUTO',),
+    'gv': ('GV',),
+    'sap_principal_fim': ('SAP_PRINCIPAL_FIM',),
+    'gestao': ('GESTAO',),
+    'st_regional': ('ST_REGIONAL',),
+    'gc': ('GC',),
+    'anomes_retirada': ('ANOMES_RETIRADA',),
+    'grupo_unidade': ('GRUPO_UNIDADE',),
+    'codigo_sap': ('CODIGO_SAP',),
+    'municipio': ('MUNICIPIO',),
+    'classificacao': ('CLASSIFICACAO',),
+    'desc_apelido': ('DESC_APELIDO',),
+}
+# aliases TP_/DS_/CD_TR_VDD_ORIGINAL: valor sem espaços, vazio/'NAN' = ausente
+COLUNAS_ALIAS = {
+    'tipo_retirada': ('TP_RETIRADA', 'TIPO_RETIRADA'),
+    'motivo_retirada': ('DS_MOTIVO_RETIRADA', 'MOTIVO_RETIRADA'),
+    'submotivo_retirada': ('SUBMOTIVO_RETIRADA',),
+    'cd_tr_vdd_original': ('CD_TR_VDD_ORIGINAL', 'CD_TR_VDD'),
+    'matricula_vendedor': ('MATRICULA_VENDEDOR',),
+}
+CAMPOS_CHURN = (
+    'uf', 'produto', 'matricula_vendedor', 'cd_tr_vdd_original', 'gv', 'sap_principal_fim', 'gestao',
+    'st_regional', 'gc', 'nr_ordem', 'dt_gross', 'anomes_gross', 'dt_retirada', 'anomes_retirada',
+    'grupo_unidade', 'codigo_sap', 'municipio', 'tipo_retirada', 'motivo_retirada',
+    'submotivo_retirada', 'classificacao', 'desc_apelido', 'nr_velocidade',
+)
+DTYPE_CHAVES = {'PEDIDO': str, 'NR_ORDEM': str, 'NUMERO_PEDIDO': str}
+
+
+# ---------------------------------------------------------------------------
+# Staging: planilha -> DataFrame normalizado
+# ---------------------------------------------------------------------------
+
+def ler_planilha_churn(arquivo, nome: str) -> pd.DataFrame:
+    if nome.endswith('.csv'):
+        df = pd.read_csv(arquivo, dtype=DTYPE_CHAVES)
+    elif nome.endswith('.xlsb'):
+        df = pd.read_excel(arquivo, engine='pyxlsb', dtype=DTYPE_CHAVES)
+    else:
+        df = pd.read_excel(arquivo, dtype=DTYPE_CHAVES)
+    # "ANOMES GROSS" -> "ANOMES_GROSS", "NR ORDEM" -> "NR_ORDEM"
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(' ', '_', regex=False)
+    return df
+
+
+def _vazia(df: pd.DataFrame) -> pd.Series:
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def _texto(df: pd.DataFrame, coluna: str) -> pd.Series:
+    if coluna not in df.columns:
+        return _vazia(df)
+    serie = df[coluna]
+    return serie.astype(str).astype(object).where(serie.notna(), None)
+
+
+def _primeiro_texto(df: pd.DataFrame, colunas: Iterable[str]) -> pd.Series:
+    resultado = _vazia(df)
+    for coluna in colunas:
+        resultado = resultado.where(resultado.notna(), _texto(df, coluna))
+    return resultado
+
+
+def _primeiro_preenchido(df: pd.DataFrame, *colunas: str) -> pd.Series:
+    """Como `valor_planilha_churn`, por coluna: strip, vazio/'NAN' ignorados, primeira vence."""
+    resultado = _vazia(df)
+    for coluna in colunas:
+        if coluna not in df.columns:
+            continue
+        limpo = df[coluna].astype(str).str.strip()
+        validos = df[coluna].notna() & (limpo != '') & (limpo.str.upper() != 'NAN')
+        resultado = resultado.where(resultado.notna(), limpo.where(validos, None))
+    return resultado
+
+
+def _data(df: pd.DataFrame, coluna: str) -> pd.Series:
+    if coluna not in df.columns:
+        return _vazia(df)
+    datas = pd.to_datetime(df[coluna], errors='coerce')
+    return datas.dt.date.astype(object).where(datas.notna(), None)
+
+
+def normalizar_planilha_churn(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas de ImportacaoChurn + `numero_pedido`, `_chave_os` e `_linha` (linha na planilha)."""
+    staging = pd.DataFrame(index=df.index)
+    staging['_linha'] = df.index + 2
+
+    # O.S.: NR_ORDEM, senão NUMERO_PEDIDO; padronizada com 8 dígitos
+    os_bruta = _primeiro_preenchido(df, 'NR_ORDEM', 'NUMERO_PEDIDO')
+    staging['nr_ordem'] = os_bruta.str.zfill(8).where(os_bruta.notna(), None)
+    staging['_chave_os'] = os_bruta.map(chave_os_canonica, na_action='ignore')
+    staging['numero_pedido'] = _primeiro_preenchido(df, 'PEDIDO', 'NUMERO_PEDIDO')
+
+    for campo, colunas in COLUNAS_TEXTO.items():
+        staging[campo] = _primeiro_texto(df, colunas)
+    for campo, colunas in COLUNAS_ALIAS.items():
+        staging[campo] = _primeiro_preenchido(df, *colunas)
+    staging['matricula_vendedor'] = staging['matricula_vendedor'].where(
+        staging['matricula_vendedor'].notna(), staging['cd_tr_vdd_original'],
+    )
+    staging['cd_tr_vdd_original'] = staging['cd_tr_vdd_original'].where(
+        staging['cd_tr_vdd_original'].notna(), staging['matricula_vendedor'],
+    )
+    staging['uf'] = _texto(df, 'UF').str[:2]
+    staging['nr_velocidade'] = _primeiro_texto(df, ('NR_VELOCIDADE', 'VELOCIDADE')).str[:50]
+    staging['dt_gross'] = _data(df, 'DT_GROSS')
+    staging['dt_retirada'] = _data(df, 'DT_RETIRADA')
+    staging['anomes_gross'] = (
+        df['ANOMES_GROSS'].map(normalizar_anomes_gross).astype(object)
+        if 'ANOMES_GROSS' in df.columns else _vazia(df)
+    )
+    return staging.astype(object).where(staging.notna(), None)
+
+
+# ---------------------------------------------------------------------------
+# Diff contra a base atual
+# ---------------------------------------------------------------------------
+
+def _lotes(valores: list, tamanho: int = LOTE):
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _ultima_por_chave(registros: list[dict[str, Any]], campo: str) -> list[dict[str, Any]]:
+    """Linhas repetidas no arquivo: a última vence (igual ao update_or_create linha a linha)."""
+    return list({r[campo]: r for r in registros}.values())
+
+
+def _diferente(obj, dados: dict[str, Any]) -> bool:
+    return any(getattr(obj, campo) != dados[campo] for campo in CAMPOS_CHURN)
+
+
+def calcular_diff(staging: pd.DataFrame) -> dict[str, Any]:
+    """Classifica as linhas em novas/alteradas/iguais e acha as removidas da base."""
+    from crm_app.models import ImportacaoChurn
+
+    registros = [r for r in staging.to_dict('records') if r['nr_ordem']]
+    com_pedido = _ultima_por_chave([r for r in registros if r['numero_pedido']], 'numero_pedido')
+    sem_pedido = _ultima_por_chave([r for r in registros if not r['numero_pedido']], 'nr_ordem')
+
+    pk_por_pedido: dict[str, int] = {}
+    pk_por_ordem: dict[str, int] = {}
+    todas: dict[int, str] = {}
+    for pk, pedido, nr_ordem in ImportacaoChurn.objects.order_by('pk').values_list('pk', 'numero_pedido', 'nr_ordem'):
+        if pedido:
+            pk_por_pedido[pedido] = pk
+        if nr_ordem:
+            pk_por_ordem.setdefault(nr_ordem, pk)
+        todas[pk] = pedido or nr_ordem or str(pk)
+
+    pares = [(r, pk_por_pedido.get(r['numero_pedido'])) for r in com_pedido]
+    pares += [(r, pk_por_ordem.get(r['nr_ordem'])) for r in sem_pedido]
+    pks = [pk for _, pk in pares if pk]
+    existentes = {}
+    for lote in _lotes(pks):
+        existentes.update(ImportacaoChurn.objects.in_bulk(lote))
+
+    diff = {'novos': [], 'alterados': [], 'iguais': 0}
+    for dados, pk in pares:
+        obj = existentes.get(pk)
+        if obj is None:
+            diff['novos'].append(dados)
+        elif _diferente(obj, dados):
+            diff['alterados'].append((obj, dados))
+        else:
+            diff['iguais'] += 1
+    removidos = [chave for pk, chave in todas.items() if pk not in existentes]
+    diff['removidos'] = removidos
+    diff['registros'] = registros
+    diff['sem_os'] = len(staging) - len(registros)
+    return diff
+
+
+def gravar_diff(diff: dict[str, Any]) -> tuple[int, int]:
+    """Upsert de novas/alteradas; retorna (criados, atualizados)."""
+    from crm_app.models import ImportacaoChurn
+
+    upsert = [dados for dados in diff['novos'] if dados['numero_pedido']]
+    upsert += [dados for obj, dados in diff['alterados'] if dados['numero_pedido']]
+    novos_sem_pedido = [dados for dados in diff['novos'] if not dados['numero_pedido']]
+    alterados_sem_pedido = []
+    for obj, dados in diff['alterados']:
+        if dados['numero_pedido']:
+            continue
+        for campo in CAMPOS_CHURN:
+            setattr(obj, campo, dados[campo])
+        alterados_sem_pedido.append(obj)
+
+    def _modelo(dados):
+        return ImportacaoChurn(numero_pedido=dados['numero_pedido'], **{c: dados[c] for c in CAMPOS_CHURN})
+
+    with transaction.atomic():
+        ImportacaoChurn.objects.bulk_create(
+            [_modelo(d) for d in upsert],
+            batch_size=LOTE,
+            update_conflicts=True,
+            unique_fields=['numero_pedido'],
+            update_fields=list(CAMPOS_CHURN),
+        )
+        ImportacaoChurn.objects.bulk_create([_modelo(d) for d in novos_sem_pedido], batch_size=LOTE)
+        ImportacaoChurn.objects.bulk_update(alterados_sem_pedido, list(CAMPOS_CHURN), batch_size=LOTE)
+    return len(diff['novos']), len(diff['alterados'])
+
+
+# ---------------------------------------------------------------------------
+# ContratoM10
+# ---------------------------------------------------------------------------
+
+def _variantes_consulta(chave: str) -> set[str]:
+    """Formas em que a O.S. pode estar gravada em ContratoM10.ordem_servico."""
+    variantes = os_variantes(chave)
+    return variantes | {f'OS-{v}' for v in variantes}
+
+
+def contratos_por_os(chaves: Iterable[str], campos: tuple[str, ...] = ('status_contrato',)) -> dict[str, dict]:
+    """{chave canônica da O.S.: valores do ContratoM10} numa consulta por lote de O.S."""
+    from crm_app.models import ContratoM10
+
+    chaves = {c for c in chaves if c}
+    consulta = sorted({v for chave in chaves for v in _variantes_consulta(chave)})
+    resultado: dict[str, dict] = {}
+    for lote in _lotes(consulta, 2000):
+        for row in ContratoM10.objects.filter(ordem_servico__in=lote).order_by('pk').values(
+            'pk', 'ordem_servico', 'safra', *campos,
+        ):
+            chave = chave_os_canonica(row['ordem_servico'])
+            if chave in chaves:
+                resultado.setdefault(chave, row)
+    return resultado
+
+
+def cancelar_contratos(cancelamentos: dict[int, dict[str, Any]]) -> int:
+    """{pk: {'data_cancelamento', 'motivo_cancelamento'}} -> CANCELADO em bulk_update (sem signals)."""
+    from crm_app.models import ContratoM10
+
+    agora = timezone.now()
+    objs = [
+        ContratoM10(
+            pk=pk,
+            status_contrato='CANCELADO',
+            data_cancelamento=dados['data_cancelamento'],
+            motivo_cancelamento=dados['motivo_cancelamento'],
+            elegivel_bonus=False,
+            atualizado_em=agora,
+        )
+        for pk, dados in cancelamentos.items()
+    ]
+    ContratoM10.objects.bulk_update(
+        objs,
+        ['status_contrato', 'data_cancelamento', 'motivo_cancelamento', 'elegivel_bonus', 'atualizado_em'],
+        batch_size=LOTE,
+    )
+    return len(objs)
+
+
+def recalcular_ativos_safras(safras: Iterable[str]) -> list[str]:
+    """Reconta SafraM10.total_ativos das safras (YYYY-MM) informadas."""
+    from dateutil.relativedelta import relativedelta
+
+    from crm_app.models import ContratoM10, SafraM10
+
+    recalculadas = []
+    for safra in sorted({s for s in safras if s}):
+        try:
+            mes_ref = date(int(safra[:4]), int(safra[5:7]), 1)
+        except (ValueError, IndexError):
+            continue
+        safra_obj = SafraM10.objects.filter(mes_referencia=mes_ref).first()
+        if not safra_obj:
+            continue
+        safra_obj.total_ativos = ContratoM10.objects.filter(
+            data_instalacao__gte=mes_ref,
+            data_instalacao__lt=mes_ref + relativedelta(months=1),
+            status_contrato='ATIVO',
+        ).count()
+        safra_obj.save(update_fields=['total_ativos'])
+        recalculadas.append(safra)
+    return recalculadas
+
+
+def sincronizar_m10(registros: list[dict[str, Any]]) -> dict[str, Any]:
+    """Cancela os contratos das O.S. do churn e reativa os cancelados por CHURN que saíram da base."""
+    from crm_app.models import ContratoM10
+    from crm_app.services import qualidade_rollup
+
+    chaves = {r['_chave_os'] for r in registros if r['_chave_os']}
+    contratos = contratos_por_os(chaves)
+    hoje = timezone.localdate()
+    cancelamentos: dict[int, dict[str, Any]] = {}
+    safras = set()
+    for r in registros:  # primeira linha da O.S. define data/motivo
+        contrato = contratos.get(r['_chave_os'])
+        if not contrato or contrato['status_contrato'] == 'CANCELADO' or contrato['pk'] in cancelamentos:
+            continue
+        cancelamentos[contrato['pk']] = {
+            'data_cancelamento': r['dt_retirada'] or hoje,
+            'motivo_cancelamento': r['_motivo_m10'] or 'CHURN',
+        }
+        safras.add(contrato['safra'])
+
+    reativar = [
+        (pk, safra)
+        for pk, os_contrato, safra in ContratoM10.objects.filter(
+            status_contrato='CANCELADO', motivo_cancelamento__icontains='CHURN',
+        ).values_list('pk', 'ordem_servico', 'safra')
+        if chave_os_canonica(os_contrato) not in chaves
+    ]
+    with transaction.atomic():
+        cancelados = cancelar_contratos(cancelamentos)
+        reativados = 0
+        for lote in _lotes([pk for pk, _ in reativar]):
+            reativados += ContratoM10.objects.filter(pk__in=lote).update(
+                status_contrato='ATIVO', data_cancelamento=None, motivo_cancelamento=None,
+                atualizado_em=timezone.now(),
+            )
+    safras.update(safra for _, safra in reativar)
+    afetados = list(cancelamentos) + [pk for pk, _ in reativar]
+    if afetados:
+        try:
+            qualidade_rollup.marcar_sujas(qualidade_rollup.fatias_dos_contratos(afetados))
+        except Exception:
+            logger.exception('[CHURN] Falha ao marcar fatias do Qualidade')
+    return {
+        'cancelados': cancelados,
+        'reativados': reativados,
+        'nao_encontrados': len(chaves - set(contratos)),
+        'ordens_unicas': len(chaves),
+        'safras_recalculadas': recalcular_ativos_safras(safras),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Orquestração
+# ---------------------------------------------------------------------------
+
+def importar_churn(df: pd.DataFrame, log) -> dict[str, Any]:
+    """Staging → diff → upsert → M10; grava o resumo em `log` e o retorna."""
+    etapas: dict[str, int] = {}
+    marca = time.perf_counter()
+
+    def _marcar(etapa: str) -> None:
+        nonlocal marca
+        agora = time.perf_counter()
+        etapas[etapa] = int((agora - marca) * 1000)
+        marca = agora
+
+    staging = normalizar_planilha_churn(df)
+    # Motivo do cancelamento no M10 vem da coluna MOTIVO_RETIRADA como está na planilha
+    staging['_motivo_m10'] = _texto(df, 'MOTIVO_RETIRADA')
+    _marcar('staging')
+    diff = calcular_diff(staging)
+    _marcar('diff')
+    criados, atualizados = gravar_diff(diff)
+    _marcar('upsert')
+    m10 = sincronizar_m10(diff['registros'])
+    _marcar('m10')
+
+    resumo = {
+        'ordens_unicas': m10['ordens_unicas'],
+        'cancelados': m10['cancelados'],
+        'reativados': m10['reativados'],
+        'nao_encontrados': m10['nao_encontrados'],
+        'criados_churn': criados,
+        'atualizados_churn': atualizados,
+        'diff': {
+            'novos': criados,
+            'alterados': atualizados,
+            'iguais': diff['iguais'],
+            'removidos': len(diff['removidos']),
+            'sem_os': diff['sem_os'],
+            'amostra_novos': [d['numero_pedido'] or d['nr_ordem'] for d in diff['novos'][:AMOSTRA_DIFF]],
+            'amostra_alterados': [
+                d['numero_pedido'] or d['nr_ordem'] for _, d in diff['alterados'][:AMOSTRA_DIFF]
+            ],
+            'amostra_removidos': diff['removidos'][:AMOSTRA_DIFF],
+        },
+        'safras_recalculadas': m10['safras_recalculadas'],
+        'etapas_ms': etapas,
+    }
+    log.total_linhas = len(df)
+    log.total_processadas = len(diff['registros'])
+    log.total_erros = 0
+    log.total_contratos_cancelados = m10['cancelados']
+    log.total_contratos_reativados = m10['reativados']
+    log.total_nao_encontrados = m10['nao_encontrados']
+    log.status = 'PARCIAL' if (m10['cancelados'] > 0 and m10['nao_encontrados'] > 0) else 'SUCESSO'
+    log.detalhes_json = resumo
+    log.finalizado_em = timezone.now()
+    log.duracao_segundos = int((log.finalizado_em - log.iniciado_em).total_seconds())
+    log.save()
+    logger.info('[CHURN] Importação #%s: %s', log.pk, {k: v for k, v in resumo.items() if k != 'diff'})
+    return resumo
@@ -11,6 +11,7 @@ Este módulo implementa as melhores práticas de desenvolvimento:
 - Transações atômicas
 """
 
+import csv
 import logging
 import os
 import re
@@ -65,6 +66,14 @@ class DFVImportService:
     DB_IMPORT_LOCK_KEY = 93142761  # Chave fixa para lock global de importação (PostgreSQL)
     DB_IMPORT_LOCK_WAIT_SECONDS = 1800  # 30 minutos
     DB_IMPORT_LOCK_POLL_SECONDS = 5
+    CHUNK_SIZE_COPY = 200_000  # Linhas por COPY na tabela de staging (modo COPY)
+    MERGE_STATEMENT_TIMEOUT = '1800000ms'  # DELETE + INSERT ... SELECT da staging inteira
+    STAGING_TABLE_PREFIX = 'dfv_staging_'
+    # Ordem das colunas no COPY da staging (linha = posição no arquivo, última vence por unidade)
+    COPY_COLUMNS = (
+        'uf', 'municipio', 'logradouro', 'num_fachada', 'complemento',
+        'cep', 'bairro', 'tipo_viabilidade', 'tipo_rede', 'celula', 'nome_cdo',
+    )
     
     # Colunas obrigatórias
     REQUIRED_COLUMNS = ['CEP', 'NUM_FACHADA']
@@ -912,6 +921,177 @@ class DFVImportService:
         
         return sucesso_count, erros_count
     
+    # ------------------------------------------------------------------
+    # Modo COPY: staging UNLOGGED + dedup/upsert em SQL (PostgreSQL)
+    # ------------------------------------------------------------------
+
+    def _use_copy_mode(self) -> bool:
+        """COPY + staging só no PostgreSQL; DFV_IMPORT_COPY_ENABLED=False volta ao fluxo em lotes."""
+        from django.conf import settings
+
+        return (
+            connection.vendor == 'postgresql'
+            and getattr(settings, 'DFV_IMPORT_COPY_ENABLED', True)
+        )
+
+    def _build_staging_frame(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """
+        Monta as colunas do COPY a partir do DataFrame já limpo/filtrado (sem objetos DFV).
+
+        Opcionais vazios viram NULL, como no fluxo em lotes. Linhas com valor maior que o
+        max_length do campo seriam rejeitadas pelo INSERT: saem aqui e contam como erro.
+
+        Returns:
+            Tupla (DataFrame com `linha` + COPY_COLUMNS, número de linhas rejeitadas)
+        """
+        frame = pd.DataFrame({'linha': range(1, len(df) + 1)}, index=df.index)
+        frame['cep'] = df['cep_limpo']
+        frame['num_fachada'] = df['fachada_limpa']
+        for col in self.OPTIONAL_COLUMNS:
+            if col in df.columns:
+                valores = df[col].fillna('').astype(str).str.strip()
+                frame[col.lower()] = valores.where(valores != '', None)
+            else:
+                frame[col.lower()] = None
+
+        mask_excede = pd.Series(False, index=frame.index)
+        for col in self.COPY_COLUMNS:
+            max_length = DFV._meta.get_field(col).max_length
+            mask_excede |= frame[col].fillna('').str.len() > max_length
+        rejeitadas = int(mask_excede.sum())
+        if rejeitadas:
+            logger.warning(f"[DFV] {rejeitadas} linhas com campo maior que o permitido no modelo")
+        return frame[~mask_excede][['linha', *self.COPY_COLUMNS]], rejeitadas
+
+    @staticmethod
+    def _copy_buffer(frame: pd.DataFrame) -> StringIO:
+        """Serializa no formato text do COPY (tab, \\N para NULL, barra invertida escapada)."""
+        escapado = frame.copy()
+        for col in escapado.columns:
+            if escapado[col].dtype == object:
+                escapado[col] = (
+                    escapado[col]
+                    .str.replace('\\', '\\\\', regex=False)
+                    .str.replace(r'[\t\r\n]', ' ', regex=True)
+                )
+        buffer = StringIO()
+        escapado.to_csv(
+            buffer, sep='\t', header=False, index=False, na_rep='\\N',
+            quoting=csv.QUOTE_NONE, escapechar=None, lineterminator='\n',
+        )
+        buffer.seek(0)
+        return buffer
+
+    def _load_via_staging(self, df: pd.DataFrame) -> Tuple[int, int, int]:
+        """
+        Carga da base via COPY numa tabela UNLOGGED e consolidação em uma transação:
+        DELETE dos pares (CEP, fachada) do arquivo + INSERT de uma linha por unidade
+        (`_consolidar_staging`). Cada COPY é commitado sozinho, então o
+        LogImportacaoDFV mostra o progresso enquanto a staging enche.
+
+        Returns:
+            Tupla (registros inseridos, registros antigos removidos, linhas rejeitadas)
+        """
+        frame, rejeitadas = self._build_staging_frame(df)
+        total = len(frame)
+        table_name = DFV._meta.db_table
+        staging = f"{self.STAGING_TABLE_PREFIX}{int(self.log_id)}"
+        colunas = ', '.join(self.COPY_COLUMNS)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE {staging} (linha bigint, "
+                + ', '.join(f"{col} text" for col in self.COPY_COLUMNS)
+                + ")"
+            )
+        try:
+            total_chunks = max(1, (total + self.CHUNK_SIZE_COPY - 1) // self.CHUNK_SIZE_COPY)
+            for i in range(0, total, self.CHUNK_SIZE_COPY):
+                chunk_num = (i // self.CHUNK_SIZE_COPY) + 1
+                buffer = self._copy_buffer(frame.iloc[i:i + self.CHUNK_SIZE_COPY])
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET LOCAL statement_timeout = '300000ms'")
+                        cursor.copy_expert(
+                            f"COPY {staging} (linha, {colunas}) FROM STDIN WITH (FORMAT text)",
+                            buffer,
+                        )
+                carregadas = min(i + self.CHUNK_SIZE_COPY, total)
+                self._update_progress(
+                    total_processed=carregadas,
+                    message=f'Carregando staging (COPY)... {chunk_num}/{total_chunks} ({carregadas}/{total} linhas)'
+                )
+            del frame
+
+            self._update_progress(message='Consolidando base DFV (deduplicação e substituição)...')
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE INDEX ON {staging} (cep, num_fachada, complemento, linha)")
+                cursor.execute(f"ANALYZE {staging}")
+            inseridos, removidos = self._consolidar_staging(staging)
+            self._update_progress(
+                success=inseridos,
+                message=f'Atualizando estatísticas da base DFV... ({inseridos} registros, {removidos} substituídos)'
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {table_name}")
+        finally:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            except Exception as e:
+                logger.warning(f"[DFV] Não foi possível remover a staging {staging}: {e}")
+
+        logger.info(
+            f"[DFV] Modo COPY: {total} linhas na staging, {inseridos} inseridas "
+            f"(duplicadas no arquivo: {total - inseridos}), {removidos} antigas substituídas"
+        )
+        return inseridos, removidos, rejeitadas
+
+    def _consolidar_staging(self, staging: str) -> Tuple[int, int]:
+        """
+        Substitui na DFV os pares (CEP, fachada) presentes na staging, numa transação.
+
+        Fica uma linha por unidade (CEP, fachada, complemento), a última do arquivo:
+        CASA 1 / CASA 2 ou apartamentos do mesmo prédio continuam separados, como no
+        fluxo em lotes. SQL sem extensões do PostgreSQL (janela em vez de DISTINCT ON).
+
+        Returns:
+            Tupla (registros inseridos, registros antigos removidos)
+        """
+        table_name = DFV._meta.db_table
+        colunas = ', '.join(self.COPY_COLUMNS)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(f"SET LOCAL statement_timeout = '{self.MERGE_STATEMENT_TIMEOUT}'")
+                cursor.execute(
+                    f"""
+                    DELETE FROM {table_name}
+                    WHERE EXISTS (
+                        SELECT 1 FROM {staging} s
+                        WHERE s.cep = {table_name}.cep AND s.num_fachada = {table_name}.num_fachada
+                    )
+                    """
+                )
+                removidos = cursor.rowcount or 0
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table_name} ({colunas}, data_importacao)
+                    SELECT {colunas}, %s
+                    FROM (
+                        SELECT {colunas}, ROW_NUMBER() OVER (
+                            PARTITION BY cep, num_fachada, complemento ORDER BY linha DESC
+                        ) AS ordem
+                        FROM {staging}
+                    ) u
+                    WHERE u.ordem = 1
+                    """,
+                    [timezone.now()],
+                )
+                inseridos = cursor.rowcount or 0
+        return inseridos, removidos
+
     def _finalize_log(
         self,
         sucesso_count: int,
@@ -1053,7 +1233,19 @@ class DFVImportService:
             
             # Liberar memória do DataFrame original
             del df
-            
+
+            if self._use_copy_mode():
+                # ETAPAS 6-9 (modo COPY): staging + dedup/upsert em SQL
+                self._update_progress(message='Carregando arquivo na staging (COPY)...')
+                sucesso_count, registros_removidos, erros_criacao = self._load_via_staging(df_valido)
+                del df_valido
+                erros_detalhados.extend(
+                    [f"Linha rejeitada: campo maior que o permitido"] * min(erros_criacao, 10)
+                )
+                return self._concluir(
+                    sucesso_count, registros_removidos, erros_invalidos + erros_criacao, erros_detalhados
+                )
+
             # ETAPA 6: Extração de pares únicos
             self._update_progress(message='Extraindo pares únicos...')
             cep_fachada_set = self._get_unique_pairs(df_valido)
@@ -1082,22 +1274,13 @@ class DFVImportService:
             # Liberar memória da lista de objetos
             del registros_para_criar
             
-            # ETAPA 10: Finalização
-            self._finalize_log(
-                sucesso_count=sucesso_count,
-                erros_count=erros_invalidos + erros_preparacao + erros_criacao,
-                registros_removidos=registros_removidos,
-                erros_detalhados=erros_detalhados
+            return self._concluir(
+                sucesso_count,
+                registros_removidos,
+                erros_invalidos + erros_preparacao + erros_criacao,
+                erros_detalhados,
             )
             
-            return {
-                'success': True,
-                'log_id': self.log_id,
-                'sucesso': sucesso_count,
-                'erros': erros_invalidos + erros_preparacao + erros_criacao,
-                'removidos': registros_removidos
-            }
-            
         except DFVImportError as e:
             logger.error(f"[DFV] Erro de importação: {e}", exc_info=True)
             self._handle_error(str(e))
@@ -1111,6 +1294,45 @@ class DFVImportService:
             if lock_acquired:
                 self._release_db_lock()
     
+    def _concluir(
+        self,
+        sucesso_count: int,
+        registros_removidos: int,
+        erros_count: int,
+        erros_detalhados: List[str],
+    ) -> Dict:
+        """Etapas finais comuns aos dois modos: índice por CEP e fechamento do log."""
+        # ETAPA 10: Índice por CEP usado nas consultas de fachada/viabilidade
+        if sucesso_count or registros_removidos:
+            self._update_progress(message='Reconstruindo índice de fachadas por CEP...')
+            self._rebuild_index()
+
+        # ETAPA 11: Finalização
+        self._finalize_log(
+            sucesso_count=sucesso_count,
+            erros_count=erros_count,
+            registros_removidos=registros_removidos,
+            erros_detalhados=erros_detalhados
+        )
+
+        return {
+            'success': True,
+            'log_id': self.log_id,
+            'sucesso': sucesso_count,
+            'erros': erros_count,
+            'removidos': registros_removidos
+        }
+
+    def _rebuild_index(self) -> None:
+        """Reconstrói o índice DFV por CEP; falha aqui não invalida a importação."""
+        from crm_app.dfv_indice import reconstruir_indice
+
+        try:
+            resultado = reconstruir_indice()
+            logger.info(f"[DFV] Índice por CEP atualizado - Log {self.log_id}: {resultado}")
+        except Exception as e:
+            logger.error(f"[DFV] Erro ao reconstruir índice por CEP: {e}", exc_info=True)
+    
     def _handle_error(self, error_message: str) -> None:
         """
         Trata erros atualizando o log de importação.
@@ -0,0 +1,38 @@
+"""
+Lote de PDFs da folha como job da fila genérica (`crm_app/job_fila.py`, fila `folha`).
+
+Separado de `folha_pdf_lote` porque aquele módulo é importado pelos processos de renderização
+(spawn, sem Django) e este registra o handler sobre um modelo. O lote envia WhatsApp, então não
+é reexecutado (max_tentativas=1): se o processo morrer no meio, o lease vence e o lote é
+fechado em ERRO em vez de ficar em PROCESSANDO com a tela fazendo polling para sempre.
+"""
+from __future__ import annotations
+
+from django.utils import timezone
+
+from crm_app.job_fila import JobFila, registrar_handler
+
+FILA_FOLHA = 'folha'
+TIPO_JOB = 'folha_pdf'
+MENSAGEM_INTERROMPIDO = 'Lote interrompido (reinício do servidor/worker). Gere o lote novamente.'
+
+
+def falhar_lote(job: JobFila, mensagem: str) -> None:
+    """ao_falhar: fecha o lote que ficou pendente/em processamento."""
+    from crm_app.models import LoteFolhaPdf
+
+    LoteFolhaPdf.objects.filter(
+        pk=(job.payload or {}).get('lote_id'),
+        status__in=[LoteFolhaPdf.STATUS_PENDENTE, LoteFolhaPdf.STATUS_PROCESSANDO],
+    ).update(
+        status=LoteFolhaPdf.STATUS_ERRO,
+        mensagem=f'{MENSAGEM_INTERROMPIDO} ({mensagem})'[:4000],
+        finalizado_em=timezone.now(),
+    )
+
+
+@registrar_handler(TIPO_JOB, fila=FILA_FOLHA, max_tentativas=1, lease_segundos=180, ao_falhar=falhar_lote)
+def processar_lote_job(job: JobFila) -> None:
+    from crm_app.services.folha_pdf_lote import executar_lote
+
+    executar_lote(int(job.payload['lote_id']))
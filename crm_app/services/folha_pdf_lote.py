@@ -0,0 +1,410 @@
+"""
+Lotes de PDF folha + extrato (fechamento do mês) fora do request HTTP.
+
+O envio/exportação para a equipe inteira montava, renderizava (pisa, CPU e uma thread
+só) e enviava um PDF por vez dentro do request, estourando o timeout do gunicorn. Agora:
+- a view cria um `LoteFolhaPdf` e despacha `executar_lote` como job da fila genérica
+  (`iniciar_em_background` → `folha_pdf_jobs`, com lease: lote órfão vira ERRO), respondendo na
+  hora com o id para polling;
+- o HTML de cada vendedor é montado no processo e renderizado num pool de processos
+  (FOLHA_PDF_PROCESSOS; 0/1 renderiza na própria thread);
+- cada PDF pronto vira um `LoteFolhaPdfItem` e, no envio WhatsApp, já entra no pool de
+  envio (FOLHA_PDF_ENVIO_CONCORRENCIA threads) enquanto os próximos renderizam;
+- o download do lote sai como ZIP em streaming (`gerar_zip`), lendo um PDF por vez.
+
+Lotes de um vendedor só seguem síncronos (mesma função, sem pool) para manter a resposta
+direta da tela.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_ERROS_GRAVADOS = 500
+NOMES_MES_FECHAMENTO = (
+    'JANEIRO', 'FEVEREIRO', 'MARÇO', 'ABRIL', 'MAIO', 'JUNHO',
+    'JULHO', 'AGOSTO', 'SETEMBRO', 'OUTUBRO', 'NOVEMBRO', 'DEZEMBRO',
+)
+
+
+# ---------------------------------------------------------------------------
+# Renderização (roda nos processos do pool: sem Django)
+# ---------------------------------------------------------------------------
+
+def renderizar_pdf(html_string: str) -> Optional[bytes]:
+    """HTML → bytes do PDF com xhtml2pdf; None se o pisa reportar erro."""
+    from xhtml2pdf import pisa
+
+    buffer = io.BytesIO()
+    status = pisa.pisaDocument(io.BytesIO(html_string.encode('UTF-8')), buffer, encoding='utf-8')
+    if status.err:
+        return None
+    return buffer.getvalue()
+
+
+class _ExecutorLocal:
+    """Executor síncrono com a interface do concurrent.futures (pool desligado / testes)."""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        futuro: Future = Future()
+        try:
+            futuro.set_result(fn(*args, **kwargs))
+        except Exception as exc:
+            futuro.set_exception(exc)
+        return futuro
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _pool_render(processos: int):
+    if processos <= 1:
+        return _ExecutorLocal()
+    import multiprocessing
+
+    # spawn: o processo web tem threads (fork herdaria locks/conexões)
+    return ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn'))
+
+
+# ---------------------------------------------------------------------------
+# Nomes de arquivo e dados da folha
+# ---------------------------------------------------------------------------
+
+def nome_arquivo_seguro(nome_base: Any) -> str:
+    return "".join(
+        c if c.isalnum() or c in ('-', '_') else '_'
+        for c in str(nome_base or 'vendedor')
+    ).strip('_') or 'vendedor'
+
+
+def rotulo_mes(mes: int) -> str:
+    return NOMES_MES_FECHAMENTO[mes - 1] if 1 <= mes <= 12 else f'MES_{mes}'
+
+
+def nome_pdf_whatsapp(vendedor_data: Dict[str, Any], ano: int, mes: int) -> str:
+    return f"Folha_Comissao_{nome_arquivo_seguro(vendedor_data.get('vendedor_nome'))}_{mes}_{ano}.pdf"
+
+
+def nome_pdf_download(consultor, vendedor_data: Dict[str, Any], mes: int) -> str:
+    username = nome_arquivo_seguro(getattr(consultor, 'username', None) or vendedor_data.get('vendedor_nome'))
+    return f'FECHAMENTO VENDAS - {rotulo_mes(mes)} {username}.pdf'
+
+
+def nome_zip_download(mes: int) -> str:
+    return f'FECHAMENTO VENDAS - {rotulo_mes(mes)} MULTIPLOS.zip'
+
+
+def telefone_whatsapp(consultor) -> Optional[str]:
+    telefone = getattr(consultor, 'tel_whatsapp', None) or getattr(consultor, 'telefone', None)
+    telefone = str(telefone or '').strip()
+    return telefone or None
+
+
+def obter_folha_exportacao(ano: int, mes: int, ids_envio: Optional[list], usar_data_efetiva: bool) -> dict:
+    """
+    Folha para PDF/Excel/WhatsApp: reaproveita o cache da aba Folha.
+    Se a folha completa não estiver em cache e houver um único vendedor, calcula só ele.
+    """
+    from crm_app.services.folha_comissionamento_cache import (
+        calcular_folha_mes_com_cache,
+        obter_folha_cacheada,
+    )
+
+    cached_all = obter_folha_cacheada(ano, mes, None, usar_data_efetiva)
+    if cached_all is not None:
+        return cached_all
+    ids = ids_envio or []
+    return calcular_folha_mes_com_cache(
+        ano,
+        mes,
+        ids[0] if len(ids) == 1 else None,
+        use_effective_date_for_display=usar_data_efetiva,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Lote
+# ---------------------------------------------------------------------------
+
+def criar_lote(*, usuario, tipo: str, ano: int, mes: int, vendedores_ids: Iterable[int],
+               usar_data_efetiva: bool, fechar_mes: bool = False):
+    from crm_app.models import LoteFolhaPdf
+
+    ids = sorted({int(i) for i in vendedores_ids})
+    return LoteFolhaPdf.objects.create(
+        usuario=usuario if getattr(usuario, 'pk', None) else None,
+        tipo=tipo,
+        ano=ano,
+        mes=mes,
+        vendedores_ids=ids,
+        fechar_mes=fechar_mes,
+        usar_data_efetiva=usar_data_efetiva,
+        total=len(ids),
+    )
+
+
+def iniciar_em_background(lote_id: int) -> None:
+    """Despacha o lote na fila genérica (fila `folha`) depois do commit do request."""
+    from django.db import transaction
+
+    from crm_app.job_fila import despachar_job
+    from crm_app.services.folha_pdf_jobs import TIPO_JOB
+
+    transaction.on_commit(lambda: despachar_job(TIPO_JOB, {'lote_id': lote_id}))
+
+
+def _enviar_pdf(svc, telefone: str, pdf: bytes, nome_pdf: str, caption: str):
+    import base64
+
+    from django.db import connection
+
+    try:
+        return svc.enviar_pdf_b64(
+            telefone,
+            base64.b64encode(pdf).decode('utf-8'),
+            nome_arquivo=nome_pdf,
+            caption=caption,
+        )
+    finally:
+        connection.close()
+
+
+def _envio_falhou(resp) -> bool:
+    return resp is None or (isinstance(resp, dict) and bool(resp.get('error')))
+
+
+def executar_lote(lote_id: int, processos: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Gera (e, no tipo WhatsApp, envia) os PDFs do lote, atualizando o progresso no registro.
+    Retorna {'enviados': [ids], 'gerados': [ids], 'erros': [...], 'erro_fechamento': str|None}.
+    """
+    from django.contrib.auth import get_user_model
+    from django.db.models import F
+
+    from crm_app.comissao_folha_whatsapp_pdf import montar_html_folha_e_extrato_pdf
+    from crm_app.models import LoteFolhaPdf, LoteFolhaPdfItem
+
+    lote = LoteFolhaPdf.objects.get(pk=lote_id)
+    if processos is None:
+        processos = int(getattr(settings, 'FOLHA_PDF_PROCESSOS', 2))
+    concorrencia_envio = max(1, int(getattr(settings, 'FOLHA_PDF_ENVIO_CONCORRENCIA', 4)))
+    whatsapp = lote.tipo == LoteFolhaPdf.TIPO_WHATSAPP
+    ids = [int(i) for i in lote.vendedores_ids or []]
+    resultado: Dict[str, Any] = {'enviados': [], 'gerados': [], 'erros': [], 'erro_fechamento': None}
+    erros = resultado['erros']
+    LoteFolhaPdf.objects.filter(pk=lote_id).update(
+        status=LoteFolhaPdf.STATUS_PROCESSANDO, iniciado_em=timezone.now(), total=len(ids),
+        mensagem='Calculando folha...',
+    )
+
+    def _progresso(**campos):
+        LoteFolhaPdf.objects.filter(pk=lote_id).update(**campos)
+
+    try:
+        folha = obter_folha_exportacao(lote.ano, lote.mes, ids, lote.usar_data_efetiva)
+        map_folha = {
+            int(x.get('vendedor_id')): x
+            for x in folha.get('vendedores', [])
+            if x.get('vendedor_id') is not None
+        }
+        periodo = folha.get('periodo', f'{lote.mes:02d}/{lote.ano}')
+        consultores = {u.id: u for u in get_user_model().objects.filter(id__in=ids)}
+
+        tarefas = []
+        for vid in ids:
+            consultor = consultores.get(vid)
+            if not consultor:
+                erros.append(f'ID {vid}: vendedor não encontrado')
+                continue
+            telefone = telefone_whatsapp(consultor) if whatsapp else None
+            if whatsapp and not telefone:
+                erros.append(f'{consultor.username}: sem WhatsApp cadastrado')
+                continue
+            vendedor_data = map_folha.get(vid)
+            if not vendedor_data:
+                erros.append(f'{consultor.username}: sem dados de folha no período')
+                continue
+            nome_pdf = (
+                nome_pdf_whatsapp(vendedor_data, lote.ano, lote.mes) if whatsapp
+                else nome_pdf_download(consultor, vendedor_data, lote.mes)
+            )
+            tarefas.append({
+                'vendedor_id': vid,
+                'username': consultor.username,
+                'telefone': telefone,
+                'nome_pdf': nome_pdf,
+                'html': montar_html_folha_e_extrato_pdf(vendedor_data, periodo),
+            })
+
+        _progresso(mensagem=f'Gerando PDFs... 0/{len(tarefas)}')
+        svc = None
+        if whatsapp and tarefas:
+            from crm_app.whatsapp_service import WhatsAppService
+
+            svc = WhatsAppService()
+        caption = f'Folha de comissão {periodo} (resumo + extrato)'
+
+        with _pool_render(min(processos, len(tarefas))) as pool_render, \
+                ThreadPoolExecutor(max_workers=concorrencia_envio, thread_name_prefix='folha-pdf-envio') as pool_envio:
+            futuros_render = {pool_render.submit(renderizar_pdf, t.pop('html')): t for t in tarefas}
+            futuros_envio = {}
+            for futuro in as_completed(futuros_render):
+                tarefa = futuros_render[futuro]
+                try:
+                    pdf = futuro.result()
+                except Exception:
+                    logger.exception('[FOLHA PDF] Falha ao renderizar %s', tarefa['nome_pdf'])
+                    pdf = None
+                if pdf is None:
+                    erros.append(f"{tarefa['username']}: erro ao gerar PDF")
+                    LoteFolhaPdfItem.objects.create(
+                        lote_id=lote_id, vendedor_id=tarefa['vendedor_id'], nome_arquivo=tarefa['nome_pdf'],
+                        status=LoteFolhaPdfItem.STATUS_ERRO, erro='erro ao gerar PDF',
+                    )
+                    continue
+                item = LoteFolhaPdfItem.objects.create(
+                    lote_id=lote_id, vendedor_id=tarefa['vendedor_id'], nome_arquivo=tarefa['nome_pdf'], pdf=pdf,
+                )
+                resultado['gerados'].append(tarefa['vendedor_id'])
+                _progresso(
+                    renderizados=F('renderizados') + 1,
+                    mensagem=f"Gerando PDFs... {len(resultado['gerados'])}/{len(tarefas)}",
+                )
+                if svc is not None:
+                    futuros_envio[pool_envio.submit(
+                        _enviar_pdf, svc, tarefa['telefone'], pdf, tarefa['nome_pdf'], caption,
+                    )] = (tarefa, item.pk)
+
+            for futuro in as_completed(futuros_envio):
+                tarefa, item_id = futuros_envio[futuro]
+                try:
+                    resp = futuro.result()
+                except Exception as exc:
+                    logger.exception('[FOLHA PDF] Falha no envio de %s', tarefa['nome_pdf'])
+                    resp = {'error': str(exc)}
+                if _envio_falhou(resp):
+                    erros.append(f"{tarefa['username']}: falha no envio WhatsApp")
+                    LoteFolhaPdfItem.objects.filter(pk=item_id).update(
+                        status=LoteFolhaPdfItem.STATUS_ERRO, erro='falha no envio WhatsApp',
+                    )
+                    continue
+                resultado['enviados'].append(tarefa['vendedor_id'])
+                LoteFolhaPdfItem.objects.filter(pk=item_id).update(status=LoteFolhaPdfItem.STATUS_ENVIADO)
+                _progresso(enviados=F('enviados') + 1)
+
+        if whatsapp and lote.fechar_mes and resultado['enviados']:
+            from crm_app.views import _fechar_pagamento_mes
+
+            total_pago = sum(float(v.get('resumo', {}).get('liquido', 0) or 0) for v in folha.get('vendedores', []))
+            try:
+                _fechar_pagamento_mes(lote.ano, lote.mes, total_pago=total_pago)
+            except Exception as exc:
+                logger.exception('[FOLHA PDF] Falha ao fechar o mês %s/%s', lote.mes, lote.ano)
+                resultado['erro_fechamento'] = str(exc)
+    except Exception as exc:
+        logger.exception('[FOLHA PDF] Erro no lote %s', lote_id)
+        erros.append(f'Erro no processamento: {exc}')
+
+    concluidos = resultado['enviados'] if whatsapp else resultado['gerados']
+    if not concluidos:
+        status = LoteFolhaPdf.STATUS_ERRO
+        mensagem = 'Nenhum envio foi concluído.' if whatsapp else 'Nenhum PDF foi gerado.'
+    else:
+        status = LoteFolhaPdf.STATUS_PARCIAL if (erros or resultado['erro_fechamento']) else LoteFolhaPdf.STATUS_SUCESSO
+        if whatsapp:
+            mensagem = f'PDF enviado para {len(concluidos)} vendedor(es).'
+            if lote.fechar_mes:
+                mensagem += (
+                    f" Falhou ao fechar o mês: {resultado['erro_fechamento']}" if resultado['erro_fechamento']
+                    else ' Mês conferido/pago/fechado.'
+                )
+        else:
+            mensagem = f'{len(concluidos)} PDF(s) gerado(s).'
+    LoteFolhaPdf.objects.filter(pk=lote_id).update(
+        status=status,
+        mensagem=mensagem,
+        erros=erros[:MAX_ERROS_GRAVADOS],
+        finalizado_em=timezone.now(),
+    )
+    logger.info('[FOLHA PDF] Lote %s: %s — %s (%s erros)', lote_id, status, mensagem, len(erros))
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Download em streaming
+# ---------------------------------------------------------------------------
+
+class _SaidaZip(io.RawIOBase):
+    """Destino não-seekable do ZipFile: acumula os bytes até o próximo `retirar`."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._partes: list = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self) -> bytes:
+        partes, self._partes = self._partes, []
+        return b''.join(partes)
+
+
+def gerar_zip(arquivos: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """ZIP em pedaços, um arquivo por vez (para StreamingHttpResponse)."""
+    saida = _SaidaZip()
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for nome, conteudo in arquivos:
+            zf.writestr(nome, bytes(conteudo))
+            pedaco = saida.retirar()
+            if pedaco:
+                yield pedaco
+    pedaco = saida.retirar()
+    if pedaco:
+        yield pedaco
+
+
+def arquivos_do_lote(lote) -> Iterator[Tuple[str, bytes]]:
+    from crm_app.models import LoteFolhaPdfItem
+
+    itens = (
+        LoteFolhaPdfItem.objects.filter(lote=lote, pdf__isnull=False)
+        .exclude(status=LoteFolhaPdfItem.STATUS_ERRO)
+        .order_by('nome_arquivo')
+        .values_list('nome_arquivo', 'pdf')
+    )
+    for nome, pdf in itens.iterator(chunk_size=20):
+        yield nome, pdf
+
+
+def serializar_lote(lote) -> Dict[str, Any]:
+    from crm_app.models import LoteFolhaPdf
+
+    concluido = lote.status in (LoteFolhaPdf.STATUS_SUCESSO, LoteFolhaPdf.STATUS_PARCIAL, LoteFolhaPdf.STATUS_ERRO)
+    return {
+        'id': lote.pk,
+        'tipo': lote.tipo,
+        'status': lote.status,
+        'concluido': concluido,
+        'total': lote.total,
+        'renderizados': lote.renderizados,
+        'enviados': lote.enviados,
+        'erros': lote.erros or [],
+        'mensagem': lote.mensagem,
+        'iniciado_em': lote.iniciado_em.isoformat() if lote.iniciado_em else None,
+        'finalizado_em': lote.finalizado_em.isoformat() if lote.finalizado_em else None,
+    }
@@ -0,0 +1,439 @@
+"""
+Importação das planilhas de Agendamento (agendamentos futuros/tarefas fechadas) e Recompra.
+
+Antes as duas rodavam `df.iterrows()` na thread de fundo: para cada linha montavam um dict,
+buscavam o agendamento existente por `nr_ordem_venda` (`.filter().first()`) e gravavam com
+`save()`/`create()` — uma ou duas queries por linha. Agora:
+- a normalização é feita por coluna no DataFrame (texto, datas, datetimes < 1900 descartados);
+- os agendamentos existentes são resolvidos numa consulta por lote de chaves `nr_ordem_venda`;
+- a gravação é `bulk_update` dos existentes + `bulk_create` dos novos, em lotes de
+  IMPORTACAO_AGENDAMENTO_LOTE (a Recompra é só `bulk_create`).
+Se um lote falhar no banco ele é regravado linha a linha só para apontar as linhas com erro.
+
+Os tempos de cada etapa (leitura, normalização, resolução, gravação) vão em
+`detalhes_json['etapas_ms']` do log. `ImportacaoAgendamento` e `ImportacaoRecompra` não têm
+signals nem efeitos colaterais em `Venda`, então não há pós-processamento por linha.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from io import BytesIO
+from typing import Any
+
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_TEXTO_AGENDAMENTO = [
+    'sg_uf', 'nm_municipio', 'indicador', 'cd_nrba', 'st_ba', 'cd_encerramento',
+    'desc_observacao', 'desc_macro_atividade', 'ds_atividade', 'nr_ordem',
+    'nr_ordem_venda', 'anomes', 'cd_sap_original', 'cd_rede', 'nm_pdv_rel',
+    'rede', 'gp_canal', 'sg_gerencia', 'nm_gc',
+]
+CAMPOS_DATA_AGENDAMENTO = ['dt_abertura_ba', 'dt_execucao_particao', 'dt_agendamento']
+CAMPOS_DATETIME_AGENDAMENTO = [
+    'dt_inicio_agendamento', 'dt_fim_agendamento', 'dt_inicio_execucao_real', 'dt_fim_execucao_real',
+]
+
+CAMPOS_RECOMPRA = [
+    'ds_anomes', 'dt_venda_particao', 'dt_encerramento', 'nr_ordem', 'st_ordem', 'nm_seg', 'sg_uf',
+    'cd_sap_pdv', 'cd_tr_vdd', 'nr_cep', 'nm_municipio', 'nm_bairro', 'resultado', 'dt_inicio_ativo',
+    'nr_cep_base', 'nr_complemento1_base', 'nr_complemento2_base', 'nr_complemento3_base',
+    'nm_diretoria', 'nm_regional', 'cd_rede', 'gp_canal', 'nm_pdv_rel', 'GERENCIA', 'nm_gc', 'REDE',
+]
+CAMPOS_DATA_RECOMPRA = ['dt_venda_particao', 'dt_encerramento', 'dt_inicio_ativo']
+
+FORMATOS_AGENDAMENTO = ('.xlsx', '.xls', '.xlsb')
+MAX_ERROS_LOG = 100
+
+
+def _lote() -> int:
+    return max(1, int(getattr(settings, 'IMPORTACAO_AGENDAMENTO_LOTE', 2000)))
+
+
+class _Cronometro:
+    """Acumula a duração (ms) de cada etapa da importação."""
+
+    def __init__(self):
+        self.etapas: dict[str, int] = {}
+        self._inicio = time.perf_counter()
+        self._marca = self._inicio
+
+    def marcar(self, etapa: str) -> None:
+        agora = time.perf_counter()
+        self.etapas[etapa] = self.etapas.get(etapa, 0) + int((agora - self._marca) * 1000)
+        self._marca = agora
+
+    def resumo(self) -> dict[str, int]:
+        return {**self.etapas, 'total': int((time.perf_counter() - self._inicio) * 1000)}
+
+
+# ---------------------------------------------------------------------------
+# Normalização por coluna
+# ---------------------------------------------------------------------------
+
+def _coluna_texto(serie: pd.Series, *, vazio_nulo: bool = False, strip: bool = False) -> pd.Series:
+    nulos = serie.isna()
+    if vazio_nulo:
+        nulos |= serie.astype(object).eq('')
+    texto = serie.astype(str)
+    if strip:
+        texto = texto.str.strip()
+    return texto.astype(object).where(~nulos, None)
+
+
+def _coluna_data(serie: pd.Series) -> pd.Series:
+    datas = pd.to_datetime(serie, errors='coerce')
+    return datas.dt.date.astype(object).where(datas.notna(), None)
+
+
+def _coluna_datetime(serie: pd.Series) -> pd.Series:
+    datas = pd.to_datetime(serie, errors='coerce')
+    validas = datas.notna() & (datas.dt.year >= 1900)
+    # datetime64[us] -> object dá datetime do Python direto (sem Timestamp por célula)
+    pydatetimes = datas.to_numpy(dtype='datetime64[us]').astype(object)
+    return pd.Series(pydatetimes, index=serie.index, dtype=object).where(validas, None)
+
+
+def normalizar_agendamentos(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas do modelo ImportacaoAgendamento presentes na planilha, já nos tipos do banco."""
+    df = df.copy()
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    saida = pd.DataFrame(index=df.index)
+    for campo in CAMPOS_TEXTO_AGENDAMENTO:
+        if campo in df.columns:
+            saida[campo] = _coluna_texto(df[campo])
+    for campo in CAMPOS_DATA_AGENDAMENTO:
+        if campo in df.columns:
+            saida[campo] = _coluna_data(df[campo])
+    for campo in CAMPOS_DATETIME_AGENDAMENTO:
+        if campo in df.columns:
+            saida[campo] = _coluna_datetime(df[campo])
+    if 'nr_ordem_venda' in saida.columns:
+        chave = saida['nr_ordem_venda'].str.strip()
+        saida['nr_ordem_venda'] = chave.where(chave.notna() & (chave != ''), None)
+    return saida
+
+
+def normalizar_recompras(df: pd.DataFrame) -> pd.DataFrame:
+    """Todas as colunas de ImportacaoRecompra (ausentes na planilha ficam nulas)."""
+    df = df.copy()
+    df.columns = [str(col).strip() for col in df.columns]
+    saida = pd.DataFrame(index=df.index)
+    for campo in CAMPOS_RECOMPRA:
+        if campo not in df.columns:
+            saida[campo] = None
+        elif campo in CAMPOS_DATA_RECOMPRA:
+            saida[campo] = _coluna_data(df[campo])
+        else:
+            saida[campo] = _coluna_texto(df[campo], vazio_nulo=True, strip=True)
+    return saida
+
+
+def _registros(df: pd.DataFrame) -> list[tuple[int, dict[str, Any]]]:
+    """(número da linha na planilha, dados) — linha 1 é o cabeçalho."""
+    return [
+        (int(idx) + 2, dados)
+        for idx, dados in zip(df.index, df.to_dict('records'))
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Leitura
+# ---------------------------------------------------------------------------
+
+def _normalizar_cabecalho(valor: Any) -> str:
+    return str(valor).strip().upper().replace(' ', '_')
+
+
+def ler_planilha_agendamento(file_content: bytes, file_name: str) -> pd.DataFrame:
+    """Lê .xlsx/.xls/.xlsb preservando zeros à esquerda em NR_ORDEM_VENDA."""
+    file_buffer = BytesIO(file_content)
+    if file_name.endswith('.xlsb'):
+        df_sample = pd.read_excel(file_buffer, engine='pyxlsb', nrows=1)
+        file_buffer.seek(0)
+        coluna = next((c for c in df_sample.columns if _normalizar_cabecalho(c) == 'NR_ORDEM_VENDA'), None)
+        if coluna is None:
+            return pd.read_excel(file_buffer, engine='pyxlsb')
+        try:
+            return pd.read_excel(file_buffer, engine='pyxlsb', dtype={coluna: str})
+        except (TypeError, ValueError):
+            file_buffer.seek(0)
+            try:
+                return pd.read_excel(
+                    file_buffer, engine='pyxlsb',
+                    converters={coluna: lambda x: str(x) if pd.notna(x) else ''},
+                )
+            except Exception:
+                file_buffer.seek(0)
+                return pd.read_excel(file_buffer, engine='pyxlsb')
+    if file_name.endswith('.xlsx'):
+        try:
+            return _ler_xlsx_ordem_venda_texto(file_buffer)
+        except Exception:
+            file_buffer.seek(0)
+            return pd.read_excel(file_buffer)
+    if file_name.endswith('.xls'):
+        return pd.read_excel(file_buffer)
+    raise ValueError(f'Formato inválido: {file_name}')
+
+
+def _ler_xlsx_ordem_venda_texto(file_buffer: BytesIO) -> pd.DataFrame:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_buffer, data_only=False, read_only=True)
+    try:
+        linhas = wb.active.iter_rows(values_only=True)
+        headers = list(next(linhas, ()))
+        df = pd.DataFrame(list(linhas), columns=headers)
+    finally:
+        wb.close()
+    coluna = next(
+        (c for c in headers if c is not None and _normalizar_cabecalho(c) == 'NR_ORDEM_VENDA'), None,
+    )
+    if coluna is not None:
+        # Número vira inteiro sem ".0"; texto fica como está (zeros à esquerda preservados)
+        df[coluna] = df[coluna].map(
+            lambda v: None if v is None
+            else str(int(v)) if isinstance(v, float) and v.is_integer()
+            else str(v)
+        )
+    return df
+
+
+def ler_planilha_recompra(file_content: bytes, file_name: str) -> pd.DataFrame:
+    file_obj = BytesIO(file_content)
+    if file_name.endswith('.xlsb'):
+        return pd.read_excel(file_obj, engine='pyxlsb')
+    if file_name.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(file_obj)
+    raise ValueError('Formato inválido')
+
+
+# ---------------------------------------------------------------------------
+# Gravação
+# ---------------------------------------------------------------------------
+
+def _criar(modelo, registros: list[tuple[int, dict[str, Any]]], erros: list[str]) -> int:
+    """bulk_create; se o lote falhar, regrava linha a linha para isolar as linhas com erro."""
+    if not registros:
+        return 0
+    try:
+        modelo.objects.bulk_create([modelo(**dados) for _, dados in registros])
+        return len(registros)
+    except Exception:
+        logger.warning('[IMPORTACAO] Lote de %s %s falhou; gravando linha a linha', len(registros), modelo.__name__)
+    criados = 0
+    for linha, dados in registros:
+        try:
+            modelo.objects.create(**dados)
+            criados += 1
+        except Exception as e:
+            erros.append(f'Linha {linha}: {e}')
+    return criados
+
+
+def _atualizar(modelo, pares: list[tuple[int, Any]], campos: list[str], erros: list[str]) -> int:
+    """bulk_update dos existentes (objeto já com os novos valores); mesmo fallback de _criar."""
+    if not pares:
+        return 0
+    objs = [obj for _, obj in pares]
+    try:
+        modelo.objects.bulk_update(objs, campos)
+        return len(objs)
+    except Exception:
+        logger.warning('[IMPORTACAO] bulk_update de %s %s falhou; gravando linha a linha', len(objs), modelo.__name__)
+    atualizados = 0
+    for linha, obj in pares:
+        try:
+            obj.save(update_fields=campos)
+            atualizados += 1
+        except Exception as e:
+            erros.append(f'Linha {linha}: {e}')
+    return atualizados
+
+
+def _existentes_por_ordem_venda(chaves: list[str]) -> dict[str, Any]:
+    """Primeiro agendamento (na ordenação padrão do modelo) de cada nr_ordem_venda."""
+    from crm_app.models import ImportacaoAgendamento
+
+    existentes: dict[str, Any] = {}
+    for obj in ImportacaoAgendamento.objects.filter(nr_ordem_venda__in=chaves):
+        existentes.setdefault(obj.nr_ordem_venda, obj)
+    return existentes
+
+
+def _cancelado(log) -> bool:
+    log.refresh_from_db(fields=['status'])
+    return log.status == 'CANCELADO'
+
+
+# ---------------------------------------------------------------------------
+# Processamento (thread de fundo das views)
+# ---------------------------------------------------------------------------
+
+def _marcar_erro(log, mensagem: str) -> None:
+    log.status = 'ERRO'
+    log.mensagem_erro = mensagem
+    log.finalizado_em = timezone.now()
+    log.save()
+    log.calcular_duracao()
+
+
+def _finalizar(
+    log,
+    criados: int,
+    atualizados: int,
+    erros: list[str],
+    etapas: dict[str, int],
+    mensagem_sucesso: str,
+    **extra,
+) -> None:
+    log.finalizado_em = timezone.now()
+    log.erros_count = len(erros)
+    if erros:
+        log.status = 'PARCIAL' if criados + atualizados > 0 else 'ERRO'
+        log.mensagem_erro = '\n'.join(erros[:50])
+        log.mensagem = f'{criados + atualizados} registros importados, {len(erros)} erros'
+    else:
+        log.status = 'SUCESSO'
+        log.mensagem = mensagem_sucesso
+    log.detalhes_json = {
+        'registros_criados': criados,
+        **extra,
+        'erros': erros[:MAX_ERROS_LOG],
+        'etapas_ms': etapas,
+    }
+    log.save()
+    log.calcular_duracao()
+    logger.info('[IMPORTACAO] %s #%s: %s criados, %s atualizados, %s erros, etapas %s',
+                type(log).__name__, log.pk, criados, atualizados, len(erros), etapas)
+
+
+def processar_agendamento(log_id: int, file_content: bytes, file_name: str) -> None:
+    """Importa a planilha de agendamentos: upsert por nr_ordem_venda em lotes."""
+    from crm_app.models import LogImportacaoAgendamento
+
+    log = LogImportacaoAgendamento.objects.get(id=log_id)
+    if log.status == 'CANCELADO':
+        return
+    if not file_name.endswith(FORMATOS_AGENDAMENTO):
+        _marcar_erro(log, 'Formato inválido. Envie .xlsx, .xls ou .xlsb')
+        return
+    try:
+        _importar_agendamento(log, file_content, file_name)
+    except Exception as e:
+        logger.exception('[IMPORTACAO] Agendamento #%s falhou', log_id)
+        _marcar_erro(log, str(e))
+
+
+def _importar_agendamento(log, file_content: bytes, file_name: str) -> None:
+    from crm_app.models import ImportacaoAgendamento
+
+    cronometro = _Cronometro()
+    try:
+        df = ler_planilha_agendamento(file_content, file_name)
+    except Exception as e:
+        _marcar_erro(log, f'Erro ao ler arquivo: {e}')
+        return
+    cronometro.marcar('leitura')
+
+    log.total_linhas = len(df)
+    log.save(update_fields=['total_linhas'])
+    registros = _registros(normalizar_agendamentos(df))
+    cronometro.marcar('normalizacao')
+
+    criados = atualizados = duplicados = 0
+    erros: list[str] = []
+    tamanho = _lote()
+    for inicio in range(0, len(registros), tamanho):
+        if _cancelado(log):
+            log.finalizado_em = timezone.now()
+            log.mensagem_erro = 'Processo cancelado pelo usuário durante o processamento.'
+            log.mensagem = (
+                f'Importação cancelada. {criados + atualizados} registros foram processados antes do cancelamento.'
+            )
+            log.detalhes_json = {'registros_criados': criados, 'etapas_ms': cronometro.resumo()}
+            log.save()
+            log.calcular_duracao()
+            return
+        lote = registros[inicio:inicio + tamanho]
+
+        # Última ocorrência de cada nr_ordem_venda no lote vence (igual ao save linha a linha)
+        por_chave: dict[str, tuple[int, dict[str, Any]]] = {}
+        sem_chave = []
+        for linha, dados in lote:
+            chave = dados.get('nr_ordem_venda')
+            if chave:
+                duplicados += chave in por_chave
+                por_chave[chave] = (linha, dados)
+            else:
+                sem_chave.append((linha, dados))
+        existentes = _existentes_por_ordem_venda(list(por_chave))
+        cronometro.marcar('resolucao')
+
+        agora = timezone.now()
+        novos = list(sem_chave)
+        pares = []
+        campos = {'atualizado_em'}
+        for chave, (linha, dados) in por_chave.items():
+            obj = existentes.get(chave)
+            if obj is None:
+                novos.append((linha, dados))
+                continue
+            for campo, valor in dados.items():
+                setattr(obj, campo, valor)
+            obj.atualizado_em = agora
+            campos.update(dados)
+            pares.append((linha, obj))
+        atualizados += _atualizar(ImportacaoAgendamento, pares, sorted(campos), erros)
+        criados += _criar(ImportacaoAgendamento, novos, erros)
+        cronometro.marcar('gravacao')
+
+    log.total_processadas = criados
+    log.agendamentos_criados = criados
+    log.agendamentos_atualizados = atualizados
+    _finalizar(
+        log, criados, atualizados, erros, cronometro.resumo(),
+        f'{criados} agendamentos importados com sucesso!',
+        registros_atualizados=atualizados,
+        duplicados_no_arquivo=duplicados,
+    )
+
+
+def processar_recompra(log_id: int, file_content: bytes, file_name: str) -> None:
+    """Importa a planilha de recompra em bulk_create por lote."""
+    from crm_app.models import LogImportacaoRecompra
+
+    log = LogImportacaoRecompra.objects.get(id=log_id)
+    try:
+        _importar_recompra(log, file_content, file_name)
+    except Exception as e:
+        logger.exception('[IMPORTACAO] Recompra #%s falhou', log_id)
+        log.refresh_from_db()
+        _marcar_erro(log, str(e))
+
+
+def _importar_recompra(log, file_content: bytes, file_name: str) -> None:
+    from crm_app.models import ImportacaoRecompra
+
+    cronometro = _Cronometro()
+    df = ler_planilha_recompra(file_content, file_name)
+    cronometro.marcar('leitura')
+    registros = _registros(normalizar_recompras(df))
+    cronometro.marcar('normalizacao')
+
+    criados = 0
+    erros: list[str] = []
+    tamanho = _lote()
+    for inicio in range(0, len(registros), tamanho):
+        criados += _criar(ImportacaoRecompra, registros[inicio:inicio + tamanho], erros)
+    cronometro.marcar('gravacao')
+
+    log.total_linhas = len(df)
+    log.total_processadas = criados
+    log.registros_criados = criados
+    _finalizar(log, criados, 0, erros, cronometro.resumo(), f'{criados} registros importados com sucesso!')
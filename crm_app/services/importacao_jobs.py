@@ -0,0 +1,221 @@
+"""
+Importações como jobs da fila genérica (`crm_app/job_fila.py`, fila `imports`).
+
+As views só persistem o upload e despacham o job; o processamento roda no `run_worker` da fila
+`imports` (worker dedicado por padrão, JOBS_WORKER_FILAS). O upload vai para o R2 (padrão em
+produção: web, worker e scheduler não compartilham disco) ou para MEDIA_ROOT
+(IMPORTACAO_UPLOAD_STORAGE=local, desenvolvimento) e é removido quando o job termina.
+
+OSAB, Agendamento, Recompra, DFV e CNPJ não têm checkpoint e a OSAB dispara WhatsApp: se o
+processo morrer no meio, o job termina em erro (max_tentativas=1) e o log é fechado pedindo
+reenvio, em vez de ficar eternamente em PROCESSANDO. A Legado é retomável por chunk
+(`importacao_legado_service`).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Any, Iterator
+
+from django.conf import settings
+from django.utils import timezone
+
+from crm_app.job_fila import JobFila, registrar_handler
+
+logger = logging.getLogger(__name__)
+
+PREFIXO_LOCAL = 'local:'
+PREFIXO_R2 = 'r2:'
+MENSAGEM_INTERROMPIDA = 'Importação interrompida (reinício do servidor/worker). Envie o arquivo novamente.'
+
+
+# --- Upload persistido ---
+
+def _nome_seguro(nome: str) -> str:
+    base = os.path.basename(str(nome or 'arquivo').replace('\\', '/'))
+    return re.sub(r'[^\w.\-]', '_', base)[:120] or 'arquivo'
+
+
+def persistir_upload(arquivo: bytes | Any, nome: str, prefixo: str) -> str:
+    """
+    Grava o upload (bytes ou UploadedFile, este em chunks) e retorna a referência
+    `local:<caminho relativo a MEDIA_ROOT>` ou `r2:<chave>`.
+    """
+    nome_arquivo = f'{prefixo}_{timezone.now():%Y%m%d%H%M%S%f}_{_nome_seguro(nome)}'
+    if str(getattr(settings, 'IMPORTACAO_UPLOAD_STORAGE', 'local')).lower() == 'r2':
+        from crm_app.cloudflare_r2_service import CloudflareR2Storage
+
+        origem = BytesIO(arquivo) if isinstance(arquivo, bytes) else arquivo
+        pasta = getattr(settings, 'IMPORTACAO_R2_FOLDER', 'Importacoes')
+        return PREFIXO_R2 + CloudflareR2Storage().upload_private(origem, pasta, nome_arquivo)
+
+    relativo = os.path.join('importacoes', nome_arquivo)
+    caminho = os.path.join(settings.MEDIA_ROOT, relativo)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'wb') as destino:
+        if isinstance(arquivo, bytes):
+            destino.write(arquivo)
+        else:
+            for chunk in arquivo.chunks(1024 * 1024):
+                destino.write(chunk)
+    return PREFIXO_LOCAL + relativo
+
+
+def carregar_upload(referencia: str) -> bytes:
+    if referencia.startswith(PREFIXO_R2):
+        from crm_app.cloudflare_r2_service import CloudflareR2Storage
+
+        return CloudflareR2Storage().download(referencia[len(PREFIXO_R2):])
+    with open(os.path.join(settings.MEDIA_ROOT, referencia[len(PREFIXO_LOCAL):]), 'rb') as origem:
+        return origem.read()
+
+
+@contextmanager
+def caminho_local(referencia: str) -> Iterator[str]:
+    """Caminho em disco do upload (baixa do R2 para um temporário quando preciso)."""
+    if not referencia.startswith(PREFIXO_R2):
+        yield os.path.join(settings.MEDIA_ROOT, referencia[len(PREFIXO_LOCAL):])
+        return
+
+    from crm_app.cloudflare_r2_service import CloudflareR2Storage
+
+    temporario = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(referencia)[1])
+    try:
+        with temporario:
+            CloudflareR2Storage().download_to_file(referencia[len(PREFIXO_R2):], temporario)
+        yield temporario.name
+    finally:
+        try:
+            os.remove(temporario.name)
+        except OSError:
+            pass
+
+
+def remover_upload(referencia: str) -> None:
+    if not referencia:
+        return
+    try:
+        if referencia.startswith(PREFIXO_R2):
+            from crm_app.cloudflare_r2_service import CloudflareR2Storage
+
+            CloudflareR2Storage().delete(referencia[len(PREFIXO_R2):])
+        else:
+            os.remove(os.path.join(settings.MEDIA_ROOT, referencia[len(PREFIXO_LOCAL):]))
+    except Exception:
+        logger.warning('[IMPORTACAO_JOBS] Falha ao remover upload %s', referencia, exc_info=True)
+
+
+# --- Despacho ---
+
+def despachar_importacao(tipo: str, log, arquivo: bytes | Any, nome: str, **parametros) -> JobFila:
+    """
+    Persiste o upload e despacha o job `tipo` para o log dado. Se o upload falhar (ex.: R2 sem
+    credenciais), fecha o log em ERRO antes de propagar — não deixa PROCESSANDO sem job.
+    """
+    from crm_app.job_fila import despachar_job
+
+    try:
+        referencia = persistir_upload(arquivo, nome, f'{tipo}_{log.id}')
+    except Exception as exc:
+        type(log).objects.filter(pk=log.pk, status='PROCESSANDO').update(
+            status='ERRO',
+            mensagem_erro=f'Falha ao armazenar o arquivo para processamento: {exc}'[:4000],
+            finalizado_em=timezone.now(),
+        )
+        raise
+    return despachar_job(tipo, {'log_id': log.id, 'arquivo': referencia, 'nome_arquivo': nome, **parametros})
+
+
+def _fechar_log_interrompido(nome_modelo: str):
+    """ao_falhar: fecha o log que ficou em PROCESSANDO e remove o upload."""
+
+    def _ao_falhar(job: JobFila, mensagem: str) -> None:
+        from django.apps import apps
+
+        modelo = apps.get_model('crm_app', nome_modelo)
+        payload = job.payload or {}
+        modelo.objects.filter(pk=payload.get('log_id'), status='PROCESSANDO').update(
+            status='ERRO',
+            mensagem_erro=f'{MENSAGEM_INTERROMPIDA} ({mensagem})'[:4000],
+            finalizado_em=timezone.now(),
+        )
+        remover_upload(payload.get('arquivo') or '')
+
+    return _ao_falhar
+
+
+# --- Handlers ---
+
+@registrar_handler('osab', max_tentativas=1, ao_falhar=_fechar_log_interrompido('LogImportacaoOSAB'))
+def processar_osab(job: JobFila) -> None:
+    # A importação OSAB ainda vive na view; o worker só a carrega quando há job OSAB.
+    from crm_app.views import ImportacaoOsabView
+
+    payload = job.payload
+    try:
+        ImportacaoOsabView()._processar_osab_interno(
+            payload['log_id'],
+            carregar_upload(payload['arquivo']),
+            payload['nome_arquivo'],
+            payload.get('enviar_whatsapp', True),
+            dry_run=payload.get('dry_run', False),
+        )
+    finally:
+        remover_upload(payload['arquivo'])
+
+
+@registrar_handler('agendamento', max_tentativas=1, ao_falhar=_fechar_log_interrompido('LogImportacaoAgendamento'))
+def processar_agendamento_job(job: JobFila) -> None:
+    from crm_app.services.importacao_agendamento_recompra import processar_agendamento
+
+    payload = job.payload
+    try:
+        processar_agendamento(payload['log_id'], carregar_upload(payload['arquivo']), payload['nome_arquivo'])
+    finally:
+        remover_upload(payload['arquivo'])
+
+
+@registrar_handler('recompra', max_tentativas=1, ao_falhar=_fechar_log_interrompido('LogImportacaoRecompra'))
+def processar_recompra_job(job: JobFila) -> None:
+    from crm_app.services.importacao_agendamento_recompra import processar_recompra
+
+    payload = job.payload
+    try:
+        processar_recompra(payload['log_id'], carregar_upload(payload['arquivo']), payload['nome_arquivo'])
+    finally:
+        remover_upload(payload['arquivo'])
+
+
+@registrar_handler('dfv', max_tentativas=1, ao_falhar=_fechar_log_interrompido('LogImportacaoDFV'))
+def processar_dfv_job(job: JobFila) -> None:
+    from crm_app.services.dfv_import_service import DFVImportService
+
+    payload = job.payload
+    try:
+        with caminho_local(payload['arquivo']) as caminho:
+            DFVImportService(log_id=payload['log_id']).process(None, payload['nome_arquivo'], arquivo_path=caminho)
+    finally:
+        remover_upload(payload['arquivo'])
+
+
+@registrar_handler('cnpj', max_tentativas=1, ao_falhar=_fechar_log_interrompido('LogImportacaoEstabelecimentoCNPJ'))
+def processar_cnpj_job(job: JobFila) -> None:
+    from crm_app.services.cnpj_estabele_import_service import processar_arquivo_estabele
+
+    payload = job.payload
+    try:
+        with caminho_local(payload['arquivo']) as caminho:
+            processar_arquivo_estabele(
+                log_id=payload['log_id'],
+                arquivo_path=caminho,
+                aplicar_filtros=payload.get('aplicar_filtros', False),
+                cnae_fiscal=payload.get('cnae_fiscal'),
+                codigo_municipio=payload.get('codigo_municipio'),
+                situacao_cadastral=payload.get('situacao_cadastral'),
+            )
+    finally:
+        remover_upload(payload['arquivo'])
@@ -0,0 +1,392 @@
+"""
+Importação de Vendas Legado (históricas) como job durável em chunks com checkpoint.
+
+Antes a view lia o arquivo para a memória e processava tudo numa thread daemon: se o processo
+web fosse reciclado no meio, o progresso se perdia e o `LogImportacaoLegado` ficava eternamente
+em PROCESSANDO. Agora a view persiste o upload e despacha um job `legado` na fila genérica
+(`crm_app/job_fila.py`, fila `imports`), que processa IMPORTACAO_LEGADO_CHUNK linhas por
+transação: clientes, vendas, contadores do log e checkpoint (`proxima_linha`, gravado pelo
+`heartbeat`) são confirmados juntos, então a retomada parte exatamente do último chunk. Se o
+job já foi reassumido por outra execução, o heartbeat levanta `JobPerdido` e o chunk é desfeito.
+
+Vazão e ETA ficam em `detalhes_json['progresso']`.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from io import BytesIO
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from crm_app.job_fila import JobFalhaDefinitiva, JobFila, heartbeat, registrar_handler
+from crm_app.services.importacao_jobs import carregar_upload, despachar_importacao, remover_upload
+
+logger = logging.getLogger(__name__)
+
+TIPO_JOB = 'legado'
+MAX_ERROS_LOG = 100
+
+
+def _chunk() -> int:
+    return max(1, int(getattr(settings, 'IMPORTACAO_LEGADO_CHUNK', 500)))
+
+
+def iniciar_importacao_legado(log, conteudo: bytes, nome: str) -> JobFila:
+    """Persiste o upload e despacha o job (worker dedicado ou thread local)."""
+    log.tamanho_arquivo = len(conteudo)
+    log.save(update_fields=['tamanho_arquivo'])
+    return despachar_importacao(TIPO_JOB, log, conteudo, nome, proxima_linha=0)
+
+
+def ler_planilha_legado(conteudo: bytes) -> pd.DataFrame:
+    # dtype=str preserva zeros à esquerda (O.S., CPF)
+    df = pd.read_excel(BytesIO(conteudo), dtype=str)
+    df.columns = [str(c).strip().upper() for c in df.columns]
+    return df.replace({np.nan: None, 'nan': None, 'NaN': None, 'None': None})
+
+
+def falhar_job_legado(job: JobFila, mensagem: str) -> None:
+    """ao_falhar: encerra o log em ERRO (o que já foi gravado em chunks anteriores permanece)."""
+    from crm_app.models import LogImportacaoLegado
+
+    log = LogImportacaoLegado.objects.filter(pk=(job.payload or {}).get('log_id')).first()
+    if log:
+        log.status = 'ERRO'
+        log.mensagem_erro = mensagem
+        log.finalizado_em = timezone.now()
+        log.save()
+        log.calcular_duracao()
+    remover_upload((job.payload or {}).get('arquivo') or '')
+
+
+@registrar_handler(TIPO_JOB, max_tentativas=3, ao_falhar=falhar_job_legado)
+def processar_job_legado(job: JobFila) -> None:
+    from crm_app.models import LogImportacaoLegado
+
+    payload = job.payload or {}
+    log = LogImportacaoLegado.objects.filter(pk=payload.get('log_id')).first()
+    if not log:
+        raise JobFalhaDefinitiva('Log de importação não existe.')
+
+    try:
+        df = ler_planilha_legado(carregar_upload(payload['arquivo']))
+    except Exception as exc:
+        raise JobFalhaDefinitiva(f'Erro ao ler Excel: {exc}') from exc
+
+    if log.total_linhas != len(df):
+        log.total_linhas = len(df)
+        log.save(update_fields=['total_linhas'])
+
+    try:
+        _processar_chunks(job, log, df)
+    except Exception:
+        # A fila recoloca o job; o log mostra onde parou até a próxima tentativa
+        linha = int((job.payload or {}).get('proxima_linha') or 0)
+        LogImportacaoLegado.objects.filter(pk=log.pk).update(
+            mensagem=f'Interrompida após {linha} linhas; será retomada do último chunk gravado.',
+        )
+        raise
+
+    _finalizar(job, log)
+
+
+def _processar_chunks(job: JobFila, log, df: pd.DataFrame) -> None:
+    from crm_app.models import Venda
+    from crm_app.services.busca_textual import indexar_vendas
+
+    tamanho = _chunk()
+    inicio = int((job.payload or {}).get('proxima_linha') or 0)
+    detalhes = dict(log.detalhes_json or {})
+    progresso = dict(detalhes.get('progresso') or {})
+    progresso['retomadas'] = max(0, (job.tentativas or 1) - 1)
+    caches = _Caches()
+
+    while inicio < len(df):
+        t0 = time.monotonic()
+        fatia = df.iloc[inicio:inicio + tamanho]
+        fim = inicio + len(fatia)
+        with transaction.atomic():
+            vendas, clientes_criados, erros = _montar_vendas(fatia, caches)
+            Venda.objects.bulk_create(vendas, batch_size=1000)
+
+            log.vendas_criadas += len(vendas)
+            log.total_processadas = log.vendas_criadas
+            log.clientes_criados += clientes_criados
+            log.erros_count += len(erros)
+            detalhes['erros'] = ((detalhes.get('erros') or []) + erros)[:MAX_ERROS_LOG]
+            detalhes['progresso'] = _atualizar_progresso(progresso, fim, len(df), time.monotonic() - t0, tamanho)
+            log.detalhes_json = detalhes
+            log.save(update_fields=[
+                'vendas_criadas', 'total_processadas', 'clientes_criados', 'erros_count', 'detalhes_json',
+            ])
+            heartbeat(job, {**(job.payload or {}), 'proxima_linha': fim})
+        # bulk_create não dispara signal: indexa a busca textual das novas vendas
+        indexar_vendas([v.pk for v in vendas if v.pk])
+        inicio = fim
+
+
+def _atualizar_progresso(progresso: dict, concluidas: int, total: int, segundos: float, tamanho: int) -> dict:
+    progresso['segundos_processando'] = round(float(progresso.get('segundos_processando') or 0) + segundos, 3)
+    progresso['linhas_concluidas'] = concluidas
+    progresso['chunks'] = int(progresso.get('chunks') or 0) + 1
+    progresso['chunk'] = tamanho
+    decorrido = progresso['segundos_processando']
+    vazao = concluidas / decorrido if decorrido > 0 else None
+    progresso['linhas_por_segundo'] = round(vazao, 1) if vazao else None
+    progresso['eta_segundos'] = int((total - concluidas) / vazao) if vazao else None
+    return dict(progresso)
+
+
+def _finalizar(job: JobFila, log) -> None:
+    detalhes = dict(log.detalhes_json or {})
+    erros = detalhes.get('erros') or []
+    criadas = log.vendas_criadas
+    if log.erros_count:
+        log.status = 'PARCIAL' if criadas > 0 else 'ERRO'
+        log.mensagem_erro = '\n'.join(erros[:50])
+        log.mensagem = f'{criadas} vendas importadas, {log.erros_count} erros'
+    else:
+        log.status = 'SUCESSO'
+        log.mensagem = f'{criadas} vendas importadas com sucesso!'
+    detalhes.update({'clientes_criados': log.clientes_criados, 'vendas_criadas': criadas})
+    log.detalhes_json = detalhes
+    log.finalizado_em = timezone.now()
+    log.save()
+    log.calcular_duracao()
+    remover_upload((job.payload or {}).get('arquivo') or '')
+
+
+# --- Montagem das vendas ---
+
+class _Caches:
+    """Mapas de lookup carregados uma vez por execução do job."""
+
+    def __init__(self):
+        from django.contrib.auth import get_user_model
+
+        from crm_app.models import FormaPagamento, MotivoPendencia, Plano, StatusCRM
+
+        self.usuarios = {}
+        for u in get_user_model().objects.all():
+            self.usuarios[u.username.upper()] = u
+            if u.email:
+                self.usuarios[u.email.upper()] = u
+        self.planos = {p.nome.upper(): p for p in Plano.objects.all()}
+        self.pagamentos = {fp.nome.upper(): fp for fp in FormaPagamento.objects.all()}
+        self.status_esteira = {s.nome.upper(): s for s in StatusCRM.objects.filter(tipo='Esteira')}
+        self.status_tratamento = {s.nome.upper(): s for s in StatusCRM.objects.filter(tipo='Tratamento')}
+        self.motivos = {}
+        for m in MotivoPendencia.objects.all():
+            self.motivos[m.nome.upper().strip()] = m
+            partes = m.nome.split('-')
+            if len(partes) > 1:
+                self.motivos[partes[0].strip()] = m
+        self.viacep: dict[str, dict] = {}
+
+    def consultar_cep(self, cep_input: Any) -> dict:
+        if not cep_input:
+            return {}
+        cep_limpo = str(cep_input).replace('-', '').replace('.', '').strip()
+        if len(cep_limpo) != 8:
+            return {}
+        if cep_limpo in self.viacep:
+            return self.viacep[cep_limpo]
+        try:
+            resp = requests.get(f'https://viacep.com.br/ws/{cep_limpo}/json/', timeout=2)
+            if resp.status_code == 200:
+                dados = resp.json()
+                if 'erro' not in dados:
+                    res = {
+                        'logradouro': dados.get('logradouro', '').upper(),
+                        'bairro': dados.get('bairro', '').upper(),
+                        'cidade': dados.get('localidade', '').upper(),
+                        'uf': dados.get('uf', '').upper(),
+                    }
+                    self.viacep[cep_limpo] = res
+                    return res
+        except Exception:
+            pass
+        self.viacep[cep_limpo] = {}
+        return {}
+
+
+def _parse_dt(val):
+    if not val:
+        return None
+    try:
+        return pd.to_datetime(val, dayfirst=True, errors='coerce').date()
+    except Exception:
+        return None
+
+
+def _parse_periodo(val):
+    if not val:
+        return None
+    v = str(val).upper()
+    if 'MANH' in v:
+        return 'MANHA'
+    if 'TARDE' in v:
+        return 'TARDE'
+    if 'NOITE' in v:
+        return 'NOITE'
+    return None
+
+
+def _parse_dt_time(val):
+    """Retorna datetime timezone-aware ou None. Aceita 'DD/MM/YYYY' ou 'DD/MM/YYYY HH:MM'."""
+    if not val:
+        return None
+    try:
+        dt = pd.to_datetime(val, dayfirst=True, errors='coerce')
+        if pd.isna(dt):
+            return None
+        if hasattr(dt, 'to_pydatetime'):
+            dt = dt.to_pydatetime()
+        if timezone.is_naive(dt):
+            dt = timezone.make_aware(dt)
+        return dt
+    except Exception:
+        return None
+
+
+def _montar_vendas(fatia: pd.DataFrame, caches: _Caches) -> tuple[list, int, list[str]]:
+    """Monta as vendas do chunk. Cada linha roda num savepoint para isolar erros de banco."""
+    vendas = []
+    clientes_criados = 0
+    erros = []
+    for index, row in fatia.iterrows():
+        linha = index + 2
+        try:
+            with transaction.atomic():
+                venda, criou_cliente = _montar_venda(row, caches)
+        except Exception as exc:
+            erros.append(f'Linha {linha}: {exc}')
+            continue
+        vendas.append(venda)
+        clientes_criados += int(criou_cliente)
+    return vendas, clientes_criados, erros
+
+
+def _montar_venda(row: pd.Series, caches: _Caches):
+    from crm_app.models import Cliente, Venda
+
+    # 1. CLIENTE & CPF
+    cpf_raw = str(row.get('CPF_CNPJ_CLIENTE', ''))
+    cpf_limpo = ''.join(filter(str.isdigit, cpf_raw))
+    if cpf_limpo and len(cpf_limpo) < 11:
+        cpf_limpo = cpf_limpo.zfill(11)
+    if not cpf_limpo or len(cpf_limpo) < 11:
+        raise ValueError(f'CPF inválido ou vazio ({cpf_raw}).')
+
+    nome_cli = str(row.get('NOME_CLIENTE', 'Cliente Importado')).upper()
+    cliente, criou_cliente = Cliente.objects.get_or_create(
+        cpf_cnpj=cpf_limpo, defaults={'nome_razao_social': nome_cli}
+    )
+
+    mudou_cliente = False
+    if row.get('TELEFONE_1'):
+        cliente.telefone1 = str(row.get('TELEFONE_1'))
+        mudou_cliente = True
+    if row.get('TELEFONE_2'):
+        cliente.telefone2 = str(row.get('TELEFONE_2'))
+        mudou_cliente = True
+    if row.get('EMAIL_CLIENTE'):
+        cliente.email = str(row.get('EMAIL_CLIENTE'))
+        mudou_cliente = True
+    if row.get('DATA_NASCIMENTO'):
+        cliente.data_nascimento = _parse_dt(row.get('DATA_NASCIMENTO'))
+        mudou_cliente = True
+    if row.get('NOME_MAE'):
+        cliente.nome_mae = str(row.get('NOME_MAE')).upper()
+        mudou_cliente = True
+    if mudou_cliente:
+        cliente.save()
+
+    # 2. VENDEDOR, PLANO & PAGAMENTO
+    vendedor = caches.usuarios.get(str(row.get('LOGIN_VENDEDOR', '')).upper().strip())
+    plano = caches.planos.get(str(row.get('NOME_PLANO', '')).upper().strip())
+    pgto = caches.pagamentos.get(str(row.get('FORMA_PAGAMENTO', '')).upper().strip())
+
+    # 3. STATUS
+    nome_est = str(row.get('STATUS_ESTEIRA', '')).upper().strip()
+    status_esteira = caches.status_esteira.get(nome_est)
+    if not status_esteira and nome_est:
+        if 'INSTAL' in nome_est or 'CONCLU' in nome_est:
+            status_esteira = caches.status_esteira.get('INSTALADA')
+        elif 'PENDEN' in nome_est:
+            status_esteira = caches.status_esteira.get('PENDENCIADA')
+        elif 'AGEND' in nome_est:
+            status_esteira = caches.status_esteira.get('AGENDADO')
+        elif 'CANCEL' in nome_est:
+            status_esteira = caches.status_esteira.get('CANCELADA')
+
+    motivo_pend = None
+    if row.get('MOTIVO_PENDENCIA'):
+        motivo_pend = caches.motivos.get(str(row.get('MOTIVO_PENDENCIA')).upper().strip())
+
+    status_tratamento = caches.status_tratamento.get(str(row.get('STATUS_TRATAMENTO', '')).upper().strip())
+    if not status_tratamento:
+        if status_esteira and status_esteira.nome.upper() in ['INSTALADA', 'CANCELADA']:
+            status_tratamento = caches.status_tratamento.get('FECHADO')
+        else:
+            status_tratamento = caches.status_tratamento.get('SEM TRATAMENTO')
+
+    # 4. DATAS
+    dt_venda = _parse_dt(row.get('DATA_VENDA')) or timezone.now().date()
+    dt_inst = _parse_dt(row.get('DATA_INSTALACAO'))
+    if status_esteira and status_esteira.nome.upper() == 'INSTALADA' and not dt_inst:
+        dt_inst = dt_venda
+
+    # 5. ENDEREÇO
+    cep_final = str(row.get('CEP', '')).replace('-', '').replace('.', '').strip()[:9]
+    logradouro = str(row.get('LOGRADOURO', '')).upper()
+    bairro = str(row.get('BAIRRO', '')).upper()
+    cidade = str(row.get('CIDADE', '')).upper()
+    uf = str(row.get('UF', '')).upper()
+    if cep_final and (not logradouro or not bairro):
+        dados_api = caches.consultar_cep(cep_final)
+        if dados_api:
+            logradouro = dados_api.get('logradouro', '')
+            bairro = dados_api.get('bairro', '')
+            cidade = dados_api.get('cidade', '')
+            uf = dados_api.get('uf', '')
+
+    # 6. O.S. (Preservando Zero à Esquerda)
+    os_raw = str(row.get('OS', '')).strip()
+    if os_raw.endswith('.0'):
+        os_raw = os_raw[:-2]
+
+    venda = Venda(
+        cliente=cliente,
+        vendedor=vendedor,
+        plano=plano,
+        forma_pagamento=pgto,
+        status_esteira=status_esteira,
+        status_tratamento=status_tratamento,
+        motivo_pendencia=motivo_pend,
+        data_pedido=dt_venda,
+        data_abertura=_parse_dt_time(row.get('DATA_ABERTURA')),
+        data_instalacao=dt_inst,
+        data_agendamento=_parse_dt(row.get('DATA_AGENDAMENTO')),
+        periodo_agendamento=_parse_periodo(row.get('PERIODO_AGENDAMENTO')),
+        data_criacao=dt_venda,
+        cep=cep_final,
+        logradouro=logradouro[:255],
+        numero_residencia=str(row.get('NUMERO', ''))[:20],
+        complemento=str(row.get('COMPLEMENTO', '')).upper()[:100],
+        bairro=bairro[:100],
+        cidade=cidade[:100],
+        estado=uf[:2],
+        ponto_referencia=str(row.get('PONTO_REFERENCIA', '')).upper()[:255],
+        ordem_servico=os_raw,
+        observacoes=str(row.get('OBSERVACOES', 'Importação Legado'))[:500],
+        ativo=True,
+    )
+    return venda, criou_cliente
@@ -14,10 +14,18 @@ from datetime import date, datetime, time, timedelta
 from decimal import Decimal, InvalidOperation
 from typing import Any, Optional, Sequence
 
+from django.conf import settings
 from django.core.cache import cache
 from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
 
+from crm_app.services.busca_faturas_paralela import (
+    aquecer_token_nio,
+    executar_em_paralelo,
+    resumo_latencias,
+    workers_padrao,
+)
+
 logger = logging.getLogger(__name__)
 
 STATUS_MATCH = 'MATCH'
@@ -282,8 +290,12 @@ def _decisao(
     }
 
 
-def aplicar_match_na_fatura(fatura: Any, nio: dict[str, Any]) -> list[str]:
-    """Grava PIX, barras, valor (se vazio) e confirma vencimento. Retorna campos."""
+def aplicar_match_na_fatura(fatura: Any, nio: dict[str, Any], cpf: Optional[str] = None) -> list[str]:
+    """
+    Grava PIX, barras, valor (se vazio) e confirma vencimento. Retorna campos.
+
+    Se algo foi gravado, invalida o cache de dívidas Nio do CPF (`cpf` ou o do contrato).
+    """
     campos: list[str] = []
     pix = (nio.get('codigo_pix') or '').strip()
     barras = (nio.get('codigo_barras') or '').strip()
@@ -310,13 +322,19 @@ def aplicar_match_na_fatura(fatura: Any, nio: dict[str, Any]) -> list[str]:
         fatura.ultima_busca_em = timezone.now()
         campos.extend(['status_busca', 'erro_busca', 'origem_busca', 'ultima_busca_em'])
         fatura.save(update_fields=list(dict.fromkeys(campos)))
+        from crm_app.nio_dividas_cache import invalidar_cpf
+
+        if cpf is None:
+            contrato = getattr(fatura, 'contrato', None)
+            cpf = getattr(contrato, 'cpf_cliente', None)
+        invalidar_cpf(cpf)
     return [c for c in campos if c != 'atualizado_em']
 
 
 def consultar_e_decidir_contrato(contrato: Any) -> dict[str, Any]:
     """Consulta a API Nio e decide matches das faturas abertas do contrato."""
     from crm_app.models import FaturaM10
-    from crm_app.nio_api import consultar_dividas_nio
+    from crm_app.nio_dividas_cache import consultar_dividas_nio_cache
 
     cpf = re.sub(r'\D', '', str(getattr(contrato, 'cpf_cliente', None) or ''))
     if len(cpf) < 11:
@@ -348,7 +366,7 @@ def consultar_e_decidir_contrato(contrato: Any) -> dict[str, Any]:
         }
 
     try:
-        api = consultar_dividas_nio(cpf, offset=0, limit=50, headless=True)
+        api = consultar_dividas_nio_cache(cpf, offset=0, limit=50, headless=True)
     except Exception as exc:
         logger.exception('[MatchNio] Falha API contrato=%s', getattr(contrato, 'id', None))
         return {
@@ -356,6 +374,7 @@ def consultar_e_decidir_contrato(contrato: Any) -> dict[str, Any]:
             'status': STATUS_ERRO,
             'motivo': str(exc)[:300],
             'decisoes': [],
+            'transitorio': True,
         }
     if api.get('erro_400'):
         return {
@@ -393,7 +412,7 @@ def consultar_e_decidir_contrato(contrato: Any) -> dict[str, Any]:
         nio = dec.get('nio') or {}
         if fatura is None:
             continue
-        campos = aplicar_match_na_fatura(fatura, nio)
+        campos = aplicar_match_na_fatura(fatura, nio, cpf=cpf)
         dec['alteracoes'] = campos
         if campos:
             aplicadas += 1
@@ -570,19 +589,26 @@ def processar_lote_match_noturno(*, limite: int = 30, forcar: bool = False) -> d
 
         logs = historico.logs if isinstance(historico.logs, dict) else {}
         vistos: list[int] = list(logs.get('contratos_ids') or [])
+        # Conjunto mantido junto com a lista (persistida em logs) para o teste de pertinência O(1)
+        vistos_set: set[int] = set(vistos)
         detalhes: list[dict[str, Any]] = list(logs.get('detalhes') or [])
         resumo = logs.get('resumo') or {}
 
-        pendentes = [
-            c for c in queryset_contratos_pendentes_match()
-            if c.id not in set(vistos)
-        ]
+        pendentes = [c for c in queryset_contratos_pendentes_match() if c.id not in vistos_set]
         lote = pendentes[: max(1, int(limite))]
+        latencias: list[float] = list(logs.get('latencias_ms') or [])
         processados = 0
-        for contrato in lote:
+
+        def _registrar(tarefa) -> None:
+            nonlocal processados
+            contrato = tarefa.item
+            resultado = tarefa.resultado if tarefa.ok and tarefa.resultado else {
+                'ok': False, 'status': STATUS_ERRO, 'motivo': tarefa.erro, 'decisoes': [],
+            }
             vistos.append(contrato.id)
+            vistos_set.add(contrato.id)
             processados += 1
-            resultado = consultar_e_decidir_contrato(contrato)
+            latencias.append(tarefa.latencia_ms)
             decisoes = resultado.get('decisoes') or []
             if not decisoes and not resultado.get('ok'):
                 detalhes.append({
@@ -592,10 +618,13 @@ def processar_lote_match_noturno(*, limite: int = 30, forcar: bool = False) -> d
                     'status': resultado.get('status') or STATUS_ERRO,
                     'mensagem': resultado.get('motivo') or 'Falha na consulta Nio',
                     'salvo': False,
+                    'latencia_ms': tarefa.latencia_ms,
+                    'tentativas': tarefa.tentativas,
                 })
                 resumo['erro'] = int(resumo.get('erro') or 0) + 1
             for dec in decisoes:
                 item = _detalhe_log(contrato, dec)
+                item['latencia_ms'] = tarefa.latencia_ms
                 detalhes.append(item)
                 parte = _resumo_de_decisoes([dec])
                 for k, v in parte.items():
@@ -615,21 +644,42 @@ def processar_lote_match_noturno(*, limite: int = 30, forcar: bool = False) -> d
                 f'Match {resumo.get("match") or 0} · ambíguo {resumo.get("ambiguo") or 0} · '
                 f'sem match {resumo.get("sem_match") or 0} · divergência {resumo.get("divergencia_valor") or 0}'
             )
+            # Latência por contrato (consulta + decisão + gravação, com retries), em segundos.
+            historico.tempo_medio_fatura = round(sum(latencias) / len(latencias) / 1000, 3)
+            historico.tempo_min_fatura = round(min(latencias) / 1000, 3)
+            historico.tempo_max_fatura = round(max(latencias) / 1000, 3)
             historico.logs = {
                 'progresso': {
                     'contratos_feitos': len(vistos),
                     'contratos_total': len(vistos) + max(0, len(pendentes) - processados),
                     'ultimo_contrato': contrato.numero_contrato or str(contrato.id),
+                    'workers': workers,
                 },
                 'detalhes': detalhes[-250:],
                 'contratos_ids': vistos[-4000:],
                 'resumo': resumo,
+                'latencias_ms': latencias[-2000:],
+                'latencia': resumo_latencias(latencias),
             }
             historico.save(update_fields=[
                 'total_contratos', 'total_faturas', 'faturas_sucesso',
                 'faturas_erro', 'mensagem', 'logs',
+                'tempo_medio_fatura', 'tempo_min_fatura', 'tempo_max_fatura',
             ])
 
+        workers = workers_padrao()
+        if lote and workers > 1:
+            aquecer_token_nio()
+        executar_em_paralelo(
+            lote,
+            consultar_e_decidir_contrato,
+            workers=workers,
+            tentativas=int(getattr(settings, 'NIO_BUSCA_TENTATIVAS', 3) or 1),
+            repetir_se=lambda r: bool(r and r.get('transitorio')),
+            ao_concluir=_registrar,
+            prazo_seg=CACHE_LOCK_TTL - 120,
+        )
+
         restam = max(0, len(pendentes) - processados)
         if restam == 0:
             historico.status = 'CONCLUIDA'
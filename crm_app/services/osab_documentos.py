@@ -0,0 +1,124 @@
+"""
+Conjunto compartilhado dos documentos OSAB (O.S. já na forma canônica).
+
+A exportação da Esteira e a validação CONSTA / NÃO CONSTA OSAB montavam o conjunto
+varrendo toda a `ImportacaoOsab` a cada chamada. Agora:
+- no fim de cada importação OSAB (e na reversão/limpeza) `atualizar_conjunto` grava as
+  chaves canônicas (`churn_os_utils.chave_os_canonica`) ordenadas e compactadas com zlib
+  em `IndiceSerializado` e incrementa a versão `osab_documentos`;
+- cada processo descompacta o conjunto uma vez por versão (`versao_indice.VersaoLocal`)
+  e o teste de pertinência é só um lookup em frozenset.
+
+Enquanto a versão for 0 (conjunto nunca gerado) ou OSAB_CONJUNTO_ENABLED=False,
+`conjunto_documentos` retorna None e os chamadores montam o conjunto como antes.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import zlib
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from crm_app.churn_os_utils import chave_os_canonica
+from crm_app.versao_indice import VersaoLocal, incrementar_versao
+
+logger = logging.getLogger(__name__)
+
+NOME_VERSAO = 'osab_documentos'
+CHUNK_LEITURA = 8000
+
+_versao = VersaoLocal(NOME_VERSAO, ttl_seg=30)
+_lock = threading.Lock()
+_cache: dict[str, object] = {'versao': None, 'conjunto': None}
+
+
+def serializar(chaves: Iterable[str]) -> bytes:
+    return zlib.compress('\n'.join(sorted(chaves)).encode('utf-8'), 6)
+
+
+def desserializar(dados) -> frozenset[str]:
+    if not dados:
+        return frozenset()
+    texto = zlib.decompress(bytes(dados)).decode('utf-8')
+    return frozenset(texto.split('\n')) if texto else frozenset()
+
+
+def chaves_de_documentos(documentos: Iterable[Optional[str]]) -> set[str]:
+    chaves: set[str] = set()
+    for doc in documentos:
+        chave = chave_os_canonica(doc)
+        if chave:
+            chaves.add(chave)
+    return chaves
+
+
+def atualizar_conjunto(origem: str = '') -> int:
+    """Regrava o conjunto a partir da ImportacaoOsab e publica nova versão; retorna o total."""
+    from crm_app.models import ImportacaoOsab, IndiceSerializado
+
+    chaves = chaves_de_documentos(
+        ImportacaoOsab.objects.exclude(documento__isnull=True)
+        .values_list('documento', flat=True)
+        .iterator(chunk_size=CHUNK_LEITURA)
+    )
+    dados = serializar(chaves)
+    with transaction.atomic():
+        versao = incrementar_versao(NOME_VERSAO, total=len(chaves), origem=origem)
+        IndiceSerializado.objects.update_or_create(
+            nome=NOME_VERSAO,
+            defaults={'versao': versao, 'total': len(chaves), 'dados': dados},
+        )
+    _versao.invalidar()
+    logger.info(
+        '[OSAB] Conjunto de documentos v%s: %s chaves (%s bytes) — %s',
+        versao, len(chaves), len(dados), origem or 'manual',
+    )
+    return len(chaves)
+
+
+def atualizar_conjunto_seguro(origem: str = '') -> Optional[int]:
+    """Para o fim de importação/reversão: falha aqui não invalida a operação principal."""
+    try:
+        return atualizar_conjunto(origem)
+    except Exception:
+        logger.exception('[OSAB] Falha ao atualizar conjunto de documentos (%s)', origem)
+        return None
+
+
+def conjunto_documentos() -> Optional[frozenset[str]]:
+    """Chaves canônicas da OSAB vistas por este processo; None se o conjunto não existe."""
+    from crm_app.models import IndiceSerializado
+
+    if not getattr(settings, 'OSAB_CONJUNTO_ENABLED', True):
+        return None
+    try:
+        versao = _versao.obter()
+        if versao <= 0:
+            return None
+        if _cache['versao'] == versao:
+            return _cache['conjunto']
+        with _lock:
+            if _cache['versao'] != versao:
+                dados = IndiceSerializado.objects.filter(nome=NOME_VERSAO).values_list('dados', flat=True).first()
+                if dados is None:
+                    return None
+                _cache['conjunto'] = desserializar(dados)
+                _cache['versao'] = versao
+            return _cache['conjunto']
+    except Exception:
+        logger.exception('[OSAB] Falha ao carregar conjunto de documentos')
+        return None
+
+
+def consta_no_osab(pedido: Optional[str], conjunto: Optional[frozenset[str]] = None) -> bool:
+    conjunto = conjunto_documentos() if conjunto is None else conjunto
+    chave = chave_os_canonica(pedido)
+    return bool(conjunto and chave and chave in conjunto)
+
+
+def rotulo_validacao(pedido: Optional[str], conjunto: Optional[frozenset[str]] = None) -> str:
+    """Mesmo retorno de `churn_os_utils.rotulo_validacao_osab`: CONSTA OSAB / NÃO CONSTA OSAB."""
+    return 'CONSTA OSAB' if consta_no_osab(pedido, conjunto) else 'NÃO CONSTA OSAB'
@@ -0,0 +1,248 @@
+"""
+Cruzamento CRM × base OSAB em operações de conjunto (vendas ausentes na OSAB).
+
+Em vez de carregar toda a ImportacaoOsab num set Python e testar venda a venda:
+1. as chaves de O.S. (documentos OSAB + PEDIDOs extras da planilha, e as O.S. das vendas
+   ativas) vão para tabelas temporárias e são canonizadas com UPDATEs em lote — mesma
+   equivalência de `churn_os_utils.os_variantes` (trim, ".0", prefixo "OS-", zeros à
+   esquerda em O.S. numérica);
+2. um único anti-join aponta as vendas sem chave na OSAB; regras de status/data viram
+   filtros SQL;
+3. as transições saem com UPDATE em lote + bulk_create de histórico; os snapshots de
+   reversão são devolvidos ao chamador (gravados junto com os da planilha).
+
+Tudo roda numa transação (PgBouncer em transaction pooling: a temp table não
+sobrevive entre transações; no PostgreSQL ela é ON COMMIT DROP).
+`dry_run=True` só calcula: devolve o diff sem gravar nada.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, time as dt_time
+from typing import Any, Iterable, Optional
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TABELA_OSAB = 'tmp_osab_chave'
+TABELA_VENDA = 'tmp_osab_venda_chave'
+LOTE = 2000
+LOTE_INSERT = 500
+MAX_DIFF = 5000
+
+# Anti-join: ids das vendas cuja chave canônica não está na OSAB (usado como pk__in=RawSQL)
+SQL_AUSENTES = (
+    f'SELECT v.venda_id FROM {TABELA_VENDA} v '
+    f'WHERE NOT EXISTS (SELECT 1 FROM {TABELA_OSAB} o WHERE o.chave = v.chave)'
+)
+
+
+def _sql_so_digitos(vendor: str) -> str:
+    if vendor == 'postgresql':
+        return "chave ~ '^[0-9]+$'"
+    return "chave <> '' AND chave NOT GLOB '*[^0-9]*'"
+
+
+def _canonizar(cursor, tabela: str, vendor: str) -> None:
+    """Reduz cada chave à forma canônica (duas camadas de prefixo "OS-")."""
+    tira_ponto_zero = (
+        f"UPDATE {tabela} SET chave = SUBSTR(chave, 1, LENGTH(chave) - 2) "
+        f"WHERE LENGTH(chave) >= 2 AND SUBSTR(chave, LENGTH(chave) - 1) = '.0'"
+    )
+    tira_prefixo = (
+        f"UPDATE {tabela} SET chave = TRIM(SUBSTR(chave, 4)) "
+        f"WHERE UPPER(SUBSTR(chave, 1, 3)) = 'OS-'"
+    )
+    for sql in (tira_ponto_zero, tira_prefixo, tira_ponto_zero, tira_prefixo, tira_ponto_zero):
+        cursor.execute(sql)
+    cursor.execute(
+        f"UPDATE {tabela} SET chave = COALESCE(NULLIF(LTRIM(chave, '0'), ''), '0') "
+        f"WHERE {_sql_so_digitos(vendor)}"
+    )
+
+
+def _criar_tabelas(cursor, vendor: str, documentos_extras: Iterable[str]) -> None:
+    sufixo = ' ON COMMIT DROP' if vendor == 'postgresql' else ''
+    cursor.execute(f'CREATE TEMP TABLE {TABELA_OSAB} (chave TEXT){sufixo}')
+    cursor.execute(f'CREATE TEMP TABLE {TABELA_VENDA} (venda_id BIGINT, chave TEXT){sufixo}')
+
+    cursor.execute(
+        f"INSERT INTO {TABELA_OSAB} (chave) "
+        f"SELECT TRIM(documento) FROM crm_importacao_osab WHERE documento IS NOT NULL"
+    )
+    extras = [str(d).strip() for d in documentos_extras if d is not None and str(d).strip()]
+    for i in range(0, len(extras), LOTE_INSERT):
+        fatia = extras[i:i + LOTE_INSERT]
+        cursor.execute(
+            f"INSERT INTO {TABELA_OSAB} (chave) VALUES " + ', '.join(['(%s)'] * len(fatia)),
+            fatia,
+        )
+    # os_variantes ignora vazio e 'NAN' do lado OSAB
+    cursor.execute(f"DELETE FROM {TABELA_OSAB} WHERE chave = '' OR UPPER(chave) = 'NAN'")
+
+    cursor.execute(
+        f"INSERT INTO {TABELA_VENDA} (venda_id, chave) "
+        f"SELECT id, TRIM(ordem_servico) FROM crm_venda "
+        f"WHERE ativo = %s AND ordem_servico IS NOT NULL AND TRIM(ordem_servico) <> ''",
+        [True],
+    )
+    _canonizar(cursor, TABELA_OSAB, vendor)
+    _canonizar(cursor, TABELA_VENDA, vendor)
+    cursor.execute(f'CREATE INDEX {TABELA_OSAB}_idx ON {TABELA_OSAB} (chave)')
+    if vendor == 'postgresql':
+        cursor.execute(f'ANALYZE {TABELA_OSAB}')
+        cursor.execute(f'ANALYZE {TABELA_VENDA}')
+
+
+def _remover_tabelas(cursor, vendor: str) -> None:
+    if vendor != 'postgresql':
+        cursor.execute(f'DROP TABLE IF EXISTS {TABELA_OSAB}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABELA_VENDA}')
+
+
+def _q_instalada_sem_rebaixar() -> Q:
+    """INSTALADA não é rebaixada só por ausência na base espelho (PAP/OSAB delta)."""
+    nome = 'status_esteira__nome'
+    return Q(**{f'{nome}__icontains': 'INSTALADA'}) & ~(
+        Q(**{f'{nome}__icontains': 'OUTRO PDV'})
+        | Q(**{f'{nome}__icontains': 'NAO CONSTA'})
+        | Q(**{f'{nome}__icontains': 'NÃO CONSTA'})
+    )
+
+
+def _sincronizar_sequence_historico(vendor: str) -> None:
+    if vendor != 'postgresql':
+        return
+    from django.db.models import Max
+
+    from crm_app.models import HistoricoAlteracaoVenda
+
+    max_id = HistoricoAlteracaoVenda.objects.aggregate(max_id=Max('id')).get('max_id') or 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s, true);",
+            ['crm_historico_alteracao_venda', max_id],
+        )
+
+
+def reconciliar_ausentes_osab(
+    *,
+    st_nao,
+    osab_bot=None,
+    st_outro=None,
+    documentos_extras: Iterable[str] = (),
+    snapshots_reversao: Optional[list] = None,
+    dry_run: bool = False,
+    hoje=None,
+) -> dict[str, Any]:
+    """
+    Marca como `st_nao` (NÃO CONSTA NA OSAB) as vendas ativas cuja O.S. não está na OSAB.
+
+    - Ignora pedidos abertos (ou criados, sem abertura) hoje: a base OSAB reflete até ontem.
+    - Não mexe em INSTALADA nem em vendas já em INSTALADA OUTRO PDV / NÃO CONSTA.
+    - `documentos_extras`: PEDIDOs ainda não gravados em ImportacaoOsab (simulação).
+    Retorna as contagens do pós-processamento e, em dry_run, `diff` com as transições.
+    """
+    from crm_app.models import HistoricoAlteracaoVenda, LogImportacaoOSABSnapshotVenda, Venda
+    from crm_app.osab_revert_utils import serializar_venda_snapshot_osab
+
+    vendor = connection.vendor
+    hoje = hoje or timezone.localdate()
+    inicio_hoje = timezone.make_aware(datetime.combine(hoje, dt_time.min))
+    out: dict[str, Any] = {
+        'crm_sem_osab_nao_consta': 0,
+        'crm_sem_osab_outro_pdv': 0,
+        'crm_sem_osab_ignoradas_mesmo_dia': 0,
+    }
+    if dry_run:
+        out['diff'] = []
+        out['diff_total'] = 0
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if vendor == 'postgresql':
+                cursor.execute("SET LOCAL statement_timeout = '120000ms'")
+            _criar_tabelas(cursor, vendor, documentos_extras)
+            try:
+                ausentes = (
+                    Venda.objects.filter(ativo=True)
+                    .filter(pk__in=RawSQL(SQL_AUSENTES, []))
+                    .annotate(_ref_osab=Coalesce('data_abertura', 'data_criacao'))
+                )
+                out['crm_sem_osab_ignoradas_mesmo_dia'] = ausentes.filter(
+                    _ref_osab__gte=inicio_hoje,
+                ).count()
+                ja_marcadas = [st.pk for st in (st_nao, st_outro) if st]
+                candidatas = list(
+                    ausentes.filter(_ref_osab__lt=inicio_hoje)
+                    .exclude(status_esteira_id__in=ja_marcadas)
+                    .exclude(_q_instalada_sem_rebaixar())
+                    .order_by('id')
+                    .values(
+                        'id', 'ordem_servico', 'status_esteira_id', 'status_esteira__nome',
+                        'status_tratamento_id', 'motivo_pendencia_id', 'forma_pagamento_id',
+                        'data_abertura', 'data_agendamento', 'data_instalacao',
+                    )
+                )
+            finally:
+                _remover_tabelas(cursor, vendor)
+
+        out['crm_sem_osab_nao_consta'] = len(candidatas)
+        if not candidatas:
+            return out
+
+        historicos = []
+        for row in candidatas:
+            os_str = (row['ordem_servico'] or '').strip()
+            de = row['status_esteira__nome'] or '(vazio)'
+            alteracoes = {
+                'status_esteira': (
+                    f"De '{de}' para '{st_nao.nome}' (O.S. não consta na base OSAB após importação)"
+                )
+            }
+            if dry_run:
+                if len(out['diff']) < MAX_DIFF:
+                    out['diff'].append({
+                        'venda_id': row['id'],
+                        'ordem_servico': os_str,
+                        'origem': LogImportacaoOSABSnapshotVenda.ORIGEM_AUSENTE_OSAB,
+                        'alteracoes': alteracoes,
+                    })
+                continue
+            if snapshots_reversao is not None:
+                snapshots_reversao.append({
+                    'venda_id': row['id'],
+                    'ordem_servico': os_str,
+                    'origem': LogImportacaoOSABSnapshotVenda.ORIGEM_AUSENTE_OSAB,
+                    'valores_antes': serializar_venda_snapshot_osab(Venda(
+                        id=row['id'],
+                        status_esteira_id=row['status_esteira_id'],
+                        status_tratamento_id=row['status_tratamento_id'],
+                        motivo_pendencia_id=row['motivo_pendencia_id'],
+                        forma_pagamento_id=row['forma_pagamento_id'],
+                        data_abertura=row['data_abertura'],
+                        data_agendamento=row['data_agendamento'],
+                        data_instalacao=row['data_instalacao'],
+                    )),
+                })
+            historicos.append(HistoricoAlteracaoVenda(
+                venda_id=row['id'], usuario=osab_bot, alteracoes=alteracoes,
+            ))
+
+        if dry_run:
+            out['diff_total'] = len(candidatas)
+            return out
+
+        ids = [row['id'] for row in candidatas]
+        for i in range(0, len(ids), LOTE):
+            Venda.objects.filter(id__in=ids[i:i + LOTE]).update(status_esteira=st_nao)
+        _sincronizar_sequence_historico(vendor)
+        HistoricoAlteracaoVenda.objects.bulk_create(historicos, batch_size=LOTE)
+
+    logger.info('[OSAB] %s vendas marcadas como %s', len(ids), st_nao.nome)
+    return out
@@ -4,8 +4,11 @@ Processamento de jobs da fila PAP (serviço dedicado).
 from __future__ import annotations
 
 import logging
+import threading
+import time
 import traceback
 
+from django.conf import settings
 from django.utils import timezone
 
 from crm_app.db_resilience import (
@@ -48,10 +51,16 @@ def _notificar_falha_definitiva(job: PapJobFila) -> None:
             "❌ Não foi possível concluir sua consulta agora. Tente novamente.",
         )
         WhatsAppService().enviar_mensagem_texto(telefone, mensagem)
+        # .update() não passa pelo save: updated_at explícito invalida o cache de sessão dos
+        # outros processos (validado por etapa + updated_at) mesmo se a etapa já era "inicial";
+        # o deste processo sai pelo descartar_sessao.
         SessaoWhatsapp.objects.filter(telefone=telefone).update(
             etapa="inicial",
             dados_temp={},
+            updated_at=timezone.now(),
         )
+        from crm_app.whatsapp_roteador import descartar_sessao
+        descartar_sessao(telefone)
     except Exception:
         logger.exception(
             "[PAP_WORKER] Falha ao avisar usuário sobre erro definitivo do job %s",
@@ -179,3 +188,126 @@ def processar_job(job: PapJobFila) -> bool:
         return False
     finally:
         force_close_db_connections()
+
+
+def timeout_job_segundos(tipo: str) -> int:
+    """
+    PAP_JOB_TIMEOUT_SECONDS fixo, se configurado; senão p95 histórico do tipo ×
+    PAP_JOB_TIMEOUT_FATOR_P95 (limitado entre MIN e MAX); sem histórico, o padrão do tipo.
+    """
+    defaults = {
+        "status_online": 240,
+        "consulta_pedido": 240,
+        "analise_credito": 360,
+    }
+    base = int(getattr(settings, "PAP_JOB_TIMEOUT_SECONDS", 0) or 0)
+    if base > 0:
+        return base
+    try:
+        from crm_app.pap_job_fila import duracao_p95_segundos
+
+        p95 = duracao_p95_segundos(tipo)
+    except Exception:
+        logger.warning("[PAP_WORKER] Falha ao calcular p95 do tipo %s", tipo, exc_info=True)
+        p95 = None
+    if not p95:
+        return defaults.get(tipo, 300)
+    aprendido = p95 * float(getattr(settings, "PAP_JOB_TIMEOUT_FATOR_P95", 2.0))
+    minimo = int(getattr(settings, "PAP_JOB_TIMEOUT_MIN_SECONDS", 60))
+    maximo = int(getattr(settings, "PAP_JOB_TIMEOUT_MAX_SECONDS", 600))
+    return int(min(max(aprendido, minimo), maximo))
+
+
+def processar_job_com_timeout(job: PapJobFila, timeout_seg: int) -> bool:
+    """
+    Executa o job em thread. Se estourar o timeout, marca erro e retorna True (travou).
+    """
+    resultado: dict = {"done": False, "exc": None}
+
+    def _runner() -> None:
+        try:
+            processar_job(job)
+        except Exception as exc:
+            resultado["exc"] = exc
+            logger.exception("[PAP_WORKER] Exceção no job %s: %s", job.id, exc)
+        finally:
+            resultado["done"] = True
+
+    from crm_app.pap_job_fila import heartbeat_job_pap
+
+    t = threading.Thread(target=_runner, name=f"pap-job-{job.id}", daemon=True)
+    t.start()
+    # Enquanto espera, renova o heartbeat: worker morto é detectado em segundos, não em minutos.
+    limite = time.monotonic() + max(30, timeout_seg)
+    intervalo = max(1.0, float(getattr(settings, "PAP_JOB_HEARTBEAT_SEGUNDOS", 20)))
+    while not resultado["done"]:
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+        t.join(timeout=min(intervalo, restante))
+        if not resultado["done"]:
+            try:
+                heartbeat_job_pap(job)
+            except Exception:
+                logger.warning("[PAP_WORKER] Falha no heartbeat do job %s", job.id, exc_info=True)
+                force_close_db_connections()
+
+    if resultado["done"]:
+        return False
+
+    # Timeout: marca job como erro (não reprocessa — provavelmente Playwright zumbi).
+    try:
+        def _marcar_timeout() -> None:
+            force_close_db_connections()
+            PapJobFila.objects.filter(
+                pk=job.id,
+                status=PapJobFila.STATUS_PROCESSANDO,
+            ).update(
+                status=PapJobFila.STATUS_ERRO,
+                concluido_em=timezone.now(),
+                erro=(
+                    f"Job abandonado: timeout de {timeout_seg}s no worker PAP "
+                    f"(tipo={job.tipo})."
+                )[:4000],
+            )
+
+        retry_on_db_connection_error(
+            _marcar_timeout,
+            label=f"pap_job_{job.id}_timeout",
+        )
+    except Exception:
+        logger.exception("[PAP_WORKER] Falha ao marcar timeout do job %s", job.id)
+
+    # Avisa o usuário e libera BO do telefone deste job (não esperar 30 min do pool).
+    try:
+        _notificar_falha_definitiva(job)
+    except Exception:
+        logger.exception(
+            "[PAP_WORKER] Falha ao notificar timeout do job %s",
+            job.id,
+        )
+    try:
+        from crm_app.models import PapBoEmUso
+        from crm_app.pool_bo_pap import limpar_sessoes_expiradas
+
+        telefone = str(
+            (job.payload or {}).get("telefone") or job.telefone or ""
+        ).strip()
+        if telefone:
+            deletados, _ = PapBoEmUso.objects.filter(
+                vendedor_telefone=telefone
+            ).delete()
+            if deletados:
+                logger.info(
+                    "[PAP_WORKER] BO liberado após timeout do job %s telefone=%s",
+                    job.id,
+                    telefone,
+                )
+        limpar_sessoes_expiradas()
+    except Exception:
+        logger.exception(
+            "[PAP_WORKER] Falha ao liberar BO após timeout do job %s",
+            job.id,
+        )
+
+    return True
@@ -0,0 +1,572 @@
+"""
+Agregados pré-calculados do Qualidade e do Dashboard FPD (`RollupQualidade`).
+
+Uma linha por (lente, mês YYYY-MM). `linhas` é um cubo: uma entrada por combinação
+distinta das dimensões usadas nos cards/contagens, com a quantidade no fim.
+O que depende de "hoje" (atrasado, faixa de atraso, promessa) é derivado na leitura a
+partir das datas guardadas — a fatia não envelhece com a virada do dia.
+
+- vencimento | instalacao: uma unidade por contrato do universo do mês no painel
+  (órfão é dimensão; o filtro padrão "sem órfãos" é aplicado na leitura).
+- FPD | SPD | TPD: uma unidade por linha da ImportacaoFPD com vencimento no mês.
+
+Manutenção: signals de FaturaM10/ContratoM10/ImportacaoFPD marcam as fatias do
+contrato como sujas; a próxima leitura reconstrói só aquela fatia. Escritas em lote
+sem signal (bulk_update/update) são cobertas por `marcar_sujas()` nos imports e pelo
+teto QUALIDADE_ROLLUP_MAX_IDADE_SEG. `manage.py reconstruir_rollup_qualidade` refaz tudo.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import date, timedelta
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from crm_app.fpd_status_mapping import INDICADOR_PARA_NUMERO_FATURA
+
+logger = logging.getLogger(__name__)
+
+LENTES_PAINEL = ('vencimento', 'instalacao')
+# Indicadores que a importação FPD grava (FPD/SPD/TPD → faturas 1/2/3); não há QPD na planilha.
+INDICADORES_FPD = tuple(INDICADOR_PARA_NUMERO_FATURA)
+
+# Dimensões do cubo do painel (mesma ordem das colunas em `linhas`)
+DIMS_PAINEL = (
+    'vendedor_id', 'vendedor', 'status_contrato', 'status_tratamento_id', 'orfao',
+    'elegivel_bonus', 'elegivel', 'f1_status', 'f1_vencimento', 'f1_conferencia',
+    'faturas_pagas', 'promessas',
+)
+# Dimensões do cubo FPD
+DIMS_FPD = (
+    'vendedor_id', 'vendedor', 'nm_seg', 'aberta', 'aguard_fpd', 'venc_vivo', 'faixa_planilha',
+)
+
+_STATUS_F1_ABERTO = ('NAO_PAGO', 'AGUARDANDO')
+
+
+def rollup_ativo() -> bool:
+    return bool(getattr(settings, 'QUALIDADE_ROLLUP_ENABLED', True))
+
+
+def _idade_maxima() -> int:
+    return int(getattr(settings, 'QUALIDADE_ROLLUP_MAX_IDADE_SEG', 600) or 0)
+
+
+def _mes(d: Optional[date]) -> Optional[str]:
+    return d.strftime('%Y-%m') if d else None
+
+
+def _data(iso: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(iso) if iso else None
+
+
+# ---------------------------------------------------------------------------
+# Construção
+# ---------------------------------------------------------------------------
+
+def _linhas_painel(lente: str, periodo: str) -> list[list[Any]]:
+    from crm_app.models import FaturaM10
+    from crm_app.services.qualidade_service import (
+        STATUS_FATURA_ABERTA_PROMESSA,
+        STATUS_FATURA_FECHADA,
+        _contrato_elegivel_dinamico,
+        queryset_universo_lente,
+    )
+
+    contratos = list(
+        queryset_universo_lente(lente, periodo)
+        .select_related('vendedor')
+        .only(
+            'id', 'vendedor_id', 'vendedor__username', 'status_contrato', 'status_tratamento_id',
+            'orfao', 'elegivel_bonus', 'teve_downgrade', 'status_fatura_fpd',
+        )
+        .annotate(
+            total_faturas=Count('faturas', distinct=True),
+            faturas_pagas=Count(
+                'faturas', filter=Q(faturas__status__in=STATUS_FATURA_FECHADA), distinct=True,
+            ),
+        )
+    )
+    ids = [c.id for c in contratos]
+    fatura1: dict[int, tuple] = {}
+    promessas: dict[int, set[str]] = {}
+    for cid, numero, status, venc, conf, promessa in FaturaM10.objects.filter(
+        contrato_id__in=ids,
+    ).filter(
+        Q(numero_fatura=1)
+        | Q(status__in=STATUS_FATURA_ABERTA_PROMESSA, data_promessa_pagamento__isnull=False)
+    ).order_by('id').values_list(
+        'contrato_id', 'numero_fatura', 'status', 'data_vencimento', 'conferencia_fpd',
+        'data_promessa_pagamento',
+    ):
+        if numero == 1:
+            fatura1.setdefault(cid, (status, venc.isoformat() if venc else None, conf or ''))
+        if promessa and status in STATUS_FATURA_ABERTA_PROMESSA:
+            promessas.setdefault(cid, set()).add(promessa.isoformat())
+
+    cubo: dict[tuple, int] = {}
+    for c in contratos:
+        f1 = fatura1.get(c.id, (None, None, None))
+        chave = (
+            c.vendedor_id,
+            (c.vendedor.username or '').strip() if c.vendedor_id and c.vendedor else '',
+            c.status_contrato,
+            c.status_tratamento_id,
+            bool(c.orfao),
+            bool(c.elegivel_bonus),
+            _contrato_elegivel_dinamico(c),
+            f1[0], f1[1], f1[2],
+            int(c.faturas_pagas or 0),
+            ','.join(sorted(promessas.get(c.id, ()))),
+        )
+        cubo[chave] = cubo.get(chave, 0) + 1
+    return [list(k) + [n] for k, n in cubo.items()]
+
+
+def _cubo_fpd(indicador: str, rows_qs) -> dict[str, dict[tuple, int]]:
+    """Cubo FPD por mês de vencimento (YYYYMM) a partir de um queryset de ImportacaoFPD."""
+    from crm_app.models import FaturaM10
+    from crm_app.services.qualidade_service import (
+        _classificar_pago_aberto_fpd,
+        _normalizar_faixa_nio,
+    )
+
+    rows = list(
+        rows_qs.values(
+            'dt_venc_orig', 'ds_sit_fatura', 'faixa', 'nr_dias_atraso', 'nm_seg',
+            'contrato_m10_id', 'contrato_m10__vendedor_id', 'contrato_m10__vendedor__username',
+        )
+    )
+    contrato_ids = {r['contrato_m10_id'] for r in rows if r.get('contrato_m10_id')}
+    fatura_crm: dict[int, dict[str, Any]] = {}
+    if contrato_ids:
+        for cid, st, conf, venc in FaturaM10.objects.filter(
+            contrato_id__in=contrato_ids,
+            numero_fatura=INDICADOR_PARA_NUMERO_FATURA.get(indicador, 1),
+        ).values_list('contrato_id', 'status', 'conferencia_fpd', 'data_vencimento'):
+            fatura_crm[cid] = {
+                'status': (st or '').upper(),
+                'conferencia_fpd': (conf or '').upper(),
+                'data_vencimento': venc,
+            }
+
+    por_mes: dict[str, dict[tuple, int]] = {}
+    for r in rows:
+        if not r['dt_venc_orig']:
+            continue
+        cid = r.get('contrato_m10_id')
+        crm = fatura_crm.get(cid) if cid else None
+        aberta, _ = _classificar_pago_aberto_fpd(
+            crm=crm,
+            sit_planilha=r.get('ds_sit_fatura') or '',
+            nr_dias_atraso=r.get('nr_dias_atraso') or 0,
+            faixa_planilha=r.get('faixa') or '',
+        )
+        aguard = bool(
+            crm and crm['status'] == 'PAGO' and crm['conferencia_fpd'] in ('AGUARDANDO', 'DIVERGENTE')
+        )
+        venc_vivo = faixa_planilha = None
+        if aberta:
+            # Vencimento preferencial: CRM; fallback planilha
+            venc = (crm or {}).get('data_vencimento') or r['dt_venc_orig']
+            venc_vivo = venc.isoformat()
+            faixa_planilha = _normalizar_faixa_nio(r.get('faixa') or '', r.get('nr_dias_atraso') or 0)
+        vid = r.get('contrato_m10__vendedor_id')
+        chave = (
+            vid,
+            (r.get('contrato_m10__vendedor__username') or '').strip() if vid else '',
+            r.get('nm_seg') or '',
+            aberta,
+            aguard,
+            venc_vivo,
+            faixa_planilha,
+        )
+        cubo = por_mes.setdefault(r['dt_venc_orig'].strftime('%Y%m'), {})
+        cubo[chave] = cubo.get(chave, 0) + 1
+    return por_mes
+
+
+def _linhas_fpd(indicador: str, periodo: str) -> list[list[Any]]:
+    from crm_app.models import ImportacaoFPD
+    from crm_app.services.qualidade_service import mes_range
+
+    inicio, fim = mes_range(periodo)
+    cubos = _cubo_fpd(
+        indicador,
+        ImportacaoFPD.objects.filter(indicador=indicador, dt_venc_orig__gte=inicio, dt_venc_orig__lt=fim),
+    )
+    return [list(k) + [n] for cubo in cubos.values() for k, n in cubo.items()]
+
+
+def construir_fatia(lente: str, periodo: str):
+    """Recalcula e grava a fatia (lente, mês). Não limpa `sujo` se houve escrita no meio."""
+    from crm_app.models import RollupQualidade
+
+    try:
+        fatia, _ = RollupQualidade.objects.get_or_create(lente=lente, periodo=periodo)
+    except IntegrityError:
+        fatia = RollupQualidade.objects.get(lente=lente, periodo=periodo)
+    versao = fatia.versao
+    inicio = time.perf_counter()
+    if lente in INDICADORES_FPD:
+        linhas = _linhas_fpd(lente, periodo)
+    else:
+        linhas = _linhas_painel(lente, periodo)
+    fatia.linhas = linhas
+    fatia.total = sum(l[-1] for l in linhas)
+    fatia.construido_em = timezone.now()
+    fatia.duracao_ms = int((time.perf_counter() - inicio) * 1000)
+    atualizadas = RollupQualidade.objects.filter(pk=fatia.pk, versao=versao).update(
+        linhas=fatia.linhas, total=fatia.total, sujo=False,
+        construido_em=fatia.construido_em, duracao_ms=fatia.duracao_ms,
+    )
+    fatia.sujo = not atualizadas
+    logger.info(
+        '[ROLLUP QUALIDADE] %s %s: %s unidades em %s linhas (%s ms)',
+        lente, periodo, fatia.total, len(linhas), fatia.duracao_ms,
+    )
+    return fatia
+
+
+def obter_fatia(lente: str, periodo: str):
+    from crm_app.models import RollupQualidade
+
+    fatia = RollupQualidade.objects.filter(lente=lente, periodo=periodo).first()
+    if fatia is not None and not fatia.sujo and fatia.construido_em:
+        idade = (timezone.now() - fatia.construido_em).total_seconds()
+        if not _idade_maxima() or idade < _idade_maxima():
+            return fatia
+    return construir_fatia(lente, periodo)
+
+
+def _registros(fatia, dims: tuple) -> list[tuple[dict[str, Any], int]]:
+    return [(dict(zip(dims, linha[:-1])), int(linha[-1])) for linha in fatia.linhas or []]
+
+
+# ---------------------------------------------------------------------------
+# Invalidação
+# ---------------------------------------------------------------------------
+
+def marcar_sujas(fatias: Optional[Iterable[tuple[str, str]]] = None) -> int:
+    """Marca fatias (lente, mês) como sujas; sem argumento, todas."""
+    from crm_app.models import RollupQualidade
+
+    qs = RollupQualidade.objects.all()
+    if fatias is not None:
+        filtro = Q()
+        for lente, periodo in set(fatias):
+            if lente and periodo:
+                filtro |= Q(lente=lente, periodo=periodo)
+        if not filtro:
+            return 0
+        qs = qs.filter(filtro)
+    return qs.update(sujo=True, versao=F('versao') + 1)
+
+
+def fatias_do_contrato(contrato_id: Optional[int], data_instalacao: Optional[date] = None) -> set[tuple[str, str]]:
+    """Fatias onde o contrato entra: instalação pelo mês de instalação; vencimento/FPD pela planilha."""
+    from crm_app.models import ContratoM10, ImportacaoFPD
+
+    if not contrato_id:
+        return set()
+    if data_instalacao is None:
+        data_instalacao = (
+            ContratoM10.objects.filter(pk=contrato_id).values_list('data_instalacao', flat=True).first()
+        )
+    fatias = set()
+    if data_instalacao:
+        fatias.add(('instalacao', _mes(data_instalacao)))
+    for indicador, venc in ImportacaoFPD.objects.filter(
+        contrato_m10_id=contrato_id, dt_venc_orig__isnull=False,
+    ).values_list('indicador', 'dt_venc_orig').distinct():
+        fatias.add((indicador, _mes(venc)))
+        if indicador == 'FPD':
+            fatias.add(('vencimento', _mes(venc)))
+    return fatias
+
+
+def fatias_dos_contratos(contrato_ids: Iterable[int]) -> set[tuple[str, str]]:
+    """`fatias_do_contrato` para vários contratos (escritas em lote com `.update()`/bulk_update)."""
+    from crm_app.models import ContratoM10, ImportacaoFPD
+
+    ids = list(set(contrato_ids))
+    fatias = set()
+    for inicio in range(0, len(ids), 2000):
+        lote = ids[inicio:inicio + 2000]
+        for instalacao in ContratoM10.objects.filter(
+            pk__in=lote, data_instalacao__isnull=False,
+        ).values_list('data_instalacao', flat=True).distinct():
+            fatias.add(('instalacao', _mes(instalacao)))
+        for indicador, venc in ImportacaoFPD.objects.filter(
+            contrato_m10_id__in=lote, dt_venc_orig__isnull=False,
+        ).values_list('indicador', 'dt_venc_orig').distinct():
+            fatias.add((indicador, _mes(venc)))
+            if indicador == 'FPD':
+                fatias.add(('vencimento', _mes(venc)))
+    return fatias
+
+
+def periodos_disponiveis(lente: str) -> list[str]:
+    from crm_app.models import ContratoM10, ImportacaoFPD
+
+    if lente == 'instalacao':
+        datas = ContratoM10.objects.dates('data_instalacao', 'month')
+    else:
+        indicador = 'FPD' if lente == 'vencimento' else lente
+        datas = ImportacaoFPD.objects.filter(indicador=indicador).dates('dt_venc_orig', 'month')
+    return sorted({_mes(d) for d in datas if d})
+
+
+def reconstruir_tudo(lentes: Optional[Iterable[str]] = None, periodos: Optional[Iterable[str]] = None) -> dict[str, Any]:
+    feitas, inicio = 0, time.perf_counter()
+    for lente in lentes or (LENTES_PAINEL + INDICADORES_FPD):
+        for periodo in periodos or periodos_disponiveis(lente):
+            construir_fatia(lente, periodo)
+            feitas += 1
+    return {'fatias': feitas, 'duracao_ms': int((time.perf_counter() - inicio) * 1000)}
+
+
+# ---------------------------------------------------------------------------
+# Leitura — painel Qualidade (mesma semântica dos Q() de qualidade_service)
+# ---------------------------------------------------------------------------
+
+def _f1_atrasada(r: dict[str, Any], hoje: date) -> bool:
+    st, venc = r['f1_status'], _data(r['f1_vencimento'])
+    return st == 'ATRASADO' or (st in _STATUS_F1_ABERTO and venc is not None and venc < hoje)
+
+
+def _na_fila(r: dict[str, Any], fila: str, hoje: date) -> bool:
+    from crm_app.services.qualidade_service import (
+        FILA_ATRASADOS,
+        FILA_ATRASADOS_GTE60,
+        FILA_ATRASADOS_LT60,
+        STATUS_FATURA_FECHADA,
+        corte_vencimento_fpd,
+    )
+
+    if r['f1_status'] is None:
+        return fila not in _FILAS_CONHECIDAS
+    venc = _data(r['f1_vencimento'])
+    corte = corte_vencimento_fpd(hoje)
+    atrasada = _f1_atrasada(r, hoje)
+    aberto = r['f1_status'] in _STATUS_F1_ABERTO and venc is not None and venc >= hoje
+    paga = r['f1_status'] in STATUS_FATURA_FECHADA
+    if fila in (FILA_ATRASADOS_LT60, 'atrasados_-60', 'atrasados_menos_60'):
+        return atrasada and (venc is None or venc > corte)
+    if fila in (FILA_ATRASADOS_GTE60, 'atrasados_+60', 'atrasados_mais_60'):
+        return atrasada and venc is not None and venc <= corte
+    if fila == FILA_ATRASADOS:
+        return atrasada
+    if fila in ('abertos', 'em_aberto'):
+        return aberto
+    if fila in ('pagas', 'pago', 'pagos'):
+        return paga
+    if fila in ('todos', 'total', ''):
+        return atrasada or aberto or paga
+    return True
+
+
+_FILAS_CONHECIDAS = frozenset({
+    'atrasados_lt60', 'atrasados_-60', 'atrasados_menos_60',
+    'atrasados_gte60', 'atrasados_+60', 'atrasados_mais_60', 'atrasados',
+    'abertos', 'em_aberto', 'pagas', 'pago', 'pagos', 'todos', 'total', '',
+})
+
+
+def _na_faixa(r: dict[str, Any], chave: str, hoje: date) -> bool:
+    from crm_app.services.qualidade_service import FAIXA_ATRASO_RANGES, STATUS_FATURA_FECHADA
+
+    limites = FAIXA_ATRASO_RANGES.get((chave or '').strip().lower())
+    if not limites:
+        return True
+    venc = _data(r['f1_vencimento'])
+    if r['f1_status'] is None or r['f1_status'] in STATUS_FATURA_FECHADA or venc is None:
+        return False
+    lo, hi = limites
+    if venc > hoje - timedelta(days=lo):
+        return False
+    return hi is None or venc >= hoje - timedelta(days=hi)
+
+
+def _na_promessa(r: dict[str, Any], faixa: str, hoje: date) -> bool:
+    datas = [date.fromisoformat(d) for d in (r['promessas'] or '').split(',') if d]
+    faixa_n = (faixa or '').strip().lower()
+    if faixa_n in ('hoje', 'today'):
+        return hoje in datas
+    if faixa_n in ('atrasada', 'atrasadas', 'vencida'):
+        return any(d < hoje for d in datas)
+    if faixa_n in ('proximos', 'proximas', 'proximos_3'):
+        return any(hoje < d <= hoje + timedelta(days=3) for d in datas)
+    if faixa_n in ('todas', 'todos', 'com_promessa'):
+        return bool(datas)
+    return True
+
+
+def _passa_filtros(r: dict[str, Any], f: dict[str, Any], hoje: date) -> bool:
+    """
+    Os filtros de `_aplicar_filtros_contratos` (sem busca textual) + N/10 pagas numa linha
+    do cubo; `f` é a saída de `normalizar_filtros_contratos` (interpretada uma vez só).
+    """
+    for campo in ('vendedor_id', 'status_contrato', 'elegivel_bonus', 'orfao', 'status_tratamento_id', 'faturas_pagas'):
+        if campo in f and r[campo] != f[campo]:
+            return False
+    if 'status_fatura1' in f and r['f1_status'] != f['status_fatura1']:
+        return False
+    if 'conferencia_fpd' in f and (r['f1_status'] is None or r['f1_conferencia'] != f['conferencia_fpd']):
+        return False
+    if 'faixa_atraso' in f and not _na_faixa(r, f['faixa_atraso'], hoje):
+        return False
+    if 'promessa' in f and not _na_promessa(r, f['promessa'], hoje):
+        return False
+    return True
+
+
+def agregados_painel(lente: str, mes: str, filtros: dict[str, Any], fila: str) -> dict[str, Any]:
+    """Promessas, contagens de filtros, filas e KPIs de `dashboard_qualidade` a partir da fatia."""
+    from crm_app.services.qualidade_service import (
+        ATRASO_LIMITE_FPD_DIAS,
+        FAIXAS_NIO_ORDEM,
+        FILA_ATRASADOS_GTE60,
+        FILA_ATRASADOS_LT60,
+        META_FPD_PCT,
+        STATUS_FATURA_FECHADA,
+        _FILTROS_OPCAO_CONTAGEM,
+        faltam_pagamentos_meta_fpd,
+        normalizar_filtros_contratos,
+    )
+
+    hoje = timezone.localdate()
+    universo = _registros(obter_fatia(lente, mes), DIMS_PAINEL)
+    if filtros.get('orfao') in (None, ''):
+        universo = [(r, n) for r, n in universo if not r['orfao']]
+
+    def _contar(regs, pred) -> int:
+        return sum(n for r, n in regs if pred(r))
+
+    promessas = {
+        chave: _contar(universo, lambda r, f=faixa: _na_promessa(r, f, hoje))
+        for chave, faixa in (('hoje', 'hoje'), ('atrasadas', 'atrasada'), ('proximos', 'proximos'), ('todas', 'todas'))
+    }
+
+    # Opções de filtro: sem os filtros dimensionais, com a fila atual
+    filtros_contagem = normalizar_filtros_contratos(
+        {k: v for k, v in filtros.items() if k not in _FILTROS_OPCAO_CONTAGEM}
+    )
+    base_opcoes = [
+        (r, n) for r, n in universo
+        if _passa_filtros(r, filtros_contagem, hoje) and _na_fila(r, fila, hoje)
+    ]
+    status_trat: dict[str, int] = {}
+    vendedores: dict[int, dict[str, Any]] = {}
+    for r, n in base_opcoes:
+        chave = 'sem' if r['status_tratamento_id'] is None else str(r['status_tratamento_id'])
+        status_trat[chave] = status_trat.get(chave, 0) + n
+        if r['vendedor_id']:
+            v = vendedores.setdefault(r['vendedor_id'], {
+                'id': r['vendedor_id'], 'nome': r['vendedor'] or f"#{r['vendedor_id']}", 'count': 0,
+            })
+            v['count'] += n
+    contagens_filtros = {
+        'faixa_atraso': {
+            chave: _contar(base_opcoes, lambda r, c=chave: _na_faixa(r, c, hoje))
+            for chave, _label in FAIXAS_NIO_ORDEM
+        },
+        'faturas_pagas': {
+            str(i): _contar(base_opcoes, lambda r, i=i: r['faturas_pagas'] == i) for i in range(0, 11)
+        },
+        'conferencia_fpd': {
+            conf: _contar(base_opcoes, lambda r, c=conf: r['f1_status'] is not None and r['f1_conferencia'] == c)
+            for conf in ('AGUARDANDO', 'CONFIRMADO', 'DIVERGENTE')
+        },
+        'status_tratamento': status_trat,
+        'vendedores': sorted(vendedores.values(), key=lambda x: x['nome'].lower()),
+    }
+
+    # Filas: todos os filtros, sem a fila
+    filtros_norm = normalizar_filtros_contratos(filtros)
+    filtrados = [(r, n) for r, n in universo if _passa_filtros(r, filtros_norm, hoje)]
+    atrasados_lt60 = _contar(filtrados, lambda r: _na_fila(r, FILA_ATRASADOS_LT60, hoje))
+    atrasados_gte60 = _contar(filtrados, lambda r: _na_fila(r, FILA_ATRASADOS_GTE60, hoje))
+    atrasados = atrasados_lt60 + atrasados_gte60
+    abertos = _contar(filtrados, lambda r: _na_fila(r, 'abertos', hoje))
+    pagas = _contar(filtrados, lambda r: _na_fila(r, 'pagas', hoje))
+    total_filas = atrasados + abertos + pagas
+    filas = {
+        'atrasados': atrasados,
+        'atrasados_lt60': atrasados_lt60,
+        'atrasados_gte60': atrasados_gte60,
+        'abertos': abertos,
+        'pagas': pagas,
+        'todos': total_filas,
+        'base': sum(n for _, n in filtrados),
+        'pct_fpd': round(((atrasados + abertos) / total_filas * 100) if total_filas > 0 else 0.0, 1),
+        'meta_fpd_pct': META_FPD_PCT,
+        'faltam_para_meta_fpd': faltam_pagamentos_meta_fpd(atrasados, abertos, total_filas, META_FPD_PCT),
+        'atraso_limite_fpd_dias': ATRASO_LIMITE_FPD_DIAS,
+    }
+
+    lista = [(r, n) for r, n in filtrados if _na_fila(r, fila, hoje)]
+    return {
+        'promessas': promessas,
+        'contagens_filtros': contagens_filtros,
+        'filas': filas,
+        'total': sum(n for _, n in lista),
+        'ativos': _contar(lista, lambda r: r['status_contrato'] == 'ATIVO'),
+        'elegiveis': _contar(lista, lambda r: r['elegivel']),
+        'f1_total': _contar(lista, lambda r: r['f1_status'] is not None),
+        'f1_pagas': _contar(lista, lambda r: r['f1_status'] in STATUS_FATURA_FECHADA),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Leitura — Dashboard FPD
+# ---------------------------------------------------------------------------
+
+def registros_fpd(
+    indicador: str,
+    meses_yyyymm: Iterable[str],
+    *,
+    vendedor_id: Optional[int] = None,
+    nm_seg: Optional[str] = None,
+) -> dict[str, list[tuple[dict[str, Any], int]]]:
+    """Registros do cubo FPD por mês (chave YYYYMM), já filtrados por vendedor/segmento.
+
+    Com o rollup desligado, monta o mesmo cubo ao vivo só para os meses pedidos.
+    """
+    meses_yyyymm = list(meses_yyyymm)
+    if not rollup_ativo():
+        from crm_app.models import ImportacaoFPD
+        from crm_app.services.qualidade_service import mes_range
+
+        if not meses_yyyymm:
+            return {}
+        qs = ImportacaoFPD.objects.filter(
+            indicador=indicador,
+            dt_venc_orig__gte=mes_range(f'{meses_yyyymm[0][:4]}-{meses_yyyymm[0][4:6]}')[0],
+            dt_venc_orig__lt=mes_range(f'{meses_yyyymm[-1][:4]}-{meses_yyyymm[-1][4:6]}')[1],
+        )
+        if vendedor_id:
+            qs = qs.filter(contrato_m10__vendedor_id=vendedor_id)
+        if nm_seg:
+            qs = qs.filter(nm_seg__iexact=nm_seg)
+        cubos = _cubo_fpd(indicador, qs)
+        return {
+            chave: [(dict(zip(DIMS_FPD, k)), n) for k, n in cubos.get(chave, {}).items()]
+            for chave in meses_yyyymm
+        }
+
+    seg = nm_seg.casefold() if nm_seg else None
+    saida: dict[str, list[tuple[dict[str, Any], int]]] = {}
+    for chave in meses_yyyymm:
+        regs = _registros(obter_fatia(indicador, f'{chave[:4]}-{chave[4:6]}'), DIMS_FPD)
+        saida[chave] = [
+            (r, n) for r, n in regs
+            if (not vendedor_id or r['vendedor_id'] == vendedor_id)
+            and (not seg or (r['nm_seg'] or '').casefold() == seg)
+        ]
+    return saida
@@ -16,14 +16,11 @@ from typing import Any, Optional
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
-from django.db.models import CharField, Count, F, Func, Q, QuerySet, Value
+from django.db.models import CharField, Count, F, Func, IntegerField, OuterRef, Q, QuerySet, Subquery, Value
 from django.db.models.functions import Coalesce, TruncMonth
 from django.utils import timezone
 
-from crm_app.fpd_status_mapping import (
-    INDICADOR_PARA_NUMERO_FATURA,
-    NUMERO_FATURA_PARA_INDICADOR,
-)
+from crm_app.fpd_status_mapping import NUMERO_FATURA_PARA_INDICADOR
 from crm_app.models import (
     Cliente,
     ContratoM10,
@@ -230,6 +227,28 @@ def _recalcular_totais_safra(safra_str: str) -> None:
     )
 
 
+def _anotar_contagem_faturas(queryset: QuerySet) -> QuerySet:
+    """total_faturas / faturas_pagas por subquery.
+
+    Um Count('faturas') depois de filtros `faturas__...` reaproveitaria o JOIN do
+    filtro e contaria só as faturas que casaram (ex.: só a F1 no filtro de conferência).
+    """
+    def _contagem(**filtro) -> Coalesce:
+        sub = (
+            FaturaM10.objects.filter(contrato_id=OuterRef('pk'), **filtro)
+            .order_by()
+            .values('contrato_id')
+            .annotate(n=Count('id'))
+            .values('n')
+        )
+        return Coalesce(Subquery(sub, output_field=IntegerField()), 0)
+
+    return queryset.annotate(
+        total_faturas=_contagem(),
+        faturas_pagas=_contagem(status__in=STATUS_FATURA_FECHADA),
+    )
+
+
 def _contrato_elegivel_dinamico(contrato: ContratoM10) -> bool:
     total_f = getattr(contrato, 'total_faturas', None)
     pagas = getattr(contrato, 'faturas_pagas', None)
@@ -405,106 +424,152 @@ def payload_periodos_qualidade(lente: str) -> dict[str, Any]:
     }
 
 
-def _aplicar_filtros_contratos(
-    queryset: QuerySet[ContratoM10],
-    filtros: dict[str, Any],
-) -> QuerySet[ContratoM10]:
+def normalizar_filtros_contratos(filtros: dict[str, Any]) -> dict[str, Any]:
+    """Filtros dimensionais da lista de contratos já interpretados, só os ativos.
+
+    Chaves = campo comparado (``status_tratamento_id`` None = "sem status"); lido igual
+    pelo queryset (`_aplicar_filtros_contratos`) e pelo agregado (`qualidade_rollup`).
+    """
+    f: dict[str, Any] = {}
     vendedor = filtros.get('vendedor')
     if vendedor not in (None, '', '0', 0, 'todos'):
         try:
-            queryset = queryset.filter(vendedor_id=int(vendedor))
+            f['vendedor_id'] = int(vendedor)
         except (TypeError, ValueError):
             pass
 
     status = filtros.get('status') or filtros.get('status_contrato')
     if status:
-        queryset = queryset.filter(status_contrato=status)
+        f['status_contrato'] = status
 
-    elegivel = filtros.get('elegivel')
-    if elegivel is not None and elegivel != '':
-        if isinstance(elegivel, str):
-            queryset = queryset.filter(elegivel_bonus=(elegivel.lower() in ('true', '1', 'sim')))
-        else:
-            queryset = queryset.filter(elegivel_bonus=bool(elegivel))
-
-    orfao = filtros.get('orfao')
-    if orfao is not None and orfao != '' and _contrato_tem_campo('orfao'):
-        if isinstance(orfao, str):
-            queryset = queryset.filter(orfao=(orfao.lower() in ('true', '1', 'sim')))
-        else:
-            queryset = queryset.filter(orfao=bool(orfao))
+    for chave, campo in (('elegivel', 'elegivel_bonus'), ('orfao', 'orfao')):
+        valor = filtros.get(chave)
+        if valor is not None and valor != '':
+            f[campo] = valor.lower() in ('true', '1', 'sim') if isinstance(valor, str) else bool(valor)
 
     status_tratamento_id = filtros.get('status_tratamento_id') or filtros.get('status_tratamento')
     if status_tratamento_id not in (None, ''):
         if str(status_tratamento_id).lower() in ('null', 'vazio', 'sem'):
-            queryset = queryset.filter(status_tratamento__isnull=True)
+            f['status_tratamento_id'] = None
         elif str(status_tratamento_id).isdigit():
-            queryset = queryset.filter(status_tratamento_id=int(status_tratamento_id))
+            f['status_tratamento_id'] = int(status_tratamento_id)
+
+    if filtros.get('status_fatura1'):
+        f['status_fatura1'] = filtros['status_fatura1']
+
+    conferencia_fpd = (filtros.get('conferencia_fpd') or '').strip().upper()
+    if conferencia_fpd:
+        f['conferencia_fpd'] = conferencia_fpd
+
+    faixa_atraso = (filtros.get('faixa_atraso') or filtros.get('faixa') or '').strip()
+    if faixa_atraso:
+        f['faixa_atraso'] = faixa_atraso
+
+    promessa = (filtros.get('promessa') or '').strip().lower()
+    if promessa:
+        f['promessa'] = promessa
+
+    faturas_pagas_n = filtros.get('faturas_pagas') or filtros.get('faturas_pagas_n')
+    if faturas_pagas_n not in (None, ''):
+        try:
+            n_pagas = int(str(faturas_pagas_n).split('/')[0].strip())
+        except (TypeError, ValueError):
+            n_pagas = None
+        if n_pagas is not None and 0 <= n_pagas <= 10:
+            f['faturas_pagas'] = n_pagas
+    return f
+
+
+def _aplicar_filtros_contratos(
+    queryset: QuerySet[ContratoM10],
+    filtros: dict[str, Any],
+) -> QuerySet[ContratoM10]:
+    """Filtros dimensionais (N/10 pagas fica para depois do annotate, no painel)."""
+    f = normalizar_filtros_contratos(filtros)
+    for campo in ('vendedor_id', 'status_contrato', 'elegivel_bonus'):
+        if campo in f:
+            queryset = queryset.filter(**{campo: f[campo]})
+
+    if 'orfao' in f and _contrato_tem_campo('orfao'):
+        queryset = queryset.filter(orfao=f['orfao'])
 
-    status_fatura1 = filtros.get('status_fatura1')
-    if status_fatura1:
+    if 'status_tratamento_id' in f:
+        if f['status_tratamento_id'] is None:
+            queryset = queryset.filter(status_tratamento__isnull=True)
+        else:
+            queryset = queryset.filter(status_tratamento_id=f['status_tratamento_id'])
+
+    if 'status_fatura1' in f:
         queryset = queryset.filter(
             faturas__numero_fatura=1,
-            faturas__status=status_fatura1,
+            faturas__status=f['status_fatura1'],
         ).distinct()
 
-    conferencia_fpd = (filtros.get('conferencia_fpd') or '').strip().upper()
-    if conferencia_fpd:
+    if 'conferencia_fpd' in f:
         queryset = queryset.filter(
             faturas__numero_fatura=1,
-            faturas__conferencia_fpd=conferencia_fpd,
+            faturas__conferencia_fpd=f['conferencia_fpd'],
         ).distinct()
 
-    faixa_atraso = (filtros.get('faixa_atraso') or filtros.get('faixa') or '').strip()
-    if faixa_atraso:
+    if 'faixa_atraso' in f:
         queryset = queryset.filter(
-            _q_faixa_atraso_fatura1(faixa_atraso, timezone.localdate())
+            _q_faixa_atraso_fatura1(f['faixa_atraso'], timezone.localdate())
         ).distinct()
 
-    promessa = (filtros.get('promessa') or '').strip().lower()
-    if promessa:
-        q_prom = _q_promessa_pagamento(promessa, timezone.localdate())
+    if 'promessa' in f:
+        q_prom = _q_promessa_pagamento(f['promessa'], timezone.localdate())
         if q_prom:
             queryset = queryset.filter(q_prom).distinct()
 
     busca = filtros.get('q') or filtros.get('busca')
     if busca:
-        busca_digits = re.sub(r'\D', '', str(busca))
-        filtros_busca = (
-            Q(numero_contrato__icontains=busca)
-            | Q(numero_contrato_definitivo__icontains=busca)
-            | Q(cliente_nome__icontains=busca)
-            | Q(ordem_servico__icontains=busca)
-        )
-        if busca_digits:
-            filtros_busca |= Q(cpf_cliente__icontains=busca_digits)
-            # Celular 1/2 do cadastro da venda (com ou sem máscara / DDI 55).
-            # A busca geral (q com 2+ chars) já varre todas as safras FPD.
-            if len(busca_digits) >= 8:
+        from crm_app.services import busca_textual
+
+        q_indice = busca_textual.q_busca(busca_textual.TIPO_CONTRATO, busca)
+        if q_indice is not None:
+            queryset = queryset.filter(q_indice)
+        else:
+            queryset = _filtrar_busca_direta(queryset, busca)
+
+    return queryset
+
+
+def _filtrar_busca_direta(queryset: QuerySet, busca: str) -> QuerySet:
+    """Busca livre direto nas colunas (sem o índice DocumentoBusca)."""
+    busca_digits = re.sub(r'\D', '', str(busca))
+    filtros_busca = (
+        Q(numero_contrato__icontains=busca)
+        | Q(numero_contrato_definitivo__icontains=busca)
+        | Q(cliente_nome__icontains=busca)
+        | Q(ordem_servico__icontains=busca)
+    )
+    if busca_digits:
+        filtros_busca |= Q(cpf_cliente__icontains=busca_digits)
+        # Celular 1/2 do cadastro da venda (com ou sem máscara / DDI 55).
+        # A busca geral (q com 2+ chars) já varre todas as safras FPD.
+        if len(busca_digits) >= 8:
+            queryset = queryset.annotate(
+                _tel1_digitos=_StripNonDigits(
+                    Coalesce(F('venda__telefone1'), Value(''))
+                ),
+                _tel2_digitos=_StripNonDigits(
+                    Coalesce(F('venda__telefone2'), Value(''))
+                ),
+            )
+            for variante in _variantes_busca_telefone(busca_digits):
+                filtros_busca |= (
+                    Q(_tel1_digitos__contains=variante)
+                    | Q(_tel2_digitos__contains=variante)
+                )
+            if _contrato_tem_campo('telefone'):
                 queryset = queryset.annotate(
-                    _tel1_digitos=_StripNonDigits(
-                        Coalesce(F('venda__telefone1'), Value(''))
-                    ),
-                    _tel2_digitos=_StripNonDigits(
-                        Coalesce(F('venda__telefone2'), Value(''))
+                    _tel_contrato_digitos=_StripNonDigits(
+                        Coalesce(F('telefone'), Value(''))
                     ),
                 )
                 for variante in _variantes_busca_telefone(busca_digits):
-                    filtros_busca |= (
-                        Q(_tel1_digitos__contains=variante)
-                        | Q(_tel2_digitos__contains=variante)
-                    )
-                if _contrato_tem_campo('telefone'):
-                    queryset = queryset.annotate(
-                        _tel_contrato_digitos=_StripNonDigits(
-                            Coalesce(F('telefone'), Value(''))
-                        ),
-                    )
-                    for variante in _variantes_busca_telefone(busca_digits):
-                        filtros_busca |= Q(_tel_contrato_digitos__contains=variante)
-        queryset = queryset.filter(filtros_busca)
-
-    return queryset
+                    filtros_busca |= Q(_tel_contrato_digitos__contains=variante)
+    return queryset.filter(filtros_busca)
 
 
 def _variantes_busca_telefone(busca_digits: str) -> set[str]:
@@ -989,6 +1054,32 @@ def atualizar_status_tratamento_contrato(
     }
 
 
+def queryset_universo_lente(lente: str, mes: str) -> QuerySet[ContratoM10]:
+    """Contratos do mês na lente (instalação pela data de instalação; vencimento pela planilha FPD)."""
+    data_inicio, data_fim = mes_range(mes)
+    if (lente or '').strip().lower() == LENTE_INSTALACAO:
+        return ContratoM10.objects.filter(
+            data_instalacao__gte=data_inicio,
+            data_instalacao__lt=data_fim,
+        )
+    # Lente vencimento: mesmo universo do Dashboard FPD (planilha MATCHED).
+    # Usa dt_venc_orig da ImportacaoFPD — não FaturaM10.data_vencimento —
+    # para não divergir quando o CRM ficou com vencimento recalculado
+    # (ex.: instalação+25) diferente da planilha.
+    contrato_ids = (
+        ImportacaoFPD.objects.filter(
+            indicador='FPD',
+            dt_venc_orig__gte=data_inicio,
+            dt_venc_orig__lt=data_fim,
+            match_status='MATCHED',
+            contrato_m10_id__isnull=False,
+        )
+        .values_list('contrato_m10_id', flat=True)
+        .distinct()
+    )
+    return ContratoM10.objects.filter(id__in=contrato_ids)
+
+
 def dashboard_qualidade(
     lente: str,
     mes: str,
@@ -1009,87 +1100,57 @@ def dashboard_qualidade(
     busca_raw = (filtros.get('q') or filtros.get('busca') or '').strip()
     busca_geral = len(busca_raw) >= 2
 
-    if busca_geral:
+    queryset = (
         # Busca em toda a base (todas as safras / meses)
-        queryset = ContratoM10.objects.all()
-    else:
-        data_inicio, data_fim = mes_range(mes)
-        if lente_norm == LENTE_INSTALACAO:
-            queryset = ContratoM10.objects.filter(
-                data_instalacao__gte=data_inicio,
-                data_instalacao__lt=data_fim,
-            )
-        else:
-            # Lente vencimento: mesmo universo do Dashboard FPD (planilha MATCHED).
-            # Usa dt_venc_orig da ImportacaoFPD — não FaturaM10.data_vencimento —
-            # para não divergir quando o CRM ficou com vencimento recalculado
-            # (ex.: instalação+25) diferente da planilha.
-            contrato_ids = (
-                ImportacaoFPD.objects.filter(
-                    indicador='FPD',
-                    dt_venc_orig__gte=data_inicio,
-                    dt_venc_orig__lt=data_fim,
-                    match_status='MATCHED',
-                    contrato_m10_id__isnull=False,
-                )
-                .values_list('contrato_m10_id', flat=True)
-                .distinct()
-            )
-            queryset = ContratoM10.objects.filter(id__in=contrato_ids)
+        ContratoM10.objects.all() if busca_geral
+        else queryset_universo_lente(lente_norm, mes)
+    )
 
     # Órfãos ficam fora do tratamento por padrão (contam em "Faltam no CRM" / modal órfãos)
     if filtros.get('orfao') in (None, '') and _contrato_tem_campo('orfao'):
         queryset = queryset.filter(orfao=False)
 
-    # Lembrete de promessa: conta no universo do mês (antes dos filtros dimensionais)
-    promessas = contagens_promessas(queryset)
+    fila = (filtros.get('fila') or 'todos').strip().lower()
 
-    # Base para contagens das opções de filtro (sem faixa/status trat./conf./N-10)
-    filtros_contagem = {
-        k: v for k, v in filtros.items() if k not in _FILTROS_OPCAO_CONTAGEM
-    }
-    qs_base_annot = (
-        _aplicar_filtros_contratos(queryset, filtros_contagem)
-        .annotate(
-            total_faturas=Count('faturas', distinct=True),
-            faturas_pagas=Count(
-                'faturas',
-                filter=Q(faturas__status__in=STATUS_FATURA_FECHADA),
-                distinct=True,
-            ),
-        )
-    )
+    # Cards e contagens vêm do agregado por lente/mês; só a página da lista lê as linhas.
+    # Busca textual não cabe no agregado e segue ao vivo.
+    agregados: Optional[dict[str, Any]] = None
+    if not busca_geral:
+        from crm_app.services import qualidade_rollup
 
-    fila = (filtros.get('fila') or 'todos').strip().lower()
-    qs_para_opcoes = _aplicar_filtro_fila(qs_base_annot, fila) if fila else qs_base_annot
-    contagens_filtros = contagens_opcoes_filtros(qs_para_opcoes)
+        if qualidade_rollup.rollup_ativo():
+            agregados = qualidade_rollup.agregados_painel(lente_norm, mes, filtros, fila)
+
+    if agregados is not None:
+        promessas = agregados['promessas']
+        contagens_filtros = agregados['contagens_filtros']
+    else:
+        # Lembrete de promessa: conta no universo do mês (antes dos filtros dimensionais)
+        promessas = contagens_promessas(queryset)
+
+        # Base para contagens das opções de filtro (sem faixa/status trat./conf./N-10)
+        filtros_contagem = {
+            k: v for k, v in filtros.items() if k not in _FILTROS_OPCAO_CONTAGEM
+        }
+        qs_base_annot = (
+            _anotar_contagem_faturas(_aplicar_filtros_contratos(queryset, filtros_contagem))
+        )
+        qs_para_opcoes = _aplicar_filtro_fila(qs_base_annot, fila) if fila else qs_base_annot
+        contagens_filtros = contagens_opcoes_filtros(qs_para_opcoes)
 
     # QS completo (todos os filtros dimensionais) — filas usam o QS sem filtro de fila
     queryset = (
-        _aplicar_filtros_contratos(queryset, filtros)
+        _anotar_contagem_faturas(_aplicar_filtros_contratos(queryset, filtros))
         .select_related('vendedor', 'venda', 'venda__cliente', 'status_tratamento')
-        .annotate(
-            total_faturas=Count('faturas', distinct=True),
-            faturas_pagas=Count(
-                'faturas',
-                filter=Q(faturas__status__in=STATUS_FATURA_FECHADA),
-                distinct=True,
-            ),
-        )
         .order_by('-data_instalacao', 'id')
     )
 
     # Filtro N/10 depois do annotate para reutilizar faturas_pagas
-    faturas_pagas_n = filtros.get('faturas_pagas') or filtros.get('faturas_pagas_n')
-    if faturas_pagas_n not in (None, ''):
-        try:
-            n_pagas = int(str(faturas_pagas_n).split('/')[0].strip())
-        except (TypeError, ValueError):
-            n_pagas = None
-        if n_pagas is not None and 0 <= n_pagas <= 10:
-            queryset = queryset.filter(faturas_pagas=n_pagas)
+    n_pagas = normalizar_filtros_contratos(filtros).get('faturas_pagas')
+    if n_pagas is not None:
+        queryset = queryset.filter(faturas_pagas=n_pagas)
 
-    filas = contagens_filas_tratamento(queryset)
+    filas = agregados['filas'] if agregados is not None else contagens_filas_tratamento(queryset)
     reconciliacao = (
         None if busca_geral
         else reconciliar_fpd_com_painel(mes, filas, lente=lente_norm)
@@ -1097,16 +1158,49 @@ def dashboard_qualidade(
     if fila:
         queryset = _aplicar_filtro_fila(queryset, fila)
 
-    contratos_list = list(queryset)
+    try:
+        page = max(1, int(filtros.get('page', 1) or 1))
+    except (TypeError, ValueError):
+        page = 1
+    try:
+        page_size = max(1, min(250, int(filtros.get('page_size', 100) or 100)))
+    except (TypeError, ValueError):
+        page_size = 100
+    start = (page - 1) * page_size
+    end = start + page_size
+
+    if agregados is not None:
+        contratos_list = list(queryset[start:end])
+    else:
+        contratos_list = list(queryset)
     for c in contratos_list:
         if c.total_faturas == 0 and c.status_fatura_fpd and str(c.status_fatura_fpd).lower().startswith('paga'):
             c.total_faturas = 1
             c.faturas_pagas = 1
 
-    ids_contratos = [c.id for c in contratos_list]
-    faturas_qs = FaturaM10.objects.filter(contrato_id__in=ids_contratos).order_by(
-        'contrato_id', 'numero_fatura'
-    )
+    if agregados is not None:
+        total = agregados['total']
+        ativos = agregados['ativos']
+        elegiveis = agregados['elegiveis']
+        total_f1 = agregados['f1_total']
+        pagas_f1 = agregados['f1_pagas']
+        pagina_contratos = contratos_list
+    else:
+        total = len(contratos_list)
+        ativos = sum(1 for c in contratos_list if c.status_contrato == 'ATIVO')
+        elegiveis = sum(1 for c in contratos_list if _contrato_elegivel_dinamico(c))
+        f1_qs = FaturaM10.objects.filter(
+            contrato_id__in=[c.id for c in contratos_list], numero_fatura=1,
+        )
+        total_f1 = f1_qs.values('contrato_id').distinct().count()
+        pagas_f1 = (
+            f1_qs.filter(status__in=STATUS_FATURA_FECHADA).values('contrato_id').distinct().count()
+        )
+        pagina_contratos = contratos_list[start:end]
+
+    faturas_qs = FaturaM10.objects.filter(
+        contrato_id__in=[c.id for c in pagina_contratos],
+    ).order_by('contrato_id', 'numero_fatura')
     faturas_por_contrato: dict[int, list[FaturaM10]] = {}
     faturas1_map: dict[int, FaturaM10] = {}
     for f in faturas_qs:
@@ -1114,16 +1208,9 @@ def dashboard_qualidade(
         if f.numero_fatura == 1:
             faturas1_map[f.contrato_id] = f
 
-    total = len(contratos_list)
-    ativos = sum(1 for c in contratos_list if c.status_contrato == 'ATIVO')
-    elegiveis = sum(1 for c in contratos_list if _contrato_elegivel_dinamico(c))
     valor_total = elegiveis * VALOR_BONUS_M10 if ver_bonus else 0
 
     if lente_norm == LENTE_VENCIMENTO:
-        f1_ids = [faturas1_map[c.id].id for c in contratos_list if c.id in faturas1_map]
-        f1_qs = FaturaM10.objects.filter(id__in=f1_ids) if f1_ids else FaturaM10.objects.none()
-        total_f1 = f1_qs.count()
-        pagas_f1 = f1_qs.filter(status__in=STATUS_FATURA_FECHADA).count()
         abertas_f1 = total_f1 - pagas_f1
         taxa = round((abertas_f1 / total_f1 * 100) if total_f1 > 0 else 0, 1)
         kpis: dict[str, Any] = {
@@ -1149,20 +1236,9 @@ def dashboard_qualidade(
             'pode_ver_valor_bonus': ver_bonus,
         }
 
-    try:
-        page = max(1, int(filtros.get('page', 1) or 1))
-    except (TypeError, ValueError):
-        page = 1
-    try:
-        page_size = max(1, min(250, int(filtros.get('page_size', 100) or 100)))
-    except (TypeError, ValueError):
-        page_size = 100
-    start = (page - 1) * page_size
-    end = start + page_size
     total_pages = (total + page_size - 1) // page_size if total else 0
 
     contratos_data: list[dict[str, Any]] = []
-    pagina_contratos = contratos_list[start:end]
     resumo_contatos = montar_resumo_contatos_por_contrato(pagina_contratos)
     for c in pagina_contratos:
         is_elegivel = _contrato_elegivel_dinamico(c)
@@ -1483,7 +1559,6 @@ def dashboard_fpd_estilo_nio(
     ind = (indicador or 'FPD').strip().upper()
     if ind not in ('FPD', 'SPD', 'TPD'):
         ind = 'FPD'
-    numero_fatura = INDICADOR_PARA_NUMERO_FATURA.get(ind, 1)
     try:
         n_meses = max(1, min(12, int(meses or 6)))
     except (TypeError, ValueError):
@@ -1509,41 +1584,6 @@ def dashboard_fpd_estilo_nio(
     })
     meses_ord = meses_disponiveis[-n_meses:] if meses_disponiveis else []
 
-    qs_imp = qs_universo
-    if vend_id:
-        qs_imp = qs_imp.filter(contrato_m10__vendedor_id=vend_id)
-    if seg_filtro:
-        qs_imp = qs_imp.filter(nm_seg__iexact=seg_filtro)
-
-    qs = list(
-        qs_imp.values(
-            'dt_venc_orig',
-            'ds_sit_fatura',
-            'faixa',
-            'nr_dias_atraso',
-            'contrato_m10_id',
-            'numero_fatura_m10',
-        )
-    )
-
-    contrato_ids = {
-        row['contrato_m10_id']
-        for row in qs
-        if row.get('contrato_m10_id')
-    }
-    # status + conferência + vencimento da fatura N no CRM (tratamento)
-    fatura_crm: dict[int, dict[str, Any]] = {}
-    if contrato_ids:
-        for cid, st, conf, venc in FaturaM10.objects.filter(
-            contrato_id__in=contrato_ids,
-            numero_fatura=numero_fatura,
-        ).values_list('contrato_id', 'status', 'conferencia_fpd', 'data_vencimento'):
-            fatura_crm[cid] = {
-                'status': (st or '').upper(),
-                'conferencia_fpd': (conf or '').upper(),
-                'data_vencimento': venc,
-            }
-
     # Pré-seed dos meses da janela (zeros quando o vendedor não tem volume no mês)
     por_mes: dict[str, dict[str, Any]] = {}
     for chave in meses_ord:
@@ -1560,64 +1600,32 @@ def dashboard_fpd_estilo_nio(
             'divergencias_faixa': 0,
         }
 
+    # Pago/aberto (CRM com fallback planilha) vêm do agregado por indicador/mês;
+    # a faixa é recalculada aqui a partir do vencimento guardado.
+    from crm_app.services.qualidade_rollup import registros_fpd
+
     abertas_total = 0
     divergencias_faixa = 0
-    for row in qs:
-        dt = row['dt_venc_orig']
-        if not dt:
-            continue
-        chave = dt.strftime('%Y%m')
-        if chave not in por_mes:
-            continue
+    registros = registros_fpd(ind, meses_ord, vendedor_id=vend_id, nm_seg=seg_filtro)
+    for chave, regs in registros.items():
         bucket = por_mes[chave]
-        bucket['total_fatura'] += 1
-
-        cid = row.get('contrato_m10_id')
-        crm = fatura_crm.get(cid) if cid else None
-        sit = (row['ds_sit_fatura'] or '').strip().upper()
-
-        esta_aberta = False
-        if crm:
-            st_crm = crm['status']
-            conf = crm['conferencia_fpd']
-            if st_crm in STATUS_FATURA_FECHADA:
-                bucket['fatura_paga'] += 1
-                if st_crm == 'PAGO' and conf in ('AGUARDANDO', 'DIVERGENTE'):
-                    bucket['aguard_fpd'] += 1
-            else:
-                esta_aberta = True
-        elif sit == 'FECHADA':
-            bucket['fatura_paga'] += 1
-        elif sit == 'ABERTA':
-            esta_aberta = True
-        else:
-            if (row.get('nr_dias_atraso') or 0) <= 0 and not (row.get('faixa') or '').strip():
-                bucket['fatura_paga'] += 1
-            else:
-                esta_aberta = True
-
-        if not esta_aberta:
-            continue
-
-        # Vencimento preferencial: CRM; fallback planilha
-        venc_vivo = None
-        if crm and crm.get('data_vencimento'):
-            venc_vivo = crm['data_vencimento']
-        else:
-            venc_vivo = dt
+        for r, n in regs:
+            bucket['total_fatura'] += n
+            if not r['aberta']:
+                bucket['fatura_paga'] += n
+                if r['aguard_fpd']:
+                    bucket['aguard_fpd'] += n
+                continue
 
-        dias_vivos = _dias_atraso_por_vencimento(venc_vivo, hoje)
-        fk = _faixa_por_dias_vivos(dias_vivos)
-        bucket['faixas'][fk] = bucket['faixas'].get(fk, 0) + 1
-        abertas_total += 1
+            dias_vivos = _dias_atraso_por_vencimento(date.fromisoformat(r['venc_vivo']), hoje)
+            fk = _faixa_por_dias_vivos(dias_vivos)
+            bucket['faixas'][fk] = bucket['faixas'].get(fk, 0) + n
+            abertas_total += n
 
-        # Confronto com faixa/dias da planilha (snapshot da importação)
-        fk_planilha = _normalizar_faixa_nio(
-            row.get('faixa') or '', row.get('nr_dias_atraso') or 0
-        )
-        if fk_planilha != fk:
-            bucket['divergencias_faixa'] += 1
-            divergencias_faixa += 1
+            # Confronto com faixa/dias da planilha (snapshot da importação)
+            if r['faixa_planilha'] != fk:
+                bucket['divergencias_faixa'] += n
+                divergencias_faixa += n
 
     colunas = []
     for chave in meses_ord:
@@ -1753,7 +1761,6 @@ def dashboard_fpd_por_vendedor(
     ind = (indicador or 'FPD').strip().upper()
     if ind not in ('FPD', 'SPD', 'TPD'):
         ind = 'FPD'
-    numero_fatura = INDICADOR_PARA_NUMERO_FATURA.get(ind, 1)
     try:
         n_meses = max(1, min(12, int(meses or 6)))
     except (TypeError, ValueError):
@@ -1779,87 +1786,42 @@ def dashboard_fpd_por_vendedor(
             'label': _label_mes(mes_iso),
         })
 
-    qs_imp = qs_universo
-    if seg_filtro:
-        qs_imp = qs_imp.filter(nm_seg__iexact=seg_filtro)
-
-    qs = list(
-        qs_imp.values(
-            'dt_venc_orig',
-            'ds_sit_fatura',
-            'faixa',
-            'nr_dias_atraso',
-            'contrato_m10_id',
-            'contrato_m10__vendedor_id',
-            'contrato_m10__vendedor__username',
-            'contrato_m10__vendedor__first_name',
-            'contrato_m10__vendedor__last_name',
-        )
-    )
-
-    contrato_ids = {
-        row['contrato_m10_id']
-        for row in qs
-        if row.get('contrato_m10_id')
-    }
-    fatura_crm: dict[int, dict[str, Any]] = {}
-    if contrato_ids:
-        for cid, st, conf, venc in FaturaM10.objects.filter(
-            contrato_id__in=contrato_ids,
-            numero_fatura=numero_fatura,
-        ).values_list('contrato_id', 'status', 'conferencia_fpd', 'data_vencimento'):
-            fatura_crm[cid] = {
-                'status': (st or '').upper(),
-                'conferencia_fpd': (conf or '').upper(),
-                'data_vencimento': venc,
-            }
-
     def _bucket_vazio() -> dict[str, int]:
         return {'total': 0, 'pagas': 0, 'abertas': 0}
 
     # vendedor_key -> { nome, meses: {YYYYMM: bucket}, totais }
     por_vend: dict[str, dict[str, Any]] = {}
 
-    for row in qs:
-        dt = row.get('dt_venc_orig')
-        if not dt:
-            continue
-        chave_mes = dt.strftime('%Y%m')
-        if chave_mes not in meses_ord:
-            continue
-
-        vid, nome = _nome_vendedor_de_row(row)
-        key = str(vid) if vid is not None else 'sem'
-        block = por_vend.setdefault(
-            key,
-            {
-                'vendedor_id': vid,
-                'vendedor_nome': nome,
-                'meses': {m: _bucket_vazio() for m in meses_ord},
-                'total': 0,
-                'pagas': 0,
-                'abertas': 0,
-            },
-        )
+    from crm_app.services.qualidade_rollup import registros_fpd
 
-        cid = row.get('contrato_m10_id')
-        crm = fatura_crm.get(cid) if cid else None
-        esta_aberta, contou_paga = _classificar_pago_aberto_fpd(
-            crm=crm,
-            sit_planilha=row.get('ds_sit_fatura') or '',
-            nr_dias_atraso=row.get('nr_dias_atraso') or 0,
-            faixa_planilha=row.get('faixa') or '',
-        )
+    for chave_mes, regs in registros_fpd(ind, meses_ord, nm_seg=seg_filtro).items():
+        for r, n in regs:
+            vid, nome = _nome_vendedor_de_row({
+                'vendedor_id': r['vendedor_id'],
+                'contrato_m10__vendedor__username': r['vendedor'],
+            })
+            key = str(vid) if vid is not None else 'sem'
+            block = por_vend.setdefault(
+                key,
+                {
+                    'vendedor_id': vid,
+                    'vendedor_nome': nome,
+                    'meses': {m: _bucket_vazio() for m in meses_ord},
+                    'total': 0,
+                    'pagas': 0,
+                    'abertas': 0,
+                },
+            )
 
-        m_bucket = block['meses'][chave_mes]
-        m_bucket['total'] += 1
-        block['total'] += 1
-        if esta_aberta:
-            m_bucket['abertas'] += 1
-            block['abertas'] += 1
-        elif contou_paga:
-            m_bucket['pagas'] += 1
-            block['pagas'] += 1
+            m_bucket = block['meses'][chave_mes]
+            m_bucket['total'] += n
+            block['total'] += n
+            if r['aberta']:
+                m_bucket['abertas'] += n
+                block['abertas'] += n
+            else:
+                m_bucket['pagas'] += n
+                block['pagas'] += n
 
     linhas: list[dict[str, Any]] = []
     tot_geral = _bucket_vazio()
@@ -3367,9 +3329,9 @@ def buscar_opcoes_nio_fatura(
     venc_local = fatura.data_vencimento or contrato.calcular_vencimento_fatura_n(numero_fatura)
     mes_alvo = _mes_ref_yyyy_mm(venc_local)
 
-    from crm_app.nio_api import consultar_dividas_nio
+    from crm_app.nio_dividas_cache import consultar_dividas_nio_cache
 
-    api_result = consultar_dividas_nio(cpf, offset=0, limit=50, headless=True)
+    api_result = consultar_dividas_nio_cache(cpf, offset=0, limit=50, headless=True, permitir_stale=True)
     invoices = api_result.get('invoices') or []
 
     opcoes: list[dict[str, Any]] = []
@@ -1,8 +1,10 @@
 """
-Rate limiting via DatabaseCache (sem Redis, sem custo).
+Rate limiting via DatabaseCache (sem Redis, sem custo) e token bucket em memória
+para chamadas de saída (APIs externas) feitas por várias threads.
 """
 from __future__ import annotations
 
+import threading
 import time
 from typing import Optional
 
@@ -35,3 +37,49 @@ def permitir_requisicao(
     ttl_restante = int(periodo_segundos - (agora - dados["inicio"])) or periodo_segundos
     cache.set(cache_key, dados, ttl_restante)
     return True, None
+
+
+class LimitadorTaxa:
+    """
+    Token bucket em memória (por processo), seguro entre threads.
+
+    `aguardar()` bloqueia até haver ficha; `por_segundo` <= 0 desliga o limite.
+    """
+
+    def __init__(self, por_segundo: float, rajada: Optional[int] = None):
+        self.por_segundo = float(por_segundo or 0)
+        self.rajada = max(1, int(rajada or max(1, round(self.por_segundo))))
+        self._fichas = float(self.rajada)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self) -> float:
+        """Consome uma ficha; devolve quantos segundos esperou."""
+        if self.por_segundo <= 0:
+            return 0.0
+        esperado = 0.0
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.rajada, self._fichas + (agora - self._ultimo) * self.por_segundo)
+                self._ultimo = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return esperado
+                falta = (1 - self._fichas) / self.por_segundo
+            time.sleep(falta)
+            esperado += falta
+
+
+_limitadores: dict[str, LimitadorTaxa] = {}
+_limitadores_lock = threading.Lock()
+
+
+def limitador_por_host(host: str, por_segundo: float) -> LimitadorTaxa:
+    """Limitador compartilhado pelas threads do processo para o mesmo host."""
+    with _limitadores_lock:
+        limitador = _limitadores.get(host)
+        if limitador is None or limitador.por_segundo != float(por_segundo or 0):
+            limitador = LimitadorTaxa(por_segundo)
+            _limitadores[host] = limitador
+        return limitador
@@ -0,0 +1,179 @@
+"""
+Retenção das tabelas de log e das filas PostgreSQL.
+
+As filas (`WhatsappWebhookFila`, `PapJobFila`) guardavam os jobs concluídos para sempre e o
+índice (status, prioridade, criado_em) crescia junto. Agora:
+- `arquivar_filas` move o que terminou (concluído/erro) há mais de FILA_ARQUIVAR_APOS_HORAS
+  para `FilaJobHistorico`; o claim ainda usa o índice parcial das pendentes;
+- `podar` apaga, em lotes pela PK, as linhas mais velhas que RETENCAO_DIAS[modelo] dos logs
+  que só crescem. Dias = 0 mantém a tabela inteira (auditoria de venda e eventos da esteira
+  por padrão). Nas filas (`FILAS_PODA`) só entram jobs terminados: um pendente/processando
+  velho (fila parada, worker fora do ar) continua lá para ser processado ou recuperado.
+
+Particionamento nativo por mês não foi adotado: exige PK composta (id, data) nas tabelas
+particionadas, o que o ORM/FKs do projeto não acompanham; a poda em lotes pela PK mantém o
+tamanho sob controle sem reescrever as tabelas.
+
+Roda toda madrugada no scheduler (`aplicar_retencao`) e sob demanda em
+`manage.py aplicar_retencao [--dry-run]`.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# modelo -> campo de data. Os dias vêm de settings.RETENCAO_DIAS[modelo].
+TABELAS_PODA = {
+    'WhatsappWebhookFila': 'criado_em',
+    'PapJobFila': 'criado_em',
+    'JobFila': 'criado_em',
+    'LoteFolhaPdf': 'criado_em',
+    'CacheDividasNio': 'consultado_em',
+    'FilaJobHistorico': 'arquivado_em',
+    'HistoricoConsultaAutomacaoPAP': 'criado_em',
+    'LogEnvioPerformance': 'data_hora',
+    'HistoricoAtendimentoIACliente': 'criado_em',
+    'VendaEsteiraEvento': 'criado_em',
+    'HistoricoAlteracaoVenda': 'data_alteracao',
+    'EstatisticaBotWhatsApp': 'data_envio',
+}
+
+# Filas com status: a poda só apaga o que já terminou (concluído/erro).
+FILAS_PODA = frozenset({'WhatsappWebhookFila', 'PapJobFila', 'JobFila'})
+
+
+def _lote() -> int:
+    return max(1, int(getattr(settings, 'RETENCAO_LOTE', 5000)))
+
+
+def dias_retencao(modelo: str) -> int:
+    return int((getattr(settings, 'RETENCAO_DIAS', {}) or {}).get(modelo, 0) or 0)
+
+
+# ---------------------------------------------------------------------------
+# Arquivamento das filas
+# ---------------------------------------------------------------------------
+
+def _filas():
+    from crm_app.models import FilaJobHistorico
+    from crm_app.pap_job_fila import PapJobFila
+    from crm_app.whatsapp_webhook_fila import WhatsappWebhookFila
+
+    return (
+        (FilaJobHistorico.FILA_WEBHOOK, WhatsappWebhookFila),
+        (FilaJobHistorico.FILA_PAP, PapJobFila),
+    )
+
+
+def _terminados(modelo, limite):
+    return modelo.objects.filter(
+        status__in=(modelo.STATUS_CONCLUIDO, modelo.STATUS_ERRO),
+    ).filter(
+        Q(concluido_em__lt=limite) | Q(concluido_em__isnull=True, criado_em__lt=limite)
+    )
+
+
+def arquivar_filas(*, dry_run: bool = False, horas: Optional[int] = None) -> dict[str, int]:
+    """Move jobs terminados há mais de `horas` para FilaJobHistorico (em lotes); retorna {fila: n}."""
+    from crm_app.models import FilaJobHistorico
+
+    horas = int(horas if horas is not None else getattr(settings, 'FILA_ARQUIVAR_APOS_HORAS', 24))
+    limite = timezone.now() - timedelta(hours=horas)
+    resultado = {}
+    for fila, modelo in _filas():
+        qs = _terminados(modelo, limite)
+        if dry_run:
+            resultado[fila] = qs.count()
+            continue
+        total = 0
+        while True:
+            with transaction.atomic():
+                jobs = list(qs.order_by('pk').select_for_update(skip_locked=True)[:_lote()])
+                if not jobs:
+                    break
+                FilaJobHistorico.objects.bulk_create([
+                    FilaJobHistorico(
+                        fila=fila,
+                        job_id=job.pk,
+                        tipo=getattr(job, 'tipo', ''),
+                        telefone=job.telefone,
+                        status=job.status,
+                        prioridade=job.prioridade,
+                        tentativas=job.tentativas,
+                        erro=job.erro,
+                        payload=job.payload,
+                        criado_em=job.criado_em,
+                        iniciado_em=job.iniciado_em,
+                        concluido_em=job.concluido_em,
+                    )
+                    for job in jobs
+                ])
+                modelo.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+            total += len(jobs)
+        resultado[fila] = total
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Poda por idade
+# ---------------------------------------------------------------------------
+
+def podar(
+    modelos: Optional[list[str]] = None,
+    *,
+    dry_run: bool = False,
+    max_lotes: Optional[int] = None,
+) -> dict[str, int]:
+    """Apaga (em lotes pela PK) as linhas mais velhas que a retenção de cada modelo.
+
+    Nas filas só apaga jobs terminados; pendentes e em processamento ficam.
+    """
+    from django.apps import apps
+
+    resultado = {}
+    for nome in modelos or list(TABELAS_PODA):
+        dias = dias_retencao(nome)
+        if dias <= 0:
+            continue
+        modelo = apps.get_model('crm_app', nome)
+        campo = TABELAS_PODA[nome]
+        qs = modelo.objects.filter(**{f'{campo}__lt': timezone.now() - timedelta(days=dias)})
+        if nome in FILAS_PODA:
+            qs = qs.filter(status__in=(modelo.STATUS_CONCLUIDO, modelo.STATUS_ERRO))
+        if dry_run:
+            resultado[nome] = qs.count()
+            continue
+        total = lotes = 0
+        while max_lotes is None or lotes < max_lotes:
+            ids = list(qs.order_by('pk').values_list('pk', flat=True)[:_lote()])
+            if not ids:
+                break
+            modelo.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+            lotes += 1
+        resultado[nome] = total
+    return resultado
+
+
+def aplicar_retencao(*, dry_run: bool = False) -> dict[str, Any]:
+    """Arquiva as filas e poda os logs; usado pelo scheduler e pelo comando de gestão."""
+    inicio = time.perf_counter()
+    arquivados = arquivar_filas(dry_run=dry_run)
+    podados = podar(dry_run=dry_run)
+    resultado = {
+        'arquivados': arquivados,
+        'podados': podados,
+        'total': sum(arquivados.values()) + sum(podados.values()),
+        'duracao_ms': int((time.perf_counter() - inicio) * 1000),
+    }
+    logger.info('[RETENCAO]%s %s', ' (dry-run)' if dry_run else '', resultado)
+    return resultado
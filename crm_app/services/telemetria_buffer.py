@@ -0,0 +1,235 @@
+"""
+Telemetria do bot em buffer: estatística de comando, eventos do funil e custo do Número B.
+
+Antes cada comando do bot fazia `_buscar_usuario_por_telefone` + `EstatisticaBotWhatsApp.create`,
+cada passo do funil um `FunilVendaWppEvento.create` e cada envio ao cliente um
+`HistoricoCustoWhatsAppOficial.create` — tudo no caminho da resposta do WhatsApp.
+Agora `registrar` só enfileira em memória; uma thread daemon grava em `bulk_create` quando a
+fila chega a TELEMETRIA_LOTE itens ou a cada TELEMETRIA_FLUSH_SEG. Na gravação:
+- vendedores das estatísticas são resolvidos de uma vez (uma leitura dos telefones ativos);
+- eventos de funil cuja tentativa sumiu são descartados (evita quebrar o lote por FK);
+- custo usa as tarifas lidas uma vez por lote;
+- estatísticas e eventos de funil somam no agregado diário (`telemetria_rollup`) na mesma
+  transação do bulk_create.
+
+Garantias:
+- `atexit` descarrega o que estiver pendente no encerramento do processo;
+- dentro de um bloco atomic a gravação é imediata (a linha acompanha a transação de quem
+  chamou e a thread não enxergaria linhas ainda não commitadas);
+- acima de TELEMETRIA_MAX_PENDENTES (banco fora) os mais antigos são descartados com aviso.
+
+Os campos auto_now_add (data_envio/criado_em) ficam com o momento da gravação — no máximo
+TELEMETRIA_FLUSH_SEG depois do evento.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from crm_app.services import telemetria_rollup
+
+logger = logging.getLogger(__name__)
+
+TIPO_ESTATISTICA_BOT = "estatistica_bot"
+TIPO_FUNIL_EVENTO = "funil_evento"
+TIPO_CUSTO_OFICIAL = "custo_oficial"
+
+
+def buffer_habilitado() -> bool:
+    return bool(getattr(settings, "TELEMETRIA_BUFFER_ENABLED", True))
+
+
+# --- Gravação em lote -------------------------------------------------------------------
+
+
+def _gravar_estatisticas(itens: List[Dict[str, Any]]) -> int:
+    from crm_app.models import EstatisticaBotWhatsApp
+    from crm_app.whatsapp_webhook_handler import _resolver_vendedores_por_telefone
+
+    sem_vendedor = {i["telefone"] for i in itens if "vendedor_id" not in i}
+    vendedores = _resolver_vendedores_por_telefone(sem_vendedor) if sem_vendedor else {}
+    objs = [
+        EstatisticaBotWhatsApp(
+            telefone=i["telefone"],
+            vendedor_id=i["vendedor_id"] if "vendedor_id" in i else vendedores.get(i["telefone"]),
+            comando=i["comando"],
+        )
+        for i in itens
+    ]
+    with transaction.atomic():
+        EstatisticaBotWhatsApp.objects.bulk_create(objs, batch_size=_tamanho_lote())
+        if telemetria_rollup.rollup_ativo():
+            telemetria_rollup.incrementar_estatisticas(objs)
+    return len(objs)
+
+
+def _gravar_eventos_funil(itens: List[Dict[str, Any]]) -> int:
+    from crm_app.models import FunilVendaWppEvento, FunilVendaWppTentativa
+
+    existentes = set(
+        FunilVendaWppTentativa.objects.filter(
+            pk__in={i["tentativa_id"] for i in itens}
+        ).values_list("pk", flat=True)
+    )
+    objs = [FunilVendaWppEvento(**i) for i in itens if i["tentativa_id"] in existentes]
+    if len(objs) < len(itens):
+        logger.info("[Telemetria] %s evento(s) de funil sem tentativa descartado(s)", len(itens) - len(objs))
+    with transaction.atomic():
+        FunilVendaWppEvento.objects.bulk_create(objs, batch_size=_tamanho_lote())
+        if telemetria_rollup.rollup_ativo():
+            telemetria_rollup.incrementar_eventos_funil(objs)
+    return len(objs)
+
+
+def _gravar_custos(itens: List[Dict[str, Any]]) -> int:
+    from crm_app.models import HistoricoCustoWhatsAppOficial
+    from crm_app.services.whatsapp.custo_oficial import montar_historico_custo, obter_tarifas
+
+    tarifas = obter_tarifas()
+    objs = [HistoricoCustoWhatsAppOficial(**montar_historico_custo(tarifas=tarifas, **i)) for i in itens]
+    HistoricoCustoWhatsAppOficial.objects.bulk_create(objs, batch_size=_tamanho_lote())
+    return len(objs)
+
+
+_GRAVADORES: Dict[str, Callable[[List[Dict[str, Any]]], int]] = {
+    TIPO_ESTATISTICA_BOT: _gravar_estatisticas,
+    TIPO_FUNIL_EVENTO: _gravar_eventos_funil,
+    TIPO_CUSTO_OFICIAL: _gravar_custos,
+}
+
+
+def gravar(tipo: str, itens: List[Dict[str, Any]]) -> int:
+    """Grava os itens de um tipo agora; falha só em log (telemetria nunca derruba o bot)."""
+    if not itens:
+        return 0
+    try:
+        return _GRAVADORES[tipo](itens)
+    except Exception:
+        logger.exception("[Telemetria] Falha ao gravar %s item(ns) de %s", len(itens), tipo)
+        return 0
+
+
+# --- Buffer -----------------------------------------------------------------------------
+
+
+def _tamanho_lote() -> int:
+    return max(1, int(getattr(settings, "TELEMETRIA_LOTE", 200)))
+
+
+class BufferTelemetria:
+    """Fila em memória por processo, descarregada por uma thread daemon."""
+
+    def __init__(self, tamanho_lote: int, intervalo_seg: float, max_pendentes: int):
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.intervalo_seg = max(0.05, intervalo_seg)
+        self.max_pendentes = max(self.tamanho_lote, max_pendentes)
+        self.descartados = 0
+        self._fila: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._fila)
+
+    def adicionar(self, tipo: str, dados: Dict[str, Any]) -> None:
+        with self._lock:
+            self._fila.append((tipo, dados))
+            excesso = len(self._fila) - self.max_pendentes
+            for _ in range(max(0, excesso)):
+                self._fila.popleft()
+            if excesso > 0:
+                self.descartados += excesso
+            cheio = len(self._fila) >= self.tamanho_lote
+        if excesso > 0:
+            logger.warning(
+                "[Telemetria] Buffer cheio (%s): %s evento(s) antigo(s) descartado(s)",
+                self.max_pendentes, excesso,
+            )
+        if cheio:
+            self._acordar.set()
+
+    def descarregar(self) -> int:
+        """Grava tudo o que está na fila; retorna quantos itens foram gravados."""
+        with self._flush_lock:
+            with self._lock:
+                pendentes = list(self._fila)
+                self._fila.clear()
+            por_tipo: Dict[str, List[Dict[str, Any]]] = {}
+            for tipo, dados in pendentes:
+                por_tipo.setdefault(tipo, []).append(dados)
+            return sum(gravar(tipo, itens) for tipo, itens in por_tipo.items())
+
+    def iniciar(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="telemetria-flush", daemon=True)
+        self._thread.start()
+
+    def encerrar(self) -> None:
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.intervalo_seg + 5)
+        self.descarregar()
+
+    def _loop(self) -> None:
+        import django.db
+
+        while not self._parar.is_set():
+            self._acordar.wait(self.intervalo_seg)
+            self._acordar.clear()
+            if self._parar.is_set():
+                break
+            try:
+                django.db.close_old_connections()
+                gravados = self.descarregar()
+                if gravados:
+                    logger.debug("[Telemetria] %s evento(s) gravado(s)", gravados)
+            except Exception:
+                logger.exception("[Telemetria] Erro no flush em background")
+            finally:
+                django.db.close_old_connections()
+
+
+_buffer: Optional[BufferTelemetria] = None
+_buffer_lock = threading.Lock()
+
+
+def obter_buffer() -> BufferTelemetria:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = BufferTelemetria(
+                    tamanho_lote=_tamanho_lote(),
+                    intervalo_seg=float(getattr(settings, "TELEMETRIA_FLUSH_SEG", 2.0)),
+                    max_pendentes=int(getattr(settings, "TELEMETRIA_MAX_PENDENTES", 20000)),
+                )
+                buffer.iniciar()
+                atexit.register(buffer.encerrar)
+                _buffer = buffer
+    return _buffer
+
+
+def registrar(tipo: str, **dados: Any) -> None:
+    """Enfileira um evento de telemetria (grava na hora se o buffer estiver desligado ou em atomic)."""
+    from django.db import connection
+
+    if not buffer_habilitado() or connection.in_atomic_block:
+        gravar(tipo, [dados])
+        return
+    obter_buffer().adicionar(tipo, dados)
+
+
+def descarregar() -> int:
+    """Flush imediato do buffer do processo (comandos de gestão, testes, shutdown)."""
+    return _buffer.descarregar() if _buffer is not None else 0
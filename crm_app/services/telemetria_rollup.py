@@ -0,0 +1,222 @@
+"""
+Agregados diários da telemetria do bot (`RollupEstatisticaBotDia`, `RollupFunilVendaWppDia`).
+
+`EstatisticasBotWhatsAppView` agregava as linhas brutas de `EstatisticaBotWhatsApp` dos
+últimos N dias a cada carga da página (um Count por comando, agrupado por vendedor).
+Agora lê contagens por (dia, vendedor, comando); o resumo do funil lê contagens de
+`FunilVendaWppEvento` por (dia, estágio, tipo de evento, status da finalização).
+
+Manutenção incremental: a gravação em lote do buffer de telemetria (`telemetria_buffer`)
+soma as linhas recém-inseridas ao agregado na mesma transação. A soma é
+`UPDATE total = total + n` e, se a linha do dia ainda não existe, um INSERT — duas
+gravações concorrentes podem criar linhas repetidas para a mesma chave, por isso a leitura
+sempre faz Sum (linhas repetidas somam certo). `manage.py reconstruir_rollup_telemetria`
+refaz dias inteiros a partir das tabelas brutas (primeiro deploy / correções); depois do
+backfill as tabelas brutas podem ser podadas por idade sem afetar os relatórios.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def rollup_ativo() -> bool:
+    return bool(getattr(settings, 'TELEMETRIA_ROLLUP_ENABLED', True))
+
+
+def _dia(momento: Optional[datetime]) -> date:
+    return timezone.localdate(momento) if momento else timezone.localdate()
+
+
+def _status_final(tipo_evento: str, payload: Any) -> str:
+    from crm_app.models import FunilVendaWppEvento
+
+    if tipo_evento != FunilVendaWppEvento.TIPO_STATUS or not isinstance(payload, dict):
+        return ''
+    return str(payload.get('status') or '')[:20]
+
+
+def _somar(modelo, contagens: Counter) -> None:
+    for chave, n in contagens.items():
+        filtro = dict(chave)
+        if not modelo.objects.filter(**filtro).update(total=F('total') + n):
+            modelo.objects.create(total=n, **filtro)
+
+
+# ---------------------------------------------------------------------------
+# Incremento (chamado pela gravação em lote, na mesma transação do bulk_create)
+# ---------------------------------------------------------------------------
+
+def incrementar_estatisticas(objs: Iterable[Any]) -> None:
+    from crm_app.models import RollupEstatisticaBotDia
+
+    contagens = Counter(
+        (('dia', _dia(o.data_envio)), ('vendedor_id', o.vendedor_id), ('comando', o.comando))
+        for o in objs
+    )
+    _somar(RollupEstatisticaBotDia, contagens)
+
+
+def incrementar_eventos_funil(objs: Iterable[Any]) -> None:
+    from crm_app.models import RollupFunilVendaWppDia
+
+    contagens = Counter(
+        (
+            ('dia', _dia(o.criado_em)),
+            ('funil_estagio', o.funil_estagio),
+            ('tipo_evento', o.tipo_evento),
+            ('status_final', _status_final(o.tipo_evento, o.payload)),
+        )
+        for o in objs
+    )
+    _somar(RollupFunilVendaWppDia, contagens)
+
+
+# ---------------------------------------------------------------------------
+# Backfill
+# ---------------------------------------------------------------------------
+
+def _no_intervalo(qs, campo: str, dia_inicio: Optional[date], dia_fim: Optional[date]):
+    if dia_inicio:
+        qs = qs.filter(**{f'{campo}__gte': dia_inicio})
+    if dia_fim:
+        qs = qs.filter(**{f'{campo}__lte': dia_fim})
+    return qs
+
+
+def _reconstruir_estatisticas(dia_inicio: Optional[date], dia_fim: Optional[date]) -> int:
+    from crm_app.models import EstatisticaBotWhatsApp, RollupEstatisticaBotDia
+
+    _no_intervalo(RollupEstatisticaBotDia.objects.all(), 'dia', dia_inicio, dia_fim).delete()
+    brutas = _no_intervalo(
+        EstatisticaBotWhatsApp.objects.order_by().annotate(_dia=TruncDate('data_envio')),
+        '_dia', dia_inicio, dia_fim,
+    )
+    objs = [
+        RollupEstatisticaBotDia(
+            dia=row['_dia'], vendedor_id=row['vendedor_id'], comando=row['comando'], total=row['n'],
+        )
+        for row in brutas.values('_dia', 'vendedor_id', 'comando').annotate(n=Count('id'))
+    ]
+    RollupEstatisticaBotDia.objects.bulk_create(objs, batch_size=1000)
+    return len(objs)
+
+
+def _reconstruir_funil(dia_inicio: Optional[date], dia_fim: Optional[date]) -> int:
+    from crm_app.models import FunilVendaWppEvento, RollupFunilVendaWppDia
+
+    _no_intervalo(RollupFunilVendaWppDia.objects.all(), 'dia', dia_inicio, dia_fim).delete()
+    brutas = _no_intervalo(
+        FunilVendaWppEvento.objects.order_by().annotate(_dia=TruncDate('criado_em')),
+        '_dia', dia_inicio, dia_fim,
+    )
+    contagens: Counter = Counter()
+    agrupadas = (
+        brutas.exclude(tipo_evento=FunilVendaWppEvento.TIPO_STATUS)
+        .values('_dia', 'funil_estagio', 'tipo_evento')
+        .annotate(n=Count('id'))
+    )
+    for row in agrupadas:
+        contagens[(row['_dia'], row['funil_estagio'], row['tipo_evento'], '')] += row['n']
+    # status_final vem do payload das finalizações (poucas linhas): lido em Python
+    finalizacoes = brutas.filter(tipo_evento=FunilVendaWppEvento.TIPO_STATUS).values_list(
+        '_dia', 'funil_estagio', 'tipo_evento', 'payload',
+    )
+    for dia, estagio, tipo, payload in finalizacoes.iterator():
+        contagens[(dia, estagio, tipo, _status_final(tipo, payload))] += 1
+    objs = [
+        RollupFunilVendaWppDia(dia=d, funil_estagio=e, tipo_evento=t, status_final=st, total=n)
+        for (d, e, t, st), n in contagens.items()
+    ]
+    RollupFunilVendaWppDia.objects.bulk_create(objs, batch_size=1000)
+    return len(objs)
+
+
+def reconstruir(dia_inicio: Optional[date] = None, dia_fim: Optional[date] = None) -> dict[str, Any]:
+    """Refaz os agregados dos dias [dia_inicio, dia_fim] (sem limites: todo o histórico bruto)."""
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        resultado = {
+            'estatisticas': _reconstruir_estatisticas(dia_inicio, dia_fim),
+            'funil': _reconstruir_funil(dia_inicio, dia_fim),
+        }
+    resultado['duracao_ms'] = int((time.perf_counter() - inicio) * 1000)
+    logger.info('[ROLLUP TELEMETRIA] Reconstruído %s..%s: %s', dia_inicio, dia_fim, resultado)
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Leitura
+# ---------------------------------------------------------------------------
+
+def dia_inicial(dias: int) -> date:
+    """Primeiro dia da janela "últimos N dias" (o dia de N dias atrás entra inteiro)."""
+    return timezone.localdate() - timedelta(days=dias)
+
+
+def estatisticas_bot(dias: int, comandos: list[str]) -> dict[str, Any]:
+    """Contagens do painel de estatísticas do bot a partir do agregado diário."""
+    from crm_app.models import RollupEstatisticaBotDia
+
+    qs = RollupEstatisticaBotDia.objects.filter(dia__gte=dia_inicial(dias))
+    por_comando = {
+        row['comando']: row['n']
+        for row in qs.values('comando').annotate(n=Sum('total')).order_by('comando')
+    }
+    comandos_ordem = comandos + sorted(c for c in por_comando if c not in comandos)
+    annotate_kwargs = {'n': Sum('total')}
+    for cmd in comandos_ordem:
+        annotate_kwargs[f'cmd_{cmd}'] = Sum('total', filter=Q(comando=cmd))
+    por_vendedor = list(
+        qs.values(
+            'vendedor__id', 'vendedor__username', 'vendedor__first_name', 'vendedor__last_name',
+        ).annotate(**annotate_kwargs).order_by('-n')
+    )
+    for row in por_vendedor:
+        row['total'] = row.pop('n')
+    return {'comandos': comandos_ordem, 'por_comando': por_comando, 'por_vendedor': por_vendedor}
+
+
+def resumo_funil(dias: int) -> dict[str, Any]:
+    """Eventos e finalizações por estágio do funil nos últimos N dias."""
+    from crm_app.models import FunilVendaWppEvento, FunilVendaWppTentativa, RollupFunilVendaWppDia
+
+    estagios = {
+        codigo: {'estagio': codigo, 'nome': nome, 'eventos': 0, 'por_tipo': {}, 'finalizadas': {}}
+        for codigo, nome in FunilVendaWppTentativa.FUNIL_ESTAGIO_CHOICES
+    }
+    finalizadas: Counter = Counter()
+    linhas = (
+        RollupFunilVendaWppDia.objects.filter(dia__gte=dia_inicial(dias))
+        .values('funil_estagio', 'tipo_evento', 'status_final')
+        .annotate(n=Sum('total'))
+    )
+    for row in linhas:
+        estagio = estagios.setdefault(row['funil_estagio'], {
+            'estagio': row['funil_estagio'], 'nome': row['funil_estagio'],
+            'eventos': 0, 'por_tipo': {}, 'finalizadas': {},
+        })
+        estagio['eventos'] += row['n']
+        estagio['por_tipo'][row['tipo_evento']] = estagio['por_tipo'].get(row['tipo_evento'], 0) + row['n']
+        if row['tipo_evento'] == FunilVendaWppEvento.TIPO_STATUS and row['status_final']:
+            estagio['finalizadas'][row['status_final']] = (
+                estagio['finalizadas'].get(row['status_final'], 0) + row['n']
+            )
+            finalizadas[row['status_final']] += row['n']
+    return {
+        'periodo_dias': dias,
+        'data_inicio': dia_inicial(dias).isoformat(),
+        'estagios': list(estagios.values()),
+        'finalizadas': dict(finalizadas),
+    }
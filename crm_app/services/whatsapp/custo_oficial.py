@@ -89,13 +89,15 @@ def estimar_custo(
     tipo_envio: str,
     template_name: Optional[str] = None,
     sucesso: bool = True,
+    tarifas: Optional[dict[str, Decimal]] = None,
 ) -> tuple[Decimal, str]:
     if not sucesso:
         return Decimal("0.0000"), classificar_envio(
             tipo_envio=tipo_envio, template_name=template_name
         )
     categoria = classificar_envio(tipo_envio=tipo_envio, template_name=template_name)
-    tarifas = obter_tarifas()
+    if tarifas is None:
+        tarifas = obter_tarifas()
     return tarifas.get(categoria, Decimal("0")), categoria
 
 
@@ -115,6 +117,37 @@ def _extrair_message_id(resp: Any) -> str:
     return ""
 
 
+def montar_historico_custo(
+    *,
+    telefone: str,
+    tipo_envio: str,
+    sucesso: bool,
+    message_id: str = "",
+    template_name: str = "",
+    origem: str = "",
+    erro: str = "",
+    tarifas: Optional[dict[str, Decimal]] = None,
+) -> dict[str, Any]:
+    """Campos de HistoricoCustoWhatsAppOficial com categoria e custo estimado."""
+    custo, categoria = estimar_custo(
+        tipo_envio=tipo_envio,
+        template_name=template_name,
+        sucesso=sucesso,
+        tarifas=tarifas,
+    )
+    return {
+        "telefone": (telefone or "")[:30],
+        "tipo_envio": (tipo_envio or TIPO_TEXTO)[:20],
+        "template_name": (template_name or "")[:120],
+        "categoria": categoria,
+        "custo_estimado_brl": custo,
+        "sucesso": bool(sucesso),
+        "message_id": (message_id or "")[:120],
+        "origem": (origem or "")[:60],
+        "erro": (erro or "")[:500],
+    }
+
+
 def registrar_envio_oficial(
     *,
     telefone: str,
@@ -125,24 +158,18 @@ def registrar_envio_oficial(
     origem: str = "",
     erro: str = "",
 ) -> None:
-    """Persiste histórico + custo estimado (não bloqueia o fluxo de envio)."""
+    """Enfileira histórico + custo estimado no buffer de telemetria (não bloqueia o envio)."""
     try:
-        from crm_app.models import HistoricoCustoWhatsAppOficial
+        from crm_app.services.telemetria_buffer import TIPO_CUSTO_OFICIAL, registrar
 
-        custo, categoria = estimar_custo(
+        registrar(
+            TIPO_CUSTO_OFICIAL,
+            telefone=str(telefone or ""),
             tipo_envio=tipo_envio,
-            template_name=template_name,
-            sucesso=sucesso,
-        )
-        HistoricoCustoWhatsAppOficial.objects.create(
-            telefone=(telefone or "")[:30],
-            tipo_envio=(tipo_envio or TIPO_TEXTO)[:20],
-            template_name=(template_name or "")[:120],
-            categoria=categoria,
-            custo_estimado_brl=custo,
             sucesso=bool(sucesso),
             message_id=_extrair_message_id(resposta),
-            origem=(origem or "")[:60],
+            template_name=template_name or "",
+            origem=origem or "",
             erro=(erro or str(resposta) if not sucesso and resposta else "")[:500],
         )
     except Exception:
@@ -6,13 +6,17 @@ def buscar_fatura_nio(cliente_id):
 Serviço de busca de faturas com rastreamento, métricas e retry automático
 """
 import time
-from datetime import datetime, date
 from decimal import Decimal
-from typing import Dict, List, Optional
-from django.db import transaction
+from typing import Callable, Dict, Iterable, List, Optional
 from django.utils import timezone
 from crm_app.models import FaturaM10, HistoricoBuscaFatura, ContratoM10
-from crm_app.services_nio import buscar_fatura_nio_por_cpf, buscar_todas_faturas_nio_por_cpf
+from crm_app.services.busca_faturas_paralela import (
+    aquecer_token_nio,
+    executar_em_paralelo,
+    resumo_latencias,
+    workers_padrao,
+)
+from crm_app.services.nio_match_service import STATUS_MATCH, consultar_e_decidir_contrato
 import logging
 
 logger = logging.getLogger(__name__)
@@ -61,8 +65,9 @@ class BuscaFaturaService:
     
     def buscar_fatura_individual(self, fatura: FaturaM10, origem: str = 'INDIVIDUAL') -> Dict:
         """
-        Busca uma fatura individual com rastreamento completo
-        
+        Busca uma fatura individual com rastreamento completo (match via API Nio
+        do contrato inteiro; devolve a decisão da fatura pedida)
+
         Returns:
             Dict com: {
                 'sucesso': bool,
@@ -78,69 +83,58 @@ class BuscaFaturaService:
             'tempo': 0,
             'erro': None
         }
-        
+
         try:
-            # Incrementar tentativas
+            retorno = consultar_e_decidir_contrato(fatura.contrato)
+            decisao = next(
+                (d for d in retorno.get('decisoes') or [] if d.get('fatura_id') == fatura.id),
+                None,
+            )
+            tempo_decorrido = time.time() - inicio
+            self.tempos_execucao.append(tempo_decorrido)
+            fatura.refresh_from_db()
             fatura.tentativas_busca += 1
             fatura.origem_busca = origem
             fatura.ultima_busca_em = timezone.now()
-            
-            # Buscar no Nio
-            cpf = fatura.contrato.cpf_cliente
-            dados = buscar_fatura_nio_por_cpf(cpf, incluir_pdf=False)
-            
-            tempo_decorrido = time.time() - inicio
-            fatura.tempo_busca_segundos = Decimal(str(tempo_decorrido))
-            self.tempos_execucao.append(tempo_decorrido)
-            
-            if dados and not dados.get('sem_dividas'):
-                # Sucesso - atualizar fatura
-                if dados.get('valor'):
-                    fatura.valor = dados['valor']
-                if dados.get('data_vencimento'):
-                    fatura.data_vencimento = dados['data_vencimento']
-                if dados.get('codigo_pix'):
-                    fatura.codigo_pix = dados['codigo_pix']
-                if dados.get('codigo_barras'):
-                    fatura.codigo_barras = dados['codigo_barras']
-                if dados.get('pdf_url'):
-                    fatura.pdf_url = dados['pdf_url']
-                
+            fatura.tempo_busca_segundos = Decimal(str(round(tempo_decorrido, 3)))
+
+            if decisao and decisao.get('status') == STATUS_MATCH:
                 fatura.status_busca = 'SUCESSO'
                 fatura.erro_busca = None
-                
                 resultado['sucesso'] = True
-                resultado['dados'] = dados
+                resultado['dados'] = decisao.get('nio')
             else:
-                # Sem dados disponíveis
-                mensagem_erro = dados.get('mensagem', 'Sem dados disponíveis') if dados else 'Erro na API'
+                mensagem_erro = (decisao or {}).get('motivo') or retorno.get('motivo') or 'Sem dados disponíveis'
                 fatura.status_busca = 'ERRO'
-                fatura.erro_busca = mensagem_erro
+                fatura.erro_busca = mensagem_erro[:500]
                 resultado['erro'] = mensagem_erro
-            
+
             resultado['tempo'] = tempo_decorrido
-            fatura.save()
-            
+            fatura.save(update_fields=[
+                'tentativas_busca', 'origem_busca', 'ultima_busca_em',
+                'tempo_busca_segundos', 'status_busca', 'erro_busca',
+            ])
+
         except Exception as e:
             tempo_decorrido = time.time() - inicio
             erro_msg = str(e)
-            
+
             fatura.status_busca = 'ERRO'
             fatura.erro_busca = erro_msg
-            fatura.tempo_busca_segundos = Decimal(str(tempo_decorrido))
+            fatura.tempo_busca_segundos = Decimal(str(round(tempo_decorrido, 3)))
             fatura.save()
-            
+
             resultado['erro'] = erro_msg
             resultado['tempo'] = tempo_decorrido
-            
+
             logger.error(f"Erro ao buscar fatura {fatura.id}: {e}")
-        
+
         return resultado
-    
+
     def buscar_faturas_contrato(self, contrato: ContratoM10, origem: str = 'SAFRA') -> Dict:
         """
-        Busca todas as faturas disponíveis de um contrato com matching por vencimento
-        
+        Busca as faturas abertas de um contrato (match da API Nio por vencimento/valor)
+
         Returns:
             Dict com estatísticas da busca
         """
@@ -150,112 +144,89 @@ class BuscaFaturaService:
             'erro': 0,
             'nao_disponiveis': 0,
         }
-        
+
         if not contrato.cpf_cliente:
             return stats
-        
-        hoje = date.today()
-        
-        # Buscar faturas pendentes disponíveis
-        faturas = FaturaM10.objects.filter(
-            contrato=contrato,
-            status__in=['NAO_PAGO', 'ATRASADO', 'AGUARDANDO']
-        ).filter(
-            models.Q(data_disponibilidade__isnull=True) | 
-            models.Q(data_disponibilidade__lte=hoje)
-        ).order_by('numero_fatura')
-        
-        if not faturas.exists():
+
+        retorno = consultar_e_decidir_contrato(contrato)
+        return self._stats_do_retorno(retorno, stats)
+
+    @staticmethod
+    def _stats_do_retorno(retorno: Dict, stats: Dict) -> Dict:
+        if retorno.get('status') == 'AINDA_NAO_DISPONIVEL':
+            stats['nao_disponiveis'] += 1
             return stats
-        
-        try:
-            # Buscar todas as faturas no Nio de uma vez
-            faturas_nio = buscar_todas_faturas_nio_por_cpf(contrato.cpf_cliente, incluir_pdf=False)
-            
-            if not faturas_nio:
-                # Marcar todas como erro
-                for fatura in faturas:
-                    fatura.tentativas_busca += 1
-                    fatura.origem_busca = origem
-                    fatura.ultima_busca_em = timezone.now()
-                    fatura.status_busca = 'ERRO'
-                    fatura.erro_busca = 'Nenhuma fatura retornada pela API'
-                    fatura.save()
-                    stats['erro'] += 1
-                    stats['processadas'] += 1
-                return stats
-            
-            # Fazer matching por vencimento
-            for fatura in faturas:
-                inicio = time.time()
-                stats['processadas'] += 1
-                
-                fatura.tentativas_busca += 1
-                fatura.origem_busca = origem
-                fatura.ultima_busca_em = timezone.now()
-                
-                # Verificar disponibilidade
-                if fatura.data_disponibilidade and fatura.data_disponibilidade > hoje:
-                    fatura.status_busca = 'PENDENTE'
-                    fatura.erro_busca = f'Disponível em {fatura.data_disponibilidade}'
-                    fatura.save()
-                    stats['nao_disponiveis'] += 1
-                    continue
-                
-                # Encontrar melhor match por vencimento
-                melhor_match = None
-                menor_diff = 999
-                
-                for fatura_nio in faturas_nio:
-                    if fatura_nio.get('data_vencimento') and fatura.data_vencimento:
-                        diff_dias = abs((fatura.data_vencimento - fatura_nio['data_vencimento']).days)
-                        if diff_dias <= 3 and diff_dias < menor_diff:
-                            menor_diff = diff_dias
-                            melhor_match = fatura_nio
-                
-                tempo_decorrido = time.time() - inicio
-                fatura.tempo_busca_segundos = Decimal(str(tempo_decorrido))
-                self.tempos_execucao.append(tempo_decorrido)
-                
-                if melhor_match:
-                    # Atualizar com dados do Nio
-                    if melhor_match.get('valor'):
-                        fatura.valor = melhor_match['valor']
-                    if melhor_match.get('data_vencimento'):
-                        fatura.data_vencimento = melhor_match['data_vencimento']
-                    if melhor_match.get('codigo_pix'):
-                        fatura.codigo_pix = melhor_match['codigo_pix']
-                    if melhor_match.get('codigo_barras'):
-                        fatura.codigo_barras = melhor_match['codigo_barras']
-                    if melhor_match.get('pdf_url'):
-                        fatura.pdf_url = melhor_match['pdf_url']
-                    
-                    fatura.status_busca = 'SUCESSO'
-                    fatura.erro_busca = None
-                    stats['sucesso'] += 1
-                else:
-                    fatura.status_busca = 'ERRO'
-                    fatura.erro_busca = 'Sem match de vencimento com faturas Nio'
-                    stats['erro'] += 1
-                
-                fatura.save()
-        
-        except Exception as e:
-            logger.error(f"Erro ao buscar faturas do contrato {contrato.numero_contrato}: {e}")
-            # Marcar todas como erro
-            for fatura in faturas:
-                fatura.tentativas_busca += 1
-                fatura.origem_busca = origem
-                fatura.ultima_busca_em = timezone.now()
-                fatura.status_busca = 'ERRO'
-                fatura.erro_busca = str(e)
-                fatura.save()
+        decisoes = retorno.get('decisoes') or []
+        if not decisoes and not retorno.get('ok'):
+            stats['processadas'] += 1
+            stats['erro'] += 1
+            return stats
+        for dec in decisoes:
+            stats['processadas'] += 1
+            if dec.get('status') == STATUS_MATCH:
+                stats['sucesso'] += 1
+            else:
                 stats['erro'] += 1
-                if stats['processadas'] < faturas.count():
-                    stats['processadas'] += 1
-        
         return stats
-    
+
+    def processar_contratos(
+        self,
+        contratos: Iterable[ContratoM10],
+        workers: Optional[int] = None,
+        ao_concluir: Optional[Callable[[ContratoM10, Dict, float], None]] = None,
+    ) -> Dict:
+        """
+        Busca os contratos em paralelo (pool limitado, retry com backoff + jitter
+        em falha transitória da API) e grava progresso e latências no histórico.
+        """
+        stats = {'processadas': 0, 'sucesso': 0, 'erro': 0, 'nao_disponiveis': 0}
+        contratos = [c for c in contratos if c.cpf_cliente]
+        latencias: List[float] = []
+
+        def _registrar(tarefa) -> None:
+            retorno = tarefa.resultado if tarefa.ok and tarefa.resultado else {
+                'ok': False, 'status': 'ERRO', 'motivo': tarefa.erro, 'decisoes': [],
+            }
+            parcial = self._stats_do_retorno(
+                retorno, {'processadas': 0, 'sucesso': 0, 'erro': 0, 'nao_disponiveis': 0}
+            )
+            for chave, valor in parcial.items():
+                stats[chave] += valor
+            latencias.append(tarefa.latencia_ms)
+            self.tempos_execucao.append(tarefa.latencia_ms / 1000)
+            if self.historico and len(latencias) % 10 == 0:
+                self._gravar_progresso(stats, latencias)
+            if ao_concluir is not None:
+                ao_concluir(tarefa.item, parcial, tarefa.latencia_ms)
+
+        workers = workers or workers_padrao()
+        if contratos and workers > 1:
+            aquecer_token_nio()
+        executar_em_paralelo(
+            contratos,
+            consultar_e_decidir_contrato,
+            workers=workers,
+            repetir_se=lambda r: bool(r and r.get('transitorio')),
+            ao_concluir=_registrar,
+        )
+        if self.historico:
+            self._gravar_progresso(stats, latencias)
+        stats['latencia'] = resumo_latencias(latencias)
+        return stats
+
+    def _gravar_progresso(self, stats: Dict, latencias: List[float]) -> None:
+        self.historico.total_faturas = stats['processadas']
+        self.historico.faturas_sucesso = stats['sucesso']
+        self.historico.faturas_erro = stats['erro']
+        self.historico.faturas_nao_disponiveis = stats['nao_disponiveis']
+        logs = self.historico.logs if isinstance(self.historico.logs, dict) else {}
+        logs['latencia'] = resumo_latencias(latencias)
+        self.historico.logs = logs
+        self.historico.save(update_fields=[
+            'total_faturas', 'faturas_sucesso', 'faturas_erro',
+            'faturas_nao_disponiveis', 'logs',
+        ])
+
     def retry_erros(self, max_tentativas: int = 3) -> Dict:
         """
         Retry automático de faturas com erro
@@ -308,6 +279,3 @@ class BuscaFaturaService:
         
         return stats
 
-
-# Importar Q para queries complexas
-from django.db.models import Q
@@ -20,6 +20,7 @@ Fluxo (passos):
 
 from __future__ import annotations
 
+import importlib.util
 import logging
 import json
 import math
@@ -32,7 +33,7 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import requests
@@ -40,15 +41,14 @@ from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
-try:
-    from playwright.sync_api import Browser, BrowserContext, Page, sync_playwright
-    HAS_PLAYWRIGHT = True
-except ImportError:
-    HAS_PLAYWRIGHT = False
-    Browser = BrowserContext = Page = None  # type: ignore
-    sync_playwright = None  # type: ignore
+# Playwright só é importado ao abrir o browser (vtop_api é carregado pelo urls.py).
+HAS_PLAYWRIGHT = importlib.util.find_spec("playwright") is not None
+if not HAS_PLAYWRIGHT:
     logger.warning("[VTOP] Playwright não instalado. Automação SmartRiser desabilitada.")
 
+if TYPE_CHECKING:
+    from playwright.sync_api import Browser, BrowserContext, Page
+
 # =============================================================================
 # URLs e configuração
 # =============================================================================
@@ -840,6 +840,8 @@ class VtopSmartRiserService:
         # Materializa sessão do env (produção) antes de abrir o contexto
         if not forcar_login:
             _garantir_storage_state_arquivo()
+        from playwright.sync_api import sync_playwright
+
         self.playwright = sync_playwright().start()
         launch_opts: Dict[str, Any] = {
             "headless": _headless(),
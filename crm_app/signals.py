@@ -1,7 +1,13 @@
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from .models import Venda, ContratoM10, StatusCRM, LancamentoFinanceiro
-from .whatsapp_service import WhatsAppService
+from .venda_transicoes import (
+    ATTR_SNAPSHOT,
+    campo_mudou,
+    capturar_snapshot,
+    notificar_vendedor_cadastrada,
+    virou_cadastrada,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,25 +15,24 @@ logger = logging.getLogger(__name__)
 @receiver(pre_save, sender=Venda)
 def verificar_mudanca_status(sender, instance, **kwargs):
     """
-    Antes de salvar, captura o status atual do banco de dados para comparar depois.
+    Antes de salvar, captura o estado atual do banco (snapshot único do save, reaproveitado
+    pelos demais receivers) para comparar depois.
     E também define status_esteira como AGENDADO quando reemissão é marcada.
     """
-    if instance.pk:
+    old_instance = capturar_snapshot(instance)
+    if old_instance is None:
+        return
+    # Mantidos por compatibilidade com quem lê os atributos antigos
+    instance._old_status_tratamento = old_instance.status_tratamento
+    instance._old_status_esteira = old_instance.status_esteira
+    instance._old_reemissao = old_instance.reemissao
+
+    # Se reemissão foi marcada como True, definir status_esteira como AGENDADO
+    if instance.reemissao and not old_instance.reemissao:
         try:
-            old_instance = Venda.objects.get(pk=instance.pk)
-            # Armazena temporariamente na instância em memória
-            instance._old_status_tratamento = old_instance.status_tratamento
-            instance._old_status_esteira = old_instance.status_esteira
-            instance._old_reemissao = old_instance.reemissao
-            
-            # Se reemissão foi marcada como True, definir status_esteira como AGENDADO
-            if instance.reemissao and not old_instance.reemissao:
-                try:
-                    st_agendado = StatusCRM.objects.get(nome__iexact="AGENDADO", tipo__iexact="Esteira")
-                    instance.status_esteira = st_agendado
-                except StatusCRM.DoesNotExist:
-                    pass
-        except Venda.DoesNotExist:
+            st_agendado = StatusCRM.objects.get(nome__iexact="AGENDADO", tipo__iexact="Esteira")
+            instance.status_esteira = st_agendado
+        except StatusCRM.DoesNotExist:
             pass
 
 @receiver(post_save, sender=Venda)
@@ -35,9 +40,12 @@ def quitar_adiantamento_sabado_ao_instalar(sender, instance, created, **kwargs):
     """Qualquer save que leve a venda a INSTALADA quita adiantamento sábado pendente."""
     if created:
         return
-    old_esteira = getattr(instance, '_old_status_esteira', None)
-    if not instance.status_esteira:
+    if not instance.status_esteira_id:
         return
+    anterior = getattr(instance, ATTR_SNAPSHOT, None)
+    if anterior is not None and not campo_mudou(instance, 'status_esteira', anterior):
+        return  # esteira não mudou: não há transição para INSTALADA
+    old_esteira = anterior.status_esteira if anterior is not None else None
     try:
         from crm_app.services.adiantamento_sabado_service import (
             quitar_adiantamento_sabado_na_instalacao,
@@ -61,50 +69,16 @@ def disparar_whatsapp_cadastrada(sender, instance, created, **kwargs):
     if created:
         return  # Ignora vendas novas recém-criadas (só dispara na mudança)
 
-    # Recupera os valores antigos guardados no pre_save
-    old_tratamento = getattr(instance, '_old_status_tratamento', None)
-    new_tratamento = instance.status_tratamento
-
-    old_esteira = getattr(instance, '_old_status_esteira', None)
-    new_esteira = instance.status_esteira
-
-    gatilho_acionado = False
-
-    # 1. Verifica mudança no Status de Tratamento (Auditoria)
-    # Se o novo status é CADASTRADA e o antigo NÃO ERA CADASTRADA
-    if new_tratamento and new_tratamento.nome.upper() == "CADASTRADA":
-        if not old_tratamento or old_tratamento.nome.upper() != "CADASTRADA":
-            gatilho_acionado = True
-
-    # 2. Verifica mudança no Status de Esteira (caso use este campo também)
-    elif new_esteira and new_esteira.nome.upper() == "CADASTRADA":
-        if not old_esteira or old_esteira.nome.upper() != "CADASTRADA":
-            gatilho_acionado = True
+    anterior = getattr(instance, ATTR_SNAPSHOT, None)
+    if anterior is not None and not (
+        campo_mudou(instance, 'status_tratamento', anterior)
+        or campo_mudou(instance, 'status_esteira', anterior)
+    ):
+        return  # nenhum status mudou: evita carregar os FKs
 
-    if gatilho_acionado:
+    if virou_cadastrada(instance, anterior):
         logger.info(f"Venda #{instance.id} mudou para CADASTRADA.")
-
-        # Verifica se tem vendedor vinculado
-        if not instance.vendedor:
-            logger.warning(f"Venda #{instance.id} sem vendedor. WhatsApp cancelado.")
-            return
-
-        # Verifica se o vendedor tem o WhatsApp cadastrado no perfil
-        telefone_vendedor = instance.vendedor.tel_whatsapp
-        
-        if not telefone_vendedor:
-            logger.warning(f"Vendedor {instance.vendedor.username} não tem 'Tel WhatsApp' cadastrado.")
-            return
-
-        try:
-            logger.info(f"Enviando WhatsApp para vendedor {instance.vendedor.username} ({telefone_vendedor})...")
-            service = WhatsAppService()
-            
-            # Chama o método de envio passando explicitamente o telefone do vendedor
-            service.enviar_mensagem_cadastrada(instance, telefone_destino=telefone_vendedor)
-            
-        except Exception as e:
-            logger.error(f"Erro ao enviar WhatsApp na venda #{instance.id}: {e}")
+        notificar_vendedor_cadastrada(instance)
 
 
 # Signal para criar/atualizar faturas automaticamente ao salvar contrato M-10
@@ -0,0 +1,85 @@
+"""
+Manutenção incremental do índice de busca textual (`DocumentoBusca`).
+
+Reindexa a partir da instância salva (sem reler a linha): Venda também atualiza os
+contratos M10 ligados a ela (telefones vêm da venda) e Cliente as vendas do cliente.
+Saves com `update_fields` que não mexem em campo buscável são ignorados.
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Cliente, ContratoM10, Venda
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_CONTRATO = frozenset({
+    'cliente_nome', 'numero_contrato', 'numero_contrato_definitivo', 'ordem_servico',
+    'cpf_cliente', 'venda', 'venda_id', 'telefone',
+})
+CAMPOS_VENDA = frozenset({'ordem_servico', 'telefone1', 'telefone2', 'cliente', 'cliente_id'})
+CAMPOS_CLIENTE = frozenset({'nome_razao_social', 'cpf_cnpj'})
+
+
+def _relevante(update_fields, campos) -> bool:
+    return update_fields is None or bool(set(update_fields) & campos)
+
+
+@receiver(post_save, sender=ContratoM10)
+def indexar_contrato_salvo(sender, instance, **kwargs):
+    if not _relevante(kwargs.get('update_fields'), CAMPOS_CONTRATO):
+        return
+    from crm_app.services import busca_textual
+
+    try:
+        busca_textual.indexar_objetos_contrato([instance])
+    except Exception:
+        logger.exception('[BUSCA TEXTUAL] Falha ao indexar contrato %s', instance.pk)
+
+
+@receiver(post_save, sender=Venda)
+def indexar_venda_salva(sender, instance, **kwargs):
+    if not _relevante(kwargs.get('update_fields'), CAMPOS_VENDA):
+        return
+    from crm_app.services import busca_textual
+
+    try:
+        busca_textual.indexar_objetos_venda([instance])
+        contratos = list(ContratoM10.objects.filter(venda_id=instance.pk))
+        for contrato in contratos:
+            contrato.venda = instance
+        busca_textual.indexar_objetos_contrato(contratos)
+    except Exception:
+        logger.exception('[BUSCA TEXTUAL] Falha ao indexar venda %s', instance.pk)
+
+
+@receiver(post_save, sender=Cliente)
+def indexar_vendas_do_cliente(sender, instance, created=False, **kwargs):
+    if created or not _relevante(kwargs.get('update_fields'), CAMPOS_CLIENTE):
+        return
+    from crm_app.services import busca_textual
+
+    try:
+        vendas = list(Venda.objects.filter(cliente_id=instance.pk).only(
+            'id', 'ordem_servico', 'telefone1', 'telefone2', 'cliente_id',
+        ))
+        for venda in vendas:
+            venda.cliente = instance
+        busca_textual.indexar_objetos_venda(vendas)
+    except Exception:
+        logger.exception('[BUSCA TEXTUAL] Falha ao reindexar vendas do cliente %s', instance.pk)
+
+
+@receiver(post_delete, sender=ContratoM10)
+def remover_documento_contrato(sender, instance, **kwargs):
+    from crm_app.services import busca_textual
+
+    busca_textual.remover(busca_textual.TIPO_CONTRATO, [instance.pk])
+
+
+@receiver(post_delete, sender=Venda)
+def remover_documento_venda(sender, instance, **kwargs):
+    from crm_app.services import busca_textual
+
+    busca_textual.remover(busca_textual.TIPO_VENDA, [instance.pk])
@@ -13,6 +13,7 @@ from django.utils import timezone
 from datetime import datetime
 
 from .models import Venda, ContratoM10, SafraM10, ImportacaoFPD
+from .venda_transicoes import cancelar_contratos_m10, foi_desativada, snapshot_anterior
 
 
 # ============================================================================
@@ -42,9 +43,12 @@ def criar_contrato_m10_automatico(sender, instance, created, **kwargs):
     # Verifica se já existe um contrato com esta OS (para evitar UNIQUE constraint)
     contrato_existente = ContratoM10.objects.filter(ordem_servico=instance.ordem_servico).first()
     if contrato_existente:
-        # Atualiza o contrato existente se necessário
+        # Atualiza o contrato existente se necessário (normalmente signals_m10 já o deixou em dia)
+        cliente_nome = instance.cliente.nome_razao_social if instance.cliente else ''
+        if contrato_existente.venda_id == instance.pk and contrato_existente.cliente_nome == cliente_nome:
+            return
         contrato_existente.venda = instance
-        contrato_existente.cliente_nome = instance.cliente.nome_razao_social if instance.cliente else ''
+        contrato_existente.cliente_nome = cliente_nome
         contrato_existente.save()
         return
     
@@ -227,13 +231,8 @@ def validar_venda_antes_de_salvar(sender, instance, **kwargs):
     
     # Se mudou para inativo e tem ContratoM10, marca como cancelado
     if instance.pk:  # Se é atualização
-        venda_antiga = Venda.objects.get(pk=instance.pk)
-        if venda_antiga.ativo and not instance.ativo:
+        # Reaproveita o snapshot capturado em signals.verificar_mudanca_status
+        venda_antiga = snapshot_anterior(instance)
+        if foi_desativada(instance, venda_antiga):
             # Venda ficou inativa - marcar ContratoM10 como cancelado
-            ContratoM10.objects.filter(
-                venda=instance,
-                status_contrato='ATIVO'
-            ).update(
-                status_contrato='CANCELADO',
-                data_cancelamento=timezone.now().date()
-            )
+            cancelar_contratos_m10([instance.pk])
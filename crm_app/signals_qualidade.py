@@ -0,0 +1,73 @@
+"""
+Invalidação do agregado do Qualidade / Dashboard FPD (`RollupQualidade`).
+
+Escritas em FaturaM10, ContratoM10 e ImportacaoFPD marcam como sujas as fatias
+(lente, mês) onde o contrato aparece; a próxima leitura do painel reconstrói só elas.
+Saves com `update_fields` que não mexem em nenhuma dimensão do agregado são ignorados.
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ContratoM10, FaturaM10, ImportacaoFPD
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_FATURA = frozenset({
+    'contrato', 'contrato_id', 'numero_fatura', 'status', 'data_vencimento',
+    'conferencia_fpd', 'data_promessa_pagamento',
+})
+CAMPOS_CONTRATO = frozenset({
+    'vendedor', 'vendedor_id', 'data_instalacao', 'status_contrato', 'status_tratamento',
+    'status_tratamento_id', 'orfao', 'elegivel_bonus', 'teve_downgrade', 'status_fatura_fpd',
+})
+
+
+def _relevante(update_fields, campos) -> bool:
+    return update_fields is None or bool(set(update_fields) & campos)
+
+
+def _marcar(fatias) -> None:
+    from crm_app.services import qualidade_rollup
+
+    try:
+        if fatias:
+            qualidade_rollup.marcar_sujas(fatias)
+    except Exception:
+        logger.exception('[ROLLUP QUALIDADE] Falha ao marcar fatias sujas')
+
+
+@receiver(post_save, sender=FaturaM10)
+@receiver(post_delete, sender=FaturaM10)
+def invalidar_rollup_fatura(sender, instance, **kwargs):
+    if not _relevante(kwargs.get('update_fields'), CAMPOS_FATURA):
+        return
+    from crm_app.services.qualidade_rollup import fatias_do_contrato
+
+    contrato = instance._state.fields_cache.get('contrato')
+    _marcar(fatias_do_contrato(
+        instance.contrato_id, getattr(contrato, 'data_instalacao', None),
+    ))
+
+
+@receiver(post_save, sender=ContratoM10)
+@receiver(post_delete, sender=ContratoM10)
+def invalidar_rollup_contrato(sender, instance, **kwargs):
+    if not _relevante(kwargs.get('update_fields'), CAMPOS_CONTRATO):
+        return
+    from crm_app.services.qualidade_rollup import fatias_do_contrato
+
+    _marcar(fatias_do_contrato(instance.pk, instance.data_instalacao))
+
+
+@receiver(post_save, sender=ImportacaoFPD)
+@receiver(post_delete, sender=ImportacaoFPD)
+def invalidar_rollup_importacao_fpd(sender, instance, **kwargs):
+    if not instance.dt_venc_orig:
+        return
+    mes = instance.dt_venc_orig.strftime('%Y-%m')
+    fatias = {(instance.indicador, mes)}
+    if instance.indicador == 'FPD':
+        fatias.add(('vencimento', mes))
+    _marcar(fatias)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from unittest.mock import Mock, patch
+from unittest.mock import ANY, Mock, patch
 
 from django.test import SimpleTestCase, TestCase
 
@@ -67,4 +67,7 @@ class PapJobFalhaNotificacaoTests(SimpleTestCase):
         filtrar_sessao.return_value.update.assert_called_once_with(
             etapa="inicial",
             dados_temp={},
+            updated_at=ANY,
         )
+        # updated_at novo: o cache de sessão dos outros processos relê mesmo se a etapa já era "inicial"
+        self.assertIsNotNone(filtrar_sessao.return_value.update.call_args.kwargs["updated_at"])
@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase, TestCase
+
+from crm_app.benchmarks import dados_sinteticos, executor
+from crm_app.benchmarks.cenarios import CENARIOS
+from crm_app.models import Venda
+
+
+class BenchmarkDiffTests(SimpleTestCase):
+    def test_normalizar_sql_agrupa_literais(self):
+        a = executor.normalizar_sql("SELECT * FROM t WHERE id IN (1, 2, 3) AND nome = 'ANA'")
+        b = executor.normalizar_sql("SELECT * FROM t WHERE id IN (7, 8) AND nome = 'JO''AO'")
+        self.assertEqual(a, b)
+        self.assertEqual(executor.hash_sql(a), executor.hash_sql(b))
+
+    def _cenario(self, queries, tempo, plano):
+        return {'cenarios': {'x': {
+            'queries': queries, 'tempo_ms': tempo,
+            'top_queries': [{'hash': 'h1', 'plano': plano}],
+        }}}
+
+    def test_comparar_detecta_queries_tempo_e_seq_scan(self):
+        base = self._cenario(5, 100.0, ['Index Scan:crm_venda:idx'])
+        atual = self._cenario(9, 400.0, ['Seq Scan:crm_venda'])
+        diff = executor.comparar(atual, base)
+        self.assertEqual(len(diff['regressoes']), 3)
+
+    def test_comparar_tolera_ruido(self):
+        base = self._cenario(5, 10.0, ['Index Scan:crm_venda:idx'])
+        atual = self._cenario(5, 25.0, ['Bitmap Heap Scan:crm_venda'])
+        diff = executor.comparar(atual, base)
+        self.assertEqual(diff['regressoes'], [])
+        self.assertEqual(len(diff['avisos']), 1)
+
+
+class BenchmarkExecucaoTests(TestCase):
+    def test_gera_dados_e_mede_cenario(self):
+        criados = dados_sinteticos.gerar_dados(escala=0.002, log=lambda _m: None)
+        self.assertEqual(Venda.objects.count(), criados['vendas'])
+        usuario = dados_sinteticos.usuario_benchmark()
+
+        medido = executor.medir_cenario(
+            'esteira_contadores', CENARIOS['esteira_contadores'], usuario, repeticoes=1,
+        )
+        self.assertGreater(medido['queries'], 0)
+        self.assertTrue(medido['top_queries'][0]['plano'])
+
+        dados_sinteticos.limpar_dados(log=lambda _m: None)
+        self.assertFalse(Venda.objects.exists())
@@ -0,0 +1,97 @@
+"""Testes do executor paralelo da busca de faturas Nio (retry, prazo, limite de taxa, latências)."""
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from crm_app.services import busca_faturas_paralela as bfp
+from crm_app.services.rate_limit import LimitadorTaxa
+
+
+class ExecutarComRetryTest(SimpleTestCase):
+    @patch("crm_app.services.busca_faturas_paralela.time.sleep")
+    def test_repete_excecao_ate_dar_certo(self, mock_sleep):
+        chamadas = []
+
+        def func(item):
+            chamadas.append(item)
+            if len(chamadas) < 3:
+                raise ConnectionError("timeout")
+            return {"ok": True}
+
+        res = bfp.executar_com_retry(func, "c1", tentativas=3, base_seg=1, max_seg=5)
+        self.assertTrue(res.ok)
+        self.assertEqual(res.tentativas, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        for (espera,), _ in mock_sleep.call_args_list:
+            self.assertLessEqual(espera, 5)
+
+    @patch("crm_app.services.busca_faturas_paralela.time.sleep")
+    def test_resultado_transitorio_repete_e_esgota(self, mock_sleep):
+        res = bfp.executar_com_retry(
+            lambda item: {"ok": False, "transitorio": True},
+            "c1",
+            tentativas=2,
+            repetir_se=lambda r: r.get("transitorio"),
+        )
+        self.assertEqual(res.tentativas, 2)
+        self.assertTrue(res.ok)
+        self.assertTrue(res.resultado["transitorio"])
+        mock_sleep.assert_called_once()
+
+    def test_backoff_limitado_ao_teto(self):
+        for tentativa in range(1, 10):
+            self.assertLessEqual(bfp.backoff_com_jitter(tentativa, 1.0, 8.0), 8.0)
+
+
+class ExecutarEmParaleloTest(SimpleTestCase):
+    def test_paralelo_processa_todos_e_callback_na_thread_chamadora(self):
+        chamadora = threading.get_ident()
+        threads_callback = set()
+        vistos = []
+
+        def ao_concluir(res):
+            threads_callback.add(threading.get_ident())
+            vistos.append(res.item)
+
+        with patch("django.db.connection.close"):
+            resultados = bfp.executar_em_paralelo(
+                range(20), lambda i: i * 2, workers=4, ao_concluir=ao_concluir,
+            )
+        self.assertEqual(sorted(r.resultado for r in resultados), [i * 2 for i in range(20)])
+        self.assertEqual(sorted(vistos), list(range(20)))
+        self.assertEqual(threads_callback, {chamadora})
+
+    def test_excecao_nao_derruba_lote(self):
+        def func(i):
+            if i == 1:
+                raise ValueError("falhou")
+            return i
+
+        resultados = bfp.executar_em_paralelo([0, 1, 2], func, workers=1, tentativas=1)
+        self.assertEqual([r.ok for r in resultados], [True, False, True])
+        self.assertIn("ValueError", resultados[1].erro)
+
+    def test_prazo_esgotado_nao_inicia_novas_tarefas(self):
+        resultados = bfp.executar_em_paralelo(range(5), lambda i: i, workers=1, prazo_seg=-1)
+        self.assertEqual(resultados, [])
+
+
+class LatenciasELimitadorTest(SimpleTestCase):
+    def test_resumo_latencias_nearest_rank(self):
+        resumo = bfp.resumo_latencias([float(i) for i in range(1, 101)])
+        self.assertEqual((resumo["p50"], resumo["p95"], resumo["max"]), (50.0, 95.0, 100.0))
+        self.assertEqual(bfp.resumo_latencias([])["n"], 0)
+
+    @patch("crm_app.services.rate_limit.time.sleep")
+    def test_limitador_espera_depois_da_rajada(self, mock_sleep):
+        limitador = LimitadorTaxa(por_segundo=2, rajada=2)
+        self.assertEqual(limitador.aguardar(), 0.0)
+        self.assertEqual(limitador.aguardar(), 0.0)
+        with patch("crm_app.services.rate_limit.time.monotonic", return_value=limitador._ultimo):
+            mock_sleep.side_effect = lambda s: setattr(limitador, "_fichas", 1.0)
+            self.assertGreater(limitador.aguardar(), 0)
+        mock_sleep.assert_called_once()
+
+    def test_limitador_desligado(self):
+        self.assertEqual(LimitadorTaxa(por_segundo=0).aguardar(), 0.0)
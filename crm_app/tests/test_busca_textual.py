@@ -0,0 +1,102 @@
+"""Índice de busca textual (DocumentoBusca) do Qualidade e da Esteira."""
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from crm_app.models import Cliente, ContratoM10, DocumentoBusca, Venda
+from crm_app.services import busca_textual
+from crm_app.services.qualidade_service import _aplicar_filtros_contratos, _filtrar_busca_direta
+from usuarios.models import Usuario
+
+
+class BuscaTextualTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendedor = Usuario.objects.create_user(
+            username='consultora_busca', password='x', first_name='Mariana',
+        )
+        cls.cliente = Cliente.objects.create(nome_razao_social='João Araújo', cpf_cnpj='123.456.789-01')
+        outro = Cliente.objects.create(nome_razao_social='Empresa Beta LTDA', cpf_cnpj='12.345.678/0001-90')
+        cls.venda = Venda.objects.create(
+            vendedor=cls.vendedor, cliente=cls.cliente, ordem_servico='OS-777001',
+            telefone1='(21) 99876-5432', ativo=True,
+        )
+        cls.venda_beta = Venda.objects.create(cliente=outro, ordem_servico='OS-888002', ativo=True)
+        base = {'data_instalacao': date(2026, 3, 10), 'plano_original': 'P', 'plano_atual': 'P'}
+        cls.contrato = ContratoM10.objects.create(
+            numero_contrato='CTR-5501', ordem_servico='OS-777001', cliente_nome='João Araújo',
+            cpf_cliente='12345678901', venda=cls.venda, **base,
+        )
+        cls.contrato_beta = ContratoM10.objects.create(
+            numero_contrato='CTR-9902', ordem_servico='OS-888002', cliente_nome='Empresa Beta LTDA',
+            venda=cls.venda_beta, **base,
+        )
+
+    def setUp(self):
+        busca_textual.reconstruir_indice()
+
+    def _contratos(self, termo):
+        qs = _aplicar_filtros_contratos(ContratoM10.objects.all(), {'q': termo})
+        return set(qs.values_list('numero_contrato', flat=True))
+
+    def test_normalizacao(self):
+        self.assertEqual(busca_textual.normalizar_texto('  JOÃO   Araújo '), 'joao araujo')
+        doc = DocumentoBusca.objects.get(tipo='contrato', objeto_id=self.contrato.pk)
+        self.assertIn('joao araujo', doc.texto)
+        self.assertEqual(doc.documento, '12345678901')
+        self.assertEqual(doc.telefones, '21998765432')
+
+    def test_indice_casa_com_busca_direta(self):
+        for termo in ('João', 'araújo', 'ctr-5501', 'OS-888', '5678', 'beta ltda', 'inexistente'):
+            direto = set(
+                _filtrar_busca_direta(ContratoM10.objects.all(), termo)
+                .values_list('numero_contrato', flat=True)
+            )
+            self.assertEqual(self._contratos(termo), direto, termo)
+
+    def test_indice_ignora_acento_e_acha_telefone(self):
+        self.assertEqual(self._contratos('joao'), {'CTR-5501'})
+        self.assertEqual(self._contratos('+55 21 99876-5432'), {'CTR-5501'})
+        self.assertEqual(self._contratos('98765432'), {'CTR-5501'})
+
+    def test_busca_de_venda_inclui_consultor_e_documento_com_mascara(self):
+        def vendas(termo):
+            return set(Venda.objects.filter(busca_textual.q_busca('venda', termo)).values_list('pk', flat=True))
+
+        self.assertEqual(vendas('mariana'), {self.venda.pk})
+        self.assertEqual(vendas('12.345.678/0001'), {self.venda_beta.pk})
+        self.assertEqual(vendas('12345678000190'), {self.venda_beta.pk})
+        self.assertEqual(vendas('888002'), {self.venda_beta.pk})
+
+    def test_signals_mantem_indice(self):
+        venda = Venda.objects.get(pk=self.venda.pk)
+        venda.telefone1 = '11 91234-0000'
+        venda.save()
+        self.assertEqual(self._contratos('912340000'), {'CTR-5501'})
+
+        self.cliente.nome_razao_social = 'Joana Prado'
+        self.cliente.save(update_fields=['nome_razao_social'])
+        self.assertTrue(Venda.objects.filter(busca_textual.q_busca('venda', 'joana')).exists())
+
+        self.contrato_beta.delete()
+        self.assertFalse(DocumentoBusca.objects.filter(tipo='contrato', objeto_id=self.contrato_beta.pk).exists())
+
+    def test_sem_indice_construido_usa_busca_direta(self):
+        with override_settings(BUSCA_INDICE_ENABLED=False):
+            self.assertIsNone(busca_textual.q_busca('contrato', 'joao'))
+            self.assertEqual(self._contratos('CTR-99'), {'CTR-9902'})
+
+    def test_importacao_fpd_reindexa_numero_definitivo(self):
+        from crm_app.models import LogImportacaoFPD
+        from crm_app.views import ImportarFPDView
+
+        log = LogImportacaoFPD.objects.create(nome_arquivo='fpd.csv', usuario=self.vendedor, status='PROCESSANDO')
+        csv = b'NR_ORDEM,ID_CONTRATO,VL_FATURA\nOS-777001,DEF-424242,99.9\n'
+        # sincronização de vencimentos usa SQL do PostgreSQL (UPDATE ... FROM)
+        with mock.patch('crm_app.services.fpd_import_service.sincronizar_vencimentos_fpd_nas_faturas', return_value={}):
+            ImportarFPDView()._processar_fpd_interno(log.id, csv, 'fpd.csv', self.vendedor.id)
+
+        self.contrato.refresh_from_db()
+        self.assertEqual(self.contrato.numero_contrato_definitivo, 'DEF-424242')
+        self.assertEqual(self._contratos('def-4242'), {'CTR-5501'})
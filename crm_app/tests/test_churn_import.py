@@ -0,0 +1,103 @@
+"""Importação CHURN (Bônus M-10): upsert por diff, cancelamento/reativação do M10 em lote."""
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from crm_app.models import ContratoM10, ImportacaoChurn, LogImportacaoChurn, SafraM10
+
+URL = '/api/bonus-m10/importar-churn/'
+CABECALHO = 'PEDIDO,NR_ORDEM,UF,DT_RETIRADA,ANOMES_GROSS,MOTIVO_RETIRADA,DS_MOTIVO_RETIRADA,MATRICULA_VENDEDOR\n'
+
+
+def _csv(*linhas):
+    return SimpleUploadedFile('churn.csv', (CABECALHO + '\n'.join(linhas) + '\n').encode(), content_type='text/csv')
+
+
+class ImportarChurnTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('bo_churn', password='x')
+        cls.user.groups.add(Group.objects.create(name='BackOffice'))
+        cls.safra = SafraM10.objects.create(mes_referencia=date(2026, 7, 1), total_ativos=99)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        base = {'cliente_nome': 'C', 'data_instalacao': date(2026, 7, 10), 'plano_original': 'P', 'plano_atual': 'P'}
+        self.c_zeros = ContratoM10.objects.create(numero_contrato='N1', ordem_servico='00012345', **base)
+        self.c_prefixo = ContratoM10.objects.create(numero_contrato='N2', ordem_servico='OS-777', **base)
+        self.c_reativar = ContratoM10.objects.create(
+            numero_contrato='N3', ordem_servico='555', status_contrato='CANCELADO',
+            motivo_cancelamento='CHURN', data_cancelamento=date(2026, 8, 1), **base,
+        )
+        self.c_outro_motivo = ContratoM10.objects.create(
+            numero_contrato='N4', ordem_servico='999', status_contrato='CANCELADO',
+            motivo_cancelamento='Inadimplência', **base,
+        )
+        ImportacaoChurn.objects.create(numero_pedido='P1', nr_ordem='00012345', uf='MG', motivo_retirada='MUDANCA')
+        ImportacaoChurn.objects.create(numero_pedido='P2', nr_ordem='00000777', uf='SP')
+        ImportacaoChurn.objects.create(numero_pedido='VELHO', nr_ordem='00000555', uf='RJ')
+
+    def test_diff_upsert_e_m10(self):
+        resp = self.client.post(URL, {'file': _csv(
+            'P1,12345,MG,,,MUDANCA,MUDANCA,',
+            'P2,777,SP,2026-09-15,2026-07,Portabilidade CHURN,Portabilidade,M77',
+            'P3,888,BA,,,,,',
+            ',4444,GO,,,,,',
+            ',,,,,,,',
+        )}, format='multipart')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        diff = resp.data['diff']
+        self.assertEqual(
+            (diff['novos'], diff['alterados'], diff['iguais'], diff['removidos'], diff['sem_os']),
+            (2, 1, 1, 1, 1),
+        )
+        self.assertEqual(diff['amostra_removidos'], ['VELHO'])
+
+        p2 = ImportacaoChurn.objects.get(numero_pedido='P2')
+        self.assertEqual(
+            (p2.dt_retirada, p2.anomes_gross, p2.motivo_retirada), (date(2026, 9, 15), '202607', 'Portabilidade'),
+        )
+        self.assertEqual((p2.matricula_vendedor, p2.cd_tr_vdd_original), ('M77', 'M77'))
+        self.assertTrue(ImportacaoChurn.objects.filter(numero_pedido__isnull=True, nr_ordem='00004444').exists())
+        self.assertEqual(ImportacaoChurn.objects.count(), 5)
+
+        self.c_zeros.refresh_from_db()
+        self.c_prefixo.refresh_from_db()
+        self.c_reativar.refresh_from_db()
+        self.c_outro_motivo.refresh_from_db()
+        self.assertEqual((self.c_zeros.status_contrato, self.c_zeros.motivo_cancelamento), ('CANCELADO', 'MUDANCA'))
+        self.assertEqual(self.c_prefixo.data_cancelamento, date(2026, 9, 15))
+        self.assertFalse(self.c_prefixo.elegivel_bonus)
+        self.assertEqual((self.c_reativar.status_contrato, self.c_reativar.data_cancelamento), ('ATIVO', None))
+        self.assertEqual(self.c_outro_motivo.status_contrato, 'CANCELADO')
+        self.assertEqual((resp.data['cancelados'], resp.data['reativados'], resp.data['nao_encontrados']), (2, 1, 2))
+        self.safra.refresh_from_db()
+        self.assertEqual(self.safra.total_ativos, 1)
+
+        log = LogImportacaoChurn.objects.get(pk=resp.data['log_id'])
+        self.assertEqual(log.status, 'PARCIAL')
+        self.assertEqual(log.detalhes_json['diff']['novos'], 2)
+        self.assertIn('upsert', log.detalhes_json['etapas_ms'])
+
+        # Mesmo arquivo de novo: nada a gravar, só contagem de iguais
+        resp = self.client.post(URL, {'file': _csv(
+            'P1,12345,MG,,,MUDANCA,MUDANCA,',
+            'P2,777,SP,2026-09-15,2026-07,Portabilidade CHURN,Portabilidade,M77',
+            'P3,888,BA,,,,,',
+            ',4444,GO,,,,,',
+        )}, format='multipart')
+        diff = resp.data['diff']
+        self.assertEqual((diff['novos'], diff['alterados'], diff['iguais'], diff['removidos']), (0, 0, 4, 1))
+        self.assertEqual((resp.data['cancelados'], resp.data['reativados']), (0, 0))
+
+        # O comando de sync usa a mesma busca em lote: o churn VELHO (O.S. 555) ainda está na base
+        saida = StringIO()
+        call_command('sync_m10_da_base_churn', stdout=saida)
+        self.assertIn('Contratos marcados CANCELADO: 1', saida.getvalue())
+        self.c_reativar.refresh_from_db()
+        self.assertEqual(self.c_reativar.status_contrato, 'CANCELADO')
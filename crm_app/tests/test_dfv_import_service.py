@@ -0,0 +1,95 @@
+"""Importação DFV: montagem da staging do modo COPY e fluxo em lotes (fallback fora do PostgreSQL)."""
+import pandas as pd
+from django.db import connection
+from django.test import TestCase
+
+from crm_app.models import DFV, LogImportacaoDFV
+from crm_app.services.dfv_import_service import DFVImportService
+
+CSV = (
+    'CEP;NUM_FACHADA;UF;LOGRADOURO;TIPO_VIABILIDADE\n'
+    '20000-000; 10 ;RJ;Rua A;VIAVEL\n'
+    '20000000;12;RJ;Rua A\\B;VIAVEL\n'
+    ';13;RJ;Sem CEP;VIAVEL\n'
+    '20000000;14;RJX;UF longa;VIAVEL\n'
+    '20000000;10;RJ;Rua A (nova);INVIAVEL\n'
+)
+
+
+class DFVImportServiceTest(TestCase):
+    def setUp(self):
+        self.log = LogImportacaoDFV.objects.create(nome_arquivo='dfv.csv', status='PROCESSANDO')
+        self.service = DFVImportService(self.log.id)
+
+    def _df_valido(self):
+        df = self.service._normalize_columns(self.service._read_csv(CSV.encode('utf-8')))
+        df_valido, invalidas = self.service._filter_valid_rows(self.service._clean_data(df))
+        self.assertEqual(invalidas, 1)
+        return df_valido
+
+    def test_staging_rejeita_campo_longo_e_serializa_no_formato_copy(self):
+        frame, rejeitadas = self.service._build_staging_frame(self._df_valido())
+        self.assertEqual(rejeitadas, 1)
+        self.assertEqual(list(frame.columns), ['linha', *DFVImportService.COPY_COLUMNS])
+        self.assertEqual(list(frame['linha']), [1, 2, 4])
+        self.assertEqual(list(frame['cep']), ['20000000'] * 3)
+        self.assertTrue(pd.isna(frame.iloc[0]['complemento']))
+
+        linhas = DFVImportService._copy_buffer(frame).getvalue().splitlines()
+        self.assertEqual(len(linhas), 3)
+        campos = linhas[1].split('\t')
+        self.assertEqual(len(campos), 1 + len(DFVImportService.COPY_COLUMNS))
+        self.assertEqual(campos[3], 'Rua A\\\\B')
+        self.assertEqual(campos[5], '\\N')
+
+    def test_fora_do_postgres_usa_fluxo_em_lotes(self):
+        DFV.objects.create(cep='20000000', num_fachada='12', logradouro='Antiga')
+        self.assertFalse(self.service._use_copy_mode())
+
+        resultado = self.service.process(CSV.encode('utf-8'), 'dfv.csv')
+
+        self.assertEqual(resultado['removidos'], 1)
+        self.assertFalse(DFV.objects.filter(logradouro='Antiga').exists())
+        self.log.refresh_from_db()
+        self.assertIn(self.log.status, ('SUCESSO', 'PARCIAL'))
+        self.assertEqual(self.log.sucesso, resultado['sucesso'])
+
+    def test_consolidacao_da_staging_mantem_complementos_da_mesma_fachada(self):
+        DFV.objects.create(cep='20000000', num_fachada='10', logradouro='Antiga')
+        DFV.objects.create(cep='20000000', num_fachada='99', logradouro='Fora do arquivo')
+        staging = f'{DFVImportService.STAGING_TABLE_PREFIX}{self.log.id}'
+        colunas = ('linha', 'cep', 'num_fachada', 'complemento', 'logradouro', 'tipo_viabilidade')
+        linhas = [
+            (1, '20000000', '10', 'CASA 1', 'Rua A', 'VIAVEL'),
+            (2, '20000000', '10', 'CASA 2', 'Rua A', 'VIAVEL'),
+            (3, '20000000', '10', 'CASA 1', 'Rua A (nova)', 'INVIAVEL'),
+            (4, '20000000', '12', None, 'Rua A', 'VIAVEL'),
+            (5, '20000000', '12', None, 'Rua A (nova)', 'VIAVEL'),
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {staging} (linha bigint, '
+                + ', '.join(f'{col} text' for col in DFVImportService.COPY_COLUMNS) + ')'
+            )
+            for linha in linhas:
+                cursor.execute(
+                    f'INSERT INTO {staging} ({", ".join(colunas)}) VALUES (%s, %s, %s, %s, %s, %s)', linha,
+                )
+        try:
+            inseridos, removidos = self.service._consolidar_staging(staging)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {staging}')
+
+        self.assertEqual((inseridos, removidos), (3, 1))
+        self.assertEqual(
+            sorted(DFV.objects.filter(num_fachada__in=['10', '12']).values_list(
+                'num_fachada', 'complemento', 'logradouro', 'tipo_viabilidade',
+            ), key=str),
+            sorted([
+                ('10', 'CASA 1', 'Rua A (nova)', 'INVIAVEL'),
+                ('10', 'CASA 2', 'Rua A', 'VIAVEL'),
+                ('12', None, 'Rua A (nova)', 'VIAVEL'),
+            ], key=str),
+        )
+        self.assertTrue(DFV.objects.filter(num_fachada='99').exists())
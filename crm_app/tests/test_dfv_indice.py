@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from crm_app import dfv_indice
+from crm_app.models import DFV, DFVIndiceCep
+from crm_app.utils import _cep_numero_viavel_no_dfv, consultar_fachada_dfv, listar_fachadas_dfv
+
+
+@patch('builtins.print')
+class DFVIndiceTests(TestCase):
+    def setUp(self):
+        dfv_indice._cache.limpar()
+        dfv_indice._versao_local.invalidar()
+        base = dict(logradouro='RUA A', bairro='CENTRO', tipo_rede='GPON', municipio='BH')
+        DFV.objects.create(cep='30130000', num_fachada='10', complemento='CA 1',
+                           tipo_viabilidade='VIÁVEL', nome_cdo='CDO-2', **base)
+        DFV.objects.create(cep='30130000', num_fachada='2', tipo_viabilidade='VIAVEL', nome_cdo='CDO-1', **base)
+        DFV.objects.create(cep='30130000', num_fachada='7', tipo_viabilidade='SEM REDE', **base)
+        DFV.objects.create(cep='30140000', num_fachada='1', tipo_viabilidade='SEM REDE', **base)
+
+    def tearDown(self):
+        dfv_indice._cache.limpar()
+        dfv_indice._versao_local.invalidar()
+
+    def test_sem_indice_usa_consulta_direta(self, _print):
+        self.assertTrue(_cep_numero_viavel_no_dfv('30130000', '2'))
+        texto = '\n'.join(listar_fachadas_dfv('30130-000'))
+        self.assertIn('2, 10 (CA 1)', texto)
+
+    def test_indice_responde_igual_a_consulta_direta(self, _print):
+        esperado_lista = listar_fachadas_dfv('30130000')
+        esperado_fachada = consultar_fachada_dfv('30130000', '07')
+
+        resultado = dfv_indice.reconstruir_indice()
+        self.assertEqual(resultado['ceps'], 2)
+        self.assertEqual(DFVIndiceCep.objects.get(cep='30130000').total_viaveis, 2)
+
+        with self.assertNumQueries(2):  # versão + CEP; depois tudo em memória
+            self.assertEqual(listar_fachadas_dfv('30130000'), esperado_lista)
+            self.assertEqual(consultar_fachada_dfv('30130000', '07'), esperado_fachada)
+            self.assertTrue(_cep_numero_viavel_no_dfv('30130000', '10 (CA 1)'))
+            self.assertFalse(_cep_numero_viavel_no_dfv('30130000', '7'))
+        self.assertIn('NENHUMA FACHADA', listar_fachadas_dfv('30140000'))
+
+    def test_fachada_mantem_tipo_e_logradouro_da_propria_linha(self, _print):
+        # Rua diferente da do cabeçalho (1ª viável), tipo em minúsculas e número repetido:
+        # vale a linha de menor pk, como o .first() da consulta direta.
+        DFV.objects.create(cep='30130000', num_fachada='15', logradouro='TRAVESSA B',
+                           tipo_viabilidade='inviavel - sem cdo', bairro='CENTRO')
+        DFV.objects.create(cep='30130000', num_fachada='15', logradouro='RUA A',
+                           tipo_viabilidade='VIAVEL', bairro='CENTRO')
+        esperado = consultar_fachada_dfv('30130000', '15')
+        self.assertIn('Status: *INVIAVEL - SEM CDO*', esperado)
+        self.assertIn('End: TRAVESSA B, 15', esperado)
+
+        dfv_indice.reconstruir_indice()
+        self.assertEqual(consultar_fachada_dfv('30130000', '15'), esperado)
+        self.assertIn('End: RUA A, 2', consultar_fachada_dfv('30130000', '2'))
+        self.assertEqual(DFVIndiceCep.objects.get(cep='30130000').dados['logradouros'], {'15': 'TRAVESSA B'})
+
+    def test_lote_kmz(self, _print):
+        dfv_indice.reconstruir_indice()
+        resultado = dfv_indice.numeros_viaveis_lote([
+            ('30130000', '10'), ('30130000', '7'), ('30140000', '1'), ('99999999', '1'),
+        ])
+        self.assertEqual(list(resultado.values()), [True, False, False, False])
+
+    def test_reconstrucao_invalida_cache_local(self, _print):
+        dfv_indice.reconstruir_indice()
+        self.assertFalse(_cep_numero_viavel_no_dfv('30140000', '1'))
+        DFV.objects.filter(cep='30140000').update(tipo_viabilidade='VIAVEL')
+        dfv_indice.reconstruir_indice()
+        self.assertTrue(_cep_numero_viavel_no_dfv('30140000', '1'))
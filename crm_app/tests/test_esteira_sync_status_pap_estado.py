@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from crm_app.esteira_sync_status_pap_estado import (
+    calcular_proxima_verificacao,
+    registrar_verificacao_pap,
+    separar_vendas_para_sync,
+)
+from crm_app.models import Cliente, MotivoPendencia, StatusCRM, Venda, VendaSyncStatusPapEstado
+from usuarios.models import Perfil, Usuario
+
+
+@override_settings(
+    SYNC_ESTEIRA_ESTADO_INTERVALO_BASE_MIN=60,
+    SYNC_ESTEIRA_ESTADO_INTERVALO_MAX_MIN=24 * 60,
+)
+class EsteiraSyncStatusPapEstadoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.perfil = Perfil.objects.create(cod_perfil='T', nome='Admin')
+        cls.user = Usuario.objects.create_user(
+            username='user_sync_estado', password='SenhaSegura123', perfil=cls.perfil,
+        )
+        cls.cliente = Cliente.objects.create(cpf_cnpj='11122233344', nome_razao_social='CLI SYNC')
+        cls.st_agend = StatusCRM.objects.create(nome='AGENDADO', tipo='Esteira', estado='ABERTO')
+        cls.st_pend = StatusCRM.objects.create(nome='PENDENCIADA', tipo='Esteira', estado='ABERTO')
+        cls.motivo = MotivoPendencia.objects.create(nome='CLIENTE AUSENTE', tipo_pendencia='CLIENTE')
+
+    def _venda(self, **kwargs):
+        defaults = dict(
+            vendedor=self.user,
+            cliente=self.cliente,
+            status_esteira=self.st_agend,
+            ordem_servico='12345678',
+            data_agendamento=timezone.localdate() + timedelta(days=10),
+            periodo_agendamento='MANHA',
+            ativo=True,
+        )
+        defaults.update(kwargs)
+        return Venda.objects.create(**defaults)
+
+    def test_backoff_exponencial_em_venda_estavel(self):
+        venda = self._venda()
+        agora = timezone.now()
+        self.assertEqual(calcular_proxima_verificacao(venda, 0, agora=agora), agora + timedelta(minutes=60))
+        self.assertEqual(calcular_proxima_verificacao(venda, 3, agora=agora), agora + timedelta(minutes=480))
+        self.assertEqual(calcular_proxima_verificacao(venda, 20, agora=agora), agora + timedelta(hours=24))
+
+    def test_agendamento_proximo_fica_no_intervalo_base(self):
+        venda = self._venda(data_agendamento=timezone.localdate() + timedelta(days=1))
+        agora = timezone.now()
+        self.assertEqual(calcular_proxima_verificacao(venda, 5, agora=agora), agora + timedelta(minutes=60))
+
+    def test_registrar_verificacao_acumula_sem_alteracao_e_zera_ao_mudar(self):
+        venda = self._venda()
+        registrar_verificacao_pap(venda.id)
+        estado = registrar_verificacao_pap(venda.id)
+        self.assertEqual(estado.verificacoes_sem_alteracao, 2)
+        hash_anterior = estado.snapshot_hash
+
+        venda.data_agendamento = date(2030, 1, 2)
+        venda.save()
+        estado = registrar_verificacao_pap(venda.id)
+        self.assertEqual(estado.verificacoes_sem_alteracao, 0)
+        self.assertNotEqual(estado.snapshot_hash, hash_anterior)
+
+    def test_separar_pula_estavel_e_prioriza_pendencia_recente(self):
+        estavel = self._venda(ordem_servico='11111111')
+        nova = self._venda(ordem_servico='22222222')
+        pendente = self._venda(
+            ordem_servico='33333333',
+            status_esteira=self.st_pend,
+            motivo_pendencia=self.motivo,
+            data_agendamento=None,
+        )
+        registrar_verificacao_pap(estavel.id)
+        registrar_verificacao_pap(pendente.id)
+
+        vendas = Venda.objects.select_related('status_esteira').filter(
+            pk__in=[estavel.id, nova.id, pendente.id]
+        ).order_by('id')
+        fila, puladas = separar_vendas_para_sync(vendas)
+        self.assertEqual([v.id for v in fila], [pendente.id, nova.id])
+        self.assertEqual([v.id for v in puladas], [estavel.id])
+
+    def test_alteracao_fora_do_sync_volta_para_fila(self):
+        venda = self._venda()
+        registrar_verificacao_pap(venda.id)
+        Venda.objects.filter(pk=venda.id).update(periodo_agendamento='TARDE')
+
+        vendas = Venda.objects.select_related('status_esteira').filter(pk=venda.id)
+        fila, puladas = separar_vendas_para_sync(vendas)
+        self.assertEqual([v.id for v in fila], [venda.id])
+        self.assertEqual(puladas, [])
+        self.assertTrue(VendaSyncStatusPapEstado.objects.filter(venda=venda).exists())
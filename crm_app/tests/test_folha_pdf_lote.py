@@ -0,0 +1,200 @@
+"""Lotes de PDF folha + extrato: execução do lote, envio WhatsApp, ZIP em streaming e endpoints."""
+import io
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from crm_app.job_fila import (
+    JobFila,
+    enfileirar_job,
+    processar_proximo_job,
+    reivindicar_proximo_job,
+    retomar_jobs_orfaos,
+)
+from crm_app.models import LoteFolhaPdf, LoteFolhaPdfItem
+from crm_app.services import folha_pdf_lote
+from usuarios.models import Perfil, Usuario
+
+PDF_FAKE = b'%PDF-1.4 fake'
+
+
+def _folha(*vendedores):
+    return {
+        'periodo': '03/2026',
+        'vendedores': [
+            {'vendedor_id': v.pk, 'vendedor_nome': v.username.title(), 'resumo': {'liquido': 100}}
+            for v in vendedores
+        ],
+    }
+
+
+class NomesEZipTest(SimpleTestCase):
+    def test_nomes_de_arquivo(self):
+        self.assertEqual(
+            folha_pdf_lote.nome_pdf_whatsapp({'vendedor_nome': 'Ana Maria'}, 2026, 3),
+            'Folha_Comissao_Ana_Maria_3_2026.pdf',
+        )
+        consultor = mock.Mock(username='ana.maria')
+        self.assertEqual(
+            folha_pdf_lote.nome_pdf_download(consultor, {}, 3),
+            'FECHAMENTO VENDAS - MARÇO ana_maria.pdf',
+        )
+        self.assertEqual(folha_pdf_lote.nome_zip_download(13), 'FECHAMENTO VENDAS - MES_13 MULTIPLOS.zip')
+
+    def test_zip_em_pedacos_e_valido(self):
+        arquivos = [(f'arq{i}.pdf', bytes([i]) * 5000) for i in range(3)]
+        pedacos = list(folha_pdf_lote.gerar_zip(iter(arquivos)))
+        self.assertGreaterEqual(len(pedacos), 3)
+        with zipfile.ZipFile(io.BytesIO(b''.join(pedacos))) as zf:
+            self.assertEqual(zf.namelist(), ['arq0.pdf', 'arq1.pdf', 'arq2.pdf'])
+            self.assertEqual(zf.read('arq2.pdf'), bytes([2]) * 5000)
+
+
+class ExecutarLoteTest(TestCase):
+    def setUp(self):
+        self.ana = Usuario.objects.create_user(username='ana', password='x', tel_whatsapp='5521999990001')
+        self.bia = Usuario.objects.create_user(username='bia', password='x', tel_whatsapp='5521999990002')
+        self.caio = Usuario.objects.create_user(username='caio', password='x')
+
+    def _lote(self, tipo, **kw):
+        return folha_pdf_lote.criar_lote(
+            usuario=self.ana, tipo=tipo, ano=2026, mes=3,
+            vendedores_ids=[self.ana.pk, self.bia.pk, self.caio.pk], usar_data_efetiva=False, **kw,
+        )
+
+    def test_download_grava_itens_e_marca_parcial(self):
+        lote = self._lote(LoteFolhaPdf.TIPO_DOWNLOAD)
+        render = mock.Mock(side_effect=lambda html: None if 'Bia' in html else PDF_FAKE)
+        with mock.patch.object(folha_pdf_lote, 'obter_folha_exportacao', return_value=_folha(self.ana, self.bia)), \
+                mock.patch.object(folha_pdf_lote, 'renderizar_pdf', render):
+            resultado = folha_pdf_lote.executar_lote(lote.pk, processos=0)
+
+        self.assertEqual(resultado['gerados'], [self.ana.pk])
+        self.assertEqual(len(resultado['erros']), 2)
+        lote.refresh_from_db()
+        self.assertEqual(lote.status, LoteFolhaPdf.STATUS_PARCIAL)
+        self.assertEqual((lote.total, lote.renderizados), (3, 1))
+        self.assertEqual(
+            list(lote.itens.order_by('vendedor_id').values_list('status', flat=True)),
+            [LoteFolhaPdfItem.STATUS_GERADO, LoteFolhaPdfItem.STATUS_ERRO],
+        )
+        self.assertEqual(list(folha_pdf_lote.arquivos_do_lote(lote)), [('FECHAMENTO VENDAS - MARÇO ana.pdf', PDF_FAKE)])
+
+    def test_whatsapp_envia_em_paralelo_e_fecha_mes(self):
+        lote = self._lote(LoteFolhaPdf.TIPO_WHATSAPP, fechar_mes=True)
+        svc = mock.Mock()
+        svc.enviar_pdf_b64.side_effect = lambda tel, *a, **kw: {'error': 'x'} if tel.endswith('2') else {'ok': True}
+        with mock.patch.object(folha_pdf_lote, 'obter_folha_exportacao', return_value=_folha(self.ana, self.bia, self.caio)), \
+                mock.patch.object(folha_pdf_lote, 'renderizar_pdf', return_value=PDF_FAKE), \
+                mock.patch('crm_app.whatsapp_service.WhatsAppService', return_value=svc), \
+                mock.patch('crm_app.views._fechar_pagamento_mes') as fechar:
+            resultado = folha_pdf_lote.executar_lote(lote.pk, processos=0)
+
+        self.assertEqual(resultado['enviados'], [self.ana.pk])
+        self.assertEqual(svc.enviar_pdf_b64.call_count, 2)
+        self.assertEqual(resultado['erros'], ['caio: sem WhatsApp cadastrado', 'bia: falha no envio WhatsApp'])
+        fechar.assert_called_once_with(2026, 3, total_pago=300.0)
+        lote.refresh_from_db()
+        self.assertEqual((lote.status, lote.enviados), (LoteFolhaPdf.STATUS_PARCIAL, 1))
+        self.assertEqual(lote.itens.get(vendedor_id=self.ana.pk).status, LoteFolhaPdfItem.STATUS_ENVIADO)
+
+    def test_lote_pela_fila_generica_vira_erro_se_o_processo_morrer(self):
+        lote = self._lote(LoteFolhaPdf.TIPO_WHATSAPP)
+        with mock.patch('crm_app.job_fila.threading.Thread') as thread, \
+                self.captureOnCommitCallbacks(execute=True):
+            folha_pdf_lote.iniciar_em_background(lote.pk)
+        thread.return_value.start.assert_called_once()
+        job = JobFila.objects.get(tipo='folha_pdf')
+        self.assertEqual((job.fila, job.payload, job.max_tentativas), ('folha', {'lote_id': lote.pk}, 1))
+
+        # Web reciclado depois do claim: lease vence sem heartbeat e o scheduler fecha o lote.
+        self.assertEqual(reivindicar_proximo_job(job_id=job.pk).pk, job.pk)
+        LoteFolhaPdf.objects.filter(pk=lote.pk).update(status=LoteFolhaPdf.STATUS_PROCESSANDO)
+        JobFila.objects.filter(pk=job.pk).update(lease_ate=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(retomar_jobs_orfaos()['erro'], 1)
+        lote.refresh_from_db()
+        self.assertEqual(lote.status, LoteFolhaPdf.STATUS_ERRO)
+        self.assertIn('Lote interrompido', lote.mensagem)
+        self.assertIsNotNone(lote.finalizado_em)
+
+    def test_lote_pendente_sem_thread_vira_erro(self):
+        lote = self._lote(LoteFolhaPdf.TIPO_DOWNLOAD)
+        job = enfileirar_job('folha_pdf', {'lote_id': lote.pk})
+        self.assertEqual(retomar_jobs_orfaos()['erro'], 0)
+        JobFila.objects.filter(pk=job.pk).update(criado_em=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(retomar_jobs_orfaos()['erro'], 1)
+        lote.refresh_from_db()
+        self.assertEqual(lote.status, LoteFolhaPdf.STATUS_ERRO)
+
+    def test_handler_executa_o_lote(self):
+        lote = self._lote(LoteFolhaPdf.TIPO_DOWNLOAD)
+        job = enfileirar_job('folha_pdf', {'lote_id': lote.pk})
+        with mock.patch.object(folha_pdf_lote, 'executar_lote') as executar:
+            self.assertTrue(processar_proximo_job(job_id=job.pk))
+        executar.assert_called_once_with(lote.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobFila.STATUS_CONCLUIDO)
+
+
+class LoteFolhaPdfEndpointsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        perfil = Perfil.objects.create(nome='Diretoria', cod_perfil='DIR_PDF')
+        cls.gestor = Usuario.objects.create_user(username='gestor_pdf', password='x', perfil=perfil)
+        cls.outro = Usuario.objects.create_user(username='outro_pdf', password='x')
+        cls.v1 = Usuario.objects.create_user(username='v1_pdf', password='x')
+        cls.v2 = Usuario.objects.create_user(username='v2_pdf', password='x')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.gestor)
+
+    def test_varios_vendedores_vira_lote_com_status_e_zip(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            resp = self.client.post(
+                '/api/crm/comissionamento/exportar-folha-extrato-pdf/',
+                {'ano': 2026, 'mes': 3, 'vendedores_ids': [self.v1.pk, self.v2.pk]},
+                format='json',
+            )
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(callbacks), 1)
+        lote_id = resp.data['lote_id']
+        self.assertTrue(resp.data['status_url'].endswith(f'/api/crm/comissionamento/lote-folha-pdf/{lote_id}/'))
+        self.assertEqual(
+            self.client.get(f'/api/crm/comissionamento/lote-folha-pdf/{lote_id}/download/').status_code,
+            status.HTTP_409_CONFLICT,
+        )
+
+        with mock.patch.object(folha_pdf_lote, 'obter_folha_exportacao', return_value=_folha(self.v1, self.v2)), \
+                mock.patch.object(folha_pdf_lote, 'renderizar_pdf', return_value=PDF_FAKE):
+            folha_pdf_lote.executar_lote(lote_id, processos=0)
+
+        st = self.client.get(f'/api/crm/comissionamento/lote-folha-pdf/{lote_id}/')
+        self.assertEqual((st.data['status'], st.data['concluido'], st.data['renderizados']), ('SUCESSO', True, 2))
+
+        dl = self.client.get(f'/api/crm/comissionamento/lote-folha-pdf/{lote_id}/download/')
+        self.assertEqual(dl['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(dl.streaming_content))) as zf:
+            self.assertEqual(len(zf.namelist()), 2)
+
+        self.client.force_authenticate(user=self.outro)
+        self.assertEqual(
+            self.client.get(f'/api/crm/comissionamento/lote-folha-pdf/{lote_id}/').status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_um_vendedor_continua_sincrono(self):
+        with mock.patch.object(folha_pdf_lote, 'obter_folha_exportacao', return_value=_folha(self.v1)), \
+                mock.patch.object(folha_pdf_lote, 'renderizar_pdf', return_value=PDF_FAKE):
+            resp = self.client.post(
+                '/api/crm/comissionamento/exportar-folha-extrato-pdf/',
+                {'ano': 2026, 'mes': 3, 'vendedor_id': self.v1.pk},
+                format='json',
+            )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['Content-Type'], 'application/pdf')
+        self.assertEqual(resp.content, PDF_FAKE)
@@ -0,0 +1,92 @@
+"""Importação de Agendamento/Recompra: normalização por coluna, upsert em lote e tempos por etapa."""
+from datetime import date, datetime
+from io import BytesIO
+
+import pandas as pd
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from crm_app.models import (
+    ImportacaoAgendamento,
+    ImportacaoRecompra,
+    LogImportacaoAgendamento,
+    LogImportacaoRecompra,
+)
+from crm_app.services.importacao_agendamento_recompra import processar_agendamento, processar_recompra
+
+
+def _xlsx(linhas):
+    buffer = BytesIO()
+    pd.DataFrame(linhas).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+@override_settings(IMPORTACAO_AGENDAMENTO_LOTE=2)
+class ImportacaoAgendamentoTest(TestCase):
+    def test_upsert_por_ordem_venda_em_lotes(self):
+        existente = ImportacaoAgendamento.objects.create(nr_ordem_venda='00123', st_ba='ABERTO')
+        arquivo = _xlsx([
+            {'NR_ORDEM_VENDA': '00123', 'ST_BA': 'FECHADO', 'DT_AGENDAMENTO': '2026-10-20',
+             'DT_INICIO_EXECUCAO_REAL': '2026-10-20 08:00', 'CD_NRBA': 'BA7'},
+            {'NR_ORDEM_VENDA': ' 555 ', 'ST_BA': 'ABERTO', 'DT_AGENDAMENTO': 'lixo',
+             'DT_INICIO_EXECUCAO_REAL': '1850-01-01 08:00', 'CD_NRBA': None},
+            {'NR_ORDEM_VENDA': None, 'ST_BA': 'SEM OS', 'DT_AGENDAMENTO': None,
+             'DT_INICIO_EXECUCAO_REAL': None, 'CD_NRBA': 'BA8'},
+            {'NR_ORDEM_VENDA': '555', 'ST_BA': 'REAGENDADO', 'DT_AGENDAMENTO': '2026-10-21',
+             'DT_INICIO_EXECUCAO_REAL': None, 'CD_NRBA': 'BA9'},
+        ])
+        log = LogImportacaoAgendamento.objects.create(nome_arquivo='ag.xlsx', status='PROCESSANDO')
+
+        processar_agendamento(log.id, arquivo, 'ag.xlsx')
+
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'SUCESSO', log.mensagem_erro)
+        self.assertEqual((log.total_linhas, log.agendamentos_criados, log.agendamentos_atualizados), (4, 2, 2))
+        self.assertEqual(
+            set(log.detalhes_json['etapas_ms']), {'leitura', 'normalizacao', 'resolucao', 'gravacao', 'total'},
+        )
+
+        existente.refresh_from_db()
+        self.assertEqual((existente.st_ba, existente.cd_nrba), ('FECHADO', 'BA7'))
+        self.assertEqual(existente.dt_agendamento, date(2026, 10, 20))
+        self.assertEqual(
+            timezone.localtime(existente.dt_inicio_execucao_real).replace(tzinfo=None), datetime(2026, 10, 20, 8, 0),
+        )
+        # 555 é criado no 1º lote e atualizado no 2º (espaços removidos da chave)
+        novo = ImportacaoAgendamento.objects.get(nr_ordem_venda='555')
+        self.assertEqual((novo.st_ba, novo.cd_nrba, novo.dt_agendamento), ('REAGENDADO', 'BA9', date(2026, 10, 21)))
+        self.assertIsNone(novo.dt_inicio_execucao_real)
+        self.assertTrue(ImportacaoAgendamento.objects.filter(nr_ordem_venda__isnull=True, st_ba='SEM OS').exists())
+        self.assertEqual(ImportacaoAgendamento.objects.count(), 3)
+
+    def test_cancelado_e_formato_invalido(self):
+        log = LogImportacaoAgendamento.objects.create(nome_arquivo='ag.csv', status='PROCESSANDO')
+        processar_agendamento(log.id, b'x', 'ag.csv')
+        log.refresh_from_db()
+        self.assertEqual((log.status, log.mensagem_erro), ('ERRO', 'Formato inválido. Envie .xlsx, .xls ou .xlsb'))
+
+        log = LogImportacaoAgendamento.objects.create(nome_arquivo='ag.xlsx', status='CANCELADO')
+        processar_agendamento(log.id, _xlsx([{'NR_ORDEM_VENDA': '1'}]), 'ag.xlsx')
+        self.assertFalse(ImportacaoAgendamento.objects.exists())
+
+
+class ImportacaoRecompraTest(TestCase):
+    def test_bulk_create_normalizado(self):
+        arquivo = _xlsx([
+            {'nr_ordem': ' 42 ', 'dt_encerramento': '2026-09-30', 'resultado': '', 'REDE': 'X'},
+            {'nr_ordem': 43, 'dt_encerramento': 'invalida', 'resultado': 'OK', 'REDE': None},
+        ])
+        log = LogImportacaoRecompra.objects.create(nome_arquivo='rc.xlsx', status='PROCESSANDO')
+
+        processar_recompra(log.id, arquivo, 'rc.xlsx')
+
+        log.refresh_from_db()
+        self.assertEqual((log.status, log.registros_criados, log.total_linhas), ('SUCESSO', 2, 2))
+        self.assertIn('gravacao', log.detalhes_json['etapas_ms'])
+        linhas = {r.nr_ordem: r for r in ImportacaoRecompra.objects.all()}
+        self.assertEqual(set(linhas), {'42', '43'})
+        self.assertEqual(linhas['42'].dt_encerramento, date(2026, 9, 30))
+        self.assertIsNone(linhas['42'].resultado)
+        self.assertIsNone(linhas['43'].dt_encerramento)
+        self.assertIsNone(linhas['43'].REDE)
+        self.assertIsNone(linhas['43'].nm_seg)
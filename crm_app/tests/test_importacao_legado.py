@@ -0,0 +1,227 @@
+"""Importações como jobs da fila genérica: Legado em chunks com checkpoint, lease e run_worker."""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from crm_app import job_fila
+from crm_app.job_fila import (
+    JobFila,
+    JobPerdido,
+    heartbeat,
+    processar_job,
+    processar_proximo_job,
+    recuperar_jobs_travados,
+    reivindicar_proximo_job,
+    retomar_jobs_orfaos,
+)
+from crm_app.management.commands.run_worker import parse_filas
+from crm_app.models import Cliente, LogImportacaoAgendamento, LogImportacaoLegado, Venda
+from crm_app.services import importacao_jobs
+from crm_app.services import importacao_legado_service as servico
+
+MEDIA_TMP = tempfile.mkdtemp()
+
+
+def _xlsx(linhas):
+    buffer = BytesIO()
+    pd.DataFrame(linhas).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _planilha():
+    linhas = [
+        {'CPF_CNPJ_CLIENTE': f'1234567890{i}', 'NOME_CLIENTE': f'cliente {i}', 'DATA_VENDA': '10/01/2024', 'OS': f'00{i}'}
+        for i in range(1, 5)
+    ]
+    linhas.insert(2, {'CPF_CNPJ_CLIENTE': 'abc', 'NOME_CLIENTE': 'sem cpf', 'DATA_VENDA': None, 'OS': None})
+    return _xlsx(linhas)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TMP, IMPORTACAO_UPLOAD_STORAGE='local', IMPORTACAO_LEGADO_CHUNK=2, JOBS_WORKER_FILAS=['imports'])
+class ImportacaoLegadoJobTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TMP, ignore_errors=True)
+
+    def setUp(self):
+        self.log = LogImportacaoLegado.objects.create(nome_arquivo='legado.xlsx', status='PROCESSANDO')
+        self.job = servico.iniciar_importacao_legado(self.log, _planilha(), 'legado.xlsx')
+
+    def test_retoma_do_ultimo_chunk_gravado(self):
+        original = servico._montar_vendas
+        chamadas = []
+
+        def _cai_no_segundo_chunk(fatia, caches):
+            chamadas.append(len(fatia))
+            if len(chamadas) == 2:
+                raise RuntimeError('processo reciclado')
+            return original(fatia, caches)
+
+        with mock.patch.object(servico, '_montar_vendas', side_effect=_cai_no_segundo_chunk):
+            self.assertTrue(processar_proximo_job())
+
+        self.job.refresh_from_db()
+        self.log.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.payload['proxima_linha']), ('pendente', 2))
+        self.assertEqual((self.log.status, self.log.vendas_criadas, self.log.total_linhas), ('PROCESSANDO', 2, 5))
+        self.assertEqual(Venda.objects.count(), 2)
+
+        self.assertTrue(processar_proximo_job())
+
+        self.job.refresh_from_db()
+        self.log.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.tentativas), ('concluido', 2))
+        self.assertEqual(self.log.status, 'PARCIAL')
+        self.assertEqual((self.log.vendas_criadas, self.log.clientes_criados, self.log.erros_count), (4, 4, 1))
+        self.assertEqual(self.log.mensagem_erro, 'Linha 4: CPF inválido ou vazio (abc).')
+        self.assertEqual(Venda.objects.count(), 4)
+        self.assertEqual(Cliente.objects.count(), 4)
+        self.assertEqual(set(Venda.objects.values_list('ordem_servico', flat=True)), {'001', '002', '003', '004'})
+        progresso = self.log.detalhes_json['progresso']
+        self.assertEqual((progresso['linhas_concluidas'], progresso['retomadas'], progresso['eta_segundos']), (5, 1, 0))
+        caminho = os.path.join(MEDIA_TMP, self.job.payload['arquivo'].removeprefix(importacao_jobs.PREFIXO_LOCAL))
+        self.assertFalse(os.path.exists(caminho))
+
+    def test_recupera_job_com_lease_vencido(self):
+        vencido = timezone.now() - timedelta(minutes=1)
+        JobFila.objects.filter(pk=self.job.pk).update(status=JobFila.STATUS_PROCESSANDO, tentativas=1, lease_ate=vencido)
+        JobFila.objects.create(tipo='legado', status=JobFila.STATUS_PROCESSANDO, lease_ate=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual(recuperar_jobs_travados(['imports']), {'requeued': 1, 'erro': 0})
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobFila.STATUS_PENDENTE)
+
+        JobFila.objects.filter(pk=self.job.pk).update(status=JobFila.STATUS_PROCESSANDO, tentativas=3, lease_ate=vencido)
+        self.assertEqual(recuperar_jobs_travados(), {'requeued': 0, 'erro': 1})
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.status, 'ERRO')
+        self.assertIn('sem heartbeat', self.log.mensagem_erro)
+
+    def test_execucao_reassumida_descarta_chunk(self):
+        job = reivindicar_proximo_job(['imports'])
+        # Outra execução já reassumiu o job (nova tentativa): o checkpoint desta não vale mais
+        JobFila.objects.filter(pk=job.pk).update(tentativas=5)
+        with self.assertRaises(JobPerdido):
+            heartbeat(job, {**job.payload, 'proxima_linha': 2})
+        self.assertFalse(processar_job(job))
+        self.assertFalse(Venda.objects.exists())
+        self.assertEqual(JobFila.objects.get(pk=job.pk).payload['proxima_linha'], 0)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TMP, IMPORTACAO_UPLOAD_STORAGE='local', JOBS_WORKER_FILAS=['imports'])
+class ImportacaoViewsJobTest(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(user=get_user_model().objects.create_user('legado', password='x'))
+
+    def test_upload_enfileira_e_log_mostra_progresso(self):
+        # Cada workbook leva o timestamp de criação: os bytes são gerados uma vez só
+        conteudo = _planilha()
+        arquivo = SimpleUploadedFile('legado.xlsx', conteudo)
+        resp = self.client.post('/api/crm/import/legado/', {'file': arquivo}, format='multipart')
+        self.assertEqual(resp.status_code, 200, resp.data)
+
+        log = LogImportacaoLegado.objects.get(pk=resp.data['log_id'])
+        job = JobFila.objects.get(payload__log_id=log.id, tipo='legado')
+        self.assertEqual((job.status, job.fila), ('pendente', 'imports'))
+        self.assertEqual(importacao_jobs.carregar_upload(job.payload['arquivo']), conteudo)
+
+        log.total_linhas = 5
+        log.detalhes_json = {**log.detalhes_json, 'progresso': {
+            'linhas_concluidas': 2, 'linhas_por_segundo': 4.0, 'eta_segundos': 1, 'retomadas': 0,
+        }}
+        log.save()
+        dados = self.client.get('/api/crm/logs-legado/').data['logs'][0]
+        self.assertEqual(
+            (dados['linhas_concluidas'], dados['linhas_por_segundo'], dados['eta_segundos']), (2, 4.0, 1),
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TMP, IMPORTACAO_UPLOAD_STORAGE='local', JOBS_WORKER_FILAS=['imports'], JOBS_CONCORRENCIA={'imports': 1, 'webhook': 2})
+class JobFilaImportacoesTest(TestCase):
+    def test_importacao_sem_checkpoint_interrompida_fecha_log(self):
+        log = LogImportacaoAgendamento.objects.create(nome_arquivo='agenda.xlsx', status='PROCESSANDO')
+        job = importacao_jobs.despachar_importacao('agendamento', log, b'conteudo', 'agenda.xlsx')
+        self.assertEqual((job.fila, job.max_tentativas), ('imports', 1))
+
+        JobFila.objects.filter(pk=job.pk).update(
+            status=JobFila.STATUS_PROCESSANDO, tentativas=1, lease_ate=timezone.now() - timedelta(minutes=1),
+        )
+        self.assertEqual(recuperar_jobs_travados(), {'requeued': 0, 'erro': 1})
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'ERRO')
+        self.assertIn(importacao_jobs.MENSAGEM_INTERROMPIDA, log.mensagem_erro)
+        caminho = os.path.join(MEDIA_TMP, job.payload['arquivo'].removeprefix(importacao_jobs.PREFIXO_LOCAL))
+        self.assertFalse(os.path.exists(caminho))
+
+    def test_scheduler_so_recupera_leases_e_nao_executa_handlers(self):
+        log = LogImportacaoLegado.objects.create(nome_arquivo='legado.xlsx', status='PROCESSANDO')
+        job = servico.iniciar_importacao_legado(log, _planilha(), 'legado.xlsx')
+        JobFila.objects.filter(pk=job.pk).update(
+            status=JobFila.STATUS_PROCESSANDO, tentativas=1, lease_ate=timezone.now() - timedelta(minutes=1),
+        )
+        self.assertEqual(retomar_jobs_orfaos(), {'requeued': 1, 'erro': 0})
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobFila.STATUS_PENDENTE)
+        self.assertEqual(retomar_jobs_orfaos(), {'requeued': 0, 'erro': 0})
+        self.assertEqual(JobFila.objects.get(pk=job.pk).status, JobFila.STATUS_PENDENTE)
+        self.assertFalse(Venda.objects.exists())
+
+    def test_fila_sem_worker_dedicado_nao_recoloca(self):
+        log = LogImportacaoLegado.objects.create(nome_arquivo='legado.xlsx', status='PROCESSANDO')
+        job = JobFila.objects.create(
+            tipo='legado', payload={'log_id': log.id}, status=JobFila.STATUS_PROCESSANDO, tentativas=1,
+            lease_ate=timezone.now() - timedelta(minutes=1),
+        )
+        with override_settings(JOBS_WORKER_FILAS=[]):
+            self.assertEqual(retomar_jobs_orfaos(), {'requeued': 0, 'erro': 1})
+        self.assertEqual(JobFila.objects.get(pk=job.pk).status, JobFila.STATUS_ERRO)
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'ERRO')
+
+    def test_pendente_orfao_nao_fica_atras_das_filas_com_worker(self):
+        # 100+ pendentes mais antigos na fila com worker não escondem o órfão da fila da thread
+        JobFila.objects.bulk_create([JobFila(tipo='legado', fila='imports') for _ in range(101)])
+        orfao = JobFila.objects.create(tipo='sem_handler', fila='folha')
+        velho = timezone.now() - timedelta(days=1)
+        JobFila.objects.update(criado_em=velho)
+        JobFila.objects.filter(pk=orfao.pk).update(criado_em=velho + timedelta(minutes=1))
+
+        self.assertEqual(recuperar_jobs_travados(), {'requeued': 0, 'erro': 1})
+        self.assertEqual(JobFila.objects.get(pk=orfao.pk).status, JobFila.STATUS_ERRO)
+        self.assertEqual(JobFila.objects.filter(status=JobFila.STATUS_PENDENTE).count(), 101)
+
+    def test_recuperacao_nao_mexe_em_job_que_acabou_de_concluir(self):
+        job = JobFila.objects.create(
+            tipo='legado', status=JobFila.STATUS_PROCESSANDO, tentativas=1,
+            lease_ate=timezone.now() - timedelta(minutes=1),
+        )
+        # O worker concluiu entre a leitura do lease vencido e o requeue
+        JobFila.objects.filter(pk=job.pk).update(status=JobFila.STATUS_CONCLUIDO)
+
+        self.assertFalse(job_fila._falhar(job, None, 'Lease vencido'))
+        self.assertFalse(job_fila._falhar(job, None, 'Lease vencido', definitiva=True))
+        self.assertEqual(JobFila.objects.get(pk=job.pk).status, JobFila.STATUS_CONCLUIDO)
+
+    @override_settings(IMPORTACAO_UPLOAD_STORAGE='r2', CLOUDFLARE_R2_ACCOUNT_ID='')
+    def test_upload_sem_r2_configurado_falha_no_despacho(self):
+        log = LogImportacaoAgendamento.objects.create(nome_arquivo='agenda.xlsx', status='PROCESSANDO')
+        with self.assertRaises(Exception):
+            importacao_jobs.despachar_importacao('agendamento', log, b'conteudo', 'agenda.xlsx')
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'ERRO')
+        self.assertFalse(JobFila.objects.exists())
+
+    def test_parse_filas(self):
+        self.assertEqual(parse_filas('imports:3, pap ,webhook'), {'imports': 3, 'pap': 1, 'webhook': 2})
+        self.assertEqual(parse_filas(None), {'imports': 1})
@@ -0,0 +1,32 @@
+import sys
+
+from django.test import SimpleTestCase
+
+from crm_app.lazy_imports import LazyModule, lazy_attr
+from crm_app.management.commands.perfil_importacao import parse_importtime
+
+
+class LazyImportsTests(SimpleTestCase):
+    def test_lazy_module_so_importa_no_primeiro_acesso(self):
+        mod = LazyModule('json')
+        self.assertFalse(mod.carregado)
+        self.assertEqual(mod.dumps([1]), '[1]')
+        self.assertTrue(mod.carregado)
+        self.assertIs(mod._carregar(), sys.modules['json'])
+
+    def test_lazy_attr_chamavel(self):
+        OrderedDict = lazy_attr('collections', 'OrderedDict')
+        self.assertEqual(list(OrderedDict([('a', 1)])), ['a'])
+        self.assertEqual(OrderedDict.__name__, 'OrderedDict')
+
+    def test_parse_importtime_nivel_pela_indentacao(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   json.decoder\n'
+            'import time:       300 |        420 | json\n'
+            'outra linha qualquer\n'
+        )
+        self.assertEqual(
+            parse_importtime(stderr),
+            [('json.decoder', 120, 120, 1), ('json', 300, 420, 0)],
+        )
@@ -0,0 +1,141 @@
+"""Testes do cache compartilhado de token/sessionId da API Nio e da consulta em lote."""
+import time
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from crm_app import nio_api
+
+_LOCMEM = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "nio-api-cache-tests",
+    }
+}
+
+PARAMS = {"token": "tok-1", "apiServerUrl": "https://api.nio.test"}
+
+
+def _debts(cpf):
+    return {"debts": [{"debtId": f"d-{cpf}", "invoices": [{"id": "i1", "amount": 99.9}]}]}
+
+
+def _http_error(status):
+    resp = requests.Response()
+    resp.status_code = status
+    return requests.HTTPError(f"{status}", response=resp)
+
+
+@override_settings(CACHES=_LOCMEM, NIO_TOKEN_TTL_SEG=1800, NIO_TOKEN_RENOVAR_ANTES_SEG=300, NIO_SESSION_ID_TTL_SEG=600)
+class NioTokenCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self._limpar_local()
+
+    def tearDown(self):
+        cache.clear()
+        self._limpar_local()
+
+    def _limpar_local(self):
+        nio_api._token_cache.update({"params": None, "timestamp": 0})
+        nio_api._session_ids.clear()
+
+    @patch("crm_app.nio_api.fetch_params_requests", return_value=PARAMS)
+    def test_token_compartilhado_entre_processos(self, mock_fetch):
+        self.assertEqual(nio_api.get_cached_params(), PARAMS)
+        # Outro processo: memória local vazia, mas o cache compartilhado tem o token.
+        self._limpar_local()
+        self.assertEqual(nio_api.get_cached_params(), PARAMS)
+        mock_fetch.assert_called_once()
+
+    @patch("crm_app.nio_api.fetch_params_requests")
+    def test_aguarda_token_publicado_por_quem_tem_o_lock(self, mock_fetch):
+        cache.add(nio_api.CACHE_KEY_LOCK, "outro-host:1", timeout=60)
+
+        def publicar(_segundos):
+            cache.set(nio_api.CACHE_KEY_PARAMS, {"params": PARAMS, "timestamp": time.time()}, timeout=60)
+
+        with patch("crm_app.nio_api.time.sleep", side_effect=publicar):
+            self.assertEqual(nio_api.get_cached_params(), PARAMS)
+        mock_fetch.assert_not_called()
+
+    @patch("crm_app.nio_api.fetch_params_requests", return_value=PARAMS)
+    def test_nao_libera_lock_de_outro_processo(self, mock_fetch):
+        cache.add(nio_api.CACHE_KEY_LOCK, "outro-host:1", timeout=60)
+        with patch("crm_app.nio_api._aguardar_token_publicado", return_value=None):
+            self.assertEqual(nio_api.get_cached_params(), PARAMS)
+        mock_fetch.assert_called_once()
+        self.assertEqual(cache.get(nio_api.CACHE_KEY_LOCK), "outro-host:1")
+
+    @patch("crm_app.nio_api.fetch_params_requests", return_value=PARAMS)
+    def test_libera_o_proprio_lock_so_se_ainda_for_dono(self, _fetch):
+        dono = nio_api._adquirir_lock_global()
+        self.assertIsNone(nio_api._adquirir_lock_global())
+        cache.set(nio_api.CACHE_KEY_LOCK, "outro-host:2", timeout=60)  # expirou e outro pegou
+        nio_api._liberar_lock_global(dono)
+        self.assertEqual(cache.get(nio_api.CACHE_KEY_LOCK), "outro-host:2")
+        cache.set(nio_api.CACHE_KEY_LOCK, dono, timeout=60)
+        nio_api._liberar_lock_global(dono)
+        self.assertIsNone(cache.get(nio_api.CACHE_KEY_LOCK))
+
+    @patch("crm_app.nio_api._agendar_renovacao")
+    @patch("crm_app.nio_api.fetch_params_requests")
+    def test_token_perto_de_expirar_renova_em_background(self, mock_fetch, mock_agendar):
+        antigo = time.time() - 1600
+        cache.set(nio_api.CACHE_KEY_PARAMS, {"params": PARAMS, "timestamp": antigo}, timeout=600)
+        self.assertEqual(nio_api.get_cached_params(), PARAMS)
+        mock_agendar.assert_called_once()
+        mock_fetch.assert_not_called()
+
+    @patch("crm_app.nio_api.get_debts", side_effect=lambda api, tok, sid, cpf, *a: _debts(cpf))
+    @patch("crm_app.nio_api.get_session_id", return_value="sid-1")
+    @patch("crm_app.nio_api.fetch_params_requests", return_value=PARAMS)
+    def test_session_id_reaproveitado_entre_consultas(self, _fetch, mock_sid, _debts_mock):
+        r1 = nio_api.consultar_dividas_nio("11122233344")
+        r2 = nio_api.consultar_dividas_nio("55566677788")
+        self.assertEqual(r1["session_id"], "sid-1")
+        self.assertEqual(len(r2["invoices"]), 1)
+        mock_sid.assert_called_once()
+
+    @patch("crm_app.nio_api.get_session_id", side_effect=["sid-velho", "sid-novo"])
+    @patch("crm_app.nio_api.fetch_params_requests", return_value=PARAMS)
+    def test_session_id_recusado_e_renovado_uma_vez(self, _fetch, mock_sid):
+        chamadas = []
+
+        def get_debts(api, tok, sid, cpf, *args):
+            chamadas.append(sid)
+            if sid == "sid-velho":
+                raise _http_error(401)
+            return _debts(cpf)
+
+        with patch("crm_app.nio_api.get_debts", side_effect=get_debts):
+            resultado = nio_api.consultar_dividas_nio("11122233344")
+        self.assertEqual(chamadas, ["sid-velho", "sid-novo"])
+        self.assertEqual(resultado["session_id"], "sid-novo")
+
+    @patch("crm_app.nio_api.get_session_id", return_value="sid-1")
+    @patch("crm_app.nio_api.fetch_params_requests", return_value=PARAMS)
+    def test_lote_isola_erros_e_deduplica(self, _fetch, mock_sid):
+        def get_debts(api, tok, sid, cpf, *args):
+            if cpf == "99988877766":
+                raise _http_error(500)
+            return _debts(cpf)
+
+        with patch("crm_app.nio_api.get_debts", side_effect=MagicMock(side_effect=get_debts)) as mock_debts:
+            resultado = nio_api.consultar_dividas_nio_lote(
+                ["111.222.333-44", "11122233344", "99988877766", "123"],
+            )
+        self.assertEqual(set(resultado), {"11122233344", "99988877766", "123"})
+        self.assertEqual(len(resultado["11122233344"]["invoices"]), 1)
+        self.assertIn("erro", resultado["99988877766"])
+        self.assertIn("erro", resultado["123"])
+        self.assertEqual(mock_debts.call_count, 2)
+        mock_sid.assert_called_once()
+
+    @patch("crm_app.nio_api.get_cached_params", return_value=None)
+    def test_lote_sem_token_marca_todos_com_erro(self, _params):
+        resultado = nio_api.consultar_dividas_nio_lote(["11122233344", "55566677788"])
+        self.assertTrue(all("erro" in r for r in resultado.values()))
+        self.assertEqual(len(resultado), 2)
@@ -0,0 +1,170 @@
+"""Testes do cache por CPF das dívidas Nio (TTL, stale-while-revalidate, invalidação)."""
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from crm_app import nio_api, nio_dividas_cache
+from crm_app.models import CacheDividasNio
+from crm_app.services.nio_match_service import aplicar_match_na_fatura
+
+_LOCMEM = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "nio-dividas-cache-tests",
+    }
+}
+
+CPF = "11122233344"
+_CREDENCIAIS = {"token": "tv", "api_base": "https://api", "session_id": "sv"}
+
+
+def _resposta(n=1):
+    return {"token": "t", "api_base": "https://api", "session_id": "s", "invoices": [{"invoice_id": i} for i in range(n)]}
+
+
+@override_settings(CACHES=_LOCMEM, NIO_DIVIDAS_CACHE_TTL_SEG=300, NIO_DIVIDAS_CACHE_SWR_SEG=1800)
+class NioDividasCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        vigentes = patch("crm_app.nio_api.credenciais_vigentes", return_value=_CREDENCIAIS)
+        vigentes.start()
+        self.addCleanup(vigentes.stop)
+
+    def tearDown(self):
+        cache.clear()
+
+    def _envelhecer(self, segundos):
+        CacheDividasNio.objects.filter(cpf=CPF).update(consultado_em=F("consultado_em") - timedelta(seconds=segundos))
+
+    @patch("crm_app.nio_api.consultar_dividas_nio", return_value=_resposta())
+    def test_segunda_consulta_do_cpf_vem_do_cache(self, mock_api):
+        r1 = nio_dividas_cache.consultar_dividas_nio_cache("111.222.333-44", limit=50)
+        r2 = nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        self.assertEqual((r1["cache"], r2["cache"]), ("miss", "hit"))
+        self.assertEqual(r2["invoices"], r1["invoices"])
+        mock_api.assert_called_once()
+        stats = nio_dividas_cache.estatisticas()
+        self.assertEqual((stats["hit"], stats["miss"]), (1, 1))
+        self.assertEqual(stats["taxa_acerto"], 0.5)
+
+    @patch("crm_app.nio_api.consultar_dividas_nio", return_value=_resposta())
+    def test_paginas_diferentes_sao_entradas_diferentes(self, mock_api):
+        nio_dividas_cache.consultar_dividas_nio_cache(CPF, offset=0, limit=50)
+        nio_dividas_cache.consultar_dividas_nio_cache(CPF, offset=50, limit=50)
+        self.assertEqual(mock_api.call_count, 2)
+        # Uma linha por página, fora do cache do Django (só os contadores ficam lá).
+        self.assertEqual(
+            sorted(CacheDividasNio.objects.filter(cpf=CPF).values_list("pagina", flat=True)), ["0:50", "50:50"],
+        )
+        self.assertFalse([k for k in cache._cache if CPF in k])
+
+    def test_gravar_e_upsert_sem_sobrescrever_outras_paginas(self):
+        nio_dividas_cache._gravar(CPF, "0:50", _resposta(1))
+        nio_dividas_cache._gravar(CPF, "50:50", _resposta(2))
+        nio_dividas_cache._gravar(CPF, "0:50", _resposta(3))
+        self.assertEqual(CacheDividasNio.objects.filter(cpf=CPF).count(), 2)
+        self.assertEqual(len(nio_dividas_cache._ler(CPF, "0:50")["resultado"]["invoices"]), 3)
+        self.assertEqual(len(nio_dividas_cache._ler(CPF, "50:50")["resultado"]["invoices"]), 2)
+
+    @patch("crm_app.nio_api.consultar_dividas_nio", return_value=_resposta())
+    def test_hit_recebe_credenciais_vigentes(self, mock_api):
+        r = nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        self.assertEqual(r["token"], "t")
+        gravado = CacheDividasNio.objects.get(cpf=CPF).resultado
+        self.assertFalse(set(gravado) & {"token", "api_base", "session_id"})
+
+        # Sem credenciais válidas em cache, autentica de novo em vez de devolver as gravadas
+        with patch("crm_app.nio_api.credenciais_vigentes", return_value=None), \
+                patch("crm_app.nio_api._contexto_consulta", return_value=("t3", "https://api3")), \
+                patch("crm_app.nio_api.obter_session_id", return_value="s3"):
+            r = nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        self.assertEqual((r["token"], r["api_base"], r["session_id"], r["cache"]), ("t3", "https://api3", "s3", "hit"))
+        with patch("crm_app.nio_api.credenciais_vigentes", return_value=None), \
+                patch("crm_app.nio_api._contexto_consulta", side_effect=RuntimeError("captcha")):
+            with self.assertRaises(RuntimeError):
+                nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        novas = {"token": "t2", "api_base": "https://api2", "session_id": "s2"}
+        with patch("crm_app.nio_api.credenciais_vigentes", return_value=novas):
+            r = nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        self.assertEqual((r["token"], r["api_base"], r["session_id"]), ("t2", "https://api2", "s2"))
+
+    @patch("crm_app.nio_dividas_cache._agendar_renovacao")
+    @patch("crm_app.nio_api.consultar_dividas_nio", return_value=_resposta())
+    def test_stale_while_revalidate(self, mock_api, mock_agendar):
+        nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        self._envelhecer(600)
+
+        r = nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50, permitir_stale=True)
+        self.assertEqual(r["cache"], "stale")
+        mock_agendar.assert_called_once()
+        self.assertEqual(mock_api.call_count, 1)
+
+        # Sem permitir_stale a entrada velha é miss e vai à Nio.
+        r = nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        self.assertEqual(r["cache"], "miss")
+        self.assertEqual(mock_api.call_count, 2)
+
+    @patch("crm_app.nio_api.consultar_dividas_nio", return_value=_resposta())
+    def test_renovacao_em_background_atualiza_entrada(self, mock_api):
+        with patch("crm_app.nio_dividas_cache.threading.Thread") as mock_thread:
+            nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+            self._envelhecer(600)
+            nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50, permitir_stale=True)
+            nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50, permitir_stale=True)
+        # Lock por CPF/página: só uma renovação agendada.
+        mock_thread.assert_called_once()
+        alvo = mock_thread.call_args.kwargs
+        mock_api.return_value = _resposta(3)
+        alvo["target"](*alvo["args"])
+
+        r = nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        self.assertEqual(r["cache"], "hit")
+        self.assertEqual(len(r["invoices"]), 3)
+        self.assertEqual(nio_dividas_cache.estatisticas()["renovacao"], 1)
+
+    @patch("crm_app.nio_api.consultar_dividas_nio", return_value=_resposta())
+    def test_match_aplicado_invalida_cpf(self, mock_api):
+        nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        fatura = SimpleNamespace(
+            codigo_pix="", codigo_barras="", valor=None, data_vencimento=None, save=MagicMock(),
+        )
+        campos = aplicar_match_na_fatura(fatura, {"codigo_pix": "PIX123"}, cpf=CPF)
+        self.assertIn("codigo_pix", campos)
+        r = nio_dividas_cache.consultar_dividas_nio_cache(CPF, limit=50)
+        self.assertEqual(r["cache"], "miss")
+
+    @override_settings(NIO_DIVIDAS_CACHE_ENABLED=False)
+    @patch("crm_app.nio_api.consultar_dividas_nio", return_value=_resposta())
+    def test_desligado_consulta_sempre(self, mock_api):
+        nio_dividas_cache.consultar_dividas_nio_cache(CPF)
+        nio_dividas_cache.consultar_dividas_nio_cache(CPF)
+        self.assertEqual(mock_api.call_count, 2)
+
+
+@override_settings(CACHES=_LOCMEM, NIO_TOKEN_TTL_SEG=1800, NIO_SESSION_ID_TTL_SEG=600)
+class CredenciaisVigentesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        nio_api._token_cache.update({"params": None, "timestamp": 0, "expires_in": 0})
+        nio_api._session_ids.clear()
+
+    def tearDown(self):
+        self.setUp()
+
+    def test_so_devolve_com_token_e_session_id_validos(self):
+        self.assertIsNone(nio_api.credenciais_vigentes())
+        nio_api._publicar_token({"token": "tk", "apiServerUrl": "https://api"})
+        self.assertIsNone(nio_api.credenciais_vigentes())
+
+        chave = nio_api._chave_session_id("https://api", "tk")
+        cache.set(chave, {"session_id": "sid", "timestamp": time.time() - 700})
+        self.assertIsNone(nio_api.credenciais_vigentes())
+        cache.set(chave, {"session_id": "sid", "timestamp": time.time()})
+        self.assertEqual(
+            nio_api.credenciais_vigentes(), {"token": "tk", "api_base": "https://api", "session_id": "sid"},
+        )
@@ -0,0 +1,83 @@
+"""Conjunto compartilhado de documentos OSAB (CONSTA / NÃO CONSTA OSAB sem varrer a tabela)."""
+from itertools import product
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from crm_app.churn_os_utils import (
+    build_osab_documento_set,
+    chave_os_canonica,
+    os_variantes,
+    rotulo_validacao_osab,
+)
+from crm_app.models import ImportacaoOsab, IndiceSerializado
+from crm_app.services import osab_documentos
+
+AMOSTRAS = (
+    '00012345', '12345', '12345.0', 'OS-12345', 'os-00012345', 'OS- 12345.0', 'OS-OS-12345',
+    '0', '000', 'ABC9', 'abc9', 'OS-ABC9', ' 42 ', '0042', 'nan', 'NAN', '', None, '1.0.0',
+)
+
+
+class ChaveCanonicaTest(SimpleTestCase):
+    def test_chave_igual_se_e_so_se_variantes_se_cruzam(self):
+        for a, b in product(AMOSTRAS, repeat=2):
+            casam = bool(os_variantes(a) & os_variantes(b))
+            ka, kb = chave_os_canonica(a), chave_os_canonica(b)
+            self.assertEqual(casam, ka is not None and ka == kb, (a, b))
+
+    def test_serializacao_ida_e_volta(self):
+        chaves = {'12345', 'ABC9', '0'}
+        self.assertEqual(osab_documentos.desserializar(osab_documentos.serializar(chaves)), chaves)
+        self.assertEqual(osab_documentos.desserializar(osab_documentos.serializar([])), frozenset())
+
+
+class ConjuntoOsabTest(TestCase):
+    def setUp(self):
+        osab_documentos._versao.invalidar()
+        osab_documentos._cache.update(versao=None, conjunto=None)
+        for doc in ('00012345', 'OS-777', 'ABC9', '555.0', ' 42 ', 'nan', ''):
+            ImportacaoOsab.objects.create(documento=doc)
+
+    def test_sem_conjunto_gerado_retorna_none(self):
+        self.assertIsNone(osab_documentos.conjunto_documentos())
+        self.assertFalse(osab_documentos.consta_no_osab('12345'))
+
+    def test_rotulo_igual_ao_conjunto_montado_da_tabela(self):
+        self.assertEqual(osab_documentos.atualizar_conjunto('teste'), 5)
+        conjunto = osab_documentos.conjunto_documentos()
+        legado = build_osab_documento_set(ImportacaoOsab.objects.values_list('documento', flat=True))
+        for pedido in AMOSTRAS + ('777', 'OS-0777', '555', '99999', 'OS-42'):
+            self.assertEqual(
+                osab_documentos.rotulo_validacao(pedido, conjunto),
+                rotulo_validacao_osab(pedido, legado),
+                pedido,
+            )
+        self.assertEqual(IndiceSerializado.objects.get(nome=osab_documentos.NOME_VERSAO).total, 5)
+
+    def test_nova_versao_substitui_conjunto_do_processo(self):
+        osab_documentos.atualizar_conjunto()
+        self.assertFalse(osab_documentos.consta_no_osab('88888'))
+        ImportacaoOsab.objects.create(documento='00088888')
+        self.assertFalse(osab_documentos.consta_no_osab('88888'))
+
+        osab_documentos.atualizar_conjunto()
+        self.assertTrue(osab_documentos.consta_no_osab('88888'))
+
+        ImportacaoOsab.objects.all().delete()
+        osab_documentos.atualizar_conjunto()
+        self.assertEqual(osab_documentos.conjunto_documentos(), frozenset())
+        with override_settings(OSAB_CONJUNTO_ENABLED=False):
+            self.assertIsNone(osab_documentos.conjunto_documentos())
+
+    def test_edicao_do_documento_publica_nova_versao(self):
+        osab_documentos.atualizar_conjunto()
+        registro = ImportacaoOsab.objects.get(documento='ABC9')
+        client = APIClient()
+        client.force_authenticate(user=get_user_model().objects.create_user('osab', password='x'))
+
+        resp = client.patch(f'/api/crm/import/osab/{registro.pk}/', {'documento': 'OS-99999'}, format='json')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertTrue(osab_documentos.consta_no_osab('99999'))
+        self.assertFalse(osab_documentos.consta_no_osab('ABC9'))
@@ -0,0 +1,117 @@
+"""Cruzamento CRM × OSAB em SQL (vendas ausentes → NÃO CONSTA NA OSAB) e modo simulação."""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from crm_app.churn_os_utils import build_osab_documento_set, pedido_consta_no_osab
+from crm_app.models import (
+    Cliente,
+    HistoricoAlteracaoVenda,
+    ImportacaoOsab,
+    StatusCRM,
+    Venda,
+)
+from crm_app.services.osab_reconciliacao import reconciliar_ausentes_osab
+from usuarios.models import Usuario
+
+
+class ReconciliacaoAusentesOsabTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.st_nao = StatusCRM.objects.create(nome='NÃO CONSTA NA OSAB', tipo='Esteira', estado='ABERTO')
+        cls.st_outro = StatusCRM.objects.create(nome='INSTALADA OUTRO PDV', tipo='Esteira', estado='FECHADO')
+        cls.st_inst = StatusCRM.objects.create(nome='INSTALADA', tipo='Esteira', estado='FECHADO')
+        cls.st_agend = StatusCRM.objects.create(nome='AGENDADO', tipo='Esteira', estado='ABERTO')
+        cls.bot = Usuario.objects.create_user(username='osab_bot_teste', password='x')
+        cls.cliente = Cliente.objects.create(nome_razao_social='Cliente OSAB', cpf_cnpj='99988877766')
+        for doc in ('00012345', 'OS-777', 'ABC9', '555.0', ' 42 ', 'nan'):
+            ImportacaoOsab.objects.create(documento=doc)
+
+        ontem = timezone.now() - timedelta(days=1)
+        cls.casos = {}
+        for chave, os_, status, abertura, ativo in (
+            ('zeros', '12345', cls.st_agend, ontem, True),
+            ('prefixo', 'os-777', cls.st_agend, ontem, True),
+            ('ponto_zero', '555', cls.st_agend, ontem, True),
+            ('espacos', '0042', cls.st_agend, ontem, True),
+            ('caixa', 'abc9', cls.st_agend, ontem, True),
+            ('ausente', '99999', cls.st_agend, ontem, True),
+            ('sem_status', 'OS-31337', None, ontem, True),
+            ('instalada', '88888', cls.st_inst, ontem, True),
+            ('outro_pdv', '77777', cls.st_outro, ontem, True),
+            ('hoje', '66666', cls.st_agend, timezone.now(), True),
+            ('inativa', '55555', cls.st_agend, ontem, False),
+            ('texto_nan', 'nan', cls.st_agend, ontem, True),
+        ):
+            cls.casos[chave] = Venda.objects.create(
+                cliente=cls.cliente, ordem_servico=os_, status_esteira=status,
+                data_abertura=abertura, ativo=ativo,
+            )
+
+    def _status(self, chave):
+        return Venda.objects.get(pk=self.casos[chave].pk).status_esteira_id
+
+    def test_marca_so_ausentes_com_a_mesma_equivalencia_de_os_variantes(self):
+        snapshots = []
+        out = reconciliar_ausentes_osab(
+            st_nao=self.st_nao, st_outro=self.st_outro, osab_bot=self.bot,
+            snapshots_reversao=snapshots,
+        )
+        marcadas = {'caixa', 'ausente', 'sem_status', 'texto_nan'}
+        osab_set = build_osab_documento_set(ImportacaoOsab.objects.values_list('documento', flat=True))
+        for chave, venda in self.casos.items():
+            esperado = chave in marcadas
+            self.assertEqual(self._status(chave) == self.st_nao.pk, esperado, chave)
+            if venda.ativo and chave not in ('instalada', 'outro_pdv', 'hoje'):
+                self.assertEqual(not pedido_consta_no_osab(venda.ordem_servico, osab_set), esperado, chave)
+
+        self.assertEqual(out['crm_sem_osab_nao_consta'], len(marcadas))
+        self.assertEqual(out['crm_sem_osab_ignoradas_mesmo_dia'], 1)
+        self.assertEqual({s['venda_id'] for s in snapshots}, {self.casos[c].pk for c in marcadas})
+        snap = next(s for s in snapshots if s['venda_id'] == self.casos['ausente'].pk)
+        self.assertEqual(snap['valores_antes']['status_esteira_id'], self.st_agend.pk)
+        self.assertEqual(
+            HistoricoAlteracaoVenda.objects.filter(venda_id__in=[self.casos[c].pk for c in marcadas]).count(),
+            len(marcadas),
+        )
+
+    def test_dry_run_devolve_diff_sem_gravar(self):
+        out = reconciliar_ausentes_osab(
+            st_nao=self.st_nao, st_outro=self.st_outro, dry_run=True,
+            documentos_extras=['99999', ' OS-000031337 '],
+        )
+        self.assertEqual({d['venda_id'] for d in out['diff']}, {self.casos['caixa'].pk, self.casos['texto_nan'].pk})
+        self.assertEqual(out['diff_total'], 2)
+        self.assertEqual(self._status('ausente'), self.st_agend.pk)
+        self.assertFalse(HistoricoAlteracaoVenda.objects.exists())
+
+    def test_importacao_em_simulacao_grava_so_o_diff_no_log(self):
+        from io import BytesIO
+
+        import pandas as pd
+
+        from crm_app.models import LogImportacaoOSAB
+        from crm_app.views import ImportacaoOsabView
+
+        buffer = BytesIO()
+        pd.DataFrame([
+            {'PEDIDO': '99999', 'SITUACAO': 'CONCLUIDO', 'DT_REF': '2026-10-01'},
+            {'PEDIDO': '12345', 'SITUACAO': 'AGENDADO', 'DT_REF': '2026-10-01'},
+        ]).to_excel(buffer, index=False)
+        log = LogImportacaoOSAB.objects.create(nome_arquivo='sim.xlsx', status='PROCESSANDO')
+        total_osab = ImportacaoOsab.objects.count()
+
+        ImportacaoOsabView()._processar_osab_interno(log.id, buffer.getvalue(), 'sim.xlsx', False, dry_run=True)
+
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'SUCESSO')
+        self.assertTrue(log.mensagem.startswith('[SIMULAÇÃO]'))
+        self.assertTrue(log.detalhes_json['dry_run'])
+        diff = {(d['venda_id'], d['origem']) for d in log.detalhes_json['diff']}
+        self.assertIn((self.casos['ausente'].pk, 'PLANILHA'), diff)
+        self.assertIn((self.casos['caixa'].pk, 'AUSENTE_OSAB'), diff)
+        self.assertNotIn(self.casos['ausente'].pk, {v for v, o in diff if o == 'AUSENTE_OSAB'})
+        self.assertEqual(ImportacaoOsab.objects.count(), total_osab)
+        self.assertEqual(self._status('ausente'), self.st_agend.pk)
+        self.assertFalse(log.snapshots_vendas.exists())
@@ -0,0 +1,129 @@
+"""Fila PAP: faixas interativa/lote, envelhecimento, limites por tipo, heartbeat e timeout pelo p95."""
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from crm_app.models import FilaJobHistorico
+from crm_app.pap_job_fila import (
+    CLAIM_LOCK_KEY,
+    PapJobFila,
+    enfileirar_job_pap,
+    heartbeat_job_pap,
+    metricas_espera_por_tipo,
+    recuperar_jobs_pap_travados,
+    reivindicar_proximo_job,
+)
+from crm_app.services.pap_job_processor import timeout_job_segundos
+
+
+def _job(tipo, *, prioridade=5, espera_s=0, **campos):
+    job = enfileirar_job_pap(tipo, {}, prioridade=prioridade)
+    PapJobFila.objects.filter(pk=job.pk).update(criado_em=timezone.now() - timedelta(seconds=espera_s), **campos)
+    return job
+
+
+@override_settings(
+    PAP_JOB_TIPOS_INTERATIVOS=['status_online', 'analise_credito'],
+    PAP_JOB_LOTE_PENALIDADE=5,
+    PAP_JOB_AGING_SEGUNDOS=30,
+    PAP_JOB_LOTE_MAX_SIMULTANEOS=1,
+    PAP_JOB_CONCORRENCIA_TIPOS={'analise_credito': 1},
+)
+class PapJobFilaAgendamentoTest(TestCase):
+    def test_interativo_passa_na_frente_do_lote_mais_antigo(self):
+        _job('consulta_pedido', espera_s=60)
+        credito = _job('analise_credito')
+        self.assertEqual(reivindicar_proximo_job().pk, credito.pk)
+
+    def test_envelhecimento_evita_fome_do_lote(self):
+        lote = _job('consulta_pedido', espera_s=400)
+        _job('analise_credito', espera_s=10)
+        job = reivindicar_proximo_job()
+        self.assertEqual(job.pk, lote.pk)
+        self.assertEqual((job.status, job.tentativas), (PapJobFila.STATUS_PROCESSANDO, 1))
+        self.assertIsNotNone(job.heartbeat_em)
+
+    def test_limites_por_tipo_e_da_faixa_de_lote(self):
+        _job('analise_credito', status=PapJobFila.STATUS_PROCESSANDO)
+        _job('consulta_pedido', status=PapJobFila.STATUS_PROCESSANDO)
+        _job('analise_credito', prioridade=1)
+        _job('consulta_pedido', prioridade=1)
+        status = _job('status_online', prioridade=5, espera_s=1)
+        self.assertEqual(reivindicar_proximo_job().pk, status.pk)
+        self.assertIsNone(reivindicar_proximo_job())
+
+    def test_claim_serializado_por_advisory_lock_no_postgres(self):
+        _job('status_online')
+        conexao = mock.MagicMock(vendor='postgresql')
+        with mock.patch('crm_app.pap_job_fila.transaction.get_connection', return_value=conexao):
+            self.assertIsNotNone(reivindicar_proximo_job())
+        conexao.cursor.return_value.__enter__.return_value.execute.assert_called_once_with(
+            'SELECT pg_advisory_xact_lock(%s)', [CLAIM_LOCK_KEY],
+        )
+
+    def test_sem_heartbeat_recupera_antes_do_stale_por_minutos(self):
+        job = _job('status_online', espera_s=5)
+        reivindicar_proximo_job()
+        heartbeat_job_pap(job)
+        self.assertEqual(recuperar_jobs_pap_travados()['processando_requeued'], 0)
+
+        PapJobFila.objects.filter(pk=job.pk).update(heartbeat_em=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(recuperar_jobs_pap_travados()['processando_requeued'], 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, PapJobFila.STATUS_PENDENTE)
+        self.assertIn('sem heartbeat', job.erro)
+
+    def test_metricas_de_espera_por_tipo(self):
+        agora = timezone.now()
+        for espera in (2, 4, 30):
+            _job('status_online', espera_s=espera, status=PapJobFila.STATUS_CONCLUIDO, iniciado_em=agora)
+        _job('consulta_pedido', espera_s=45)
+        metricas = metricas_espera_por_tipo()
+        self.assertEqual(
+            (metricas['status_online']['n'], metricas['status_online']['espera_p95_s']), (3, 30.0),
+        )
+        self.assertEqual(metricas['status_online']['faixa'], 'interativa')
+        self.assertEqual(metricas['consulta_pedido']['pendentes'], 1)
+        self.assertGreaterEqual(metricas['consulta_pedido']['pendente_mais_antigo_s'], 45)
+
+
+@override_settings(
+    PAP_JOB_TIMEOUT_SECONDS=0,
+    PAP_JOB_TIMEOUT_MIN_AMOSTRAS=5,
+    PAP_JOB_TIMEOUT_FATOR_P95=2.0,
+    PAP_JOB_TIMEOUT_MIN_SECONDS=60,
+    PAP_JOB_TIMEOUT_MAX_SECONDS=600,
+)
+class PapJobTimeoutAprendidoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _concluidos(self, tipo, duracoes, *, arquivados=False):
+        fim = timezone.now() - timedelta(hours=1)
+        for duracao in duracoes:
+            if arquivados:
+                FilaJobHistorico.objects.create(
+                    fila=FilaJobHistorico.FILA_PAP, job_id=0, tipo=tipo, status='concluido',
+                    criado_em=fim, iniciado_em=fim - timedelta(seconds=duracao), concluido_em=fim,
+                )
+            else:
+                _job(tipo, status=PapJobFila.STATUS_CONCLUIDO,
+                     iniciado_em=fim - timedelta(seconds=duracao), concluido_em=fim)
+
+    def test_sem_amostras_usa_padrao_do_tipo(self):
+        self._concluidos('analise_credito', [40, 50])
+        self.assertEqual(timeout_job_segundos('analise_credito'), 360)
+
+    def test_p95_historico_com_arquivados(self):
+        self._concluidos('status_online', [40, 45, 50])
+        self._concluidos('status_online', [55, 90], arquivados=True)
+        self.assertEqual(timeout_job_segundos('status_online'), 180)
+
+    def test_limites_e_timeout_fixo(self):
+        self._concluidos('consulta_pedido', [10] * 5)
+        self.assertEqual(timeout_job_segundos('consulta_pedido'), 60)
+        with override_settings(PAP_JOB_TIMEOUT_SECONDS=123):
+            self.assertEqual(timeout_job_segundos('consulta_pedido'), 123)
@@ -0,0 +1,131 @@
+"""Agregado do Qualidade/FPD: mesmos números que a consulta ao vivo e invalidação por signal."""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from crm_app.models import ContratoM10, FaturaM10, ImportacaoFPD, RollupQualidade
+from crm_app.services import qualidade_rollup
+from crm_app.services import qualidade_service as qs
+
+CHAVES_AGREGADAS = ('kpis', 'filas', 'contagens_filtros', 'promessas', 'total', 'total_pages')
+
+
+class RollupQualidadeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('rollup_admin', password='x', is_superuser=True)
+        vendedores = [User.objects.create_user(f'vend_{i}', password='x') for i in range(2)]
+        hoje = timezone.localdate()
+        cls.mes_inst = (hoje - timedelta(days=75)).strftime('%Y-%m')
+        inst = hoje - timedelta(days=75)
+        # (status f1, dias desde o vencimento, conferência, promessa em dias, status contrato)
+        cenarios = [
+            ('PAGO', 40, 'CONFIRMADO', None, 'ATIVO'),
+            ('PAGO', 40, 'AGUARDANDO', None, 'ATIVO'),
+            ('NAO_PAGO', 20, '', 0, 'ATIVO'),
+            ('ATRASADO', 65, '', -2, 'CANCELADO'),
+            ('AGUARDANDO', -5, '', 2, 'ATIVO'),
+            ('NAO_PAGO', 35, 'DIVERGENTE', None, 'ATIVO'),
+            (None, 0, '', None, 'ATIVO'),
+        ]
+        cls.contratos = []
+        for i, (status, dias, conf, promessa, st_contrato) in enumerate(cenarios):
+            contrato = ContratoM10.objects.create(
+                numero_contrato=f'RQ{i}', ordem_servico=f'OSRQ{i}', cliente_nome=f'Cliente {i}',
+                cpf_cliente='12345678901', vendedor=vendedores[i % 2], data_instalacao=inst,
+                plano_original='P', plano_atual='P', status_contrato=st_contrato,
+                orfao=(i == 6),
+            )
+            cls.contratos.append(contrato)
+            if status is None:
+                continue
+            venc = hoje - timedelta(days=dias)
+            FaturaM10.objects.update_or_create(
+                contrato=contrato, numero_fatura=1,
+                defaults={
+                    'data_vencimento': venc, 'status': status, 'conferencia_fpd': conf,
+                    'data_promessa_pagamento': hoje + timedelta(days=promessa) if promessa is not None else None,
+                },
+            )
+            ImportacaoFPD.objects.create(
+                nr_ordem=f'OSRQ{i}', id_contrato=f'RQ{i}', indicador='FPD', nr_fatura=f'N{i}',
+                dt_venc_orig=venc, ds_status_fatura='PAGO' if status == 'PAGO' else 'ABERTO',
+                ds_sit_fatura='FECHADA' if status == 'PAGO' else 'ABERTA',
+                nm_seg='Varejo' if i % 2 else 'Empresarial',
+                contrato_m10=contrato, match_status='MATCHED',
+            )
+
+    def _comparar_painel(self, lente, mes, filtros):
+        com = qs.dashboard_qualidade(lente, mes, self.user, dict(filtros))
+        with override_settings(QUALIDADE_ROLLUP_ENABLED=False):
+            sem = qs.dashboard_qualidade(lente, mes, self.user, dict(filtros))
+        for chave in CHAVES_AGREGADAS:
+            self.assertEqual(com[chave], sem[chave], f'{chave} diverge com filtros {filtros}')
+        self.assertEqual([c['id'] for c in com['contratos']], [c['id'] for c in sem['contratos']])
+        return com
+
+    def test_painel_instalacao_igual_ao_vivo(self):
+        vendedor_id = self.contratos[0].vendedor_id
+        for filtros in (
+            {},
+            {'fila': 'atrasados_lt60'},
+            {'fila': 'atrasados_gte60'},
+            {'fila': 'abertos'},
+            {'fila': 'pagas', 'conferencia_fpd': 'aguardando'},
+            {'faixa_atraso': 'd15_30'},
+            {'promessa': 'hoje'},
+            {'promessa': 'proximos', 'fila': 'todos'},
+            {'vendedor': vendedor_id, 'status': 'ATIVO'},
+            {'faturas_pagas': '1/10'},
+            {'orfao': 'true'},
+            {'status_tratamento': 'sem', 'elegivel': 'sim'},
+            {'page': 2, 'page_size': 2},
+        ):
+            self._comparar_painel(qs.LENTE_INSTALACAO, self.mes_inst, filtros)
+
+    def test_painel_vencimento_igual_ao_vivo(self):
+        meses = {f.data_vencimento.strftime('%Y-%m') for f in FaturaM10.objects.all()}
+        for mes in meses:
+            self._comparar_painel(qs.LENTE_VENCIMENTO, mes, {})
+
+    def test_dashboards_fpd_iguais_ao_vivo(self):
+        for kwargs in ({}, {'nm_seg': 'varejo'}, {'vendedor_id': self.contratos[1].vendedor_id}):
+            com = qs.dashboard_fpd_estilo_nio(meses=12, **kwargs)
+            with override_settings(QUALIDADE_ROLLUP_ENABLED=False):
+                sem = qs.dashboard_fpd_estilo_nio(meses=12, **kwargs)
+            self.assertEqual(com['colunas'], sem['colunas'])
+            self.assertEqual(com['abertas_total'], sem['abertas_total'])
+        com = qs.dashboard_fpd_por_vendedor(meses=12)
+        with override_settings(QUALIDADE_ROLLUP_ENABLED=False):
+            sem = qs.dashboard_fpd_por_vendedor(meses=12)
+        self.assertEqual(com['linhas_vendedores'], sem['linhas_vendedores'])
+        self.assertEqual(com['totais'], sem['totais'])
+
+    def test_lentes_fpd_sao_os_indicadores_da_importacao(self):
+        indicadores = tuple(valor for valor, _rotulo in ImportacaoFPD._meta.get_field('indicador').choices)
+        self.assertEqual(qualidade_rollup.INDICADORES_FPD, indicadores)
+        self.assertEqual(qualidade_rollup.INDICADORES_FPD, ('FPD', 'SPD', 'TPD'))
+
+    def test_save_da_fatura_marca_fatia_suja_e_leitura_reconstroi(self):
+        antes = qs.dashboard_qualidade(qs.LENTE_INSTALACAO, self.mes_inst, self.user, {})
+        fatia = RollupQualidade.objects.get(lente='instalacao', periodo=self.mes_inst)
+        self.assertFalse(fatia.sujo)
+
+        fatura = FaturaM10.objects.get(contrato=self.contratos[2], numero_fatura=1)
+        fatura.status = 'PAGO'
+        fatura.save(update_fields=['status'])
+        fatia.refresh_from_db()
+        self.assertTrue(fatia.sujo)
+
+        depois = qs.dashboard_qualidade(qs.LENTE_INSTALACAO, self.mes_inst, self.user, {})
+        self.assertEqual(depois['filas']['pagas'], antes['filas']['pagas'] + 1)
+
+    def test_save_sem_dimensao_do_agregado_nao_invalida(self):
+        qs.dashboard_qualidade(qs.LENTE_INSTALACAO, self.mes_inst, self.user, {})
+        fatura = FaturaM10.objects.get(contrato=self.contratos[0], numero_fatura=1)
+        fatura.status_busca = 'SUCESSO'
+        fatura.save(update_fields=['status_busca'])
+        self.assertFalse(RollupQualidade.objects.get(lente='instalacao', periodo=self.mes_inst).sujo)
@@ -0,0 +1,96 @@
+"""Retenção: arquivamento das filas em FilaJobHistorico e poda em lotes dos logs."""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from crm_app.job_fila import JobFila
+from crm_app.models import FilaJobHistorico, LogEnvioPerformance, LoteFolhaPdf, LoteFolhaPdfItem
+from crm_app.pap_job_fila import PapJobFila
+from crm_app.services import retencao_service
+from crm_app.whatsapp_webhook_fila import WhatsappWebhookFila
+
+
+def _envelhecer(modelo, pks, campo, **delta):
+    modelo.objects.filter(pk__in=pks).update(**{campo: timezone.now() - timedelta(**delta)})
+
+
+@override_settings(FILA_ARQUIVAR_APOS_HORAS=24, RETENCAO_LOTE=2)
+class RetencaoTest(TestCase):
+    def setUp(self):
+        agora = timezone.now()
+        self.velho = WhatsappWebhookFila.objects.create(
+            payload={'x': 1}, telefone='5531999990001',
+            status=WhatsappWebhookFila.STATUS_CONCLUIDO, concluido_em=agora - timedelta(days=2),
+        )
+        self.recente = WhatsappWebhookFila.objects.create(
+            status=WhatsappWebhookFila.STATUS_CONCLUIDO, concluido_em=agora,
+        )
+        self.pendente = WhatsappWebhookFila.objects.create(status=WhatsappWebhookFila.STATUS_PENDENTE)
+        _envelhecer(WhatsappWebhookFila, [self.pendente.pk], 'criado_em', days=10)
+        self.pap_erro = PapJobFila.objects.create(
+            tipo='consulta', status=PapJobFila.STATUS_ERRO, erro='timeout', tentativas=2,
+        )
+        _envelhecer(PapJobFila, [self.pap_erro.pk], 'criado_em', days=3)
+
+    def test_arquiva_so_terminados_antigos(self):
+        self.assertEqual(retencao_service.arquivar_filas(dry_run=True), {'webhook': 1, 'pap': 1})
+        self.assertEqual(FilaJobHistorico.objects.count(), 0)
+
+        self.assertEqual(retencao_service.arquivar_filas(), {'webhook': 1, 'pap': 1})
+        self.assertEqual(
+            set(WhatsappWebhookFila.objects.values_list('pk', flat=True)),
+            {self.recente.pk, self.pendente.pk},
+        )
+        self.assertFalse(PapJobFila.objects.exists())
+        hist = FilaJobHistorico.objects.get(fila=FilaJobHistorico.FILA_PAP)
+        self.assertEqual(
+            (hist.job_id, hist.tipo, hist.status, hist.erro), (self.pap_erro.pk, 'consulta', 'erro', 'timeout'),
+        )
+        self.assertEqual(FilaJobHistorico.objects.get(fila='webhook').payload, {'x': 1})
+
+    def test_poda_em_lotes_respeitando_dias_zero(self):
+        logs = [LogEnvioPerformance.objects.create(regra_nome=f'r{i}') for i in range(5)]
+        _envelhecer(LogEnvioPerformance, [log.pk for log in logs[:3]], 'data_hora', days=100)
+
+        with override_settings(RETENCAO_DIAS={'LogEnvioPerformance': 90, 'PapJobFila': 0}):
+            self.assertEqual(retencao_service.podar(dry_run=True), {'LogEnvioPerformance': 3})
+            self.assertEqual(retencao_service.podar(max_lotes=1), {'LogEnvioPerformance': 2})
+            resultado = retencao_service.aplicar_retencao()
+        self.assertEqual(resultado['podados'], {'LogEnvioPerformance': 1})
+        self.assertEqual(resultado['total'], 3)
+        self.assertEqual(LogEnvioPerformance.objects.count(), 2)
+        self.assertEqual(resultado['arquivados'], {'webhook': 1, 'pap': 1})
+        self.assertFalse(PapJobFila.objects.exists())
+
+    def test_poda_das_filas_so_apaga_jobs_terminados(self):
+        concluido = JobFila.objects.create(tipo='importacao', status=JobFila.STATUS_CONCLUIDO)
+        pendente = JobFila.objects.create(tipo='importacao', status=JobFila.STATUS_PENDENTE)
+        processando = JobFila.objects.create(tipo='importacao', status=JobFila.STATUS_PROCESSANDO)
+        _envelhecer(JobFila, [concluido.pk, pendente.pk, processando.pk], 'criado_em', days=40)
+
+        with override_settings(RETENCAO_DIAS={'JobFila': 30, 'WhatsappWebhookFila': 5}):
+            self.assertEqual(retencao_service.podar(), {'JobFila': 1, 'WhatsappWebhookFila': 0})
+        self.assertEqual(
+            set(JobFila.objects.values_list('pk', flat=True)), {pendente.pk, processando.pk},
+        )
+        self.assertTrue(WhatsappWebhookFila.objects.filter(pk=self.pendente.pk).exists())
+
+    def test_poda_lotes_de_pdf_da_folha_com_os_pdfs(self):
+        velho = LoteFolhaPdf.objects.create(tipo=LoteFolhaPdf.TIPO_DOWNLOAD, ano=2026, mes=1)
+        LoteFolhaPdfItem.objects.create(lote=velho, vendedor_id=1, pdf=b'%PDF')
+        novo = LoteFolhaPdf.objects.create(tipo=LoteFolhaPdf.TIPO_DOWNLOAD, ano=2026, mes=3)
+        _envelhecer(LoteFolhaPdf, [velho.pk], 'criado_em', days=20)
+
+        with override_settings(RETENCAO_DIAS={'LoteFolhaPdf': 15}):
+            self.assertEqual(retencao_service.podar(), {'LoteFolhaPdf': 1})
+        self.assertEqual(list(LoteFolhaPdf.objects.values_list('pk', flat=True)), [novo.pk])
+        self.assertFalse(LoteFolhaPdfItem.objects.exists())
+
+    def test_comando(self):
+        saida = StringIO()
+        call_command('aplicar_retencao', '--dry-run', stdout=saida)
+        self.assertIn('Fila webhook: 1 job(s) seriam arquivado(s)', saida.getvalue())
+        self.assertEqual(WhatsappWebhookFila.objects.count(), 3)
@@ -0,0 +1,75 @@
+import logging
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from crm_app.models import SchedulerJobExecucao
+from crm_app.scheduler import POOL_LENTO, POOL_PADRAO, _wrap_scheduler_job, create_scheduler
+from crm_app.scheduler_execucoes import estatisticas_jobs, limpar_execucoes_antigas, linhas_afetadas_de
+
+
+class SchedulerLedgerTests(TestCase):
+    def test_registra_sucesso_com_linhas_afetadas(self):
+        job = _wrap_scheduler_job(lambda: {'enviados': 7}, job_id='job_ok')
+        job()
+        ex = SchedulerJobExecucao.objects.get(job_id='job_ok')
+        self.assertEqual(ex.status, SchedulerJobExecucao.STATUS_SUCESSO)
+        self.assertEqual(ex.linhas_afetadas, 7)
+        self.assertIsNotNone(ex.duracao_ms)
+        self.assertIsNotNone(ex.finalizado_em)
+
+    def test_erro_logado_pelo_job_conta_como_falha(self):
+        def job_que_engole():
+            try:
+                raise RuntimeError('timeout PAP')
+            except Exception as e:
+                logging.getLogger('crm_app.scheduler').error('❌ Erro no job: %s', e)
+
+        # Sem assertLogs: ele troca os handlers e a captura do ledger não veria o registro.
+        _wrap_scheduler_job(job_que_engole, job_id='job_erro')()
+        ex = SchedulerJobExecucao.objects.get(job_id='job_erro')
+        self.assertEqual(ex.status, SchedulerJobExecucao.STATUS_ERRO)
+        self.assertIn('timeout PAP', ex.erro)
+
+    def test_excecao_propaga_e_fica_no_ledger(self):
+        def job_quebra():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            _wrap_scheduler_job(job_quebra, job_id='job_quebra')()
+        ex = SchedulerJobExecucao.objects.get(job_id='job_quebra')
+        self.assertEqual(ex.erro, 'ValueError: boom')
+
+    @override_settings(SCHEDULER_LEDGER_ENABLED=False)
+    def test_ledger_desligado_nao_grava(self):
+        _wrap_scheduler_job(lambda: None, job_id='job_off')()
+        self.assertFalse(SchedulerJobExecucao.objects.exists())
+
+    def test_percentis_por_job(self):
+        agora = timezone.now()
+        for i, ms in enumerate([100, 200, 300, 400, 5000]):
+            SchedulerJobExecucao.objects.create(
+                job_id='sync', status='sucesso', iniciado_em=agora - timedelta(minutes=i), duracao_ms=ms,
+            )
+        SchedulerJobExecucao.objects.create(
+            job_id='sync', status='erro', iniciado_em=agora - timedelta(days=40), duracao_ms=9,
+        )
+        (item,) = estatisticas_jobs(dias=7)
+        self.assertEqual(item['execucoes'], 5)
+        self.assertEqual(item['p50_ms'], 300)
+        self.assertEqual(item['p95_ms'], 5000)
+        self.assertEqual(limpar_execucoes_antigas(30), 1)
+
+    def test_linhas_afetadas_de(self):
+        self.assertEqual(linhas_afetadas_de(3), 3)
+        self.assertEqual(linhas_afetadas_de({'supervisores': 2}), 2)
+        self.assertIsNone(linhas_afetadas_de(True))
+        self.assertIsNone(linhas_afetadas_de('ok'))
+
+    def test_jobs_longos_no_pool_lento(self):
+        scheduler = create_scheduler()
+        pools = {job.id: job.executor for job in scheduler.get_jobs()}
+        self.assertEqual(pools['sync_status_esteira_pap_noturno'], POOL_LENTO)
+        self.assertEqual(pools['preaquecer_cache_folha'], POOL_LENTO)
+        self.assertEqual(pools['lembrete_presenca_supervisor_10h'], POOL_PADRAO)
@@ -0,0 +1,95 @@
+"""Buffer de telemetria do bot: gravação em lote, vendedores resolvidos de uma vez e limites."""
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+
+from crm_app.funil_venda_wpp_service import funil_registrar_evento_sessao
+from crm_app.models import (
+    EstatisticaBotWhatsApp,
+    FunilVendaWppEvento,
+    FunilVendaWppTentativa,
+    HistoricoCustoWhatsAppOficial,
+    SessaoWhatsapp,
+)
+from crm_app.services import telemetria_buffer
+from crm_app.services.telemetria_buffer import (
+    TIPO_CUSTO_OFICIAL,
+    TIPO_ESTATISTICA_BOT,
+    TIPO_FUNIL_EVENTO,
+    BufferTelemetria,
+)
+from crm_app.services.whatsapp.custo_oficial import registrar_envio_oficial
+from crm_app.whatsapp_webhook_handler import (
+    _buscar_usuario_por_telefone,
+    _registrar_estatistica,
+    _resolver_vendedores_por_telefone,
+)
+from usuarios.models import Usuario
+
+
+class BufferTelemetriaTest(TestCase):
+    def setUp(self):
+        self.ana = Usuario.objects.create_user(username='ana_tel', password='x', tel_whatsapp='(31) 99999-0001')
+        self.bia = Usuario.objects.create_user(username='bia_tel', password='x', tel_whatsapp_2='31988880002')
+        Usuario.objects.create_user(username='inativo_tel', password='x', tel_whatsapp='31977770003', is_active=False)
+        self.tentativa = FunilVendaWppTentativa.objects.create(telefone='5531999990001')
+
+    def test_descarrega_em_lote_por_tipo(self):
+        buffer = BufferTelemetria(tamanho_lote=50, intervalo_seg=60, max_pendentes=100)
+        for telefone in ('5531999990001', '5531988880002', '5531999990001', '5531900000000'):
+            buffer.adicionar(TIPO_ESTATISTICA_BOT, {'telefone': telefone, 'comando': 'FATURA'})
+        base_evento = {'etapa_codigo': 'venda_cpf', 'funil_estagio': 'cadastro', 'tipo_evento': 'input', 'payload': {}}
+        buffer.adicionar(TIPO_FUNIL_EVENTO, dict(base_evento, tentativa_id=self.tentativa.pk))
+        buffer.adicionar(TIPO_FUNIL_EVENTO, dict(base_evento, tentativa_id=self.tentativa.pk + 999))
+        buffer.adicionar(TIPO_CUSTO_OFICIAL, {'telefone': '5531999990001', 'tipo_envio': 'TEMPLATE', 'sucesso': True})
+        self.assertEqual(EstatisticaBotWhatsApp.objects.count(), 0)
+
+        self.assertEqual(buffer.descarregar(), 6)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(
+            sorted(EstatisticaBotWhatsApp.objects.values_list('telefone', 'vendedor_id')),
+            [
+                ('5531900000000', None),
+                ('5531988880002', self.bia.pk),
+                ('5531999990001', self.ana.pk),
+                ('5531999990001', self.ana.pk),
+            ],
+        )
+        self.assertEqual(list(FunilVendaWppEvento.objects.values_list('tentativa_id', flat=True)), [self.tentativa.pk])
+        custo = HistoricoCustoWhatsAppOficial.objects.get()
+        self.assertEqual((custo.categoria, custo.custo_estimado_brl), ('UTILITY', Decimal('0.0350')))
+
+    def test_descarta_os_mais_antigos_acima_do_limite(self):
+        buffer = BufferTelemetria(tamanho_lote=2, intervalo_seg=60, max_pendentes=3)
+        for comando in ('A', 'B', 'C', 'D', 'E'):
+            buffer.adicionar(TIPO_ESTATISTICA_BOT, {'telefone': '1', 'comando': comando, 'vendedor_id': None})
+        self.assertEqual((len(buffer), buffer.descartados), (3, 2))
+        buffer.descarregar()
+        self.assertEqual(sorted(EstatisticaBotWhatsApp.objects.values_list('comando', flat=True)), ['C', 'D', 'E'])
+
+    def test_resolucao_em_lote_igual_a_busca_individual(self):
+        telefones = ['5531999990001', '31999990001', '99990001', '5531988880002', '5531977770003', '']
+        resolvidos = _resolver_vendedores_por_telefone(telefones)
+        for telefone in telefones:
+            usuario = _buscar_usuario_por_telefone(telefone)
+            self.assertEqual(resolvidos[telefone], usuario.pk if usuario else None, telefone)
+
+    def test_em_transacao_grava_na_hora(self):
+        # TestCase roda dentro de atomic: a thread não veria as linhas, então grava inline
+        sessao = SessaoWhatsapp.objects.create(
+            telefone='5531999990001', dados_temp={'funil_wpp_tentativa_id': self.tentativa.pk},
+        )
+        with override_settings(FUNIL_VENDAS_REGISTRAR=True):
+            _registrar_estatistica('5531999990001', 'STATUS')
+            registrar_envio_oficial(telefone='5531999990001', tipo_envio='TEXTO', sucesso=False, resposta={'e': 1})
+            funil_registrar_evento_sessao(sessao, 'venda_cpf', {'cpf': '1', 'senha': 'x'})
+
+        self.assertIsNone(telemetria_buffer._buffer)
+        self.assertEqual(EstatisticaBotWhatsApp.objects.get().vendedor_id, self.ana.pk)
+        self.assertEqual(HistoricoCustoWhatsAppOficial.objects.get().erro, "{'e': 1}")
+        self.tentativa.refresh_from_db()
+        self.assertEqual(
+            (self.tentativa.etapa_codigo_atual, self.tentativa.funil_estagio_max, self.tentativa.dados_agregados),
+            ('venda_cpf', 'cadastro', {'cpf': '1'}),
+        )
+        self.assertEqual(FunilVendaWppEvento.objects.get().payload, {'cpf': '1', 'senha': 'x'})
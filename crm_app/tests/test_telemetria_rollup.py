@@ -0,0 +1,111 @@
+"""Agregados diários da telemetria: incremento na gravação, backfill e leitura pelas views."""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from crm_app.models import (
+    EstatisticaBotWhatsApp,
+    FunilVendaWppEvento,
+    FunilVendaWppTentativa,
+    RollupEstatisticaBotDia,
+    RollupFunilVendaWppDia,
+)
+from crm_app.services import telemetria_buffer
+from crm_app.services.telemetria_buffer import TIPO_ESTATISTICA_BOT, TIPO_FUNIL_EVENTO
+from usuarios.models import Perfil, Usuario
+
+
+def _somas(modelo, *campos):
+    from django.db.models import Sum
+
+    return {
+        tuple(row[c] for c in campos): row['n']
+        for row in modelo.objects.values(*campos).annotate(n=Sum('total'))
+    }
+
+
+class RollupTelemetriaTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        perfil = Perfil.objects.create(nome='Diretoria', cod_perfil='DIR_ROLLUP')
+        cls.gestor = Usuario.objects.create_user(username='gestor_rollup', password='x', perfil=perfil)
+        cls.ana = Usuario.objects.create_user(username='ana_rollup', password='x', tel_whatsapp='31999990001')
+        cls.tentativa = FunilVendaWppTentativa.objects.create(telefone='5531999990001')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.gestor)
+        estatisticas = [
+            {'telefone': '5531999990001', 'comando': 'FATURA'},
+            {'telefone': '5531999990001', 'comando': 'FATURA'},
+            {'telefone': '5531999990001', 'comando': 'STATUS'},
+            {'telefone': '5531900000000', 'comando': 'FATURA'},
+        ]
+        telemetria_buffer.gravar(TIPO_ESTATISTICA_BOT, estatisticas)
+        base = {'tentativa_id': self.tentativa.pk, 'etapa_codigo': 'venda_cpf', 'payload': {}}
+        telemetria_buffer.gravar(TIPO_FUNIL_EVENTO, [
+            dict(base, funil_estagio='viabilidade', tipo_evento='input'),
+            dict(base, funil_estagio='cadastro', tipo_evento='input'),
+            dict(base, funil_estagio='cadastro', tipo_evento='status', payload={'status': 'abandonado'}),
+        ])
+
+    def test_incremento_igual_ao_backfill(self):
+        hoje = timezone.localdate()
+        esperado_bot = {
+            (hoje, self.ana.pk, 'FATURA'): 2,
+            (hoje, self.ana.pk, 'STATUS'): 1,
+            (hoje, None, 'FATURA'): 1,
+        }
+        esperado_funil = {
+            (hoje, 'viabilidade', 'input', ''): 1,
+            (hoje, 'cadastro', 'input', ''): 1,
+            (hoje, 'cadastro', 'status', 'abandonado'): 1,
+        }
+        self.assertEqual(_somas(RollupEstatisticaBotDia, 'dia', 'vendedor_id', 'comando'), esperado_bot)
+        campos_funil = ('dia', 'funil_estagio', 'tipo_evento', 'status_final')
+        self.assertEqual(_somas(RollupFunilVendaWppDia, *campos_funil), esperado_funil)
+
+        # Linha repetida (gravações concorrentes) e dia antigo sem bruto: o backfill normaliza
+        RollupEstatisticaBotDia.objects.create(dia=hoje, vendedor=self.ana, comando='FATURA', total=0)
+        RollupEstatisticaBotDia.objects.create(dia=hoje - timedelta(days=400), comando='DFV', total=9)
+        saida = StringIO()
+        call_command('reconstruir_rollup_telemetria', '--desde', (hoje - timedelta(days=1)).isoformat(), stdout=saida)
+        self.assertIn('3 linhas de estatísticas', saida.getvalue())
+        self.assertEqual(RollupEstatisticaBotDia.objects.filter(dia=hoje).count(), 3)
+        self.assertEqual(
+            _somas(RollupEstatisticaBotDia, 'dia', 'vendedor_id', 'comando'),
+            {**esperado_bot, (hoje - timedelta(days=400), None, 'DFV'): 9},
+        )
+        self.assertEqual(_somas(RollupFunilVendaWppDia, *campos_funil), esperado_funil)
+
+    def test_estatisticas_bot_mesma_resposta_do_bruto(self):
+        url = '/api/crm/estatisticas-bot/?dias=7'
+        com_rollup = self.client.get(url).data
+        with override_settings(TELEMETRIA_ROLLUP_ENABLED=False):
+            bruto = self.client.get(url).data
+        for chave in ('totais', 'comandos', 'por_comando'):
+            self.assertEqual(com_rollup[chave], bruto[chave], chave)
+        self.assertEqual(com_rollup['totais'], {'geral': 4, 'sem_vendedor': 1, 'com_vendedor': 3})
+        self.assertEqual(
+            [(v['vendedor_id'], v['total'], v['comandos']['FATURA']) for v in com_rollup['por_vendedor']],
+            [(v['vendedor_id'], v['total'], v['comandos']['FATURA']) for v in bruto['por_vendedor']],
+        )
+        # Bruto podado: os relatórios continuam pelo agregado
+        EstatisticaBotWhatsApp.objects.all().delete()
+        self.assertEqual(self.client.get(url).data['totais']['geral'], 4)
+
+    def test_resumo_do_funil(self):
+        FunilVendaWppEvento.objects.all().delete()
+        resp = self.client.get('/api/crm/funil-venda-wpp/resumo/?dias=30')
+        self.assertEqual(resp.status_code, 200)
+        estagios = {e['estagio']: e for e in resp.data['estagios']}
+        self.assertEqual(estagios['cadastro']['eventos'], 2)
+        self.assertEqual(estagios['cadastro']['finalizadas'], {'abandonado': 1})
+        self.assertEqual(estagios['pedido']['eventos'], 0)
+        self.assertEqual(resp.data['finalizadas'], {'abandonado': 1})
+
+        self.client.force_authenticate(user=self.ana)
+        self.assertEqual(self.client.get('/api/crm/funil-venda-wpp/resumo/').status_code, 403)
@@ -0,0 +1,88 @@
+"""Testes do snapshot único por save da Venda e da quitação de adiantamento pós-bulk."""
+from datetime import date
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from crm_app.models import Cliente, StatusCRM, Venda
+from crm_app.venda_transicoes import ATTR_SNAPSHOT
+from usuarios.models import Usuario
+
+
+def _selects_venda(ctx):
+    return [
+        q['sql'] for q in ctx.captured_queries
+        if q['sql'].lstrip().upper().startswith('SELECT') and 'FROM "crm_venda"' in q['sql']
+    ]
+
+
+class VendaTransicoesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.st_sem = StatusCRM.objects.create(nome='SEM TRATAMENTO', tipo='Tratamento', estado='ABERTO')
+        cls.st_cad = StatusCRM.objects.create(nome='CADASTRADA', tipo='Tratamento', estado='FECHADO')
+        cls.st_agend = StatusCRM.objects.create(nome='AGENDADO', tipo='Esteira', estado='ABERTO')
+        cls.st_inst = StatusCRM.objects.create(nome='INSTALADA', tipo='Esteira', estado='FECHADO')
+        cls.vendedor = Usuario.objects.create_user(
+            username='vend_trans', password='x', tel_whatsapp='21999990000',
+        )
+        cls.cliente = Cliente.objects.create(nome_razao_social='Cliente Trans', cpf_cnpj='11122233344')
+
+    def _criar_venda(self, **kwargs):
+        defaults = {
+            'vendedor': self.vendedor,
+            'cliente': self.cliente,
+            'status_tratamento': self.st_sem,
+            'status_esteira': self.st_agend,
+            'ativo': True,
+        }
+        defaults.update(kwargs)
+        return Venda.objects.create(**defaults)
+
+    def test_save_le_estado_anterior_uma_vez(self):
+        venda = self._criar_venda(ordem_servico='OS-SNAP-1')
+        venda = Venda.objects.get(pk=venda.pk)
+        venda.observacoes = 'alterada'
+        with CaptureQueriesContext(connection) as ctx:
+            venda.save()
+        self.assertEqual(len(_selects_venda(ctx)), 1)
+        self.assertEqual(getattr(venda, ATTR_SNAPSHOT).status_tratamento_id, self.st_sem.pk)
+
+    @patch('crm_app.whatsapp_service.WhatsAppService.enviar_mensagem_cadastrada')
+    def test_save_para_cadastrada_notifica_vendedor(self, mock_enviar):
+        venda = self._criar_venda(ordem_servico='OS-SNAP-2')
+        venda.observacoes = 'sem mudança de status'
+        venda.save()
+        mock_enviar.assert_not_called()
+
+        venda.status_tratamento = self.st_cad
+        venda.save()
+        venda.save()
+        mock_enviar.assert_called_once()
+        self.assertEqual(mock_enviar.call_args.kwargs['telefone_destino'], '21999990000')
+
+    def test_pos_bulk_do_osab_quita_adiantamento_em_lote(self):
+        from crm_app.services.adiantamento_sabado_service import quitar_adiantamento_sabado_pos_bulk
+
+        vendas = [
+            self._criar_venda(ordem_servico=f'OS-LOTE-{i}', adiantamento_sabado_marcado=True)
+            for i in range(3)
+        ]
+        for venda in vendas:
+            venda.status_esteira = self.st_inst
+            venda.data_instalacao = date(2026, 3, 10)
+        Venda.objects.bulk_update(vendas, ['status_esteira', 'data_instalacao'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(quitar_adiantamento_sabado_pos_bulk(vendas), 3)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(
+            Venda.objects.filter(
+                pk__in=[v.pk for v in vendas], antecipacao_comissao=True,
+                adiantamento_sabado_quitado_em__isnull=False,
+            ).count(),
+            3,
+        )
+        self.assertEqual(quitar_adiantamento_sabado_pos_bulk(vendas), 0)
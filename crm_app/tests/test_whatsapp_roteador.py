@@ -0,0 +1,137 @@
+"""Roteador do bot WhatsApp: estado da conversa numa consulta e cache de SessaoWhatsapp."""
+from datetime import timedelta
+from itertools import product
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from crm_app import whatsapp_roteador
+from crm_app.esteira_lista_agendamento_vendedor_service import deve_tentar_lista_agendamento
+from crm_app.esteira_posso_antecipar_service import deve_tentar_posso_antecipar
+from crm_app.esteira_posso_reagendar_service import deve_tentar_posso_reagendar
+from crm_app.models import (
+    BoasVindasEnviado,
+    Cliente,
+    PossoAnteciparVendedorEnviado,
+    PossoReagendarConsultorSessao,
+    SessaoWhatsapp,
+    Venda,
+)
+from crm_app.whatsapp_roteador import (
+    FLUXO_BOAS_VINDAS,
+    FLUXO_CONFIRMACAO_AUDITORIA,
+    FLUXO_LEMBRETE_INSTALACAO,
+    FLUXO_POSSO_ANTECIPAR,
+    FLUXO_POSSO_REAGENDAR,
+    carregar_estado,
+    obter_ou_criar_sessao,
+)
+from usuarios.models import Usuario
+
+TELEFONE = '5531999990001'
+
+
+class EstadoConversaTest(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(cpf_cnpj='12345678901', nome_razao_social='Cliente Roteador')
+        venda = Venda.objects.create(cliente=cliente)
+        PossoAnteciparVendedorEnviado.objects.create(venda=venda, telefone=TELEFONE, whatsapp_message_id='PA-1')
+        antiga = PossoAnteciparVendedorEnviado.objects.create(venda=venda, telefone=TELEFONE, whatsapp_message_id='PA-OLD')
+        PossoAnteciparVendedorEnviado.objects.filter(pk=antiga.pk).update(data_envio=timezone.now() - timedelta(days=5))
+        PossoReagendarConsultorSessao.objects.create(venda=venda, telefone=TELEFONE, whatsapp_message_id='PR-1')
+        BoasVindasEnviado.objects.create(venda=venda, telefone=TELEFONE, respondido_em=timezone.now())
+        SessaoWhatsapp.objects.create(telefone=TELEFONE, etapa='menu', dados_temp={'a': 1})
+        whatsapp_roteador.limpar_cache_sessoes()
+
+    def test_uma_consulta_e_mesmas_decisoes_dos_fluxos(self):
+        with self.assertNumQueries(1):
+            estado = carregar_estado(TELEFONE, TELEFONE)
+
+        self.assertEqual(estado.etapa_sessao, 'menu')
+        self.assertTrue(estado.ref_de(FLUXO_POSSO_ANTECIPAR, 'PA-1'))
+        self.assertFalse(estado.ref_de(FLUXO_POSSO_ANTECIPAR, 'PA-OLD'))
+        self.assertTrue(estado.tem_aberto(FLUXO_POSSO_REAGENDAR))
+        self.assertEqual(estado.fluxo_ativo, FLUXO_POSSO_REAGENDAR)
+        self.assertTrue(estado.descarta(FLUXO_CONFIRMACAO_AUDITORIA))
+        self.assertTrue(estado.descarta(FLUXO_LEMBRETE_INSTALACAO))
+        self.assertFalse(estado.descarta(FLUXO_BOAS_VINDAS))
+        self.assertFalse(estado.tem_aberto(FLUXO_BOAS_VINDAS))
+
+        funcoes = (deve_tentar_lista_agendamento, deve_tentar_posso_reagendar, deve_tentar_posso_antecipar)
+        for funcao, texto, ref in product(funcoes, ('SIM', 'nao', 'status'), ('', 'PA-1', 'PA-OLD', 'PR-1', 'X')):
+            kwargs = {'reference_message_id': ref, 'telefone': TELEFONE}
+            self.assertEqual(
+                funcao(texto, estado=estado, **kwargs),
+                funcao(texto, **kwargs),
+                (funcao.__name__, texto, ref),
+            )
+
+    def test_sessao_do_cache_e_releitura_apos_escrita_externa(self):
+        estado = carregar_estado(TELEFONE, TELEFONE)
+        with self.assertNumQueries(1):
+            sessao, criada = obter_ou_criar_sessao(TELEFONE, estado)
+        self.assertFalse(criada)
+
+        sessao.dados_temp['b'] = 2
+        sessao.save(update_fields=['dados_temp'])
+        estado = carregar_estado(TELEFONE, TELEFONE)
+        with self.assertNumQueries(0):
+            em_cache, _ = obter_ou_criar_sessao(TELEFONE, estado)
+        self.assertEqual(em_cache.dados_temp, {'a': 1, 'b': 2})
+        em_cache.dados_temp['c'] = 3
+        self.assertNotIn('c', obter_ou_criar_sessao(TELEFONE, estado)[0].dados_temp)
+
+        # Outro processo muda a etapa sem passar pelo cache deste
+        SessaoWhatsapp.objects.filter(pk=sessao.pk).update(etapa='venda_cpf', dados_temp={})
+        estado = carregar_estado(TELEFONE, TELEFONE)
+        with self.assertNumQueries(1):
+            relida, _ = obter_ou_criar_sessao(TELEFONE, estado)
+        self.assertEqual((relida.etapa, relida.dados_temp), ('venda_cpf', {}))
+
+    def test_reset_do_worker_pap_na_mesma_etapa_forca_releitura(self):
+        from crm_app.pap_job_fila import PapJobFila
+        from crm_app.services.pap_job_processor import _notificar_falha_definitiva
+
+        SessaoWhatsapp.objects.filter(telefone=TELEFONE).update(etapa='inicial')
+        estado = carregar_estado(TELEFONE, TELEFONE)
+        self.assertEqual(obter_ou_criar_sessao(TELEFONE, estado)[0].dados_temp, {'a': 1})
+
+        # Worker PAP (outro processo): limpa dados_temp sem mudar a etapa
+        job = PapJobFila(id=1, tipo='analise_credito', telefone=TELEFONE, payload={})
+        with mock.patch('crm_app.whatsapp_service.WhatsAppService.enviar_mensagem_texto'), \
+                mock.patch('crm_app.whatsapp_roteador.descartar_sessao'):
+            _notificar_falha_definitiva(job)
+        estado = carregar_estado(TELEFONE, TELEFONE)
+        relida, _ = obter_ou_criar_sessao(TELEFONE, estado)
+        self.assertEqual((relida.etapa, relida.dados_temp), ('inicial', {}))
+
+    def test_sem_sessao_cria(self):
+        estado = carregar_estado('5531988887777', '5531988887777')
+        self.assertIsNone(estado.sessao)
+        sessao, criada = obter_ou_criar_sessao('5531988887777', estado)
+        self.assertTrue(criada)
+        self.assertEqual(sessao.etapa, 'inicial')
+
+
+class WebhookQueriesTest(TestCase):
+    def setUp(self):
+        whatsapp_roteador.limpar_cache_sessoes()
+        Usuario.objects.create_user(username='vend_roteador', password='x', tel_whatsapp=TELEFONE)
+
+    def _mensagem(self, texto):
+        payload = {'phone': TELEFONE, 'type': 'ReceivedCallback', 'text': {'message': texto}}
+        from crm_app.whatsapp_webhook_handler import processar_webhook_whatsapp
+
+        with mock.patch('crm_app.whatsapp_service.WhatsAppService.enviar_mensagem_texto', return_value=(True, {})), \
+                self.assertLogs('crm_app.whatsapp_webhook_handler', level='INFO') as logs:
+            processar_webhook_whatsapp(payload)
+        linha = next(r for r in logs.output if 'queries=' in r)
+        return int(linha.split('queries=')[1].split()[0])
+
+    def test_menos_consultas_com_roteador(self):
+        self._mensagem('MENU')
+        com_roteador = self._mensagem('MENU')
+        with override_settings(WHATSAPP_ROTEADOR_ENABLED=False):
+            sem_roteador = self._mensagem('MENU')
+        self.assertLess(com_roteador, sem_roteador)
@@ -103,6 +103,8 @@ from .views import (
     enviar_comissao_whatsapp,
     enviar_folha_extrato_whatsapp,
     exportar_folha_extrato_pdf,
+    status_lote_folha_pdf,
+    download_lote_folha_pdf,
     exportar_comissionamento_resumo_excel,
     exportar_comissionamento_extrato_excel,
     enviar_resultado_campanha_whatsapp,
@@ -215,12 +217,17 @@ from .auditoria_inclusao_api import (
     DemandaInclusaoErroView,
 )
 from .pendencia_indevida_api import PendenciaIndevidaRegistrarView, PendenciaIndevidaRelatorioView
-from .funil_venda_wpp_api import FunilVendaWppTentativaDetailView, FunilVendaWppTentativaListView
+from .funil_venda_wpp_api import (
+    FunilVendaWppResumoView,
+    FunilVendaWppTentativaDetailView,
+    FunilVendaWppTentativaListView,
+)
 from .esteira_sync_status_pap_api import (
     SyncStatusEsteiraCancelarView,
     SyncStatusEsteiraIniciarView,
     SyncStatusEsteiraStatusView,
 )
+from .scheduler_execucoes_api import SchedulerJobsEstatisticasView
 from .esteira_consulta_status_pap_api import (
     ConsultaStatusEsteiraCancelarView,
     ConsultaStatusEsteiraIniciarView,
@@ -278,6 +285,7 @@ urlpatterns = [
     path('whatsapp-telefones-sem-ia/<int:pk>/', whatsapp_telefone_sem_ia_detail_view, name='whatsapp-telefone-sem-ia-detail'),
     path('funil-venda-wpp/tentativas/', FunilVendaWppTentativaListView.as_view(), name='funil-venda-wpp-tentativas'),
     path('funil-venda-wpp/tentativas/<int:pk>/', FunilVendaWppTentativaDetailView.as_view(), name='funil-venda-wpp-tentativa-detail'),
+    path('funil-venda-wpp/resumo/', FunilVendaWppResumoView.as_view(), name='funil-venda-wpp-resumo'),
     path('consultar-biometria-brpronto/', consultar_biometria_brpronto_view, name='consultar-biometria-brpronto'),
     # --- Endpoint para busca automática de fatura NIO (Bonus M-10) ---
     path('bonus-m10/buscar-fatura-nio/', buscar_fatura_nio_bonus_m10, name='buscar-fatura-nio-bonus-m10'),
@@ -350,6 +358,8 @@ urlpatterns = [
     path('comissionamento/whatsapp/', enviar_comissao_whatsapp, name='enviar-whatsapp-comissao'),
     path('comissionamento/enviar-folha-extrato-whatsapp/', enviar_folha_extrato_whatsapp, name='enviar-folha-extrato-whatsapp'),
     path('comissionamento/exportar-folha-extrato-pdf/', exportar_folha_extrato_pdf, name='exportar-folha-extrato-pdf'),
+    path('comissionamento/lote-folha-pdf/<int:lote_id>/', status_lote_folha_pdf, name='status-lote-folha-pdf'),
+    path('comissionamento/lote-folha-pdf/<int:lote_id>/download/', download_lote_folha_pdf, name='download-lote-folha-pdf'),
     path('comissionamento/exportar-resumo-excel/', exportar_comissionamento_resumo_excel, name='exportar-comissionamento-resumo-excel'),
     path('comissionamento/exportar-extrato-excel/', exportar_comissionamento_extrato_excel, name='exportar-comissionamento-extrato-excel'),
     
@@ -414,6 +424,7 @@ urlpatterns = [
     path('esteira/sync-status-pap/iniciar/', SyncStatusEsteiraIniciarView.as_view(), name='esteira-sync-status-pap-iniciar'),
     path('esteira/sync-status-pap/cancelar/', SyncStatusEsteiraCancelarView.as_view(), name='esteira-sync-status-pap-cancelar'),
     path('esteira/sync-status-pap/status/', SyncStatusEsteiraStatusView.as_view(), name='esteira-sync-status-pap-status'),
+    path('scheduler/jobs/', SchedulerJobsEstatisticasView.as_view(), name='scheduler-jobs-estatisticas'),
     path('esteira/consulta-status-pap/iniciar/', ConsultaStatusEsteiraIniciarView.as_view(), name='esteira-consulta-status-pap-iniciar'),
     path('esteira/consulta-status-pap/cancelar/', ConsultaStatusEsteiraCancelarView.as_view(), name='esteira-consulta-status-pap-cancelar'),
     path('esteira/consulta-status-pap/status/', ConsultaStatusEsteiraStatusView.as_view(), name='esteira-consulta-status-pap-status'),
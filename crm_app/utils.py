@@ -11,6 +11,11 @@ def is_member(user, groups):
         return False
     if getattr(user, 'is_superuser', False):
         return True
+    from usuarios.autorizacao import snapshot_autorizacao
+
+    snap = snapshot_autorizacao(user)
+    if snap is not None:
+        return snap.pertence(groups)
     if user.groups.filter(name__in=groups).exists():
         return True
     try:
@@ -229,6 +234,19 @@ def consultar_fachada_dfv(cep, numero):
     numero_limpo = str(numero).strip().upper()
     print(f"\n🔎 BUSCA DFV (FACHADA) -> CEP: {cep_limpo} | NUM: {numero_limpo}")
 
+    from crm_app import dfv_indice
+
+    disponivel, entrada = dfv_indice.obter_entrada(cep_limpo)
+    if disponivel:
+        tipos = (entrada or {}).get('tipos') or {}
+        num = numero_limpo
+        if num not in tipos and numero_limpo.isdigit():
+            num = str(int(numero_limpo))
+        if num in tipos:
+            logradouro = (entrada.get('logradouros') or {}).get(num, entrada.get('logradouro'))
+            return f"✅ *FACHADA LOCALIZADA (DFV)*\nStatus: *{tipos[num]}*\nEnd: {logradouro}, {num}"
+        return f"❌ *FACHADA NÃO ENCONTRADA*\nO número {numero_limpo} no CEP {cep_limpo} não consta na base DFV."
+
     dfv = DFV.objects.filter(cep=cep_limpo, num_fachada=numero_limpo).first()
     if not dfv and numero_limpo.isdigit():
         dfv = DFV.objects.filter(cep=cep_limpo, num_fachada=str(int(numero_limpo))).first()
@@ -246,7 +264,22 @@ def listar_fachadas_dfv(cep):
     cep_limpo = limpar_texto(cep)
     print(f"\n🔎 LISTAR FACHADAS DFV -> CEP: {cep_limpo}")
 
-    # Busca todos os registros com esse CEP que sejam VIÁVEIS
+    from crm_app import dfv_indice
+
+    disponivel, entrada = dfv_indice.obter_entrada(cep_limpo)
+    if disponivel:
+        if not entrada or not entrada.get('viaveis'):
+            return _mensagem_nenhuma_fachada_dfv(cep_limpo)
+        cdos = entrada.get('cdos') or []
+        return _mensagem_fachadas_dfv(
+            entrada.get('logradouro') or "Rua Desconhecida",
+            entrada.get('bairro') or "Bairro Desconhecido",
+            entrada.get('tecnologia') or "-",
+            ', '.join(cdos) if cdos else '-',
+            entrada['viaveis'],
+        )
+
+    # Sem índice: busca todos os registros com esse CEP que sejam VIÁVEIS
     fachadas = DFV.objects.filter(
         cep=cep_limpo
     ).filter(
@@ -254,41 +287,35 @@ def listar_fachadas_dfv(cep):
     ).values_list('num_fachada', 'complemento', 'logradouro', 'bairro', 'tipo_rede', 'nome_cdo')
 
     if not fachadas:
-        return (
-            f"❌ *NENHUMA FACHADA ENCONTRADA*\n\n"
-            f"Não encontramos nenhum número viável cadastrado na base DFV para o CEP {cep_limpo}.\n"
-            f"Tente a consulta de *Viabilidade (KMZ)* para ver se a região tem cobertura."
-        )
+        return _mensagem_nenhuma_fachada_dfv(cep_limpo)
 
     # Pega dados do logradouro do primeiro resultado para cabeçalho
     exemplo = fachadas[0]
-    logradouro = exemplo[2] or "Rua Desconhecida"
-    bairro = exemplo[3] or "Bairro Desconhecido"
-    tecnologia = exemplo[4] or "-"
-    nome_cdo = exemplo[5] or "-"
+    numeros = dfv_indice.ordenar_fachadas([dfv_indice.num_compl(f[0], f[1]) for f in fachadas if f[0]])
 
-    # Monta lista de números + complemento
-    def num_compl(num, compl):
-        num = (num or '').strip()
-        compl = (compl or '').strip()
-        if compl:
-            return f"{num} ({compl})"
-        return num
+    # Listar todos os NOME_CDOs distintos para o CEP
+    cdos = sorted(set([f[5] for f in fachadas if f[5]]))
+    return _mensagem_fachadas_dfv(
+        exemplo[2] or "Rua Desconhecida",
+        exemplo[3] or "Bairro Desconhecido",
+        exemplo[4] or "-",
+        ', '.join(cdos) if cdos else '-',
+        numeros,
+    )
+
+
+def _mensagem_nenhuma_fachada_dfv(cep_limpo):
+    return (
+        f"❌ *NENHUMA FACHADA ENCONTRADA*\n\n"
+        f"Não encontramos nenhum número viável cadastrado na base DFV para o CEP {cep_limpo}.\n"
+        f"Tente a consulta de *Viabilidade (KMZ)* para ver se a região tem cobertura."
+    )
 
-    numeros = [num_compl(f[0], f[1]) for f in fachadas if f[0]]
-    try:
-        # Ordena pelo número (ignorando complemento)
-        numeros.sort(key=lambda x: int(''.join(filter(str.isdigit, x.split(' ')[0]))) if any(c.isdigit() for c in x.split(' ')[0]) else 0)
-    except:
-        numeros.sort()
 
+def _mensagem_fachadas_dfv(logradouro, bairro, tecnologia, cdos_str, numeros):
     total = len(numeros)
     lista_str = ", ".join(numeros)
 
-    # Listar todos os NOME_CDOs distintos para o CEP
-    cdos = sorted(set([f[5] for f in fachadas if f[5]]))
-    cdos_str = ', '.join(cdos) if cdos else '-'
-
     # Se a lista for muito grande, corta para não travar o Zap
     if len(lista_str) > 3000:
         lista_str = lista_str[:3000] + "... (lista muito longa)"
@@ -319,13 +346,9 @@ def _cep_numero_viavel_no_dfv(cep_limpo, numero):
     num_limpo = num_str.split("(")[0].strip() if "(" in num_str else num_str
     if not num_limpo.isdigit():
         return False
-    existe = DFV.objects.filter(
-        cep=cep_limpo,
-        num_fachada=num_limpo
-    ).filter(
-        Q(tipo_viabilidade__icontains='VIAVEL') | Q(tipo_viabilidade__icontains='VIÁVEL')
-    ).exists()
-    return existe
+    from crm_app.dfv_indice import numeros_viaveis_lote
+
+    return numeros_viaveis_lote([(cep_limpo, num_limpo)])[(cep_limpo, num_limpo)]
 
 
 def consultar_viabilidade_kmz(cep, numero):
@@ -0,0 +1,115 @@
+"""
+Rastreamento de mudanças da Venda e efeitos colaterais das transições de status.
+
+Um único snapshot do estado anterior por save (status, reemissão, ativo), compartilhado
+pelos receivers de pre_save/post_save em vez de cada um refazer `Venda.objects.get`.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+ATTR_SNAPSHOT = '_snapshot_anterior'
+
+# Campos lidos do banco antes do save; status vêm com o nome (select_related + only).
+CAMPOS_SNAPSHOT = (
+    'reemissao',
+    'ativo',
+    'status_tratamento',
+    'status_tratamento__nome',
+    'status_esteira',
+    'status_esteira__nome',
+)
+
+
+def _qs_snapshot():
+    from crm_app.models import Venda
+
+    return Venda.objects.select_related('status_tratamento', 'status_esteira').only(*CAMPOS_SNAPSHOT)
+
+
+def capturar_snapshot(instance):
+    """Lê o estado anterior (1 query) e guarda na instância; None se a venda é nova."""
+    snapshot = None
+    if instance.pk:
+        snapshot = _qs_snapshot().filter(pk=instance.pk).first()
+    setattr(instance, ATTR_SNAPSHOT, snapshot)
+    return snapshot
+
+
+def snapshot_anterior(instance):
+    """Snapshot do save corrente (capturado no primeiro pre_save); captura se ausente."""
+    if not hasattr(instance, ATTR_SNAPSHOT):
+        return capturar_snapshot(instance)
+    return getattr(instance, ATTR_SNAPSHOT)
+
+
+def campo_mudou(instance, campo: str, anterior=None) -> bool:
+    """Compara pelo attname (ex.: status_esteira_id), sem carregar FKs. Sem snapshot → True."""
+    anterior = anterior if anterior is not None else getattr(instance, ATTR_SNAPSHOT, None)
+    if anterior is None:
+        return True
+    attname = instance._meta.get_field(campo).attname
+    return getattr(instance, attname) != getattr(anterior, attname)
+
+
+def _nome(status) -> str:
+    return ((status.nome if status else '') or '').strip().upper()
+
+
+def virou_cadastrada(venda, anterior) -> bool:
+    """Status de tratamento (ou, na falta dele, de esteira) passou a CADASTRADA."""
+    old_tratamento = anterior.status_tratamento if anterior is not None else None
+    old_esteira = anterior.status_esteira if anterior is not None else None
+    if _nome(venda.status_tratamento) == 'CADASTRADA':
+        return _nome(old_tratamento) != 'CADASTRADA'
+    if _nome(venda.status_esteira) == 'CADASTRADA':
+        return _nome(old_esteira) != 'CADASTRADA'
+    return False
+
+
+def foi_desativada(venda, anterior) -> bool:
+    return anterior is not None and anterior.ativo and not venda.ativo
+
+
+def notificar_vendedor_cadastrada(venda) -> bool:
+    """Envia ao vendedor a mensagem de venda CADASTRADA (telefone do perfil)."""
+    if not venda.vendedor:
+        logger.warning(f"Venda #{venda.id} sem vendedor. WhatsApp cancelado.")
+        return False
+
+    telefone_vendedor = venda.vendedor.tel_whatsapp
+    if not telefone_vendedor:
+        logger.warning(f"Vendedor {venda.vendedor.username} não tem 'Tel WhatsApp' cadastrado.")
+        return False
+
+    try:
+        from crm_app.whatsapp_service import WhatsAppService
+
+        logger.info(f"Enviando WhatsApp para vendedor {venda.vendedor.username} ({telefone_vendedor})...")
+        WhatsAppService().enviar_mensagem_cadastrada(venda, telefone_destino=telefone_vendedor)
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao enviar WhatsApp na venda #{venda.id}: {e}")
+        return False
+
+
+def cancelar_contratos_m10(venda_ids: Iterable[int]) -> int:
+    """Vendas desativadas: ContratoM10 ATIVO → CANCELADO (1 UPDATE)."""
+    from django.utils import timezone
+
+    from crm_app.models import ContratoM10
+
+    venda_ids = list(venda_ids)
+    if not venda_ids:
+        return 0
+    return ContratoM10.objects.filter(
+        venda_id__in=venda_ids,
+        status_contrato='ATIVO',
+    ).update(
+        status_contrato='CANCELADO',
+        data_cancelamento=timezone.now().date(),
+    )
+
@@ -0,0 +1,66 @@
+"""
+Carimbo de versão para dados derivados mantidos em memória por processo.
+
+Web, webhook e scheduler rodam em serviços separados (sem Redis): quem reconstrói um
+índice incrementa a versão no banco (`VersaoIndice`) e cada processo relê a versão no
+máximo a cada `ttl_seg` segundos, descartando o cache local quando ela muda.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+def versao_atual(nome: str) -> int:
+    from crm_app.models import VersaoIndice
+
+    versao = VersaoIndice.objects.filter(nome=nome).values_list('versao', flat=True).first()
+    return int(versao or 0)
+
+
+def incrementar_versao(nome: str, **detalhes) -> int:
+    """Incrementa (ou cria em 1) a versão de `nome`; retorna a nova versão."""
+    from crm_app.models import VersaoIndice
+
+    with transaction.atomic():
+        obj, criado = VersaoIndice.objects.select_for_update().get_or_create(
+            nome=nome, defaults={'versao': 1, 'detalhes': detalhes},
+        )
+        if not criado:
+            VersaoIndice.objects.filter(pk=obj.pk).update(versao=F('versao') + 1, detalhes=detalhes)
+            obj.refresh_from_db(fields=['versao'])
+    logger.info('[VERSAO INDICE] %s -> v%s', nome, obj.versao)
+    return int(obj.versao)
+
+
+class VersaoLocal:
+    """Versão de `nome` vista por este processo, relida do banco no máximo a cada `ttl_seg`."""
+
+    def __init__(self, nome: str, ttl_seg: float = 60.0) -> None:
+        self.nome = nome
+        self.ttl_seg = ttl_seg
+        self._versao: Optional[int] = None
+        self._lido_em = 0.0
+        self._lock = threading.Lock()
+
+    def obter(self) -> int:
+        agora = time.monotonic()
+        if self._versao is not None and agora - self._lido_em < self.ttl_seg:
+            return self._versao
+        with self._lock:
+            if self._versao is None or agora - self._lido_em >= self.ttl_seg:
+                self._versao = versao_atual(self.nome)
+                self._lido_em = agora
+            return self._versao
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._versao = None
+            self._lido_em = 0.0
@@ -552,9 +552,10 @@ def buscar_fatura_nio_bonus_m10(request):
         return None
 
     try:
-        from crm_app.nio_api import consultar_dividas_nio, get_invoice_pdf_url
+        from crm_app.nio_api import get_invoice_pdf_url
+        from crm_app.nio_dividas_cache import consultar_dividas_nio_cache
 
-        api_result = consultar_dividas_nio(cpf_limpo, offset=0, limit=50, headless=True)
+        api_result = consultar_dividas_nio_cache(cpf_limpo, offset=0, limit=50, headless=True, permitir_stale=True)
         invoices = api_result.get("invoices") or []
 
         if not invoices:
@@ -613,8 +614,6 @@ def buscar_fatura_nio_bonus_m10(request):
             "message": "Não foi possível buscar a fatura. Verifique o CPF ou tente novamente.",
         }, status=500)
 import logging
-import pandas as pd
-import numpy as np
 from decimal import Decimal, InvalidOperation
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
@@ -632,6 +631,22 @@ import threading
 import requests
 from email_validator import validate_email, EmailNotValidError
 
+# Dependências pesadas só no 1º uso: urls.py, workers e serviços importam este módulo
+# sem gerar Excel/PDF (ver `manage.py perfil_importacao`).
+from .lazy_imports import LazyModule, lazy_attr
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+openpyxl = LazyModule('openpyxl')
+pisa = LazyModule('xhtml2pdf.pisa')
+get_column_letter = lazy_attr('openpyxl.utils', 'get_column_letter')
+Font = lazy_attr('openpyxl.styles', 'Font')
+PatternFill = lazy_attr('openpyxl.styles', 'PatternFill')
+Alignment = lazy_attr('openpyxl.styles', 'Alignment')
+Border = lazy_attr('openpyxl.styles', 'Border')
+Side = lazy_attr('openpyxl.styles', 'Side')
+WhatsAppService = lazy_attr('crm_app.whatsapp_service', 'WhatsAppService')
+
 
 # --- CORREÇÃO CRÍTICA: Importar transaction e IntegrityError ---
 from django.db import transaction, IntegrityError
@@ -666,7 +681,6 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.exceptions import PermissionDenied, NotFound
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.pagination import PageNumberPagination
-from openpyxl.utils import get_column_letter
 
 
 class VendaPagination(PageNumberPagination):
@@ -679,11 +693,8 @@ class VendaPagination(PageNumberPagination):
 # --- IMPORTS EXTRAS DO PROJETO ---
 from core.models import DiaFiscal, RegraAutomacao
 from core.validators import validar_cpf, validar_cnpj, validar_cpf_ou_cnpj
-from .whatsapp_service import WhatsAppService
-from xhtml2pdf import pisa
 from usuarios.permissions import CheckAPIPermission, VendaPermission
-import openpyxl 
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from usuarios.autorizacao import ids_liderados
 from .models import GrupoDisparo
 from .serializers import GrupoDisparoSerializer
 from .models import LancamentoFinanceiro
@@ -1562,8 +1573,10 @@ class EstatisticasBotWhatsAppView(APIView):
         try:
             from django.db.models import Count, Q
             from django.utils import timezone
-            from datetime import timedelta
-            
+            from datetime import datetime, timedelta
+
+            from crm_app.services import telemetria_rollup
+
             # Parâmetros opcionais de filtro
             dias = request.query_params.get('dias', 30)  # Padrão: últimos 30 dias
             try:
@@ -1571,49 +1584,67 @@ class EstatisticasBotWhatsAppView(APIView):
             except Exception:
                 dias = 30
             
-            data_inicio = timezone.now() - timedelta(days=dias)
-            
-            # Filtrar estatísticas do período
-            estatisticas = EstatisticaBotWhatsApp.objects.filter(
-                data_envio__gte=data_inicio
-            ).select_related('vendedor')
-            
-            # 1. Contagem por comando
-            por_comando = estatisticas.values('comando').annotate(
-                total=Count('id')
-            ).order_by('comando')
-            
-            comando_dict = {item['comando']: item['total'] for item in por_comando}
-
-            # Ordem canônica (choices) + quaisquer valores extras presentes no período
             ordem_choices = [c[0] for c in EstatisticaBotWhatsApp.COMANDO_CHOICES]
-            extras = sorted(k for k in comando_dict.keys() if k not in ordem_choices)
-            comandos_ordem = ordem_choices + extras
 
+            if telemetria_rollup.rollup_ativo():
+                # Agregado diário (dia, vendedor, comando): a janela começa no início do dia
+                data_inicio = timezone.make_aware(
+                    datetime.combine(telemetria_rollup.dia_inicial(dias), datetime.min.time())
+                )
+                agregado = telemetria_rollup.estatisticas_bot(dias, ordem_choices)
+                comando_dict = agregado['por_comando']
+                comandos_ordem = agregado['comandos']
+                por_vendedor = [i for i in agregado['por_vendedor'] if i['vendedor__id'] is not None]
+                por_sem_vendedor = [i for i in agregado['por_vendedor'] if i['vendedor__id'] is None]
+                total_geral = sum(comando_dict.values())
+                total_sem_vendedor = sum(i['total'] for i in por_sem_vendedor)
+            else:
+                data_inicio = timezone.now() - timedelta(days=dias)
+
+                # Filtrar estatísticas do período
+                estatisticas = EstatisticaBotWhatsApp.objects.filter(
+                    data_envio__gte=data_inicio
+                ).select_related('vendedor')
+
+                # 1. Contagem por comando
+                por_comando = estatisticas.values('comando').annotate(
+                    total=Count('id')
+                ).order_by('comando')
+
+                comando_dict = {item['comando']: item['total'] for item in por_comando}
+
+                # Ordem canônica (choices) + quaisquer valores extras presentes no período
+                extras = sorted(k for k in comando_dict.keys() if k not in ordem_choices)
+                comandos_ordem = ordem_choices + extras
+
+                # 2. Contagem por vendedor — mapa dinâmico por comando
+                annotate_kwargs = {
+                    'total': Count('id'),
+                }
+                for cmd in comandos_ordem:
+                    annotate_kwargs[f'cmd_{cmd}'] = Count('id', filter=Q(comando=cmd))
+
+                def _annotate_por_grupo(qs):
+                    return qs.values(
+                        'vendedor__id',
+                        'vendedor__username',
+                        'vendedor__first_name',
+                        'vendedor__last_name',
+                    ).annotate(**annotate_kwargs).order_by('-total')
+
+                por_vendedor = _annotate_por_grupo(estatisticas.filter(vendedor__isnull=False))
+                por_sem_vendedor = _annotate_por_grupo(estatisticas.filter(vendedor__isnull=True))
+
+                # 3. Totais gerais
+                total_geral = estatisticas.count()
+                total_sem_vendedor = estatisticas.filter(vendedor__isnull=True).count()
+
+            # Inclui no detalhe só o que tem uso, mas mantém lista completa em `comandos`
+            # (UI usa `comandos` + `por_comando_detalhe`)
             por_comando_detalhe = {
                 cmd: comando_dict.get(cmd, 0) for cmd in comandos_ordem
             }
-            # Inclui no detalhe só o que tem uso, mas mantém lista completa em `comandos`
-            # (UI usa `comandos` + `por_comando_detalhe`)
 
-            # 2. Contagem por vendedor — mapa dinâmico por comando
-            annotate_kwargs = {
-                'total': Count('id'),
-            }
-            for cmd in comandos_ordem:
-                annotate_kwargs[f'cmd_{cmd}'] = Count('id', filter=Q(comando=cmd))
-
-            def _annotate_por_grupo(qs):
-                return qs.values(
-                    'vendedor__id',
-                    'vendedor__username',
-                    'vendedor__first_name',
-                    'vendedor__last_name',
-                ).annotate(**annotate_kwargs).order_by('-total')
-
-            por_vendedor = _annotate_por_grupo(estatisticas.filter(vendedor__isnull=False))
-            por_sem_vendedor = _annotate_por_grupo(estatisticas.filter(vendedor__isnull=True))
-            
             def _linha_vendedor(item, sem_cadastro: bool) -> dict:
                 nome_completo = item.get('vendedor__first_name', '') or ''
                 sobrenome = item.get('vendedor__last_name', '') or ''
@@ -1642,11 +1673,7 @@ class EstatisticasBotWhatsAppView(APIView):
                 _linha_vendedor(item, True) for item in por_sem_vendedor
             )
             vendedores_data.sort(key=lambda x: x['total'], reverse=True)
-            
-            # 3. Totais gerais
-            total_geral = estatisticas.count()
-            total_sem_vendedor = estatisticas.filter(vendedor__isnull=True).count()
-            
+
             return Response({
                 'periodo_dias': dias,
                 'data_inicio': data_inicio.isoformat(),
@@ -1946,7 +1973,15 @@ class VendaViewSet(viewsets.ModelViewSet):
             status_instalada_exata = status_upper == 'INSTALADA'
 
         # --- FILTRO DE BUSCA GLOBAL ---
+        # Índice DocumentoBusca (trigram no Postgres); sem índice construído, busca direta.
+        q_indice = None
         if busca_geral:
+            from crm_app.services import busca_textual
+
+            q_indice = busca_textual.q_busca(busca_textual.TIPO_VENDA, search)
+        if q_indice is not None:
+            queryset = queryset.filter(q_indice)
+        elif busca_geral:
             search_strip = (search or '').strip()
             search_clean = re.sub(r'\D', '', search_strip)
             filters = Q(ordem_servico__icontains=search_strip) | \
@@ -2001,7 +2036,7 @@ class VendaViewSet(viewsets.ModelViewSet):
                 return queryset
             q_vs_retrieve = q_venda_acesso_retrieve_vendedor_supervisor()
             if is_member(user, ['Supervisor']):
-                liderados_ids = list(user.liderados.values_list('id', flat=True))
+                liderados_ids = ids_liderados(user)
                 liderados_ids.append(user.id)
                 qs_sup = queryset.filter(vendedor_id__in=liderados_ids)
                 if self.action == 'retrieve':
@@ -2027,7 +2062,7 @@ class VendaViewSet(viewsets.ModelViewSet):
             elif is_member(user, ['Auditoria', 'Qualidade', PERFIL_GERENTE_CONTAS]):
                 pass # Já filtrado no inicio
             elif is_member(user, ['Supervisor']):
-                liderados_ids = list(user.liderados.values_list('id', flat=True))
+                liderados_ids = ids_liderados(user)
                 liderados_ids.append(user.id)
                 queryset = queryset.filter(vendedor_id__in=liderados_ids)
             else:
@@ -3506,12 +3541,21 @@ class VendaViewSet(viewsets.ModelViewSet):
             logger.exception('Erro ao normalizar classificações MEI legadas no export')
 
         from crm_app.churn_os_utils import build_osab_documento_set, rotulo_validacao_osab
+        from crm_app.services import osab_documentos
 
-        osab_set = build_osab_documento_set(
-            ImportacaoOsab.objects.exclude(
-                Q(documento__isnull=True) | Q(documento='')
-            ).values_list('documento', flat=True).iterator(chunk_size=8000)
-        )
+        conjunto_osab = osab_documentos.conjunto_documentos()
+        if conjunto_osab is not None:
+            def _rotulo_osab(pedido):
+                return osab_documentos.rotulo_validacao(pedido, conjunto_osab)
+        else:
+            osab_set = build_osab_documento_set(
+                ImportacaoOsab.objects.exclude(
+                    Q(documento__isnull=True) | Q(documento='')
+                ).values_list('documento', flat=True).iterator(chunk_size=8000)
+            )
+
+            def _rotulo_osab(pedido):
+                return rotulo_validacao_osab(pedido, osab_set)
 
         def _classificacao_mei_celula(venda):
             cod = venda.classificacao_mei or (
@@ -3563,7 +3607,7 @@ class VendaViewSet(viewsets.ModelViewSet):
                 v.status_tratamento.nome if v.status_tratamento else '-',
                 v.status_comissionamento.nome if v.status_comissionamento else '-',
                 v.ordem_servico or '-',
-                rotulo_validacao_osab(v.ordem_servico, osab_set),
+                _rotulo_osab(v.ordem_servico),
                 dt_agendamento,
                 v.get_periodo_agendamento_display() or '-',
                 dt_instalacao,
@@ -5227,20 +5271,6 @@ class ImportacaoOsabView(APIView):
             return set()
         return os_variantes(norm)
 
-    def _build_osab_documento_set(self, documentos):
-        """Conjunto de chaves para match incluindo variantes de cada documento OSAB."""
-        osab_set = set()
-        for doc in documentos:
-            if doc is None:
-                continue
-            osab_set.update(self._variantes_pedido_osab(doc))
-        return osab_set
-
-    def _pedido_consta_no_osab_set(self, pedido, osab_set):
-        if not osab_set:
-            return False
-        return bool(self._variantes_pedido_osab(pedido) & osab_set)
-
     def _normalize_text(self, text):
         if not text: return ""
         text = str(text).upper().strip()
@@ -5327,6 +5357,7 @@ class ImportacaoOsabView(APIView):
 
     def _marcar_vendas_ausentes_na_osab(
         self, log_id, total_registros_import, osab_bot, snapshots_reversao=None, pedidos_validos_planilha=0,
+        dry_run=False, documentos_extras=(),
     ):
         """
         Após gravar a importação: vendas ativas com O.S. que não existem em ImportacaoOsab.
@@ -5337,17 +5368,10 @@ class ImportacaoOsabView(APIView):
         - Demais status -> NÃO CONSTA NA OSAB.
         Não envia WhatsApp. Não executa se a planilha tiver 0 linhas ou 0 pedidos válidos
         (evita marcar o CRM inteiro quando o arquivo não trouxe PEDIDO utilizável).
+        Cruzamento em SQL (services/osab_reconciliacao.py); `dry_run` só devolve o diff.
         """
-        from django.db import connection, transaction
-        from django.db.models import Q
-        from django.utils import timezone
-        from crm_app.models import LogImportacaoOSAB, ImportacaoOsab, Venda, StatusCRM, HistoricoAlteracaoVenda
-
-        from crm_app.osab_revert_utils import serializar_venda_snapshot_osab
-        from crm_app.models import LogImportacaoOSABSnapshotVenda
-
-        if snapshots_reversao is None:
-            snapshots_reversao = []
+        from crm_app.models import LogImportacaoOSAB, ImportacaoOsab, StatusCRM
+        from crm_app.services.osab_reconciliacao import reconciliar_ausentes_osab
 
         out = {
             'crm_sem_osab_nao_consta': 0,
@@ -5373,11 +5397,7 @@ class ImportacaoOsabView(APIView):
             mensagem='Verificando vendas no CRM ausentes da base OSAB...'
         )
 
-        osab_set = self._build_osab_documento_set(
-            ImportacaoOsab.objects.values_list('documento', flat=True).iterator(chunk_size=8000)
-        )
-
-        if not osab_set:
+        if not documentos_extras and not ImportacaoOsab.objects.exists():
             return out
 
         st_nao = StatusCRM.objects.filter(tipo='Esteira', nome__iexact='NÃO CONSTA NA OSAB').first()
@@ -5388,89 +5408,15 @@ class ImportacaoOsabView(APIView):
             print("Aviso OSAB: cadastre o status Esteira 'NÃO CONSTA NA OSAB' no CRM.")
             return out
 
-        hoje = timezone.localdate()
-        vendas_atualizar = []
-        historicos_criar = []
-
-        qs = Venda.objects.filter(ativo=True).exclude(
-            Q(ordem_servico__isnull=True) | Q(ordem_servico='')
-        ).select_related('status_esteira')
-
-        for venda in qs.iterator(chunk_size=2000):
-            os_str = (venda.ordem_servico or '').strip()
-            if not os_str:
-                continue
-            if self._pedido_consta_no_osab_set(os_str, osab_set):
-                continue
-
-            if venda.data_abertura:
-                da = venda.data_abertura
-                ref_d = timezone.localtime(da).date() if timezone.is_aware(da) else da.date()
-            else:
-                dc = venda.data_criacao
-                ref_d = timezone.localtime(dc).date() if timezone.is_aware(dc) else dc.date()
-            if ref_d >= hoje:
-                out['crm_sem_osab_ignoradas_mesmo_dia'] += 1
-                continue
-
-            se = venda.status_esteira
-            if se:
-                if st_outro and se.id == st_outro.id:
-                    continue
-                if se.id == st_nao.id:
-                    continue
-
-            nome_se = (se.nome if se else '') or ''
-            nome_u = nome_se.upper()
-            # INSTALADA: não rebaixar só por ausência na base espelho (PAP/OSAB delta).
-            if nome_u == 'INSTALADA' or (
-                'INSTALADA' in nome_u and 'OUTRO PDV' not in nome_u and 'NAO CONSTA' not in nome_u
-                and 'NÃO CONSTA' not in nome_u
-            ):
-                continue
-
-            target = st_nao
-
-            if se and se.id == target.id:
-                continue
-
-            old_nome = se.nome if se else '(vazio)'
-            snapshots_reversao.append({
-                'venda_id': venda.id,
-                'ordem_servico': os_str,
-                'origem': LogImportacaoOSABSnapshotVenda.ORIGEM_AUSENTE_OSAB,
-                'valores_antes': serializar_venda_snapshot_osab(venda),
-            })
-            venda.status_esteira = target
-            vendas_atualizar.append(venda)
-            historicos_criar.append(
-                HistoricoAlteracaoVenda(
-                    venda=venda,
-                    usuario=osab_bot,
-                    alteracoes={
-                        'status_esteira': (
-                            f"De '{old_nome}' para '{target.nome}' "
-                            f"(O.S. não consta na base OSAB após importação)"
-                        )
-                    },
-                )
-            )
-            out['crm_sem_osab_nao_consta'] += 1
-
-        if not vendas_atualizar:
-            return out
-
         try:
-            with transaction.atomic():
-                with connection.cursor() as cursor:
-                    cursor.execute("SET LOCAL statement_timeout = '120000ms'")
-                Venda.objects.bulk_update(vendas_atualizar, ['status_esteira'], batch_size=2000)
-            if historicos_criar:
-                with transaction.atomic():
-                    with connection.cursor() as cursor:
-                        cursor.execute("SET LOCAL statement_timeout = '120000ms'")
-                    self._sincronizar_seq_historico()
-                    HistoricoAlteracaoVenda.objects.bulk_create(historicos_criar, batch_size=2000)
+            out.update(reconciliar_ausentes_osab(
+                st_nao=st_nao,
+                st_outro=st_outro,
+                osab_bot=osab_bot,
+                documentos_extras=documentos_extras,
+                snapshots_reversao=snapshots_reversao,
+                dry_run=dry_run,
+            ))
         except Exception as e:
             print(f"Erro ao marcar vendas sem OSAB: {e}")
             raise
@@ -5494,6 +5440,10 @@ class ImportacaoOsabView(APIView):
         usuario = request.user
         pode_decidir = is_member(usuario, ['Diretoria', 'Admin'])
         flag_enviar_whatsapp = opcao_front if pode_decidir else True
+        # Simulação: processa a planilha inteira e grava só o diff no log (nenhuma venda/OSAB alterada)
+        dry_run = str(request.data.get('dry_run', 'false')).lower() == 'true'
+        if dry_run:
+            flag_enviar_whatsapp = False
         
         if not flag_enviar_whatsapp:
             print(f"--- Importação OSAB SILENCIOSA iniciada por: {usuario.username} ---")
@@ -5508,10 +5458,13 @@ class ImportacaoOsabView(APIView):
             enviar_whatsapp=flag_enviar_whatsapp
         )
 
-        # Ler arquivo para memória ANTES de spawnar thread
+        # Persistir upload e despachar job na fila de importações (worker dedicado ou thread local)
+        from crm_app.services.importacao_jobs import despachar_importacao
         try:
-            file_content = file_obj.read()
-            file_name = file_obj.name
+            despachar_importacao(
+                'osab', log, file_obj, file_obj.name,
+                enviar_whatsapp=flag_enviar_whatsapp, dry_run=dry_run,
+            )
         except Exception as e:
             log.status = 'ERRO'
             log.mensagem_erro = f'Erro ao ler arquivo: {str(e)}'
@@ -5520,22 +5473,66 @@ class ImportacaoOsabView(APIView):
             log.save()
             return Response({'error': f'Erro leitura arquivo: {str(e)}'}, status=400)
 
-        # Processar em background
-        import threading
-        thread = threading.Thread(
-            target=self._processar_osab_interno,
-            args=(log.id, file_content, file_name, flag_enviar_whatsapp)
-        )
-        thread.daemon = True
-        thread.start()
-
         return Response({
             'success': True,
-            'message': 'Importação OSAB iniciada! Processamento em andamento...',
+            'message': (
+                'Simulação OSAB iniciada! Nenhuma venda será alterada.' if dry_run
+                else 'Importação OSAB iniciada! Processamento em andamento...'
+            ),
             'log_id': log.id,
+            'dry_run': dry_run,
             'detalhes': 'O processamento está sendo executado em background. Atualize a página em alguns minutos para ver o resultado.',
         }, status=200)
 
+    def _finalizar_simulacao_osab(
+        self, log_id, report, osab_bot, pedidos_planilha, diff_planilha, *, criados, atualizados_osab,
+    ):
+        """Fecha o log de uma simulação: diff planilha + ausentes na OSAB, sem gravar nada."""
+        from crm_app.models import LogImportacaoOSAB
+        from crm_app.services.osab_reconciliacao import MAX_DIFF
+
+        snap = self._marcar_vendas_ausentes_na_osab(
+            log_id,
+            report['total_registros'],
+            osab_bot,
+            pedidos_validos_planilha=report.get('pedidos_validos_planilha', 0),
+            dry_run=True,
+            documentos_extras=pedidos_planilha,
+        )
+        diff_ausentes = snap.pop('diff', [])
+        report.update(snap)
+        report['dry_run'] = True
+        report['criados'] = criados
+        report['atualizados_planilha_osab'] = len(diff_planilha)
+        report['atualizados'] = len(diff_planilha) + report.get('crm_sem_osab_nao_consta', 0)
+        report['osab_atualizados'] = atualizados_osab
+        report['diff'] = (diff_planilha + diff_ausentes)[:MAX_DIFF]
+        report['diff_total'] = len(diff_planilha) + snap.get('diff_total', 0)
+
+        log = LogImportacaoOSAB.objects.get(id=log_id)
+        finalizado_agora = timezone.now()
+        duracao = int((finalizado_agora - log.iniciado_em).total_seconds()) if log.iniciado_em else None
+        mensagem = (
+            f"[SIMULAÇÃO] {report['total_registros']} registros; {criados} OSAB novos, "
+            f"{atualizados_osab} OSAB alterados; {report['atualizados_planilha_osab']} vendas mudariam "
+            f"pela planilha e {report.get('crm_sem_osab_nao_consta', 0)} iriam para NÃO CONSTA NA OSAB. "
+            f"Nada foi gravado."
+        )
+        LogImportacaoOSAB.objects.filter(id=log_id).update(
+            status='SUCESSO',
+            total_registros=report['total_registros'],
+            total_processadas=report['total_registros'],
+            criados=criados,
+            atualizados=report['atualizados'],
+            vendas_encontradas=report['vendas_encontradas'],
+            ja_corretos=report['ja_corretos'],
+            erros_count=len(report['erros']),
+            mensagem=mensagem,
+            detalhes_json=report,
+            finalizado_em=finalizado_agora,
+            duracao_segundos=duracao,
+        )
+
     def _serialize_date_for_json(self, value):
         """Converte objetos date/datetime para string ISO para serialização JSON"""
         from datetime import date, datetime
@@ -5545,8 +5542,8 @@ class ImportacaoOsabView(APIView):
             return value.isoformat()
         return value
 
-    def _processar_osab_interno(self, log_id, file_content, file_name, flag_enviar_whatsapp):
-        """Processamento OSAB em background thread"""
+    def _processar_osab_interno(self, log_id, file_content, file_name, flag_enviar_whatsapp, dry_run=False):
+        """Processamento OSAB em background thread (`dry_run`: só calcula o diff, sem gravar)"""
         from io import BytesIO
         from django.utils import timezone
         from crm_app.models import LogImportacaoOSAB
@@ -5877,6 +5874,7 @@ class ImportacaoOsabView(APIView):
             from crm_app.osab_revert_utils import serializar_venda_snapshot_osab
             from crm_app.models import LogImportacaoOSABSnapshotVenda
             snapshots_reversao = []
+            diff_simulacao = []
 
             coluna_map = {
                 'PRODUTO': 'produto', 'UF': 'uf', 'DT_REF': 'dt_ref', 'PEDIDO': 'documento',
@@ -6201,6 +6199,13 @@ class ImportacaoOsabView(APIView):
                         )
                         if msg_whatsapp_desta_venda and flag_enviar_whatsapp:
                             fila_mensagens_whatsapp.append(msg_whatsapp_desta_venda)
+                        if dry_run:
+                            diff_simulacao.append({
+                                'venda_id': venda.id,
+                                'ordem_servico': doc_chave,
+                                'origem': LogImportacaoOSABSnapshotVenda.ORIGEM_PLANILHA,
+                                'alteracoes': detalhes_hist,
+                            })
                     else:
                         log_item["resultado_crm"] = "SEM_MUDANCA_CRM"
                         report["ja_corretos"] += 1
@@ -6221,6 +6226,13 @@ class ImportacaoOsabView(APIView):
                         mensagem=f'Processando registros... {index + 1}/{total_registros}'
                     )
 
+            if dry_run:
+                self._finalizar_simulacao_osab(
+                    log_id, report, osab_bot, lista_pedidos_limpos, diff_simulacao,
+                    criados=len(osab_criar), atualizados_osab=len(osab_atualizar),
+                )
+                return
+
             # --- 3. PERSISTÊNCIA ---
             LogImportacaoOSAB.objects.filter(id=log_id).update(
                 total_processadas=total_registros,
@@ -6301,6 +6313,9 @@ class ImportacaoOsabView(APIView):
 
                 self._salvar_snapshots_reversao_osab(log_id, snapshots_reversao)
 
+                from crm_app.services.osab_documentos import atualizar_conjunto_seguro
+                atualizar_conjunto_seguro(f'importacao OSAB #{log_id}')
+
             except Exception as e:
                 log.status = 'ERRO'
                 log.mensagem_erro = f'Erro ao salvar no banco: {str(e)}'
@@ -6388,6 +6403,14 @@ class ImportacaoOsabDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = ImportacaoOsabSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def perform_update(self, serializer):
+        documento_anterior = serializer.instance.documento
+        instancia = serializer.save()
+        # O conjunto compartilhado de documentos OSAB só muda quando o documento muda
+        if instancia.documento != documento_anterior:
+            from crm_app.services.osab_documentos import atualizar_conjunto_seguro
+            atualizar_conjunto_seguro(f'edicao OSAB #{instancia.pk}')
+
 
 # --- Controle de TT's (vendedores sem venda há X dias) ---
 from crm_app.controle_tts_service import controle_tts_listar_ordenado
@@ -6505,32 +6528,7 @@ class ControleTTTratadoAPIView(APIView):
         return Response({'tratado': False, 'deleted': deleted > 0})
 
 
-def _normalizar_anomes_gross(val):
-    """Normaliza ANOMES_GROSS para formato AAAAMM (ex.: '2025-07' -> '202507'). Aceita também número serial do Excel."""
-    if val is None or pd.isna(val):
-        return None
-    # Número serial do Excel (ex.: 45658 = 1/12/2025)
-    try:
-        if isinstance(val, (int, float)) and 30000 <= float(val) <= 60000:
-            from datetime import datetime, timedelta
-            d = datetime(1899, 12, 30) + timedelta(days=int(float(val)))
-            return d.strftime('%Y%m')
-    except (ValueError, OSError):
-        pass
-    s = str(val).strip()
-    if not s or s.lower() in ('nan', 'none', ''):
-        return None
-    # Remover separadores comuns
-    s = s.replace('-', '').replace('/', '').replace(' ', '')
-    # Se tem formato de data completa (YYYY-MM-DD), pegar só YYYYMM
-    if len(s) >= 6 and s[:4].isdigit():
-        if len(s) >= 8:  # YYYYMMDD ou YYYYMMDDHH...
-            return s[:6]  # Pega YYYYMM
-        elif len(s) == 6 and s.isdigit():
-            return s  # Já está no formato AAAAMM
-        elif len(s) == 7 and s[4] in ('-', '/'):  # YYYY-MM ou YYYY/MM
-            return s[:4] + s[5:7]
-    return s[:6] if len(s) >= 6 else None
+from crm_app.churn_os_utils import normalizar_anomes_gross as _normalizar_anomes_gross
 
 
 class ImportacaoChurnView(APIView):
@@ -6977,9 +6975,6 @@ class ImportarDFVView(APIView):
             Response com log_id e status da importação iniciada
         """
         import logging
-        import threading
-        import tempfile
-        import os
         
         logger = logging.getLogger(__name__)
         
@@ -7019,49 +7014,15 @@ class ImportarDFVView(APIView):
                 f"Arquivo: {file_obj.name}, Usuário: {request.user.username}"
             )
             
-            # Salvar arquivo em disco temporário para evitar uso excessivo de memória
-            chunk_size = 1024 * 1024  # 1MB por chunk
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
-            temp_path = temp_file.name
-            total_bytes = 0
-
-            logger.debug(f"[DFV] Salvando arquivo {file_obj.name} em disco temporário...")
-            for chunk in file_obj.chunks(chunk_size):
-                temp_file.write(chunk)
-                total_bytes += len(chunk)
-            temp_file.close()
+            # Persistir upload em chunks (disco/R2) e despachar job na fila de importações
+            from .services.importacao_jobs import despachar_importacao
 
+            LogImportacaoDFV.objects.filter(id=log.id).update(tamanho_arquivo=file_obj.size or 0)
+            despachar_importacao('dfv', log, file_obj, file_obj.name)
             logger.info(
-                f"[DFV] Arquivo salvo em disco: {file_obj.name} "
-                f"({total_bytes / (1024*1024):.2f} MB)"
+                f"[DFV] Job despachado: {file_obj.name} "
+                f"({(file_obj.size or 0) / (1024*1024):.2f} MB)"
             )
-
-            # Atualizar tamanho do arquivo no log
-            LogImportacaoDFV.objects.filter(id=log.id).update(tamanho_arquivo=total_bytes)
-            
-            # Iniciar processamento em thread background
-            def processar_dfv_async():
-                """Wrapper para processamento assíncrono"""
-                try:
-                    from .services.dfv_import_service import DFVImportService
-                    
-                    service = DFVImportService(log_id=log.id)
-                    service.process(None, file_obj.name, arquivo_path=temp_path)
-                except Exception as e:
-                    logger.error(
-                        f"[DFV] Erro crítico no processamento assíncrono: {e}",
-                        exc_info=True
-                    )
-                    # O serviço já atualiza o log em caso de erro
-                finally:
-                    try:
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-                    except Exception as e:
-                        logger.warning(f"[DFV] Não foi possível remover arquivo temporário: {e}")
-            
-            thread = threading.Thread(target=processar_dfv_async, daemon=True)
-            thread.start()
             
             # Retornar imediatamente ao cliente
             return Response({
@@ -7093,9 +7054,6 @@ class ImportarCNPJView(APIView):
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request):
-        import threading
-        import tempfile
-
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response({'error': 'Arquivo não enviado.'}, status=400)
@@ -7109,7 +7067,7 @@ class ImportarCNPJView(APIView):
 
         try:
             from .models import LogImportacaoEstabelecimentoCNPJ
-            from .services.cnpj_estabele_import_service import processar_arquivo_estabele
+            from .services.importacao_jobs import despachar_importacao
 
             log_em_andamento = LogImportacaoEstabelecimentoCNPJ.objects.filter(
                 status='PROCESSANDO'
@@ -7124,45 +7082,18 @@ class ImportarCNPJView(APIView):
                 nome_arquivo=file_obj.name,
                 usuario=request.user,
                 status='PROCESSANDO',
-                tamanho_arquivo=0,
+                tamanho_arquivo=file_obj.size or 0,
             )
 
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.ESTABELE')
-            temp_path = temp_file.name
-            total_bytes = 0
-            for chunk in file_obj.chunks(chunk_size=1024 * 1024):
-                temp_file.write(chunk)
-                total_bytes += len(chunk)
-            temp_file.close()
-
-            LogImportacaoEstabelecimentoCNPJ.objects.filter(id=log.id).update(
-                tamanho_arquivo=total_bytes
+            # Persistir upload em chunks (disco/R2) e despachar job na fila de importações
+            despachar_importacao(
+                'cnpj', log, file_obj, file_obj.name,
+                aplicar_filtros=request.data.get('aplicar_filtros') in (True, 'true', '1'),
+                cnae_fiscal=request.data.get('cnae_fiscal') or None,
+                codigo_municipio=request.data.get('codigo_municipio') or None,
+                situacao_cadastral=request.data.get('situacao_cadastral') or None,
             )
 
-            aplicar_filtros = request.data.get('aplicar_filtros') in (True, 'true', '1')
-            cnae = request.data.get('cnae_fiscal') or None
-            municipio = request.data.get('codigo_municipio') or None
-            situacao = request.data.get('situacao_cadastral') or None
-
-            def processar_async():
-                try:
-                    processar_arquivo_estabele(
-                        log_id=log.id,
-                        arquivo_path=temp_path,
-                        aplicar_filtros=aplicar_filtros,
-                        cnae_fiscal=cnae,
-                        codigo_municipio=municipio,
-                        situacao_cadastral=situacao,
-                    )
-                finally:
-                    try:
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-                    except Exception:
-                        pass
-
-            threading.Thread(target=processar_async, daemon=True).start()
-
             return Response({
                 'success': True,
                 'log_id': log.id,
@@ -7386,39 +7317,82 @@ def enviar_comissao_whatsapp(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+GRUPOS_GESTAO_FOLHA_PDF = ['Diretoria', 'Admin', 'BackOffice', 'Auditoria', 'Qualidade']
+
+
 def _obter_folha_exportacao(request, ano: int, mes: int, ids_envio: list[int] | None = None) -> dict:
     """
     Folha para PDF/Excel/WhatsApp: reaproveita o cache da aba Folha.
     Se a folha completa não estiver em cache e houver um único vendedor, calcula só ele.
     """
-    from crm_app.services.folha_comissionamento_cache import (
-        calcular_folha_mes_com_cache,
-        obter_folha_cacheada,
+    from crm_app.services.folha_pdf_lote import obter_folha_exportacao
+
+    use_effective = not is_member(request.user, GRUPOS_GESTAO_FOLHA_PDF)
+    return obter_folha_exportacao(ano, mes, ids_envio, use_effective)
+
+
+def _ids_vendedores_request(request) -> list[int]:
+    """vendedor_id + vendedores_ids do body, sem repetidos e ignorando valores inválidos."""
+    vendedor_id = request.data.get('vendedor_id')
+    vendedores_ids = request.data.get('vendedores_ids') or []
+    ids_envio = []
+    if isinstance(vendedores_ids, list):
+        for x in vendedores_ids:
+            try:
+                ids_envio.append(int(x))
+            except (TypeError, ValueError):
+                continue
+    if vendedor_id is not None:
+        try:
+            ids_envio.append(int(vendedor_id))
+        except (TypeError, ValueError):
+            pass
+    return sorted(set(ids_envio))
+
+
+def _criar_lote_folha_pdf(request, tipo: str, ano: int, mes: int, ids_envio: list[int], fechar_mes: bool = False):
+    from crm_app.services.folha_pdf_lote import criar_lote
+
+    return criar_lote(
+        usuario=request.user,
+        tipo=tipo,
+        ano=ano,
+        mes=mes,
+        vendedores_ids=ids_envio,
+        usar_data_efetiva=not is_member(request.user, GRUPOS_GESTAO_FOLHA_PDF),
+        fechar_mes=fechar_mes,
     )
 
-    grupos_gestao = ['Diretoria', 'Admin', 'BackOffice', 'Auditoria', 'Qualidade']
-    use_effective = not is_member(request.user, grupos_gestao)
 
-    cached_all = obter_folha_cacheada(ano, mes, None, use_effective)
-    if cached_all is not None:
-        return cached_all
+def _lote_folha_pdf_sincrono(ids_envio: list[int]) -> bool:
+    return len(ids_envio) <= int(getattr(settings, 'FOLHA_PDF_LOTE_SINCRONO_MAX', 1))
 
-    ids = ids_envio or []
-    if len(ids) == 1:
-        return calcular_folha_mes_com_cache(
-            ano,
-            mes,
-            ids[0],
-            use_effective_date_for_display=use_effective,
-        )
-    return calcular_folha_mes_com_cache(
-        ano,
-        mes,
-        None,
-        use_effective_date_for_display=use_effective,
+
+def _resposta_lote_folha_pdf_iniciado(request, lote, mensagem: str):
+    from crm_app.services.folha_pdf_lote import iniciar_em_background
+
+    iniciar_em_background(lote.pk)
+    # relativo ao endpoint chamado: crm_app.urls é incluído em /api/crm/ e em /api/
+    return Response(
+        {
+            "ok": True,
+            "assincrono": True,
+            "lote_id": lote.pk,
+            "total": lote.total,
+            "mensagem": mensagem,
+            "status_url": request.build_absolute_uri(f"../lote-folha-pdf/{lote.pk}/"),
+            "download_url": request.build_absolute_uri(f"../lote-folha-pdf/{lote.pk}/download/"),
+        },
+        status=status.HTTP_202_ACCEPTED,
     )
 
 
+def _attachment(nome: str) -> str:
+    from urllib.parse import quote
+
+    return f'attachment; filename="{nome}"; filename*=UTF-8\'\'{quote(nome)}'
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def enviar_folha_extrato_whatsapp(request):
@@ -7427,12 +7401,15 @@ def enviar_folha_extrato_whatsapp(request):
     Body:
       { "ano": int, "mes": int, "vendedor_id": int? , "vendedores_ids": [int]? , "fechar_mes": bool? }.
     Destino: tel_whatsapp (WhatsApp 1 principal) do usuário.
+    Acima de FOLHA_PDF_LOTE_SINCRONO_MAX vendedores roda em background (services/folha_pdf_lote.py)
+    e responde 202 com o lote para acompanhar em lote-folha-pdf/<id>/.
     """
+    from crm_app.models import LoteFolhaPdf
+    from crm_app.services.folha_pdf_lote import executar_lote
+
     try:
         ano = request.data.get('ano')
         mes = request.data.get('mes')
-        vendedor_id = request.data.get('vendedor_id')
-        vendedores_ids = request.data.get('vendedores_ids') or []
         fechar_mes = bool(request.data.get('fechar_mes', True))
         if ano is None or mes is None:
             return Response(
@@ -7441,92 +7418,35 @@ def enviar_folha_extrato_whatsapp(request):
             )
         ano, mes = int(ano), int(mes)
 
-        ids_envio = []
-        if isinstance(vendedores_ids, list):
-            for x in vendedores_ids:
-                try:
-                    ids_envio.append(int(x))
-                except (TypeError, ValueError):
-                    continue
-        if vendedor_id is not None:
-            try:
-                ids_envio.append(int(vendedor_id))
-            except (TypeError, ValueError):
-                pass
-        ids_envio = sorted(set(ids_envio))
+        ids_envio = _ids_vendedores_request(request)
         if not ids_envio:
             return Response({"error": "Selecione ao menos um vendedor."}, status=status.HTTP_400_BAD_REQUEST)
 
-        User = get_user_model()
-        consultores = {u.id: u for u in User.objects.filter(id__in=ids_envio)}
-
-        folha = _obter_folha_exportacao(request, ano, mes, ids_envio)
-        map_folha = {int(x.get('vendedor_id')): x for x in folha.get('vendedores', []) if x.get('vendedor_id') is not None}
-        periodo = folha.get('periodo', f"{mes:02d}/{ano}")
-        svc = WhatsAppService()
-        from crm_app.comissao_folha_whatsapp_pdf import montar_html_folha_e_extrato_pdf
-
-        enviados = []
-        erros = []
-        for vid in ids_envio:
-            consultor = consultores.get(vid)
-            if not consultor:
-                erros.append(f"ID {vid}: vendedor não encontrado")
-                continue
-            telefone = getattr(consultor, 'tel_whatsapp', None) or (consultor.telefone if hasattr(consultor, 'telefone') else None)
-            if not telefone or not str(telefone).strip():
-                erros.append(f"{consultor.username}: sem WhatsApp cadastrado")
-                continue
-            vendedor_data = map_folha.get(vid)
-            if not vendedor_data:
-                erros.append(f"{consultor.username}: sem dados de folha no período")
-                continue
-
-            html_string = montar_html_folha_e_extrato_pdf(vendedor_data, periodo)
-            pdf_buffer = BytesIO()
-            pisa_status = pisa.pisaDocument(BytesIO(html_string.encode("UTF-8")), pdf_buffer, encoding="utf-8")
-            if pisa_status.err:
-                erros.append(f"{consultor.username}: erro ao gerar PDF")
-                continue
-            pdf_bytes = pdf_buffer.getvalue()
-            pdf_b64 = base64.b64encode(pdf_bytes).decode("utf-8")
-            nome_seguro = "".join(
-                c if c.isalnum() or c in ("-", "_") else "_"
-                for c in str(vendedor_data.get("vendedor_nome") or "vendedor")
-            ).strip("_") or "vendedor"
-            nome_pdf = f"Folha_Comissao_{nome_seguro}_{mes}_{ano}.pdf"
-            resp_pdf = svc.enviar_pdf_b64(
-                telefone,
-                pdf_b64,
-                nome_arquivo=nome_pdf,
-                caption=f"Folha de comissão {periodo} (resumo + extrato)",
+        lote = _criar_lote_folha_pdf(request, LoteFolhaPdf.TIPO_WHATSAPP, ano, mes, ids_envio, fechar_mes)
+        if not _lote_folha_pdf_sincrono(ids_envio):
+            return _resposta_lote_folha_pdf_iniciado(
+                request, lote, f"Envio de {len(ids_envio)} PDF(s) iniciado em segundo plano.",
             )
-            if resp_pdf is None or (isinstance(resp_pdf, dict) and resp_pdf.get('error')):
-                erros.append(f"{consultor.username}: falha no envio WhatsApp")
-                continue
-            enviados.append(vid)
 
+        resultado = executar_lote(lote.pk, processos=0)
+        enviados, erros = resultado['enviados'], resultado['erros']
         if not enviados:
             return Response(
                 {"error": "Nenhum envio foi concluído.", "erros": erros},
                 status=status.HTTP_502_BAD_GATEWAY
             )
 
-        if fechar_mes:
-            total_pago_mes = sum(float(v.get('resumo', {}).get('liquido', 0) or 0) for v in folha.get('vendedores', []))
-            try:
-                _fechar_pagamento_mes(ano, mes, total_pago=total_pago_mes)
-            except Exception as e:
-                return Response(
-                    {
-                        "ok": False,
-                        "mensagem": f"Envios concluídos para {len(enviados)} vendedor(es), mas falhou ao fechar o mês.",
-                        "enviados": enviados,
-                        "erros": erros,
-                        "erro_fechamento": str(e),
-                    },
-                    status=status.HTTP_207_MULTI_STATUS,
-                )
+        if resultado['erro_fechamento']:
+            return Response(
+                {
+                    "ok": False,
+                    "mensagem": f"Envios concluídos para {len(enviados)} vendedor(es), mas falhou ao fechar o mês.",
+                    "enviados": enviados,
+                    "erros": erros,
+                    "erro_fechamento": resultado['erro_fechamento'],
+                },
+                status=status.HTTP_207_MULTI_STATUS,
+            )
 
         return Response({
             "ok": True,
@@ -7545,17 +7465,18 @@ def exportar_folha_extrato_pdf(request):
     """
     Gera download de PDF (folha + extrato no mesmo arquivo), no mesmo layout do WhatsApp.
     Body: { "ano": int, "mes": int, "vendedor_id": int?, "vendedores_ids": [int]? }.
-    Um vendedor: retorna application/pdf. Vários: retorna application/zip com um PDF por vendedor.
+    Um vendedor: retorna application/pdf. Vários: 202 com o lote; quando concluído, o ZIP
+    (um PDF por vendedor) sai em lote-folha-pdf/<id>/download/.
     Não envia WhatsApp e não fecha o mês.
     """
-    import zipfile
-    from urllib.parse import quote
+    from django.http import StreamingHttpResponse
+
+    from crm_app.models import LoteFolhaPdf
+    from crm_app.services.folha_pdf_lote import arquivos_do_lote, executar_lote, gerar_zip, nome_zip_download
 
     try:
         ano = request.data.get('ano')
         mes = request.data.get('mes')
-        vendedor_id = request.data.get('vendedor_id')
-        vendedores_ids = request.data.get('vendedores_ids') or []
         if ano is None or mes is None:
             return Response(
                 {"error": "Envie ano e mes."},
@@ -7563,87 +7484,22 @@ def exportar_folha_extrato_pdf(request):
             )
         ano, mes = int(ano), int(mes)
 
-        ids_envio = []
-        if isinstance(vendedores_ids, list):
-            for x in vendedores_ids:
-                try:
-                    ids_envio.append(int(x))
-                except (TypeError, ValueError):
-                    continue
-        if vendedor_id is not None:
-            try:
-                ids_envio.append(int(vendedor_id))
-            except (TypeError, ValueError):
-                pass
-        ids_envio = sorted(set(ids_envio))
+        ids_envio = _ids_vendedores_request(request)
         if not ids_envio:
             return Response(
                 {"error": "Selecione ao menos um vendedor."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        User = get_user_model()
-        consultores = {u.id: u for u in User.objects.filter(id__in=ids_envio)}
-
-        from crm_app.comissao_folha_whatsapp_pdf import montar_html_folha_e_extrato_pdf
-
-        folha = _obter_folha_exportacao(request, ano, mes, ids_envio)
-        map_folha = {
-            int(x.get('vendedor_id')): x
-            for x in folha.get('vendedores', [])
-            if x.get('vendedor_id') is not None
-        }
-        periodo = folha.get('periodo', f"{mes:02d}/{ano}")
-
-        def _nome_arquivo_seguro(nome_base: str) -> str:
-            s = "".join(
-                c if c.isalnum() or c in ("-", "_") else "_"
-                for c in str(nome_base or "vendedor")
-            ).strip("_") or "vendedor"
-            return s
-
-        _NOMES_MES_PDF_FECHAMENTO = (
-            "JANEIRO",
-            "FEVEREIRO",
-            "MARÇO",
-            "ABRIL",
-            "MAIO",
-            "JUNHO",
-            "JULHO",
-            "AGOSTO",
-            "SETEMBRO",
-            "OUTUBRO",
-            "NOVEMBRO",
-            "DEZEMBRO",
-        )
-        mes_label = _NOMES_MES_PDF_FECHAMENTO[mes - 1] if 1 <= mes <= 12 else f"MES_{mes}"
-
-        pdfs_ok = []
-        erros = []
-        for vid in ids_envio:
-            consultor = consultores.get(vid)
-            if not consultor:
-                erros.append(f"ID {vid}: vendedor não encontrado")
-                continue
-            vendedor_data = map_folha.get(vid)
-            if not vendedor_data:
-                erros.append(f"{consultor.username}: sem dados de folha no período")
-                continue
-            html_string = montar_html_folha_e_extrato_pdf(vendedor_data, periodo)
-            pdf_buffer = BytesIO()
-            pisa_status = pisa.pisaDocument(
-                BytesIO(html_string.encode("UTF-8")), pdf_buffer, encoding="utf-8"
-            )
-            if pisa_status.err:
-                erros.append(f"{consultor.username}: erro ao gerar PDF")
-                continue
-            username_v = _nome_arquivo_seguro(
-                getattr(consultor, "username", None) or vendedor_data.get("vendedor_nome")
+        lote = _criar_lote_folha_pdf(request, LoteFolhaPdf.TIPO_DOWNLOAD, ano, mes, ids_envio)
+        if not _lote_folha_pdf_sincrono(ids_envio):
+            return _resposta_lote_folha_pdf_iniciado(
+                request, lote, f"Geração de {len(ids_envio)} PDF(s) iniciada em segundo plano.",
             )
-            nome_pdf = f"FECHAMENTO VENDAS - {mes_label} {username_v}.pdf"
-            pdfs_ok.append((nome_pdf, pdf_buffer.getvalue()))
 
-        if not pdfs_ok:
+        resultado = executar_lote(lote.pk, processos=0)
+        erros = resultado['erros']
+        if not resultado['gerados']:
             return Response(
                 {
                     "error": "Nenhum PDF foi gerado.",
@@ -7652,24 +7508,15 @@ def exportar_folha_extrato_pdf(request):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if len(pdfs_ok) == 1:
-            nome, conteudo = pdfs_ok[0]
-            resp = HttpResponse(conteudo, content_type="application/pdf")
-            resp["Content-Disposition"] = (
-                f'attachment; filename="{nome}"; filename*=UTF-8\'\'{quote(nome)}'
-            )
+        if len(resultado['gerados']) == 1:
+            nome, conteudo = next(arquivos_do_lote(lote))
+            resp = HttpResponse(bytes(conteudo), content_type="application/pdf")
+            resp["Content-Disposition"] = _attachment(nome)
             return resp
 
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-            for nome, conteudo in pdfs_ok:
-                zf.writestr(nome, conteudo)
-        zip_bytes = zip_buffer.getvalue()
-        zip_nome = f"FECHAMENTO VENDAS - {mes_label} MULTIPLOS.zip"
-        resp = HttpResponse(zip_bytes, content_type="application/zip")
-        resp["Content-Disposition"] = (
-            f'attachment; filename="{zip_nome}"; filename*=UTF-8\'\'{quote(zip_nome)}'
-        )
+        zip_nome = nome_zip_download(mes)
+        resp = StreamingHttpResponse(gerar_zip(arquivos_do_lote(lote)), content_type="application/zip")
+        resp["Content-Disposition"] = _attachment(zip_nome)
         if erros:
             resp["X-Export-Warnings"] = "; ".join(erros[:5])
         return resp
@@ -7678,8 +7525,59 @@ def exportar_folha_extrato_pdf(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
+def _lote_folha_pdf_do_usuario(request, lote_id: int):
+    """Lote visível para quem o criou e para a gestão; None caso contrário."""
+    from crm_app.models import LoteFolhaPdf
+
+    lote = LoteFolhaPdf.objects.filter(pk=lote_id).first()
+    if lote is None:
+        return None
+    if lote.usuario_id != request.user.pk and not is_member(request.user, GRUPOS_GESTAO_FOLHA_PDF):
+        return None
+    return lote
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def status_lote_folha_pdf(request, lote_id):
+    """Progresso do lote de PDFs folha + extrato (polling da tela de comissionamento)."""
+    from crm_app.services.folha_pdf_lote import serializar_lote
+
+    lote = _lote_folha_pdf_do_usuario(request, lote_id)
+    if lote is None:
+        return Response({"error": "Lote não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(serializar_lote(lote))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def download_lote_folha_pdf(request, lote_id):
+    """ZIP (em streaming) com os PDFs gerados no lote."""
+    from django.http import StreamingHttpResponse
+
+    from crm_app.models import LoteFolhaPdf, LoteFolhaPdfItem
+    from crm_app.services.folha_pdf_lote import arquivos_do_lote, gerar_zip, nome_zip_download
+
+    lote = _lote_folha_pdf_do_usuario(request, lote_id)
+    if lote is None:
+        return Response({"error": "Lote não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+    if lote.status in (LoteFolhaPdf.STATUS_PENDENTE, LoteFolhaPdf.STATUS_PROCESSANDO):
+        return Response({"error": "Lote ainda em processamento."}, status=status.HTTP_409_CONFLICT)
+    if not lote.itens.filter(pdf__isnull=False).exclude(status=LoteFolhaPdfItem.STATUS_ERRO).exists():
+        return Response(
+            {"error": "Nenhum PDF foi gerado.", "detalhes": lote.erros or []},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    zip_nome = nome_zip_download(lote.mes)
+    resp = StreamingHttpResponse(gerar_zip(arquivos_do_lote(lote)), content_type="application/zip")
+    resp["Content-Disposition"] = _attachment(zip_nome)
+    if lote.erros:
+        resp["X-Export-Warnings"] = "; ".join(lote.erros[:5])
+    return resp
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
 def exportar_comissionamento_resumo_excel(request):
     """
     Exporta resumo de comissionamento em XLSX para o mês/ano informado.
@@ -10323,13 +10221,16 @@ class ImportacaoLegadoView(APIView):
             log.save()
             return Response({'error': f'Erro ao ler arquivo: {str(e)}'}, status=400)
 
-        # 3. Iniciar thread de processamento
-        thread = threading.Thread(
-            target=self._processar_legado_interno,
-            args=(log.id, file_content, file_name)
-        )
-        thread.daemon = True
-        thread.start()
+        # 3. Persistir upload e enfileirar job em chunks com checkpoint (retomável após restart)
+        from crm_app.services.importacao_legado_service import iniciar_importacao_legado
+        try:
+            iniciar_importacao_legado(log, file_content, file_name)
+        except Exception as e:
+            log.status = 'ERRO'
+            log.mensagem_erro = f'Erro ao salvar arquivo: {str(e)}'
+            log.finalizado_em = timezone.now()
+            log.save()
+            return Response({'error': f'Erro ao salvar arquivo: {str(e)}'}, status=500)
 
         # 4. Retornar imediatamente
         # Mantém padrão dos outros imports: retorna sucesso imediato + log_id
@@ -10341,292 +10242,6 @@ class ImportacaoLegadoView(APIView):
             'log_id': log.id
         }, status=200)
 
-    def _processar_legado_interno(self, log_id, file_content, file_name):
-        """Processa importação em background"""
-        try:
-            log = LogImportacaoLegado.objects.get(id=log_id)
-            
-            # Ler Excel em memória com dtype=str para preservar zeros
-            try:
-                df = pd.read_excel(BytesIO(file_content), dtype=str)
-            except Exception as e:
-                log.status = 'ERRO'
-                log.mensagem_erro = f'Erro ao ler Excel: {str(e)}'
-                log.finalizado_em = timezone.now()
-                log.save()
-                return
-
-            # Normaliza colunas
-            df.columns = [str(c).strip().upper() for c in df.columns]
-            df = df.replace({np.nan: None, 'nan': None, 'NaN': None, 'None': None})
-            
-            log.total_linhas = len(df)
-            log.save()
-            
-            # --- CACHES PARA PERFORMANCE ---
-            users_map = {u.username.upper(): u for u in get_user_model().objects.all()}
-            for u in get_user_model().objects.all():
-                if u.email: users_map[u.email.upper()] = u
-
-            planos_map = {p.nome.upper(): p for p in Plano.objects.all()}
-            pgto_map = {fp.nome.upper(): fp for fp in FormaPagamento.objects.all()}
-            
-            status_esteira_map = {s.nome.upper(): s for s in StatusCRM.objects.filter(tipo='Esteira')}
-            status_tratamento_map = {s.nome.upper(): s for s in StatusCRM.objects.filter(tipo='Tratamento')}
-            
-            motivo_map = {}
-            for m in MotivoPendencia.objects.all():
-                motivo_map[m.nome.upper().strip()] = m
-                parts = m.nome.split('-')
-                if len(parts) > 1: motivo_map[parts[0].strip()] = m
-
-            cache_viacep = {}
-            vendas_para_criar = []
-            logs_erro = []
-            vendas_criadas = 0
-            clientes_criados = 0
-
-            # --- FUNÇÕES AUXILIARES ---
-            def parse_dt(val):
-                if not val: return None
-                try: return pd.to_datetime(val, dayfirst=True, errors='coerce').date()
-                except: return None
-
-            def parse_periodo(val):
-                if not val: return None
-                v = str(val).upper()
-                if 'MANH' in v: return 'MANHA'
-                if 'TARDE' in v: return 'TARDE'
-                if 'NOITE' in v: return 'NOITE'
-                return None
-
-            def parse_dt_time(val):
-                """Retorna datetime timezone-aware ou None. Aceita 'DD/MM/YYYY' ou 'DD/MM/YYYY HH:MM'."""
-                if not val: return None
-                try:
-                    dt = pd.to_datetime(val, dayfirst=True, errors='coerce')
-                    if pd.isna(dt): return None
-                    if hasattr(dt, 'to_pydatetime'):
-                        dt = dt.to_pydatetime()
-                    if timezone.is_naive(dt):
-                        dt = timezone.make_aware(dt)
-                    return dt
-                except Exception:
-                    return None
-
-            def consultar_cep_otimizado(cep_input):
-                if not cep_input: return {}
-                cep_limpo = str(cep_input).replace('-', '').replace('.', '').strip()
-                if len(cep_limpo) != 8: return {}
-                
-                if cep_limpo in cache_viacep: return cache_viacep[cep_limpo]
-                
-                try:
-                    resp = requests.get(f"https://viacep.com.br/ws/{cep_limpo}/json/", timeout=2)
-                    if resp.status_code == 200:
-                        dados = resp.json()
-                        if 'erro' not in dados:
-                            res = {
-                                'logradouro': dados.get('logradouro', '').upper(),
-                                'bairro': dados.get('bairro', '').upper(),
-                                'cidade': dados.get('localidade', '').upper(),
-                                'uf': dados.get('uf', '').upper()
-                            }
-                            cache_viacep[cep_limpo] = res
-                            return res
-                except: pass
-                
-                cache_viacep[cep_limpo] = {}
-                return {}
-
-            # --- LOOP DE PROCESSAMENTO ---
-            for index, row in df.iterrows():
-                linha = index + 2
-                try:
-                    # 1. CLIENTE & CPF
-                    cpf_raw = str(row.get('CPF_CNPJ_CLIENTE', ''))
-                    cpf_limpo = ''.join(filter(str.isdigit, cpf_raw))
-                    
-                    if cpf_limpo and len(cpf_limpo) < 11:
-                        cpf_limpo = cpf_limpo.zfill(11)
-                    
-                    if not cpf_limpo or len(cpf_limpo) < 11:
-                        logs_erro.append(f"Linha {linha}: CPF inválido ou vazio ({cpf_raw}).")
-                        continue
-
-                    nome_cli = str(row.get('NOME_CLIENTE', 'Cliente Importado')).upper()
-                    
-                    cliente, criou_cliente = Cliente.objects.get_or_create(
-                        cpf_cnpj=cpf_limpo, defaults={'nome_razao_social': nome_cli}
-                    )
-                    if criou_cliente:
-                        clientes_criados += 1
-                    
-                    mudou_cliente = False
-                    if row.get('TELEFONE_1'): 
-                        cliente.telefone1 = str(row.get('TELEFONE_1'))
-                        mudou_cliente = True
-                    if row.get('TELEFONE_2'): 
-                        cliente.telefone2 = str(row.get('TELEFONE_2'))
-                        mudou_cliente = True
-                    if row.get('EMAIL_CLIENTE'): 
-                        cliente.email = str(row.get('EMAIL_CLIENTE'))
-                        mudou_cliente = True
-                    if row.get('DATA_NASCIMENTO'): 
-                        cliente.data_nascimento = parse_dt(row.get('DATA_NASCIMENTO'))
-                        mudou_cliente = True
-                    if row.get('NOME_MAE'): 
-                        cliente.nome_mae = str(row.get('NOME_MAE')).upper()
-                        mudou_cliente = True
-                    
-                    if mudou_cliente:
-                        cliente.save()
-
-                    # 2. VENDEDOR
-                    login_vend = str(row.get('LOGIN_VENDEDOR', '')).upper().strip()
-                    vendedor = users_map.get(login_vend)
-
-                    # 3. PLANO & PAGAMENTO
-                    nome_plano = str(row.get('NOME_PLANO', '')).upper().strip()
-                    plano = planos_map.get(nome_plano)
-                    
-                    nome_pgto = str(row.get('FORMA_PAGAMENTO', '')).upper().strip()
-                    pgto = pgto_map.get(nome_pgto)
-
-                    # 4. STATUS
-                    nome_est = str(row.get('STATUS_ESTEIRA', '')).upper().strip()
-                    status_esteira = status_esteira_map.get(nome_est)
-                    
-                    if not status_esteira and nome_est:
-                        if 'INSTAL' in nome_est or 'CONCLU' in nome_est: 
-                            status_esteira = status_esteira_map.get('INSTALADA')
-                        elif 'PENDEN' in nome_est: 
-                            status_esteira = status_esteira_map.get('PENDENCIADA')
-                        elif 'AGEND' in nome_est: 
-                            status_esteira = status_esteira_map.get('AGENDADO')
-                        elif 'CANCEL' in nome_est: 
-                            status_esteira = status_esteira_map.get('CANCELADA')
-
-                    motivo_pend = None
-                    if row.get('MOTIVO_PENDENCIA'):
-                        motivo_pend = motivo_map.get(str(row.get('MOTIVO_PENDENCIA')).upper().strip())
-
-                    status_tratamento = status_tratamento_map.get(str(row.get('STATUS_TRATAMENTO', '')).upper().strip())
-                    if not status_tratamento:
-                        if status_esteira and status_esteira.nome.upper() in ['INSTALADA', 'CANCELADA']:
-                            status_tratamento = status_tratamento_map.get('FECHADO')
-                        else:
-                            status_tratamento = status_tratamento_map.get('SEM TRATAMENTO')
-
-                    # 5. DATAS
-                    dt_venda = parse_dt(row.get('DATA_VENDA'))
-                    if not dt_venda: dt_venda = timezone.now().date()
-
-                    dt_abertura = parse_dt_time(row.get('DATA_ABERTURA'))
-                    dt_inst = parse_dt(row.get('DATA_INSTALACAO'))
-                    dt_agend = parse_dt(row.get('DATA_AGENDAMENTO'))
-
-                    if status_esteira and status_esteira.nome.upper() == 'INSTALADA' and not dt_inst:
-                        dt_inst = dt_venda
-
-                    # 6. ENDEREÇO
-                    cep_raw = str(row.get('CEP', '')).replace('-', '').replace('.', '').strip()
-                    cep_final = cep_raw[:9]
-                    
-                    logradouro = str(row.get('LOGRADOURO', '')).upper()
-                    bairro = str(row.get('BAIRRO', '')).upper()
-                    cidade = str(row.get('CIDADE', '')).upper()
-                    uf = str(row.get('UF', '')).upper()
-                    
-                    if cep_final and (not logradouro or not bairro):
-                        dados_api = consultar_cep_otimizado(cep_final)
-                        if dados_api:
-                            logradouro = dados_api.get('logradouro', '')
-                            bairro = dados_api.get('bairro', '')
-                            cidade = dados_api.get('cidade', '')
-                            uf = dados_api.get('uf', '')
-
-                    # 7. O.S. (Preservando Zero à Esquerda)
-                    os_raw = str(row.get('OS', '')).strip()
-                    if os_raw.endswith('.0'): os_raw = os_raw[:-2]
-
-                    # --- INSTANCIAÇÃO ---
-                    venda = Venda(
-                        cliente=cliente,
-                        vendedor=vendedor,
-                        plano=plano,
-                        forma_pagamento=pgto,
-                        
-                        status_esteira=status_esteira,
-                        status_tratamento=status_tratamento,
-                        motivo_pendencia=motivo_pend,
-                        
-                        data_pedido=dt_venda,
-                        data_abertura=dt_abertura,
-                        data_instalacao=dt_inst,
-                        data_agendamento=dt_agend,
-                        periodo_agendamento=parse_periodo(row.get('PERIODO_AGENDAMENTO')),
-                        
-                        data_criacao=dt_venda, 
-                        
-                        cep=cep_final,
-                        logradouro=logradouro[:255],
-                        numero_residencia=str(row.get('NUMERO', ''))[:20],
-                        complemento=str(row.get('COMPLEMENTO', '')).upper()[:100],
-                        bairro=bairro[:100],
-                        cidade=cidade[:100],
-                        estado=uf[:2],
-                        ponto_referencia=str(row.get('PONTO_REFERENCIA', '')).upper()[:255],
-
-                        ordem_servico=os_raw,
-                        observacoes=str(row.get('OBSERVACOES', 'Importação Legado'))[:500],
-                        ativo=True
-                    )
-                    
-                    vendas_para_criar.append(venda)
-                    vendas_criadas += 1
-
-                except Exception as e:
-                    logs_erro.append(f"Linha {linha}: {str(e)}")
-
-            # --- GRAVAÇÃO EM LOTE ---
-            if vendas_para_criar:
-                with transaction.atomic():
-                    Venda.objects.bulk_create(vendas_para_criar, batch_size=1000)
-
-            # Atualizar log
-            log.total_processadas = vendas_criadas
-            log.vendas_criadas = vendas_criadas
-            log.clientes_criados = clientes_criados
-            log.erros_count = len(logs_erro)
-            log.finalizado_em = timezone.now()
-            
-            if logs_erro:
-                log.status = 'PARCIAL' if vendas_criadas > 0 else 'ERRO'
-                log.mensagem_erro = '\n'.join(logs_erro[:50])
-                log.mensagem = f'{vendas_criadas} vendas importadas, {len(logs_erro)} erros'
-            else:
-                log.status = 'SUCESSO'
-                log.mensagem = f'{vendas_criadas} vendas importadas com sucesso!'
-            
-            log.detalhes_json = {
-                'clientes_criados': clientes_criados,
-                'vendas_criadas': vendas_criadas,
-                'erros': logs_erro[:100]
-            }
-            log.calcular_duracao()
-            log.save()
-
-        except Exception as e:
-            try:
-                log = LogImportacaoLegado.objects.get(id=log_id)
-                log.status = 'ERRO'
-                log.mensagem_erro = str(e)
-                log.finalizado_em = timezone.now()
-                log.calcular_duracao()
-                log.save()
-            except:
-                pass
 # Adicione ou certifique-se que esta classe existe
 class ConfigurarAutomacaoView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -11934,10 +11549,10 @@ class ImportacaoAgendamentoView(APIView):
             status='PROCESSANDO'
         )
 
-        # 2. Ler arquivo para memória
+        # 2. Persistir upload e despachar job (importacao_jobs: normalização por coluna + gravação em lote)
+        from crm_app.services.importacao_jobs import despachar_importacao
         try:
-            file_content = file_obj.read()
-            file_name = file_obj.name
+            despachar_importacao('agendamento', log, file_obj, file_obj.name)
         except Exception as e:
             log.status = 'ERRO'
             log.mensagem_erro = f'Erro ao ler arquivo: {str(e)}'
@@ -11945,15 +11560,7 @@ class ImportacaoAgendamentoView(APIView):
             log.save()
             return Response({'error': f'Erro ao ler arquivo: {str(e)}'}, status=400)
 
-        # 3. Iniciar thread de processamento
-        thread = threading.Thread(
-            target=self._processar_agendamento_interno,
-            args=(log.id, file_content, file_name)
-        )
-        thread.daemon = True
-        thread.start()
-
-        # 4. Retornar imediatamente
+        # 3. Retornar imediatamente
         return Response({
             'success': True,
             'status': 'PROCESSANDO',
@@ -11962,266 +11569,6 @@ class ImportacaoAgendamentoView(APIView):
             'message': 'Processamento iniciado! Acompanhe o progresso na aba Histórico.'
         }, status=200)
 
-    def _processar_agendamento_interno(self, log_id, file_content, file_name):
-        """Processa importação em background"""
-        try:
-            log = LogImportacaoAgendamento.objects.get(id=log_id)
-            
-            # Verificar se foi cancelado antes de começar
-            log.refresh_from_db()
-            if log.status == 'CANCELADO':
-                return
-            
-            # Ler Excel/XLSB em memória (preservando zeros à esquerda em nr_ordem_venda)
-            try:
-                file_buffer = BytesIO(file_content)
-                if file_name.endswith('.xlsb'):
-                    # Para .xlsb, tentar usar dtype/converters para forçar nr_ordem_venda como string
-                    file_buffer.seek(0)
-                    df_sample = pd.read_excel(file_buffer, engine='pyxlsb', nrows=1)
-                    file_buffer.seek(0)
-                    # Encontrar coluna que parece ser NR_ORDEM_VENDA (case-insensitive, antes da normalização)
-                    nr_ordem_venda_col = None
-                    for col in df_sample.columns:
-                        col_normalizado = str(col).strip().upper().replace(' ', '_')
-                        if col_normalizado == 'NR_ORDEM_VENDA':
-                            nr_ordem_venda_col = col
-                            break
-                    # Tentar usar dtype primeiro (se suportado), senão converters
-                    if nr_ordem_venda_col:
-                        try:
-                            df = pd.read_excel(file_buffer, engine='pyxlsb', dtype={nr_ordem_venda_col: str})
-                        except (TypeError, ValueError):
-                            try:
-                                df = pd.read_excel(file_buffer, engine='pyxlsb', converters={nr_ordem_venda_col: lambda x: str(x) if pd.notna(x) else ''})
-                            except:
-                                df = pd.read_excel(file_buffer, engine='pyxlsb')
-                    else:
-                        df = pd.read_excel(file_buffer, engine='pyxlsb')
-                elif file_name.endswith('.xlsx'):
-                    # Para .xlsx, usar openpyxl para forçar nr_ordem_venda como texto
-                    try:
-                        from openpyxl import load_workbook
-                        file_buffer.seek(0)
-                        wb = load_workbook(file_buffer, data_only=False, read_only=True)
-                        ws = wb.active
-                        
-                        # Ler cabeçalhos
-                        headers = [cell.value for cell in ws[1]]
-                        # Encontrar índice da coluna NR_ORDEM_VENDA
-                        nr_ordem_venda_idx = None
-                        for idx, header in enumerate(headers):
-                            if header and str(header).strip().upper().replace(' ', '_') == 'NR_ORDEM_VENDA':
-                                nr_ordem_venda_idx = idx
-                                break
-                        
-                        # Ler dados: para NR_ORDEM_VENDA, forçar como string (preserva zeros)
-                        data = []
-                        for row in ws.iter_rows(min_row=2, values_only=False):
-                            row_data = []
-                            for idx, cell in enumerate(row):
-                                if idx == nr_ordem_venda_idx and cell.value is not None:
-                                    # Para NR_ORDEM_VENDA: sempre converter para string (preserva zeros à esquerda)
-                                    # Se célula tem formato texto (@) ou se é string, usar direto
-                                    if cell.data_type == 's':
-                                        row_data.append(str(cell.value))
-                                    else:
-                                        # Se for número, converter para string formatando sem perder zeros
-                                        val = cell.value
-                                        # Formatar como string inteiro (sem decimais)
-                                        if isinstance(val, (int, float)):
-                                            # Para números, converter para int primeiro para evitar .0
-                                            if isinstance(val, float) and val.is_integer():
-                                                val = int(val)
-                                            row_data.append(str(val))
-                                        else:
-                                            row_data.append(str(val) if val is not None else '')
-                                else:
-                                    row_data.append(cell.value)
-                            data.append(row_data)
-                        
-                        wb.close()
-                        df = pd.DataFrame(data, columns=headers)
-                    except Exception as e_openpyxl:
-                        # Se openpyxl falhar, ler normalmente
-                        file_buffer.seek(0)
-                        df = pd.read_excel(file_buffer)
-                elif file_name.endswith('.xls'):
-                    df = pd.read_excel(file_buffer)
-                else:
-                    log.status = 'ERRO'
-                    log.mensagem_erro = 'Formato inválido. Envie .xlsx, .xls ou .xlsb'
-                    log.finalizado_em = timezone.now()
-                    log.save()
-                    return
-            except Exception as e:
-                log.status = 'ERRO'
-                log.mensagem_erro = f'Erro ao ler arquivo: {str(e)}'
-                log.finalizado_em = timezone.now()
-                log.save()
-                return
-
-            # Normaliza nomes das colunas
-            df.columns = [str(col).strip().lower() for col in df.columns]
-
-            log.total_linhas = len(df)
-            log.save()
-
-            # Converte datas
-            campos_data = ['dt_abertura_ba', 'dt_execucao_particao', 'dt_agendamento']
-            campos_datetime = ['dt_inicio_agendamento', 'dt_fim_agendamento', 'dt_inicio_execucao_real', 'dt_fim_execucao_real']
-
-            for campo in campos_data:
-                if campo in df.columns:
-                    df[campo] = pd.to_datetime(df[campo], errors='coerce')
-
-            for campo in campos_datetime:
-                if campo in df.columns:
-                    df[campo] = pd.to_datetime(df[campo], errors='coerce')
-
-            # Processa linhas
-            registros_criados = 0
-            registros_atualizados = 0
-            nao_encontrados = 0
-            erros = []
-
-            for idx, row in df.iterrows():
-                # Verificar se foi cancelado (a cada 100 linhas para não sobrecarregar)
-                if idx % 100 == 0:
-                    log.refresh_from_db()
-                    if log.status == 'CANCELADO':
-                        # Marcar como cancelado e sair
-                        log.finalizado_em = timezone.now()
-                        log.calcular_duracao()
-                        log.mensagem_erro = 'Processo cancelado pelo usuário durante o processamento.'
-                        log.mensagem = f'Importação cancelada. {registros_criados} registros foram processados antes do cancelamento.'
-                        log.save()
-                        return
-                try:
-                    # Construir dicionário de dados, mas evitando campos que contenham 'id' no nome
-                    dados = {}
-                    campos_permitidos = [
-                        'sg_uf', 'nm_municipio', 'indicador', 'cd_nrba', 'st_ba', 'cd_encerramento',
-                        'desc_observacao', 'desc_macro_atividade', 'ds_atividade', 'nr_ordem', 
-                        'nr_ordem_venda', 'anomes', 'cd_sap_original', 'cd_rede', 'nm_pdv_rel',
-                        'rede', 'gp_canal', 'sg_gerencia', 'nm_gc'
-                    ]
-                    for campo in campos_permitidos:
-                        if campo in df.columns:
-                            valor = row.get(campo)
-                            dados[campo] = str(valor) if pd.notna(valor) else None
-
-                    # Campos de data - conversão melhorada para evitar datas inválidas
-                    for campo in campos_data:
-                        if campo in df.columns:
-                            valor = row[campo]
-                            # Verifica se é um Timestamp válido (não NaT)
-                            if isinstance(valor, pd.Timestamp) and pd.notna(valor):
-                                dados[campo] = valor.date()
-                            else:
-                                dados[campo] = None
-
-                    # Campos de datetime - conversão melhorada para evitar datas inválidas (1970-01-01)
-                    for campo in campos_datetime:
-                        if campo in df.columns:
-                            valor = row[campo]
-                            # Verifica se é um Timestamp válido (não NaT) antes de converter
-                            if isinstance(valor, pd.Timestamp) and pd.notna(valor):
-                                dt_obj = valor.to_pydatetime()
-                                # Validação adicional: não permitir datas muito antigas (antes de 1900)
-                                if dt_obj.year >= 1900:
-                                    dados[campo] = dt_obj
-                                else:
-                                    dados[campo] = None
-                            else:
-                                dados[campo] = None
-
-                    # Garantir que campos de ID/chave primária não sejam passados (proteção contra coluna 'id' na planilha)
-                    # Remove qualquer campo relacionado a ID que possa existir na planilha (case-insensitive)
-                    campos_para_remover = ['id', 'pk', 'ID', 'PK', 'Id', 'Pk', 'iD', 'pK']
-                    for campo in campos_para_remover:
-                        if campo in dados:
-                            del dados[campo]
-                    
-                    # Remover também campos que são auto-gerados pelo Django
-                    campos_auto = {'id', 'criado_em', 'atualizado_em'}
-                    for campo_auto in campos_auto:
-                        if campo_auto in dados:
-                            del dados[campo_auto]
-                    
-                    # Normalizar nr_ordem_venda (remover espaços e garantir que não seja vazio)
-                    nr_ordem_venda_val = dados.get('nr_ordem_venda')
-                    if nr_ordem_venda_val:
-                        nr_ordem_venda_val = str(nr_ordem_venda_val).strip()
-                        if not nr_ordem_venda_val:
-                            nr_ordem_venda_val = None
-                        else:
-                            # Atualizar o valor normalizado no dicionário para garantir consistência
-                            dados['nr_ordem_venda'] = nr_ordem_venda_val
-                    
-                    # Lógica: Se nr_ordem_venda existir, SEMPRE atualizar (sem depender de comparação de datas)
-                    if nr_ordem_venda_val:
-                        try:
-                            # Buscar registro existente por nr_ordem_venda
-                            registro_existente = ImportacaoAgendamento.objects.filter(nr_ordem_venda=nr_ordem_venda_val).first()
-                            
-                            if registro_existente:
-                                # Sempre atualizar quando o registro existe
-                                for key, value in dados.items():
-                                    setattr(registro_existente, key, value)
-                                registro_existente.save()
-                                registros_atualizados += 1
-                            else:
-                                # Não existe, cria novo registro
-                                ImportacaoAgendamento.objects.create(**dados)
-                                registros_criados += 1
-                        except Exception as e_inner:
-                            # Se houver erro na busca/atualização, tenta criar normalmente
-                            try:
-                                ImportacaoAgendamento.objects.create(**dados)
-                                registros_criados += 1
-                            except:
-                                raise e_inner
-                    else:
-                        # Se não tem nr_ordem_venda, cria normalmente
-                        ImportacaoAgendamento.objects.create(**dados)
-                        registros_criados += 1
-
-                except Exception as e:
-                    erros.append(f"Linha {idx + 2}: {str(e)}")
-
-            # Atualizar log
-            log.total_processadas = registros_criados
-            log.agendamentos_criados = registros_criados
-            log.agendamentos_atualizados = registros_atualizados
-            log.nao_encontrados = nao_encontrados
-            log.erros_count = len(erros)
-            log.finalizado_em = timezone.now()
-            
-            if erros:
-                log.status = 'PARCIAL' if registros_criados > 0 else 'ERRO'
-                log.mensagem_erro = '\n'.join(erros[:50])
-                log.mensagem = f'{registros_criados} registros importados, {len(erros)} erros'
-            else:
-                log.status = 'SUCESSO'
-                log.mensagem = f'{registros_criados} agendamentos importados com sucesso!'
-            
-            log.detalhes_json = {
-                'registros_criados': registros_criados,
-                'erros': erros[:100]
-            }
-            log.save()
-
-        except Exception as e:
-            try:
-                log = LogImportacaoAgendamento.objects.get(id=log_id)
-                log.status = 'ERRO'
-                log.mensagem_erro = str(e)
-                log.finalizado_em = timezone.now()
-                log.save()
-            except:
-                pass
-
 
 class ImportacaoRecompraView(APIView):
     permission_classes = [CheckAPIPermission]
@@ -12243,15 +11590,9 @@ class ImportacaoRecompraView(APIView):
             tamanho_arquivo=file_obj.size
         )
 
-        # Processar em thread background
-        file_content = file_obj.read()
-        file_name = file_obj.name
-        
-        def processar_recompra_async():
-            self._processar_recompra_interno(log.id, file_content, file_name)
-        
-        thread = threading.Thread(target=processar_recompra_async, daemon=True)
-        thread.start()
+        # Persistir upload e despachar job (normalização por coluna + bulk_create)
+        from crm_app.services.importacao_jobs import despachar_importacao
+        despachar_importacao('recompra', log, file_obj, file_obj.name)
 
         return Response({
             'success': True,
@@ -12261,123 +11602,6 @@ class ImportacaoRecompraView(APIView):
             'background': True
         })
 
-    def _processar_recompra_interno(self, log_id, file_content, file_name):
-        """Processa Recompra em background thread"""
-        from .models import ImportacaoRecompra, LogImportacaoRecompra
-        from django.utils import timezone
-        from io import BytesIO
-        
-        log = LogImportacaoRecompra.objects.get(id=log_id)
-        inicio = timezone.now()
-        
-        try:
-            # Ler arquivo
-            file_obj = BytesIO(file_content)
-            
-            if file_name.endswith('.xlsb'):
-                df = pd.read_excel(file_obj, engine='pyxlsb')
-            elif file_name.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_obj)
-            else:
-                raise ValueError('Formato inválido')
-
-            df.columns = [str(col).strip() for col in df.columns]
-            campos_data = ['dt_venda_particao', 'dt_encerramento', 'dt_inicio_ativo']
-
-            for campo in campos_data:
-                if campo in df.columns:
-                    df[campo] = pd.to_datetime(df[campo], errors='coerce')
-
-            coluna_map = {
-                'ds_anomes': 'ds_anomes',
-                'dt_venda_particao': 'dt_venda_particao',
-                'dt_encerramento': 'dt_encerramento',
-                'nr_ordem': 'nr_ordem',
-                'st_ordem': 'st_ordem',
-                'nm_seg': 'nm_seg',
-                'sg_uf': 'sg_uf',
-                'cd_sap_pdv': 'cd_sap_pdv',
-                'cd_tr_vdd': 'cd_tr_vdd',
-                'nr_cep': 'nr_cep',
-                'nm_municipio': 'nm_municipio',
-                'nm_bairro': 'nm_bairro',
-                'resultado': 'resultado',
-                'dt_inicio_ativo': 'dt_inicio_ativo',
-                'nr_cep_base': 'nr_cep_base',
-                'nr_complemento1_base': 'nr_complemento1_base',
-                'nr_complemento2_base': 'nr_complemento2_base',
-                'nr_complemento3_base': 'nr_complemento3_base',
-                'nm_diretoria': 'nm_diretoria',
-                'nm_regional': 'nm_regional',
-                'cd_rede': 'cd_rede',
-                'gp_canal': 'gp_canal',
-                'nm_pdv_rel': 'nm_pdv_rel',
-                'GERENCIA': 'GERENCIA',
-                'nm_gc': 'nm_gc',
-                'REDE': 'REDE',
-            }
-
-            registros_criados = 0
-            erros = []
-
-            for idx, row in df.iterrows():
-                try:
-                    dados = {}
-                    for col_arquivo, col_model in coluna_map.items():
-                        if col_arquivo in df.columns:
-                            valor = row.get(col_arquivo)
-                            if pd.isna(valor) or valor == '':
-                                dados[col_model] = None
-                            else:
-                                if col_model in campos_data:
-                                    try:
-                                        dados[col_model] = pd.to_datetime(valor).date()
-                                    except:
-                                        dados[col_model] = None
-                                else:
-                                    dados[col_model] = str(valor).strip()
-                        else:
-                            dados[col_model] = None
-
-                    ImportacaoRecompra.objects.create(**dados)
-                    registros_criados += 1
-
-                except Exception as e:
-                    erros.append(f"Linha {idx + 2}: {str(e)}")
-
-            # Atualizar log
-            log.total_linhas = len(df)
-            log.total_processadas = registros_criados
-            log.registros_criados = registros_criados
-            log.erros_count = len(erros)
-            log.finalizado_em = timezone.now()
-            
-            if erros:
-                log.status = 'PARCIAL' if registros_criados > 0 else 'ERRO'
-                log.mensagem_erro = '\n'.join(erros[:50])
-                log.mensagem = f'{registros_criados} registros importados, {len(erros)} erros'
-            else:
-                log.status = 'SUCESSO'
-                log.mensagem = f'{registros_criados} registros importados com sucesso!'
-            
-            log.calcular_duracao()
-            log.detalhes_json = {
-                'registros_criados': registros_criados,
-                'erros': erros[:100]
-            }
-            log.save()
-
-        except Exception as e:
-            try:
-                log.refresh_from_db()
-                log.status = 'ERRO'
-                log.mensagem_erro = str(e)
-                log.finalizado_em = timezone.now()
-                log.calcular_duracao()
-                log.save()
-            except:
-                pass
-
 
 # =============================================================================
 # BÔNUS M-10 & FPD - VIEWS
@@ -12385,7 +11609,6 @@ class ImportacaoRecompraView(APIView):
 
 from django.db.models import Q, Count, Sum, Avg
 from django.http import HttpResponse
-import pandas as pd
 from datetime import datetime
 from .models import SafraM10, ContratoM10, FaturaM10
 
@@ -13416,6 +12639,9 @@ class ImportarFPDView(APIView):
                     ContratoM10.objects.bulk_update(
                         contratos_uniq, ['numero_contrato_definitivo'], batch_size=500
                     )
+                    # bulk_update não dispara signal: reindexa a busca textual (nº definitivo)
+                    from crm_app.services.busca_textual import indexar_contratos
+                    indexar_contratos(vistos_cids)
 
                 # Espelha campos *_fpd do ContratoM10 a partir da 1ª fatura (FPD)
                 if contratos_afetados_ids:
@@ -13463,6 +12689,10 @@ class ImportarFPDView(APIView):
                 logger.exception('Falha ao sincronizar vencimentos FPD: %s', e_sync)
                 sync_venc = {'erro': str(e_sync)}
 
+            # bulk_create/bulk_update não disparam signals: invalida todo o agregado do Qualidade/FPD
+            from crm_app.services.qualidade_rollup import marcar_sujas
+            marcar_sujas()
+
             log.finalizado_em = timezone.now()
             log.calcular_duracao()
             log.total_processadas = registros_importacoes_fpd + registros_atualizados
@@ -13965,6 +13195,8 @@ class LimparImportacaoOSABView(APIView):
         try:
             count = ImportacaoOsab.objects.count()
             ImportacaoOsab.objects.all().delete()
+            from crm_app.services.osab_documentos import atualizar_conjunto_seguro
+            atualizar_conjunto_seguro('limpeza OSAB')
             return Response({
                 'mensagem': f'Tabela ImportacaoOsab limpa com sucesso.',
                 'registros_removidos': count
@@ -14323,6 +13555,9 @@ class ReverterImportacaoOSABView(APIView):
         except Exception as e:
             return Response({'error': f'Erro ao reverter importação: {e}'}, status=500)
 
+        from crm_app.services.osab_documentos import atualizar_conjunto_seguro
+        atualizar_conjunto_seguro(f'reversao OSAB #{log_id}')
+
         return Response({
             'success': True,
             'message': f'Importação revertida: {len(vendas_restaurar)} venda(s) restaurada(s).',
@@ -14400,6 +13635,7 @@ class LogsImportacaoRecompraView(APIView):
                     'total_processadas': log.total_processadas,
                     'registros_criados': log.registros_criados,
                     'erros_count': log.erros_count,
+                    'etapas_ms': (log.detalhes_json or {}).get('etapas_ms'),
                     'mensagem': log.mensagem,
                     'mensagem_erro': log.mensagem_erro,
                     'usuario_nome': log.usuario.get_full_name() if log.usuario else 'Sistema',
@@ -14439,6 +13675,8 @@ class LogsImportacaoLegadoView(APIView):
         
         logs_data = []
         for log in logs:
+            # Progresso gravado a cada chunk pelo job (importacao_legado_service)
+            progresso = (log.detalhes_json or {}).get('progresso') or {}
             logs_data.append({
                 'id': log.id,
                 'nome_arquivo': log.nome_arquivo,
@@ -14449,6 +13687,10 @@ class LogsImportacaoLegadoView(APIView):
                 'duracao_segundos': log.duracao_segundos,
                 'total_linhas': log.total_linhas,
                 'total_processadas': log.total_processadas,
+                'linhas_concluidas': progresso.get('linhas_concluidas', 0),
+                'linhas_por_segundo': progresso.get('linhas_por_segundo'),
+                'eta_segundos': progresso.get('eta_segundos') if log.status == 'PROCESSANDO' else None,
+                'retomadas': progresso.get('retomadas', 0),
                 'vendas_criadas': log.vendas_criadas,
                 'vendas_atualizadas': log.vendas_atualizadas,
                 'clientes_criados': log.clientes_criados,
@@ -14544,6 +13786,7 @@ class LogsImportacaoAgendamentoView(APIView):
                 'agendamentos_atualizados': log.agendamentos_atualizados,
                 'nao_encontrados': log.nao_encontrados,
                 'erros_count': log.erros_count,
+                'etapas_ms': (log.detalhes_json or {}).get('etapas_ms'),
                 'mensagem': log.mensagem,
                 'mensagem_erro': log.mensagem_erro,
                 'usuario': log.usuario.username if log.usuario else 'Sistema',
@@ -14561,47 +13804,10 @@ class ImportarChurnView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
 
-    def _defaults_importacao_churn_row(self, row):
-        """Mapeia colunas da planilha churn (inclui aliases TP_/DS_/CD_TR_VDD_ORIGINAL)."""
-        from crm_app.churn_os_utils import valor_planilha_churn
-
-        tipo = valor_planilha_churn(row, 'TP_RETIRADA', 'TIPO_RETIRADA')
-        motivo = valor_planilha_churn(row, 'DS_MOTIVO_RETIRADA', 'MOTIVO_RETIRADA')
-        submotivo = valor_planilha_churn(row, 'SUBMOTIVO_RETIRADA')
-        cd_vdd = valor_planilha_churn(row, 'CD_TR_VDD_ORIGINAL', 'CD_TR_VDD')
-        matricula = valor_planilha_churn(row, 'MATRICULA_VENDEDOR') or cd_vdd
-        return {
-            'uf': str(row.get('UF', ''))[:2] if pd.notna(row.get('UF')) else None,
-            'produto': str(row.get('PRODUTO', '')) if pd.notna(row.get('PRODUTO')) else None,
-            'matricula_vendedor': matricula,
-            'cd_tr_vdd_original': cd_vdd or matricula,
-            'gv': str(row.get('GV', '')) if pd.notna(row.get('GV')) else None,
-            'sap_principal_fim': str(row.get('SAP_PRINCIPAL_FIM', '')) if pd.notna(row.get('SAP_PRINCIPAL_FIM')) else None,
-            'gestao': str(row.get('GESTAO', '')) if pd.notna(row.get('GESTAO')) else None,
-            'st_regional': str(row.get('ST_REGIONAL', '')) if pd.notna(row.get('ST_REGIONAL')) else None,
-            'gc': str(row.get('GC', '')) if pd.notna(row.get('GC')) else None,
-            'dt_gross': pd.to_datetime(row.get('DT_GROSS')).date() if pd.notna(row.get('DT_GROSS')) else None,
-            'anomes_gross': _normalizar_anomes_gross(row.get('ANOMES_GROSS', '')),
-            'dt_retirada': pd.to_datetime(row.get('DT_RETIRADA')).date() if pd.notna(row.get('DT_RETIRADA')) else None,
-            'anomes_retirada': str(row.get('ANOMES_RETIRADA', '')) if pd.notna(row.get('ANOMES_RETIRADA')) else None,
-            'grupo_unidade': str(row.get('GRUPO_UNIDADE', '')) if pd.notna(row.get('GRUPO_UNIDADE')) else None,
-            'codigo_sap': str(row.get('CODIGO_SAP', '')) if pd.notna(row.get('CODIGO_SAP')) else None,
-            'municipio': str(row.get('MUNICIPIO', '')) if pd.notna(row.get('MUNICIPIO')) else None,
-            'tipo_retirada': tipo,
-            'motivo_retirada': motivo,
-            'submotivo_retirada': submotivo,
-            'classificacao': str(row.get('CLASSIFICACAO', '')) if pd.notna(row.get('CLASSIFICACAO')) else None,
-            'desc_apelido': str(row.get('DESC_APELIDO', '')) if pd.notna(row.get('DESC_APELIDO')) else None,
-            'nr_velocidade': (
-                str(row.get('NR_VELOCIDADE', '') or row.get('VELOCIDADE', ''))[:50]
-                if pd.notna(row.get('NR_VELOCIDADE', row.get('VELOCIDADE')))
-                else None
-            ),
-        }
-
     def post(self, request):
-        from .models import ImportacaoChurn, ContratoM10, LogImportacaoChurn
-        
+        from .models import LogImportacaoChurn
+        from crm_app.services.churn_import_service import importar_churn, ler_planilha_churn
+
         if not is_member(request.user, ['Admin', 'BackOffice', 'Diretoria']):
             return Response({'error': 'Sem permissão'}, status=403)
 
@@ -14616,190 +13822,51 @@ class ImportarChurnView(APIView):
             usuario=request.user,
             status='PROCESSANDO'
         )
-        inicio = datetime.now()
 
         try:
-            if arquivo.name.endswith('.csv'):
-                df = pd.read_csv(arquivo, dtype={'PEDIDO': str, 'NR_ORDEM': str, 'NUMERO_PEDIDO': str})
-            elif arquivo.name.endswith('.xlsb'):
-                try:
-                    df = pd.read_excel(arquivo, engine='pyxlsb', dtype={'PEDIDO': str, 'NR_ORDEM': str, 'NUMERO_PEDIDO': str})
-                except Exception as e:
-                    log.status = 'ERRO'
-                    log.mensagem_erro = (
-                        'Formato .xlsb não suportado ou falha ao ler. '
-                        'Use arquivo .xlsx ou .csv. Se precisar usar .xlsb, instale: pip install pyxlsb'
-                    )
-                    log.finalizado_em = datetime.now()
-                    log.save()
-                    return Response({
-                        'error': log.mensagem_erro
-                    }, status=400)
-            else:
-                df = pd.read_excel(arquivo, dtype={'PEDIDO': str, 'NR_ORDEM': str, 'NUMERO_PEDIDO': str})
-
-            # Normalizar nomes das colunas (ex.: "ANOMES GROSS" -> "ANOMES_GROSS", "NR ORDEM" -> "NR_ORDEM")
-            df.columns = df.columns.str.strip().str.upper().str.replace(' ', '_', regex=False)
-            
-            log.total_linhas = len(df)
-            log.save()
-
-            cancelados = 0
-            criados_churn = 0
-            atualizados_churn = 0
-            reativados = 0
-            nao_encontrados = 0
-            erros = 0
-            
-            # Coletar todas as O.S que aparecem no CHURN
-            ordens_no_churn = set()
-
-            # GAP 4: Dicionário de ContratoM10 por várias formas da O.S. (como no FPD)
-            contratos_churn_dict = {}
-            for c in ContratoM10.objects.exclude(ordem_servico__isnull=True).exclude(ordem_servico=''):
-                os_val = str(c.ordem_servico).strip()
-                os_sem_zeros = os_val.lstrip('0') or '0'
-                for key in [os_val, os_sem_zeros, os_val.zfill(8), f'OS-{os_val}', f'OS-{os_sem_zeros}', f'OS-{os_val.zfill(8)}']:
-                    if key and key not in contratos_churn_dict:
-                        contratos_churn_dict[key] = c
-
-            for _, row in df.iterrows():
-                try:
-                    # Busca por O.S - pode vir como NR_ORDEM ou NUMERO_PEDIDO
-                    # Prioridade: NR_ORDEM se existir, senão NUMERO_PEDIDO
-                    nr_ordem_raw = row.get('NR_ORDEM', '')
-                    if pd.isna(nr_ordem_raw) or str(nr_ordem_raw).strip() == '':
-                        # Tentar NUMERO_PEDIDO como fallback
-                        numero_pedido_raw = row.get('NUMERO_PEDIDO', '')
-                        if pd.notna(numero_pedido_raw) and str(numero_pedido_raw).strip():
-                            nr_ordem_raw = numero_pedido_raw
-                        else:
-                            continue  # Pula se não tiver nenhum dos dois
-                    
-                    nr_ordem = str(nr_ordem_raw).strip().zfill(8)  # Padronizar com 8 dígitos
-                    nr_ordem_sem_zeros = nr_ordem.lstrip('0') or '0'
-                    ordens_no_churn.add(nr_ordem)
-                    ordens_no_churn.add(nr_ordem_sem_zeros)
-
-                    # Salvar registro na ImportacaoChurn
-                    try:
-                        # Usar PEDIDO como principal, com fallback para NUMERO_PEDIDO
-                        numero_pedido_raw = row.get('PEDIDO', '') or row.get('NUMERO_PEDIDO', '')
-                        numero_pedido_val = str(numero_pedido_raw).strip() if pd.notna(numero_pedido_raw) and str(numero_pedido_raw).strip() else None
-                        
-                        # Se numero_pedido for None, usar nr_ordem como chave alternativa
-                        # Mas como numero_pedido tem unique=True, não podemos usar None
-                        # Vamos usar uma chave composta ou tratar de outra forma
-                        if numero_pedido_val:
-                            defaults_churn = self._defaults_importacao_churn_row(row)
-                            defaults_churn['nr_ordem'] = nr_ordem
-                            obj, created = ImportacaoChurn.objects.update_or_create(
-                                numero_pedido=numero_pedido_val,
-                                defaults=defaults_churn,
-                            )
-                            if created:
-                                criados_churn += 1
-                            else:
-                                atualizados_churn += 1
-                        else:
-                            # Se numero_pedido for None, usar nr_ordem como alternativa
-                            # Buscar por nr_ordem se numero_pedido não estiver disponível
-                            try:
-                                obj_existente = ImportacaoChurn.objects.get(nr_ordem=nr_ordem)
-                                for campo, valor in self._defaults_importacao_churn_row(row).items():
-                                    setattr(obj_existente, campo, valor)
-                                obj_existente.save()
-                                atualizados_churn += 1
-                            except ImportacaoChurn.DoesNotExist:
-                                # Criar novo registro sem numero_pedido (permitido pelo modelo)
-                                defaults_create = self._defaults_importacao_churn_row(row)
-                                defaults_create['numero_pedido'] = None
-                                defaults_create['nr_ordem'] = nr_ordem
-                                ImportacaoChurn.objects.create(**defaults_create)
-                                criados_churn += 1
-                    except Exception as e:
-                        erros += 1
-                        print(f"Erro ao salvar ImportacaoChurn: {e}")
-
-                    # Atualizar status do contrato M10 para CANCELADO (GAP 4: match por várias formas de O.S.)
-                    try:
-                        contrato = None
-                        for key in [nr_ordem, nr_ordem_sem_zeros, str(nr_ordem_raw).strip(), f'OS-{nr_ordem}', f'OS-{nr_ordem_sem_zeros}']:
-                            if key and key in contratos_churn_dict:
-                                contrato = contratos_churn_dict[key]
-                                break
-                        if contrato is None:
-                            nao_encontrados += 1
-                            # Salvar ImportacaoChurn já foi feito acima; segue para próxima linha
-                            continue
-                        
-                        # Marca como cancelado (apareceu no CHURN)
-                        if contrato.status_contrato != 'CANCELADO':
-                            contrato.status_contrato = 'CANCELADO'
-                            contrato.data_cancelamento = pd.to_datetime(row.get('DT_RETIRADA')).date() if pd.notna(row.get('DT_RETIRADA')) else datetime.now().date()
-                            contrato.motivo_cancelamento = str(row.get('MOTIVO_RETIRADA', '')) if pd.notna(row.get('MOTIVO_RETIRADA')) else 'CHURN'
-                            contrato.elegivel_bonus = False
-                            contrato.save()
-                            cancelados += 1
-                        
-                    except Exception:
-                        nao_encontrados += 1
-                
-                except Exception as e:
-                    erros += 1
-                    continue
-
-            # GAP 6: Reativar apenas contratos que foram cancelados POR CHURN e cuja O.S. não está na planilha atual
-            contratos_reativar = ContratoM10.objects.filter(
-                status_contrato='CANCELADO',
-                motivo_cancelamento__icontains='CHURN',
-            ).exclude(ordem_servico__in=ordens_no_churn)
-            reativados = contratos_reativar.update(
-                status_contrato='ATIVO', data_cancelamento=None, motivo_cancelamento=None
-            )
-
-            # Atualizar log
-            fim = datetime.now()
-            log.finalizado_em = fim
-            log.duracao_segundos = int((fim - inicio).total_seconds())
-            log.total_processadas = criados_churn + atualizados_churn
-            log.total_erros = erros
-            log.total_contratos_cancelados = cancelados
-            log.total_contratos_reativados = reativados
-            log.total_nao_encontrados = nao_encontrados
-            log.status = 'PARCIAL' if (cancelados > 0 and nao_encontrados > 0) else 'SUCESSO'
-            log.detalhes_json = {
-                'ordens_unicas': len(ordens_no_churn),
-                'cancelados': cancelados,
-                'reativados': reativados,
-                'nao_encontrados': nao_encontrados,
-                'criados_churn': criados_churn,
-                'atualizados_churn': atualizados_churn,
-            }
-            log.save()
+            try:
+                df = ler_planilha_churn(arquivo, arquivo.name)
+            except Exception:
+                if not arquivo.name.endswith('.xlsb'):
+                    raise
+                log.status = 'ERRO'
+                log.mensagem_erro = (
+                    'Formato .xlsb não suportado ou falha ao ler. '
+                    'Use arquivo .xlsx ou .csv. Se precisar usar .xlsb, instale: pip install pyxlsb'
+                )
+                log.finalizado_em = timezone.now()
+                log.save()
+                return Response({'error': log.mensagem_erro}, status=400)
 
+            resumo = importar_churn(df, log)
+            cancelados, reativados = resumo['cancelados'], resumo['reativados']
+            criados, atualizados = resumo['criados_churn'], resumo['atualizados_churn']
             return Response({
-                'message': f'Base CHURN processada! {cancelados} contratos cancelados, {reativados} contratos reativados, {criados_churn + atualizados_churn} registros processados.',
+                'message': (
+                    f'Base CHURN processada! {cancelados} contratos cancelados, {reativados} contratos '
+                    f'reativados, {criados} churns novos, {atualizados} alterados, '
+                    f'{resumo["diff"]["removidos"]} fora do arquivo.'
+                ),
                 'total_registros': log.total_linhas,
-                'criados': criados_churn,  # Registros criados na ImportacaoChurn
-                'atualizados': atualizados_churn,  # Registros atualizados na ImportacaoChurn
+                'criados': criados,  # Registros criados na ImportacaoChurn
+                'atualizados': atualizados,  # Registros alterados na ImportacaoChurn
                 'cancelados': cancelados,
                 'reativados': reativados,
-                'salvos_churn': criados_churn + atualizados_churn,
-                'nao_encontrados': nao_encontrados,
+                'salvos_churn': criados + atualizados,
+                'nao_encontrados': resumo['nao_encontrados'],
+                'diff': resumo['diff'],
                 'log_id': log.id,
             })
 
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            
+            logger.exception('[CHURN] Falha na importação %s', log.id)
+
             # Atualizar log com erro
             log.status = 'ERRO'
             log.mensagem_erro = str(e)
-            log.finalizado_em = datetime.now()
+            log.finalizado_em = timezone.now()
             log.save()
-            
+
             return Response({'error': f'Erro ao processar arquivo: {str(e)}'}, status=500)
 
 
@@ -15862,7 +14929,7 @@ def _antecipar_instalacao_queryset_vendas(request):
         return base
     if is_member(request.user, ['Supervisor']):
         # Supervisor: suas vendas + dos liderados
-        liderados_ids = list(request.user.liderados.values_list('id', flat=True))
+        liderados_ids = ids_liderados(request.user)
         return base.filter(Q(vendedor_id=request.user.id) | Q(vendedor_id__in=liderados_ids))
     # Vendedor: só as suas
     return base.filter(vendedor_id=request.user.id)
@@ -15882,7 +14949,7 @@ def _antecipar_instalacao_queryset_vendas_reparo(request):
     if is_member(request.user, ['Diretoria', 'Admin', 'BackOffice']):
         return base
     if is_member(request.user, ['Supervisor']):
-        liderados_ids = list(request.user.liderados.values_list('id', flat=True))
+        liderados_ids = ids_liderados(request.user)
         return base.filter(Q(vendedor_id=request.user.id) | Q(vendedor_id__in=liderados_ids))
     return base.filter(vendedor_id=request.user.id)
 
@@ -15899,7 +14966,7 @@ def _antecipar_instalacao_queryset_vendas_instalacao_fisica(request):
     if is_member(request.user, ['Diretoria', 'Admin', 'BackOffice']):
         return base
     if is_member(request.user, ['Supervisor']):
-        liderados_ids = list(request.user.liderados.values_list('id', flat=True))
+        liderados_ids = ids_liderados(request.user)
         return base.filter(Q(vendedor_id=request.user.id) | Q(vendedor_id__in=liderados_ids))
     return base.filter(vendedor_id=request.user.id)
 
@@ -16318,7 +15385,7 @@ def _historico_antecipar_queryset(request):
     if is_member(request.user, ['Diretoria', 'Admin', 'BackOffice']):
         return base
     if is_member(request.user, ['Supervisor']):
-        liderados_ids = list(request.user.liderados.values_list('id', flat=True))
+        liderados_ids = ids_liderados(request.user)
         return base.filter(Q(usuario_id=request.user.id) | Q(usuario_id__in=liderados_ids))
     return base.filter(usuario_id=request.user.id)
 
@@ -0,0 +1,341 @@
+"""
+Roteamento de conversa do bot WhatsApp: estado do telefone numa consulta só.
+
+`processar_webhook_whatsapp` sondava os fluxos em sequência para cada mensagem (lista de
+agendamentos, posso reagendar, posso antecipar — cada um com sua consulta por
+referenceMessageId / sessão aberta) e depois lia a `SessaoWhatsapp` mais de uma vez.
+Agora `carregar_estado` busca, num UNION ALL pelos índices de telefone:
+- as sessões de lista de agendamento e de posso reagendar e as consultas posso antecipar
+  da janela de resposta (id, messageId e se ainda está aberta);
+- as pendências do lado do cliente (resumo da auditoria sem confirmação, lembrete de
+  instalação e boas-vindas nas janelas de resposta do handler);
+- a linha da `SessaoWhatsapp` do chat (id, etapa, updated_at).
+Os `deve_tentar_*` / `processar_*` recebem o estado e o handler pula as sondagens que o
+estado descarta; só vão ao banco quando há algo para aquele fluxo.
+
+A `SessaoWhatsapp` completa (dados_temp) fica num cache por processo com TTL curto
+(WHATSAPP_SESSAO_CACHE_TTL_SEG), gravado a cada save (write-through, sinais abaixo) e
+validado pela etapa/updated_at lidos no UNION — escrita de outro processo muda um dos
+dois (`SessaoWhatsapp.save` sempre grava updated_at) e força a releitura.
+
+`contar_queries` mede as consultas por mensagem (log no fim do handler).
+"""
+from __future__ import annotations
+
+import copy
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from crm_app.models import SessaoWhatsapp
+
+logger = logging.getLogger(__name__)
+
+FLUXO_SESSAO = 'sessao'
+FLUXO_LISTA_AGENDAMENTO = 'lista_agendamento'
+FLUXO_POSSO_REAGENDAR = 'posso_reagendar'
+FLUXO_POSSO_ANTECIPAR = 'posso_antecipar'
+FLUXO_CONFIRMACAO_AUDITORIA = 'confirmacao_auditoria'
+FLUXO_LEMBRETE_INSTALACAO = 'lembrete_instalacao'
+FLUXO_BOAS_VINDAS = 'boas_vindas'
+# Ordem de prioridade do handler (usada só para log/diagnóstico)
+FLUXOS_ESTEIRA = (FLUXO_LISTA_AGENDAMENTO, FLUXO_POSSO_REAGENDAR, FLUXO_POSSO_ANTECIPAR)
+FLUXOS_CLIENTE = (FLUXO_CONFIRMACAO_AUDITORIA, FLUXO_LEMBRETE_INSTALACAO, FLUXO_BOAS_VINDAS)
+
+# Janelas de resposta dos fluxos do cliente no handler
+HORAS_LEMBRETE_INSTALACAO = 48
+DIAS_BOAS_VINDAS = 30
+
+MAX_SESSOES_CACHE = 5000
+
+
+class LinhaFluxo(NamedTuple):
+    fluxo: str
+    id: int
+    ref: str
+    aberto: bool
+    momento: object
+
+
+class EstadoConversa:
+    """Linhas de cada fluxo para um telefone, carregadas por `carregar_estado`."""
+
+    def __init__(self, telefone: str, linhas: Iterable[LinhaFluxo], fluxos_cobertos: Iterable[str]):
+        self.telefone = telefone
+        self.fluxos_cobertos = frozenset(fluxos_cobertos)
+        self._linhas: Dict[str, List[LinhaFluxo]] = {}
+        for linha in linhas:
+            self._linhas.setdefault(linha.fluxo, []).append(linha)
+
+    def cobre(self, fluxo: str) -> bool:
+        """False quando o estado não sabe responder (ex.: telefone sem chave de busca)."""
+        return fluxo in self.fluxos_cobertos
+
+    def linhas(self, fluxo: str) -> List[LinhaFluxo]:
+        return self._linhas.get(fluxo, [])
+
+    def ref_de(self, fluxo: str, ref: str) -> bool:
+        ref = (ref or '').strip()
+        return bool(ref) and any(linha.ref == ref for linha in self.linhas(fluxo))
+
+    def tem_aberto(self, fluxo: str) -> bool:
+        return any(linha.aberto for linha in self.linhas(fluxo))
+
+    @property
+    def sessao(self) -> Optional[LinhaFluxo]:
+        linhas = self.linhas(FLUXO_SESSAO)
+        return linhas[0] if linhas else None
+
+    @property
+    def etapa_sessao(self) -> Optional[str]:
+        return self.sessao.ref if self.sessao else None
+
+    def descarta(self, fluxo: str) -> bool:
+        """True quando o estado garante que o fluxo não tem linha para o telefone (pular a sondagem)."""
+        return self.cobre(fluxo) and not self.linhas(fluxo)
+
+    @property
+    def fluxo_ativo(self) -> Optional[str]:
+        for fluxo in FLUXOS_ESTEIRA + FLUXOS_CLIENTE:
+            if self.tem_aberto(fluxo):
+                return fluxo
+        etapa = self.etapa_sessao
+        return f'{FLUXO_SESSAO}:{etapa}' if etapa and etapa != 'inicial' else None
+
+
+def roteador_habilitado() -> bool:
+    return bool(getattr(settings, 'WHATSAPP_ROTEADOR_ENABLED', True))
+
+
+def carregar_estado(telefone_chat: str, telefone_usuario: str) -> EstadoConversa:
+    """Uma consulta (UNION ALL) com a sessão do chat e as linhas de esteira/cliente do remetente."""
+    from django.db.models import BooleanField, Case, CharField, DateTimeField, Q, Value, When
+
+    from crm_app.esteira_lista_agendamento_vendedor_service import HORAS_LIMITE_SESSAO as HORAS_LISTA
+    from crm_app.esteira_posso_antecipar_service import (
+        HORAS_LIMITE_RESPOSTA as HORAS_ANTECIPAR,
+        _chaves_telefone_busca,
+    )
+    from crm_app.esteira_posso_reagendar_service import HORAS_LIMITE_SESSAO as HORAS_REAGENDAR
+    from crm_app.models import (
+        BoasVindasEnviado,
+        LembreteInstalacaoEnviado,
+        ListaAgendamentoVendedorSessao,
+        PapConfirmacaoCliente,
+        PossoAnteciparVendedorEnviado,
+        PossoReagendarConsultorSessao,
+    )
+    from crm_app.whatsapp_webhook_handler import _chave_telefone, _chaves_telefone_variantes
+
+    agora = timezone.now()
+
+    def _colunas(qs, fluxo: str, ref: str, aberto, momento: str):
+        return qs.order_by().annotate(
+            _fluxo=Value(fluxo, output_field=CharField()),
+            _aberto=aberto,
+        ).values_list('_fluxo', 'id', ref, '_aberto', momento)
+
+    def _aberto_se(condicao):
+        return Case(When(condicao, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+    partes = [
+        _colunas(
+            SessaoWhatsapp.objects.filter(telefone=telefone_chat),
+            FLUXO_SESSAO, 'etapa', Value(True, output_field=BooleanField()), 'updated_at',
+        ),
+    ]
+    cobertos = [FLUXO_SESSAO]
+    chaves = _chaves_telefone_busca(telefone_usuario) if telefone_usuario else []
+    if chaves:
+        cobertos.extend(FLUXOS_ESTEIRA)
+        partes.append(_colunas(
+            ListaAgendamentoVendedorSessao.objects.filter(
+                telefone__in=chaves,
+                finalizado_em__isnull=True,
+                criado_em__gte=agora - timedelta(hours=HORAS_LISTA),
+            ),
+            FLUXO_LISTA_AGENDAMENTO, 'whatsapp_message_id',
+            _aberto_se(~Q(etapa__in=(
+                ListaAgendamentoVendedorSessao.ETAPA_CIENTE,
+                ListaAgendamentoVendedorSessao.ETAPA_CONCLUIDO,
+            ))),
+            'criado_em',
+        ))
+        partes.append(_colunas(
+            PossoReagendarConsultorSessao.objects.filter(
+                telefone__in=chaves,
+                finalizado_em__isnull=True,
+                criado_em__gte=agora - timedelta(hours=HORAS_REAGENDAR),
+            ),
+            FLUXO_POSSO_REAGENDAR, 'whatsapp_message_id',
+            _aberto_se(~Q(etapa__in=(
+                PossoReagendarConsultorSessao.ETAPA_CONCLUIDO,
+                PossoReagendarConsultorSessao.ETAPA_RECUSADO,
+            ))),
+            'criado_em',
+        ))
+        partes.append(_colunas(
+            PossoAnteciparVendedorEnviado.objects.filter(
+                telefone__in=chaves,
+                data_envio__gte=agora - timedelta(hours=HORAS_ANTECIPAR),
+            ),
+            FLUXO_POSSO_ANTECIPAR, 'whatsapp_message_id',
+            _aberto_se(Q(respondido_em__isnull=True)),
+            'data_envio',
+        ))
+
+    chaves_cliente = [
+        c for c in (_chaves_telefone_variantes(telefone_usuario) or [_chave_telefone(telefone_usuario)]) if c
+    ] if telefone_usuario else []
+    if chaves_cliente:
+        cobertos.extend(FLUXOS_CLIENTE)
+        sempre_aberto = Value(True, output_field=BooleanField())
+        partes.append(_colunas(
+            PapConfirmacaoCliente.objects.filter(
+                celular_cliente__in=chaves_cliente, confirmado=False, sessao__isnull=True,
+            ),
+            FLUXO_CONFIRMACAO_AUDITORIA, 'celular_cliente', sempre_aberto, 'criado_em',
+        ))
+        partes.append(_colunas(
+            LembreteInstalacaoEnviado.objects.filter(
+                telefone__in=chaves_cliente,
+                respondido_em__isnull=True,
+                data_envio__gte=agora - timedelta(hours=HORAS_LEMBRETE_INSTALACAO),
+            ),
+            FLUXO_LEMBRETE_INSTALACAO, 'telefone', sempre_aberto, 'data_envio',
+        ))
+        partes.append(_colunas(
+            BoasVindasEnviado.objects.filter(
+                telefone__in=chaves_cliente,
+                data_envio__gte=agora - timedelta(days=DIAS_BOAS_VINDAS),
+            ),
+            FLUXO_BOAS_VINDAS, 'telefone', _aberto_se(Q(respondido_em__isnull=True)), 'data_envio',
+        ))
+
+    qs = partes[0].union(*partes[1:], all=True) if len(partes) > 1 else partes[0]
+    linhas = [
+        LinhaFluxo(fluxo, int(pk), ref or '', bool(aberto), momento)
+        for fluxo, pk, ref, aberto, momento in qs
+    ]
+    return EstadoConversa(telefone_chat, linhas, cobertos)
+
+
+# ---------------------------------------------------------------------------
+# Cache de SessaoWhatsapp por processo (write-through)
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_sessoes: Dict[str, Tuple[float, dict]] = {}
+
+
+def _ttl() -> float:
+    return float(getattr(settings, 'WHATSAPP_SESSAO_CACHE_TTL_SEG', 60))
+
+
+def _snapshot(sessao: SessaoWhatsapp) -> dict:
+    return {
+        'id': sessao.pk,
+        'telefone': sessao.telefone,
+        'etapa': sessao.etapa,
+        'dados_temp': copy.deepcopy(sessao.dados_temp or {}),
+        'updated_at': sessao.updated_at,
+        'data_ultimo_aviso_nao_autorizado': sessao.data_ultimo_aviso_nao_autorizado,
+    }
+
+
+def registrar_sessao(sessao: SessaoWhatsapp) -> None:
+    ttl = _ttl()
+    if ttl <= 0 or not sessao.pk or not sessao.telefone:
+        return
+    with _lock:
+        if len(_sessoes) >= MAX_SESSOES_CACHE and sessao.telefone not in _sessoes:
+            _sessoes.pop(next(iter(_sessoes)))
+        _sessoes[sessao.telefone] = (time.monotonic() + ttl, _snapshot(sessao))
+
+
+def descartar_sessao(telefone: str) -> None:
+    with _lock:
+        _sessoes.pop(telefone, None)
+
+
+def limpar_cache_sessoes() -> None:
+    with _lock:
+        _sessoes.clear()
+
+
+def _sessao_em_cache(telefone: str, linha: LinhaFluxo) -> Optional[SessaoWhatsapp]:
+    with _lock:
+        item = _sessoes.get(telefone)
+    if item is None:
+        return None
+    expira, snap = item
+    if (
+        expira < time.monotonic()
+        or snap['id'] != linha.id
+        or snap['etapa'] != linha.ref
+        or snap['updated_at'] != linha.momento
+    ):
+        descartar_sessao(telefone)
+        return None
+    sessao = SessaoWhatsapp(**{**snap, 'dados_temp': copy.deepcopy(snap['dados_temp'])})
+    sessao._state.adding = False
+    sessao._state.db = SessaoWhatsapp.objects.db
+    return sessao
+
+
+def obter_ou_criar_sessao(telefone: str, estado: Optional[EstadoConversa] = None) -> Tuple[SessaoWhatsapp, bool]:
+    """Mesmo retorno de `SessaoWhatsapp.objects.get_or_create(telefone=...)`, usando o estado/cache."""
+    linha = estado.sessao if estado is not None and estado.cobre(FLUXO_SESSAO) else None
+    if linha is not None:
+        sessao = _sessao_em_cache(telefone, linha)
+        if sessao is not None:
+            return sessao, False
+        sessao = SessaoWhatsapp.objects.filter(pk=linha.id).first()
+        if sessao is not None:
+            registrar_sessao(sessao)
+            return sessao, False
+    return SessaoWhatsapp.objects.get_or_create(
+        telefone=telefone,
+        defaults={'etapa': 'inicial', 'dados_temp': {}},
+    )
+
+
+@receiver(post_save, sender=SessaoWhatsapp)
+def atualizar_sessao_em_cache(sender, instance, update_fields=None, **kwargs):
+    # Save parcial sem dados_temp pode deixar em memória um dados_temp que não foi gravado
+    if update_fields is None or 'dados_temp' in update_fields:
+        registrar_sessao(instance)
+    else:
+        descartar_sessao(instance.telefone)
+
+
+@receiver(post_delete, sender=SessaoWhatsapp)
+def remover_sessao_do_cache(sender, instance, **kwargs):
+    descartar_sessao(instance.telefone)
+
+
+# ---------------------------------------------------------------------------
+# Consultas por mensagem
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def contar_queries():
+    """Conta as consultas da conexão padrão dentro do bloco: `with contar_queries() as c: ... c['total']`."""
+    from django.db import connection
+
+    contador = {'total': 0}
+
+    def _contar(execute, sql, params, many, context):
+        contador['total'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(_contar):
+        yield contador
@@ -47,6 +47,12 @@ class WhatsappWebhookFila(models.Model):
         ordering = ["prioridade", "criado_em"]
         indexes = [
             models.Index(fields=["status", "prioridade", "criado_em"]),
+            # Claim do próximo job: só as pendentes, sem varrer o histórico concluído
+            models.Index(
+                fields=["prioridade", "criado_em"],
+                condition=models.Q(status="pendente"),
+                name="webhook_fila_pendente_idx",
+            ),
         ]
 
     def __str__(self) -> str:
@@ -56,27 +56,15 @@ _inclusao_form_lock = threading.Lock()
 
 def _registrar_estatistica(telefone, comando):
     """
-    Registra uma estatística de mensagem enviada pelo bot
-    Tenta identificar o vendedor pelo telefone
+    Registra uma estatística de mensagem enviada pelo bot.
+    Vai para o buffer de telemetria; o vendedor é identificado pelo telefone na gravação
+    em lote (`_resolver_vendedores_por_telefone`), fora do caminho da resposta.
     """
     try:
-        from crm_app.models import EstatisticaBotWhatsApp
+        from crm_app.services.telemetria_buffer import TIPO_ESTATISTICA_BOT, registrar
 
-        # Mesma busca usada no fluxo do bot (DDD, 8/9 dígitos, máscaras no cadastro)
-        vendedor = _buscar_usuario_por_telefone(telefone)
-
-        # Criar registro de estatística
-        EstatisticaBotWhatsApp.objects.create(
-            telefone=telefone,
-            vendedor=vendedor,
-            comando=comando
-        )
-        
-        if vendedor:
-            logger.debug(f"[Estatística] Registrado {comando} para vendedor {vendedor.username}")
-        else:
-            logger.debug(f"[Estatística] Registrado {comando} para telefone {telefone} (vendedor não identificado)")
-            
+        registrar(TIPO_ESTATISTICA_BOT, telefone=telefone, comando=comando)
+        logger.debug(f"[Estatística] Enfileirado {comando} para telefone {telefone}")
     except Exception as e:
         logger.error(f"[Estatística] Erro ao registrar estatística: {e}", exc_info=True)
 
@@ -599,10 +587,9 @@ CREDITO_INTERVALO_MIN_SEG = 60  # 1 minuto entre análises
 STATUS_ONLINE_MAX_WAIT_SECONDS = 180  # evita sessão "presa" em aguardando_online
 
 
-def _buscar_usuario_por_telefone(telefone: str):
-    """Busca usuário ativo por qualquer um dos 3 números de WhatsApp."""
-    from usuarios.models import Usuario
-    telefone_limpo = re.sub(r'\D', '', telefone)
+def _variantes_busca_usuario(telefone: str) -> set:
+    """Variantes (com/sem 55, últimos 8/9 dígitos) usadas para achar o usuário pelo WhatsApp."""
+    telefone_limpo = re.sub(r'\D', '', telefone or '')
     telefones_variantes = {telefone_limpo}
     if telefone_limpo.startswith('55') and len(telefone_limpo) > 11:
         telefones_variantes.add(telefone_limpo[2:])
@@ -612,6 +599,13 @@ def _buscar_usuario_por_telefone(telefone: str):
         telefones_variantes.add(telefone_limpo[-8:])
     if len(telefone_limpo) >= 9:
         telefones_variantes.add(telefone_limpo[-9:])
+    return telefones_variantes
+
+
+def _buscar_usuario_por_telefone(telefone: str):
+    """Busca usuário ativo por qualquer um dos 3 números de WhatsApp."""
+    from usuarios.models import Usuario
+    telefones_variantes = _variantes_busca_usuario(telefone)
     for tel_var in telefones_variantes:
         usuario = Usuario.objects.filter(
             is_active=True
@@ -634,6 +628,40 @@ def _buscar_usuario_por_telefone(telefone: str):
     return None
 
 
+def _resolver_vendedores_por_telefone(telefones) -> dict:
+    """
+    `_buscar_usuario_por_telefone` para vários telefones com uma leitura só dos usuários ativos.
+    Mesma ordem de tentativa: tel_whatsapp sem máscara, depois os 3 campos como estão.
+    Retorna {telefone: usuario_id ou None}.
+    """
+    from usuarios.models import Usuario
+
+    usuarios = list(
+        Usuario.objects.filter(is_active=True)
+        .order_by('pk')
+        .values_list('pk', 'tel_whatsapp', 'tel_whatsapp_2', 'tel_whatsapp_3')
+    )
+    sem_mascara = [
+        (pk, (tel or '').replace('-', '').replace(' ', '').replace('(', '').replace(')', ''))
+        for pk, tel, _, _ in usuarios
+    ]
+
+    def _primeiro(variantes):
+        for var in variantes:
+            for pk, tel in sem_mascara:
+                if var in tel:
+                    return pk
+        for var in variantes:
+            var = var.lower()
+            for campo in (1, 2, 3):
+                for usuario in usuarios:
+                    if var in (usuario[campo] or '').lower():
+                        return usuario[0]
+        return None
+
+    return {telefone: _primeiro(_variantes_busca_usuario(telefone)) for telefone in telefones}
+
+
 def _primeiro_nome_usuario(usuario) -> str:
     """Retorna primeiro nome amigável para mensagens do bot."""
     try:
@@ -6233,7 +6261,7 @@ def _executar_venda_pap_etapa6_em_diante(
                         sessao_id=sessao_id,
                         protocolo_pedido=proto or None,
                     )
-                SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_confirmacao')
+                SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_confirmacao', updated_at=timezone.now())
             except Exception as e:
                 logger.warning("[VENDA PAP] Falha ao registrar PapConfirmacaoCliente/etapa: %s", e)
 
@@ -6370,7 +6398,7 @@ def _executar_venda_pap_etapa6_em_diante(
                     }
                 def _upd_abrir_os():
                     try:
-                        SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_abrir_os')
+                        SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_abrir_os', updated_at=timezone.now())
                     except Exception as e:
                         logger.warning("[VENDA PAP] Falha ao atualizar etapa venda_aguardando_abrir_os: %s", e)
                 _tu = threading.Thread(target=_upd_abrir_os, name="pap-etapa-abrir-os")
@@ -6386,7 +6414,7 @@ def _executar_venda_pap_etapa6_em_diante(
                         _automacoes_pap_ativas.pop(sessao_id, None)
                     def _upd_back():
                         try:
-                            SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_confirmacao')
+                            SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_confirmacao', updated_at=timezone.now())
                         except Exception:
                             pass
                     threading.Thread(target=_upd_back, name="pap-etapa-back").start()
@@ -6395,7 +6423,7 @@ def _executar_venda_pap_etapa6_em_diante(
                         _automacoes_pap_ativas.pop(sessao_id, None)
                     def _upd_back():
                         try:
-                            SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_confirmacao')
+                            SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_confirmacao', updated_at=timezone.now())
                         except Exception:
                             pass
                     threading.Thread(target=_upd_back, name="pap-etapa-back").start()
@@ -6423,7 +6451,7 @@ def _executar_venda_pap_etapa6_em_diante(
                 enviar_resultado(f"⏳ *BIOMETRIA PENDENTE*\n\n{msg}\n\nPeça ao cliente para realizar a biometria.\nQuando concluir, digite *BIO OK* para consultar.")
                 def _upd_etapa_bio():
                     try:
-                        SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_biometria')
+                        SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_biometria', updated_at=timezone.now())
                     except Exception as e:
                         logger.warning("[VENDA PAP] Falha ao atualizar etapa aguardando_biometria: %s", e)
                 _tb = threading.Thread(target=_upd_etapa_bio, name="pap-etapa-bio")
@@ -6461,7 +6489,7 @@ def _executar_venda_pap_etapa6_em_diante(
                 }
             def _upd_etapa_abrir_os():
                 try:
-                    SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_abrir_os')
+                    SessaoWhatsapp.objects.filter(id=sessao_id).update(etapa='venda_aguardando_abrir_os', updated_at=timezone.now())
                 except Exception as e:
                     logger.warning("[VENDA PAP] Falha ao atualizar etapa venda_aguardando_abrir_os: %s", e)
             _t_abrir = threading.Thread(target=_upd_etapa_abrir_os, name="pap-etapa-abrir-os-2")
@@ -7532,6 +7560,31 @@ def _enviar_relato_roubo_para_gc(sessao, telefone_formatado_usuario, usuario_wha
 
 
 def processar_webhook_whatsapp(data, request=None):
+    """
+    Processa mensagens recebidas do WhatsApp via webhook (ver `_processar_webhook_whatsapp`)
+    e registra quantas consultas ao banco a mensagem custou.
+    """
+    from crm_app.whatsapp_roteador import contar_queries
+
+    inicio = time.monotonic()
+    with contar_queries() as consultas:
+        resultado = _processar_webhook_whatsapp(data, request=request)
+    nivel = (
+        logging.WARNING
+        if consultas['total'] > int(getattr(settings, 'WHATSAPP_WEBHOOK_QUERIES_ALERTA', 25))
+        else logging.INFO
+    )
+    logger.log(
+        nivel,
+        "[Webhook] queries=%s tempo=%.0fms resultado=%r",
+        consultas['total'],
+        (time.monotonic() - inicio) * 1000,
+        ((resultado or {}).get('mensagem') if isinstance(resultado, dict) else None),
+    )
+    return resultado
+
+
+def _processar_webhook_whatsapp(data, request=None):
     """
     Processa mensagens recebidas do WhatsApp via webhook.
     request: opcional, usado para gerar URL do PDF (serve-pdf) e enviar documento por URL na Z-API.
@@ -7569,7 +7622,7 @@ def processar_webhook_whatsapp(data, request=None):
         consultar_status_venda_com_decisao,
         consultar_andamento_agendamentos
     )
-    from crm_app.nio_api import consultar_dividas_nio
+    from crm_app.nio_dividas_cache import consultar_dividas_nio_cache
 
     if django_settings.DEBUG:
         logger.debug("[Webhook] Payload recebido (keys): %s", list(data.keys()) if isinstance(data, dict) else type(data))
@@ -7692,12 +7745,27 @@ def processar_webhook_whatsapp(data, request=None):
     # Ignorar webhooks só de reação (emoji) - não têm texto/anexo, evitar 500
     from crm_app.esteira_posso_antecipar_service import (
         _extrair_reference_message_id_zapi as _ref_msg_zapi,
-        buscar_solicitacao_por_mensagem_whatsapp,
-    )
-    from crm_app.esteira_posso_reagendar_service import buscar_sessao_por_mensagem_whatsapp as buscar_sessao_reagendar_ref
-    from crm_app.esteira_lista_agendamento_vendedor_service import (
-        buscar_sessao_por_mensagem_whatsapp as buscar_sessao_lista_agendamento_ref,
+        _ref_tem_solicitacao as ref_posso_antecipar,
     )
+    from crm_app.esteira_posso_reagendar_service import _ref_tem_sessao as ref_posso_reagendar
+    from crm_app.esteira_lista_agendamento_vendedor_service import _ref_tem_sessao as ref_lista_agendamento
+    from crm_app.whatsapp_roteador import carregar_estado, obter_ou_criar_sessao, roteador_habilitado
+
+    _estado_memo = {}
+
+    def _estado_conversa():
+        """Sessão + fluxos da esteira do telefone numa consulta (whatsapp_roteador); None se desligado."""
+        if 'estado' not in _estado_memo:
+            _estado_memo['estado'] = None
+            if roteador_habilitado():
+                try:
+                    _estado_memo['estado'] = carregar_estado(
+                        formatar_telefone(telefone), formatar_telefone(telefone_usuario),
+                    )
+                except Exception as e:
+                    logger.warning("[Webhook] Falha ao carregar estado da conversa: %s", e, exc_info=True)
+        return _estado_memo['estado']
+
     _bid_early, _bmsg_early = _extrair_dados_botao_zapi(data)
     tem_resposta_botao = bool(_buscar_buttons_response_zapi(data) or _bid_early or _bmsg_early)
     ref_early = _ref_msg_zapi(data)
@@ -7710,7 +7778,7 @@ def processar_webhook_whatsapp(data, request=None):
         and telefone_usuario
     ):
         tel_early = formatar_telefone(telefone_usuario)
-        if tel_early and buscar_solicitacao_por_mensagem_whatsapp(ref_early, tel_early):
+        if tel_early and ref_posso_antecipar(ref_early, tel_early, _estado_conversa()):
             tem_resposta_botao = True
             if _bmsg_early:
                 mensagem_texto = _bmsg_early
@@ -7719,7 +7787,7 @@ def processar_webhook_whatsapp(data, request=None):
                 ref_early,
                 (_bmsg_early or mensagem_texto or '')[:60],
             )
-        elif tel_early and buscar_sessao_reagendar_ref(ref_early, tel_early):
+        elif tel_early and ref_posso_reagendar(ref_early, tel_early, _estado_conversa()):
             tem_resposta_botao = True
             if _bmsg_early:
                 mensagem_texto = _bmsg_early
@@ -7728,7 +7796,7 @@ def processar_webhook_whatsapp(data, request=None):
                 ref_early,
                 (_bmsg_early or mensagem_texto or '')[:60],
             )
-        elif tel_early and buscar_sessao_lista_agendamento_ref(ref_early, tel_early):
+        elif tel_early and ref_lista_agendamento(ref_early, tel_early, _estado_conversa()):
             tem_resposta_botao = True
             if _bmsg_early:
                 mensagem_texto = _bmsg_early
@@ -7776,6 +7844,7 @@ def processar_webhook_whatsapp(data, request=None):
         button_id=button_id_la,
         reference_message_id=ref_msg_la,
         telefone=telefone_formatado_usuario,
+        estado=_estado_conversa(),
     ):
         try:
             if ref_msg_la or button_id_la:
@@ -7790,6 +7859,7 @@ def processar_webhook_whatsapp(data, request=None):
                 mensagem_texto,
                 button_id=button_id_la,
                 reference_message_id=ref_msg_la,
+                estado=_estado_conversa(),
             ):
                 return {'status': 'ok', 'mensagem': 'Resposta lista agendamento vendedor'}
         except Exception as e:
@@ -7810,6 +7880,7 @@ def processar_webhook_whatsapp(data, request=None):
         button_id=button_id_pr,
         reference_message_id=ref_msg_pr,
         telefone=telefone_formatado_usuario,
+        estado=_estado_conversa(),
     ):
         try:
             if ref_msg_pr or button_id_pr:
@@ -7824,6 +7895,7 @@ def processar_webhook_whatsapp(data, request=None):
                 mensagem_texto,
                 button_id=button_id_pr,
                 reference_message_id=ref_msg_pr,
+                estado=_estado_conversa(),
             ):
                 return {'status': 'ok', 'mensagem': 'Resposta posso reagendar consultor'}
         except Exception as e:
@@ -7844,6 +7916,7 @@ def processar_webhook_whatsapp(data, request=None):
         button_id=button_id_pa,
         reference_message_id=ref_msg_pa,
         telefone=telefone_formatado_usuario,
+        estado=_estado_conversa(),
     ):
         try:
             if ref_msg_pa or button_id_pa:
@@ -7858,6 +7931,7 @@ def processar_webhook_whatsapp(data, request=None):
                 mensagem_texto,
                 button_id=button_id_pa,
                 reference_message_id=ref_msg_pa,
+                estado=_estado_conversa(),
             ):
                 return {'status': 'ok', 'mensagem': 'Resposta posso antecipar vendedor'}
         except Exception as e:
@@ -7996,9 +8070,15 @@ def processar_webhook_whatsapp(data, request=None):
     chaves_tentar_ua = _chaves_telefone_variantes(telefone_formatado_usuario) or [chave]
     try:
         from crm_app.models import PapConfirmacaoCliente
-        pendente_auditoria = PapConfirmacaoCliente.objects.filter(
-            celular_cliente__in=chaves_tentar_ua, confirmado=False, sessao__isnull=True
-        ).exists()
+        from crm_app.whatsapp_roteador import FLUXO_CONFIRMACAO_AUDITORIA
+
+        estado_conversa = _estado_conversa()
+        pendente_auditoria = (
+            not (estado_conversa and estado_conversa.descarta(FLUXO_CONFIRMACAO_AUDITORIA))
+            and PapConfirmacaoCliente.objects.filter(
+                celular_cliente__in=chaves_tentar_ua, confirmado=False, sessao__isnull=True
+            ).exists()
+        )
         if pendente_auditoria:
             try:
                 WhatsAppService.para_cliente().enviar_mensagem_texto(
@@ -8016,14 +8096,18 @@ def processar_webhook_whatsapp(data, request=None):
     try:
         from datetime import timedelta
         from crm_app.models import LembreteInstalacaoEnviado
+        from crm_app.whatsapp_roteador import FLUXO_LEMBRETE_INSTALACAO, HORAS_LEMBRETE_INSTALACAO
         chave_lembrete = _chave_telefone(telefone_formatado_usuario)
         chaves_lembrete = _chaves_telefone_variantes(telefone_formatado_usuario) or [chave_lembrete]
-        limite_envio = timezone.now() - timedelta(hours=48)
-        lembrete = LembreteInstalacaoEnviado.objects.filter(
-            telefone__in=chaves_lembrete,
-            respondido_em__isnull=True,
-            data_envio__gte=limite_envio,
-        ).order_by('-data_envio').select_related('venda').first()
+        limite_envio = timezone.now() - timedelta(hours=HORAS_LEMBRETE_INSTALACAO)
+        estado_conversa = _estado_conversa()
+        lembrete = None
+        if not (estado_conversa and estado_conversa.descarta(FLUXO_LEMBRETE_INSTALACAO)):
+            lembrete = LembreteInstalacaoEnviado.objects.filter(
+                telefone__in=chaves_lembrete,
+                respondido_em__isnull=True,
+                data_envio__gte=limite_envio,
+            ).order_by('-data_envio').select_related('venda').first()
         if lembrete:
             periodo = lembrete.periodo_agendamento or ''
             if periodo == 'MANHA':
@@ -8318,14 +8402,18 @@ def processar_webhook_whatsapp(data, request=None):
     try:
         from datetime import timedelta as _td
         from crm_app.models import BoasVindasEnviado, MensagemClienteBoasVindas
+        from crm_app.whatsapp_roteador import DIAS_BOAS_VINDAS, FLUXO_BOAS_VINDAS
         chave_bv = _chave_telefone(telefone_formatado_usuario)
         chaves_bv = _chaves_telefone_variantes(telefone_formatado_usuario) or [chave_bv]
-        limite_bv = timezone.now() - _td(days=30)
+        limite_bv = timezone.now() - _td(days=DIAS_BOAS_VINDAS)
+        estado_conversa = _estado_conversa()
+        bv = None
         # Busca o envio mais recente para este telefone (para continuar recebendo mensagens)
-        bv = BoasVindasEnviado.objects.filter(
-            telefone__in=chaves_bv,
-            data_envio__gte=limite_bv,
-        ).order_by('-data_envio').select_related('venda').first()
+        if not (estado_conversa and estado_conversa.descarta(FLUXO_BOAS_VINDAS)):
+            bv = BoasVindasEnviado.objects.filter(
+                telefone__in=chaves_bv,
+                data_envio__gte=limite_bv,
+            ).order_by('-data_envio').select_related('venda').first()
         if bv:
             texto_resposta = (mensagem_texto or '').strip() or mensagem_limpa or ''
             agora_bv = timezone.now()
@@ -8376,7 +8464,11 @@ def processar_webhook_whatsapp(data, request=None):
     # PAP: confirmação do cliente (SIM) / BIO OK antes de tratar "contato externo" (cliente não é usuário interno).
     etapa_sessao = None
     try:
-        etapa_sessao = SessaoWhatsapp.objects.filter(telefone=telefone_formatado).values_list('etapa', flat=True).first()
+        estado_conversa = _estado_conversa()
+        if estado_conversa is not None:
+            etapa_sessao = estado_conversa.etapa_sessao
+        else:
+            etapa_sessao = SessaoWhatsapp.objects.filter(telefone=telefone_formatado).values_list('etapa', flat=True).first()
     except Exception:
         pass
     sim_no_fluxo_vender = (mensagem_limpa in ['SIM', 'S'] and etapa_sessao == 'venda_confirmar_matricula')
@@ -8527,11 +8619,8 @@ def processar_webhook_whatsapp(data, request=None):
     # Inicializar serviço WhatsApp
     whatsapp_service = WhatsAppService()
     
-    # Buscar ou criar sessão
-    sessao, created = SessaoWhatsapp.objects.get_or_create(
-        telefone=telefone_formatado,
-        defaults={'etapa': 'inicial', 'dados_temp': {}}
-    )
+    # Buscar ou criar sessão (linha já lida no estado da conversa; dados_temp do cache do processo)
+    sessao, created = obter_ou_criar_sessao(telefone_formatado, _estado_conversa())
     
     # Resetar sessão antiga (mais de 30 minutos sem interação)
     if not created:
@@ -8555,7 +8644,8 @@ def processar_webhook_whatsapp(data, request=None):
                 )
             except Exception as e:
                 logger.warning(f"[Webhook] Erro ao enviar aviso não autorizado: {e}", exc_info=True)
-            SessaoWhatsapp.objects.filter(id=sessao.id).update(data_ultimo_aviso_nao_autorizado=hoje)
+            sessao.data_ultimo_aviso_nao_autorizado = hoje
+            sessao.save(update_fields=['data_ultimo_aviso_nao_autorizado'])
         return {'status': 'ok', 'mensagem': 'Usuário não autorizado a chamar no bot'}
 
     def _enviar_material_record_apoia_da_sessao(caption=None):
@@ -10402,7 +10492,9 @@ def processar_webhook_whatsapp(data, request=None):
                         limit = 50  # Aumentar limite por requisição
                         max_tentativas = 5  # Evitar loop infinito
                         for tentativa in range(max_tentativas):
-                            resultado = consultar_dividas_nio(cpf_limpo, offset=offset, limit=limit, headless=headless_fatura)
+                            resultado = consultar_dividas_nio_cache(
+                                cpf_limpo, offset=offset, limit=limit, headless=headless_fatura, permitir_stale=True,
+                            )
                             invoices_lote = resultado.get('invoices', [])
                             if not invoices_lote:
                                 break
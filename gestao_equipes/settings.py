@@ -312,6 +312,31 @@ N8N_TEAMS_WEBHOOK_URL = config('N8N_TEAMS_WEBHOOK_URL', default='')
 SITE_URL = config('SITE_URL', default='https://www.recordpap.com.br')
 # Descarta webhooks Z-API irrelevantes (grupo, fromMe, etc.) antes do handler pesado
 WHATSAPP_WEBHOOK_FASTPATH = config('WHATSAPP_WEBHOOK_FASTPATH', default=True, cast=bool)
+# Roteador do bot (crm_app/whatsapp_roteador.py): estado do telefone (sessão + fluxos da esteira)
+# numa consulta; SessaoWhatsapp em cache por processo, validado por etapa/updated_at.
+WHATSAPP_ROTEADOR_ENABLED = config('WHATSAPP_ROTEADOR_ENABLED', default=True, cast=bool)
+WHATSAPP_SESSAO_CACHE_TTL_SEG = config('WHATSAPP_SESSAO_CACHE_TTL_SEG', default=60, cast=int)
+# Log de aviso quando uma mensagem passa deste número de consultas
+WHATSAPP_WEBHOOK_QUERIES_ALERTA = config('WHATSAPP_WEBHOOK_QUERIES_ALERTA', default=25, cast=int)
+# Telemetria do bot (crm_app/services/telemetria_buffer.py): estatística de comando, eventos do
+# funil e custo do Número B enfileirados em memória e gravados em bulk_create por thread daemon.
+TELEMETRIA_BUFFER_ENABLED = config('TELEMETRIA_BUFFER_ENABLED', default=True, cast=bool)
+TELEMETRIA_LOTE = config('TELEMETRIA_LOTE', default=200, cast=int)
+TELEMETRIA_FLUSH_SEG = config('TELEMETRIA_FLUSH_SEG', default=2.0, cast=float)
+TELEMETRIA_MAX_PENDENTES = config('TELEMETRIA_MAX_PENDENTES', default=20000, cast=int)
+# Agregado diário (crm_app/services/telemetria_rollup.py) lido pelas estatísticas do bot e pelo
+# resumo do funil. Backfill: python manage.py reconstruir_rollup_telemetria
+TELEMETRIA_ROLLUP_ENABLED = config('TELEMETRIA_ROLLUP_ENABLED', default=True, cast=bool)
+
+# --- Índice DFV por CEP (crm_app/dfv_indice.py; reconstruído após cada importação DFV) ---
+DFV_INDICE_CACHE_CEPS = config('DFV_INDICE_CACHE_CEPS', default=20000, cast=int)
+DFV_INDICE_VERSAO_TTL_SEG = config('DFV_INDICE_VERSAO_TTL_SEG', default=60, cast=int)
+# Importação DFV no PostgreSQL: COPY para staging UNLOGGED + dedup/upsert em SQL
+# (crm_app/services/dfv_import_service.py). False volta ao fluxo em lotes com bulk insert.
+DFV_IMPORT_COPY_ENABLED = config('DFV_IMPORT_COPY_ENABLED', default=True, cast=bool)
+# Importação Agendamento/Recompra: linhas por lote de bulk_update/bulk_create
+# (crm_app/services/importacao_agendamento_recompra.py).
+IMPORTACAO_AGENDAMENTO_LOTE = config('IMPORTACAO_AGENDAMENTO_LOTE', default=2000, cast=int)
 
 # --- DFV Power BI (comando WhatsApp DFV — ao vivo; independente da base local FACHADA) ---
 DFV_POWERBI_ENABLED = config(
@@ -403,6 +428,42 @@ RECAPTCHA_SOLVER_API_URL = config('RECAPTCHA_SOLVER_API_URL', default='')
 
 # Caminho para armazenar/reusar cookies da Nio (storage state do Playwright)
 NIO_STORAGE_STATE = os.path.join(BASE_DIR, '.playwright_state.json')
+# Token/sessionId da API Nio compartilhados entre processos (cache do Django) — crm_app/nio_api.py.
+# Renova em background quando faltam NIO_TOKEN_RENOVAR_ANTES_SEG para expirar.
+NIO_TOKEN_TTL_SEG = config('NIO_TOKEN_TTL_SEG', default=1800, cast=int)
+NIO_TOKEN_RENOVAR_ANTES_SEG = config('NIO_TOKEN_RENOVAR_ANTES_SEG', default=300, cast=int)
+NIO_TOKEN_LOCK_SEG = config('NIO_TOKEN_LOCK_SEG', default=180, cast=int)
+NIO_SESSION_ID_TTL_SEG = config('NIO_SESSION_ID_TTL_SEG', default=600, cast=int)
+# Cache por CPF das dívidas Nio (crm_app/nio_dividas_cache.py): fresco por TTL; fluxos
+# interativos aceitam a resposta velha por mais SWR segundos enquanto renovam em background.
+NIO_DIVIDAS_CACHE_ENABLED = config('NIO_DIVIDAS_CACHE_ENABLED', default=True, cast=bool)
+NIO_DIVIDAS_CACHE_TTL_SEG = config('NIO_DIVIDAS_CACHE_TTL_SEG', default=300, cast=int)
+NIO_DIVIDAS_CACHE_SWR_SEG = config('NIO_DIVIDAS_CACHE_SWR_SEG', default=1800, cast=int)
+# Busca/match de faturas Nio em paralelo (crm_app/services/busca_faturas_paralela.py):
+# contratos simultâneos, tentativas com backoff + jitter e teto de req/s por host da API (0 = sem teto).
+NIO_BUSCA_WORKERS = config('NIO_BUSCA_WORKERS', default=4, cast=int)
+NIO_BUSCA_TENTATIVAS = config('NIO_BUSCA_TENTATIVAS', default=3, cast=int)
+NIO_API_MAX_RPS = config('NIO_API_MAX_RPS', default=5, cast=float)
+# Agregado por lente/mês do Qualidade e Dashboard FPD (crm_app/services/qualidade_rollup.py):
+# fatia suja (signal) ou mais velha que MAX_IDADE é reconstruída na leitura.
+QUALIDADE_ROLLUP_ENABLED = config('QUALIDADE_ROLLUP_ENABLED', default=True, cast=bool)
+QUALIDADE_ROLLUP_MAX_IDADE_SEG = config('QUALIDADE_ROLLUP_MAX_IDADE_SEG', default=600, cast=int)
+# Busca textual do Qualidade/Esteira pelo índice DocumentoBusca (crm_app/services/busca_textual.py);
+# só vale depois do primeiro `manage.py reconstruir_indice_busca`.
+BUSCA_INDICE_ENABLED = config('BUSCA_INDICE_ENABLED', default=True, cast=bool)
+# Conjunto OSAB compartilhado (crm_app/services/osab_documentos.py): regravado no fim de
+# cada importação/reversão OSAB; export da Esteira testa CONSTA OSAB sem varrer a tabela.
+OSAB_CONJUNTO_ENABLED = config('OSAB_CONJUNTO_ENABLED', default=True, cast=bool)
+# Snapshot de autorização por usuário (usuarios/autorizacao.py): grupos, perfil, permissões e
+# liderados em cache; 0 desliga o cache entre requests (fica só o memo por request).
+AUTORIZACAO_CACHE_TTL_SEG = config('AUTORIZACAO_CACHE_TTL_SEG', default=300, cast=int)
+AUTORIZACAO_VERSAO_TTL_SEG = config('AUTORIZACAO_VERSAO_TTL_SEG', default=15, cast=int)
+# Lotes de PDF folha + extrato (crm_app/services/folha_pdf_lote.py): acima de
+# FOLHA_PDF_LOTE_SINCRONO_MAX vendedores o envio/download roda em background com polling.
+# FOLHA_PDF_PROCESSOS = processos de renderização (0/1 renderiza na thread do lote).
+FOLHA_PDF_PROCESSOS = config('FOLHA_PDF_PROCESSOS', default=2, cast=int)
+FOLHA_PDF_ENVIO_CONCORRENCIA = config('FOLHA_PDF_ENVIO_CONCORRENCIA', default=4, cast=int)
+FOLHA_PDF_LOTE_SINCRONO_MAX = config('FOLHA_PDF_LOTE_SINCRONO_MAX', default=1, cast=int)
 
 # WhatsApp Web — bot oficial Nio (reagendamento 7029 na esteira)
 WHATSAPP_NIO_PROFILE_DIR = config(
@@ -594,6 +655,14 @@ SYNC_ESTEIRA_INTERVALO_LONGO_MIN_SEG = config('SYNC_ESTEIRA_INTERVALO_LONGO_MIN_
 SYNC_ESTEIRA_INTERVALO_LONGO_MAX_SEG = config('SYNC_ESTEIRA_INTERVALO_LONGO_MAX_SEG', default=600, cast=int)
 # Quantas consultas STATUS reutilizam o mesmo browser antes de reciclar (evita N logins V.tal).
 SYNC_ESTEIRA_MAX_CONSULTAS_POR_SESSAO = config('SYNC_ESTEIRA_MAX_CONSULTAS_POR_SESSAO', default=20, cast=int)
+# Skip list: vendas sem mudança no PAP recuam em backoff exponencial (base → máx, em minutos).
+SYNC_ESTEIRA_SKIP_ESTAVEIS = config('SYNC_ESTEIRA_SKIP_ESTAVEIS', default=True, cast=bool)
+SYNC_ESTEIRA_ESTADO_INTERVALO_BASE_MIN = config('SYNC_ESTEIRA_ESTADO_INTERVALO_BASE_MIN', default=120, cast=int)
+SYNC_ESTEIRA_ESTADO_INTERVALO_MAX_MIN = config('SYNC_ESTEIRA_ESTADO_INTERVALO_MAX_MIN', default=2880, cast=int)
+SYNC_ESTEIRA_ESTADO_DIAS_AGENDAMENTO = config('SYNC_ESTEIRA_ESTADO_DIAS_AGENDAMENTO', default=1, cast=int)
+SYNC_ESTEIRA_ESTADO_HORAS_PENDENCIA_RECENTE = config(
+    'SYNC_ESTEIRA_ESTADO_HORAS_PENDENCIA_RECENTE', default=48, cast=int,
+)
 
 # Consulta STATUS PAP da aba (login do usuário na Esteira) — ~5–6 O.S./min
 CONSULTA_ESTEIRA_INTERVALO_MIN_SEG = config('CONSULTA_ESTEIRA_INTERVALO_MIN_SEG', default=8, cast=int)
@@ -648,6 +717,35 @@ FOLHA_COMISSAO_CACHE_ENABLED = config(
     cast=lambda v: str(v).lower() in ('true', '1', 'yes'),
 )
 FOLHA_COMISSAO_CACHE_TTL = config('FOLHA_COMISSAO_CACHE_TTL', default=1800, cast=int)
+# Orçamento de import do URLconf (manage.py perfil_importacao); 0 = só relatório
+IMPORT_TIME_BUDGET_MS = config('IMPORT_TIME_BUDGET_MS', default=1500, cast=int)
+
+# --- Scheduler (run_scheduler): ledger de execuções e pools por tipo de job ---
+SCHEDULER_LEDGER_ENABLED = config('SCHEDULER_LEDGER_ENABLED', default=True, cast=bool)
+SCHEDULER_LEDGER_RETENCAO_DIAS = config('SCHEDULER_LEDGER_RETENCAO_DIAS', default=30, cast=int)
+# Retenção (crm_app/services/retencao_service.py; job noturno aplicar_retencao).
+# Filas: jobs terminados há mais de FILA_ARQUIVAR_APOS_HORAS vão para FilaJobHistorico.
+FILA_ARQUIVAR_APOS_HORAS = config('FILA_ARQUIVAR_APOS_HORAS', default=24, cast=int)
+RETENCAO_LOTE = config('RETENCAO_LOTE', default=5000, cast=int)
+# Dias por modelo (0 = manter tudo). Auditoria de venda e eventos da esteira ficam por padrão.
+RETENCAO_DIAS = {
+    'WhatsappWebhookFila': config('RETENCAO_DIAS_WEBHOOK_FILA', default=30, cast=int),
+    'PapJobFila': config('RETENCAO_DIAS_PAP_FILA', default=30, cast=int),
+    'JobFila': config('RETENCAO_DIAS_JOB_FILA', default=30, cast=int),
+    # Lotes de PDF da folha: os PDFs (BinaryField) saem junto com o lote (cascade)
+    'LoteFolhaPdf': config('RETENCAO_DIAS_LOTE_FOLHA_PDF', default=15, cast=int),
+    # Respostas Nio por CPF: passado TTL + SWR (minutos) a linha não é mais usada
+    'CacheDividasNio': config('RETENCAO_DIAS_CACHE_DIVIDAS_NIO', default=1, cast=int),
+    'FilaJobHistorico': config('RETENCAO_DIAS_FILA_HISTORICO', default=90, cast=int),
+    'HistoricoConsultaAutomacaoPAP': config('RETENCAO_DIAS_CONSULTA_AUTOMACAO_PAP', default=180, cast=int),
+    'LogEnvioPerformance': config('RETENCAO_DIAS_LOG_ENVIO_PERFORMANCE', default=90, cast=int),
+    'HistoricoAtendimentoIACliente': config('RETENCAO_DIAS_ATENDIMENTO_IA', default=365, cast=int),
+    'VendaEsteiraEvento': config('RETENCAO_DIAS_VENDA_ESTEIRA_EVENTO', default=0, cast=int),
+    'HistoricoAlteracaoVenda': config('RETENCAO_DIAS_HISTORICO_ALTERACAO_VENDA', default=0, cast=int),
+    'EstatisticaBotWhatsApp': config('RETENCAO_DIAS_ESTATISTICA_BOT', default=0, cast=int),
+}
+SCHEDULER_POOL_PADRAO_WORKERS = config('SCHEDULER_POOL_PADRAO_WORKERS', default=5, cast=int)
+SCHEDULER_POOL_LENTO_WORKERS = config('SCHEDULER_POOL_LENTO_WORKERS', default=3, cast=int)
 
 # Webhook Z-API: processar em thread/fila e responder HTTP 200 imediatamente
 WHATSAPP_WEBHOOK_ASYNC = config(
@@ -700,8 +798,58 @@ PAP_WORKER_POLL_SECONDS = config('PAP_WORKER_POLL_SECONDS', default=2, cast=floa
 # Watchdog da fila: processando sem heartbeat / pendente órfão (minutos).
 PAP_JOB_STALE_PROCESSANDO_MINUTES = config('PAP_JOB_STALE_PROCESSANDO_MINUTES', default=12, cast=int)
 PAP_JOB_STALE_PENDENTE_MINUTES = config('PAP_JOB_STALE_PENDENTE_MINUTES', default=10, cast=int)
-# 0 = usa timeout por tipo (status=240s, credito=360s).
+# 0 = timeout aprendido: p95 das durações do tipo (últimos N dias) × fator, entre MIN e MAX;
+# sem amostras suficientes usa o padrão por tipo (status=240s, credito=360s).
 PAP_JOB_TIMEOUT_SECONDS = config('PAP_JOB_TIMEOUT_SECONDS', default=0, cast=int)
+PAP_JOB_TIMEOUT_FATOR_P95 = config('PAP_JOB_TIMEOUT_FATOR_P95', default=2.0, cast=float)
+PAP_JOB_TIMEOUT_MIN_SECONDS = config('PAP_JOB_TIMEOUT_MIN_SECONDS', default=60, cast=int)
+PAP_JOB_TIMEOUT_MAX_SECONDS = config('PAP_JOB_TIMEOUT_MAX_SECONDS', default=600, cast=int)
+PAP_JOB_TIMEOUT_MIN_AMOSTRAS = config('PAP_JOB_TIMEOUT_MIN_AMOSTRAS', default=20, cast=int)
+PAP_JOB_TIMEOUT_JANELA_DIAS = config('PAP_JOB_TIMEOUT_JANELA_DIAS', default=7, cast=int)
+# Heartbeat do worker PAP enquanto o handler roda; sem batimento por STALE s o job é órfão.
+PAP_JOB_HEARTBEAT_SEGUNDOS = config('PAP_JOB_HEARTBEAT_SEGUNDOS', default=20, cast=int)
+PAP_JOB_HEARTBEAT_STALE_SEGUNDOS = config('PAP_JOB_HEARTBEAT_STALE_SEGUNDOS', default=90, cast=int)
+# Agendamento do claim (crm_app/pap_job_fila.py): faixa interativa (WhatsApp aguardando) na
+# frente do lote; envelhecimento de 1 nível de prioridade a cada AGING s de espera.
+PAP_JOB_TIPOS_INTERATIVOS = [
+    t.strip()
+    for t in config('PAP_JOB_TIPOS_INTERATIVOS', default='status_online,analise_credito').split(',')
+    if t.strip()
+]
+PAP_JOB_LOTE_PENALIDADE = config('PAP_JOB_LOTE_PENALIDADE', default=5, cast=int)
+PAP_JOB_AGING_SEGUNDOS = config('PAP_JOB_AGING_SEGUNDOS', default=30, cast=int)
+# Máximo de jobs de lote simultâneos (com `run_worker --queues=pap:2` sobra vaga p/ interativo).
+PAP_JOB_LOTE_MAX_SIMULTANEOS = config('PAP_JOB_LOTE_MAX_SIMULTANEOS', default=1, cast=int)
+# Limite por tipo, ex.: "analise_credito:1,consulta_pedido:1" (ausente/0 = sem limite).
+PAP_JOB_CONCORRENCIA_TIPOS = {
+    tipo.strip(): int(n)
+    for tipo, _, n in (
+        item.partition(':') for item in config('PAP_JOB_CONCORRENCIA_TIPOS', default='').split(',')
+    )
+    if tipo.strip() and n.strip().isdigit()
+}
+
+# Fila genérica de jobs (crm_app/job_fila.py): filas consumidas por `run_worker` em outro
+# serviço (imports por padrão — railway.worker.toml). Filas fora da lista rodam numa thread do
+# web, sem retomada; o scheduler só recupera leases vencidos.
+JOBS_WORKER_FILAS = [
+    f.strip() for f in config('JOBS_WORKER_FILAS', default='imports').split(',') if f.strip()
+]
+# Sem heartbeat por este tempo o job é considerado órfão e volta para a fila.
+JOBS_LEASE_SEGUNDOS = config('JOBS_LEASE_SEGUNDOS', default=900, cast=int)
+JOBS_WORKER_POLL_SECONDS = config('JOBS_WORKER_POLL_SECONDS', default=2, cast=float)
+# Concorrência padrão por fila no run_worker (sobrescrita por --queues=fila:N)
+JOBS_CONCORRENCIA = {
+    'imports': config('JOBS_CONCORRENCIA_IMPORTS', default=1, cast=int),
+    'pap': config('JOBS_CONCORRENCIA_PAP', default=1, cast=int),
+    'webhook': config('JOBS_CONCORRENCIA_WEBHOOK', default=2, cast=int),
+    'folha': config('JOBS_CONCORRENCIA_FOLHA', default=1, cast=int),
+}
+IMPORTACAO_LEGADO_CHUNK = config('IMPORTACAO_LEGADO_CHUNK', default=500, cast=int)
+# r2 = bucket (worker em outro serviço, padrão em produção); local = MEDIA_ROOT, só quando web e
+# worker compartilham o disco (desenvolvimento). Sem credenciais R2 o upload falha no despacho.
+IMPORTACAO_UPLOAD_STORAGE = config('IMPORTACAO_UPLOAD_STORAGE', default='local' if DEBUG else 'r2')
+IMPORTACAO_R2_FOLDER = config('IMPORTACAO_R2_FOLDER', default='Importacoes')
 
 # Sentry (tier gratuito — definir SENTRY_DSN no Railway)
 SENTRY_DSN = config('SENTRY_DSN', default='')
@@ -71,6 +71,12 @@ class MetricsView(View):
             pap_queue_running = PapJobFila.objects.filter(status=PapJobFila.STATUS_PROCESSANDO).count()
         except Exception:
             pass
+        try:
+            from crm_app.pap_job_fila import metricas_espera_por_tipo
+
+            pap_queue_wait = metricas_espera_por_tipo()
+        except Exception:
+            pap_queue_wait = {}
         try:
             from crm_app.whatsapp_webhook_fila import WhatsappWebhookFila
 
@@ -109,6 +115,7 @@ class MetricsView(View):
                 "whatsapp_dedicated_worker": getattr(settings, "WHATSAPP_USE_DEDICATED_WORKER", False),
                 "pap_queue_pending": pap_queue_pending,
                 "pap_queue_running": pap_queue_running,
+                "pap_queue_wait": pap_queue_wait,
                 "webhook_queue_pending": webhook_queue_pending,
                 "webhook_queue_running": webhook_queue_running,
                 "cache_ok": cache_ok,
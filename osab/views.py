@@ -1,7 +1,5 @@
 # osab/views.py
 
-import pandas as pd
-import numpy as np
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -9,6 +7,10 @@ from rest_framework.parsers import MultiPartParser, FormParser
 
 from usuarios.permissions import CheckAPIPermission
 from .models import Osab
+from crm_app.lazy_imports import LazyModule
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
 
 class UploadOsabView(APIView):
     permission_classes = [CheckAPIPermission]
@@ -6,10 +6,13 @@ from django.db import connection
 from django.db.utils import OperationalError
 from datetime import datetime, timedelta
 from django.http import HttpResponse
-import pandas as pd
 from io import BytesIO
 import logging
 
+from crm_app.lazy_imports import LazyModule
+
+pd = LazyModule('pandas')  # só os exports Excel usam
+
 # Configuração do logger para depuração
 logger = logging.getLogger(__name__)
 
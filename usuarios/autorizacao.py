@@ -0,0 +1,145 @@
+"""
+Snapshot de autorização por usuário: grupos, perfil, permissões e liderados diretos.
+
+`is_member`, `CheckAPIPermission`, `VendaPermission` e os filtros de equipe consultavam
+grupos/permissões no banco a cada chamada (dezenas por request na Esteira e nos exports).
+Agora o snapshot é calculado uma vez e:
+- fica no próprio objeto do usuário (`request.user`) pelo resto do request;
+- vai para o cache padrão por AUTORIZACAO_CACHE_TTL_SEG, na chave da geração atual.
+
+Invalidação (usuarios/signals.py): mudança de grupos, permissões diretas, perfil,
+supervisor ou flags do usuário apaga a chave dele (e a dos supervisores afetados) na
+hora; mudança de permissões de um grupo ou renomeação de grupo/perfil incrementa a
+geração `autorizacao` (`versao_indice`), relida por processo a cada
+AUTORIZACAO_VERSAO_TTL_SEG. Escritas com `.update()` em massa dependem do TTL.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from crm_app.versao_indice import VersaoLocal, incrementar_versao
+
+logger = logging.getLogger(__name__)
+
+NOME_VERSAO = 'autorizacao'
+ATRIBUTO_MEMO = '_snapshot_autorizacao'
+
+_versao = VersaoLocal(
+    NOME_VERSAO, ttl_seg=float(getattr(settings, 'AUTORIZACAO_VERSAO_TTL_SEG', 15)),
+)
+
+
+@dataclass(frozen=True)
+class SnapshotAutorizacao:
+    user_id: int
+    is_superuser: bool
+    is_active: bool
+    grupos: frozenset
+    perfil: Optional[str]
+    permissoes: frozenset
+    liderados_ids: tuple
+
+    def tem_grupo(self, nomes: Iterable[str]) -> bool:
+        """Só grupos do Django (sem perfil nem superusuário)."""
+        return not self.grupos.isdisjoint(nomes)
+
+    def pertence(self, nomes: Iterable[str]) -> bool:
+        """Mesma regra de `crm_app.utils.is_member`: superusuário, grupo ou nome do perfil."""
+        nomes = set(nomes)
+        return self.is_superuser or self.tem_grupo(nomes) or (self.perfil is not None and self.perfil in nomes)
+
+    def tem_perm(self, perm: str) -> bool:
+        """Mesma regra de `User.has_perm` com o ModelBackend."""
+        if not self.is_active:
+            return False
+        return self.is_superuser or perm in self.permissoes
+
+
+def _geracao() -> int:
+    try:
+        return _versao.obter()
+    except Exception:
+        logger.exception('[AUTORIZACAO] Falha ao ler geração do cache')
+        return -1
+
+
+def _chave(user_id: int, geracao: int) -> str:
+    return f'autorizacao:v{geracao}:{user_id}'
+
+
+def _calcular(user) -> SnapshotAutorizacao:
+    perfil = None
+    if getattr(user, 'perfil_id', None):
+        try:
+            perfil = user.perfil.nome
+        except Exception:
+            perfil = None
+    return SnapshotAutorizacao(
+        user_id=user.pk,
+        is_superuser=bool(user.is_superuser),
+        is_active=bool(user.is_active),
+        grupos=frozenset(user.groups.values_list('name', flat=True)),
+        perfil=perfil,
+        permissoes=frozenset(user.get_all_permissions()),
+        liderados_ids=tuple(user.liderados.order_by('pk').values_list('pk', flat=True)),
+    )
+
+
+def snapshot_autorizacao(user: Any) -> Optional[SnapshotAutorizacao]:
+    """Snapshot do usuário (memo no objeto + cache); None para anônimo ou não salvo."""
+    if not user or not getattr(user, 'pk', None) or not getattr(user, 'is_authenticated', False):
+        return None
+    snap = getattr(user, ATRIBUTO_MEMO, None)
+    if snap is not None:
+        return snap
+
+    ttl = int(getattr(settings, 'AUTORIZACAO_CACHE_TTL_SEG', 300))
+    geracao = _geracao()
+    chave = _chave(user.pk, geracao)
+    if ttl > 0 and geracao >= 0:
+        try:
+            snap = cache.get(chave)
+        except Exception:
+            logger.exception('[AUTORIZACAO] Falha ao ler cache do usuário %s', user.pk)
+    if snap is None:
+        snap = _calcular(user)
+        if ttl > 0 and geracao >= 0:
+            try:
+                cache.set(chave, snap, ttl)
+            except Exception:
+                logger.exception('[AUTORIZACAO] Falha ao gravar cache do usuário %s', user.pk)
+    setattr(user, ATRIBUTO_MEMO, snap)
+    return snap
+
+
+def ids_liderados(user: Any) -> list[int]:
+    """Liderados diretos (`Usuario.liderados`) a partir do snapshot."""
+    snap = snapshot_autorizacao(user)
+    if snap is None:
+        return []
+    return list(snap.liderados_ids)
+
+
+def invalidar_usuarios(ids: Iterable[Optional[int]], instancia: Any = None) -> None:
+    """Apaga o snapshot dos usuários (todos os processos) e o memo da instância alterada."""
+    if instancia is not None and hasattr(instancia, ATRIBUTO_MEMO):
+        delattr(instancia, ATRIBUTO_MEMO)
+    ids = {int(i) for i in ids if i}
+    if not ids:
+        return
+    geracao = _geracao()
+    try:
+        cache.delete_many([_chave(i, geracao) for i in ids])
+    except Exception:
+        logger.exception('[AUTORIZACAO] Falha ao invalidar cache de %s', sorted(ids))
+
+
+def invalidar_todos(motivo: str = '') -> None:
+    """Nova geração: todos os snapshots em cache deixam de valer."""
+    incrementar_versao(NOME_VERSAO, motivo=motivo)
+    _versao.invalidar()
@@ -3,6 +3,13 @@
 from rest_framework import permissions
 
 from crm_app.perfis_acesso import is_somente_leitura
+from usuarios.autorizacao import snapshot_autorizacao
+
+
+def _tem_perm(user, perm):
+    snap = snapshot_autorizacao(user)
+    return snap.tem_perm(perm) if snap is not None else user.has_perm(perm)
+
 
 class CheckAPIPermission(permissions.BasePermission):
     """
@@ -51,7 +58,7 @@ class CheckAPIPermission(permissions.BasePermission):
         permission_codename = f'{app_label}.{action}_{resource_name}'
 
         # 6. Verifica se o usuário tem essa permissão (via Grupo ou direta)
-        return request.user.has_perm(permission_codename)
+        return _tem_perm(request.user, permission_codename)
 
 
 class VendaPermission(permissions.BasePermission):
@@ -73,7 +80,8 @@ class VendaPermission(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         # 1. Superusers e Admins Totais (incluindo BackOffice)
-        if request.user.is_superuser or request.user.groups.filter(name__in=['Diretoria', 'Admin', 'BackOffice']).exists():
+        snap = snapshot_autorizacao(request.user)
+        if request.user.is_superuser or (snap is not None and snap.tem_grupo(['Diretoria', 'Admin', 'BackOffice'])):
             return True
 
         # 2. Métodos de Leitura (GET, HEAD, OPTIONS) são permitidos
@@ -92,18 +100,17 @@ class VendaPermission(permissions.BasePermission):
             
             # B) CORREÇÃO: Se o usuário tiver a permissão nativa de editar venda, permite.
             # Isso libera o Backoffice que tem 'crm_app.change_venda'
-            if request.user.has_perm('crm_app.change_venda'):
+            if _tem_perm(request.user, 'crm_app.change_venda'):
                 return True
                 
             # C) CORREÇÃO EXTRA: Se o usuário tem acesso aos painéis de gestão, 
             # subentende-se que ele precisa alterar status.
-            user_perms = request.user.get_all_permissions()
-            if 'crm_app.can_view_auditoria' in user_perms or 'crm_app.can_view_esteira' in user_perms:
+            if _tem_perm(request.user, 'crm_app.can_view_auditoria') or _tem_perm(request.user, 'crm_app.can_view_esteira'):
                  return True
 
         # 4. DELETE (Geralmente restrito)
         if request.method == 'DELETE':
-            if request.user.has_perm('crm_app.delete_venda'):
+            if _tem_perm(request.user, 'crm_app.delete_venda'):
                 return True
 
         return False
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Invalidação do snapshot de autorização (`usuarios/autorizacao.py`).
+
+Mudanças de um usuário apagam só a chave dele (e dos supervisores cujos liderados
+mudaram); mudanças que afetam muitos usuários (permissões de grupo, nome de grupo ou
+perfil) abrem uma nova geração do cache.
+"""
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .autorizacao import invalidar_todos, invalidar_usuarios
+from .models import Perfil, Usuario
+
+CAMPOS_AUTORIZACAO = frozenset({
+    'perfil', 'perfil_id', 'supervisor', 'supervisor_id', 'is_superuser', 'is_active', 'is_staff',
+})
+ACOES_M2M = frozenset({'post_add', 'post_remove', 'post_clear'})
+
+
+def _relevante(update_fields) -> bool:
+    return update_fields is None or bool(set(update_fields) & CAMPOS_AUTORIZACAO)
+
+
+@receiver(pre_save, sender=Usuario)
+def guardar_supervisor_anterior(sender, instance, update_fields=None, **kwargs):
+    if instance.pk and _relevante(update_fields):
+        instance._supervisor_anterior_id = (
+            Usuario.objects.filter(pk=instance.pk).values_list('supervisor_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_usuario_salvo(sender, instance, created=False, update_fields=None, **kwargs):
+    # created: ids podem ser reaproveitados (ex.: SQLite) — não herdar snapshot antigo
+    if not created and not _relevante(update_fields):
+        return
+    anterior = getattr(instance, '_supervisor_anterior_id', None)
+    invalidar_usuarios({instance.pk, instance.supervisor_id, anterior}, instancia=instance)
+
+
+@receiver(post_delete, sender=Usuario)
+def invalidar_usuario_removido(sender, instance, **kwargs):
+    invalidar_usuarios({instance.pk, instance.supervisor_id})
+
+
+@receiver(m2m_changed, sender=Usuario.groups.through)
+@receiver(m2m_changed, sender=Usuario.user_permissions.through)
+def invalidar_grupos_do_usuario(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ACOES_M2M:
+        return
+    if not reverse:
+        invalidar_usuarios({instance.pk}, instancia=instance)
+    elif action == 'post_clear' or not pk_set:
+        invalidar_todos(f'{type(instance).__name__} {instance.pk}: {action}')
+    else:
+        invalidar_usuarios(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidar_permissoes_de_grupo(sender, instance, action, **kwargs):
+    if action in ACOES_M2M:
+        invalidar_todos(f'permissões de {instance}: {action}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Perfil)
+@receiver(post_delete, sender=Perfil)
+def invalidar_nome_grupo_ou_perfil(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    invalidar_todos(f'{sender.__name__} {instance.pk} alterado')
@@ -50,4 +50,72 @@ class UsuarioModelTest(TestCase):
         Verifica se o relacionamento com o modelo Perfil está funcionando.
         """
         self.assertEqual(self.usuario.perfil.nome, 'Consultor')
-        self.assertEqual(str(self.usuario.perfil), 'Consultor') # Testa o método __str__ do Perfil
\ No newline at end of file
+        self.assertEqual(str(self.usuario.perfil), 'Consultor') # Testa o método __str__ do Perfil
+
+
+class SnapshotAutorizacaoTest(TestCase):
+    """Snapshot de autorização em cache (usuarios/autorizacao.py) e sua invalidação."""
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+
+        from usuarios import autorizacao
+
+        # a geração volta a 0 no rollback de cada teste; não herdar a lida pelo processo
+        autorizacao._versao.invalidar()
+        self.grupo = Group.objects.create(name='BackOffice')
+        self.supervisor = Usuario.objects.create_user(username='sup_autz', password='x')
+        self.usuario = Usuario.objects.create_user(username='vend_autz', password='x', supervisor=self.supervisor)
+
+    def _fresco(self, user):
+        return Usuario.objects.get(pk=user.pk)
+
+    def test_is_member_usa_snapshot_sem_nova_consulta(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from crm_app.utils import is_member
+
+        user = self._fresco(self.usuario)
+        self.assertFalse(is_member(user, ['BackOffice']))
+        with self.assertNumQueries(0):
+            self.assertFalse(is_member(user, ['BackOffice', 'Admin']))
+
+        # outro objeto do mesmo usuário (novo request): lê o cache, sem consultar grupos
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertFalse(is_member(self._fresco(self.usuario), ['Admin']))
+        self.assertFalse([q for q in ctx.captured_queries if 'auth_group' in q['sql']])
+
+    def test_mudanca_de_grupo_e_perfil_invalida(self):
+        from crm_app.utils import is_member
+
+        self.assertFalse(is_member(self._fresco(self.usuario), ['BackOffice']))
+        self.grupo.user_set.add(self.usuario)
+        self.assertTrue(is_member(self._fresco(self.usuario), ['BackOffice']))
+
+        perfil = Perfil.objects.create(nome='Supervisor', cod_perfil='sup')
+        self.assertFalse(is_member(self._fresco(self.usuario), ['Supervisor']))
+        self.usuario.perfil = perfil
+        self.usuario.save()
+        self.assertTrue(is_member(self._fresco(self.usuario), ['Supervisor']))
+
+        perfil.nome = 'Supervisor Regional'
+        perfil.save()
+        self.assertFalse(is_member(self._fresco(self.usuario), ['Supervisor']))
+
+    def test_permissoes_de_grupo_e_liderados(self):
+        from django.contrib.auth.models import Permission
+
+        from usuarios.autorizacao import ids_liderados, snapshot_autorizacao
+
+        self.usuario.groups.add(self.grupo)
+        self.assertFalse(snapshot_autorizacao(self._fresco(self.usuario)).tem_perm('crm_app.change_venda'))
+        self.grupo.permissions.add(Permission.objects.get(codename='change_venda', content_type__app_label='crm_app'))
+        self.assertTrue(snapshot_autorizacao(self._fresco(self.usuario)).tem_perm('crm_app.change_venda'))
+
+        self.assertEqual(ids_liderados(self._fresco(self.supervisor)), [self.usuario.pk])
+        outro = Usuario.objects.create_user(username='sup2_autz', password='x')
+        self.usuario.supervisor = outro
+        self.usuario.save()
+        self.assertEqual(ids_liderados(self._fresco(self.supervisor)), [])
+        self.assertEqual(ids_liderados(self._fresco(outro)), [self.usuario.pk])
@@ -14,7 +14,10 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from crm_app.whatsapp_service import WhatsAppService
 from datetime import datetime
 import re
-import openpyxl
+
+from crm_app.lazy_imports import LazyModule
+
+openpyxl = LazyModule('openpyxl')
 
 from .models import Usuario, Perfil, PermissaoPerfil
 from .serializers import (